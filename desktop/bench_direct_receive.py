@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Verify io-daemon direct-to-disk receive and compare it with plain forwarding.
+
+A local Python peer streams PIECE messages for a two-file torrent. With
+direct receive the daemon writes and verifies the pieces itself and only
+OP_TCP_BLOCK events reach the client; without it every byte is forwarded
+as OP_TCP_RECV (which the engine would then copy, hash and write back).
+
+Usage: python bench_direct_receive.py [--mb 64] [--piece-kb 256]
+"""
+
+import argparse
+import hashlib
+import os
+import socket
+import struct
+import threading
+import time
+
+from io_daemon_client import ROOT_KEY, IoSocket, running_daemon
+
+OP_TCP_CONNECT = 0x10
+OP_TCP_CONNECTED = 0x11
+OP_TCP_SEND = 0x12
+OP_TCP_RECV = 0x13
+OP_TCP_CLOSE = 0x14
+OP_TCP_BLOCK = 0x1B
+OP_TCP_DIRECT = 0x1C
+OP_TCP_DIRECT_RESULT = 0x1D
+OP_DISK_LAYOUT_SET = 0x40
+OP_DISK_LAYOUT_RESULT = 0x41
+
+MSG_UNCHOKE = 1
+MSG_INTERESTED = 2
+MSG_REQUEST = 6
+MSG_PIECE = 7
+
+BLOCK_SIZE = 16384
+HANDSHAKE_LEN = 68
+PIECE_VERIFIED = 1
+
+
+def handshake():
+    return b"\x13BitTorrent protocol" + bytes(8) + bytes(20) + os.urandom(20)
+
+
+def wire_message(msg_id, payload=b""):
+    return struct.pack(">IB", len(payload) + 1, msg_id) + payload
+
+
+class Seeder:
+    """Serves one connection: handshake, then every block once INTERESTED arrives."""
+
+    def __init__(self, data, piece_length):
+        self.data = data
+        self.piece_length = piece_length
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _recv_exact(self, conn, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("client closed")
+            buf += chunk
+        return buf
+
+    def _serve(self):
+        conn, _ = self.server.accept()
+        with conn:
+            self._recv_exact(conn, HANDSHAKE_LEN)
+            conn.sendall(handshake())
+            length, msg_id = struct.unpack(">IB", self._recv_exact(conn, 5))
+            assert msg_id == MSG_INTERESTED and length == 1
+            out = [wire_message(MSG_UNCHOKE)]
+            for offset in range(0, len(self.data), BLOCK_SIZE):
+                index, begin = divmod(offset, self.piece_length)
+                block = self.data[offset : offset + BLOCK_SIZE]
+                out.append(wire_message(MSG_PIECE, struct.pack(">II", index, begin) + block))
+                if len(out) >= 64:
+                    conn.sendall(b"".join(out))
+                    out = []
+            conn.sendall(b"".join(out))
+            # Drain the client's REQUESTs until it hangs up
+            try:
+                while conn.recv(65536):
+                    pass
+            except OSError:
+                pass
+
+
+def pack_layout(layout_id, piece_length, files, piece_hashes):
+    root = ROOT_KEY.encode()
+    out = [
+        struct.pack("<IIQB", layout_id, piece_length, sum(n for _, n in files), len(root)),
+        root,
+        struct.pack("<I", len(files)),
+    ]
+    for path, length in files:
+        p = path.encode()
+        out.append(struct.pack("<QH", length, len(p)) + p)
+    out.append(struct.pack("<I", len(piece_hashes)) + b"".join(piece_hashes))
+    return b"".join(out)
+
+
+def open_peer(ws, socket_id, port):
+    ws.send(OP_TCP_CONNECT, socket_id, struct.pack("<IH", socket_id, port) + b"127.0.0.1")
+    msg_type, _, payload = ws.recv()
+    assert msg_type == OP_TCP_CONNECTED and payload[4] == 0, "connect failed"
+    ws.send(OP_TCP_SEND, 0, struct.pack("<I", socket_id) + handshake())
+    received = 0
+    while received < HANDSHAKE_LEN:
+        msg_type, _, payload = ws.recv()
+        assert msg_type == OP_TCP_RECV, f"unexpected {msg_type:#x}"
+        received += len(payload) - 4
+    assert received == HANDSHAKE_LEN, "peer sent data before INTERESTED"
+
+
+def run_forwarding(port, data, piece_length):
+    ws = IoSocket(port)
+    ws.authenticate()
+    seeder = Seeder(data, piece_length)
+    open_peer(ws, 1, seeder.port)
+    expected = len(data) // BLOCK_SIZE * (13 + BLOCK_SIZE) + 5
+
+    start = time.perf_counter()
+    ws.send(OP_TCP_SEND, 0, struct.pack("<I", 1) + wire_message(MSG_INTERESTED))
+    received = 0
+    while received < expected:
+        msg_type, _, payload = ws.recv()
+        if msg_type == OP_TCP_RECV:
+            received += len(payload) - 4
+    elapsed = time.perf_counter() - start
+    ws.send(OP_TCP_CLOSE, 0, struct.pack("<I", 1))
+    ws.close()
+    return elapsed
+
+
+def run_direct(port, download_root, data, piece_length):
+    ws = IoSocket(port)
+    ws.authenticate()
+    pieces = [data[i : i + piece_length] for i in range(0, len(data), piece_length)]
+    hashes = [hashlib.sha1(p).digest() for p in pieces]
+    # Split mid-piece so some pieces span both files
+    split = len(data) // 2 + BLOCK_SIZE // 2
+    files = [("direct/a.bin", split), ("direct/b.bin", len(data) - split)]
+
+    ws.send(OP_DISK_LAYOUT_SET, 7, pack_layout(1, piece_length, files, hashes))
+    msg_type, _, payload = ws.recv()
+    assert msg_type == OP_DISK_LAYOUT_RESULT and payload[4] == 0, f"layout rejected: {payload[5:]}"
+
+    seeder = Seeder(data, piece_length)
+    open_peer(ws, 1, seeder.port)
+    ws.send(OP_TCP_DIRECT, 8, struct.pack("<IIQ", 1, 1, HANDSHAKE_LEN))
+    msg_type, _, payload = ws.recv()
+    assert msg_type == OP_TCP_DIRECT_RESULT and payload[4] == 0, "direct receive rejected"
+
+    # The daemon only writes blocks we requested
+    requests = [
+        wire_message(MSG_REQUEST, struct.pack(">III", *divmod(offset, piece_length), BLOCK_SIZE))
+        for offset in range(0, len(data), BLOCK_SIZE)
+    ]
+    start = time.perf_counter()
+    ws.send(OP_TCP_SEND, 0, struct.pack("<I", 1) + wire_message(MSG_INTERESTED) + b"".join(requests))
+    blocks = 0
+    verified = 0
+    forwarded = 0
+    while blocks < len(data) // BLOCK_SIZE:
+        msg_type, _, payload = ws.recv()
+        if msg_type == OP_TCP_BLOCK:
+            _, index, begin, length, status, piece_result = struct.unpack("<IIIIBB", payload)
+            assert status == 0, f"block {index}:{begin} status {status}"
+            blocks += 1
+            verified += piece_result == PIECE_VERIFIED
+        elif msg_type == OP_TCP_RECV:
+            forwarded += len(payload) - 4
+    elapsed = time.perf_counter() - start
+    ws.send(OP_TCP_CLOSE, 0, struct.pack("<I", 1))
+    ws.close()
+
+    assert verified == len(pieces), f"{verified}/{len(pieces)} pieces verified"
+    assert forwarded == 5, f"expected only UNCHOKE forwarded, got {forwarded} bytes"
+    on_disk = b""
+    for path, _ in files:
+        with open(os.path.join(download_root, path), "rb") as f:
+            on_disk += f.read()
+    assert on_disk == data, "file contents mismatch"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mb", type=int, default=64)
+    parser.add_argument("--piece-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    piece_length = args.piece_kb * 1024
+    data = os.urandom(args.mb * 1024 * 1024)
+
+    with running_daemon() as (port, download_root):
+        print(f"io-daemon on port {port}: {args.mb}MB in {args.piece_kb}KB pieces")
+        direct_s = run_direct(port, download_root, data, piece_length)
+        print("  OK all pieces written and verified by the daemon, files match")
+        forward_s = run_forwarding(port, data, piece_length)
+        print(f"  forwarding (receive only): {args.mb / forward_s:8.1f} MB/s")
+        print(f"  direct (write + verify):   {args.mb / direct_s:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
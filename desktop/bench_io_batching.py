@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark io-daemon RECV batching and credit-based flow control.
+
+Many local peers stream data at once through the daemon. Reports WebSocket
+frames and throughput with plain per-read TCP_RECV frames versus
+TCP_RECV_BATCH, then checks that with credit enabled a consumer that stops
+granting credit caps what the daemon forwards at the window.
+
+Usage: python bench_io_batching.py [--conns 200] [--kb 1024] [--window-kb 1024]
+"""
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+from io_daemon_client import IoSocket, running_daemon
+
+OP_TCP_CONNECT = 0x10
+OP_TCP_CONNECTED = 0x11
+OP_TCP_SEND = 0x12
+OP_TCP_RECV = 0x13
+OP_TCP_CLOSE = 0x14
+OP_TCP_RECV_BATCH = 0x1E
+OP_IO_CONFIGURE = 0x50
+OP_IO_CONFIGURED = 0x51
+OP_IO_CREDIT = 0x52
+OP_IO_STATS = 0x53
+OP_IO_STATS_RESULT = 0x54
+
+IO_FLAG_BATCH_RECV = 1
+IO_FLAG_CREDIT = 2
+
+# Daemon read size for plain forwarding; a read waits until this much credit is free
+TCP_READ_SIZE = 8192
+
+
+class Streamer:
+    """Accepts connections; each one gets `size` bytes once it sends a byte."""
+
+    def __init__(self, size):
+        self.payload = bytes(range(256)) * (size // 256)
+        self.server = socket.create_server(("127.0.0.1", 0), backlog=1024)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            conn, _ = self.server.accept()
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                if conn.recv(1):
+                    conn.sendall(self.payload)
+                conn.recv(1)
+            except OSError:
+                pass
+
+
+class Client:
+    def __init__(self, port, flags=0, window=0):
+        self.ws = IoSocket(port)
+        self.ws.authenticate()
+        self.window = window
+        self.owed = 0
+        self.frames = 0
+        self.received = 0
+        if flags:
+            self.ws.send(OP_IO_CONFIGURE, 1, struct.pack("<BI", flags, window))
+            msg_type, _, payload = self.ws.recv()
+            assert msg_type == OP_IO_CONFIGURED and payload[4] == 0, "configure rejected"
+            self.window = struct.unpack_from("<I", payload)[0]
+
+    def open(self, conns, port):
+        for sid in range(1, conns + 1):
+            self.ws.send(OP_TCP_CONNECT, sid, struct.pack("<IH", sid, port) + b"127.0.0.1")
+        for _ in range(conns):
+            msg_type, _, payload = self.ws.recv()
+            assert msg_type == OP_TCP_CONNECTED and payload[4] == 0, "connect failed"
+        for sid in range(1, conns + 1):
+            self.ws.send(OP_TCP_SEND, 0, struct.pack("<I", sid) + b"g")
+
+    def pump(self, grant=True):
+        """Read one frame and grant credit like the engine does."""
+        msg_type, _, payload = self.ws.recv()
+        self.frames += 1
+        if msg_type == OP_TCP_RECV:
+            got = len(payload) - 4
+        elif msg_type == OP_TCP_RECV_BATCH:
+            got, off = 0, 0
+            while off < len(payload):
+                (n,) = struct.unpack_from("<I", payload, off)
+                got += n
+                off += 8 + n
+        else:
+            return msg_type, payload
+        self.received += got
+        self.owed += got
+        if grant and self.window and self.owed >= self.window // 4:
+            self.ws.send(OP_IO_CREDIT, 0, struct.pack("<I", self.owed))
+            self.owed = 0
+        return msg_type, payload
+
+    def close(self, conns):
+        for sid in range(1, conns + 1):
+            self.ws.send(OP_TCP_CLOSE, 0, struct.pack("<I", sid))
+        self.ws.close()
+
+
+def run_throughput(port, streamer, conns, flags, window):
+    client = Client(port, flags, window)
+    client.open(conns, streamer.port)
+    expected = conns * len(streamer.payload)
+    start = time.perf_counter()
+    while client.received < expected:
+        client.pump()
+    elapsed = time.perf_counter() - start
+    client.close(conns)
+    return elapsed, client.frames
+
+
+def check_credit_cap(port, streamer, conns, window):
+    client = Client(port, IO_FLAG_BATCH_RECV | IO_FLAG_CREDIT, window)
+    client.open(conns, streamer.port)
+    # Stop granting: the daemon must stop forwarding at the window
+    while client.received <= client.window - TCP_READ_SIZE:
+        client.pump(grant=False)
+    time.sleep(0.5)
+    client.ws.send(OP_IO_STATS, 2)
+    msg_type = None
+    while msg_type != OP_IO_STATS_RESULT:
+        msg_type, payload = client.pump(grant=False)
+    assert client.received <= client.window, f"{client.received} bytes beyond {client.window}"
+
+    available, _status, count = struct.unpack_from("<IBI", payload)
+    waiting = sum(
+        struct.unpack_from("<I", payload, 9 + i * 12 + 8)[0] > 0 for i in range(count)
+    )
+    client.close(conns)
+    return client.received, available, waiting
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--conns", type=int, default=200)
+    parser.add_argument("--kb", type=int, default=1024, help="bytes per connection")
+    parser.add_argument("--window-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    streamer = Streamer(args.kb * 1024)
+    total_mb = args.conns * args.kb / 1024
+    window = args.window_kb * 1024
+
+    with running_daemon() as (port, _):
+        print(f"io-daemon on port {port}: {args.conns} connections x {args.kb}KB")
+        modes = [
+            ("per-read", 0, 0),
+            ("batched", IO_FLAG_BATCH_RECV, 0),
+            ("batched+credit", IO_FLAG_BATCH_RECV | IO_FLAG_CREDIT, window),
+        ]
+        for name, flags, win in modes:
+            elapsed, frames = run_throughput(port, streamer, args.conns, flags, win)
+            print(
+                f"  {name:<15} {total_mb / elapsed:8.1f} MB/s  {frames:8d} frames  "
+                f"{frames / elapsed:10.0f} frames/s"
+            )
+
+        capped, available, waiting = check_credit_cap(port, streamer, args.conns, window)
+        print(
+            f"  OK without grants the daemon stopped at {capped} bytes "
+            f"(window {window}, credit left {available}, {waiting} reads waiting)"
+        )
+
+
+if __name__ == "__main__":
+    main()
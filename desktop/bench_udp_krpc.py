@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark io-daemon UDP batching with a flood of DHT KRPC pings.
+
+Local flooder sockets send bencoded KRPC ping queries to a UDP socket bound
+through the daemon; the client answers every ping through the daemon the way
+KRPCSocket does. Reports packets/sec and CPU per packet (client and daemon)
+with per-datagram UDP_RECV/UDP_SEND frames versus UDP_RECV_BATCH and
+UDP_SEND_BATCH.
+
+Usage: python bench_udp_krpc.py [--packets 200000] [--flooders 4]
+"""
+
+import argparse
+import os
+import socket
+import struct
+import threading
+import time
+
+from io_daemon_client import IoSocket, running_daemon
+
+OP_UDP_BIND = 0x20
+OP_UDP_BOUND = 0x21
+OP_UDP_SEND = 0x22
+OP_UDP_RECV = 0x23
+OP_UDP_CLOSE = 0x24
+OP_UDP_SEND_BATCH = 0x27
+OP_UDP_RECV_BATCH = 0x28
+OP_IO_CONFIGURE = 0x50
+OP_IO_CONFIGURED = 0x51
+
+IO_FLAG_BATCH_UDP = 4
+
+SOCKET_ID = 1
+PONG = b"d1:rd2:id20:" + b"\x01" * 20 + b"e1:t2:aa1:y1:re"
+
+
+def ping(seq):
+    return b"d1:ad2:id20:" + b"\x02" * 20 + b"e1:q4:ping1:t2:" + struct.pack("<H", seq) + b"1:y1:qe"
+
+
+def daemon_cpu():
+    """CPU seconds used by the daemon child process, or None off Linux."""
+    try:
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == os.getpid():
+                return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except OSError:
+        pass
+    return None
+
+
+class Flooder:
+    """Sends pings at the daemon's UDP port and counts pongs."""
+
+    def __init__(self, port, count):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+        self.sock.settimeout(1.0)
+        self.port = port
+        self.count = count
+        self.pongs = 0
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+
+    def start(self):
+        self.receiver.start()
+        threading.Thread(target=self._send, daemon=True).start()
+
+    def _send(self):
+        target = ("127.0.0.1", self.port)
+        for seq in range(self.count):
+            self.sock.sendto(ping(seq & 0xFFFF), target)
+            # Keep the daemon's receive buffer from overflowing
+            if seq - self.pongs > 512:
+                time.sleep(0.0005)
+
+    def _receive(self):
+        while self.pongs < self.count:
+            try:
+                self.sock.recv(2048)
+            except socket.timeout:
+                return
+            self.pongs += 1
+
+
+def datagrams(msg_type, payload):
+    """(port, addr) of each ping in an UDP_RECV or UDP_RECV_BATCH payload."""
+    if msg_type == OP_UDP_RECV:
+        port, addr_len = struct.unpack_from("<HH", payload, 4)
+        return [(port, payload[8 : 8 + addr_len])]
+    (count,) = struct.unpack_from("<H", payload, 4)
+    out, off = [], 6
+    for _ in range(count):
+        port, addr_len = struct.unpack_from("<HH", payload, off)
+        addr = payload[off + 4 : off + 4 + addr_len]
+        off += 4 + addr_len
+        (data_len,) = struct.unpack_from("<H", payload, off)
+        off += 2 + data_len
+        out.append((port, addr))
+    return out
+
+
+def run(port, packets, flooders, batched):
+    ws = IoSocket(port)
+    ws.authenticate()
+    if batched:
+        ws.send(OP_IO_CONFIGURE, 1, struct.pack("<BI", IO_FLAG_BATCH_UDP, 0))
+        msg_type, _, payload = ws.recv()
+        assert msg_type == OP_IO_CONFIGURED and payload[4] == 0, "configure rejected"
+
+    ws.send(OP_UDP_BIND, 2, struct.pack("<IH", SOCKET_ID, 0) + b"127.0.0.1")
+    msg_type, _, payload = ws.recv()
+    assert msg_type == OP_UDP_BOUND and payload[4] == 0, "bind failed"
+    (udp_port,) = struct.unpack_from("<H", payload, 5)
+
+    senders = [Flooder(udp_port, packets // flooders) for _ in range(flooders)]
+    expected = sum(s.count for s in senders)
+    cpu_start, daemon_start = time.process_time(), daemon_cpu()
+    start = time.perf_counter()
+    for sender in senders:
+        sender.start()
+
+    received = frames = 0
+    while received < expected:
+        msg_type, _, payload = ws.recv()
+        if msg_type not in (OP_UDP_RECV, OP_UDP_RECV_BATCH):
+            continue
+        frames += 1
+        pings = datagrams(msg_type, payload)
+        received += len(pings)
+        if batched:
+            out = bytearray(struct.pack("<IH", SOCKET_ID, len(pings)))
+            for dport, addr in pings:
+                out += struct.pack("<HH", dport, len(addr)) + addr
+                out += struct.pack("<H", len(PONG)) + PONG
+            ws.send(OP_UDP_SEND_BATCH, 0, bytes(out))
+        else:
+            for dport, addr in pings:
+                header = struct.pack("<IHH", SOCKET_ID, dport, len(addr))
+                ws.send(OP_UDP_SEND, 0, header + addr + PONG)
+
+    for sender in senders:
+        sender.receiver.join()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    daemon_end = daemon_cpu()
+    daemon = None if daemon_start is None else daemon_end - daemon_start
+
+    ws.send(OP_UDP_CLOSE, 0, struct.pack("<I", SOCKET_ID))
+    ws.close()
+    pongs = sum(s.pongs for s in senders)
+    return elapsed, frames, received, pongs, cpu, daemon
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--packets", type=int, default=200000)
+    parser.add_argument("--flooders", type=int, default=4)
+    args = parser.parse_args()
+
+    with running_daemon() as (port, _):
+        print(f"io-daemon on port {port}: {args.packets} KRPC pings from {args.flooders} sockets")
+        for name, batched in (("per-datagram", False), ("batched", True)):
+            elapsed, frames, received, pongs, cpu, daemon = run(
+                port, args.packets, args.flooders, batched
+            )
+            daemon_us = "n/a" if daemon is None else f"{daemon / received * 1e6:.2f}"
+            print(
+                f"  {name:<13} {received / elapsed:10.0f} pkt/s  {frames:8d} frames  "
+                f"{pongs:8d} pongs  client {cpu / received * 1e6:6.2f} us/pkt  "
+                f"daemon {daemon_us} us/pkt"
+            )
+
+
+if __name__ == "__main__":
+    main()
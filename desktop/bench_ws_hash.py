@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark io-daemon piece hashing: one POST /hash/sha1 per piece versus
+streaming 16KB blocks over the /io WebSocket (OP_HASH_OPEN/UPDATE/FINALIZE).
+
+Reports throughput and completion latency, i.e. the time from the last
+block being available to having the digest.
+
+Usage: python bench_ws_hash.py [--piece-kb 1024] [--pieces 64]
+"""
+
+import argparse
+import hashlib
+import os
+import statistics
+import struct
+import time
+
+import requests
+
+from io_daemon_client import TOKEN, IoSocket, running_daemon
+
+OP_HASH_OPEN = 0x30
+OP_HASH_UPDATE = 0x31
+OP_HASH_FINALIZE = 0x32
+OP_HASH_RESULT = 0x33
+
+HASH_ALGO_SHA1 = 0
+BLOCK_SIZE = 16384
+
+
+def bench_http(port, pieces):
+    session = requests.Session()
+    url = f"http://127.0.0.1:{port}/hash/sha1"
+    latencies = []
+    start = time.perf_counter()
+    for piece in pieces:
+        t0 = time.perf_counter()
+        resp = session.post(url, headers={"X-JST-Auth": TOKEN}, data=piece)
+        latencies.append(time.perf_counter() - t0)
+        assert resp.status_code == 200, f"hash failed: {resp.status_code}"
+        assert resp.content == hashlib.sha1(piece).digest(), "HTTP digest mismatch"
+    return time.perf_counter() - start, latencies
+
+
+def bench_ws(port, pieces):
+    ws = IoSocket(port)
+    ws.authenticate()
+    latencies = []
+    start = time.perf_counter()
+    for i, piece in enumerate(pieces):
+        hash_id = i + 1
+        id_bytes = struct.pack("<I", hash_id)
+        ws.send(OP_HASH_OPEN, 0, id_bytes + bytes([HASH_ALGO_SHA1]))
+        for off in range(0, len(piece), BLOCK_SIZE):
+            ws.send(OP_HASH_UPDATE, 0, id_bytes + piece[off : off + BLOCK_SIZE])
+        t0 = time.perf_counter()
+        ws.send(OP_HASH_FINALIZE, hash_id, id_bytes)
+        msg_type, req_id, payload = ws.recv()
+        latencies.append(time.perf_counter() - t0)
+        assert msg_type == OP_HASH_RESULT and req_id == hash_id, f"unexpected reply {msg_type:#x}"
+        assert payload[4] == 0, f"hash status {payload[4]}"
+        assert payload[5:] == hashlib.sha1(piece).digest(), "WS digest mismatch"
+    elapsed = time.perf_counter() - start
+    ws.close()
+    return elapsed, latencies
+
+
+def report(name, elapsed, latencies, total_mb):
+    ms = sorted(s * 1000 for s in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(
+        f"  {name:<10} {total_mb / elapsed:8.1f} MB/s   "
+        f"completion latency median {statistics.median(ms):6.2f} ms  p95 {p95:6.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--piece-kb", type=int, default=1024)
+    parser.add_argument("--pieces", type=int, default=64)
+    args = parser.parse_args()
+
+    pieces = [os.urandom(args.piece_kb * 1024) for _ in range(args.pieces)]
+    total_mb = args.piece_kb * args.pieces / 1024
+
+    with running_daemon() as (port, _):
+        print(f"io-daemon on port {port}: {args.pieces} pieces of {args.piece_kb}KB")
+        report("http", *bench_http(port, pieces), total_mb)
+        report("ws-stream", *bench_ws(port, pieces), total_mb)
+
+
+if __name__ == "__main__":
+    main()
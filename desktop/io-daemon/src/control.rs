@@ -26,6 +26,16 @@ pub struct StatsResponse {
     bytes_sent: u64,
     /// Total bytes received
     bytes_received: u64,
+    /// Number of open streaming hashes
+    open_hashes: u32,
+    /// Total bytes fed to streaming hashes
+    bytes_hashed: u64,
+    /// Total PIECE payload bytes written by direct-to-disk receive
+    direct_bytes_written: u64,
+    /// Total binary frames sent over /io WebSockets
+    ws_frames_sent: u64,
+    /// Number of socket reads that had to wait for client credit
+    credit_waits: u64,
     /// Uptime in seconds
     uptime_secs: u64,
 }
@@ -63,6 +73,11 @@ async fn stats(State(state): State<Arc<AppState>>) -> Json<StatsResponse> {
         ws_connections: stats.ws_connections.load(Ordering::Relaxed),
         bytes_sent: stats.bytes_sent.load(Ordering::Relaxed),
         bytes_received: stats.bytes_received.load(Ordering::Relaxed),
+        open_hashes: stats.open_hashes.load(Ordering::Relaxed),
+        bytes_hashed: stats.bytes_hashed.load(Ordering::Relaxed),
+        direct_bytes_written: stats.direct_bytes_written.load(Ordering::Relaxed),
+        ws_frames_sent: stats.ws_frames_sent.load(Ordering::Relaxed),
+        credit_waits: stats.credit_waits.load(Ordering::Relaxed),
         uptime_secs: now.saturating_sub(start_time),
     })
 }
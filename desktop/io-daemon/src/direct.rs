@@ -0,0 +1,732 @@
+//! Direct-to-disk receive for peer connections.
+//!
+//! When enabled for a TCP socket, the read task parses the BitTorrent wire
+//! stream itself: PIECE payloads are written straight into the torrent's
+//! files and hashed as they land, and only a small block event goes back
+//! over the WebSocket. All other messages are forwarded unchanged.
+//!
+//! Only blocks that answer one of the client's outstanding REQUESTs are
+//! written, and never into a piece that is already complete, so a peer can't
+//! overwrite verified data with bytes we didn't ask for. Any other block is
+//! forwarded to the client as a plain PIECE message.
+
+use sha1::{Digest, Sha1};
+use std::collections::{BTreeMap, HashMap, HashSet};
+use std::fs::{self, File, OpenOptions};
+use std::io::{Seek, SeekFrom, Write};
+use std::path::PathBuf;
+use std::sync::atomic::{AtomicBool, Ordering};
+use std::sync::Mutex;
+
+const MSG_CHOKE: u8 = 0;
+const MSG_HAVE: u8 = 4;
+const MSG_BITFIELD: u8 = 5;
+const MSG_REQUEST: u8 = 6;
+const MSG_PIECE: u8 = 7;
+const MSG_CANCEL: u8 = 8;
+const MSG_HAVE_ALL: u8 = 0x0E;
+const MSG_REJECT_REQUEST: u8 = 0x10;
+
+/// Outstanding requests tracked per socket. Far above any pipeline depth;
+/// reaching it means the outgoing stream isn't being parsed correctly.
+const MAX_TRACKED_REQUESTS: usize = 65536;
+
+/// PIECE header after the length prefix: id(1) + index(4) + begin(4)
+const PIECE_HEADER_LEN: usize = 9;
+
+/// Largest wire message accepted while parsing. Blocks are 16KB; the largest
+/// other messages are bitfields of very large torrents.
+const MAX_MESSAGE_LEN: usize = 16 * 1024 * 1024;
+
+/// Cached file handles per layout before the cache is flushed
+const MAX_OPEN_FILES: usize = 64;
+
+// Block event status
+pub const BLOCK_WRITTEN: u8 = 0;
+pub const BLOCK_IO_ERROR: u8 = 1;
+pub const BLOCK_OUT_OF_RANGE: u8 = 2;
+// 3 was "not requested"; such blocks are now forwarded as PIECE messages
+pub const BLOCK_PIECE_COMPLETE: u8 = 4;
+
+// Piece result, carried on the block event that completes a piece
+pub const PIECE_PENDING: u8 = 0;
+pub const PIECE_VERIFIED: u8 = 1;
+pub const PIECE_HASH_MISMATCH: u8 = 2;
+
+struct LayoutFile {
+    offset: u64,
+    length: u64,
+    path: PathBuf,
+}
+
+/// Running SHA1 over the contiguous prefix of a piece.
+/// Out-of-order blocks are held until the gap before them is filled.
+struct PieceProgress {
+    hasher: Sha1,
+    hashed: u32,
+    pending: BTreeMap<u32, Vec<u8>>,
+}
+
+#[derive(Default)]
+struct LayoutState {
+    handles: HashMap<usize, File>,
+    pieces: HashMap<u32, PieceProgress>,
+    /// Pieces verified here; later blocks for them are dropped
+    complete: HashSet<u32>,
+}
+
+/// File layout and piece hashes of one torrent, registered by the client.
+pub struct DiskLayout {
+    piece_length: u64,
+    total_length: u64,
+    files: Vec<LayoutFile>,
+    piece_hashes: Vec<[u8; 20]>,
+    active: AtomicBool,
+    state: Mutex<LayoutState>,
+}
+
+struct Reader<'a> {
+    data: &'a [u8],
+    pos: usize,
+}
+
+impl<'a> Reader<'a> {
+    fn take(&mut self, n: usize) -> Result<&'a [u8], String> {
+        if self.data.len() - self.pos < n {
+            return Err("Truncated disk layout".to_string());
+        }
+        let slice = &self.data[self.pos..self.pos + n];
+        self.pos += n;
+        Ok(slice)
+    }
+
+    fn u8(&mut self) -> Result<u8, String> {
+        Ok(self.take(1)?[0])
+    }
+
+    fn u16(&mut self) -> Result<u16, String> {
+        Ok(u16::from_le_bytes(self.take(2)?.try_into().unwrap()))
+    }
+
+    fn u32(&mut self) -> Result<u32, String> {
+        Ok(u32::from_le_bytes(self.take(4)?.try_into().unwrap()))
+    }
+
+    fn u64(&mut self) -> Result<u64, String> {
+        Ok(u64::from_le_bytes(self.take(8)?.try_into().unwrap()))
+    }
+
+    fn string(&mut self, len: usize) -> Result<String, String> {
+        String::from_utf8(self.take(len)?.to_vec()).map_err(|_| "Invalid UTF-8".to_string())
+    }
+}
+
+impl DiskLayout {
+    /// Parse a layout registration.
+    ///
+    /// Format (little-endian):
+    ///   [pieceLength:4][totalLength:8][rootKeyLen:1][rootKey]
+    ///   [fileCount:4] then per file: [length:8][pathLen:2][path]
+    ///   [pieceCount:4][sha1:20 * pieceCount]
+    ///
+    /// `resolve` maps (rootKey, relative path) to an absolute, validated path.
+    pub fn parse<F>(data: &[u8], resolve: F) -> Result<Self, String>
+    where
+        F: Fn(&str, &str) -> Result<PathBuf, String>,
+    {
+        let mut r = Reader { data, pos: 0 };
+        let piece_length = r.u32()? as u64;
+        let total_length = r.u64()?;
+        let root_len = r.u8()? as usize;
+        let root_key = r.string(root_len)?;
+
+        let file_count = r.u32()? as usize;
+        // Each file entry is at least 10 bytes - bound the allocation by the payload
+        let mut files = Vec::with_capacity(file_count.min(data.len() / 10));
+        let mut offset = 0u64;
+        for _ in 0..file_count {
+            let length = r.u64()?;
+            let path_len = r.u16()? as usize;
+            let path = r.string(path_len)?;
+            files.push(LayoutFile {
+                offset,
+                length,
+                path: resolve(&root_key, &path)?,
+            });
+            offset = offset.checked_add(length).ok_or("File lengths overflow")?;
+        }
+
+        if piece_length == 0 || offset != total_length {
+            return Err("Inconsistent piece or file lengths".to_string());
+        }
+        let piece_count = r.u32()? as u64;
+        if piece_count != total_length.div_ceil(piece_length) {
+            return Err("Piece count does not match total length".to_string());
+        }
+        let mut piece_hashes = Vec::with_capacity(piece_count as usize);
+        for _ in 0..piece_count {
+            piece_hashes.push(r.take(20)?.try_into().unwrap());
+        }
+        if r.pos != data.len() {
+            return Err("Trailing bytes after disk layout".to_string());
+        }
+
+        Ok(Self {
+            piece_length,
+            total_length,
+            files,
+            piece_hashes,
+            active: AtomicBool::new(true),
+            state: Mutex::new(LayoutState::default()),
+        })
+    }
+
+    /// Whether PIECE messages should be written through this layout.
+    /// Removed layouts stay referenced by read tasks, which then forward
+    /// PIECE messages to the client as ordinary data.
+    pub fn is_active(&self) -> bool {
+        self.active.load(Ordering::Relaxed)
+    }
+
+    pub fn deactivate(&self) {
+        self.active.store(false, Ordering::Relaxed);
+        if let Ok(mut state) = self.state.lock() {
+            *state = LayoutState::default();
+        }
+    }
+
+    /// Forget hash state for a piece (e.g. after the client restarted it).
+    pub fn reset_piece(&self, index: u32) {
+        if let Ok(mut state) = self.state.lock() {
+            state.pieces.remove(&index);
+            state.complete.remove(&index);
+        }
+    }
+
+    fn piece_size(&self, index: u32) -> Option<u64> {
+        let start = index as u64 * self.piece_length;
+        if index as usize >= self.piece_hashes.len() {
+            return None;
+        }
+        Some(self.piece_length.min(self.total_length - start))
+    }
+
+    /// Write one block to disk and feed it to the piece hash.
+    /// Blocks of a piece already verified here are dropped unwritten.
+    /// Blocking - call from spawn_blocking.
+    ///
+    /// Returns (block status, piece result).
+    pub fn write_block(&self, index: u32, begin: u32, data: &[u8]) -> (u8, u8) {
+        let piece_size = match self.piece_size(index) {
+            Some(size) => size,
+            None => return (BLOCK_OUT_OF_RANGE, PIECE_PENDING),
+        };
+        if data.is_empty() || begin as u64 + data.len() as u64 > piece_size {
+            return (BLOCK_OUT_OF_RANGE, PIECE_PENDING);
+        }
+
+        let mut state = match self.state.lock() {
+            Ok(state) => state,
+            Err(_) => return (BLOCK_IO_ERROR, PIECE_PENDING),
+        };
+        if state.complete.contains(&index) {
+            return (BLOCK_PIECE_COMPLETE, PIECE_PENDING);
+        }
+
+        let torrent_offset = index as u64 * self.piece_length + begin as u64;
+        if self.write_segments(&mut state, torrent_offset, data).is_err() {
+            // Drop cached handles in case one went bad
+            state.handles.clear();
+            return (BLOCK_IO_ERROR, PIECE_PENDING);
+        }
+
+        let progress = state.pieces.entry(index).or_insert_with(|| PieceProgress {
+            hasher: Sha1::new(),
+            hashed: 0,
+            pending: BTreeMap::new(),
+        });
+        if begin > progress.hashed {
+            progress.pending.insert(begin, data.to_vec());
+        } else {
+            feed(progress, begin, data);
+        }
+        while let Some((&start, _)) = progress.pending.first_key_value() {
+            if start > progress.hashed {
+                break;
+            }
+            let block = progress.pending.remove(&start).unwrap();
+            feed(progress, start, &block);
+        }
+
+        if progress.hashed as u64 != piece_size {
+            return (BLOCK_WRITTEN, PIECE_PENDING);
+        }
+        let progress = state.pieces.remove(&index).unwrap();
+        let digest = progress.hasher.finalize();
+        if digest.as_slice() == self.piece_hashes[index as usize] {
+            state.complete.insert(index);
+            (BLOCK_WRITTEN, PIECE_VERIFIED)
+        } else {
+            (BLOCK_WRITTEN, PIECE_HASH_MISMATCH)
+        }
+    }
+
+    fn write_segments(
+        &self,
+        state: &mut LayoutState,
+        torrent_offset: u64,
+        data: &[u8],
+    ) -> std::io::Result<()> {
+        // First file that ends after torrent_offset
+        let mut i = self
+            .files
+            .partition_point(|f| f.offset + f.length <= torrent_offset);
+        let mut offset = torrent_offset;
+        let mut remaining = data;
+        while !remaining.is_empty() && i < self.files.len() {
+            let file = &self.files[i];
+            let within = offset - file.offset;
+            let n = remaining.len().min((file.length - within) as usize);
+            if n > 0 {
+                if !state.handles.contains_key(&i) && state.handles.len() >= MAX_OPEN_FILES {
+                    state.handles.clear();
+                }
+                let handle = match state.handles.entry(i) {
+                    std::collections::hash_map::Entry::Occupied(e) => e.into_mut(),
+                    std::collections::hash_map::Entry::Vacant(e) => {
+                        if let Some(parent) = file.path.parent() {
+                            fs::create_dir_all(parent)?;
+                        }
+                        let f = OpenOptions::new().write(true).create(true).open(&file.path)?;
+                        e.insert(f)
+                    }
+                };
+                handle.seek(SeekFrom::Start(within))?;
+                handle.write_all(&remaining[..n])?;
+                remaining = &remaining[n..];
+                offset += n as u64;
+            }
+            i += 1;
+        }
+        Ok(())
+    }
+}
+
+/// Feed the part of a block that extends past the hashed prefix.
+fn feed(progress: &mut PieceProgress, begin: u32, data: &[u8]) {
+    let end = begin as u64 + data.len() as u64;
+    if end <= progress.hashed as u64 {
+        return; // Duplicate of data already hashed
+    }
+    let skip = (progress.hashed - begin) as usize;
+    progress.hasher.update(&data[skip..]);
+    progress.hashed = end as u32;
+}
+
+/// What direct receive does with an incoming block.
+#[derive(Debug, PartialEq)]
+pub enum BlockVerdict {
+    /// Answers a tracked request: write it through the layout
+    Write,
+    /// Not tracked: hand it to the client as a PIECE message
+    Forward,
+    /// Report this block status without writing
+    Drop(u8),
+}
+
+/// Requests and announced pieces in the client's outgoing wire stream.
+///
+/// Created when direct receive is enabled and fed every byte the client sends
+/// from then on, starting at a message boundary. Incoming CHOKE and
+/// REJECT_REQUEST messages drop the requests the peer has discarded. Direct
+/// receive asks it whether an incoming block answers an outstanding REQUEST
+/// (not since CANCELed) of a piece we haven't announced with HAVE, BITFIELD or
+/// HAVE_ALL. Blocks it doesn't know about, including answers to requests sent
+/// before it was created, go to the client; a stream that doesn't parse, e.g.
+/// an encrypted one, stops being tracked and has every block forwarded.
+#[derive(Default)]
+pub struct RequestTracker {
+    failed: bool,
+    /// Partial message header or tracked message
+    buf: Vec<u8>,
+    /// Bytes left of an untracked message (e.g. an outgoing PIECE)
+    skip: usize,
+    requests: HashSet<(u32, u32, u32)>,
+    have: HashSet<u32>,
+    bitfield: Vec<u8>,
+    have_all: bool,
+}
+
+impl RequestTracker {
+    /// Parse bytes the client is sending to the peer.
+    pub fn observe(&mut self, mut data: &[u8]) {
+        while !data.is_empty() && !self.failed {
+            if self.skip > 0 {
+                let n = self.skip.min(data.len());
+                self.skip -= n;
+                data = &data[n..];
+                continue;
+            }
+            let need = self.needed();
+            let n = (need - self.buf.len()).min(data.len());
+            self.buf.extend_from_slice(&data[..n]);
+            data = &data[n..];
+            // Step once what is buffered is all the step needs
+            if self.buf.len() == need && self.needed() == need {
+                self.consume();
+            }
+        }
+    }
+
+    /// Buffered bytes needed before the next step.
+    fn needed(&self) -> usize {
+        if self.buf.len() < 4 {
+            return 4;
+        }
+        let len = self.message_len();
+        if len == 0 || len > MAX_MESSAGE_LEN {
+            return 4;
+        }
+        if self.buf.len() < 5 {
+            return 5;
+        }
+        match self.buf[4] {
+            MSG_HAVE | MSG_BITFIELD | MSG_REQUEST | MSG_CANCEL | MSG_HAVE_ALL => 4 + len,
+            _ => 5,
+        }
+    }
+
+    fn message_len(&self) -> usize {
+        u32::from_be_bytes(self.buf[0..4].try_into().unwrap()) as usize
+    }
+
+    fn consume(&mut self) {
+        let buf = std::mem::take(&mut self.buf);
+        let len = u32::from_be_bytes(buf[0..4].try_into().unwrap()) as usize;
+        if len == 0 {
+            return; // Keep-alive
+        }
+        if len > MAX_MESSAGE_LEN {
+            self.fail();
+            return;
+        }
+        let payload = &buf[5..];
+        if payload.len() < len - 1 {
+            self.skip = len - 1;
+            return;
+        }
+        let u32_at = |i: usize| u32::from_be_bytes(payload[i..i + 4].try_into().unwrap());
+        match (buf[4], payload.len()) {
+            (MSG_HAVE, 4) => {
+                self.have.insert(u32_at(0));
+            }
+            (MSG_BITFIELD, _) => self.bitfield = payload.to_vec(),
+            (MSG_HAVE_ALL, 0) => self.have_all = true,
+            (MSG_REQUEST, 12) => {
+                self.requests.insert((u32_at(0), u32_at(4), u32_at(8)));
+                if self.requests.len() > MAX_TRACKED_REQUESTS {
+                    self.fail();
+                }
+            }
+            (MSG_CANCEL, 12) => {
+                self.requests.remove(&(u32_at(0), u32_at(4), u32_at(8)));
+            }
+            _ => {}
+        }
+    }
+
+    /// Parse complete messages received from the peer (the Raw events of
+    /// direct receive) for requests it has discarded.
+    pub fn observe_incoming(&mut self, mut data: &[u8]) {
+        while data.len() >= 4 && !self.failed {
+            let len = u32::from_be_bytes(data[0..4].try_into().unwrap()) as usize;
+            if data.len() < 4 + len {
+                break;
+            }
+            let msg = &data[4..4 + len];
+            data = &data[4 + len..];
+            match (msg.first(), len) {
+                // A choking peer discards every request it hasn't answered
+                (Some(&MSG_CHOKE), 1) => self.requests.clear(),
+                (Some(&MSG_REJECT_REQUEST), 13) => {
+                    let u32_at = |i: usize| u32::from_be_bytes(msg[i..i + 4].try_into().unwrap());
+                    self.requests.remove(&(u32_at(1), u32_at(5), u32_at(9)));
+                }
+                _ => {}
+            }
+        }
+    }
+
+    fn fail(&mut self) {
+        self.failed = true;
+        self.buf = Vec::new();
+        self.requests = HashSet::new();
+    }
+
+    fn has_piece(&self, index: u32) -> bool {
+        let byte = self.bitfield.get(index as usize / 8).copied().unwrap_or(0);
+        self.have_all || self.have.contains(&index) || byte & (0x80 >> (index % 8)) != 0
+    }
+
+    /// Check an incoming block before it is written, consuming its request.
+    pub fn accept_block(&mut self, index: u32, begin: u32, length: u32) -> BlockVerdict {
+        if !self.requests.remove(&(index, begin, length)) {
+            return BlockVerdict::Forward;
+        }
+        if self.has_piece(index) {
+            return BlockVerdict::Drop(BLOCK_PIECE_COMPLETE);
+        }
+        BlockVerdict::Write
+    }
+}
+
+/// Output of the wire parser, in stream order.
+pub enum WireEvent {
+    /// One or more complete non-PIECE messages, forwarded as-is
+    Raw(Vec<u8>),
+    /// A PIECE message to write through the disk layout
+    Block { index: u32, begin: u32, data: Vec<u8> },
+}
+
+/// Encode a block as the PIECE message it arrived in.
+pub fn piece_message(index: u32, begin: u32, data: &[u8]) -> Vec<u8> {
+    let mut m = Vec::with_capacity(4 + PIECE_HEADER_LEN + data.len());
+    m.extend_from_slice(&((PIECE_HEADER_LEN + data.len()) as u32).to_be_bytes());
+    m.push(MSG_PIECE);
+    m.extend_from_slice(&index.to_be_bytes());
+    m.extend_from_slice(&begin.to_be_bytes());
+    m.extend_from_slice(data);
+    m
+}
+
+/// Splits a BitTorrent message stream (after the handshake) at message
+/// boundaries.
+#[derive(Default)]
+pub struct WireParser {
+    buf: Vec<u8>,
+}
+
+impl WireParser {
+    /// Append bytes and emit every complete message.
+    /// With `split_pieces` false, PIECE messages are forwarded as Raw.
+    pub fn push(
+        &mut self,
+        data: &[u8],
+        split_pieces: bool,
+        out: &mut Vec<WireEvent>,
+    ) -> Result<(), String> {
+        self.buf.extend_from_slice(data);
+
+        let mut pos = 0;
+        let mut raw: Vec<u8> = Vec::new();
+        while self.buf.len() - pos >= 4 {
+            let len = u32::from_be_bytes(self.buf[pos..pos + 4].try_into().unwrap()) as usize;
+            if len > MAX_MESSAGE_LEN {
+                return Err(format!("Wire message too large: {} bytes", len));
+            }
+            if self.buf.len() - pos < 4 + len {
+                break;
+            }
+            let msg = &self.buf[pos + 4..pos + 4 + len];
+            if split_pieces && len >= PIECE_HEADER_LEN && msg[0] == MSG_PIECE {
+                if !raw.is_empty() {
+                    out.push(WireEvent::Raw(std::mem::take(&mut raw)));
+                }
+                out.push(WireEvent::Block {
+                    index: u32::from_be_bytes(msg[1..5].try_into().unwrap()),
+                    begin: u32::from_be_bytes(msg[5..9].try_into().unwrap()),
+                    data: msg[PIECE_HEADER_LEN..].to_vec(),
+                });
+            } else {
+                raw.extend_from_slice(&self.buf[pos..pos + 4 + len]);
+            }
+            pos += 4 + len;
+        }
+        if !raw.is_empty() {
+            out.push(WireEvent::Raw(raw));
+        }
+        self.buf.drain(..pos);
+        Ok(())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn layout_bytes(piece_length: u32, files: &[(&str, u64)], hashes: &[[u8; 20]]) -> Vec<u8> {
+        let total: u64 = files.iter().map(|(_, l)| l).sum();
+        let mut b = piece_length.to_le_bytes().to_vec();
+        b.extend_from_slice(&total.to_le_bytes());
+        b.push(4);
+        b.extend_from_slice(b"root");
+        b.extend_from_slice(&(files.len() as u32).to_le_bytes());
+        for (path, len) in files {
+            b.extend_from_slice(&len.to_le_bytes());
+            b.extend_from_slice(&(path.len() as u16).to_le_bytes());
+            b.extend_from_slice(path.as_bytes());
+        }
+        b.extend_from_slice(&(hashes.len() as u32).to_le_bytes());
+        for h in hashes {
+            b.extend_from_slice(h);
+        }
+        b
+    }
+
+    fn sha1(data: &[u8]) -> [u8; 20] {
+        Sha1::digest(data).into()
+    }
+
+    #[test]
+    fn test_parser_splits_pieces_and_keeps_other_messages() {
+        let have = [0, 0, 0, 5, 4, 0, 0, 0, 9];
+        let keepalive = [0, 0, 0, 0];
+        let mut stream = have.to_vec();
+        stream.extend_from_slice(&keepalive);
+        stream.extend_from_slice(&piece_message(2, 16384, b"abc"));
+        stream.extend_from_slice(&have);
+
+        let mut parser = WireParser::default();
+        let mut out = Vec::new();
+        // Feed in awkward chunks
+        for chunk in stream.chunks(5) {
+            parser.push(chunk, true, &mut out).unwrap();
+        }
+
+        let mut raw = Vec::new();
+        let mut blocks = Vec::new();
+        for e in out {
+            match e {
+                WireEvent::Raw(r) => raw.extend_from_slice(&r),
+                WireEvent::Block { index, begin, data } => blocks.push((index, begin, data)),
+            }
+        }
+        let mut expected_raw = have.to_vec();
+        expected_raw.extend_from_slice(&keepalive);
+        expected_raw.extend_from_slice(&have);
+        assert_eq!(raw, expected_raw);
+        assert_eq!(blocks, vec![(2, 16384, b"abc".to_vec())]);
+    }
+
+    #[test]
+    fn test_parser_forwards_pieces_when_not_splitting() {
+        let msg = piece_message(0, 0, b"xyz");
+        let mut parser = WireParser::default();
+        let mut out = Vec::new();
+        parser.push(&msg, false, &mut out).unwrap();
+        assert!(matches!(&out[..], [WireEvent::Raw(r)] if *r == msg));
+    }
+
+    #[test]
+    fn test_parser_rejects_oversized_message() {
+        let mut parser = WireParser::default();
+        let mut out = Vec::new();
+        assert!(parser.push(&[0xFF, 0xFF, 0xFF, 0xFF], true, &mut out).is_err());
+    }
+
+    #[test]
+    fn test_layout_rejects_bad_lengths() {
+        let dir = std::env::temp_dir();
+        let resolve = |_: &str, p: &str| -> Result<PathBuf, String> { Ok(dir.join(p)) };
+        let bytes = layout_bytes(16, &[("a", 10)], &[[0; 20], [0; 20]]);
+        assert!(DiskLayout::parse(&bytes, resolve).is_err());
+        let mut bytes = layout_bytes(16, &[("a", 10)], &[[0; 20]]);
+        bytes.push(0);
+        assert!(DiskLayout::parse(&bytes, resolve).is_err());
+    }
+
+    #[test]
+    fn test_write_blocks_across_files_and_verify() {
+        let dir = std::env::temp_dir().join(format!("jst-direct-{}", std::process::id()));
+        let content: Vec<u8> = (0..40u8).collect();
+        // Piece 0 = bytes 0..32 spans a.bin (20) and sub/b.bin (first 12 bytes)
+        let hashes = [sha1(&content[..32]), sha1(&content[32..])];
+        let bytes = layout_bytes(32, &[("a.bin", 20), ("sub/b.bin", 20)], &hashes);
+        let resolve = |_: &str, p: &str| -> Result<PathBuf, String> { Ok(dir.join(p)) };
+        let layout = DiskLayout::parse(&bytes, resolve).unwrap();
+
+        // Out of order, with a duplicate
+        assert_eq!(layout.write_block(0, 16, &content[16..32]), (BLOCK_WRITTEN, PIECE_PENDING));
+        assert_eq!(layout.write_block(0, 16, &content[16..32]), (BLOCK_WRITTEN, PIECE_PENDING));
+        assert_eq!(layout.write_block(0, 0, &content[..16]), (BLOCK_WRITTEN, PIECE_VERIFIED));
+
+        // Last piece is short; corrupt it
+        assert_eq!(layout.write_block(1, 0, &[0u8; 8]), (BLOCK_WRITTEN, PIECE_HASH_MISMATCH));
+        assert_eq!(layout.write_block(1, 0, &content[32..]), (BLOCK_WRITTEN, PIECE_VERIFIED));
+
+        // Verified pieces are not overwritten
+        assert_eq!(layout.write_block(0, 0, &[0u8; 16]).0, BLOCK_PIECE_COMPLETE);
+
+        assert_eq!(layout.write_block(1, 4, &[0u8; 8]).0, BLOCK_OUT_OF_RANGE);
+        assert_eq!(layout.write_block(2, 0, &[0u8; 1]).0, BLOCK_OUT_OF_RANGE);
+
+        drop(layout);
+        assert_eq!(fs::read(dir.join("a.bin")).unwrap(), &content[..20]);
+        assert_eq!(fs::read(dir.join("sub/b.bin")).unwrap(), &content[20..]);
+        fs::remove_dir_all(&dir).ok();
+    }
+
+    fn wire_msg(id: u8, payload: &[u8]) -> Vec<u8> {
+        let mut m = ((payload.len() + 1) as u32).to_be_bytes().to_vec();
+        m.push(id);
+        m.extend_from_slice(payload);
+        m
+    }
+
+    fn request_payload(index: u32, begin: u32, length: u32) -> Vec<u8> {
+        [index, begin, length].iter().flat_map(|v| v.to_be_bytes()).collect()
+    }
+
+    #[test]
+    fn test_tracker_accepts_only_requested_blocks() {
+        let mut stream = wire_msg(MSG_BITFIELD, &[0b0100_0000]);
+        stream.extend_from_slice(&wire_msg(MSG_REQUEST, &request_payload(0, 0, 16384)));
+        stream.extend_from_slice(&wire_msg(MSG_REQUEST, &request_payload(0, 16384, 16384)));
+        // An upload in between is skipped without being buffered
+        stream.extend_from_slice(&piece_message(1, 0, &[7u8; 1000]));
+        stream.extend_from_slice(&wire_msg(MSG_REQUEST, &request_payload(2, 0, 16384)));
+        stream.extend_from_slice(&wire_msg(MSG_CANCEL, &request_payload(0, 16384, 16384)));
+        stream.extend_from_slice(&wire_msg(MSG_REQUEST, &request_payload(3, 0, 16384)));
+        stream.extend_from_slice(&wire_msg(MSG_HAVE, &3u32.to_be_bytes()));
+        stream.extend_from_slice(&[0, 0, 0, 0]);
+
+        let mut tracker = RequestTracker::default();
+        for chunk in stream.chunks(7) {
+            tracker.observe(chunk);
+        }
+        assert_eq!(tracker.accept_block(0, 0, 16384), BlockVerdict::Write);
+        // Each request is answered once; anything else goes to the client
+        assert_eq!(tracker.accept_block(0, 0, 16384), BlockVerdict::Forward);
+        assert_eq!(tracker.accept_block(0, 16384, 16384), BlockVerdict::Forward);
+        assert_eq!(tracker.accept_block(2, 0, 16384), BlockVerdict::Write);
+        assert_eq!(tracker.accept_block(3, 0, 16384), BlockVerdict::Drop(BLOCK_PIECE_COMPLETE));
+        assert_eq!(tracker.accept_block(1, 0, 16384), BlockVerdict::Forward);
+    }
+
+    #[test]
+    fn test_tracker_drops_requests_the_peer_discards() {
+        let mut tracker = RequestTracker::default();
+        for (index, begin) in [(0, 0), (0, 16384), (1, 0)] {
+            tracker.observe(&wire_msg(MSG_REQUEST, &request_payload(index, begin, 16384)));
+        }
+        let mut incoming = wire_msg(MSG_HAVE, &5u32.to_be_bytes());
+        incoming.extend_from_slice(&wire_msg(MSG_REJECT_REQUEST, &request_payload(0, 16384, 16384)));
+        tracker.observe_incoming(&incoming);
+        assert_eq!(tracker.accept_block(0, 16384, 16384), BlockVerdict::Forward);
+        assert_eq!(tracker.accept_block(0, 0, 16384), BlockVerdict::Write);
+
+        tracker.observe_incoming(&wire_msg(MSG_CHOKE, &[]));
+        assert_eq!(tracker.accept_block(1, 0, 16384), BlockVerdict::Forward);
+        // Requests sent after the choke are tracked again
+        tracker.observe(&wire_msg(MSG_REQUEST, &request_payload(1, 0, 16384)));
+        assert_eq!(tracker.accept_block(1, 0, 16384), BlockVerdict::Write);
+    }
+
+    #[test]
+    fn test_tracker_forwards_everything_from_unparseable_stream() {
+        let mut tracker = RequestTracker::default();
+        tracker.observe(&[0xAB; 68]);
+        tracker.observe(&wire_msg(MSG_REQUEST, &request_payload(0, 0, 16384)));
+        assert_eq!(tracker.accept_block(0, 0, 16384), BlockVerdict::Forward);
+    }
+}
@@ -1,13 +1,15 @@
 use axum::{
+    body::Bytes,
     extract::{DefaultBodyLimit, Path, State},
-    http::{HeaderMap, StatusCode},
+    http::{header, HeaderMap, StatusCode},
+    response::IntoResponse,
     routing::{get, post},
     Json, Router,
 };
 use base64::{engine::general_purpose::STANDARD as BASE64, Engine as _};
 use serde::{Deserialize, Serialize};
 use sha1::{Digest, Sha1};
-use std::path::PathBuf;
+use std::path::{Path as FsPath, PathBuf};
 use std::sync::Arc;
 use tokio::fs::{self, File};
 use tokio::io::{AsyncReadExt, AsyncSeekExt, AsyncWriteExt};
@@ -17,6 +19,17 @@ use crate::AppState;
 // 64MB limit for piece writes (must match MAX_PIECE_SIZE in engine)
 pub const MAX_BODY_SIZE: usize = 64 * 1024 * 1024;
 
+// Batched writes carry up to MAX_BODY_SIZE of piece data plus per-item headers.
+// The engine splits larger batches across requests.
+pub const MAX_BATCH_BODY_SIZE: usize = MAX_BODY_SIZE + 1024 * 1024;
+
+// Per-item result codes for batched verified writes.
+// Must match WriteResultCode in packages/engine/src/io/verified-write-batch.ts
+pub const WRITE_RESULT_SUCCESS: u8 = 0;
+pub const WRITE_RESULT_HASH_MISMATCH: u8 = 1;
+pub const WRITE_RESULT_IO_ERROR: u8 = 2;
+pub const WRITE_RESULT_INVALID_ARGS: u8 = 3;
+
 #[allow(deprecated)]
 pub fn routes() -> Router<Arc<AppState>> {
     Router::new()
@@ -32,6 +45,11 @@ pub fn routes() -> Router<Arc<AppState>> {
         .route("/ops/delete", post(delete_file))
         .route("/ops/truncate", post(truncate_file))
         .layer(DefaultBodyLimit::max(MAX_BODY_SIZE))
+        .merge(
+            Router::new()
+                .route("/write-verified-batch", post(write_verified_batch))
+                .layer(DefaultBodyLimit::max(MAX_BATCH_BODY_SIZE)),
+        )
 }
 
 // ============================================================================
@@ -191,38 +209,217 @@ async fn write_file_v2(
         }
     }
 
-    // Ensure parent directory exists
+    write_at(&full_path, offset, &body).await.map_err(|e| {
+        if e.kind() == std::io::ErrorKind::StorageFull {
+            (StatusCode::INSUFFICIENT_STORAGE, e.to_string())
+        } else {
+            (StatusCode::INTERNAL_SERVER_ERROR, e.to_string())
+        }
+    })?;
+
+    Ok(())
+}
+
+/// Write bytes at an offset, creating the file and parent directories if needed.
+async fn write_at(full_path: &FsPath, offset: u64, data: &[u8]) -> std::io::Result<()> {
     if let Some(parent) = full_path.parent() {
-        fs::create_dir_all(parent).await.map_err(|e| {
-            if e.kind() == std::io::ErrorKind::StorageFull {
-                (StatusCode::INSUFFICIENT_STORAGE, e.to_string())
-            } else {
-                (StatusCode::INTERNAL_SERVER_ERROR, e.to_string())
-            }
-        })?;
+        fs::create_dir_all(parent).await?;
     }
 
     let mut file = fs::OpenOptions::new()
         .write(true)
         .create(true)
-        .open(&full_path)
-        .await
-        .map_err(|e| (StatusCode::INTERNAL_SERVER_ERROR, e.to_string()))?;
+        .open(full_path)
+        .await?;
 
     if offset > 0 {
-        file.seek(SeekFrom::Start(offset)).await
-            .map_err(|e| (StatusCode::INTERNAL_SERVER_ERROR, e.to_string()))?;
+        file.seek(SeekFrom::Start(offset)).await?;
     }
 
-    file.write_all(&body).await.map_err(|e| {
-        if e.kind() == std::io::ErrorKind::StorageFull {
-            (StatusCode::INSUFFICIENT_STORAGE, e.to_string())
-        } else {
-            (StatusCode::INTERNAL_SERVER_ERROR, e.to_string())
+    file.write_all(data).await
+}
+
+// ============================================================================
+// Batched verified writes
+// ============================================================================
+
+/// One item of a verified write batch. `data` is a zero-copy slice of the body.
+struct VerifiedWriteItem {
+    root_key: String,
+    path: String,
+    position: u64,
+    data: Bytes,
+    expected_sha1_hex: String,
+}
+
+/// Little-endian cursor over a batch request body.
+struct BatchReader<'a> {
+    buf: &'a Bytes,
+    pos: usize,
+}
+
+impl<'a> BatchReader<'a> {
+    fn new(buf: &'a Bytes) -> Self {
+        Self { buf, pos: 0 }
+    }
+
+    fn take(&mut self, n: usize) -> Result<Bytes, String> {
+        if self.buf.len() - self.pos < n {
+            return Err(format!(
+                "Truncated batch: need {} bytes at offset {}, have {}",
+                n,
+                self.pos,
+                self.buf.len() - self.pos
+            ));
         }
-    })?;
+        let slice = self.buf.slice(self.pos..self.pos + n);
+        self.pos += n;
+        Ok(slice)
+    }
 
-    Ok(())
+    fn u8(&mut self) -> Result<u8, String> {
+        Ok(self.take(1)?[0])
+    }
+
+    fn u16(&mut self) -> Result<u16, String> {
+        let b = self.take(2)?;
+        Ok(u16::from_le_bytes([b[0], b[1]]))
+    }
+
+    fn u32(&mut self) -> Result<u32, String> {
+        let b = self.take(4)?;
+        Ok(u32::from_le_bytes([b[0], b[1], b[2], b[3]]))
+    }
+
+    fn u64(&mut self) -> Result<u64, String> {
+        let b = self.take(8)?;
+        let mut arr = [0u8; 8];
+        arr.copy_from_slice(&b);
+        Ok(u64::from_le_bytes(arr))
+    }
+
+    fn string(&mut self, len: usize) -> Result<String, String> {
+        let b = self.take(len)?;
+        String::from_utf8(b.to_vec()).map_err(|_| "Invalid UTF-8 in batch string".to_string())
+    }
+}
+
+/// Parse a verified write batch.
+///
+/// Format (same as the Android native batch, little-endian):
+///   [count: u32] then for each write:
+///     [rootKeyLen: u8] [rootKey]
+///     [pathLen: u16] [path]
+///     [position: u64]
+///     [dataLen: u32] [data]
+///     [hashHex: 40 bytes]
+///     [callbackIdLen: u8] [callbackId] (ignored - results are positional)
+fn parse_verified_write_batch(body: &Bytes) -> Result<Vec<VerifiedWriteItem>, String> {
+    let mut r = BatchReader::new(body);
+    let count = r.u32()? as usize;
+    // Every item needs at least 56 bytes of headers, so bound the allocation
+    let mut items = Vec::with_capacity(count.min(body.len() / 56));
+
+    for _ in 0..count {
+        let root_key_len = r.u8()? as usize;
+        let root_key = r.string(root_key_len)?;
+        let path_len = r.u16()? as usize;
+        let path = r.string(path_len)?;
+        let position = r.u64()?;
+        let data_len = r.u32()? as usize;
+        let data = r.take(data_len)?;
+        let expected_sha1_hex = r.string(40)?;
+        let callback_id_len = r.u8()? as usize;
+        r.take(callback_id_len)?;
+
+        items.push(VerifiedWriteItem {
+            root_key,
+            path,
+            position,
+            data,
+            expected_sha1_hex,
+        });
+    }
+
+    if r.pos != body.len() {
+        return Err(format!("Trailing bytes in batch: {}", body.len() - r.pos));
+    }
+
+    Ok(items)
+}
+
+/// Hash-check and write a single batch item. Returns (result code, bytes written).
+async fn write_verified_item(state: &AppState, item: VerifiedWriteItem) -> (u8, u32) {
+    let full_path = match validate_path(state, &item.root_key, &item.path) {
+        Ok(p) => p,
+        Err((_, msg)) => {
+            tracing::warn!("Batch write rejected for {}: {}", item.path, msg);
+            return (WRITE_RESULT_INVALID_ARGS, 0);
+        }
+    };
+
+    // Hash on the blocking pool so items in the batch are verified in parallel
+    let data = item.data.clone();
+    let expected = item.expected_sha1_hex.to_ascii_lowercase();
+    let hash_ok = tokio::task::spawn_blocking(move || {
+        let mut hasher = Sha1::new();
+        hasher.update(&data);
+        hex::encode(hasher.finalize()) == expected
+    })
+    .await;
+
+    match hash_ok {
+        Ok(true) => {}
+        Ok(false) => return (WRITE_RESULT_HASH_MISMATCH, 0),
+        Err(e) => {
+            tracing::error!("Batch hash task failed for {}: {}", item.path, e);
+            return (WRITE_RESULT_IO_ERROR, 0);
+        }
+    }
+
+    match write_at(&full_path, item.position, &item.data).await {
+        Ok(()) => (WRITE_RESULT_SUCCESS, item.data.len() as u32),
+        Err(e) => {
+            tracing::error!("Batch write failed for {}: {}", item.path, e);
+            (WRITE_RESULT_IO_ERROR, 0)
+        }
+    }
+}
+
+/// Encode batch results in request order: [count: u32] then [code: u8][bytesWritten: u32] each.
+fn encode_batch_results(results: &[(u8, u32)]) -> Vec<u8> {
+    let mut out = Vec::with_capacity(4 + results.len() * 5);
+    out.extend_from_slice(&(results.len() as u32).to_le_bytes());
+    for (code, bytes_written) in results {
+        out.push(*code);
+        out.extend_from_slice(&bytes_written.to_le_bytes());
+    }
+    out
+}
+
+/// Batched verified write endpoint.
+/// POST /write-verified-batch
+/// Body: packed batch (see parse_verified_write_batch)
+/// Returns: packed per-item results (see encode_batch_results).
+/// Individual item failures are reported in the results, not as HTTP errors;
+/// only a malformed body yields 400.
+async fn write_verified_batch(
+    State(state): State<Arc<AppState>>,
+    body: Bytes,
+) -> Result<impl IntoResponse, (StatusCode, String)> {
+    let items = parse_verified_write_batch(&body).map_err(|e| (StatusCode::BAD_REQUEST, e))?;
+
+    let results = futures::future::join_all(
+        items
+            .into_iter()
+            .map(|item| write_verified_item(&state, item)),
+    )
+    .await;
+
+    Ok((
+        [(header::CONTENT_TYPE, "application/octet-stream")],
+        encode_batch_results(&results),
+    ))
 }
 
 /// New read endpoint with base64 path in header.
@@ -423,6 +620,8 @@ pub fn validate_path(state: &AppState, root_key: &str, path: &str) -> Result<Pat
 
 #[cfg(test)]
 mod tests {
+    use super::{encode_batch_results, parse_verified_write_batch};
+    use axum::body::Bytes;
     use sha1::{Sha1, Digest};
 
     /// Test helper: compute SHA1 hash the same way as write_file_v2
@@ -464,4 +663,69 @@ mod tests {
         // Verify uppercase would NOT match (this is intentional behavior)
         assert_ne!(hash, hash.to_uppercase());
     }
+
+    /// Test helper: append one item in the engine's packVerifiedWriteBatch format
+    fn pack_item(buf: &mut Vec<u8>, root_key: &str, path: &str, position: u64, data: &[u8], cb: &str) {
+        buf.push(root_key.len() as u8);
+        buf.extend_from_slice(root_key.as_bytes());
+        buf.extend_from_slice(&(path.len() as u16).to_le_bytes());
+        buf.extend_from_slice(path.as_bytes());
+        buf.extend_from_slice(&position.to_le_bytes());
+        buf.extend_from_slice(&(data.len() as u32).to_le_bytes());
+        buf.extend_from_slice(data);
+        buf.extend_from_slice(compute_sha1_hex(data).as_bytes());
+        buf.push(cb.len() as u8);
+        buf.extend_from_slice(cb.as_bytes());
+    }
+
+    #[test]
+    fn test_parse_verified_write_batch() {
+        let mut buf = 2u32.to_le_bytes().to_vec();
+        pack_item(&mut buf, "root1", "a/b.bin", 0x1_0000_0001, b"hello", "vw_1");
+        pack_item(&mut buf, "r2", "c.bin", 16384, b"", "vw_2");
+
+        let items = parse_verified_write_batch(&Bytes::from(buf)).unwrap();
+        assert_eq!(items.len(), 2);
+        assert_eq!(items[0].root_key, "root1");
+        assert_eq!(items[0].path, "a/b.bin");
+        assert_eq!(items[0].position, 0x1_0000_0001);
+        assert_eq!(&items[0].data[..], b"hello");
+        assert_eq!(items[0].expected_sha1_hex, "aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d");
+        assert_eq!(items[1].root_key, "r2");
+        assert_eq!(items[1].position, 16384);
+        assert!(items[1].data.is_empty());
+    }
+
+    #[test]
+    fn test_parse_verified_write_batch_truncated() {
+        let mut buf = 1u32.to_le_bytes().to_vec();
+        pack_item(&mut buf, "root", "f", 0, b"data", "c");
+        buf.truncate(buf.len() - 3);
+        assert!(parse_verified_write_batch(&Bytes::from(buf)).is_err());
+    }
+
+    #[test]
+    fn test_parse_verified_write_batch_trailing_bytes() {
+        let mut buf = 1u32.to_le_bytes().to_vec();
+        pack_item(&mut buf, "root", "f", 0, b"data", "c");
+        buf.push(0);
+        assert!(parse_verified_write_batch(&Bytes::from(buf)).is_err());
+    }
+
+    #[test]
+    fn test_parse_verified_write_batch_huge_count() {
+        // A bogus count must not cause a huge allocation or panic
+        let buf = u32::MAX.to_le_bytes().to_vec();
+        assert!(parse_verified_write_batch(&Bytes::from(buf)).is_err());
+    }
+
+    #[test]
+    fn test_encode_batch_results() {
+        let out = encode_batch_results(&[(0, 16384), (1, 0)]);
+        assert_eq!(out.len(), 4 + 2 * 5);
+        assert_eq!(u32::from_le_bytes([out[0], out[1], out[2], out[3]]), 2);
+        assert_eq!(out[4], 0);
+        assert_eq!(u32::from_le_bytes([out[5], out[6], out[7], out[8]]), 16384);
+        assert_eq!(out[9], 1);
+    }
 }
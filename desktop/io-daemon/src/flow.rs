@@ -0,0 +1,238 @@
+//! Flow control for the /io WebSocket.
+//!
+//! With hundreds of peer connections, forwarding every TCP read as its own
+//! OP_TCP_RECV frame costs the client one message event per read. Clients
+//! that opt in via OP_IO_CONFIGURE get:
+//!
+//! - RECV batching: consecutive OP_TCP_RECV frames already queued for the
+//!   WebSocket are packed into one OP_TCP_RECV_BATCH frame.
+//! - Credit: read tasks must hold credit for every byte they forward. The
+//!   client grants credit back (OP_IO_CREDIT) as it consumes data, so a slow
+//!   consumer stops socket reads instead of growing the daemon's queues.
+//!   Clients should grant back consumed bytes once they add up to a quarter
+//!   of the window; a single read never waits for more than half of it.
+//! - UDP batching: each recvmmsg batch is sent as one OP_UDP_RECV_BATCH
+//!   frame instead of one OP_UDP_RECV per datagram.
+//!
+//! Outgoing TCP sends are coalesced per socket regardless of configuration.
+
+use std::sync::atomic::{AtomicBool, AtomicU32, AtomicU64, Ordering};
+use tokio::sync::Semaphore;
+
+/// Upper bound on an OP_TCP_RECV_BATCH frame's payload
+pub const RECV_BATCH_MAX: usize = 256 * 1024;
+/// Upper bound on queued sends merged into one socket write
+pub const SEND_COALESCE_MAX: usize = 64 * 1024;
+/// Smallest credit window accepted
+pub const MIN_CREDIT: u32 = 64 * 1024;
+
+/// OP_IO_CONFIGURE flag bits
+pub const IO_FLAG_BATCH_RECV: u8 = 1;
+pub const IO_FLAG_CREDIT: u8 = 2;
+pub const IO_FLAG_BATCH_UDP: u8 = 4;
+
+/// Per-WebSocket flow control state shared with all socket tasks.
+pub struct FlowControl {
+    batching: AtomicBool,
+    udp_batching: AtomicBool,
+    credit_enabled: AtomicBool,
+    window: AtomicU32,
+    credit: Semaphore,
+}
+
+impl FlowControl {
+    pub fn new() -> Self {
+        Self {
+            batching: AtomicBool::new(false),
+            udp_batching: AtomicBool::new(false),
+            credit_enabled: AtomicBool::new(false),
+            window: AtomicU32::new(0),
+            credit: Semaphore::new(0),
+        }
+    }
+
+    /// Apply OP_IO_CONFIGURE. Credit can only be enabled once per
+    /// connection; returns the credit window in effect (0 when disabled).
+    pub fn configure(&self, flags: u8, initial_credit: u32) -> u32 {
+        self.batching
+            .store(flags & IO_FLAG_BATCH_RECV != 0, Ordering::Relaxed);
+        self.udp_batching
+            .store(flags & IO_FLAG_BATCH_UDP != 0, Ordering::Relaxed);
+        if flags & IO_FLAG_CREDIT != 0 && !self.credit_enabled.swap(true, Ordering::AcqRel) {
+            let window = initial_credit.max(MIN_CREDIT);
+            self.window.store(window, Ordering::Relaxed);
+            self.credit.add_permits(window as usize);
+            return window;
+        }
+        0
+    }
+
+    pub fn batching(&self) -> bool {
+        self.batching.load(Ordering::Relaxed)
+    }
+
+    pub fn udp_batching(&self) -> bool {
+        self.udp_batching.load(Ordering::Relaxed)
+    }
+
+    pub fn credit_enabled(&self) -> bool {
+        self.credit_enabled.load(Ordering::Relaxed)
+    }
+
+    /// Return credit for bytes the client has consumed.
+    pub fn grant(&self, bytes: u32) {
+        if self.credit_enabled() && !self.credit.is_closed() {
+            self.credit.add_permits(bytes as usize);
+        }
+    }
+
+    pub fn available(&self) -> usize {
+        self.credit.available_permits()
+    }
+
+    /// Wait for credit to forward `bytes` to the client. Returns false once
+    /// the connection is gone and the caller should stop reading.
+    pub async fn acquire(
+        &self,
+        bytes: usize,
+        queue: &SocketQueue,
+        stats: &crate::DaemonStats,
+    ) -> bool {
+        if bytes == 0 || !self.credit_enabled() {
+            return true;
+        }
+        // Oversized reads are charged at most half the window so that the
+        // credit the client still holds back can never stall them
+        let bytes = bytes.min(self.window.load(Ordering::Relaxed) as usize / 2);
+        if let Ok(permit) = self.credit.try_acquire_many(bytes as u32) {
+            permit.forget();
+            return true;
+        }
+        stats.credit_waits.fetch_add(1, Ordering::Relaxed);
+        queue.recv_waiting.store(bytes as u32, Ordering::Relaxed);
+        let acquired = match self.credit.acquire_many(bytes as u32).await {
+            Ok(permit) => {
+                permit.forget();
+                true
+            }
+            Err(_) => false,
+        };
+        queue.recv_waiting.store(0, Ordering::Relaxed);
+        acquired
+    }
+
+    /// Wake every task waiting for credit; called when the WebSocket closes.
+    pub fn close(&self) {
+        self.credit.close();
+    }
+}
+
+/// Queue depths of one TCP socket, reported by OP_IO_STATS.
+#[derive(Default)]
+pub struct SocketQueue {
+    /// Bytes accepted from OP_TCP_SEND but not yet written to the socket
+    pub send_queued: AtomicU64,
+    /// Bytes read from the socket that are waiting for client credit
+    pub recv_waiting: AtomicU32,
+}
+
+/// Pack OP_TCP_RECV payloads (socketId(4) + data) into an OP_TCP_RECV_BATCH
+/// payload: per entry dataLen(4), socketId(4), data.
+pub fn pack_recv_batch<'a>(payloads: impl IntoIterator<Item = &'a [u8]>, out: &mut Vec<u8>) {
+    for payload in payloads {
+        let data_len = payload.len().saturating_sub(4) as u32;
+        out.extend_from_slice(&data_len.to_le_bytes());
+        out.extend_from_slice(payload);
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::DaemonStats;
+    use std::sync::Arc;
+
+    fn recv_payload(socket_id: u32, data: &[u8]) -> Vec<u8> {
+        let mut p = socket_id.to_le_bytes().to_vec();
+        p.extend_from_slice(data);
+        p
+    }
+
+    #[test]
+    fn test_pack_recv_batch() {
+        let a = recv_payload(1, b"hello");
+        let b = recv_payload(0x10000, b"");
+        let mut out = Vec::new();
+        pack_recv_batch([a.as_slice(), b.as_slice()], &mut out);
+
+        assert_eq!(out.len(), 4 + 9 + 4 + 4);
+        assert_eq!(&out[0..4], &5u32.to_le_bytes());
+        assert_eq!(&out[4..13], a.as_slice());
+        assert_eq!(&out[13..17], &0u32.to_le_bytes());
+        assert_eq!(&out[17..21], &0x10000u32.to_le_bytes());
+    }
+
+    #[test]
+    fn test_configure_enables_credit_once() {
+        let flow = FlowControl::new();
+        assert!(!flow.credit_enabled());
+        assert_eq!(flow.configure(IO_FLAG_BATCH_RECV, 0), 0);
+        assert!(flow.batching());
+        assert!(!flow.udp_batching());
+        assert_eq!(flow.available(), 0);
+
+        assert_eq!(flow.configure(IO_FLAG_CREDIT, 1024), MIN_CREDIT);
+        assert!(!flow.batching());
+        assert_eq!(flow.available(), MIN_CREDIT as usize);
+        // A second configure must not mint more credit
+        assert_eq!(flow.configure(IO_FLAG_CREDIT, 1 << 20), 0);
+        assert_eq!(flow.available(), MIN_CREDIT as usize);
+    }
+
+    #[tokio::test]
+    async fn test_acquire_waits_for_grant() {
+        let flow = Arc::new(FlowControl::new());
+        let stats = Arc::new(DaemonStats::new());
+        let queue = Arc::new(SocketQueue::default());
+        // Without credit enabled reads are never held back
+        assert!(flow.acquire(1 << 20, &queue, &stats).await);
+
+        flow.configure(IO_FLAG_CREDIT, MIN_CREDIT);
+        // Charged at most half the window per read
+        assert!(flow.acquire(MIN_CREDIT as usize, &queue, &stats).await);
+        assert_eq!(flow.available(), MIN_CREDIT as usize / 2);
+        assert!(flow.acquire(MIN_CREDIT as usize / 2, &queue, &stats).await);
+        assert_eq!(flow.available(), 0);
+
+        let waiter = {
+            let (flow, queue, stats) = (flow.clone(), queue.clone(), stats.clone());
+            tokio::spawn(async move { flow.acquire(100, &queue, &stats).await })
+        };
+        tokio::task::yield_now().await;
+        assert_eq!(queue.recv_waiting.load(Ordering::Relaxed), 100);
+        assert_eq!(stats.credit_waits.load(Ordering::Relaxed), 1);
+
+        flow.grant(150);
+        assert!(waiter.await.unwrap());
+        assert_eq!(flow.available(), 50);
+        assert_eq!(queue.recv_waiting.load(Ordering::Relaxed), 0);
+    }
+
+    #[tokio::test]
+    async fn test_close_releases_waiters() {
+        let flow = Arc::new(FlowControl::new());
+        let stats = Arc::new(DaemonStats::new());
+        let queue = Arc::new(SocketQueue::default());
+        flow.configure(IO_FLAG_CREDIT, MIN_CREDIT);
+        assert!(flow.acquire(MIN_CREDIT as usize, &queue, &stats).await);
+        assert!(flow.acquire(MIN_CREDIT as usize, &queue, &stats).await);
+
+        let waiter = {
+            let (flow, queue, stats) = (flow.clone(), queue.clone(), stats.clone());
+            tokio::spawn(async move { flow.acquire(1, &queue, &stats).await })
+        };
+        tokio::task::yield_now().await;
+        flow.close();
+        assert!(!waiter.await.unwrap());
+    }
+}
@@ -26,6 +26,42 @@ pub fn routes() -> Router<Arc<AppState>> {
         .layer(DefaultBodyLimit::max(MAX_BODY_SIZE))
 }
 
+/// Algorithm ids for streaming hashes over the /io WebSocket (OP_HASH_OPEN)
+pub const HASH_ALGO_SHA1: u8 = 0;
+pub const HASH_ALGO_SHA256: u8 = 1;
+
+/// Running digest for the WebSocket streaming hash opcodes.
+/// Lets the engine feed blocks as they arrive instead of posting whole pieces.
+pub enum StreamingHasher {
+    Sha1(Sha1),
+    Sha256(Sha256),
+}
+
+impl StreamingHasher {
+    pub fn new(algo: u8) -> Option<Self> {
+        match algo {
+            HASH_ALGO_SHA1 => Some(Self::Sha1(Sha1::new())),
+            HASH_ALGO_SHA256 => Some(Self::Sha256(Sha256::new())),
+            _ => None,
+        }
+    }
+
+    pub fn update(&mut self, data: &[u8]) {
+        match self {
+            Self::Sha1(h) => h.update(data),
+            Self::Sha256(h) => h.update(data),
+        }
+    }
+
+    /// Consume the hasher and return the raw digest (20 or 32 bytes).
+    pub fn finalize(self) -> Vec<u8> {
+        match self {
+            Self::Sha1(h) => h.finalize().to_vec(),
+            Self::Sha256(h) => h.finalize().to_vec(),
+        }
+    }
+}
+
 #[derive(Deserialize)]
 struct HashParams {
     offset: Option<u64>,
@@ -129,3 +165,41 @@ async fn hash_sha256_file(
 
     Ok(hex::encode(hasher.finalize()))
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_streaming_sha1_matches_one_shot() {
+        let data = vec![0x5Au8; 3 * 16384 + 100];
+        let mut streaming = StreamingHasher::new(HASH_ALGO_SHA1).unwrap();
+        for chunk in data.chunks(16384) {
+            streaming.update(chunk);
+        }
+        let mut one_shot = Sha1::new();
+        one_shot.update(&data);
+        assert_eq!(streaming.finalize(), one_shot.finalize().to_vec());
+    }
+
+    #[test]
+    fn test_streaming_sha256_digest_length() {
+        let mut streaming = StreamingHasher::new(HASH_ALGO_SHA256).unwrap();
+        streaming.update(b"hello sha256");
+        assert_eq!(streaming.finalize().len(), 32);
+    }
+
+    #[test]
+    fn test_streaming_empty_sha1() {
+        let streaming = StreamingHasher::new(HASH_ALGO_SHA1).unwrap();
+        assert_eq!(
+            hex::encode(streaming.finalize()),
+            "da39a3ee5e6b4b0d3255bfef95601890afd80709"
+        );
+    }
+
+    #[test]
+    fn test_streaming_unknown_algo() {
+        assert!(StreamingHasher::new(7).is_none());
+    }
+}
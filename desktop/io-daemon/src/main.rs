@@ -20,9 +20,12 @@ use tower_http::trace::TraceLayer;
 
 mod auth;
 mod control;
+mod direct;
 mod files;
+mod flow;
 mod hashing;
 mod http;
+mod udp_batch;
 mod ws;
 mod config;
 
@@ -68,6 +71,16 @@ pub struct DaemonStats {
     pub bytes_sent: AtomicU64,
     /// Total bytes received via TCP/UDP
     pub bytes_received: AtomicU64,
+    /// Number of open streaming hashes (WebSocket OP_HASH_*)
+    pub open_hashes: AtomicU32,
+    /// Total bytes fed to streaming hashes
+    pub bytes_hashed: AtomicU64,
+    /// Total PIECE payload bytes written by direct-to-disk receive
+    pub direct_bytes_written: AtomicU64,
+    /// Total binary frames sent over /io WebSockets
+    pub ws_frames_sent: AtomicU64,
+    /// Number of socket reads that had to wait for client credit
+    pub credit_waits: AtomicU64,
     /// Daemon start time (epoch seconds)
     pub start_time: AtomicU64,
 }
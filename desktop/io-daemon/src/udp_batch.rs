@@ -0,0 +1,360 @@
+//! Batched UDP I/O for the /io WebSocket.
+//!
+//! DHT traffic arrives in bursts of small datagrams. On Linux the read task
+//! drains up to `UDP_BATCH` datagrams per recvmmsg(2) call and the client can
+//! hand over many datagrams per frame, which go out with sendmmsg(2). Other
+//! platforms drain the socket with non-blocking reads and send one at a time.
+//!
+//! Wire format shared by OP_UDP_SEND_BATCH and OP_UDP_RECV_BATCH:
+//! socketId(4), count(2), then per datagram port(2), addrLen(2), addr, dataLen(2), data
+//!
+//! Send addresses may be hostnames (e.g. DHT bootstrap routers); they are
+//! resolved before the batch goes out, like OP_UDP_SEND does.
+
+use std::collections::HashMap;
+use std::io;
+use std::net::{IpAddr, SocketAddr};
+use tokio::io::Interest;
+use tokio::net::UdpSocket;
+
+/// Datagrams received per batch
+pub const UDP_BATCH: usize = 16;
+/// Largest UDP payload (IPv4 limit rounded up to the u16 range)
+pub const MAX_DATAGRAM: usize = 65535;
+
+/// Receive buffers reused across recv() calls.
+pub struct RecvBatch {
+    buf: Vec<u8>,
+    lens: [usize; UDP_BATCH],
+    addrs: [Option<SocketAddr>; UDP_BATCH],
+    count: usize,
+}
+
+impl RecvBatch {
+    pub fn new() -> Self {
+        Self {
+            buf: vec![0u8; UDP_BATCH * MAX_DATAGRAM],
+            lens: [0; UDP_BATCH],
+            addrs: [None; UDP_BATCH],
+            count: 0,
+        }
+    }
+
+    /// Wait until the socket is readable, then receive as many datagrams as
+    /// are queued (at least one, at most `UDP_BATCH`).
+    pub async fn recv(&mut self, socket: &UdpSocket) -> io::Result<usize> {
+        let count = socket
+            .async_io(Interest::READABLE, || self.try_recv(socket))
+            .await?;
+        self.count = count;
+        Ok(count)
+    }
+
+    /// Received datagrams; those with an unrepresentable source are skipped.
+    pub fn datagrams(&self) -> impl Iterator<Item = (SocketAddr, &[u8])> {
+        (0..self.count).filter_map(move |i| {
+            let start = i * MAX_DATAGRAM;
+            self.addrs[i].map(|addr| (addr, &self.buf[start..start + self.lens[i]]))
+        })
+    }
+
+    #[cfg(target_os = "linux")]
+    fn try_recv(&mut self, socket: &UdpSocket) -> io::Result<usize> {
+        use std::os::fd::AsRawFd;
+
+        let mut names: [libc::sockaddr_storage; UDP_BATCH] = unsafe { std::mem::zeroed() };
+        let mut iovs: [libc::iovec; UDP_BATCH] = unsafe { std::mem::zeroed() };
+        let mut msgs: [libc::mmsghdr; UDP_BATCH] = unsafe { std::mem::zeroed() };
+        for (i, chunk) in self.buf.chunks_mut(MAX_DATAGRAM).enumerate() {
+            iovs[i].iov_base = chunk.as_mut_ptr() as *mut libc::c_void;
+            iovs[i].iov_len = chunk.len();
+            let hdr = &mut msgs[i].msg_hdr;
+            hdr.msg_name = &mut names[i] as *mut _ as *mut libc::c_void;
+            hdr.msg_namelen = std::mem::size_of::<libc::sockaddr_storage>() as libc::socklen_t;
+            hdr.msg_iov = &mut iovs[i];
+            hdr.msg_iovlen = 1;
+        }
+
+        let n = unsafe {
+            libc::recvmmsg(
+                socket.as_raw_fd(),
+                msgs.as_mut_ptr(),
+                UDP_BATCH as _,
+                libc::MSG_DONTWAIT as _,
+                std::ptr::null_mut(),
+            )
+        };
+        if n < 0 {
+            return Err(io::Error::last_os_error());
+        }
+        let n = n as usize;
+        for i in 0..n {
+            self.lens[i] = msgs[i].msg_len as usize;
+            // SAFETY: the kernel filled in `msg_namelen` bytes of the storage
+            let addr = unsafe { socket2::SockAddr::new(names[i], msgs[i].msg_hdr.msg_namelen) };
+            self.addrs[i] = addr.as_socket();
+        }
+        Ok(n)
+    }
+
+    #[cfg(not(target_os = "linux"))]
+    fn try_recv(&mut self, socket: &UdpSocket) -> io::Result<usize> {
+        let mut n = 0;
+        for chunk in self.buf.chunks_mut(MAX_DATAGRAM) {
+            match socket.try_recv_from(chunk) {
+                Ok((len, addr)) => {
+                    self.lens[n] = len;
+                    self.addrs[n] = Some(addr);
+                    n += 1;
+                }
+                // Report WouldBlock only if nothing was read so readiness is cleared
+                Err(e) if n == 0 => return Err(e),
+                Err(_) => break,
+            }
+        }
+        Ok(n)
+    }
+}
+
+/// Send datagrams in order. Returns the payload bytes sent.
+pub async fn send_batch(socket: &UdpSocket, datagrams: &[(SocketAddr, &[u8])]) -> usize {
+    let mut pos = 0;
+    let mut sent = 0;
+    while pos < datagrams.len() {
+        match socket
+            .async_io(Interest::WRITABLE, || try_send(socket, &datagrams[pos..]))
+            .await
+        {
+            Ok(n) => {
+                sent += datagrams[pos..pos + n]
+                    .iter()
+                    .map(|(_, d)| d.len())
+                    .sum::<usize>();
+                pos += n;
+            }
+            // Only the first datagram can fail (e.g. wrong address family); skip it
+            Err(_) => pos += 1,
+        }
+    }
+    sent
+}
+
+#[cfg(target_os = "linux")]
+fn try_send(socket: &UdpSocket, datagrams: &[(SocketAddr, &[u8])]) -> io::Result<usize> {
+    use std::os::fd::AsRawFd;
+
+    let count = datagrams.len().min(UDP_BATCH);
+    let names: Vec<socket2::SockAddr> = datagrams[..count]
+        .iter()
+        .map(|(addr, _)| socket2::SockAddr::from(*addr))
+        .collect();
+    let mut iovs: [libc::iovec; UDP_BATCH] = unsafe { std::mem::zeroed() };
+    let mut msgs: [libc::mmsghdr; UDP_BATCH] = unsafe { std::mem::zeroed() };
+    for i in 0..count {
+        let data = datagrams[i].1;
+        iovs[i].iov_base = data.as_ptr() as *mut libc::c_void;
+        iovs[i].iov_len = data.len();
+        let hdr = &mut msgs[i].msg_hdr;
+        hdr.msg_name = names[i].as_ptr() as *mut libc::c_void;
+        hdr.msg_namelen = names[i].len();
+        hdr.msg_iov = &mut iovs[i];
+        hdr.msg_iovlen = 1;
+    }
+
+    let n = unsafe { libc::sendmmsg(socket.as_raw_fd(), msgs.as_mut_ptr(), count as _, 0) };
+    if n < 0 {
+        return Err(io::Error::last_os_error());
+    }
+    Ok(n as usize)
+}
+
+#[cfg(not(target_os = "linux"))]
+fn try_send(socket: &UdpSocket, datagrams: &[(SocketAddr, &[u8])]) -> io::Result<usize> {
+    let (addr, data) = datagrams[0];
+    socket.try_send_to(data, addr).map(|_| 1)
+}
+
+/// Destination of a datagram in an OP_UDP_SEND_BATCH payload.
+#[derive(Debug, PartialEq)]
+pub enum Destination<'a> {
+    Addr(SocketAddr),
+    /// Not an IP literal - resolved by `resolve_batch`
+    Host(&'a str, u16),
+}
+
+/// Parse an OP_UDP_SEND_BATCH payload. Datagrams whose address is not valid
+/// UTF-8 are dropped.
+pub fn parse_send_batch(payload: &[u8]) -> Option<(u32, Vec<(Destination<'_>, &[u8])>)> {
+    let socket_id = u32::from_le_bytes(payload.get(0..4)?.try_into().unwrap());
+    let count = u16::from_le_bytes(payload.get(4..6)?.try_into().unwrap()) as usize;
+    let mut datagrams = Vec::with_capacity(count);
+    let mut pos = 6;
+    for _ in 0..count {
+        let port = u16::from_le_bytes(payload.get(pos..pos + 2)?.try_into().unwrap());
+        let addr_len =
+            u16::from_le_bytes(payload.get(pos + 2..pos + 4)?.try_into().unwrap()) as usize;
+        let addr = std::str::from_utf8(payload.get(pos + 4..pos + 4 + addr_len)?).ok();
+        pos += 4 + addr_len;
+        let data_len = u16::from_le_bytes(payload.get(pos..pos + 2)?.try_into().unwrap()) as usize;
+        let data = payload.get(pos + 2..pos + 2 + data_len)?;
+        pos += 2 + data_len;
+        match addr.map(|a| (a, a.parse::<IpAddr>())) {
+            Some((_, Ok(ip))) => datagrams.push((Destination::Addr(SocketAddr::new(ip, port)), data)),
+            Some((host, Err(_))) => datagrams.push((Destination::Host(host, port), data)),
+            None => {}
+        }
+    }
+    Some((socket_id, datagrams))
+}
+
+/// Resolve hostname destinations, keeping datagram order. Each host is looked
+/// up once per batch; an address of the socket's family is preferred.
+/// Datagrams to hosts that don't resolve are dropped.
+pub async fn resolve_batch<'a>(
+    datagrams: Vec<(Destination<'_>, &'a [u8])>,
+    ipv4: bool,
+) -> Vec<(SocketAddr, &'a [u8])> {
+    let mut resolved: HashMap<(String, u16), Option<SocketAddr>> = HashMap::new();
+    let mut out = Vec::with_capacity(datagrams.len());
+    for (dest, data) in datagrams {
+        let addr = match dest {
+            Destination::Addr(addr) => Some(addr),
+            Destination::Host(host, port) => {
+                let key = (host.to_string(), port);
+                if !resolved.contains_key(&key) {
+                    let addrs: Vec<SocketAddr> = match tokio::net::lookup_host((host, port)).await {
+                        Ok(addrs) => addrs.collect(),
+                        Err(_) => Vec::new(),
+                    };
+                    let addr = addrs
+                        .iter()
+                        .find(|a| a.is_ipv4() == ipv4)
+                        .or(addrs.first())
+                        .copied();
+                    resolved.insert(key.clone(), addr);
+                }
+                resolved[&key]
+            }
+        };
+        if let Some(addr) = addr {
+            out.push((addr, data));
+        }
+    }
+    out
+}
+
+/// Append one OP_UDP_RECV_BATCH entry.
+pub fn pack_datagram(out: &mut Vec<u8>, addr: SocketAddr, data: &[u8]) {
+    let ip = addr.ip().to_string();
+    out.extend_from_slice(&addr.port().to_le_bytes());
+    out.extend_from_slice(&(ip.len() as u16).to_le_bytes());
+    out.extend_from_slice(ip.as_bytes());
+    out.extend_from_slice(&(data.len() as u16).to_le_bytes());
+    out.extend_from_slice(data);
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn send_payload(socket_id: u32, datagrams: &[(&str, u16, &[u8])]) -> Vec<u8> {
+        let mut p = socket_id.to_le_bytes().to_vec();
+        p.extend_from_slice(&(datagrams.len() as u16).to_le_bytes());
+        for (addr, port, data) in datagrams {
+            p.extend_from_slice(&port.to_le_bytes());
+            p.extend_from_slice(&(addr.len() as u16).to_le_bytes());
+            p.extend_from_slice(addr.as_bytes());
+            p.extend_from_slice(&(data.len() as u16).to_le_bytes());
+            p.extend_from_slice(data);
+        }
+        p
+    }
+
+    #[test]
+    fn test_parse_send_batch() {
+        let payload = send_payload(
+            7,
+            &[
+                ("127.0.0.1", 6881, &b"ping"[..]),
+                ("dht.example", 1, &b"x"[..]),
+                ("::1", 80, &b""[..]),
+            ],
+        );
+        let (socket_id, datagrams) = parse_send_batch(&payload).unwrap();
+        assert_eq!(socket_id, 7);
+        assert_eq!(
+            datagrams,
+            vec![
+                (Destination::Addr("127.0.0.1:6881".parse().unwrap()), &b"ping"[..]),
+                (Destination::Host("dht.example", 1), &b"x"[..]),
+                (Destination::Addr("[::1]:80".parse().unwrap()), &b""[..]),
+            ]
+        );
+
+        // Truncated payloads are rejected
+        assert!(parse_send_batch(&payload[..payload.len() - 1]).is_none());
+    }
+
+    #[test]
+    fn test_pack_datagram_matches_send_format() {
+        let mut out = 7u32.to_le_bytes().to_vec();
+        out.extend_from_slice(&1u16.to_le_bytes());
+        pack_datagram(&mut out, "10.0.0.1:51413".parse().unwrap(), b"abc");
+        assert_eq!(out, send_payload(7, &[("10.0.0.1", 51413, &b"abc"[..])]));
+    }
+
+    #[tokio::test]
+    async fn test_batch_round_trip() {
+        let a = UdpSocket::bind("127.0.0.1:0").await.unwrap();
+        let b = UdpSocket::bind("127.0.0.1:0").await.unwrap();
+        let b_addr = b.local_addr().unwrap();
+
+        let packets: Vec<Vec<u8>> = (0..UDP_BATCH as u8 + 4)
+            .map(|i| vec![i; 100 + i as usize])
+            .collect();
+        let datagrams: Vec<(SocketAddr, &[u8])> =
+            packets.iter().map(|p| (b_addr, p.as_slice())).collect();
+        let total: usize = packets.iter().map(|p| p.len()).sum();
+        assert_eq!(send_batch(&a, &datagrams).await, total);
+
+        let mut batch = RecvBatch::new();
+        let mut received = Vec::new();
+        while received.len() < packets.len() {
+            let n = batch.recv(&b).await.unwrap();
+            assert!(n >= 1 && n <= UDP_BATCH);
+            for (from, data) in batch.datagrams() {
+                assert_eq!(from, a.local_addr().unwrap());
+                received.push(data.to_vec());
+            }
+        }
+        assert_eq!(received, packets);
+    }
+
+    #[tokio::test]
+    async fn test_batch_to_hostname() {
+        let a = UdpSocket::bind("127.0.0.1:0").await.unwrap();
+        let b = UdpSocket::bind("127.0.0.1:0").await.unwrap();
+        let port = b.local_addr().unwrap().port();
+        let payload = send_payload(
+            1,
+            &[
+                ("localhost", port, &b"bootstrap"[..]),
+                ("127.0.0.1", port, &b"ip"[..]),
+                ("no-such-host.invalid", port, &b"dropped"[..]),
+                ("localhost", port, &b"again"[..]),
+            ],
+        );
+        let (_, datagrams) = parse_send_batch(&payload).unwrap();
+        let datagrams = resolve_batch(datagrams, true).await;
+        assert_eq!(datagrams.len(), 3);
+        assert_eq!(send_batch(&a, &datagrams).await, 9 + 2 + 5);
+
+        let mut batch = RecvBatch::new();
+        let mut received = Vec::new();
+        while received.len() < 3 {
+            batch.recv(&b).await.unwrap();
+            received.extend(batch.datagrams().map(|(_, data)| data.to_vec()));
+        }
+        assert_eq!(received, vec![b"bootstrap".to_vec(), b"ip".to_vec(), b"again".to_vec()]);
+    }
+}
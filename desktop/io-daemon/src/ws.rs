@@ -10,12 +10,24 @@ use std::sync::atomic::Ordering;
 use tokio::net::{TcpListener, TcpStream, UdpSocket};
 use socket2::{SockRef, Socket, Domain, Type, Protocol};
 use tokio::sync::mpsc;
-use tokio::io::{AsyncReadExt, AsyncWriteExt};
+use tokio::io::{AsyncReadExt, AsyncWrite, AsyncWriteExt};
 use tokio::time::{timeout, Duration};
 use std::collections::HashMap;
 use tokio::sync::Mutex;
 use native_tls::TlsConnector;
 use crate::AppState;
+use crate::DaemonStats;
+use crate::direct::{
+    piece_message, BlockVerdict, DiskLayout, RequestTracker, WireEvent, WireParser, BLOCK_IO_ERROR,
+    BLOCK_WRITTEN, PIECE_PENDING,
+};
+use crate::files::validate_path;
+use crate::flow::{
+    pack_recv_batch, FlowControl, SocketQueue, RECV_BATCH_MAX, SEND_COALESCE_MAX,
+};
+use crate::hashing::StreamingHasher;
+use crate::udp_batch::{pack_datagram, parse_send_batch, resolve_batch, send_batch, RecvBatch};
+use tokio::net::tcp::OwnedReadHalf;
 
 
 // Opcodes
@@ -41,6 +53,14 @@ const OP_TCP_STOP_LISTEN: u8 = 0x18;
 const OP_TCP_SECURE: u8 = 0x19;
 const OP_TCP_SECURED: u8 = 0x1A;
 
+// Direct-to-disk receive: daemon parses PIECE messages and writes them itself
+const OP_TCP_BLOCK: u8 = 0x1B;
+const OP_TCP_DIRECT: u8 = 0x1C;
+const OP_TCP_DIRECT_RESULT: u8 = 0x1D;
+
+// Several sockets' OP_TCP_RECV payloads in one frame (after OP_IO_CONFIGURE)
+const OP_TCP_RECV_BATCH: u8 = 0x1E;
+
 const OP_UDP_BIND: u8 = 0x20;
 const OP_UDP_BOUND: u8 = 0x21;
 const OP_UDP_SEND: u8 = 0x22;
@@ -48,6 +68,52 @@ const OP_UDP_RECV: u8 = 0x23;
 const OP_UDP_CLOSE: u8 = 0x24;
 const OP_UDP_JOIN_MULTICAST: u8 = 0x25;
 const OP_UDP_LEAVE_MULTICAST: u8 = 0x26;
+// Many datagrams per frame (receive side after OP_IO_CONFIGURE)
+const OP_UDP_SEND_BATCH: u8 = 0x27;
+const OP_UDP_RECV_BATCH: u8 = 0x28;
+
+// Streaming hash opcodes (hash blocks as they arrive instead of posting whole pieces)
+const OP_HASH_OPEN: u8 = 0x30;
+const OP_HASH_UPDATE: u8 = 0x31;
+const OP_HASH_FINALIZE: u8 = 0x32;
+const OP_HASH_RESULT: u8 = 0x33;
+const OP_HASH_ABORT: u8 = 0x34;
+
+// OP_HASH_RESULT status codes
+const HASH_STATUS_OK: u8 = 0;
+const HASH_STATUS_UNKNOWN_ID: u8 = 1;
+
+// Disk layouts for direct-to-disk receive
+const OP_DISK_LAYOUT_SET: u8 = 0x40;
+const OP_DISK_LAYOUT_RESULT: u8 = 0x41;
+const OP_DISK_LAYOUT_REMOVE: u8 = 0x42;
+const OP_DISK_PIECE_RESET: u8 = 0x43;
+
+// Connection-level flow control
+const OP_IO_CONFIGURE: u8 = 0x50;
+const OP_IO_CONFIGURED: u8 = 0x51;
+const OP_IO_CREDIT: u8 = 0x52;
+const OP_IO_STATS: u8 = 0x53;
+const OP_IO_STATS_RESULT: u8 = 0x54;
+
+// OP_TCP_DIRECT_RESULT status codes
+const DIRECT_STATUS_OK: u8 = 0;
+const DIRECT_STATUS_OFFSET_MISMATCH: u8 = 1;
+const DIRECT_STATUS_UNKNOWN: u8 = 2;
+
+/// Read size for plain forwarding (one OP_TCP_RECV frame per read)
+const TCP_READ_SIZE: usize = 8192;
+/// Read size in direct mode - larger reads batch several blocks per disk write
+const TCP_DIRECT_READ_SIZE: usize = 65536;
+
+/// Upper bound on concurrently open hashes per connection.
+/// Active pieces are bounded well below this; the cap protects against leaks.
+const MAX_OPEN_HASHES: usize = 65536;
+/// Updates queued per open hash before OP_HASH_UPDATE waits for the hasher
+const HASH_QUEUE_DEPTH: usize = 8;
+/// Updates up to this size are hashed on the hash task itself; larger ones
+/// go to the blocking pool so they don't hold up a runtime worker
+const HASH_INLINE_MAX: usize = 64 * 1024;
 
 const PROTOCOL_VERSION: u8 = 1;
 
@@ -102,8 +168,30 @@ impl Envelope {
     }
 }
 
+/// Switch a socket's read task to direct-to-disk receive.
+struct DirectCommand {
+    layout: Arc<DiskLayout>,
+    /// Stream bytes the client has consumed; must match what was delivered
+    stream_offset: u64,
+    req_id: u32,
+    /// Requests sent on the socket since direct receive was first asked for
+    requests: Arc<std::sync::Mutex<RequestTracker>>,
+}
+
+/// Work for a streaming hash task, applied in the order it was sent.
+enum HashCommand {
+    Update(Vec<u8>),
+    /// Reply with the digest to this request id
+    Finalize(u32),
+}
+
 struct SocketManager {
     tcp_sockets: HashMap<u32, mpsc::Sender<Vec<u8>>>,
+    tcp_queues: HashMap<u32, Arc<SocketQueue>>,
+    tcp_direct: HashMap<u32, mpsc::Sender<DirectCommand>>,
+    /// Outgoing requests per plain TCP socket, checked by direct receive
+    tcp_requests: HashMap<u32, Arc<std::sync::Mutex<RequestTracker>>>,
+    disk_layouts: HashMap<u32, Arc<DiskLayout>>,
     pending_connects: HashMap<u32, tokio::task::AbortHandle>,
     pending_tcp: HashMap<u32, TcpStream>,  // Connected but not yet reading/writing (for TLS upgrade)
     udp_sockets: HashMap<u32, Arc<UdpSocket>>,
@@ -112,6 +200,16 @@ struct SocketManager {
     next_socket_id: u32,
 }
 
+impl SocketManager {
+    /// Register an established TCP socket's write channel and queue counters.
+    fn add_tcp_socket(&mut self, socket_id: u32, write_tx: mpsc::Sender<Vec<u8>>) -> Arc<SocketQueue> {
+        let queue = Arc::new(SocketQueue::default());
+        self.tcp_sockets.insert(socket_id, write_tx);
+        self.tcp_queues.insert(socket_id, queue.clone());
+        queue
+    }
+}
+
 async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
     let (mut sender, mut receiver) = socket.split();
     let (tx, mut rx) = mpsc::channel::<Vec<u8>>(100);
@@ -120,17 +218,63 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
     let stats = state.stats.clone();
     stats.ws_connections.fetch_add(1, Ordering::Relaxed);
 
+    let flow = Arc::new(FlowControl::new());
+
     // Task to send binary frames to client
+    let flow_send = flow.clone();
+    let stats_send = stats.clone();
     let send_task = tokio::spawn(async move {
-        while let Some(data) = rx.recv().await {
+        let mut next: Option<Vec<u8>> = None;
+        loop {
+            let data = match next.take() {
+                Some(d) => d,
+                None => match rx.recv().await {
+                    Some(d) => d,
+                    None => break,
+                },
+            };
+            let data = if flow_send.batching() && is_recv_frame(&data) {
+                // Pack RECV frames that are already queued behind this one.
+                // Anything else ends the batch so frame order is preserved.
+                let mut frames = vec![data];
+                let mut size = frames[0].len();
+                while size < RECV_BATCH_MAX {
+                    match rx.try_recv() {
+                        Ok(d) if is_recv_frame(&d) => {
+                            size += d.len();
+                            frames.push(d);
+                        }
+                        Ok(d) => {
+                            next = Some(d);
+                            break;
+                        }
+                        Err(_) => break,
+                    }
+                }
+                if frames.len() == 1 {
+                    frames.pop().unwrap()
+                } else {
+                    let mut batch = Envelope::new(OP_TCP_RECV_BATCH, 0).to_bytes().to_vec();
+                    batch.reserve(size);
+                    pack_recv_batch(frames.iter().map(|f| &f[8..]), &mut batch);
+                    batch
+                }
+            } else {
+                data
+            };
             if sender.send(Message::Binary(data)).await.is_err() {
                 break;
             }
+            stats_send.ws_frames_sent.fetch_add(1, Ordering::Relaxed);
         }
     });
 
     let socket_manager = Arc::new(Mutex::new(SocketManager {
         tcp_sockets: HashMap::new(),
+        tcp_queues: HashMap::new(),
+        tcp_direct: HashMap::new(),
+        tcp_requests: HashMap::new(),
+        disk_layouts: HashMap::new(),
         pending_connects: HashMap::new(),
         pending_tcp: HashMap::new(),
         udp_sockets: HashMap::new(),
@@ -139,6 +283,10 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
         next_socket_id: 0x10000, // Start high to avoid collision with client-assigned IDs
     }));
 
+    // Streaming hashes are only touched by this receive loop, so no lock is needed.
+    // Each open hash runs on its own task so hashing never stalls this loop.
+    let mut hashes: HashMap<u32, mpsc::Sender<HashCommand>> = HashMap::new();
+
     // Authentication State Machine
     let mut authenticated = false;
 
@@ -342,64 +490,50 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         let pending_stream = socket_manager.lock().await.pending_tcp.remove(&socket_id);
                         if let Some(stream) = pending_stream {
                             // Auto-activate as plain TCP socket
-                            let (mut read_half, mut write_half) = stream.into_split();
-                            let (write_tx, mut write_rx) = mpsc::channel::<Vec<u8>>(32);
+                            let (read_half, write_half) = stream.into_split();
+                            let (write_tx, write_rx) = mpsc::channel::<Vec<u8>>(32);
 
-                            socket_manager.lock().await.tcp_sockets.insert(socket_id, write_tx.clone());
+                            let queue = socket_manager.lock().await.add_tcp_socket(socket_id, write_tx.clone());
 
                             // Update stats: pending_tcp -> tcp_sockets
                             stats.pending_tcp.fetch_sub(1, Ordering::Relaxed);
                             stats.tcp_sockets.fetch_add(1, Ordering::Relaxed);
 
-                            // Send the data
+                            // Send the data (bytes_sent is tracked in the write task)
+                            queue.send_queued.fetch_add(data_len, Ordering::Relaxed);
                             write_tx.send(data_to_send).await.ok();
-                            stats.bytes_sent.fetch_add(data_len, Ordering::Relaxed);
 
                             // Read task
-                            let tx_read = tx.clone();
-                            let stats_read = stats.clone();
-                            tokio::spawn(async move {
-                                let mut buf = [0u8; 8192];
-                                loop {
-                                    match read_half.read(&mut buf).await {
-                                        Ok(0) => break,
-                                        Ok(n) => {
-                                            stats_read.bytes_received.fetch_add(n as u64, Ordering::Relaxed);
-                                            let mut p = socket_id.to_le_bytes().to_vec();
-                                            p.extend_from_slice(&buf[..n]);
-                                            let env = Envelope::new(OP_TCP_RECV, 0);
-                                            let mut d = env.to_bytes().to_vec();
-                                            d.extend_from_slice(&p);
-                                            if tx_read.send(d).await.is_err() {
-                                                break;
-                                            }
-                                        }
-                                        Err(_) => break,
-                                    }
-                                }
-                                let mut p = socket_id.to_le_bytes().to_vec();
-                                p.push(0);
-                                p.extend_from_slice(&0u32.to_le_bytes());
-                                let env = Envelope::new(OP_TCP_CLOSE, 0);
-                                let mut d = env.to_bytes().to_vec();
-                                d.extend_from_slice(&p);
-                                tx_read.send(d).await.ok();
-                            });
-
-                            // Write task
-                            let stats_write = stats.clone();
-                            tokio::spawn(async move {
-                                while let Some(data) = write_rx.recv().await {
-                                    let len = data.len() as u64;
-                                    if write_half.write_all(&data).await.is_err() {
-                                        break;
-                                    }
-                                    stats_write.bytes_sent.fetch_add(len, Ordering::Relaxed);
-                                }
-                            });
-                        } else if let Some(sender) = socket_manager.lock().await.tcp_sockets.get(&socket_id) {
-                            sender.send(data_to_send).await.ok();
-                            // Note: bytes_sent is tracked in the write task
+                            let (direct_tx, direct_rx) = mpsc::channel::<DirectCommand>(4);
+                            socket_manager.lock().await.tcp_direct.insert(socket_id, direct_tx);
+                            tokio::spawn(tcp_read_loop(
+                                socket_id,
+                                read_half,
+                                tx.clone(),
+                                stats.clone(),
+                                direct_rx,
+                                flow.clone(),
+                                queue.clone(),
+                            ));
+
+                            tokio::spawn(tcp_write_loop(write_half, write_rx, stats.clone(), queue));
+                        } else {
+                            let (target, requests) = {
+                                let mgr = socket_manager.lock().await;
+                                (
+                                    mgr.tcp_sockets.get(&socket_id).cloned().zip(mgr.tcp_queues.get(&socket_id).cloned()),
+                                    mgr.tcp_requests.get(&socket_id).cloned(),
+                                )
+                            };
+                            // Only sockets with direct receive track their requests
+                            if let Some(requests) = requests {
+                                requests.lock().unwrap().observe(&data_to_send);
+                            }
+                            if let Some((sender, queue)) = target {
+                                queue.send_queued.fetch_add(data_len, Ordering::Relaxed);
+                                sender.send(data_to_send).await.ok();
+                                // Note: bytes_sent is tracked in the write task
+                            }
                         }
                     }
                 }
@@ -413,6 +547,9 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         if mgr.tcp_sockets.remove(&socket_id).is_some() {
                             stats.tcp_sockets.fetch_sub(1, Ordering::Relaxed);
                         }
+                        mgr.tcp_queues.remove(&socket_id);
+                        mgr.tcp_direct.remove(&socket_id);
+                        mgr.tcp_requests.remove(&socket_id);
 
                         // Remove pending socket (connected but not yet activated)
                         if mgr.pending_tcp.remove(&socket_id).is_some() {
@@ -439,6 +576,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         let manager = socket_manager.clone();
                         let tx_clone = tx.clone();
                         let stats_clone = stats.clone();
+                        let flow_tls = flow.clone();
 
                         // Take the pending stream
                         let pending_stream = manager.lock().await.pending_tcp.remove(&socket_id);
@@ -485,10 +623,10 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                                 match handshake_result {
                                     Ok(Ok(tls_stream)) => {
                                         // TLS handshake succeeded - activate the socket
-                                        let (mut read_half, mut write_half) = tokio::io::split(tls_stream);
-                                        let (write_tx, mut write_rx) = mpsc::channel::<Vec<u8>>(32);
+                                        let (mut read_half, write_half) = tokio::io::split(tls_stream);
+                                        let (write_tx, write_rx) = mpsc::channel::<Vec<u8>>(32);
 
-                                        manager.lock().await.tcp_sockets.insert(socket_id, write_tx);
+                                        let queue = manager.lock().await.add_tcp_socket(socket_id, write_tx);
 
                                         // Update stats: added to tcp_sockets
                                         stats_clone.tcp_sockets.fetch_add(1, Ordering::Relaxed);
@@ -504,6 +642,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                                         // Read task
                                         let tx_read = tx_clone.clone();
                                         let stats_read = stats_clone.clone();
+                                        let queue_read = queue.clone();
                                         tokio::spawn(async move {
                                             let mut buf = [0u8; 8192];
                                             loop {
@@ -511,6 +650,9 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                                                     Ok(0) => break,
                                                     Ok(n) => {
                                                         stats_read.bytes_received.fetch_add(n as u64, Ordering::Relaxed);
+                                                        if !flow_tls.acquire(n, &queue_read, &stats_read).await {
+                                                            break;
+                                                        }
                                                         let mut p = socket_id.to_le_bytes().to_vec();
                                                         p.extend_from_slice(&buf[..n]);
                                                         let env = Envelope::new(OP_TCP_RECV, 0);
@@ -532,17 +674,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                                             tx_read.send(d).await.ok();
                                         });
 
-                                        // Write task
-                                        let stats_write = stats_clone.clone();
-                                        tokio::spawn(async move {
-                                            while let Some(data) = write_rx.recv().await {
-                                                let len = data.len() as u64;
-                                                if write_half.write(&data).await.is_err() {
-                                                    break;
-                                                }
-                                                stats_write.bytes_sent.fetch_add(len, Ordering::Relaxed);
-                                            }
-                                        });
+                                        tokio::spawn(tcp_write_loop(write_half, write_rx, stats_clone.clone(), queue));
                                     }
                                     Ok(Err(e)) => {
                                         // TLS handshake failed
@@ -593,6 +725,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         let tx_clone = tx.clone();
                         let req_id = env.request_id;
                         let stats_clone = stats.clone();
+                        let flow_accept = flow.clone();
 
                         tokio::spawn(async move {
                             match TcpListener::bind(&addr).await {
@@ -646,59 +779,33 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                                                     }
 
                                                     // Set up read/write for the accepted connection
-                                                    let (mut read_half, mut write_half) = stream.into_split();
-                                                    let (write_tx, mut write_rx) = mpsc::channel::<Vec<u8>>(32);
+                                                    let (read_half, write_half) = stream.into_split();
+                                                    let (write_tx, write_rx) = mpsc::channel::<Vec<u8>>(32);
 
-                                                    manager_accept.lock().await.tcp_sockets.insert(socket_id, write_tx);
+                                                    let queue = manager_accept.lock().await.add_tcp_socket(socket_id, write_tx);
 
                                                     // Update stats: new accepted TCP socket
                                                     stats_accept.tcp_sockets.fetch_add(1, Ordering::Relaxed);
 
                                                     // Read task
-                                                    let tx_read = tx_accept.clone();
-                                                    let stats_read = stats_accept.clone();
-                                                    tokio::spawn(async move {
-                                                        let mut buf = [0u8; 8192];
-                                                        loop {
-                                                            match read_half.read(&mut buf).await {
-                                                                Ok(0) => break,
-                                                                Ok(n) => {
-                                                                    stats_read.bytes_received.fetch_add(n as u64, Ordering::Relaxed);
-                                                                    let mut p = socket_id.to_le_bytes().to_vec();
-                                                                    p.extend_from_slice(&buf[..n]);
-
-                                                                    let env = Envelope::new(OP_TCP_RECV, 0);
-                                                                    let mut d = env.to_bytes().to_vec();
-                                                                    d.extend_from_slice(&p);
-                                                                    if tx_read.send(d).await.is_err() {
-                                                                        break;
-                                                                    }
-                                                                }
-                                                                Err(_) => break,
-                                                            }
-                                                        }
-                                                        // Send TCP_CLOSE
-                                                        let mut p = socket_id.to_le_bytes().to_vec();
-                                                        p.push(0);
-                                                        p.extend_from_slice(&0u32.to_le_bytes());
-
-                                                        let env = Envelope::new(OP_TCP_CLOSE, 0);
-                                                        let mut d = env.to_bytes().to_vec();
-                                                        d.extend_from_slice(&p);
-                                                        tx_read.send(d).await.ok();
-                                                    });
-
-                                                    // Write task
-                                                    let stats_write = stats_accept.clone();
-                                                    tokio::spawn(async move {
-                                                        while let Some(data) = write_rx.recv().await {
-                                                            let len = data.len() as u64;
-                                                            if write_half.write_all(&data).await.is_err() {
-                                                                break;
-                                                            }
-                                                            stats_write.bytes_sent.fetch_add(len, Ordering::Relaxed);
-                                                        }
-                                                    });
+                                                    let (direct_tx, direct_rx) = mpsc::channel::<DirectCommand>(4);
+                                                    manager_accept.lock().await.tcp_direct.insert(socket_id, direct_tx);
+                                                    tokio::spawn(tcp_read_loop(
+                                                        socket_id,
+                                                        read_half,
+                                                        tx_accept.clone(),
+                                                        stats_accept.clone(),
+                                                        direct_rx,
+                                                        flow_accept.clone(),
+                                                        queue.clone(),
+                                                    ));
+
+                                                    tokio::spawn(tcp_write_loop(
+                                                        write_half,
+                                                        write_rx,
+                                                        stats_accept.clone(),
+                                                        queue,
+                                                    ));
                                                 }
                                                 Err(_) => break,
                                             }
@@ -749,6 +856,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         let tx_clone = tx.clone();
                         let req_id = env.request_id;
                         let stats_clone = stats.clone();
+                        let flow_udp = flow.clone();
 
                         tokio::spawn(async move {
                             // Use socket2 to create UDP socket with SO_REUSEADDR
@@ -791,26 +899,47 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                                     let tx_read = tx_clone.clone();
                                     let stats_read = stats_clone.clone();
                                     let read_task = tokio::spawn(async move {
-                                        let mut buf = [0u8; 65535];
-                                        loop {
-                                            match socket.recv_from(&mut buf).await {
-                                                Ok((n, peer)) => {
-                                                    stats_read.bytes_received.fetch_add(n as u64, Ordering::Relaxed);
-                                                    // Send UDP_RECV
-                                                    // Payload: socketId(4), port(2), addr(string), data
-                                                    // Layout: socketId(4) + port(2) + addr_len(2) + addr + data
-                                                    let mut p = socket_id.to_le_bytes().to_vec();
-                                                    p.extend_from_slice(&peer.port().to_le_bytes());
-                                                    let addr_str = peer.ip().to_string();
-                                                    p.extend_from_slice(&(addr_str.len() as u16).to_le_bytes());
-                                                    p.extend_from_slice(addr_str.as_bytes());
-                                                    p.extend_from_slice(&buf[..n]);
+                                        let mut batch = RecvBatch::new();
+                                        'read: loop {
+                                            match batch.recv(&socket).await {
+                                                Ok(_) => {
+                                                    if flow_udp.udp_batching() {
+                                                        // Send UDP_RECV_BATCH
+                                                        // Payload: socketId(4), count(2), then per datagram
+                                                        // port(2), addr_len(2), addr, data_len(2), data
+                                                        let mut d = Envelope::new(OP_UDP_RECV_BATCH, 0).to_bytes().to_vec();
+                                                        d.extend_from_slice(&socket_id.to_le_bytes());
+                                                        d.extend_from_slice(&0u16.to_le_bytes());
+                                                        let mut count: u16 = 0;
+                                                        for (peer, data) in batch.datagrams() {
+                                                            stats_read.bytes_received.fetch_add(data.len() as u64, Ordering::Relaxed);
+                                                            pack_datagram(&mut d, peer, data);
+                                                            count += 1;
+                                                        }
+                                                        d[12..14].copy_from_slice(&count.to_le_bytes());
+                                                        if tx_read.send(d).await.is_err() {
+                                                            break;
+                                                        }
+                                                        continue;
+                                                    }
+                                                    for (peer, data) in batch.datagrams() {
+                                                        stats_read.bytes_received.fetch_add(data.len() as u64, Ordering::Relaxed);
+                                                        // Send UDP_RECV
+                                                        // Payload: socketId(4), port(2), addr(string), data
+                                                        // Layout: socketId(4) + port(2) + addr_len(2) + addr + data
+                                                        let mut p = socket_id.to_le_bytes().to_vec();
+                                                        p.extend_from_slice(&peer.port().to_le_bytes());
+                                                        let addr_str = peer.ip().to_string();
+                                                        p.extend_from_slice(&(addr_str.len() as u16).to_le_bytes());
+                                                        p.extend_from_slice(addr_str.as_bytes());
+                                                        p.extend_from_slice(data);
 
-                                                    let env = Envelope::new(OP_UDP_RECV, 0);
-                                                    let mut d = env.to_bytes().to_vec();
-                                                    d.extend_from_slice(&p);
-                                                    if tx_read.send(d).await.is_err() {
-                                                        break;
+                                                        let env = Envelope::new(OP_UDP_RECV, 0);
+                                                        let mut d = env.to_bytes().to_vec();
+                                                        d.extend_from_slice(&p);
+                                                        if tx_read.send(d).await.is_err() {
+                                                            break 'read;
+                                                        }
                                                     }
                                                 }
                                                 Err(_) => break,
@@ -866,6 +995,19 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         }
                     }
                 }
+                OP_UDP_SEND_BATCH => {
+                    // Payload: socketId(4), count(2), then per datagram
+                    // dest_port(2), dest_addr_len(2), dest_addr, data_len(2), data
+                    if let Some((socket_id, datagrams)) = parse_send_batch(payload) {
+                        let socket = socket_manager.lock().await.udp_sockets.get(&socket_id).cloned();
+                        if let Some(socket) = socket {
+                            let ipv4 = socket.local_addr().map(|a| a.is_ipv4()).unwrap_or(true);
+                            let datagrams = resolve_batch(datagrams, ipv4).await;
+                            let sent = send_batch(&socket, &datagrams).await;
+                            stats.bytes_sent.fetch_add(sent as u64, Ordering::Relaxed);
+                        }
+                    }
+                }
                 OP_UDP_CLOSE => {
                     // Payload: socketId(4)
                     if payload.len() >= 4 {
@@ -967,6 +1109,186 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
                         }
                     }
                 }
+                OP_TCP_DIRECT => {
+                    // Payload: socketId(4), layoutId(4), streamOffset(8)
+                    // Reply: OP_TCP_DIRECT_RESULT socketId(4), status(1)
+                    if payload.len() >= 16 {
+                        let socket_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        let layout_id = u32::from_le_bytes(payload[4..8].try_into().unwrap());
+                        let stream_offset = u64::from_le_bytes(payload[8..16].try_into().unwrap());
+
+                        let (layout, direct_tx, requests) = {
+                            let mut mgr = socket_manager.lock().await;
+                            let direct_tx = mgr.tcp_direct.get(&socket_id).cloned();
+                            // Track what is sent from here on, before the peer can answer it
+                            let requests = direct_tx.as_ref().map(|_| {
+                                mgr.tcp_requests
+                                    .entry(socket_id)
+                                    .or_insert_with(|| Arc::new(std::sync::Mutex::new(RequestTracker::default())))
+                                    .clone()
+                            });
+                            (mgr.disk_layouts.get(&layout_id).cloned(), direct_tx, requests)
+                        };
+                        let queued = match (layout, direct_tx, requests) {
+                            (Some(layout), Some(direct_tx), Some(requests)) => direct_tx
+                                .send(DirectCommand { layout, stream_offset, req_id: env.request_id, requests })
+                                .await
+                                .is_ok(),
+                            _ => false,
+                        };
+                        // On success the read task replies once it has switched modes
+                        if !queued {
+                            let mut resp = socket_id.to_le_bytes().to_vec();
+                            resp.push(DIRECT_STATUS_UNKNOWN);
+                            send_msg(&tx, OP_TCP_DIRECT_RESULT, env.request_id, resp).await;
+                        }
+                    }
+                }
+                OP_DISK_LAYOUT_SET => {
+                    // Payload: layoutId(4), layout (see DiskLayout::parse)
+                    // Reply: OP_DISK_LAYOUT_RESULT layoutId(4), status(1), error(utf8)
+                    if payload.len() >= 4 {
+                        let layout_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        let parsed = DiskLayout::parse(&payload[4..], |root_key, path| {
+                            validate_path(&state, root_key, path).map_err(|(_, e)| e)
+                        });
+                        let mut resp = layout_id.to_le_bytes().to_vec();
+                        match parsed {
+                            Ok(layout) => {
+                                let old = socket_manager
+                                    .lock()
+                                    .await
+                                    .disk_layouts
+                                    .insert(layout_id, Arc::new(layout));
+                                if let Some(old) = old {
+                                    old.deactivate();
+                                }
+                                resp.push(0);
+                            }
+                            Err(e) => {
+                                resp.push(1);
+                                resp.extend_from_slice(e.as_bytes());
+                            }
+                        }
+                        send_msg(&tx, OP_DISK_LAYOUT_RESULT, env.request_id, resp).await;
+                    }
+                }
+                OP_DISK_LAYOUT_REMOVE => {
+                    // Payload: layoutId(4)
+                    if payload.len() >= 4 {
+                        let layout_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        if let Some(layout) = socket_manager.lock().await.disk_layouts.remove(&layout_id) {
+                            layout.deactivate();
+                        }
+                    }
+                }
+                OP_DISK_PIECE_RESET => {
+                    // Payload: layoutId(4), pieceIndex(4)
+                    if payload.len() >= 8 {
+                        let layout_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        let index = u32::from_le_bytes(payload[4..8].try_into().unwrap());
+                        if let Some(layout) = socket_manager.lock().await.disk_layouts.get(&layout_id) {
+                            layout.reset_piece(index);
+                        }
+                    }
+                }
+                OP_HASH_OPEN => {
+                    // Payload: hashId(4), algo(1)
+                    // No reply; a failed open surfaces as HASH_STATUS_UNKNOWN_ID on finalize
+                    if payload.len() >= 5 {
+                        let hash_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        if hashes.len() < MAX_OPEN_HASHES || hashes.contains_key(&hash_id) {
+                            if let Some(hasher) = StreamingHasher::new(payload[4]) {
+                                let (hash_tx, hash_rx) = mpsc::channel::<HashCommand>(HASH_QUEUE_DEPTH);
+                                tokio::spawn(hash_task(hash_id, hasher, hash_rx, tx.clone(), stats.clone()));
+                                // Reopening an id lets the old task finish unheard
+                                if hashes.insert(hash_id, hash_tx).is_none() {
+                                    stats.open_hashes.fetch_add(1, Ordering::Relaxed);
+                                }
+                            }
+                        }
+                    }
+                }
+                OP_HASH_UPDATE => {
+                    // Payload: hashId(4), data
+                    if payload.len() >= 4 {
+                        let hash_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        if let Some(hash_tx) = hashes.get(&hash_id) {
+                            hash_tx.send(HashCommand::Update(payload[4..].to_vec())).await.ok();
+                        }
+                    }
+                }
+                OP_HASH_FINALIZE => {
+                    // Payload: hashId(4)
+                    // Reply: OP_HASH_RESULT hashId(4), status(1), digest
+                    // The hash task replies once all earlier updates are applied
+                    if payload.len() >= 4 {
+                        let hash_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        let queued = match hashes.remove(&hash_id) {
+                            Some(hash_tx) => {
+                                stats.open_hashes.fetch_sub(1, Ordering::Relaxed);
+                                hash_tx.send(HashCommand::Finalize(env.request_id)).await.is_ok()
+                            }
+                            None => false,
+                        };
+                        if !queued {
+                            let mut resp = hash_id.to_le_bytes().to_vec();
+                            resp.push(HASH_STATUS_UNKNOWN_ID);
+                            send_msg(&tx, OP_HASH_RESULT, env.request_id, resp).await;
+                        }
+                    }
+                }
+                OP_HASH_ABORT => {
+                    // Payload: hashId(4)
+                    if payload.len() >= 4 {
+                        let hash_id = u32::from_le_bytes(payload[0..4].try_into().unwrap());
+                        if hashes.remove(&hash_id).is_some() {
+                            stats.open_hashes.fetch_sub(1, Ordering::Relaxed);
+                        }
+                    }
+                }
+                OP_IO_CONFIGURE => {
+                    // Payload: flags(1), initialCredit(4)
+                    // Reply: creditWindow(4), status(1)
+                    if payload.len() >= 5 {
+                        let initial_credit = u32::from_le_bytes(payload[1..5].try_into().unwrap());
+                        let window = flow.configure(payload[0], initial_credit);
+                        let mut resp = window.to_le_bytes().to_vec();
+                        resp.push(0);
+                        send_msg(&tx, OP_IO_CONFIGURED, env.request_id, resp).await;
+                    }
+                }
+                OP_IO_CREDIT => {
+                    // Payload: bytes(4)
+                    if payload.len() >= 4 {
+                        flow.grant(u32::from_le_bytes(payload[0..4].try_into().unwrap()));
+                    }
+                }
+                OP_IO_STATS => {
+                    // Reply: availableCredit(4), status(1), socketCount(4),
+                    // then per socket: socketId(4), sendQueued(4), recvWaiting(4)
+                    let mut queues: Vec<(u32, Arc<SocketQueue>)> = socket_manager
+                        .lock()
+                        .await
+                        .tcp_queues
+                        .iter()
+                        .map(|(id, q)| (*id, q.clone()))
+                        .collect();
+                    queues.sort_unstable_by_key(|(id, _)| *id);
+
+                    let available = flow.available().min(u32::MAX as usize) as u32;
+                    let mut resp = Vec::with_capacity(9 + queues.len() * 12);
+                    resp.extend_from_slice(&available.to_le_bytes());
+                    resp.push(0);
+                    resp.extend_from_slice(&(queues.len() as u32).to_le_bytes());
+                    for (id, q) in queues {
+                        let send_queued = q.send_queued.load(Ordering::Relaxed).min(u32::MAX as u64) as u32;
+                        resp.extend_from_slice(&id.to_le_bytes());
+                        resp.extend_from_slice(&send_queued.to_le_bytes());
+                        resp.extend_from_slice(&q.recv_waiting.load(Ordering::Relaxed).to_le_bytes());
+                    }
+                    send_msg(&tx, OP_IO_STATS_RESULT, env.request_id, resp).await;
+                }
                 _ => {
                     // Unknown opcode
                     send_error(&tx, env.request_id, "Unknown opcode").await;
@@ -975,6 +1297,10 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
         }
     }
 
+    stats.open_hashes.fetch_sub(hashes.len() as u32, Ordering::Relaxed);
+    // Read tasks waiting for credit must not outlive the connection
+    flow.close();
+
     // Clean up all resources when WebSocket disconnects
     {
         let mut manager = socket_manager.lock().await;
@@ -1008,6 +1334,10 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
         // Clear UDP sockets to release Arc references and unbind ports immediately
         // Without this, the sockets remain bound until the function returns
         manager.udp_sockets.clear();
+        // Stop direct writes from read tasks that outlive this connection
+        for (_, layout) in manager.disk_layouts.drain() {
+            layout.deactivate();
+        }
         // TCP sockets will be cleaned up when dropped
     }
 
@@ -1016,3 +1346,272 @@ async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
 
     send_task.abort();
 }
+
+fn is_recv_frame(frame: &[u8]) -> bool {
+    frame.len() >= 12 && frame[1] == OP_TCP_RECV
+}
+
+/// Write loop for an established TCP (or TLS) socket.
+///
+/// Sends that queued up while the previous write was in flight are merged
+/// into one write. Nothing is delayed to wait for more data: request
+/// latency matters more than segment count for peer traffic.
+async fn tcp_write_loop<W: AsyncWrite + Unpin>(
+    mut write_half: W,
+    mut write_rx: mpsc::Receiver<Vec<u8>>,
+    stats: Arc<DaemonStats>,
+    queue: Arc<SocketQueue>,
+) {
+    while let Some(mut data) = write_rx.recv().await {
+        while data.len() < SEND_COALESCE_MAX {
+            match write_rx.try_recv() {
+                Ok(more) => data.extend_from_slice(&more),
+                Err(_) => break,
+            }
+        }
+        let len = data.len() as u64;
+        if write_half.write_all(&data).await.is_err() {
+            break;
+        }
+        queue.send_queued.fetch_sub(len, Ordering::Relaxed);
+        stats.bytes_sent.fetch_add(len, Ordering::Relaxed);
+    }
+}
+
+/// Apply one streaming hash's updates in order and reply to its finalize.
+///
+/// Ends after the finalize, or when the receive loop drops its sender
+/// (abort, reopen, or disconnect).
+async fn hash_task(
+    hash_id: u32,
+    mut hasher: StreamingHasher,
+    mut hash_rx: mpsc::Receiver<HashCommand>,
+    tx: mpsc::Sender<Vec<u8>>,
+    stats: Arc<DaemonStats>,
+) {
+    while let Some(cmd) = hash_rx.recv().await {
+        match cmd {
+            HashCommand::Update(data) => {
+                let len = data.len() as u64;
+                if data.len() <= HASH_INLINE_MAX {
+                    hasher.update(&data);
+                } else {
+                    hasher = match tokio::task::spawn_blocking(move || {
+                        hasher.update(&data);
+                        hasher
+                    })
+                    .await
+                    {
+                        Ok(hasher) => hasher,
+                        Err(_) => return,
+                    };
+                }
+                stats.bytes_hashed.fetch_add(len, Ordering::Relaxed);
+            }
+            HashCommand::Finalize(req_id) => {
+                // Payload: hashId(4), status(1), digest
+                let mut d = Envelope::new(OP_HASH_RESULT, req_id).to_bytes().to_vec();
+                d.extend_from_slice(&hash_id.to_le_bytes());
+                d.push(HASH_STATUS_OK);
+                d.extend_from_slice(&hasher.finalize());
+                tx.send(d).await.ok();
+                return;
+            }
+        }
+    }
+}
+
+fn tcp_frame(msg_type: u8, socket_id: u32, body: &[u8]) -> Vec<u8> {
+    let mut d = Envelope::new(msg_type, 0).to_bytes().to_vec();
+    d.reserve(4 + body.len());
+    d.extend_from_slice(&socket_id.to_le_bytes());
+    d.extend_from_slice(body);
+    d
+}
+
+/// Read loop for an established plain TCP socket.
+///
+/// Forwards bytes as OP_TCP_RECV until the client enables direct-to-disk
+/// receive. From then on the wire stream is parsed here: PIECE payloads are
+/// written through the disk layout and reported as OP_TCP_BLOCK, and all
+/// other messages are still forwarded as OP_TCP_RECV, in stream order.
+///
+/// Blocks that belong to a piece already announced are reported without
+/// being written, and blocks the command's request tracker doesn't know are
+/// forwarded as plain PIECE messages for the client to handle.
+///
+/// With credit enabled, forwarded bytes wait for client credit before the
+/// next read; block events are not charged since their data stays here.
+async fn tcp_read_loop(
+    socket_id: u32,
+    mut read_half: OwnedReadHalf,
+    tx: mpsc::Sender<Vec<u8>>,
+    stats: Arc<DaemonStats>,
+    mut direct_rx: mpsc::Receiver<DirectCommand>,
+    flow: Arc<FlowControl>,
+    queue: Arc<SocketQueue>,
+) {
+    let mut buf = vec![0u8; TCP_DIRECT_READ_SIZE];
+    // Stream bytes delivered to the client, raw or as block events
+    let mut delivered: u64 = 0;
+    let mut direct: Option<(Arc<DiskLayout>, WireParser, Arc<std::sync::Mutex<RequestTracker>>)> = None;
+
+    loop {
+        let read_size = if direct.is_some() { TCP_DIRECT_READ_SIZE } else { TCP_READ_SIZE };
+        tokio::select! {
+            Some(cmd) = direct_rx.recv() => {
+                // Switch only at a message boundary the client agrees on:
+                // everything delivered so far must have been consumed by it
+                let status = if cmd.stream_offset == delivered {
+                    match &mut direct {
+                        Some((layout, _, _)) => *layout = cmd.layout,
+                        None => direct = Some((cmd.layout, WireParser::default(), cmd.requests)),
+                    }
+                    DIRECT_STATUS_OK
+                } else {
+                    DIRECT_STATUS_OFFSET_MISMATCH
+                };
+                let mut d = Envelope::new(OP_TCP_DIRECT_RESULT, cmd.req_id).to_bytes().to_vec();
+                d.extend_from_slice(&socket_id.to_le_bytes());
+                d.push(status);
+                if tx.send(d).await.is_err() {
+                    break;
+                }
+            }
+            result = read_half.read(&mut buf[..read_size]) => {
+                let n = match result {
+                    Ok(0) | Err(_) => break,
+                    Ok(n) => n,
+                };
+                stats.bytes_received.fetch_add(n as u64, Ordering::Relaxed);
+
+                let (layout, parser, requests) = match &mut direct {
+                    None => {
+                        delivered += n as u64;
+                        if !flow.acquire(n, &queue, &stats).await {
+                            break;
+                        }
+                        if tx.send(tcp_frame(OP_TCP_RECV, socket_id, &buf[..n])).await.is_err() {
+                            break;
+                        }
+                        continue;
+                    }
+                    Some((layout, parser, requests)) => (layout.clone(), parser, requests.clone()),
+                };
+
+                let mut events = Vec::new();
+                if let Err(e) = parser.push(&buf[..n], layout.is_active(), &mut events) {
+                    eprintln!("Direct receive on socket {} failed: {}", socket_id, e);
+                    break;
+                }
+                if events.is_empty() {
+                    continue;
+                }
+
+                // Check blocks in stream order, after any CHOKE or REJECT before them;
+                // blocks the tracker doesn't know go to the client as PIECE messages
+                let mut accepted: Vec<Result<(), u8>> = Vec::new();
+                {
+                    let mut requests = requests.lock().unwrap();
+                    for event in events.iter_mut() {
+                        let verdict = match event {
+                            WireEvent::Raw(raw) => {
+                                requests.observe_incoming(raw);
+                                continue;
+                            }
+                            WireEvent::Block { index, begin, data } => {
+                                requests.accept_block(*index, *begin, data.len() as u32)
+                            }
+                        };
+                        match verdict {
+                            BlockVerdict::Write => accepted.push(Ok(())),
+                            BlockVerdict::Drop(status) => accepted.push(Err(status)),
+                            BlockVerdict::Forward => {
+                                if let WireEvent::Block { index, begin, data } = event {
+                                    *event = WireEvent::Raw(piece_message(*index, *begin, data));
+                                }
+                            }
+                        }
+                    }
+                }
+
+                // Disk writes and hashing happen off the async runtime
+                let (events, results) = if !accepted.is_empty() {
+                    let layout = layout.clone();
+                    match tokio::task::spawn_blocking(move || {
+                        let results: Vec<(u8, u8)> = events
+                            .iter()
+                            .filter_map(|e| match e {
+                                WireEvent::Block { index, begin, data } => Some((index, begin, data)),
+                                WireEvent::Raw(_) => None,
+                            })
+                            .zip(accepted)
+                            .map(|((index, begin, data), accepted)| match accepted {
+                                Ok(()) => layout.write_block(*index, *begin, data),
+                                Err(status) => (status, PIECE_PENDING),
+                            })
+                            .collect();
+                        (events, results)
+                    })
+                    .await
+                    {
+                        Ok(r) => r,
+                        Err(_) => break,
+                    }
+                } else {
+                    (events, Vec::new())
+                };
+
+                let raw_bytes: usize = events
+                    .iter()
+                    .map(|e| match e {
+                        WireEvent::Raw(raw) => raw.len(),
+                        WireEvent::Block { .. } => 0,
+                    })
+                    .sum();
+                if !flow.acquire(raw_bytes, &queue, &stats).await {
+                    break;
+                }
+
+                let mut results = results.into_iter();
+                let mut closed = false;
+                for event in events {
+                    let frame = match event {
+                        WireEvent::Raw(raw) => {
+                            delivered += raw.len() as u64;
+                            tcp_frame(OP_TCP_RECV, socket_id, &raw)
+                        }
+                        WireEvent::Block { index, begin, data } => {
+                            // Payload: socketId(4), index(4), begin(4), length(4), status(1), pieceResult(1)
+                            let (status, piece_result) = results.next().unwrap_or((BLOCK_IO_ERROR, 0));
+                            if status == BLOCK_WRITTEN {
+                                stats.direct_bytes_written.fetch_add(data.len() as u64, Ordering::Relaxed);
+                            }
+                            // 4-byte length prefix + id + index + begin
+                            delivered += 13 + data.len() as u64;
+                            let mut body = [0u8; 14];
+                            body[0..4].copy_from_slice(&index.to_le_bytes());
+                            body[4..8].copy_from_slice(&begin.to_le_bytes());
+                            body[8..12].copy_from_slice(&(data.len() as u32).to_le_bytes());
+                            body[12] = status;
+                            body[13] = piece_result;
+                            tcp_frame(OP_TCP_BLOCK, socket_id, &body)
+                        }
+                    };
+                    if tx.send(frame).await.is_err() {
+                        closed = true;
+                        break;
+                    }
+                }
+                if closed {
+                    break;
+                }
+            }
+        }
+    }
+
+    // Send TCP_CLOSE
+    let mut p = vec![0u8];
+    p.extend_from_slice(&0u32.to_le_bytes());
+    tx.send(tcp_frame(OP_TCP_CLOSE, socket_id, &p)).await.ok();
+}
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Minimal io-daemon client helpers shared by the desktop benchmark scripts.
+
+Starts a throwaway io-daemon with a temp config dir and speaks the /io
+WebSocket binary protocol (8-byte envelope, see DAEMON-PROTOCOL.md).
+"""
+
+import base64
+import contextlib
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+
+IO_DAEMON_BINARY = os.environ.get("IO_DAEMON_BINARY", "./target/release/jstorrent-io-daemon")
+
+PROTOCOL_VERSION = 1
+
+OP_CLIENT_HELLO = 0x01
+OP_SERVER_HELLO = 0x02
+OP_AUTH = 0x03
+OP_AUTH_RESULT = 0x04
+OP_ERROR = 0x7F
+
+TOKEN = "bench-token-12345"
+INSTALL_ID = "bench-install-id"
+ROOT_KEY = "bench-root-key"
+
+
+def pack_envelope(msg_type, req_id, payload=b""):
+    return struct.pack("<BBHI", PROTOCOL_VERSION, msg_type, 0, req_id) + payload
+
+
+def unpack_envelope(data):
+    _version, msg_type, _flags, req_id = struct.unpack_from("<BBHI", data, 0)
+    return msg_type, req_id, data[8:]
+
+
+def _mask(data, key):
+    """XOR-mask a client frame (whole-buffer integer XOR, fast enough for MB payloads)."""
+    if not data:
+        return b""
+    repeated = (key * (len(data) // 4 + 1))[: len(data)]
+    masked = int.from_bytes(data, "little") ^ int.from_bytes(repeated, "little")
+    return masked.to_bytes(len(data), "little")
+
+
+class IoSocket:
+    """Blocking WebSocket client for the daemon's /io endpoint."""
+
+    def __init__(self, port, host="127.0.0.1", path="/io"):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall(
+            (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("WebSocket handshake failed: connection closed")
+            response += chunk
+        if b"101" not in response.split(b"\r\n", 1)[0]:
+            raise ConnectionError(f"WebSocket handshake failed: {response!r}")
+        self._buf = response.split(b"\r\n\r\n", 1)[1]
+
+    def _recv_exact(self, n):
+        while len(self._buf) < n:
+            chunk = self.sock.recv(max(65536, n - len(self._buf)))
+            if not chunk:
+                raise ConnectionError("WebSocket closed")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+    def send(self, msg_type, req_id, payload=b""):
+        data = pack_envelope(msg_type, req_id, payload)
+        length = len(data)
+        if length < 126:
+            header = struct.pack("!BB", 0x82, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack("!BBH", 0x82, 0x80 | 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x82, 0x80 | 127, length)
+        key = os.urandom(4)
+        self.sock.sendall(header + key + _mask(data, key))
+
+    def recv(self):
+        """Return (msg_type, req_id, payload) for the next binary frame."""
+        while True:
+            byte0, byte1 = struct.unpack("!BB", self._recv_exact(2))
+            length = byte1 & 0x7F
+            if length == 126:
+                (length,) = struct.unpack("!H", self._recv_exact(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", self._recv_exact(8))
+            payload = self._recv_exact(length)
+            if byte0 & 0x0F == 0x2:
+                return unpack_envelope(payload)
+
+    def authenticate(self, token=TOKEN):
+        self.send(OP_CLIENT_HELLO, 1)
+        msg_type, _, _ = self.recv()
+        assert msg_type == OP_SERVER_HELLO, f"Expected SERVER_HELLO, got {msg_type:#x}"
+        self.send(OP_AUTH, 2, b"\x01" + token.encode())
+        msg_type, _, payload = self.recv()
+        assert msg_type == OP_AUTH_RESULT and payload[0] == 0, "Authentication failed"
+
+    def close(self):
+        self.sock.close()
+
+
+def _write_config(config_root, download_root):
+    config_dir = os.path.join(config_root, "jstorrent-native")
+    os.makedirs(config_dir)
+    rpc_info = {
+        "version": 1,
+        "profiles": [
+            {
+                "install_id": INSTALL_ID,
+                "extension_id": None,
+                "pid": os.getpid(),
+                "port": 0,
+                "token": TOKEN,
+                "started": 0,
+                "last_used": 0,
+                "browser": {"name": "bench", "binary": "python", "extension_id": None},
+                "download_roots": [
+                    {
+                        "key": ROOT_KEY,
+                        "path": download_root,
+                        "display_name": "Bench Downloads",
+                        "removable": False,
+                        "last_stat_ok": True,
+                        "last_checked": 0,
+                    }
+                ],
+            }
+        ],
+    }
+    with open(os.path.join(config_dir, "rpc-info.json"), "w") as f:
+        json.dump(rpc_info, f)
+
+
+@contextlib.contextmanager
+def running_daemon(binary=IO_DAEMON_BINARY):
+    """Start an io-daemon for the duration of the block. Yields (port, download_root)."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        download_root = os.path.join(temp_dir, "downloads")
+        os.makedirs(download_root)
+        _write_config(temp_dir, download_root)
+
+        env = os.environ.copy()
+        env["JSTORRENT_CONFIG_DIR"] = temp_dir
+        proc = subprocess.Popen(
+            [binary, "--token", TOKEN, "--install-id", INSTALL_ID],
+            stdout=subprocess.PIPE,
+            stderr=sys.stderr,
+            env=env,
+        )
+        try:
+            port = int(proc.stdout.readline().decode().strip())
+            yield port, download_root
+        finally:
+            proc.terminate()
+            proc.wait()
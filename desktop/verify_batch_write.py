@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Verify io-daemon batched verified-write endpoint and compare throughput
+against one X-Expected-SHA1 request per piece.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+IO_DAEMON_BINARY = "./target/debug/jstorrent-io-daemon"
+
+# Result codes (must match WriteResultCode in packages/engine/src/io/verified-write-batch.ts)
+SUCCESS = 0
+HASH_MISMATCH = 1
+IO_ERROR = 2
+INVALID_ARGS = 3
+
+BENCH_PIECE_SIZE = 256 * 1024
+BENCH_PIECE_COUNT = 256
+BENCH_BATCH_SIZE = 16
+
+
+def pack_batch(items):
+    """Pack (root_key, path, position, data, sha1_hex) tuples like packVerifiedWriteBatch."""
+    out = [struct.pack("<I", len(items))]
+    for i, (root_key, path, position, data, sha1_hex) in enumerate(items):
+        root_b = root_key.encode()
+        path_b = path.encode()
+        cb = f"py_{i}".encode()
+        out.append(struct.pack("<B", len(root_b)) + root_b)
+        out.append(struct.pack("<H", len(path_b)) + path_b)
+        out.append(struct.pack("<Q", position))
+        out.append(struct.pack("<I", len(data)) + data)
+        out.append(sha1_hex.encode())
+        out.append(struct.pack("<B", len(cb)) + cb)
+    return b"".join(out)
+
+
+def unpack_results(body):
+    (count,) = struct.unpack_from("<I", body, 0)
+    assert len(body) == 4 + count * 5, f"Bad results length {len(body)} for {count} items"
+    return [struct.unpack_from("<BI", body, 4 + i * 5) for i in range(count)]
+
+
+def write_config(temp_dir, token, install_id, root_token, download_root):
+    config_dir = os.path.join(temp_dir, "jstorrent-native")
+    os.makedirs(config_dir)
+    rpc_info = {
+        "version": 1,
+        "profiles": [
+            {
+                "install_id": install_id,
+                "extension_id": None,
+                "pid": os.getpid(),
+                "port": 0,
+                "token": token,
+                "started": 0,
+                "last_used": 0,
+                "browser": {"name": "test", "binary": "python", "extension_id": None},
+                "download_roots": [
+                    {
+                        "key": root_token,
+                        "path": download_root,
+                        "display_name": "Test Downloads",
+                        "removable": False,
+                        "last_stat_ok": True,
+                        "last_checked": 0,
+                    }
+                ],
+            }
+        ],
+    }
+    with open(os.path.join(config_dir, "rpc-info.json"), "w") as f:
+        json.dump(rpc_info, f)
+
+
+def main():
+    token = "test-token-12345"
+    install_id = "test-install-id"
+    root_token = "test-root-token-xyz"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        download_root = os.path.join(temp_dir, "downloads")
+        os.makedirs(download_root)
+        write_config(temp_dir, token, install_id, root_token, download_root)
+
+        env = os.environ.copy()
+        env["JSTORRENT_CONFIG_DIR"] = temp_dir
+
+        proc = subprocess.Popen(
+            [IO_DAEMON_BINARY, "--token", token, "--install-id", install_id],
+            stdout=subprocess.PIPE,
+            stderr=sys.stderr,
+            env=env,
+        )
+
+        try:
+            port = int(proc.stdout.readline().decode().strip())
+            print(f"io-daemon started on port {port}")
+
+            base_url = f"http://127.0.0.1:{port}"
+            headers = {"X-JST-Auth": token}
+            batch_url = f"{base_url}/write-verified-batch"
+            session = requests.Session()
+
+            # Test 1: Mixed batch with per-item result codes
+            print("\nTest 1: Batch with success, mismatch and invalid root...")
+            good = b"piece data " * 100
+            bad = b"corrupted"
+            items = [
+                (root_token, "batch/a.bin", 0, good, hashlib.sha1(good).hexdigest()),
+                (root_token, "batch/b.bin", 0, bad, "0" * 40),
+                ("no-such-root", "batch/c.bin", 0, good, hashlib.sha1(good).hexdigest()),
+                (root_token, "batch/a.bin", len(good), good, hashlib.sha1(good).hexdigest()),
+            ]
+            resp = session.post(batch_url, headers=headers, data=pack_batch(items))
+            assert resp.status_code == 200, f"Batch failed: {resp.status_code} {resp.text}"
+            results = unpack_results(resp.content)
+            assert results == [
+                (SUCCESS, len(good)),
+                (HASH_MISMATCH, 0),
+                (INVALID_ARGS, 0),
+                (SUCCESS, len(good)),
+            ], f"Unexpected results: {results}"
+            with open(os.path.join(download_root, "batch/a.bin"), "rb") as f:
+                assert f.read() == good + good
+            assert not os.path.exists(os.path.join(download_root, "batch/b.bin"))
+            print("  OK Per-item result codes and file contents")
+
+            # Test 2: Malformed body
+            print("\nTest 2: Truncated batch is rejected...")
+            resp = session.post(batch_url, headers=headers, data=pack_batch(items)[:-5])
+            assert resp.status_code == 400, f"Expected 400, got {resp.status_code}"
+            print("  OK 400 Bad Request")
+
+            # Test 3: Auth required
+            print("\nTest 3: Verify auth is required...")
+            resp = session.post(batch_url, data=pack_batch(items[:1]))
+            assert resp.status_code == 401, f"Expected 401, got {resp.status_code}"
+            print("  OK Unauthorized without token")
+
+            # Throughput comparison
+            print(
+                f"\nBenchmark: {BENCH_PIECE_COUNT} pieces of {BENCH_PIECE_SIZE // 1024}KB, "
+                f"batch size {BENCH_BATCH_SIZE}"
+            )
+            pieces = [os.urandom(BENCH_PIECE_SIZE) for _ in range(BENCH_PIECE_COUNT)]
+            hashes = [hashlib.sha1(p).hexdigest() for p in pieces]
+            total_mb = BENCH_PIECE_SIZE * BENCH_PIECE_COUNT / (1024 * 1024)
+
+            path_b64 = base64.b64encode(b"bench/single.bin").decode()
+            start = time.perf_counter()
+            for i, piece in enumerate(pieces):
+                resp = session.post(
+                    f"{base_url}/write/{root_token}",
+                    headers={
+                        **headers,
+                        "X-Path-Base64": path_b64,
+                        "X-Offset": str(i * BENCH_PIECE_SIZE),
+                        "X-Expected-SHA1": hashes[i],
+                    },
+                    data=piece,
+                )
+                assert resp.status_code == 200, f"Write failed: {resp.status_code}"
+            single_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for b in range(0, BENCH_PIECE_COUNT, BENCH_BATCH_SIZE):
+                batch = [
+                    (root_token, "bench/batch.bin", i * BENCH_PIECE_SIZE, pieces[i], hashes[i])
+                    for i in range(b, min(b + BENCH_BATCH_SIZE, BENCH_PIECE_COUNT))
+                ]
+                resp = session.post(batch_url, headers=headers, data=pack_batch(batch))
+                assert resp.status_code == 200, f"Batch failed: {resp.status_code}"
+                assert all(code == SUCCESS for code, _ in unpack_results(resp.content))
+            batch_s = time.perf_counter() - start
+
+            for name in ("single.bin", "batch.bin"):
+                with open(os.path.join(download_root, "bench", name), "rb") as f:
+                    assert f.read() == b"".join(pieces), f"{name} content mismatch"
+
+            print(f"  per-piece: {single_s:.3f}s ({total_mb / single_s:.1f} MB/s)")
+            print(f"  batched:   {batch_s:.3f}s ({total_mb / batch_s:.1f} MB/s)")
+            print(f"  speedup:   {single_s / batch_s:.2f}x")
+
+            print("\nAll batch write tests passed!")
+
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -85,6 +85,39 @@ async def read_messages(ws, f, cancel_event):
             f.flush()
             print(line, flush=True)
 
+async def stream_rpc_logs(base_url, level):
+    """Tail an engine's HTTP RPC log stream (/logs/stream), resuming after reconnects."""
+    f = open(LOG_FILE, "a")
+    cursor = None
+
+    while True:
+        url = f"{base_url.rstrip('/')}/logs/stream?level={level}"
+        if cursor is not None:
+            url += f"&after={cursor}"
+        log(f"Connecting to {url}")
+        try:
+            timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(url) as resp:
+                    f.write("\n--- Connected ---\n")
+                    f.flush()
+                    async for raw in resp.content:
+                        if not raw.strip():
+                            continue
+                        entry = json.loads(raw)
+                        cursor = entry["id"]
+                        line = f"[{entry['level']}] {entry['message']}"
+                        f.write(line + "\n")
+                        f.flush()
+                        print(line, flush=True)
+        except Exception as e:
+            log(f"Error: {type(e).__name__}: {e}")
+
+        f.write("--- Disconnected ---\n")
+        f.flush()
+        log("Reconnecting in 1s...")
+        await asyncio.sleep(1)
+
 async def stream_logs():
     f = open(LOG_FILE, "a")
     
@@ -133,5 +166,17 @@ async def stream_logs():
         await asyncio.sleep(1)
 
 if __name__ == "__main__":
+    # sw-log-stream.py [--rpc http://127.0.0.1:PORT] [--level debug]
+    # With --rpc, tails an engine's HTTP RPC log stream instead of the
+    # extension service worker's console.
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rpc", help="Engine HTTP RPC base URL")
+    parser.add_argument("--level", default="debug")
+    args = parser.parse_args()
+
     log("Starting")
-    asyncio.run(stream_logs())
+    if args.rpc:
+        asyncio.run(stream_rpc_logs(args.rpc, args.level))
+    else:
+        asyncio.run(stream_logs())
@@ -3,6 +3,7 @@ import {
   DaemonConnection,
   DaemonSocketFactory,
   DaemonFileSystem,
+  DaemonBatchingDiskQueue,
   DaemonHasher,
   StorageRootManager,
   ExternalChromeStorageSessionStore,
@@ -240,8 +241,10 @@ export class ChromeExtensionEngineManager implements IEngineManager {
     })
 
     // 3. Set up storage root manager
+    // Verified piece writes are batched into one daemon request per engine tick
+    const batchQueue = new DaemonBatchingDiskQueue(this.daemonConnection)
     const srm = new StorageRootManager(
-      (root) => new DaemonFileSystem(this.daemonConnection!, root.key),
+      (root) => new DaemonFileSystem(this.daemonConnection!, root.key, batchQueue),
     )
 
     // 4. Create session store (before registering roots so we can load default)
@@ -296,9 +299,15 @@ export class ChromeExtensionEngineManager implements IEngineManager {
 
     // 6. Create engine (suspended) with ConfigHub
     // Engine will auto-apply settings and subscribe to changes via ConfigHub
-    const hasher = new DaemonHasher(this.daemonConnection)
+    // Desktop io-daemon streams piece hashes over the /io socket; the Android
+    // companion daemon only has the HTTP hash endpoint
+    const socketFactory = new DaemonSocketFactory(this.daemonConnection)
+    if (!isChromeos) {
+      await socketFactory.enableFlowControl()
+    }
+    const hasher = new DaemonHasher(this.daemonConnection, isChromeos ? undefined : socketFactory)
     this.engine = new BtEngine({
-      socketFactory: new DaemonSocketFactory(this.daemonConnection),
+      socketFactory,
       storageRootManager: srm,
       sessionStore: this.sessionStore,
       hasher,
@@ -306,6 +315,7 @@ export class ChromeExtensionEngineManager implements IEngineManager {
       startSuspended: true,
       getNetworkInterfaces: () => this.daemonConnection!.getNetworkInterfaces(),
       config: configHub,
+      onEndOfTick: () => batchQueue.flushPending(),
     })
     window.engine = this.engine // expose for debugging
     console.log('[ChromeExtensionEngineManager] Engine created (suspended)')
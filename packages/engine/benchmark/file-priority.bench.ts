@@ -0,0 +1,166 @@
+/**
+ * Benchmark for piece classification in large multi-file torrents.
+ *
+ * Compares the previous classification (every piece checked against every
+ * file, stored as strings) with the interval sweep that re-classifies only
+ * the pieces of changed files, and measures the sweep on a season-pack
+ * layout of 20k files and 200k pieces.
+ *
+ * The large layout is synthetic by default. To use a real torrent instead,
+ * generate one with libtorrent and point FILE_PRIORITY_TORRENT at it:
+ *
+ *   cd integration/python && uv run python make_file_priority_fixture.py /tmp/fixture
+ *   FILE_PRIORITY_TORRENT=/tmp/fixture/season-pack.torrent \
+ *     pnpm vitest bench benchmark/file-priority.bench.ts
+ *
+ *   pnpm vitest bench benchmark/file-priority.bench.ts
+ *   NODE_OPTIONS='--jitless' pnpm vitest bench benchmark/file-priority.bench.ts
+ */
+import { readFileSync } from 'node:fs'
+import { bench, describe } from 'vitest'
+import { FilePriorityManager } from '../src/core/file-priority-manager'
+import type { FileInfo, PieceClassification } from '../src/core/file-priority-manager'
+import { TorrentParser } from '../src/core/torrent-parser'
+import { createFilter } from '../src/logging/logger'
+import { Bencode } from '../src/utils/bencode'
+import { MockEngine } from '../test/utils/mock-engine'
+
+interface Layout {
+  name: string
+  files: FileInfo[]
+  pieceLength: number
+  totalLength: number
+}
+
+let seed = 1
+const random = () => {
+  seed = (seed * 1103515245 + 12345) & 0x7fffffff
+  return seed / 0x80000000
+}
+
+/** Files of uneven size averaging `pieces / files` pieces each */
+function syntheticLayout(fileCount: number, pieceCount: number, pieceLength: number): Layout {
+  const totalLength = pieceCount * pieceLength
+  const weights = Array.from({ length: fileCount }, () => 0.5 + random())
+  const weightSum = weights.reduce((a, b) => a + b, 0)
+  const files: FileInfo[] = []
+  let offset = 0
+  for (let i = 0; i < fileCount; i++) {
+    const share = Math.floor((totalLength * weights[i]) / weightSum)
+    const length = i === fileCount - 1 ? totalLength - offset : share
+    files.push({ offset, length })
+    offset += length
+  }
+  return { name: `${fileCount} files, ${pieceCount} pieces`, files, pieceLength, totalLength }
+}
+
+function fixtureLayout(path: string): Layout {
+  const info = Bencode.decode(readFileSync(path)).info
+  const parsed = TorrentParser.parseInfoDictionary(info, new Uint8Array(20))
+  const pieces = Math.ceil(parsed.length / parsed.pieceLength)
+  return {
+    name: `${parsed.files.length} files, ${pieces} pieces (${path})`,
+    files: parsed.files,
+    pieceLength: parsed.pieceLength,
+    totalLength: parsed.length,
+  }
+}
+
+function createManager(layout: Layout): FilePriorityManager {
+  const { files, pieceLength, totalLength } = layout
+  const piecesCount = Math.ceil(totalLength / pieceLength)
+  const engine = new MockEngine()
+  engine.filterFn = createFilter({ level: 'error' })
+  const manager = new FilePriorityManager({
+    engine,
+    infoHash: new Uint8Array(20),
+    getPiecesCount: () => piecesCount,
+    getPieceLength: (i) => Math.min(pieceLength, totalLength - i * pieceLength),
+    getFiles: () => files,
+    hasMetadata: () => true,
+    isFileComplete: () => false,
+    getBitfield: () => undefined,
+    onPrioritiesChanged: () => {},
+    onBlacklistPieces: () => {},
+  })
+  manager.setStandardPieceLength(pieceLength)
+  manager.initFilePriorities()
+  return manager
+}
+
+/** The previous implementation: nested piece/file loops into a string array */
+function legacyClassify(layout: Layout, priorities: number[]): PieceClassification[] {
+  const { files, pieceLength, totalLength } = layout
+  const piecesCount = Math.ceil(totalLength / pieceLength)
+  const classification: PieceClassification[] = new Array(piecesCount)
+  for (let pieceIndex = 0; pieceIndex < piecesCount; pieceIndex++) {
+    const pieceStart = pieceIndex * pieceLength
+    const pieceEnd = Math.min(pieceStart + pieceLength, totalLength)
+    let touchesSkipped = false
+    let touchesNonSkipped = false
+    for (let fileIndex = 0; fileIndex < files.length; fileIndex++) {
+      const file = files[fileIndex]
+      if (pieceStart < file.offset + file.length && pieceEnd > file.offset) {
+        if (priorities[fileIndex] === 1) touchesSkipped = true
+        else touchesNonSkipped = true
+      }
+      if (touchesSkipped && touchesNonSkipped) break
+    }
+    classification[pieceIndex] =
+      touchesSkipped && touchesNonSkipped ? 'boundary' : touchesSkipped ? 'blacklisted' : 'wanted'
+  }
+  return classification
+}
+
+// The nested loops are quadratic: compare on a layout they can finish
+const small = syntheticLayout(2_000, 20_000, 16 * 1024)
+const large = process.env.FILE_PRIORITY_TORRENT
+  ? fixtureLayout(process.env.FILE_PRIORITY_TORRENT)
+  : syntheticLayout(20_000, 200_000, 16 * 1024)
+
+describe(`toggle one file: ${small.name}`, () => {
+  const priorities = new Array(small.files.length).fill(0)
+  let file = 0
+  bench(
+    'nested piece x file loops',
+    () => {
+      priorities[file] ^= 1
+      file = (file + 7) % small.files.length
+      legacyClassify(small, priorities)
+    },
+    { iterations: 5 },
+  )
+
+  const manager = createManager(small)
+  bench('interval sweep over changed files', () => {
+    manager.setFilePriority(file, manager.filePriorities[file] ^ 1)
+    file = (file + 7) % small.files.length
+  })
+})
+
+describe(large.name, () => {
+  const manager = createManager(large)
+  let file = 0
+  bench('toggle one file', () => {
+    manager.setFilePriority(file, manager.filePriorities[file] ^ 1)
+    file = (file + 7) % large.files.length
+  })
+
+  bench('skip 1000 files at once', () => {
+    const changes = new Map<number, number>()
+    for (let i = 0; i < 1000; i++) {
+      const index = (file + i * 13) % large.files.length
+      changes.set(index, manager.filePriorities[index] ^ 1)
+    }
+    file = (file + 1) % large.files.length
+    manager.setFilePriorities(changes)
+  })
+
+  bench(
+    'classify every piece (metadata load)',
+    () => {
+      manager.initFilePriorities()
+    },
+    { iterations: 20 },
+  )
+})
@@ -0,0 +1,118 @@
+/**
+ * Benchmark for the .parts file with 500 boundary pieces of 4MiB.
+ *
+ * Compares adding/removing one piece in the indexed format (one piece write
+ * plus an index entry) with the bencoded format's flush, which re-encoded
+ * and rewrote every stored piece (~2GiB here), and measures loading the
+ * index without reading piece data.
+ *
+ * Piece data is discarded by the filesystem; only the header and index are
+ * kept, so the benchmark measures CPU and bytes written rather than disk.
+ *
+ *   pnpm vitest bench benchmark/parts-file.bench.ts
+ */
+import { bench, describe } from 'vitest'
+import { PartsFile } from '../src/core/parts-file'
+import type { IFileHandle, IFileStat, IFileSystem } from '../src/interfaces/filesystem'
+import type { IStorageHandle } from '../src/io/storage-handle'
+import { Bencode } from '../src/utils/bencode'
+import { MockEngine } from '../test/utils/mock-engine'
+
+const PIECE_COUNT = 500
+const PIECE_LENGTH = 4 * 1024 * 1024
+/** Bytes kept per file; covers the header and an index of up to ~43k entries */
+const KEPT_BYTES = 1024 * 1024
+
+/**
+ * Filesystem that keeps the start of each file and discards the rest,
+ * counting bytes written.
+ */
+class DiscardingFileSystem implements IFileSystem {
+  files = new Map<string, { head: Uint8Array; size: number }>()
+  bytesWritten = 0
+
+  async open(path: string): Promise<IFileHandle> {
+    let file = this.files.get(path)
+    if (!file) {
+      file = { head: new Uint8Array(KEPT_BYTES), size: 0 }
+      this.files.set(path, file)
+    }
+    const f = file
+    const fs = this
+    return {
+      async read(buffer, offset, length, position) {
+        const bytes = Math.max(0, Math.min(length, f.size - position))
+        const kept = Math.max(0, Math.min(bytes, KEPT_BYTES - position))
+        if (kept > 0) buffer.set(f.head.subarray(position, position + kept), offset)
+        return { bytesRead: bytes }
+      },
+      async write(buffer, offset, length, position) {
+        const kept = Math.max(0, Math.min(length, KEPT_BYTES - position))
+        if (kept > 0) f.head.set(buffer.subarray(offset, offset + kept), position)
+        f.size = Math.max(f.size, position + length)
+        fs.bytesWritten += length
+        return { bytesWritten: length }
+      },
+      async truncate(len) {
+        f.size = len
+      },
+      async sync() {},
+      async close() {},
+    }
+  }
+
+  async stat(path: string): Promise<IFileStat> {
+    const file = this.files.get(path)
+    if (!file) throw new Error(`ENOENT: ${path}`)
+    return { size: file.size, mtime: new Date(), isDirectory: false, isFile: true }
+  }
+
+  async mkdir(): Promise<void> {}
+
+  async exists(path: string): Promise<boolean> {
+    return this.files.has(path)
+  }
+
+  async readdir(): Promise<string[]> {
+    return []
+  }
+
+  async delete(path: string): Promise<void> {
+    this.files.delete(path)
+  }
+}
+
+const fs = new DiscardingFileSystem()
+const storage: IStorageHandle = { id: 'bench', name: 'bench', getFileSystem: () => fs }
+const engine = new MockEngine()
+const infoHash = 'parts-bench'
+const piece = new Uint8Array(PIECE_LENGTH).fill(0xab)
+
+const partsFile = new PartsFile(engine, storage, infoHash)
+for (let i = 0; i < PIECE_COUNT; i++) partsFile.addPiece(i, piece)
+await partsFile.flush()
+
+describe(`.parts with ${PIECE_COUNT} pieces of 4MiB`, () => {
+  bench('indexed: remove + add one piece', async () => {
+    await partsFile.removePieceAndFlush(PIECE_COUNT - 1)
+    await partsFile.addPieceAndFlush(PIECE_COUNT - 1, piece)
+  })
+
+  bench('indexed: load index', async () => {
+    await new PartsFile(engine, storage, infoHash).load()
+  })
+
+  bench(
+    'bencoded: remove + add one piece (full rewrite per flush)',
+    () => {
+      const obj: Record<string, Uint8Array> = {}
+      for (let i = 0; i < PIECE_COUNT; i++) obj[String(i)] = piece
+      for (let flush = 0; flush < 2; flush++) {
+        if (flush === 0) delete obj[String(PIECE_COUNT - 1)]
+        else obj[String(PIECE_COUNT - 1)] = piece
+        fs.bytesWritten += Bencode.encode(obj).length
+      }
+    },
+    { iterations: 1, warmupIterations: 0 },
+  )
+})
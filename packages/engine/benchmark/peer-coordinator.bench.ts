@@ -0,0 +1,87 @@
+/**
+ * Benchmark for one choke round at 2000 connected peers.
+ *
+ * Compares the previous selection (filter, full sort by download rate, and an
+ * optimistic-candidate array holding each new peer three times) with the
+ * top-k pass and prefix-sum sampler, and measures a full PeerCoordinator
+ * evaluation, which is forced every call by advancing the clock.
+ *
+ *   pnpm vitest bench benchmark/peer-coordinator.bench.ts
+ *   NODE_OPTIONS='--jitless' pnpm vitest bench benchmark/peer-coordinator.bench.ts
+ */
+import { bench, describe } from 'vitest'
+import { PeerCoordinator, selectTopK, WeightedSampler } from '../src/core/peer-coordinator'
+import type { PeerSnapshot, UnchokePeerSnapshot } from '../src/core/peer-coordinator'
+
+const PEER_COUNT = 2000
+const REGULAR_SLOTS = 3
+const NEW_PEER_THRESHOLD_MS = 60_000
+const NEW_PEER_WEIGHT = 3
+
+let seed = 1
+const random = () => {
+  seed = (seed * 1103515245 + 12345) & 0x7fffffff
+  return seed / 0x80000000
+}
+
+let now = 10 * 60_000
+const clock = () => now
+
+const peers: PeerSnapshot[] = Array.from({ length: PEER_COUNT }, (_, i) => ({
+  id: `10.0.${i >> 8}.${i & 0xff}:6881`,
+  peerInterested: random() < 0.7,
+  peerChoking: random() < 0.5,
+  amChoking: true,
+  downloadRate: Math.floor(random() * 1_000_000),
+  connectedAt: now - Math.floor(random() * 5 * 60_000),
+  lastDataReceived: now,
+  isIncoming: random() < 0.3,
+  totalBytesReceived: 0,
+}))
+
+function legacySelect(list: UnchokePeerSnapshot[]): UnchokePeerSnapshot | undefined {
+  const interested = list.filter((p) => p.peerInterested)
+  const byDownloadRate = [...interested].sort((a, b) => b.downloadRate - a.downloadRate)
+  const titForTat = byDownloadRate.slice(0, REGULAR_SLOTS)
+  const titForTatIds = new Set(titForTat.map((p) => p.id))
+  const candidates = list.filter((p) => p.peerInterested && !titForTatIds.has(p.id))
+  const weighted: UnchokePeerSnapshot[] = []
+  for (const peer of candidates) {
+    const weight = now - peer.connectedAt < NEW_PEER_THRESHOLD_MS ? NEW_PEER_WEIGHT : 1
+    for (let i = 0; i < weight; i++) weighted.push(peer)
+  }
+  return weighted[Math.floor(random() * weighted.length)]
+}
+
+const sampler = new WeightedSampler<UnchokePeerSnapshot>(random)
+const titForTat: UnchokePeerSnapshot[] = []
+const isInterested = (p: UnchokePeerSnapshot) => p.peerInterested
+const byRate = (p: UnchokePeerSnapshot) => p.downloadRate
+const optimisticWeight = (p: UnchokePeerSnapshot) => {
+  if (!p.peerInterested || titForTat.includes(p)) return 0
+  return now - p.connectedAt < NEW_PEER_THRESHOLD_MS ? NEW_PEER_WEIGHT : 1
+}
+
+function pooledSelect(list: UnchokePeerSnapshot[]): UnchokePeerSnapshot | null {
+  selectTopK(list, REGULAR_SLOTS, byRate, titForTat, isInterested)
+  return sampler.sample(list, optimisticWeight)
+}
+
+describe(`unchoke selection over ${PEER_COUNT} peers`, () => {
+  bench('filter + sort + expanded weighted array', () => {
+    if (!legacySelect(peers)) throw new Error('no candidate')
+  })
+
+  bench('top-k + prefix-sum sampler', () => {
+    if (!pooledSelect(peers)) throw new Error('no candidate')
+  })
+})
+
+describe(`PeerCoordinator.evaluate over ${PEER_COUNT} peers`, () => {
+  const coordinator = new PeerCoordinator({}, {}, clock, random)
+
+  bench('choke round (forced every call)', () => {
+    now += 30_000
+    coordinator.evaluate(peers, true)
+  })
+})
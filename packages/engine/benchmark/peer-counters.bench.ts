@@ -0,0 +1,94 @@
+/**
+ * Benchmark for buffered-bytes accounting at 5000 connected peers.
+ *
+ * Compares the per-tick recount over every peer (what backpressure and tick
+ * results used to do) with reading the incrementally maintained counters,
+ * and measures what the deltas cost on the receive path.
+ *
+ *   pnpm vitest bench benchmark/peer-counters.bench.ts
+ *   NODE_OPTIONS='--jitless' pnpm vitest bench benchmark/peer-counters.bench.ts
+ */
+import { bench, describe } from 'vitest'
+import { PeerConnection } from '../src/core/peer-connection'
+import { PeerCounters, sumPeerCounters } from '../src/core/peer-counters'
+import { PeerWireProtocol } from '../src/protocol/wire-protocol'
+import type { ITcpSocket } from '../src/interfaces/socket'
+import { MockEngine } from '../test/utils/mock-engine'
+
+const PEER_COUNT = 5000
+const TORRENT_COUNT = 50
+
+class BenchSocket implements ITcpSocket {
+  onDataCb: ((data: Uint8Array) => void) | null = null
+  send(): void {}
+  onData(cb: (data: Uint8Array) => void): void {
+    this.onDataCb = cb
+  }
+  onClose(): void {}
+  onError(): void {}
+  close(): void {}
+}
+
+const engine = new MockEngine()
+engine.autoDrainBuffers = false
+const engineCounters = new PeerCounters()
+const torrents = Array.from({ length: TORRENT_COUNT }, () => ({
+  counters: new PeerCounters(engineCounters),
+  peers: [] as PeerConnection[],
+}))
+const sockets: BenchSocket[] = []
+
+const handshake = PeerWireProtocol.createHandshake(new Uint8Array(20), new Uint8Array(20))
+// KEEPALIVE; the last one of a drain stays buffered until more data arrives
+const chunk = new Uint8Array(4)
+
+for (let i = 0; i < PEER_COUNT; i++) {
+  const socket = new BenchSocket()
+  const peer = new PeerConnection(engine, socket)
+  socket.onDataCb!(handshake)
+  const torrent = torrents[i % TORRENT_COUNT]
+  peer.attachCounters(torrent.counters)
+  torrent.peers.push(peer)
+  sockets.push(socket)
+}
+
+describe(`backpressure total over ${PEER_COUNT} peers`, () => {
+  bench('recount every peer', () => {
+    let total = 0
+    for (const torrent of torrents) {
+      for (const peer of torrent.peers) total += peer.bufferedBytes
+    }
+    if (total < 0) throw new Error('unreachable')
+  })
+
+  bench('read engine counters', () => {
+    if (engineCounters.bufferedBytes < 0) throw new Error('unreachable')
+  })
+})
+
+describe(`tick result sums for ${TORRENT_COUNT} torrents`, () => {
+  bench('recount every peer', () => {
+    for (const torrent of torrents) sumPeerCounters(torrent.peers)
+  })
+
+  bench('read torrent counters', () => {
+    let total = 0
+    for (const torrent of torrents) {
+      const c = torrent.counters
+      total += c.bufferedBytes + c.requestsPending + c.pipelineDepth
+    }
+    if (total < 0) throw new Error('unreachable')
+  })
+})
+
+describe(`receive + drain on ${PEER_COUNT} peers (delta overhead)`, () => {
+  bench('data, drain and request accounting', () => {
+    for (let i = 0; i < PEER_COUNT; i++) {
+      sockets[i].onDataCb!(chunk)
+      const peer = torrents[i % TORRENT_COUNT].peers[Math.floor(i / TORRENT_COUNT)]
+      peer.requestsPending++
+      peer.drainBuffer()
+      peer.requestsPending--
+    }
+  })
+})
@@ -0,0 +1,108 @@
+/**
+ * Benchmark for connect-candidate selection in a 50k peer swarm.
+ *
+ * Compares the previous selection (filter every peer, score and sort all
+ * eligible ones) with the incremental PeerSelector, under the usual pattern:
+ * pick a burst of candidates, start connecting to them, and have earlier
+ * attempts fail into backoff.
+ *
+ *   pnpm vitest bench benchmark/peer-selector.bench.ts
+ *   NODE_OPTIONS='--jitless' pnpm vitest bench benchmark/peer-selector.bench.ts
+ */
+import { bench, describe } from 'vitest'
+import { PeerSelector } from '../src/core/peer-selector'
+import { Swarm, addressKey, getPortScorePenalty } from '../src/core/swarm'
+import type { PeerAddress, SwarmPeer } from '../src/core/swarm'
+import type { Logger } from '../src/logging/logger'
+
+const PEER_COUNT = 50_000
+const BURST = 10
+
+const noop = () => {}
+const logger: Logger = { debug: noop, info: noop, warn: noop, error: noop }
+
+const addresses: PeerAddress[] = Array.from({ length: PEER_COUNT }, (_, i) => ({
+  ip: `10.${i >> 16}.${(i >> 8) & 0xff}.${i & 0xff}`,
+  port: 6881 + (i % 1000),
+  family: 'ipv4',
+}))
+
+function createSwarm(): Swarm {
+  const swarm = new Swarm(logger)
+  swarm.addPeers(addresses, 'tracker')
+  return swarm
+}
+
+const backoff = (failures: number) => Math.min(1000 * Math.pow(2, failures), 5 * 60 * 1000)
+
+function legacyScore(peer: SwarmPeer, now: number): number {
+  let score = 100 + getPortScorePenalty(peer.port)
+  if (peer.lastConnectSuccess) score += 50
+  score -= peer.connectFailures * 20
+  if (peer.lastConnectAttempt) {
+    const timeSince = now - peer.lastConnectAttempt
+    if (timeSince < 30000) score -= 30
+    else if (timeSince < 60000) score -= 15
+  }
+  return score + 10 + Math.random() * 10
+}
+
+function legacySelect(swarm: Swarm, limit: number): SwarmPeer[] {
+  const now = Date.now()
+  const candidates: SwarmPeer[] = []
+  for (const peer of swarm.getAllPeersArray()) {
+    if (peer.state !== 'idle' && peer.state !== 'failed') continue
+    if (peer.state === 'failed' && peer.lastConnectAttempt) {
+      if (now - peer.lastConnectAttempt < backoff(peer.connectFailures)) continue
+    }
+    if (peer.state === 'idle' && peer.quickDisconnects > 0 && peer.lastDisconnect) {
+      if (now - peer.lastDisconnect < backoff(peer.quickDisconnects)) continue
+    }
+    if (!peer.suspiciousPort) candidates.push(peer)
+  }
+  const scored = candidates.map((peer) => ({ peer, score: legacyScore(peer, now) }))
+  scored.sort((a, b) => b.score - a.score)
+  return scored.slice(0, limit).map((s) => s.peer)
+}
+
+/**
+ * One connect round: fail the previous burst into backoff, then select and
+ * start the next one.
+ */
+function round(swarm: Swarm, select: (limit: number) => SwarmPeer[], pending: string[]): void {
+  for (const key of pending) swarm.markConnectFailed(key, 'timeout')
+  pending.length = 0
+  for (const peer of select(BURST)) {
+    const key = addressKey(peer)
+    swarm.markConnecting(key)
+    pending.push(key)
+  }
+}
+
+describe(`select ${BURST} of ${PEER_COUNT} peers`, () => {
+  const legacySwarm = createSwarm()
+  const legacyPending: string[] = []
+  bench('filter + score + sort every call', () => {
+    round(legacySwarm, (limit) => legacySelect(legacySwarm, limit), legacyPending)
+  })
+
+  const swarm = createSwarm()
+  const selector = new PeerSelector(swarm)
+  const pending: string[] = []
+  bench('incremental candidate heap', () => {
+    round(swarm, (limit) => selector.getConnectablePeers(limit), pending)
+  })
+})
+
+describe(`add ${PEER_COUNT} peers and select`, () => {
+  bench(
+    'first selection after bulk add',
+    () => {
+      const swarm = new Swarm(logger)
+      const selector = new PeerSelector(swarm)
+      swarm.addPeers(addresses, 'tracker')
+      selector.getConnectablePeers(BURST)
+    },
+    { iterations: 10 },
+  )
+})
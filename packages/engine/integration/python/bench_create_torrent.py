@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark torrent creation: JSTorrent's TorrentCreator vs libtorrent's create_torrent.
+
+Both hash the same generated data with the same piece length; the piece
+hashes (v1) and per-file merkle roots (v2) are compared to check that the
+two creators agree.
+
+Usage:
+    uv run python bench_create_torrent.py
+    uv run python bench_create_torrent.py --size 10gb --files 20 --version hybrid
+    uv run python bench_create_torrent.py --path /data/some-folder --version v2
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import libtorrent as lt
+
+from libtorrent_utils import create_torrent_from_path
+
+CHUNK = 4 * 1024 * 1024
+
+
+def parse_size(value: str) -> int:
+    match = re.fullmatch(r"(\d+)\s*(kb|mb|gb)?", value.strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    units = {None: 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+    return int(match.group(1)) * units[match.group(2)]
+
+
+def generate_data(root: str, size: int, files: int, seed: int) -> str:
+    """Write `files` files totalling `size` bytes; returns the path to hash."""
+    rng = random.Random(seed)
+    target = os.path.join(root, "bench-data")
+    os.makedirs(target)
+    # Uneven sizes so files don't line up with pieces
+    weights = [rng.uniform(0.5, 1.5) for _ in range(files)]
+    sizes = [int(size * w / sum(weights)) for w in weights]
+    sizes[-1] += size - sum(sizes)
+    for i, file_size in enumerate(sizes):
+        with open(os.path.join(target, f"file_{i:04d}.bin"), "wb") as f:
+            remaining = file_size
+            while remaining > 0:
+                n = min(CHUNK, remaining)
+                f.write(rng.randbytes(n))
+                remaining -= n
+    if files == 1:
+        return os.path.join(target, "file_0000.bin")
+    return target
+
+
+def list_files(path: str) -> list:
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(d, f) for d, _, names in os.walk(path) for f in names]
+
+
+def run_jstorrent(path: str, out: str, version: str, piece_length: int) -> float:
+    script = os.path.join(os.path.dirname(__file__), "create_torrent.ts")
+    cwd = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+    result = subprocess.run(
+        ["npx", "tsx", script, path, out, version, str(piece_length)],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    match = re.search(r"CREATE_SECONDS=([\d.]+)", result.stdout)
+    if not match:
+        raise RuntimeError(f"create_torrent.ts did not report timing:\n{result.stdout}")
+    return float(match.group(1))
+
+
+def pieces_roots(tree: dict, prefix: tuple = ()) -> dict:
+    roots = {}
+    for key, value in tree.items():
+        if key == b"":
+            roots[prefix] = value.get(b"pieces root")
+        else:
+            roots.update(pieces_roots(value, prefix + (key,)))
+    return roots
+
+
+def v1_files(info: dict) -> list:
+    if b"files" not in info:
+        return [(info[b"name"], info[b"length"])]
+    return [(tuple(f[b"path"]), f[b"length"]) for f in info[b"files"]]
+
+
+def compare(ours: bytes, theirs: bytes, version: str) -> list:
+    """Return a list of differences between the two torrents' hashes."""
+    a = lt.bdecode(ours)[b"info"]
+    b = lt.bdecode(theirs)[b"info"]
+    problems = []
+    if a[b"piece length"] != b[b"piece length"]:
+        problems.append(f"piece length {a[b'piece length']} != {b[b'piece length']}")
+        return problems
+    if version != "v2":
+        if v1_files(a) != v1_files(b):
+            print("  note: v1 file order differs from libtorrent, skipping piece comparison")
+        elif a[b"pieces"] != b[b"pieces"]:
+            problems.append("v1 piece hashes differ")
+    if version != "v1":
+        if pieces_roots(a[b"file tree"]) != pieces_roots(b[b"file tree"]):
+            problems.append("v2 pieces roots differ")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=parse_size, default=parse_size("1gb"), help="Total data size (e.g. 500mb, 10gb)")
+    parser.add_argument("--files", type=int, default=1, help="Number of files to split the data into")
+    parser.add_argument("--version", choices=["v1", "v2", "hybrid"], default="v1")
+    parser.add_argument("--piece-length", type=parse_size, default=parse_size("1mb"))
+    parser.add_argument("--path", help="Hash existing data instead of generating it")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-create-")
+    try:
+        if args.path:
+            path = os.path.abspath(args.path)
+        else:
+            print(f"Generating {args.size / 1024 ** 3:.2f} GiB in {args.files} file(s)...")
+            path = generate_data(workdir, args.size, args.files, args.seed)
+        files = list_files(path)
+        total = sum(os.path.getsize(f) for f in files)
+
+        # Warm the page cache so both runs measure hashing rather than cold reads
+        for file_path in files:
+            with open(file_path, "rb") as f:
+                while f.read(CHUNK):
+                    pass
+
+        print(f"Creating {args.version} torrent, piece length {args.piece_length}")
+        theirs, lt_seconds = create_torrent_from_path(path, args.version, args.piece_length)
+        out = os.path.join(workdir, "jstorrent.torrent")
+        start = time.perf_counter()
+        jst_seconds = run_jstorrent(path, out, args.version, args.piece_length)
+        wall = time.perf_counter() - start
+        with open(out, "rb") as f:
+            ours = f.read()
+
+        mib = total / 1024 ** 2
+        print()
+        print(f"{'creator':<12} {'seconds':>10} {'MiB/s':>10}")
+        print(f"{'libtorrent':<12} {lt_seconds:>10.2f} {mib / lt_seconds:>10.1f}")
+        print(f"{'jstorrent':<12} {jst_seconds:>10.2f} {mib / jst_seconds:>10.1f}   (process {wall:.2f}s)")
+        print(f"ratio: {jst_seconds / lt_seconds:.2f}x libtorrent")
+
+        problems = compare(ours, theirs, args.version)
+        for problem in problems:
+            print(f"MISMATCH: {problem}")
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
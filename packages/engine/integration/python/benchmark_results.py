@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Store benchmark_tick.py runs and compare them across engine commits.
+
+Each run is appended to a JSONL file (one run per line) together with the
+git SHA it ran on and its configuration: jitless, size, peers, storage and
+seeder. Runs with the same configuration on the same SHA form a sample;
+means get a 95% confidence interval (Student's t), and `compare` runs a
+Welch t-test per metric to flag regressions that are both statistically
+significant and larger than --threshold.
+
+Usage:
+    # Record: benchmark_tick.py saves every completed run
+    uv run python benchmark_tick.py --repeat 5
+    uv run python benchmark_tick.py --repeat 5 --jitless --peers 5
+
+    # Inspect
+    uv run python benchmark_results.py list
+    uv run python benchmark_results.py summary --sha HEAD
+
+    # Regressions from main to the working tree's commit (exit code 1 if any);
+    # runs recorded with --profile also point at the head's .cpuprofile
+    uv run python benchmark_results.py compare main HEAD
+    uv run python benchmark_results.py compare abc1234 def5678 --size 1gb --peers 5
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from deterministic_data import DEFAULT_DATA_DIR
+
+DEFAULT_RESULTS_PATH = DEFAULT_DATA_DIR / "benchmark-results.jsonl"
+
+# Configuration that must match for two runs to be comparable
+CONFIG_KEYS = ("jitless", "size", "peers", "storage", "seeder")
+
+# Compared metrics: +1 if higher is better, -1 if lower is better
+METRICS = {
+    "p99_tick_ms": -1,
+    "avg_tick_ms": -1,
+    "download_speed_mbps": +1,
+    "peak_rss_mb": -1,
+}
+
+# Two-sided 95% critical values of Student's t by degrees of freedom
+_T95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+    9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131,
+    16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 25: 2.060, 30: 2.042,
+    40: 2.021, 60: 2.000, 120: 1.980,
+}
+
+
+def t_critical(df: float) -> float:
+    """95% two-sided critical value, rounding df down (conservative)."""
+    if df < 1:
+        return math.inf
+    if df >= 1000:
+        return 1.960
+    return _T95[max(k for k in _T95 if k <= df)]
+
+
+@dataclass
+class Summary:
+    """Mean of one metric over a sample of runs, with its 95% confidence interval."""
+    n: int
+    mean: float
+    stdev: float
+    ci: float  # Half-width; the interval is mean ± ci
+
+    def __str__(self) -> str:
+        if self.n < 2:
+            return f"{self.mean:.2f} (n=1)"
+        return f"{self.mean:.2f} ± {self.ci:.2f} (n={self.n})"
+
+
+def summarize(values: List[float]) -> Summary:
+    n = len(values)
+    mean = statistics.fmean(values)
+    if n < 2:
+        return Summary(n, mean, 0.0, math.inf)
+    stdev = statistics.stdev(values)
+    return Summary(n, mean, stdev, t_critical(n - 1) * stdev / math.sqrt(n))
+
+
+def welch_significant(a: Summary, b: Summary) -> bool:
+    """Welch's t-test at 95%: do the two means differ?"""
+    if a.n < 2 or b.n < 2:
+        return False
+    va, vb = a.stdev ** 2 / a.n, b.stdev ** 2 / b.n
+    if va + vb == 0:
+        return a.mean != b.mean
+    t = abs(a.mean - b.mean) / math.sqrt(va + vb)
+    df = (va + vb) ** 2 / (va ** 2 / (a.n - 1) + vb ** 2 / (b.n - 1))
+    return t > t_critical(df)
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+
+def git_revision() -> Tuple[str, bool]:
+    """(HEAD SHA, whether tracked files have uncommitted changes)."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=cwd, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return sha, bool(status.strip())
+
+
+def resolve_ref(ref: str) -> str:
+    """Full SHA for a git ref, or `ref` itself (matched as a SHA prefix)."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            cwd=cwd, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ref
+
+
+def record_run(run: Dict, path: Path = DEFAULT_RESULTS_PATH) -> Dict:
+    """Append one run, stamped with the time and git revision; returns the stored record."""
+    sha, dirty = git_revision()
+    record = {"timestamp": time.time(), "git_sha": sha, "git_dirty": dirty, **run}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
+
+
+def load_runs(path: Path = DEFAULT_RESULTS_PATH) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def config_of(run: Dict) -> Tuple:
+    return tuple(run.get(key) for key in CONFIG_KEYS)
+
+
+def describe_config(config: Tuple) -> str:
+    return ", ".join(f"{key}={value}" for key, value in zip(CONFIG_KEYS, config))
+
+
+def select(runs: Iterable[Dict], sha: Optional[str] = None, **config) -> List[Dict]:
+    """Runs on `sha` (full SHA or prefix) whose configuration matches the given keys."""
+    return [
+        run
+        for run in runs
+        if (sha is None or run["git_sha"].startswith(sha))
+        and all(run.get(key) == value for key, value in config.items() if value is not None)
+    ]
+
+
+def group_by_config(runs: Iterable[Dict]) -> Dict[Tuple, List[Dict]]:
+    groups: Dict[Tuple, List[Dict]] = {}
+    for run in runs:
+        groups.setdefault(config_of(run), []).append(run)
+    return groups
+
+
+def summarize_runs(runs: List[Dict]) -> Dict[str, Summary]:
+    """Summary per metric, skipping metrics no run recorded."""
+    summaries = {}
+    for metric in METRICS:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        if values:
+            summaries[metric] = summarize(values)
+    return summaries
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Comparison:
+    metric: str
+    base: Summary
+    head: Summary
+    change: float  # Relative change of the mean, head vs base
+    verdict: str  # "regression", "improvement", "~" (no significant change) or "n/a"
+
+
+def compare_runs(base: List[Dict], head: List[Dict], threshold: float = 0.02) -> List[Comparison]:
+    """Compare two samples of one configuration, metric by metric."""
+    base_summaries = summarize_runs(base)
+    head_summaries = summarize_runs(head)
+    comparisons = []
+    for metric, direction in METRICS.items():
+        if metric not in base_summaries or metric not in head_summaries:
+            continue
+        b, h = base_summaries[metric], head_summaries[metric]
+        change = (h.mean - b.mean) / b.mean if b.mean else 0.0
+        if b.n < 2 or h.n < 2:
+            verdict = "n/a"
+        elif abs(change) < threshold or not welch_significant(b, h):
+            verdict = "~"
+        else:
+            verdict = "improvement" if change * direction > 0 else "regression"
+        comparisons.append(Comparison(metric, b, h, change, verdict))
+    return comparisons
+
+
+def print_summary(runs: List[Dict], quiet: bool = False) -> None:
+    """Mean and 95% CI of each metric over repeated runs of one configuration."""
+    summaries = summarize_runs(runs)
+    if quiet:
+        for metric, s in summaries.items():
+            print(f"{metric.upper()}_MEAN={s.mean:.2f}")
+            print(f"{metric.upper()}_CI95={s.ci:.2f}")
+        return
+    print(f"Summary over {len(runs)} runs (mean ± 95% CI):")
+    for metric, s in summaries.items():
+        print(f"  {metric:22s} {s}")
+
+
+def cmd_list(args) -> int:
+    runs = load_runs(args.file)
+    by_sha: Dict[str, List[Dict]] = {}
+    for run in runs:
+        by_sha.setdefault(run["git_sha"], []).append(run)
+    for sha, sha_runs in by_sha.items():
+        dirty = " (dirty)" if any(run.get("git_dirty") for run in sha_runs) else ""
+        print(f"{sha[:12]}{dirty}")
+        for config, group in group_by_config(sha_runs).items():
+            print(f"  {len(group):3d} runs  {describe_config(config)}")
+    if not runs:
+        print(f"No runs recorded in {args.file}")
+    return 0
+
+
+def cmd_summary(args) -> int:
+    sha = resolve_ref(args.sha) if args.sha else None
+    runs = select(load_runs(args.file), sha, **config_filter(args))
+    for config, group in group_by_config(runs).items():
+        print(describe_config(config))
+        print_summary(group)
+        print()
+    if not runs:
+        print("No matching runs")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    runs = load_runs(args.file)
+    config = config_filter(args)
+    base = group_by_config(select(runs, resolve_ref(args.base), **config))
+    head = group_by_config(select(runs, resolve_ref(args.head), **config))
+
+    regressions = 0
+    common = [c for c in base if c in head]
+    for cfg in common:
+        print(describe_config(cfg))
+        print(f"  {'metric':22s} {'base':>24s} {'head':>24s} {'change':>8s}")
+        regressed = False
+        for c in compare_runs(base[cfg], head[cfg], args.threshold):
+            flag = "  <-- REGRESSION" if c.verdict == "regression" else f"  {c.verdict}"
+            print(f"  {c.metric:22s} {str(c.base):>24s} {str(c.head):>24s} {c.change:+8.1%}{flag}")
+            regressed |= c.verdict == "regression"
+        # Runs recorded with --profile point at their .cpuprofile: the hot stacks
+        profiles = [run["profile"] for run in head[cfg] if run.get("profile")]
+        if regressed and profiles:
+            print(f"  head CPU profile: {profiles[-1]}")
+        regressions += regressed
+        print()
+    if not common:
+        print(f"No configuration has runs on both {args.base} and {args.head}")
+        return 2
+    return 1 if regressions else 0
+
+
+def config_filter(args) -> Dict:
+    return {
+        "jitless": args.jitless,
+        "size": args.size,
+        "peers": args.peers,
+        "storage": args.storage,
+        "seeder": args.seeder,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--file", type=Path, default=DEFAULT_RESULTS_PATH, help="Results JSONL")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--jitless", action="store_true", default=None)
+        p.add_argument("--jit", dest="jitless", action="store_false")
+        p.add_argument("--size")
+        p.add_argument("--peers", type=int)
+        p.add_argument("--storage")
+        p.add_argument("--seeder")
+
+    commands.add_parser("list", help="Recorded runs by SHA and configuration")
+
+    summary = commands.add_parser("summary", help="Mean and 95%% CI per configuration")
+    summary.add_argument("--sha", help="Git ref or SHA prefix")
+    add_filters(summary)
+
+    compare = commands.add_parser("compare", help="Flag significant regressions")
+    compare.add_argument("base", help="Baseline git ref or SHA prefix")
+    compare.add_argument("head", help="Candidate git ref or SHA prefix")
+    compare.add_argument(
+        "--threshold", type=float, default=0.02,
+        help="Ignore changes smaller than this fraction of the mean (default: 0.02)",
+    )
+    add_filters(compare)
+
+    args = parser.parse_args()
+    handlers = {"list": cmd_list, "summary": cmd_summary, "compare": cmd_compare}
+    return handlers[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
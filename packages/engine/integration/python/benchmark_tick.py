@@ -19,32 +19,58 @@ Usage:
     uv run python benchmark_tick.py --peers 5
     uv run python benchmark_tick.py --peers 10 --size 1gb
 
+    # Synthetic seeders: data computed on the fly, nothing stored on disk
+    uv run python benchmark_tick.py --seeder synthetic --size 100gb --peers 5
+
+    # Protocol-only throughput: downloaded data is verified, then discarded
+    uv run python benchmark_tick.py --storage null --peers 5
+
     # Quiet mode (machine-parseable output)
     uv run python benchmark_tick.py --quiet
 
+    # Per-subsystem memory over time (active pieces, swarm, DHT, logs, heap, ...)
+    uv run python benchmark_tick.py --memory memory.csv
+
+    # CPU profile of the download (.cpuprofile saved next to the results)
+    uv run python benchmark_tick.py --profile
+
+    # Repeated runs for confidence intervals; each run is recorded with the git SHA
+    uv run python benchmark_tick.py --repeat 5
+    uv run python benchmark_results.py compare main HEAD
+
+    # Save per-category throughput from the engine's bandwidth history
+    uv run python benchmark_tick.py --throughput throughput.csv
+    uv run python benchmark_tick.py --throughput throughput.png  # needs matplotlib
+
 Prerequisites (single peer mode):
     Start the seeder first in another terminal:
     pnpm seed-for-test --size 1gb
 
-For --peers mode, seeders are started automatically.
+For --peers mode and --seeder synthetic, seeders are started automatically.
+Sizes other than 100mb/1gb get their info hash from the fixture manifest
+(deterministic_data.py), generating it first if needed.
 """
 import argparse
 import os
+import shutil
 import signal
 import subprocess
 import sys
+import tempfile
 import time
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import quote
 
+from benchmark_results import DEFAULT_RESULTS_PATH, git_revision, print_summary, record_run
+from deterministic_data import DEFAULT_DATA_DIR, SEED, SIZE_CONFIGS, ensure_fixture
 from jst import JSTEngine
 
 # Test info hashes and filenames (must match seed_for_test.py)
 INFOHASH_100MB = "67d01ece1b99c49c257baada0f760b770a7530b9"
 INFOHASH_1GB = "18a7aacab6d2bc518e336921ccd4b6cc32a9624b"
-FILENAME_100MB = "testdata_100mb.bin"
-FILENAME_1GB = "testdata_1gb.bin"
+KNOWN_INFOHASHES = {"100mb": INFOHASH_100MB, "1gb": INFOHASH_1GB}
 
 
 def build_magnet(info_hash: str, name: str, peers: List[Tuple[str, int]]) -> str:
@@ -81,6 +107,53 @@ class BenchmarkResult:
     jitless: bool
     size_bytes: int
     num_peers: int = 1
+    storage: str = "disk"
+    peak_rss_mb: Optional[float] = None  # Engine process, when the OS reports it
+    profile: Optional[str] = None  # .cpuprofile of the download, with --profile
+
+
+def memory_sample(report: dict, elapsed: float) -> Dict[str, float]:
+    """Flatten a memory report into one row: subsystem estimates plus process memory."""
+    row = {"time": elapsed, **report["subsystems"], "total": report["total"]}
+    for key in ("rss", "heapUsed", "external", "arrayBuffers"):
+        row[key] = report["process"][key]
+    return row
+
+
+def save_memory(samples: List[Dict[str, float]], path: str) -> None:
+    """Write memory samples as CSV, one column per subsystem (bytes)."""
+    if not samples:
+        return
+    columns = list(samples[0])
+    with open(path, "w") as f:
+        f.write(",".join(columns) + "\n")
+        for row in samples:
+            f.write(",".join(f"{row[c]:.2f}" if c == "time" else str(row[c]) for c in columns))
+            f.write("\n")
+
+
+def print_memory_peaks(samples: List[Dict[str, float]]) -> None:
+    print("Peak memory (engine estimates, then process):")
+    for column in samples[0]:
+        if column != "time":
+            peak = max(row[column] for row in samples)
+            print(f"  {column:18s} {peak / (1024 * 1024):8.1f} MB")
+
+
+def profile_path(args: argparse.Namespace) -> Path:
+    """Where --profile saves a run's .cpuprofile: a profiles/ dir next to the results."""
+    sha, dirty = git_revision()
+    mode = "jitless" if args.jitless else "jit"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"{sha[:10]}{'-dirty' if dirty else ''}-{args.size}-{args.peers}p-{mode}-{stamp}"
+    return args.results.parent / "profiles" / f"{name}.cpuprofile"
+
+
+def print_hotspots(hotspots: List[dict]) -> None:
+    print("Top self time (CPU profile):")
+    for h in hotspots:
+        location = h["location"].rsplit("/", 1)[-1]
+        print(f"  {h['selfPercent']:5.1f}% {h['selfMs']:9.0f} ms  {h['functionName']}  {location}")
 
 
 def collect_tick_samples(
@@ -89,8 +162,13 @@ def collect_tick_samples(
     poll_interval: float = 1.0,
     timeout: float = 600.0,
     quiet: bool = False,
+    memory_samples: Optional[List[Dict[str, float]]] = None,
 ) -> List[TickSample]:
-    """Collect tick samples until download completes or timeout."""
+    """Collect tick samples until download completes or timeout.
+
+    If `memory_samples` is a list, the engine's memory report is appended to
+    it at every poll (see memory_sample).
+    """
     samples: List[TickSample] = []
     start_time = time.time()
     last_tick_count = 0
@@ -106,6 +184,8 @@ def collect_tick_samples(
         try:
             status = engine.get_torrent_status(tid)
             tick_stats = engine.get_tick_stats()
+            if memory_samples is not None:
+                memory_samples.append(memory_sample(engine.memory_report(), elapsed))
         except Exception as e:
             if not quiet:
                 print(f"\nError getting stats: {e}")
@@ -174,6 +254,7 @@ def calculate_results(
     jitless: bool,
     size_bytes: int,
     num_peers: int = 1,
+    storage: str = "disk",
 ) -> BenchmarkResult:
     """Calculate final benchmark statistics."""
     if not samples:
@@ -187,6 +268,7 @@ def calculate_results(
             download_speed_mbps=0,
             jitless=jitless,
             size_bytes=size_bytes,
+            storage=storage,
         )
 
     total_time = samples[-1].timestamp
@@ -221,9 +303,52 @@ def calculate_results(
         jitless=jitless,
         size_bytes=size_bytes,
         num_peers=num_peers,
+        storage=storage,
     )
 
 
+def summarize_throughput(history: Dict[str, Dict[str, dict]]) -> List[Tuple[str, float, float]]:
+    """Return (category, avg MB/s, peak MB/s) for categories that saw download traffic."""
+    rows = []
+    for category, directions in history.items():
+        series = directions.get("down")
+        if series is None or not series["bytes"].any():
+            continue
+        rate = series["rate"]
+        rows.append((category, rate.mean() / (1024 * 1024), rate.max() / (1024 * 1024)))
+    return rows
+
+
+def save_throughput(history: Dict[str, Dict[str, dict]], path: str) -> None:
+    """Write per-category download throughput as CSV, or plot it if path ends in .png/.svg."""
+    series = {
+        category: directions["down"]
+        for category, directions in history.items()
+        if "down" in directions and directions["down"]["bytes"].any()
+    }
+    if path.endswith((".png", ".svg")):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 5))
+        for category, s in series.items():
+            t0 = s["times"][0]
+            ax.plot(s["times"] - t0, s["rate"] / (1024 * 1024), label=category)
+        ax.set_xlabel("seconds")
+        ax.set_ylabel("MB/s")
+        ax.set_title("Download throughput by traffic category")
+        ax.legend()
+        fig.savefig(path)
+        return
+
+    with open(path, "w") as f:
+        f.write("category,time,bucket_ms,bytes,bytes_per_sec\n")
+        for category, s in series.items():
+            for t, b, r in zip(s["times"], s["bytes"], s["rate"]):
+                f.write(f"{category},{t:.3f},{s['bucket_ms']},{b:.0f},{r:.0f}\n")
+
+
 def print_results(result: BenchmarkResult, quiet: bool = False):
     """Print benchmark results."""
     if quiet:
@@ -231,6 +356,7 @@ def print_results(result: BenchmarkResult, quiet: bool = False):
         print(f"JITLESS={result.jitless}")
         print(f"SIZE_BYTES={result.size_bytes}")
         print(f"NUM_PEERS={result.num_peers}")
+        print(f"STORAGE={result.storage}")
         print(f"TOTAL_TICKS={result.total_ticks}")
         print(f"TOTAL_TIME_SEC={result.total_time_sec:.2f}")
         print(f"AVG_TICK_MS={result.avg_tick_ms:.2f}")
@@ -238,6 +364,8 @@ def print_results(result: BenchmarkResult, quiet: bool = False):
         print(f"P95_TICK_MS={result.p95_tick_ms:.2f}")
         print(f"P99_TICK_MS={result.p99_tick_ms:.2f}")
         print(f"DOWNLOAD_SPEED_MBPS={result.download_speed_mbps:.2f}")
+        if result.peak_rss_mb is not None:
+            print(f"PEAK_RSS_MB={result.peak_rss_mb:.1f}")
     else:
         mode = "JIT-less" if result.jitless else "JIT (V8)"
         size_mb = result.size_bytes / (1024 * 1024)
@@ -249,8 +377,12 @@ def print_results(result: BenchmarkResult, quiet: bool = False):
         print(f"Download size:     {size_mb:.0f} MB")
         if result.num_peers > 1:
             print(f"Seeders:           {result.num_peers}")
+        if result.storage != "disk":
+            print(f"Storage:           {result.storage} (no disk I/O)")
         print(f"Total time:        {result.total_time_sec:.1f} seconds")
         print(f"Download speed:    {result.download_speed_mbps:.1f} MB/s")
+        if result.peak_rss_mb is not None:
+            print(f"Peak RSS:          {result.peak_rss_mb:.0f} MB")
         print()
         print("Tick Performance (100ms interval):")
         print(f"  Total ticks:     {result.total_ticks}")
@@ -273,6 +405,110 @@ def print_results(result: BenchmarkResult, quiet: bool = False):
         print("=" * 60)
 
 
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak resident set size of a process in MB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_once(
+    args: argparse.Namespace, magnet: str, size_bytes: int, throughput: Optional[str]
+) -> Optional[BenchmarkResult]:
+    """Download once with a fresh engine; returns None if the download didn't finish."""
+    download_dir = tempfile.mkdtemp(prefix="tick_benchmark_")
+    engine = None
+    try:
+        if not args.quiet:
+            print(f"Starting engine (jitless={args.jitless})...")
+
+        engine = JSTEngine(
+            download_dir=download_dir,
+            jitless=args.jitless,
+            verbose=not args.quiet,
+            storage=args.storage,
+        )
+
+        if not args.quiet:
+            print(f"Engine started on RPC port {engine.rpc_port}")
+            print(f"Adding magnet link...")
+
+        # Add torrent
+        history_start_ms = int(time.time() * 1000)
+        tid = engine.add_magnet(magnet)
+
+        if not args.quiet:
+            print(f"Torrent added: {tid}")
+            print(f"Waiting for peer connection and download...")
+            print()
+
+        if args.profile:
+            engine.start_profile()
+
+        # Collect samples during download
+        memory_samples = [] if args.memory else None
+        samples, all_tick_times = collect_tick_samples(
+            engine,
+            tid,
+            poll_interval=args.poll_interval,
+            timeout=args.timeout,
+            quiet=args.quiet,
+            memory_samples=memory_samples,
+        )
+        profile = None
+        if args.profile:
+            path = profile_path(args)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profile = engine.stop_profile(path, top=15)
+        if memory_samples:
+            save_memory(memory_samples, args.memory)
+            if not args.quiet:
+                print_memory_peaks(memory_samples)
+                print(f"Memory samples saved to {args.memory}")
+        if not samples or samples[-1].progress < 1.0:
+            print("ERROR: Download did not complete; run not recorded", file=sys.stderr)
+            return None
+
+        # Calculate and print results
+        result = calculate_results(
+            samples, all_tick_times, args.jitless, size_bytes, args.peers, args.storage
+        )
+        result.peak_rss_mb = peak_rss_mb(engine.proc.pid)
+        print_results(result, args.quiet)
+        if profile:
+            result.profile = profile["path"]
+            if args.quiet:
+                print(f"PROFILE={result.profile}")
+            else:
+                print_hotspots(profile["hotspots"])
+                print(f"CPU profile saved to {result.profile} (Chrome DevTools or speedscope)")
+
+        # Throughput curves come from the engine's history buffers, not from polling
+        history = engine.get_bandwidth_history(direction="down", since=history_start_ms)
+        if not args.quiet:
+            print("Throughput by category (engine history):")
+            for category, avg_mbps, peak_mbps in summarize_throughput(history):
+                print(f"  {category:14s} avg {avg_mbps:7.1f} MB/s  peak {peak_mbps:7.1f} MB/s")
+        if throughput:
+            save_throughput(history, throughput)
+            if not args.quiet:
+                print(f"Throughput saved to {throughput}")
+
+        return result
+    finally:
+        if engine is not None:
+            try:
+                engine.close()
+            except Exception:
+                pass
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="Benchmark tick performance during torrent download."
@@ -284,10 +520,24 @@ def main() -> int:
     )
     parser.add_argument(
         "--size",
-        choices=["100mb", "1gb"],
+        choices=list(SIZE_CONFIGS),
         default="100mb",
         help="Test file size (default: 100mb)",
     )
+    parser.add_argument(
+        "--seeder",
+        choices=["libtorrent", "synthetic"],
+        default="libtorrent",
+        help="libtorrent seeds the fixture file from disk; synthetic computes blocks on "
+        "the fly (synthetic_seeder.py), so sizes aren't limited by disk (default: libtorrent)",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["disk", "null", "memory"],
+        default="disk",
+        help="Where the engine writes downloaded data: the temp download dir, nowhere "
+        "(null), or RAM (memory). Pieces are hash-checked either way (default: disk)",
+    )
     parser.add_argument(
         "--quiet", "-q",
         action="store_true",
@@ -317,18 +567,66 @@ def main() -> int:
         default=6881,
         help="Base port for seeders (default: 6881)",
     )
+    parser.add_argument(
+        "--throughput",
+        metavar="PATH",
+        help="Save per-category download throughput from the engine's bandwidth "
+        "history as CSV (or a plot if PATH ends in .png/.svg)",
+    )
+    parser.add_argument(
+        "--memory",
+        metavar="PATH",
+        help="Sample the engine's per-subsystem memory report at every poll and save "
+        "it as CSV (bytes per subsystem, plus process rss/heap)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="CPU-profile the engine for the whole download, save the .cpuprofile in a "
+        "profiles/ dir next to the results file and print the top self-time functions",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Download N times with a fresh engine each time, reusing the fixture and "
+        "seeders; prints mean and 95%% confidence intervals (default: 1)",
+    )
+    parser.add_argument(
+        "--results",
+        type=Path,
+        default=DEFAULT_RESULTS_PATH,
+        metavar="PATH",
+        help=f"JSONL file completed runs are appended to (default: {DEFAULT_RESULTS_PATH}); "
+        "compare them with benchmark_results.py",
+    )
+    parser.add_argument(
+        "--no-save",
+        action="store_true",
+        help="Don't record runs in the results file",
+    )
 
     args = parser.parse_args()
 
     # Determine info hash, filename, and size
-    if args.size == "1gb":
-        info_hash = INFOHASH_1GB
-        filename = FILENAME_1GB
-        size_bytes = 1024 * 1024 * 1024
+    config = SIZE_CONFIGS[args.size]
+    filename = config["filename"]
+    size_bytes = config["size"]
+    synthetic = args.seeder == "synthetic"
+    if not synthetic and args.size in KNOWN_INFOHASHES:
+        info_hash = KNOWN_INFOHASHES[args.size]
     else:
-        info_hash = INFOHASH_100MB
-        filename = FILENAME_100MB
-        size_bytes = 100 * 1024 * 1024
+        # Synthetic seeders only need the hashes; libtorrent needs the data too
+        fixture = ensure_fixture(
+            DEFAULT_DATA_DIR,
+            filename,
+            size_bytes,
+            config["piece_length"],
+            SEED,
+            quiet=args.quiet,
+            write_data=not synthetic,
+        )
+        info_hash = fixture.info_hash
 
     # Build peer list
     peer_list = [("127.0.0.1", args.base_port + i) for i in range(args.peers)]
@@ -336,22 +634,32 @@ def main() -> int:
 
     # For swarm mode, we'll start the seeders ourselves
     seeder_proc = None
-    if args.peers > 1:
+    if args.peers > 1 or synthetic:
         if not args.quiet:
             mode = "JIT-less" if args.jitless else "JIT (V8)"
             print(f"Starting tick benchmark ({mode}, {args.size}, {args.peers} peers)")
-            print(f"Starting swarm seeder with {args.peers} peers...")
+            print(f"Starting {args.seeder} seeder with {args.peers} peers...")
 
         # Start the swarm seeder
         script_dir = os.path.dirname(os.path.abspath(__file__))
-        seeder_cmd = [
-            "uv", "run", "python", "seed_for_test_swarm.py",
-            "--count", str(args.peers),
-            "--size", args.size,
-            "--port", str(args.base_port),
-            "--kill",  # Kill any existing processes on those ports
-            "--quiet",
-        ]
+        if synthetic:
+            seeder_cmd = [
+                "uv", "run", "python", "synthetic_seeder.py",
+                "--count", str(args.peers),
+                "--size", args.size,
+                "--port", str(args.base_port),
+                "--bind", "127.0.0.1",
+                "--quiet",
+            ]
+        else:
+            seeder_cmd = [
+                "uv", "run", "python", "seed_for_test_swarm.py",
+                "--count", str(args.peers),
+                "--size", args.size,
+                "--port", str(args.base_port),
+                "--kill",  # Kill any existing processes on those ports
+                "--quiet",
+            ]
         seeder_proc = subprocess.Popen(
             seeder_cmd,
             cwd=script_dir,
@@ -377,48 +685,28 @@ def main() -> int:
             print(f"Make sure seeder is running: pnpm seed-for-test --size {args.size}")
             print()
 
-    # Create temp directory for download
-    import tempfile
-    import shutil
-
-    download_dir = tempfile.mkdtemp(prefix="tick_benchmark_")
-
     try:
-        # Start engine
-        if not args.quiet:
-            print(f"Starting engine (jitless={args.jitless})...")
-
-        engine = JSTEngine(
-            download_dir=download_dir,
-            jitless=args.jitless,
-            verbose=not args.quiet,
-        )
-
-        if not args.quiet:
-            print(f"Engine started on RPC port {engine.rpc_port}")
-            print(f"Adding magnet link...")
-
-        # Add torrent
-        tid = engine.add_magnet(magnet)
-
-        if not args.quiet:
-            print(f"Torrent added: {tid}")
-            print(f"Waiting for peer connection and download...")
-            print()
-
-        # Collect samples during download
-        samples, all_tick_times = collect_tick_samples(
-            engine,
-            tid,
-            poll_interval=args.poll_interval,
-            timeout=args.timeout,
-            quiet=args.quiet,
-        )
-
-        # Calculate and print results
-        result = calculate_results(samples, all_tick_times, args.jitless, size_bytes, args.peers)
-        print_results(result, args.quiet)
-
+        results = []
+        for run in range(args.repeat):
+            if args.repeat > 1 and not args.quiet:
+                print(f"Run {run + 1}/{args.repeat}")
+            # Throughput history is saved for the last run only
+            last = run == args.repeat - 1
+            result = run_once(args, magnet, size_bytes, args.throughput if last else None)
+            if result is None:
+                continue
+            results.append(result)
+            if not args.no_save:
+                record = asdict(result)
+                record.update(size=args.size, seeder=args.seeder, peers=args.peers)
+                record_run(record, args.results)
+
+        if not results:
+            return 1
+        if args.repeat > 1:
+            print_summary([asdict(r) for r in results], args.quiet)
+        if not args.no_save and not args.quiet:
+            print(f"Results appended to {args.results}")
         return 0
 
     except KeyboardInterrupt:
@@ -431,12 +719,6 @@ def main() -> int:
         traceback.print_exc()
         return 1
     finally:
-        # Cleanup
-        try:
-            engine.close()
-        except:
-            pass
-        shutil.rmtree(download_dir, ignore_errors=True)
         # Stop swarm seeder if we started it
         if seeder_proc is not None:
             try:
@@ -0,0 +1,47 @@
+/**
+ * Create a .torrent with TorrentCreator, for bench_create_torrent.py.
+ *
+ *   npx tsx integration/python/create_torrent.ts <path> <out.torrent> [v1|v2|hybrid] [pieceLength]
+ *
+ * Prints CREATE_SECONDS=<seconds> when done.
+ */
+import * as fs from 'fs'
+import * as nodePath from 'path'
+import { TorrentCreator, type TorrentVersion } from '../../src/core/torrent-creator'
+import { NodeFileSystem, NodeHasher } from '../../src/adapters/node'
+import type { IStorageHandle } from '../../src/io/storage-handle'
+
+async function main() {
+  const [target, out, version = 'v1', pieceLength = '0'] = process.argv.slice(2)
+  if (!target || !out) {
+    console.error('Usage: create_torrent.ts <path> <out.torrent> [v1|v2|hybrid] [pieceLength]')
+    process.exit(1)
+  }
+
+  const absolute = nodePath.resolve(target)
+  const nodeFs = new NodeFileSystem()
+  const storage: IStorageHandle = { id: 'bench', name: 'bench', getFileSystem: () => nodeFs }
+  let lastReport = 0
+
+  const start = performance.now()
+  const torrent = await TorrentCreator.create(storage, absolute, new NodeHasher(), {
+    version: version as TorrentVersion,
+    pieceLength: parseInt(pieceLength, 10) || undefined,
+    onProgress: (p) => {
+      const now = performance.now()
+      if (now - lastReport < 1000 && p.piecesHashed < p.totalPieces) return
+      lastReport = now
+      const pct = ((100 * p.bytesHashed) / Math.max(1, p.totalBytes)).toFixed(1)
+      console.error(`progress ${pct}% (${p.piecesHashed}/${p.totalPieces} pieces)`)
+    },
+  })
+  const seconds = (performance.now() - start) / 1000
+
+  fs.writeFileSync(out, torrent)
+  console.log(`CREATE_SECONDS=${seconds.toFixed(3)}`)
+}
+
+main().catch((err) => {
+  console.error(err)
+  process.exit(1)
+})
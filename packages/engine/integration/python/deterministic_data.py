@@ -0,0 +1,398 @@
+"""
+Deterministic test data: generation, piece hashing and .torrent writing in one pass.
+
+The data is one numpy PCG64 stream seeded with the fixture seed, 8 bytes per
+64-bit draw. PCG64 can jump ahead, so every chunk gets its own generator
+advanced to the chunk's offset: chunks are produced independently (in
+parallel across processes) yet byte-identical to drawing the whole file from
+`np.random.default_rng(seed)` in order, which is how older fixtures were
+made. Their info hashes are unchanged.
+
+Each worker writes its chunk straight into the data file and hashes it while
+it is in memory: SHA-1 per piece for v1, and SHA-256 merkle roots per piece
+for the v2 piece layers. The .torrent (hybrid v1+v2, as libtorrent creates it)
+is written from those hashes, so the data is never read back.
+
+Finished fixtures are recorded in a manifest keyed by (size, piece length,
+seed); the data is only regenerated when the manifest is missing. Completed
+chunks are logged as they finish, so an interrupted generation resumes where
+it stopped.
+
+With write_data=False only the hashes and .torrent are produced: enough for
+synthetic_seeder.py, which computes blocks on the fly with read_range().
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# DO NOT CHANGE SEED (it would change the infohash)
+SEED = 0xDEADBEEF
+DEFAULT_DATA_DIR = Path.home() / ".jstorrent-test-seed"
+
+CHUNK_SIZE = 16 * 1024 * 1024
+BLOCK_SIZE = 16 * 1024  # BEP 52 merkle leaf size
+CREATOR = "jstorrent_test_seeder"
+
+SIZE_CONFIGS = {
+    "100mb": {
+        "size": 100 * 1024 * 1024,
+        "piece_length": 256 * 1024,
+        "filename": "testdata_100mb.bin",
+    },
+    "1gb": {
+        "size": 1024 * 1024 * 1024,
+        "piece_length": 1024 * 1024,
+        "filename": "testdata_1gb.bin",
+    },
+    "10gb": {
+        "size": 10 * 1024 * 1024 * 1024,
+        "piece_length": 4 * 1024 * 1024,
+        "filename": "testdata_10gb.bin",
+    },
+    # Too big to keep on disk: serve it with synthetic_seeder.py
+    "100gb": {
+        "size": 100 * 1024 * 1024 * 1024,
+        "piece_length": 16 * 1024 * 1024,
+        "filename": "testdata_100gb.bin",
+    },
+}
+
+
+@dataclass
+class Fixture:
+    data_path: Path
+    torrent_path: Path
+    info_hash: str
+    size: int
+    piece_length: int
+    seed: int
+    # False if only the hashes were generated (the data file doesn't exist)
+    has_data: bool = True
+
+
+# =============================================================================
+# Data
+# =============================================================================
+def read_range(seed: int, offset: int, length: int) -> bytes:
+    """Bytes [offset, offset + length) of the data stream for `seed`."""
+    start = offset - offset % 8
+    bit_generator = np.random.PCG64(seed)
+    bit_generator.advance(start // 8)
+    count = -(-(offset + length - start) // 8) * 8
+    data = np.random.Generator(bit_generator).integers(0, 256, size=count, dtype=np.uint8)
+    return data[offset - start : offset - start + length].tobytes()
+
+
+def chunk_size_for(piece_length: int) -> int:
+    """Chunks hold whole pieces, so each worker can hash its own."""
+    return max(CHUNK_SIZE, piece_length)
+
+
+# =============================================================================
+# Hashing
+# =============================================================================
+def merkle_root(leaves: List[bytes], width: int, pad: bytes = bytes(32)) -> bytes:
+    """Root of a SHA-256 tree over `leaves` padded with `pad` to `width` (a power of two)."""
+    layer = leaves + [pad] * (width - len(leaves))
+    while len(layer) > 1:
+        layer = [
+            hashlib.sha256(layer[i] + layer[i + 1]).digest() for i in range(0, len(layer), 2)
+        ]
+    return layer[0]
+
+
+def block_hashes(data: memoryview) -> List[bytes]:
+    return [
+        hashlib.sha256(data[i : i + BLOCK_SIZE]).digest() for i in range(0, len(data), BLOCK_SIZE)
+    ]
+
+
+def _next_power_of_two(n: int) -> int:
+    return 1 << max(0, (n - 1).bit_length())
+
+
+def _generate_chunk(
+    path: Optional[str], seed: int, index: int, chunk_size: int, size: int, piece_length: int
+) -> Tuple[int, bytes, bytes]:
+    """
+    Generate one chunk, write it to `path` unless None, and return
+    (index, v1 piece hashes, v2 piece layer hashes).
+    """
+    offset = index * chunk_size
+    length = min(chunk_size, size - offset)
+    bit_generator = np.random.PCG64(seed)
+    bit_generator.advance(offset // 8)
+    chunk = np.random.Generator(bit_generator).integers(0, 256, size=length, dtype=np.uint8)
+    data = memoryview(chunk)
+
+    if path is not None:
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            written = 0
+            while written < length:
+                written += os.pwrite(fd, data[written:], offset + written)
+        finally:
+            os.close(fd)
+
+    blocks_per_piece = piece_length // BLOCK_SIZE
+    v1 = []
+    v2 = []
+    for start in range(0, length, piece_length):
+        piece = data[start : start + piece_length]
+        v1.append(hashlib.sha1(piece).digest())
+        leaves = block_hashes(piece)
+        # A single-piece file's tree only spans its own blocks
+        width = blocks_per_piece if size > piece_length else _next_power_of_two(len(leaves))
+        v2.append(merkle_root(leaves, width))
+    return index, b"".join(v1), b"".join(v2)
+
+
+# =============================================================================
+# Torrent
+# =============================================================================
+def bencode(value) -> bytes:
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, list):
+        return b"l" + b"".join(bencode(v) for v in value) + b"e"
+    if isinstance(value, dict):
+        items = sorted((k.encode() if isinstance(k, str) else k, v) for k, v in value.items())
+        return b"d" + b"".join(bencode(k) + bencode(v) for k, v in items) + b"e"
+    raise TypeError(f"cannot bencode {type(value).__name__}")
+
+
+def bdecode(data: bytes):
+    """Decode bencoded data; strings come back as bytes (dict keys too)."""
+
+    def decode(i: int):
+        c = data[i : i + 1]
+        if c == b"i":
+            end = data.index(b"e", i)
+            return int(data[i + 1 : end]), end + 1
+        if c == b"l":
+            items, i = [], i + 1
+            while data[i : i + 1] != b"e":
+                item, i = decode(i)
+                items.append(item)
+            return items, i + 1
+        if c == b"d":
+            result, i = {}, i + 1
+            while data[i : i + 1] != b"e":
+                key, i = decode(i)
+                result[key], i = decode(i)
+            return result, i + 1
+        colon = data.index(b":", i)
+        start = colon + 1
+        end = start + int(data[i:colon])
+        return data[start:end], end
+
+    value, _ = decode(0)
+    return value
+
+
+def read_info_dict(torrent_path: Path) -> bytes:
+    """The bencoded info dictionary of a .torrent (what BEP 9 serves)."""
+    return bencode(bdecode(torrent_path.read_bytes())[b"info"])
+
+
+def build_torrent(
+    name: str, size: int, piece_length: int, v1_hashes: bytes, piece_layer: bytes
+) -> Tuple[bytes, str]:
+    """Hybrid v1+v2 single-file torrent. Returns (torrent bytes, v1 info hash)."""
+    blocks_per_piece = piece_length // BLOCK_SIZE
+    piece_count = len(piece_layer) // 32
+    if size <= piece_length:
+        # One piece: its hash is the file root and there is no piece layer
+        root = piece_layer
+    else:
+        pad = merkle_root([], blocks_per_piece)
+        layer = [piece_layer[i * 32 : (i + 1) * 32] for i in range(piece_count)]
+        root = merkle_root(layer, _next_power_of_two(piece_count), pad)
+
+    info = {
+        "file tree": {name: {"": {"length": size, "pieces root": root}}},
+        "length": size,
+        "meta version": 2,
+        "name": name,
+        "piece length": piece_length,
+        "pieces": v1_hashes,
+    }
+    torrent = {
+        "created by": CREATOR,
+        "creation date": int(time.time()),
+        "info": info,
+    }
+    if size > piece_length:
+        torrent["piece layers"] = {root: piece_layer}
+    info_hash = hashlib.sha1(bencode(info)).hexdigest()
+    return bencode(torrent), info_hash
+
+
+# =============================================================================
+# Fixtures
+# =============================================================================
+def manifest_path(data_dir: Path, size: int, piece_length: int, seed: int) -> Path:
+    return data_dir / "manifests" / f"{size}-{piece_length}-{seed:x}.json"
+
+
+def load_fixture(
+    data_dir: Path, size: int, piece_length: int, seed: int, require_data: bool = True
+) -> Optional[Fixture]:
+    """The fixture recorded in the manifest, if it and its files exist."""
+    path = manifest_path(data_dir, size, piece_length, seed)
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    data_path = data_dir / manifest["filename"]
+    torrent_path = data_dir / manifest["torrent"]
+    has_data = manifest.get("data", True)
+    if has_data:
+        has_data = data_path.exists() and data_path.stat().st_size == size
+    if not torrent_path.exists() or (require_data and not has_data):
+        return None
+    return Fixture(
+        data_path, torrent_path, manifest["info_hash"], size, piece_length, seed, has_data
+    )
+
+
+def _load_progress(path: Path) -> Dict[int, Tuple[bytes, bytes]]:
+    """Chunks finished by an earlier, interrupted run."""
+    done: Dict[int, Tuple[bytes, bytes]] = {}
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return done
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break  # torn last line
+        done[entry["chunk"]] = (bytes.fromhex(entry["v1"]), bytes.fromhex(entry["v2"]))
+    return done
+
+
+def generate_fixture(
+    data_dir: Path,
+    filename: str,
+    size: int,
+    piece_length: int,
+    seed: int,
+    workers: Optional[int] = None,
+    regenerate: bool = False,
+    quiet: bool = False,
+    write_data: bool = True,
+) -> Fixture:
+    """
+    Generate (or resume generating) a fixture and its .torrent, and record it
+    in the manifest. Use ensure_fixture() to reuse an existing one.
+    """
+    if piece_length % BLOCK_SIZE or piece_length & (piece_length - 1):
+        raise ValueError(f"piece length must be a power of two >= 16 KiB: {piece_length}")
+    data_dir.mkdir(parents=True, exist_ok=True)
+    data_path = data_dir / filename
+    torrent_path = data_path.with_suffix(".bin.torrent")
+    manifest = manifest_path(data_dir, size, piece_length, seed)
+    # Hash-only runs keep their own log: their chunks were never written
+    progress_path = manifest.with_suffix(".progress" if write_data else ".hashes.progress")
+    manifest.parent.mkdir(exist_ok=True)
+
+    chunk_size = chunk_size_for(piece_length)
+    chunk_count = -(-size // chunk_size)
+    done = {} if regenerate else _load_progress(progress_path)
+    if write_data and (not data_path.exists() or data_path.stat().st_size != size):
+        done = {}
+    if not done:
+        if write_data:
+            with open(data_path, "wb") as f:
+                f.truncate(size)
+        progress_path.write_text("")
+
+    todo = [i for i in range(chunk_count) if i not in done]
+    if not quiet:
+        what = "deterministic data" if write_data else "piece hashes for"
+        resumed = f", resuming after {len(done)}/{chunk_count} chunks" if done else ""
+        print(f"Generating {what} {size / (1024 * 1024):.0f}MB{resumed}...")
+
+    target = str(data_path) if write_data else None
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(progress_path, "a") as log:
+        futures = [
+            pool.submit(_generate_chunk, target, seed, i, chunk_size, size, piece_length)
+            for i in todo
+        ]
+        for future in as_completed(futures):
+            index, v1, v2 = future.result()
+            done[index] = (v1, v2)
+            log.write(json.dumps({"chunk": index, "v1": v1.hex(), "v2": v2.hex()}) + "\n")
+            log.flush()
+            if not quiet:
+                print(f"\r  Progress: {len(done) / chunk_count * 100:.1f}%", end="", flush=True)
+    if not quiet:
+        print()
+
+    v1_hashes = b"".join(done[i][0] for i in range(chunk_count))
+    piece_layer = b"".join(done[i][1] for i in range(chunk_count))
+    torrent, info_hash = build_torrent(filename, size, piece_length, v1_hashes, piece_layer)
+    torrent_path.write_bytes(torrent)
+
+    manifest.write_text(
+        json.dumps(
+            {
+                "size": size,
+                "piece_length": piece_length,
+                "seed": seed,
+                "filename": filename,
+                "torrent": torrent_path.name,
+                "info_hash": info_hash,
+                "data": write_data,
+            },
+            indent=2,
+        )
+    )
+    progress_path.unlink()
+    return Fixture(data_path, torrent_path, info_hash, size, piece_length, seed, write_data)
+
+
+def ensure_fixture(
+    data_dir: Path,
+    filename: str,
+    size: int,
+    piece_length: int,
+    seed: int,
+    workers: Optional[int] = None,
+    regenerate: bool = False,
+    quiet: bool = False,
+    write_data: bool = True,
+) -> Fixture:
+    """
+    Reuse the fixture from its manifest, generating it if the manifest is
+    missing. With write_data=False a fixture without data on disk will do.
+    """
+    if not regenerate:
+        fixture = load_fixture(data_dir, size, piece_length, seed, require_data=write_data)
+        if fixture and fixture.data_path.name == filename:
+            if not quiet:
+                print(f"Using existing {'data' if write_data else 'manifest'} for {filename}")
+            return fixture
+    return generate_fixture(
+        data_dir,
+        filename,
+        size,
+        piece_length,
+        seed,
+        workers,
+        regenerate=regenerate,
+        quiet=quiet,
+        write_data=write_data,
+    )
@@ -1,3 +1,4 @@
+import json
 import requests
 import time
 import base64
@@ -304,6 +305,12 @@ class JSTEngine:
         """Set maximum peers for a torrent."""
         return self._req("POST", f"/torrent/{tid}/settings", json={"maxPeers": max_peers})
 
+    def set_bandwidth_limits(self, tid, download_limit=None, upload_limit=None, weight=None):
+        """Set per-torrent rate caps (bytes/sec, 0 = none) and/or bandwidth weight."""
+        settings = {"downloadLimit": download_limit, "uploadLimit": upload_limit, "weight": weight}
+        body = {k: v for k, v in settings.items() if v is not None}
+        return self._req("POST", f"/torrent/{tid}/settings", json=body)
+
     def get_piece_availability(self, tid):
         """Get piece availability map (which peers have which pieces)."""
         return self._req("GET", f"/torrent/{tid}/availability")
@@ -312,9 +319,32 @@ class JSTEngine:
         """Force disconnect a specific peer."""
         return self._req("POST", f"/torrent/{tid}/disconnect-peer", json={"ip": ip, "port": port})
 
-    def get_logs(self, level="info", limit=100):
-        """Get recent engine logs."""
-        return self._req("GET", f"/logs?level={level}&limit={limit}")
+    def get_logs(self, level="info", limit=100, after=None):
+        """Get engine logs.
+
+        Without `after`, returns the newest `limit` entries. With `after`
+        (an entry id, e.g. the previous response's `lastId`), returns up to
+        `limit` entries logged since then, oldest first.
+        """
+        path = f"/logs?level={level}&limit={limit}"
+        if after is not None:
+            path += f"&after={after}"
+        return self._req("GET", path)
+
+    def stream_logs(self, level="info", after=None, timeout=None):
+        """Yield log entries as they are logged (newline-delimited JSON stream).
+
+        Starts with retained entries after `after` (all of them if None).
+        Stops when the engine closes the connection, or raises
+        requests.exceptions.ReadTimeout after `timeout` idle seconds.
+        """
+        path = f"/logs/stream?level={level}"
+        if after is not None:
+            path += f"&after={after}"
+        with self.session.get(f"{self.base}{path}", stream=True, timeout=timeout) as r:
+            for line in r.iter_lines():
+                if line:
+                    yield json.loads(line)
 
     # -----------------------------
     # Test helpers
@@ -344,3 +374,90 @@ class JSTEngine:
     def get_tick_stats(self):
         """Get engine tick statistics for benchmarking."""
         return self._req("GET", "/engine/tick-stats")
+
+    def memory_report(self):
+        """Get estimated memory per engine subsystem, in bytes.
+
+        Returns a dict with:
+            subsystems  {activePieces, pieceAvailability, swarm, peerBuffers,
+                         dht, logs, bandwidthHistory, bufferPool} - estimates kept by
+                         each component, summed over torrents
+            total       sum of the subsystems
+            torrents    {infoHash: {activePieces, pieceAvailability, swarm, peerBuffers}}
+            process     Node's process.memoryUsage() (rss, heapUsed, ...)
+        """
+        return self._req("GET", "/engine/memory")
+
+    def heap_snapshot(self, path=None):
+        """Write a V8 heap snapshot (in the OS temp dir unless `path` is given).
+
+        Blocks the engine while writing. Returns the snapshot's path; open it
+        in Chrome DevTools → Memory.
+        """
+        body = {"path": os.path.abspath(path)} if path else {}
+        return self._req("POST", "/engine/memory/heap-snapshot", json=body)["path"]
+
+    def start_profile(self, interval_us=None):
+        """Start the engine's CPU sampling profiler (inspector session, no DevTools)."""
+        body = {"intervalUs": interval_us} if interval_us else {}
+        self._req("POST", "/debug/profile/start", json=body)
+
+    def stop_profile(self, path=None, top=20):
+        """Stop profiling and write a .cpuprofile (in the OS temp dir unless `path`).
+
+        Returns {"path": ..., "hotspots": [...]}, hotspots being the `top`
+        functions by self time: functionName, location, selfMs, selfPercent.
+        Load the file in Chrome DevTools (Performance) or speedscope for a flame graph.
+        """
+        body = {"top": top}
+        if path:
+            body["path"] = os.path.abspath(path)
+        res = self._req("POST", "/debug/profile/stop", json=body)
+        return {"path": res["path"], "hotspots": res["hotspots"]}
+
+    def profile(self, seconds, path=None, top=20):
+        """Profile the engine for `seconds`; returns the same as stop_profile()."""
+        self.start_profile()
+        time.sleep(seconds)
+        return self.stop_profile(path, top)
+
+    def get_bandwidth_history(self, category=None, direction="both", since=None, resolution=None):
+        """Get engine bandwidth history per traffic category as numpy arrays.
+
+        Reads the engine's in-memory history tiers in one request instead of
+        polling rates. `category` is a TrafficCategory name or a list of them
+        (all if None); `since` is epoch ms, or ms relative to now if negative
+        (all retained history if None); `resolution` is the minimum bucket
+        length in ms (picked from the range if None).
+
+        Returns {category: {direction: series}} where series has:
+            times       float64 bucket start times, epoch seconds
+            bytes       float32 bytes transferred per bucket
+            rate        float64 bytes/sec per bucket
+            bucket_ms   bucket length in ms
+        """
+        import numpy as np
+
+        path = f"/engine/bandwidth-history?direction={direction}"
+        if category is not None:
+            if not isinstance(category, str):
+                category = ",".join(category)
+            path += f"&category={category}"
+        if since is not None:
+            path += f"&from={int(since)}"
+        if resolution is not None:
+            path += f"&resolution={int(resolution)}"
+        res = self._req("GET", path)
+
+        history = {}
+        for s in res["series"]:
+            values = np.frombuffer(base64.b64decode(s["values"]), dtype="<f4", count=s["count"])
+            bucket_ms = s["bucketMs"]
+            times = (s["startTime"] + np.arange(s["count"], dtype=np.float64) * bucket_ms) / 1000
+            history.setdefault(s["category"], {})[s["direction"]] = {
+                "times": times,
+                "bytes": values,
+                "rate": values.astype(np.float64) * (1000 / bucket_ms),
+                "bucket_ms": bucket_ms,
+            }
+        return history
@@ -258,3 +258,32 @@ def create_v2_hybrid_torrent(root_dir: str, name: str, size: int = 1024 * 1024)
     truncated_v2_hash = str(info.info_hash())
 
     return torrent_path, v1_hash, truncated_v2_hash
+
+
+def create_torrent_from_path(path: str, version: str = "v1", piece_length: int = 0) -> Tuple[bytes, float]:
+    """
+    Create a .torrent for an existing file or directory with libtorrent.
+
+    Args:
+        path: File or directory to hash
+        version: "v1", "v2" or "hybrid"
+        piece_length: Piece length in bytes (0 = libtorrent default)
+
+    Returns:
+        Tuple of (bencoded torrent, seconds spent hashing)
+    """
+    flags = 0
+    if version == "v1":
+        flags = lt.create_torrent.v1_only
+    elif version == "v2":
+        flags = lt.create_torrent.v2_only
+
+    fs = lt.file_storage()
+    lt.add_files(fs, path)
+    t = lt.create_torrent(fs, piece_size=piece_length, flags=flags)
+    t.set_creator('libtorrent_bench')
+
+    start = time.perf_counter()
+    lt.set_piece_hashes(t, os.path.dirname(os.path.abspath(path)))
+    seconds = time.perf_counter() - start
+    return lt.bencode(t.generate()), seconds
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Generate a season-pack style multi-file torrent for the file priority benchmark.
+
+Creates many small files of uneven size with libtorrent (via
+LibtorrentSession.create_multi_file_torrent) and prints the .torrent path
+to pass to benchmark/file-priority.bench.ts:
+
+    uv run python make_file_priority_fixture.py /tmp/fixture
+    FILE_PRIORITY_TORRENT=/tmp/fixture/season-pack.torrent \\
+        pnpm vitest bench benchmark/file-priority.bench.ts
+
+File data is random, so --size is written to disk in full. The defaults
+(20k files, 16 KiB pieces) give ~40k pieces; raise --size for more.
+"""
+import argparse
+import random
+import re
+
+from libtorrent_utils import LibtorrentSession
+
+
+def parse_size(value: str) -> int:
+    match = re.fullmatch(r"(\d+)\s*(kb|mb|gb)?", value.strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    units = {None: 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+    return int(match.group(1)) * units[match.group(2)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("root", help="Directory for the files and the .torrent")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--size", type=parse_size, default="640mb", help="Total size")
+    parser.add_argument("--piece-length", type=parse_size, default="16kb")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Uneven sizes so files don't line up with pieces
+    rng = random.Random(args.seed)
+    weights = [rng.uniform(0.5, 1.5) for _ in range(args.files)]
+    total = sum(weights)
+    sizes = [int(args.size * w / total) for w in weights]
+    sizes[-1] += args.size - sum(sizes)
+
+    # Group episodes into season folders like a real pack
+    files = [(f"s{i // 1000:02d}/e{i:05d}.bin", size) for i, size in enumerate(sizes)]
+
+    session = LibtorrentSession(args.root, port=0)
+    torrent_path, info_hash = session.create_multi_file_torrent(
+        "season-pack", files, piece_length=args.piece_length
+    )
+    pieces = -(-args.size // args.piece_length)
+    print(f"{len(files)} files, {pieces} pieces, info hash {info_hash}")
+    print(torrent_path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
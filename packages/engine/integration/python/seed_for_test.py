@@ -3,7 +3,8 @@
 Seeder for Android emulator testing.
 
 Generates deterministic test data and seeds it via libtorrent or JSTEngine.
-Data is cached in ~/.jstorrent-test-seed/ for fast subsequent runs.
+Data is cached in ~/.jstorrent-test-seed/ for fast subsequent runs; see
+deterministic_data.py for how it is generated, hashed and cached.
 
 The same seed always produces the same data, which means the same infohash.
 This allows using a predictable magnet link for testing.
@@ -13,6 +14,7 @@ Usage:
     uv run python seed_for_test.py --engine jstengine     # Seed with JSTEngine
     uv run python seed_for_test.py --size 1gb             # Seed 1GB file
     uv run python seed_for_test.py --regenerate           # Force regenerate data
+    uv run python seed_for_test.py --size 10gb --workers 8  # Generate with 8 processes
     uv run python seed_for_test.py --quiet                # Machine-parseable output
 """
 import argparse
@@ -26,15 +28,13 @@ from typing import Optional, Tuple
 from urllib.parse import quote
 
 import libtorrent as lt
-import numpy as np
 
+from deterministic_data import DEFAULT_DATA_DIR, SEED, SIZE_CONFIGS, ensure_fixture
 from jst import JSTEngine
 
 # =============================================================================
-# Constants - DO NOT CHANGE SEED (it would change the infohash)
+# Constants - SEED, SIZE_CONFIGS and DEFAULT_DATA_DIR live in deterministic_data
 # =============================================================================
-SEED = 0xDEADBEEF
-DEFAULT_DATA_DIR = Path.home() / ".jstorrent-test-seed"
 ANDROID_EMU_HOST = "10.0.2.2"
 CROSTINI_HOST = "100.115.92.206"
 DEFAULT_PORT = 6881
@@ -55,19 +55,6 @@ def get_lan_ip() -> Optional[str]:
         return None
 
 
-SIZE_CONFIGS = {
-    "100mb": {
-        "size": 100 * 1024 * 1024,
-        "piece_length": 256 * 1024,
-        "filename": "testdata_100mb.bin",
-    },
-    "1gb": {
-        "size": 1024 * 1024 * 1024,
-        "piece_length": 1024 * 1024,
-        "filename": "testdata_1gb.bin",
-    },
-}
-
 # =============================================================================
 # Port Management
 # =============================================================================
@@ -109,114 +96,32 @@ def handle_signal(signum, frame):
     shutdown_requested = True
 
 
-# =============================================================================
-# Data Generation
-# =============================================================================
-def generate_deterministic_data(
-    path: Path, size: int, seed: int = SEED, quiet: bool = False
-) -> None:
-    """Generate deterministic random data file using numpy."""
-    rng = np.random.default_rng(seed)
-    chunk_size = 16 * 1024 * 1024  # 16MB chunks
-    remaining = size
-
-    if not quiet:
-        print(f"Generating {size / (1024*1024):.0f}MB deterministic data...")
-
-    with open(path, "wb") as f:
-        while remaining > 0:
-            chunk_len = min(chunk_size, remaining)
-            chunk = rng.integers(0, 256, size=chunk_len, dtype=np.uint8)
-            f.write(chunk.tobytes())
-            remaining -= chunk_len
-            if not quiet:
-                progress = (size - remaining) / size * 100
-                print(f"\r  Progress: {progress:.1f}%", end="", flush=True)
-
-    if not quiet:
-        print()  # newline after progress
-
-
-# =============================================================================
-# Torrent Creation
-# =============================================================================
-def create_torrent_for_file(
-    file_path: Path, piece_length: int, quiet: bool = False
-) -> Tuple[Path, str]:
-    """Create .torrent file for an existing file. Returns (torrent_path, info_hash)."""
-    if not quiet:
-        print(f"Creating torrent file (piece size: {piece_length // 1024}KB)...")
-
-    base_dir = str(file_path.parent)
-    filename = file_path.name
-
-    fs = lt.file_storage()
-    lt.add_files(fs, str(file_path))
-    t = lt.create_torrent(fs, piece_size=piece_length)
-    t.set_creator("jstorrent_test_seeder")
-    lt.set_piece_hashes(t, base_dir)
-
-    torrent_path = file_path.with_suffix(".bin.torrent")
-    with open(torrent_path, "wb") as f:
-        f.write(lt.bencode(t.generate()))
-
-    info = lt.torrent_info(str(torrent_path))
-    # For hybrid v1+v2 torrents, info_hash() returns the v2 hash (truncated).
-    # We need the v1 hash (SHA1 of full info dict) for compatibility with JSTEngine.
-    hashes = info.info_hashes()
-    if hashes.has_v1():
-        info_hash = str(hashes.v1)
-    else:
-        info_hash = str(info.info_hash())
-
-    return torrent_path, info_hash
-
-
 # =============================================================================
 # Data Management
 # =============================================================================
 def ensure_data_exists(
-    data_dir: Path, size_key: str, regenerate: bool = False, quiet: bool = False
+    data_dir: Path,
+    size_key: str,
+    regenerate: bool = False,
+    quiet: bool = False,
+    workers: Optional[int] = None,
 ) -> Tuple[Path, Path, str]:
     """
     Ensure data and torrent files exist.
     Returns (data_path, torrent_path, info_hash).
     """
     config = SIZE_CONFIGS[size_key]
-    data_dir.mkdir(parents=True, exist_ok=True)
-
-    data_path = data_dir / config["filename"]
-    torrent_path = data_path.with_suffix(".bin.torrent")
-
-    # Check if we need to regenerate
-    needs_data = not data_path.exists() or regenerate
-    needs_torrent = not torrent_path.exists() or regenerate
-
-    if needs_data:
-        generate_deterministic_data(
-            data_path, config["size"], seed=SEED, quiet=quiet
-        )
-        needs_torrent = True  # Always regenerate torrent if data changed
-
-    if needs_torrent:
-        torrent_path, info_hash = create_torrent_for_file(
-            data_path, config["piece_length"], quiet=quiet
-        )
-    else:
-        # Load existing torrent to get info_hash
-        # For hybrid v1+v2 torrents, info_hash() returns the v2 hash (truncated).
-        # We need the v1 hash (SHA1 of full info dict) for compatibility with JSTEngine.
-        info = lt.torrent_info(str(torrent_path))
-        hashes = info.info_hashes()
-        if hashes.has_v1():
-            info_hash = str(hashes.v1)
-        else:
-            info_hash = str(info.info_hash())
-
-    if not quiet and not needs_data:
-        print(f"Using existing data at {data_path}")
-
-    return data_path, torrent_path, info_hash
+    fixture = ensure_fixture(
+        data_dir,
+        config["filename"],
+        config["size"],
+        config["piece_length"],
+        SEED,
+        workers=workers,
+        regenerate=regenerate,
+        quiet=quiet,
+    )
+    return fixture.data_path, fixture.torrent_path, fixture.info_hash
 
 
 # =============================================================================
@@ -301,7 +206,7 @@ def main() -> int:
     parser.add_argument(
         "--size",
         "-s",
-        choices=["100mb", "1gb"],
+        choices=list(SIZE_CONFIGS),
         default="100mb",
         help="Data size to generate/seed (default: 100mb)",
     )
@@ -336,6 +241,12 @@ def main() -> int:
         default=DEFAULT_DATA_DIR,
         help=f"Data directory (default: {DEFAULT_DATA_DIR})",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for data generation (default: one per CPU)",
+    )
     parser.add_argument(
         "--engine",
         "-e",
@@ -355,7 +266,7 @@ def main() -> int:
 
     # Ensure data exists
     data_path, torrent_path, info_hash = ensure_data_exists(
-        args.data_dir, args.size, args.regenerate, args.quiet
+        args.data_dir, args.size, args.regenerate, args.quiet, workers=args.workers
     )
 
     config = SIZE_CONFIGS[args.size]
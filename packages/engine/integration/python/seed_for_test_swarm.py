@@ -201,7 +201,7 @@ def main() -> int:
     parser.add_argument(
         "--size",
         "-s",
-        choices=["100mb", "1gb"],
+        choices=list(SIZE_CONFIGS),
         default="100mb",
         help="Data size to seed (default: 100mb)",
     )
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Seeder that serves deterministic test data without storing it.
+
+A minimal BitTorrent seeding peer: blocks are computed on the fly from
+(seed, piece index) with deterministic_data.read_range, so the torrent size
+is not limited by disk and throughput isn't skewed by the page cache. Piece
+hashes are computed once into the fixture manifest (no data file is
+written); later runs start immediately.
+
+Speaks plain BitTorrent with BEP 10 + BEP 9 (ut_metadata), so it works with
+magnet links. No encryption, no fast extension, never chokes.
+
+Usage:
+    uv run python synthetic_seeder.py --size 100gb                # One seeder on 6881
+    uv run python synthetic_seeder.py --size 100gb --count 5      # 5 seeders on 6881-6885
+    uv run python synthetic_seeder.py --size 1gb --quiet          # Machine-parseable output
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import struct
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from deterministic_data import (
+    DEFAULT_DATA_DIR,
+    SEED,
+    SIZE_CONFIGS,
+    Fixture,
+    bdecode,
+    bencode,
+    ensure_fixture,
+    read_info_dict,
+    read_range,
+)
+
+DEFAULT_PORT = 6881
+METADATA_BLOCK = 16 * 1024
+MAX_REQUEST = 128 * 1024
+UT_METADATA_ID = 1  # Our extended message ID for ut_metadata
+
+MSG_UNCHOKE = 1
+MSG_BITFIELD = 5
+MSG_REQUEST = 6
+MSG_PIECE = 7
+MSG_EXTENDED = 20
+
+
+class PieceCache:
+    """Recently generated pieces, least recently used evicted first."""
+
+    def __init__(self, fixture: Fixture, max_bytes: int):
+        self.fixture = fixture
+        self.max_bytes = max_bytes
+        self.pieces: "OrderedDict[int, bytes]" = OrderedDict()
+        self.bytes = 0
+
+    def block(self, index: int, begin: int, length: int) -> bytes:
+        piece = self.pieces.get(index)
+        if piece is None:
+            offset = index * self.fixture.piece_length
+            piece_len = min(self.fixture.piece_length, self.fixture.size - offset)
+            piece = read_range(self.fixture.seed, offset, piece_len)
+            self.pieces[index] = piece
+            self.bytes += len(piece)
+            while self.bytes > self.max_bytes and len(self.pieces) > 1:
+                _, evicted = self.pieces.popitem(last=False)
+                self.bytes -= len(evicted)
+        else:
+            self.pieces.move_to_end(index)
+        return piece[begin : begin + length]
+
+
+def message(msg_id: int, payload: bytes = b"") -> bytes:
+    return struct.pack(">IB", len(payload) + 1, msg_id) + payload
+
+
+class SyntheticSeeder:
+    def __init__(self, fixture: Fixture, info_dict: bytes, peer_id: bytes, cache_bytes: int):
+        self.fixture = fixture
+        self.info_dict = info_dict
+        self.info_hash = bytes.fromhex(fixture.info_hash)
+        self.peer_id = peer_id
+        self.cache = PieceCache(fixture, cache_bytes)
+        self.piece_count = -(-fixture.size // fixture.piece_length)
+        self.bitfield = self._full_bitfield()
+
+    def _full_bitfield(self) -> bytes:
+        bits = bytearray(b"\xff" * (-(-self.piece_count // 8)))
+        spare = len(bits) * 8 - self.piece_count
+        if spare:
+            bits[-1] = (0xFF << spare) & 0xFF
+        return bytes(bits)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await self._serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handshake = await reader.readexactly(68)
+        if handshake[:20] != b"\x13BitTorrent protocol" or handshake[28:48] != self.info_hash:
+            return
+        extensions = bool(handshake[25] & 0x10)
+
+        reserved = bytearray(8)
+        reserved[5] |= 0x10  # BEP 10 Extension Protocol
+        writer.write(b"\x13BitTorrent protocol" + bytes(reserved) + self.info_hash + self.peer_id)
+        if extensions:
+            ext_handshake = {
+                "m": {"ut_metadata": UT_METADATA_ID},
+                "metadata_size": len(self.info_dict),
+                "v": "jstorrent synthetic seeder",
+            }
+            writer.write(message(MSG_EXTENDED, b"\x00" + bencode(ext_handshake)))
+        writer.write(message(MSG_BITFIELD, self.bitfield))
+        writer.write(message(MSG_UNCHOKE))
+        await writer.drain()
+
+        peer_metadata_id: Optional[int] = None
+        while True:
+            (length,) = struct.unpack(">I", await reader.readexactly(4))
+            if length == 0:
+                continue  # keep-alive
+            payload = await reader.readexactly(length)
+            msg_id = payload[0]
+
+            if msg_id == MSG_REQUEST and length == 13:
+                index, begin, size = struct.unpack(">III", payload[1:13])
+                if not self._valid_request(index, begin, size):
+                    return
+                block = self.cache.block(index, begin, size)
+                writer.write(message(MSG_PIECE, struct.pack(">II", index, begin) + block))
+                await writer.drain()
+            elif msg_id == MSG_EXTENDED and length >= 2:
+                if payload[1] == 0:
+                    ids = bdecode(payload[2:]).get(b"m", {})
+                    peer_metadata_id = ids.get(b"ut_metadata") or None
+                elif payload[1] == UT_METADATA_ID and peer_metadata_id is not None:
+                    writer.write(self._metadata_reply(peer_metadata_id, bdecode(payload[2:])))
+                    await writer.drain()
+            # Everything else (interested, have, cancel, ...) needs no answer
+
+    def _valid_request(self, index: int, begin: int, size: int) -> bool:
+        if index >= self.piece_count or size == 0 or size > MAX_REQUEST:
+            return False
+        piece_len = min(
+            self.fixture.piece_length, self.fixture.size - index * self.fixture.piece_length
+        )
+        return begin + size <= piece_len
+
+    def _metadata_reply(self, peer_metadata_id: int, request: dict) -> bytes:
+        piece = request.get(b"piece", -1)
+        start = piece * METADATA_BLOCK
+        if request.get(b"msg_type") != 0 or piece < 0 or start >= len(self.info_dict):
+            reject = bencode({"msg_type": 2, "piece": max(piece, 0)})
+            return message(MSG_EXTENDED, bytes([peer_metadata_id]) + reject)
+        header = bencode({"msg_type": 1, "piece": piece, "total_size": len(self.info_dict)})
+        data = self.info_dict[start : start + METADATA_BLOCK]
+        return message(MSG_EXTENDED, bytes([peer_metadata_id]) + header + data)
+
+
+def run_seeder(fixture: Fixture, port: int, bind: str, cache_bytes: int, index: int) -> None:
+    """Serve one seeder port until terminated (runs in its own process)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent handles Ctrl+C
+    info_dict = read_info_dict(fixture.torrent_path)
+    peer_id = b"-JS0001-" + f"synth{index:07d}".encode()
+    seeder = SyntheticSeeder(fixture, info_dict, peer_id, cache_bytes)
+
+    async def serve():
+        server = await asyncio.start_server(seeder.handle, bind, port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def build_magnet(info_hash: str, name: str, host: str, ports: list) -> str:
+    hints = "&".join(f"x.pe={host}:{port}" for port in ports)
+    return f"magnet:?xt=urn:btih:{info_hash}&dn={quote(name)}&{hints}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", "-s", choices=list(SIZE_CONFIGS), default="100gb")
+    parser.add_argument("--count", "-c", type=int, default=1, help="Seeders (one port each)")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_PORT, help="First port")
+    parser.add_argument("--bind", default="0.0.0.0", help="Interface to bind to")
+    parser.add_argument(
+        "--cache-mb", type=int, default=256, help="Generated pieces kept per seeder (MB)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Processes for hashing")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--quiet", "-q", action="store_true", help="Machine-parseable output")
+    args = parser.parse_args()
+
+    config = SIZE_CONFIGS[args.size]
+    fixture = ensure_fixture(
+        args.data_dir,
+        config["filename"],
+        config["size"],
+        config["piece_length"],
+        SEED,
+        workers=args.workers,
+        quiet=args.quiet,
+        write_data=False,
+    )
+
+    ports = [args.port + i for i in range(args.count)]
+    processes = [
+        multiprocessing.Process(
+            target=run_seeder,
+            args=(fixture, port, args.bind, args.cache_mb * 1024 * 1024, i),
+            daemon=True,
+        )
+        for i, port in enumerate(ports)
+    ]
+    for process in processes:
+        process.start()
+
+    magnet = build_magnet(fixture.info_hash, config["filename"], "127.0.0.1", ports)
+    if args.quiet:
+        print(f"INFOHASH={fixture.info_hash}")
+        print(f"PORTS={','.join(str(p) for p in ports)}")
+        print(f"MAGNET_LOCALHOST={magnet}", flush=True)
+    else:
+        print(f"Synthetic seeder: {config['filename']} ({config['size']} bytes, no data on disk)")
+        print(f"Info hash: {fixture.info_hash}")
+        print(f"Listening on ports {ports[0]}-{ports[-1]} (pid {os.getpid()})")
+        print(magnet)
+        print("Press Ctrl+C to stop seeding", flush=True)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            time.sleep(1)
+            if not all(p.is_alive() for p in processes):
+                print("ERROR: a seeder process exited", file=sys.stderr)
+                return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the benchmark result store and regression comparison.
+
+1. Runs are appended to the JSONL store with the git SHA and read back
+2. Confidence intervals shrink as runs agree
+3. A clear slowdown in tick p99 and throughput is flagged as a regression
+4. Noise within the runs' spread is not
+"""
+import sys
+from pathlib import Path
+
+import benchmark_results as br
+from test_helpers import temp_directory, fail, passed
+
+CONFIG = {"jitless": False, "size": "100mb", "peers": 5, "storage": "null", "seeder": "synthetic"}
+
+
+def make_runs(sha: str, p99s, speeds):
+    return [
+        {"git_sha": sha, **CONFIG, "p99_tick_ms": p99, "download_speed_mbps": speed}
+        for p99, speed in zip(p99s, speeds)
+    ]
+
+
+def verdicts(base, head):
+    return {c.metric: c.verdict for c in br.compare_runs(base, head)}
+
+
+def main() -> int:
+    with temp_directory() as temp:
+        path = Path(temp) / "results.jsonl"
+        for _ in range(3):
+            br.record_run({**CONFIG, "p99_tick_ms": 10.0}, path)
+        runs = br.load_runs(path)
+        if len(runs) != 3 or not all(run["git_sha"] for run in runs):
+            return fail(f"Expected 3 stored runs with a git SHA, got {runs}")
+        sha = runs[0]["git_sha"]
+        if len(br.select(runs, sha[:7], size="100mb", peers=5)) != 3:
+            return fail("Runs not found by SHA prefix and configuration")
+        if br.select(runs, sha, peers=10):
+            return fail("Runs with other configurations must not match")
+
+    tight = br.summarize([10.0, 10.1, 9.9, 10.0, 10.05])
+    loose = br.summarize([8.0, 12.0, 10.0])
+    if not tight.ci < loose.ci:
+        return fail(f"CI of agreeing runs ({tight.ci}) should be narrower than {loose.ci}")
+    print(f"CIs: tight {tight}, loose {loose}")
+
+    base = make_runs("aaa", [10.0, 10.2, 9.9, 10.1, 10.0], [110, 112, 109, 111, 110])
+    slower = make_runs("bbb", [14.9, 15.2, 15.0, 15.1, 14.8], [90, 92, 91, 89, 90])
+    result = verdicts(base, slower)
+    if result != {"p99_tick_ms": "regression", "download_speed_mbps": "regression"}:
+        return fail(f"Slowdown not flagged: {result}")
+
+    faster = make_runs("ccc", [7.0, 7.1, 6.9, 7.0, 7.2], [130, 131, 129, 130, 132])
+    result = verdicts(base, faster)
+    if set(result.values()) != {"improvement"}:
+        return fail(f"Speedup not recognised: {result}")
+
+    noisy = make_runs("ddd", [9.0, 11.5, 10.0, 8.8, 11.2], [100, 120, 112, 104, 118])
+    result = verdicts(base, noisy)
+    if set(result.values()) != {"~"}:
+        return fail(f"Noise flagged as a change: {result}")
+
+    single = make_runs("eee", [20.0], [50])
+    if set(verdicts(base, single).values()) != {"n/a"}:
+        return fail("A single run can't be tested for significance")
+
+    return passed("Benchmark results store and comparison")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
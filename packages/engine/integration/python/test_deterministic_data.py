@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test the deterministic fixture generator against libtorrent.
+
+1. Generate a fixture whose size isn't a multiple of the piece or chunk size
+2. libtorrent must compute the same info hash from the data on disk
+3. read_range must return the same bytes as the file at any offset
+4. A second call reuses the fixture through its manifest
+5. An interrupted generation resumes and produces the same torrent
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import libtorrent as lt
+
+import deterministic_data as dd
+from test_helpers import temp_directory, fail, passed
+
+SEED = 1234
+SIZE = 2 * dd.CHUNK_SIZE + 123_457
+PIECE_LENGTH = 64 * 1024
+NAME = "fixture.bin"
+
+
+def libtorrent_info_hash(data_dir: str) -> str:
+    fs = lt.file_storage()
+    fs.add_file(NAME, SIZE)
+    t = lt.create_torrent(fs, piece_size=PIECE_LENGTH)
+    lt.set_piece_hashes(t, data_dir)
+    return str(lt.torrent_info(t.generate()).info_hashes().v1)
+
+
+def main() -> int:
+    with temp_directory() as temp:
+        temp_dir = Path(temp)
+        fixture = dd.ensure_fixture(temp_dir, NAME, SIZE, PIECE_LENGTH, SEED, workers=2)
+
+        expected = libtorrent_info_hash(str(temp_dir))
+        if fixture.info_hash != expected:
+            return fail(f"Info hash {fixture.info_hash}, libtorrent says {expected}")
+        info = lt.torrent_info(str(fixture.torrent_path))
+        if str(info.info_hashes().v1) != expected or not info.info_hashes().has_v2():
+            return fail("Written .torrent is not the expected hybrid torrent")
+        print(f"Info hash matches libtorrent: {expected}")
+
+        with open(fixture.data_path, "rb") as f:
+            for offset, length in [(0, 100), (5, 3), (dd.CHUNK_SIZE - 7, 20), (SIZE - 9, 9)]:
+                f.seek(offset)
+                if dd.read_range(SEED, offset, length) != f.read(length):
+                    return fail(f"read_range({offset}, {length}) differs from the file")
+
+        mtime = os.stat(fixture.torrent_path).st_mtime_ns
+        again = dd.ensure_fixture(temp_dir, NAME, SIZE, PIECE_LENGTH, SEED, quiet=True)
+        if again.info_hash != expected or os.stat(again.torrent_path).st_mtime_ns != mtime:
+            return fail("Existing fixture was not reused from its manifest")
+
+        # Interrupted run: only chunk 1 finished before it stopped
+        resume_dir = temp_dir / "resume"
+        resume_dir.mkdir()
+        data_path = resume_dir / NAME
+        with open(data_path, "wb") as f:
+            f.truncate(SIZE)
+        chunk_size = dd.chunk_size_for(PIECE_LENGTH)
+        _, v1, v2 = dd._generate_chunk(str(data_path), SEED, 1, chunk_size, SIZE, PIECE_LENGTH)
+        progress = dd.manifest_path(resume_dir, SIZE, PIECE_LENGTH, SEED).with_suffix(".progress")
+        progress.parent.mkdir()
+        progress.write_text(json.dumps({"chunk": 1, "v1": v1.hex(), "v2": v2.hex()}) + "\n")
+
+        resumed = dd.ensure_fixture(resume_dir, NAME, SIZE, PIECE_LENGTH, SEED)
+        if resumed.info_hash != expected or progress.exists():
+            return fail("Resumed generation produced a different fixture")
+
+    return passed("Deterministic fixture matches libtorrent")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test BEP 9 metadata fetching for a magnet link from a swarm of seeders.
+
+1. Create a multi-file torrent with a large info dictionary (thousands of
+   file entries, so the metadata spans many 16 KiB pieces)
+2. Seed it from 5 libtorrent sessions
+3. Add the magnet to JSTEngine, point it at every seeder and measure
+   time-to-metadata: pieces are requested in parallel across the seeders
+4. Remove the torrent and add the magnet again with no peers: metadata must
+   come from the local cache
+"""
+import argparse
+import sys
+import time
+
+from test_helpers import test_dirs, test_engine, wait_for_seeding, fail, passed
+from libtorrent_utils import LibtorrentSession
+
+NUM_SEEDERS = 5
+
+
+def wait_for_metadata(engine, tid: str, timeout: float) -> float | None:
+    """Poll torrent status until metadata is available; returns elapsed seconds."""
+    start = time.time()
+    while time.time() - start < timeout:
+        if engine.get_torrent_status(tid).get("hasMetadata"):
+            return time.time() - start
+        time.sleep(0.05)
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=4000, help="File entries in the torrent")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    with test_dirs() as (seeder_dir, leecher_dir):
+        # Tiny files: the info dict is dominated by path entries
+        files = [(f"d{i // 100:03d}/file-{i:05d}.dat", 1024 + i % 512) for i in range(args.files)]
+        creator = LibtorrentSession(seeder_dir, port=0)
+        torrent_path, info_hash = creator.create_multi_file_torrent(
+            "metadata-pack", files, piece_length=16384
+        )
+        with open(torrent_path, "rb") as f:
+            print(f"Torrent {info_hash}: {args.files} files, .torrent is {len(f.read())} bytes")
+
+        seeders = [creator]
+        seeders += [LibtorrentSession(seeder_dir, port=0) for _ in range(NUM_SEEDERS - 1)]
+        for i, session in enumerate(seeders):
+            handle = session.add_torrent(torrent_path, seeder_dir, seed_mode=True)
+            if not wait_for_seeding(handle):
+                return fail(f"Seeder {i} didn't enter seeding state")
+            print(f"Seeder {i} ready on port {session.listen_port()}")
+
+        magnet = f"magnet:?xt=urn:btih:{info_hash}"
+        with test_engine(leecher_dir) as engine:
+            tid = engine.add_magnet(magnet)
+            for session in seeders:
+                engine.add_peer(tid, "127.0.0.1", session.listen_port())
+
+            elapsed = wait_for_metadata(engine, tid, args.timeout)
+            if elapsed is None:
+                return fail(f"No metadata from {NUM_SEEDERS} seeders after {args.timeout}s")
+            print(f"Time to metadata from {NUM_SEEDERS} seeders: {elapsed * 1000:.0f} ms")
+
+            # Cached fast path: no peers at all this time
+            engine.remove(tid)
+            tid = engine.add_magnet(magnet)
+            elapsed = wait_for_metadata(engine, tid, timeout=5)
+            if elapsed is None:
+                return fail("Re-added magnet did not pick up cached metadata")
+            print(f"Time to metadata from cache: {elapsed * 1000:.0f} ms")
+
+    return passed("Magnet metadata fetched from swarm and served from cache")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,14 @@ import { IHasher } from '../../interfaces/hasher'
  */
 export class SubtleCryptoHasher implements IHasher {
   async sha1(data: Uint8Array): Promise<Uint8Array> {
+    return this.digest('SHA-1', data)
+  }
+
+  async sha256(data: Uint8Array): Promise<Uint8Array> {
+    return this.digest('SHA-256', data)
+  }
+
+  private async digest(algorithm: string, data: Uint8Array): Promise<Uint8Array> {
     if (!crypto?.subtle) {
       throw new Error('crypto.subtle not available (requires secure context)')
     }
@@ -14,7 +22,7 @@ export class SubtleCryptoHasher implements IHasher {
       data.byteOffset === 0 && data.byteLength === data.buffer.byteLength
         ? (data.buffer as ArrayBuffer)
         : (data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength) as ArrayBuffer)
-    const hashBuffer = await crypto.subtle.digest('SHA-1', buffer)
+    const hashBuffer = await crypto.subtle.digest(algorithm, buffer)
     return new Uint8Array(hashBuffer)
   }
 }
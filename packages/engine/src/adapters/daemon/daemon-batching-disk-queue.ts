@@ -0,0 +1,269 @@
+/**
+ * Daemon Batching Disk Queue
+ *
+ * Collects verified writes during a tick and flushes them to the io-daemon in a
+ * single HTTP request. Mirrors NativeBatchingDiskQueue on Android.
+ *
+ * Flow:
+ *   1. DaemonFileHandle.write() with expected hash -> queueVerifiedWrite() (no HTTP)
+ *   2. End of tick -> flushPending() -> POST /write-verified-batch (one request)
+ *   3. io-daemon hashes and writes all items in parallel
+ *   4. Per-item WriteResultCode returned in request order
+ *
+ * Daemons without the batch endpoint (404) fall back to one
+ * X-Expected-SHA1 request per write.
+ */
+
+import type { IDiskQueue, DiskJob, DiskQueueSnapshot } from '../../core/disk-queue'
+import { toHex } from '../../utils/buffer'
+import {
+  WriteResultCode,
+  packVerifiedWriteBatch,
+  unpackVerifiedWriteResults,
+  type VerifiedWriteBatchItem,
+} from '../../io/verified-write-batch'
+import { DaemonConnection } from './daemon-connection'
+import { HashMismatchError, writeVerifiedSingle } from './daemon-file-handle'
+
+/** Target payload size per HTTP request (io-daemon accepts MAX_BODY_SIZE plus headroom) */
+const DEFAULT_MAX_BATCH_BYTES = 32 * 1024 * 1024
+
+/** Pending verified write request */
+interface PendingDaemonWrite extends VerifiedWriteBatchItem {
+  data: Uint8Array
+  resolve: (result: { bytesWritten: number }) => void
+  reject: (error: Error) => void
+}
+
+/** Metrics for batch write performance tracking */
+export interface DaemonBatchWriteMetrics {
+  /** Total number of writes processed */
+  totalWrites: number
+  /** Total bytes written */
+  totalBytes: number
+  /** Number of HTTP requests sent */
+  requestCount: number
+  /** Total round-trip time across requests (ms) */
+  totalRequestTimeMs: number
+  /** Number of flushes that sent at least one write */
+  batchCount: number
+}
+
+export class DaemonBatchingDiskQueue implements IDiskQueue {
+  private pending: PendingDaemonWrite[] = []
+  private inFlight = new Set<Promise<void>>()
+  private nextCallbackId = 1
+  private batchSupported = true
+  private metrics: DaemonBatchWriteMetrics = {
+    totalWrites: 0,
+    totalBytes: 0,
+    requestCount: 0,
+    totalRequestTimeMs: 0,
+    batchCount: 0,
+  }
+
+  constructor(
+    private connection: DaemonConnection,
+    private maxBatchBytes: number = DEFAULT_MAX_BATCH_BYTES,
+  ) {}
+
+  /**
+   * Queue a verified write for batched dispatch.
+   * Called by DaemonFileHandle.write() when an expected hash is set.
+   *
+   * @returns Promise that resolves when the write completes
+   */
+  queueVerifiedWrite(
+    rootKey: string,
+    path: string,
+    position: number,
+    data: Uint8Array,
+    expectedHash: Uint8Array,
+  ): Promise<{ bytesWritten: number }> {
+    return new Promise((resolve, reject) => {
+      this.pending.push({
+        rootKey,
+        path,
+        position,
+        data,
+        expectedHashHex: toHex(expectedHash),
+        callbackId: `dw_${this.nextCallbackId++}`,
+        resolve,
+        reject,
+      })
+    })
+  }
+
+  /**
+   * Send all pending writes to the daemon.
+   * Called at end of tick by the engine. Batches larger than maxBatchBytes
+   * are split so a single request stays under the daemon body limit.
+   */
+  flushPending(): void {
+    if (this.pending.length === 0) return
+
+    const writes = this.pending
+    this.pending = []
+    this.metrics.batchCount++
+
+    let chunk: PendingDaemonWrite[] = []
+    let chunkBytes = 0
+    for (const w of writes) {
+      if (chunk.length > 0 && chunkBytes + w.data.byteLength > this.maxBatchBytes) {
+        this.track(this.sendBatch(chunk))
+        chunk = []
+        chunkBytes = 0
+      }
+      chunk.push(w)
+      chunkBytes += w.data.byteLength
+    }
+    this.track(this.sendBatch(chunk))
+  }
+
+  private track(promise: Promise<void>): void {
+    this.inFlight.add(promise)
+    void promise.finally(() => this.inFlight.delete(promise))
+  }
+
+  private async sendBatch(batch: PendingDaemonWrite[]): Promise<void> {
+    if (!this.batchSupported) {
+      await Promise.all(batch.map((w) => this.sendSingle(w)))
+      return
+    }
+
+    const start = Date.now()
+    let response: Response
+    try {
+      response = await this.connection.requestWithHeaders(
+        'POST',
+        '/write-verified-batch',
+        { 'Content-Type': 'application/octet-stream' },
+        new Uint8Array(packVerifiedWriteBatch(batch)),
+      )
+    } catch (e) {
+      const error = e instanceof Error ? e : new Error(String(e))
+      for (const w of batch) w.reject(error)
+      return
+    }
+
+    this.metrics.requestCount++
+    this.metrics.totalRequestTimeMs += Date.now() - start
+
+    if (response.status === 404) {
+      // Older io-daemon or Android companion - use per-piece verified writes
+      this.batchSupported = false
+      await Promise.all(batch.map((w) => this.sendSingle(w)))
+      return
+    }
+
+    if (!response.ok) {
+      const errorDetail = await response.text()
+      const error = new Error(
+        `Batch write failed: ${response.status} ${response.statusText}: ${errorDetail}`,
+      )
+      for (const w of batch) w.reject(error)
+      return
+    }
+
+    let results
+    try {
+      results = unpackVerifiedWriteResults(await response.arrayBuffer())
+      if (results.length !== batch.length) {
+        throw new Error(`Batch write returned ${results.length} results for ${batch.length} writes`)
+      }
+    } catch (e) {
+      const error = e instanceof Error ? e : new Error(String(e))
+      for (const w of batch) w.reject(error)
+      return
+    }
+
+    for (let i = 0; i < batch.length; i++) {
+      const w = batch[i]
+      const { resultCode, bytesWritten } = results[i]
+      if (resultCode === WriteResultCode.SUCCESS) {
+        this.metrics.totalWrites++
+        this.metrics.totalBytes += bytesWritten
+        w.resolve({ bytesWritten })
+      } else if (resultCode === WriteResultCode.HASH_MISMATCH) {
+        w.reject(new HashMismatchError(`Hash mismatch for ${w.path}`))
+      } else if (resultCode === WriteResultCode.IO_ERROR) {
+        w.reject(new Error(`I/O error writing to ${w.path}`))
+      } else {
+        w.reject(new Error(`Write failed with code ${resultCode}`))
+      }
+    }
+  }
+
+  private async sendSingle(w: PendingDaemonWrite): Promise<void> {
+    const start = Date.now()
+    try {
+      await writeVerifiedSingle(
+        this.connection,
+        w.rootKey,
+        w.path,
+        w.position,
+        w.data,
+        w.expectedHashHex,
+      )
+      this.metrics.totalWrites++
+      this.metrics.totalBytes += w.data.byteLength
+      w.resolve({ bytesWritten: w.data.byteLength })
+    } catch (e) {
+      w.reject(e instanceof Error ? e : new Error(String(e)))
+    } finally {
+      this.metrics.requestCount++
+      this.metrics.totalRequestTimeMs += Date.now() - start
+    }
+  }
+
+  /**
+   * Get count of pending writes (for debugging/metrics).
+   */
+  get pendingCount(): number {
+    return this.pending.length
+  }
+
+  /**
+   * Whether the connected daemon accepts batched writes.
+   * Becomes false after the first 404 from the batch endpoint.
+   */
+  get isBatchingSupported(): boolean {
+    return this.batchSupported
+  }
+
+  /**
+   * Get current metrics snapshot (for debugging/monitoring).
+   */
+  getMetrics(): Readonly<DaemonBatchWriteMetrics> {
+    return { ...this.metrics }
+  }
+
+  // ============================================================
+  // IDiskQueue interface methods
+  // Verified writes bypass enqueue() and use queueVerifiedWrite() directly.
+  // ============================================================
+
+  async enqueue(
+    _job: Omit<DiskJob, 'id' | 'status' | 'enqueuedAt'>,
+    execute: () => Promise<void>,
+  ): Promise<void> {
+    await execute()
+  }
+
+  async drain(): Promise<void> {
+    this.flushPending()
+    await Promise.allSettled([...this.inFlight])
+  }
+
+  resume(): void {
+    // No-op - we don't pause batching
+  }
+
+  getSnapshot(): DiskQueueSnapshot {
+    return {
+      pending: [],
+      running: [],
+      draining: false,
+    }
+  }
+}
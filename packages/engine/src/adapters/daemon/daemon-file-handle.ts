@@ -1,6 +1,7 @@
 import { IFileHandle } from '../../interfaces/filesystem'
 import { toHex } from '../../utils/buffer'
 import { DaemonConnection } from './daemon-connection'
+import type { DaemonBatchingDiskQueue } from './daemon-batching-disk-queue'
 
 /**
  * Error thrown when hash verification fails during a write operation.
@@ -12,6 +13,39 @@ export class HashMismatchError extends Error {
   }
 }
 
+/**
+ * Write data with io-daemon hash verification in a single HTTP request.
+ * Throws HashMismatchError if the daemon rejects the data (409).
+ */
+export async function writeVerifiedSingle(
+  connection: DaemonConnection,
+  rootKey: string,
+  path: string,
+  position: number,
+  data: Uint8Array,
+  expectedHashHex: string,
+): Promise<void> {
+  const response = await connection.requestWithHeaders(
+    'POST',
+    `/write/${rootKey}`,
+    {
+      'X-Path-Base64': btoa(path),
+      'X-Offset': String(position),
+      'X-Expected-SHA1': expectedHashHex,
+    },
+    data,
+  )
+
+  if (response.status === 409) {
+    throw new HashMismatchError(await response.text())
+  }
+
+  if (!response.ok) {
+    const errorDetail = await response.text()
+    throw new Error(`Write failed: ${response.status} ${response.statusText}: ${errorDetail}`)
+  }
+}
+
 /**
  * Type guard to check if a file handle supports verified writes.
  */
@@ -26,12 +60,16 @@ export class DaemonFileHandle implements IFileHandle {
     private connection: DaemonConnection,
     private path: string,
     private rootKey: string,
+    private batchQueue?: DaemonBatchingDiskQueue,
   ) {}
 
   /**
    * Set expected SHA1 hash for the next write operation.
    * If the hash mismatches, the write will throw HashMismatchError.
    * The hash is consumed after one write operation.
+   *
+   * With a batch queue, the write is deferred until the queue flushes at
+   * end of tick and is sent together with other verified writes.
    */
   setExpectedHashForNextWrite(sha1: Uint8Array): void {
     this.pendingHash = sha1
@@ -68,30 +106,42 @@ export class DaemonFileHandle implements IFileHandle {
     position: number,
   ): Promise<{ bytesWritten: number }> {
     const data = buffer.subarray(offset, offset + length)
-    const pathB64 = btoa(this.path)
-
-    const headers: Record<string, string> = {
-      'X-Path-Base64': pathB64,
-      'X-Offset': String(position),
-    }
 
-    // Attach pending hash if set
     if (this.pendingHash) {
-      headers['X-Expected-SHA1'] = toHex(this.pendingHash)
+      const expectedHash = this.pendingHash
       this.pendingHash = null // Consume it
+
+      if (this.batchQueue) {
+        return this.batchQueue.queueVerifiedWrite(
+          this.rootKey,
+          this.path,
+          position,
+          data,
+          expectedHash,
+        )
+      }
+
+      await writeVerifiedSingle(
+        this.connection,
+        this.rootKey,
+        this.path,
+        position,
+        data,
+        toHex(expectedHash),
+      )
+      return { bytesWritten: length }
     }
 
     const response = await this.connection.requestWithHeaders(
       'POST',
       `/write/${this.rootKey}`,
-      headers,
+      {
+        'X-Path-Base64': btoa(this.path),
+        'X-Offset': String(position),
+      },
       data,
     )
 
-    if (response.status === 409) {
-      throw new HashMismatchError(await response.text())
-    }
-
     if (!response.ok) {
       const errorDetail = await response.text()
       throw new Error(`Write failed: ${response.status} ${response.statusText}: ${errorDetail}`)
@@ -1,11 +1,14 @@
 import { IFileSystem, IFileHandle, IFileStat } from '../../interfaces/filesystem'
 import { DaemonConnection } from './daemon-connection'
 import { DaemonFileHandle } from './daemon-file-handle'
+import type { DaemonBatchingDiskQueue } from './daemon-batching-disk-queue'
 
 export class DaemonFileSystem implements IFileSystem {
   constructor(
     private connection: DaemonConnection,
     private rootKey: string,
+    // Optional: batch verified writes into one request per tick
+    private batchQueue?: DaemonBatchingDiskQueue,
   ) {}
 
   async open(path: string, _mode: 'r' | 'w' | 'r+'): Promise<IFileHandle> {
@@ -15,7 +18,7 @@ export class DaemonFileSystem implements IFileSystem {
     // We can just return the handle and let the operations fail if needed,
     // or we could do a stat check here.
     // For now, just return the handle.
-    return new DaemonFileHandle(this.connection, path, this.rootKey)
+    return new DaemonFileHandle(this.connection, path, this.rootKey, this.batchQueue)
   }
 
   async stat(path: string): Promise<IFileStat> {
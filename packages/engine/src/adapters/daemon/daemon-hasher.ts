@@ -1,15 +1,141 @@
-import { IHasher } from '../../interfaces/hasher'
+import { IHasher, IIncrementalHash } from '../../interfaces/hasher'
 import { DaemonConnection } from './daemon-connection'
+import { IDaemonSocketManager } from './internal-types'
+
+// Streaming hash opcodes on the /io WebSocket
+const OP_HASH_OPEN = 0x30
+const OP_HASH_UPDATE = 0x31
+const OP_HASH_FINALIZE = 0x32
+const OP_HASH_ABORT = 0x34
+
+const HASH_ALGO_SHA1 = 0
+const SHA1_LENGTH = 20
+
+/** Max bytes per OP_HASH_UPDATE frame (keeps single frames small on the socket) */
+const MAX_UPDATE_CHUNK = 1024 * 1024
 
 /**
  * Hasher that delegates to io-daemon.
  * Works in any context since hashing happens in Rust.
+ *
+ * With a socket manager, hashes are streamed over the /io WebSocket
+ * (OP_HASH_OPEN/UPDATE/FINALIZE) so blocks can be hashed as they arrive.
+ * Without one, each sha1() call is a POST to /hash/sha1.
+ *
+ * sha256() is only used to create v2 torrents, which hash every 16KiB block
+ * and merkle pair separately; it runs in-process via Web Crypto where
+ * available rather than making an HTTP round trip per call.
  */
 export class DaemonHasher implements IHasher {
-  constructor(private connection: DaemonConnection) {}
+  /** Only present when streaming over the /io WebSocket is available */
+  readonly createSha1?: () => IIncrementalHash
+
+  private nextHashId = 1
+
+  constructor(
+    private connection: DaemonConnection,
+    socketManager?: IDaemonSocketManager,
+  ) {
+    if (socketManager) {
+      this.createSha1 = () =>
+        new DaemonStreamingHash(this.connection, socketManager, this.allocateHashId())
+    }
+  }
 
   async sha1(data: Uint8Array): Promise<Uint8Array> {
+    if (this.createSha1 && this.connection.ready) {
+      const hash = this.createSha1()
+      hash.update(data)
+      return hash.digest()
+    }
     // Returns raw 20 bytes, not hex
     return this.connection.requestBinary('POST', '/hash/sha1', undefined, data)
   }
+
+  async sha256(data: Uint8Array): Promise<Uint8Array> {
+    if (typeof crypto !== 'undefined' && crypto.subtle) {
+      return new Uint8Array(await crypto.subtle.digest('SHA-256', data.slice()))
+    }
+    // Returns raw 32 bytes
+    return this.connection.requestBinary('POST', '/hash/sha256', undefined, data)
+  }
+
+  private allocateHashId(): number {
+    const id = this.nextHashId
+    this.nextHashId = (this.nextHashId + 1) >>> 0 || 1
+    return id
+  }
+}
+
+/**
+ * Incremental hash backed by a daemon-side hasher on the /io WebSocket.
+ * Send failures (e.g. connection lost) are deferred until digest().
+ */
+class DaemonStreamingHash implements IIncrementalHash {
+  private error: Error | null = null
+  private done = false
+
+  constructor(
+    private connection: DaemonConnection,
+    private manager: IDaemonSocketManager,
+    private hashId: number,
+  ) {
+    const payload = new Uint8Array(5)
+    new DataView(payload.buffer).setUint32(0, hashId, true)
+    payload[4] = HASH_ALGO_SHA1
+    this.send(OP_HASH_OPEN, 0, payload)
+  }
+
+  update(data: Uint8Array): void {
+    if (this.done || this.error) return
+    for (let offset = 0; offset < data.byteLength; offset += MAX_UPDATE_CHUNK) {
+      const chunk = data.subarray(offset, Math.min(offset + MAX_UPDATE_CHUNK, data.byteLength))
+      const payload = new Uint8Array(4 + chunk.byteLength)
+      new DataView(payload.buffer).setUint32(0, this.hashId, true)
+      payload.set(chunk, 4)
+      this.send(OP_HASH_UPDATE, 0, payload)
+    }
+  }
+
+  async digest(): Promise<Uint8Array> {
+    if (this.done) throw new Error('Hash already finalized')
+    this.done = true
+    if (this.error) throw this.error
+
+    const reqId = this.manager.nextRequestId()
+    // Register before sending so a fast reply is not missed
+    const response = this.manager.waitForResponse(reqId)
+    this.send(OP_HASH_FINALIZE, reqId, this.idPayload())
+    if (this.error) {
+      response.catch(() => {})
+      throw this.error
+    }
+
+    // Response: hashId(4), status(1), digest
+    const payload = await response
+    if (payload.byteLength !== 5 + SHA1_LENGTH) {
+      throw new Error(`Unexpected hash result length ${payload.byteLength}`)
+    }
+    return payload.slice(5)
+  }
+
+  abort(): void {
+    if (this.done) return
+    this.done = true
+    if (!this.error) this.send(OP_HASH_ABORT, 0, this.idPayload())
+  }
+
+  private idPayload(): Uint8Array {
+    const payload = new Uint8Array(4)
+    new DataView(payload.buffer).setUint32(0, this.hashId, true)
+    return payload
+  }
+
+  private send(opcode: number, reqId: number, payload: Uint8Array): void {
+    try {
+      this.connection.sendFrame(this.manager.packEnvelope(opcode, reqId, payload))
+    } catch (e) {
+      this.error = e instanceof Error ? e : new Error(String(e))
+    }
+  }
 }
@@ -1,4 +1,10 @@
-import { ISocketFactory, ITcpServer, ITcpSocket, IUdpSocket } from '../../interfaces/socket'
+import {
+  DirectDiskLayout,
+  ISocketFactory,
+  ITcpServer,
+  ITcpSocket,
+  IUdpSocket,
+} from '../../interfaces/socket'
 import { DaemonConnection } from './daemon-connection'
 import { DaemonTcpServer } from './daemon-tcp-server'
 import { DaemonTcpSocket } from './daemon-tcp-socket'
@@ -7,12 +13,101 @@ import { IDaemonSocketManager } from './internal-types'
 
 const PROTOCOL_VERSION = 1
 
+const OP_TCP_RECV = 0x13
+const OP_TCP_RECV_BATCH = 0x1e
+
 // Opcodes for synthetic close events
 const OP_TCP_CLOSE = 0x14
 const OP_UDP_CLOSE = 0x24
 
+// Direct-to-disk layouts
+const OP_DISK_LAYOUT_SET = 0x40
+const OP_DISK_LAYOUT_REMOVE = 0x42
+const OP_DISK_PIECE_RESET = 0x43
+
+// Connection-level flow control (desktop io-daemon)
+const OP_IO_CONFIGURE = 0x50
+const OP_IO_CREDIT = 0x52
+const OP_IO_STATS = 0x53
+const IO_FLAG_BATCH_RECV = 1
+const IO_FLAG_CREDIT = 2
+const IO_FLAG_BATCH_UDP = 4
+
+/** Default receive window: bytes the daemon may forward before credit is returned */
+const DEFAULT_CREDIT_WINDOW = 8 * 1024 * 1024
+
+export interface DaemonFlowControlOptions {
+  /** Pack several sockets' received data into one WebSocket frame. Default: true */
+  batchRecv?: boolean
+  /** Exchange UDP datagrams in batches (recvmmsg/sendmmsg on Linux). Default: true */
+  batchUdp?: boolean
+  /**
+   * Receive window in bytes. The daemon stops reading sockets once this much
+   * data is unacknowledged; 0 disables credit. Default: 8MB
+   */
+  creditWindow?: number
+}
+
+export interface DaemonIoStats {
+  /** Credit the daemon still holds (0 when credit is disabled) */
+  availableCredit: number
+  sockets: Array<{
+    socketId: number
+    /** Bytes queued for sending but not yet written to the socket */
+    sendQueued: number
+    /** Bytes read from the socket and waiting for credit */
+    recvWaiting: number
+  }>
+}
+
+/**
+ * Pack an OP_DISK_LAYOUT_SET payload (all integers little-endian):
+ * layoutId(4), pieceLength(4), totalLength(8), rootKeyLen(1), rootKey,
+ * fileCount(4), then per file length(8), pathLen(2), path,
+ * then pieceCount(4), sha1(20) * pieceCount.
+ */
+export function packDiskLayout(layoutId: number, layout: DirectDiskLayout): Uint8Array {
+  const encoder = new TextEncoder()
+  const rootBytes = encoder.encode(layout.rootKey)
+  const pathBytes = layout.files.map((f) => encoder.encode(f.path))
+  const pieceCount = layout.pieceHashes.length / 20
+
+  let size = 4 + 4 + 8 + 1 + rootBytes.length + 4 + 4 + layout.pieceHashes.length
+  for (const p of pathBytes) size += 8 + 2 + p.length
+
+  const out = new Uint8Array(size)
+  const view = new DataView(out.buffer)
+  let offset = 0
+  const writeU64 = (value: number) => {
+    view.setUint32(offset, value >>> 0, true) // low 32 bits
+    view.setUint32(offset + 4, Math.floor(value / 0x100000000) >>> 0, true) // high 32 bits
+    offset += 8
+  }
+
+  view.setUint32(offset, layoutId, true)
+  view.setUint32(offset + 4, layout.pieceLength, true)
+  offset += 8
+  writeU64(layout.files.reduce((sum, f) => sum + f.length, 0))
+  view.setUint8(offset++, rootBytes.length)
+  out.set(rootBytes, offset)
+  offset += rootBytes.length
+  view.setUint32(offset, layout.files.length, true)
+  offset += 4
+  for (let i = 0; i < layout.files.length; i++) {
+    writeU64(layout.files[i].length)
+    view.setUint16(offset, pathBytes[i].length, true)
+    offset += 2
+    out.set(pathBytes[i], offset)
+    offset += pathBytes[i].length
+  }
+  view.setUint32(offset, pieceCount, true)
+  out.set(layout.pieceHashes, offset + 4)
+  return out
+}
+
 export class DaemonSocketFactory implements ISocketFactory, IDaemonSocketManager {
   private nextSocketIdVal = 1
+  private nextLayoutId = 1
   private pendingRequests = new Map<
     number,
     { resolve: (v: Uint8Array) => void; reject: (e: Error) => void }
@@ -21,11 +116,132 @@ export class DaemonSocketFactory implements ISocketFactory, IDaemonSocketManager
   // Track socket types so we can send the correct close opcode
   private socketTypes = new Map<number, 'tcp' | 'udp'>()
 
+  // Flow control: flags requested from the daemon, window it confirmed,
+  // and received bytes not yet returned as credit
+  private flowFlags = 0
+  private flowOptions: Required<DaemonFlowControlOptions> | null = null
+  private creditWindow = 0
+  private creditOwed = 0
+  private backpressure = false
+
   constructor(private daemon: DaemonConnection) {
     this.daemon.onFrame((frame) => this.handleFrame(frame))
     this.daemon.onDisconnect((reason) => this.handleDisconnect(reason))
   }
 
+  /**
+   * Opt in to RECV batching and credit-based flow control.
+   *
+   * With credit, received data is acknowledged as it is handed to sockets,
+   * except while setBackpressure(true) is in effect - the daemon then stops
+   * reading once the window is used up instead of queueing without bound.
+   * Call before opening sockets. Re-applied after reconnects.
+   *
+   * @returns false if the daemon does not support flow control
+   */
+  async enableFlowControl(options: DaemonFlowControlOptions = {}): Promise<boolean> {
+    const first = this.flowOptions === null
+    this.flowOptions = {
+      batchRecv: options.batchRecv ?? true,
+      batchUdp: options.batchUdp ?? true,
+      creditWindow: options.creditWindow ?? DEFAULT_CREDIT_WINDOW,
+    }
+    if (first) {
+      this.daemon.onReconnect(() => {
+        this.configureFlowControl().catch(() => {})
+      })
+    }
+    try {
+      await this.configureFlowControl()
+      return true
+    } catch {
+      return false
+    }
+  }
+
+  private async configureFlowControl(): Promise<void> {
+    const options = this.flowOptions!
+    this.flowFlags =
+      (options.batchRecv ? IO_FLAG_BATCH_RECV : 0) |
+      (options.batchUdp ? IO_FLAG_BATCH_UDP : 0) |
+      (options.creditWindow > 0 ? IO_FLAG_CREDIT : 0)
+    this.creditWindow = 0
+    this.creditOwed = 0
+
+    // Payload: flags(1), initialCredit(4)
+    const payload = new Uint8Array(5)
+    payload[0] = this.flowFlags
+    new DataView(payload.buffer).setUint32(1, options.creditWindow, true)
+    const reqId = this.nextRequestId()
+    this.daemon.sendFrame(this.packEnvelope(OP_IO_CONFIGURE, reqId, payload))
+
+    // Reply: creditWindow(4), status(1). Older daemons answer with an error.
+    try {
+      const reply = await this.waitForResponse(reqId)
+      this.creditWindow = new DataView(reply.buffer, reply.byteOffset).getUint32(0, true)
+    } catch (e) {
+      this.flowFlags = 0
+      throw e
+    }
+    this.maybeGrantCredit()
+  }
+
+  /** Hold back credit while the engine is over its buffer high-water mark. */
+  setBackpressure(active: boolean): void {
+    this.backpressure = active
+    if (!active) this.maybeGrantCredit(true)
+  }
+
+  /** Per-socket queue depths as seen by the daemon. */
+  async getIoStats(): Promise<DaemonIoStats> {
+    const reqId = this.nextRequestId()
+    this.daemon.sendFrame(this.packEnvelope(OP_IO_STATS, reqId))
+
+    // Reply: availableCredit(4), status(1), socketCount(4),
+    // then per socket: socketId(4), sendQueued(4), recvWaiting(4)
+    const reply = await this.waitForResponse(reqId)
+    const view = new DataView(reply.buffer, reply.byteOffset, reply.byteLength)
+    const count = view.getUint32(5, true)
+    const sockets: DaemonIoStats['sockets'] = []
+    for (let i = 0, offset = 9; i < count; i++, offset += 12) {
+      sockets.push({
+        socketId: view.getUint32(offset, true),
+        sendQueued: view.getUint32(offset + 4, true),
+        recvWaiting: view.getUint32(offset + 8, true),
+      })
+    }
+    return { availableCredit: view.getUint32(0, true), sockets }
+  }
+
+  /**
+   * Owe the daemon credit for one read. The daemon charges an oversized read
+   * at most half the window (flow.rs `acquire`), so only that much is owed;
+   * granting back the full size would inflate its credit past the window.
+   */
+  private chargeCredit(bytes: number): void {
+    if (!(this.flowFlags & IO_FLAG_CREDIT)) return
+    const maxCharge = Math.floor(this.creditWindow / 2)
+    this.creditOwed += maxCharge > 0 ? Math.min(bytes, maxCharge) : bytes
+  }
+
+  /**
+   * Return consumed bytes to the daemon once they add up to a quarter of
+   * the window (or whatever is owed, when `flush` is set).
+   */
+  private maybeGrantCredit(flush = false): void {
+    if (this.creditWindow === 0 || this.backpressure || this.creditOwed === 0) return
+    if (!flush && this.creditOwed < this.creditWindow / 4) return
+
+    const payload = new Uint8Array(4)
+    new DataView(payload.buffer).setUint32(0, this.creditOwed, true)
+    try {
+      this.daemon.sendFrame(this.packEnvelope(OP_IO_CREDIT, 0, payload))
+      this.creditOwed = 0
+    } catch {
+      // Connection gone - credit starts over when flow control is re-applied
+    }
+  }
+
   /**
    * Called when the /io websocket disconnects.
    * Cleans up all pending requests and notifies all sockets they're closed.
@@ -85,7 +301,8 @@ export class DaemonSocketFactory implements ISocketFactory, IDaemonSocketManager
 
     await this.waitForResponse(reqId)
 
-    return new DaemonUdpSocket(socketId, this.daemon, this)
+    const batched = (this.flowFlags & IO_FLAG_BATCH_UDP) !== 0
+    return new DaemonUdpSocket(socketId, this.daemon, this, batched)
   }
 
   createTcpServer(): ITcpServer {
@@ -103,6 +320,40 @@ export class DaemonSocketFactory implements ISocketFactory, IDaemonSocketManager
     throw new Error('wrapTcpSocket only supports DaemonTcpSocket')
   }
 
+  async registerDiskLayout(layout: DirectDiskLayout): Promise<number> {
+    const layoutId = this.nextLayoutId++
+    const reqId = this.nextRequestId()
+    this.daemon.sendFrame(
+      this.packEnvelope(OP_DISK_LAYOUT_SET, reqId, packDiskLayout(layoutId, layout)),
+    )
+
+    // Reply: layoutId(4), status(1), error(utf8) - non-zero status rejects
+    await this.waitForResponse(reqId)
+    return layoutId
+  }
+
+  removeDiskLayout(layoutId: number): void {
+    const payload = new Uint8Array(4)
+    new DataView(payload.buffer).setUint32(0, layoutId, true)
+    try {
+      this.daemon.sendFrame(this.packEnvelope(OP_DISK_LAYOUT_REMOVE, 0, payload))
+    } catch {
+      // Connection gone - the daemon drops layouts on disconnect anyway
+    }
+  }
+
+  resetDiskPiece(layoutId: number, pieceIndex: number): void {
+    const payload = new Uint8Array(8)
+    const view = new DataView(payload.buffer)
+    view.setUint32(0, layoutId, true)
+    view.setUint32(4, pieceIndex, true)
+    try {
+      this.daemon.sendFrame(this.packEnvelope(OP_DISK_PIECE_RESET, 0, payload))
+    } catch {
+      // Connection gone - the daemon drops layouts on disconnect anyway
+    }
+  }
+
   registerHandler(
     socketId: number,
     handler: (payload: Uint8Array, msgType: number) => void,
@@ -142,6 +393,11 @@ export class DaemonSocketFactory implements ISocketFactory, IDaemonSocketManager
       return
     }
 
+    if (msgType === OP_TCP_RECV_BATCH) {
+      this.dispatchRecvBatch(payload)
+      return
+    }
+
     // Socket events
     if (payload.byteLength >= 4) {
       const socketId = new DataView(
@@ -153,7 +409,30 @@ export class DaemonSocketFactory implements ISocketFactory, IDaemonSocketManager
       if (handler) {
         handler(payload, msgType)
       }
+      if (msgType === OP_TCP_RECV) {
+        this.chargeCredit(payload.byteLength - 4)
+        this.maybeGrantCredit()
+      }
+    }
+  }
+
+  /**
+   * Split an OP_TCP_RECV_BATCH payload - per entry dataLen(4), socketId(4),
+   * data - and deliver each entry as an OP_TCP_RECV payload.
+   */
+  private dispatchRecvBatch(payload: Uint8Array): void {
+    const view = new DataView(payload.buffer, payload.byteOffset, payload.byteLength)
+    let offset = 0
+    while (offset + 8 <= payload.byteLength) {
+      const dataLen = view.getUint32(offset, true)
+      const socketId = view.getUint32(offset + 4, true)
+      const entry = payload.subarray(offset + 4, offset + 8 + dataLen)
+      offset += 8 + dataLen
+      // Each entry is one daemon read, charged separately
+      this.chargeCredit(dataLen)
+      this.socketHandlers.get(socketId)?.(entry, OP_TCP_RECV)
     }
+    this.maybeGrantCredit()
   }
 
   waitForResponse(reqId: number, timeoutMs = 10000): Promise<Uint8Array> {
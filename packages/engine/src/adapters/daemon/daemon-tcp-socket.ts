@@ -1,4 +1,4 @@
-import { ITcpSocket } from '../../interfaces/socket'
+import { DirectBlockEvent, ITcpSocket } from '../../interfaces/socket'
 import { DaemonConnection } from './daemon-connection'
 import { IDaemonSocketManager } from './internal-types'
 
@@ -8,11 +8,14 @@ const OP_TCP_SEND = 0x12
 const OP_TCP_RECV = 0x13
 const OP_TCP_CLOSE = 0x14
 const OP_TCP_SECURE = 0x19
+const OP_TCP_BLOCK = 0x1b
+const OP_TCP_DIRECT = 0x1c
 const PROTOCOL_VERSION = 1
 
 export class DaemonTcpSocket implements ITcpSocket {
   private onDataCb: ((data: Uint8Array) => void) | null = null
   private onCloseCb: ((hadError: boolean) => void) | null = null
+  private onDirectBlockCb: ((event: DirectBlockEvent) => void) | null = null
   // @ts-expect-error - onError handler not yet implemented in daemon protocol
   private onErrorCb: ((err: Error) => void) | null = null
   private closed = false
@@ -44,6 +47,18 @@ export class DaemonTcpSocket implements ITcpSocket {
           if (this.onDataCb) {
             this.onDataCb(payload.slice(4))
           }
+        } else if (msgType === OP_TCP_BLOCK) {
+          // Payload: socketId(4), index(4), begin(4), length(4), status(1), pieceResult(1)
+          if (this.onDirectBlockCb && payload.length >= 18) {
+            const view = new DataView(payload.buffer, payload.byteOffset, payload.byteLength)
+            this.onDirectBlockCb({
+              index: view.getUint32(4, true),
+              begin: view.getUint32(8, true),
+              length: view.getUint32(12, true),
+              status: payload[16],
+              pieceResult: payload[17],
+            })
+          }
         } else if (msgType === OP_TCP_CLOSE) {
           // Payload: socketId(4), reason(1), errno(4)
           // reason != 0 indicates error (including IO connection lost)
@@ -102,6 +117,30 @@ export class DaemonTcpSocket implements ITcpSocket {
     this._isSecure = true
   }
 
+  async enableDirectReceive(layoutId: number, streamOffset: number): Promise<void> {
+    if (this.closed) {
+      throw new Error('Socket is closed')
+    }
+    const reqId = this.manager.nextRequestId()
+
+    // Payload: socketId(4), layoutId(4), streamOffset(8)
+    // Reply: OP_TCP_DIRECT_RESULT socketId(4), status(1) - non-zero status rejects
+    const buffer = new ArrayBuffer(16)
+    const view = new DataView(buffer)
+    view.setUint32(0, this.id, true)
+    view.setUint32(4, layoutId, true)
+    view.setUint32(8, streamOffset >>> 0, true)
+    view.setUint32(12, Math.floor(streamOffset / 0x100000000) >>> 0, true)
+
+    this.daemon.sendFrame(this.manager.packEnvelope(OP_TCP_DIRECT, reqId, new Uint8Array(buffer)))
+
+    await this.manager.waitForResponse(reqId)
+  }
+
+  onDirectBlock(cb: (event: DirectBlockEvent) => void) {
+    this.onDirectBlockCb = cb
+  }
+
   send(data: Uint8Array) {
     // Payload: socketId(4) + data
     const buffer = new ArrayBuffer(4 + data.byteLength)
@@ -1,4 +1,4 @@
-import { IUdpSocket } from '../../interfaces/socket'
+import { IUdpSocket, UdpDatagram } from '../../interfaces/socket'
 import { DaemonConnection } from './daemon-connection'
 import { IDaemonSocketManager } from './internal-types'
 
@@ -8,17 +8,76 @@ const OP_UDP_RECV = 0x23
 const OP_UDP_CLOSE = 0x24
 const OP_UDP_JOIN_MULTICAST = 0x25
 const OP_UDP_LEAVE_MULTICAST = 0x26
+const OP_UDP_SEND_BATCH = 0x27
+const OP_UDP_RECV_BATCH = 0x28
 const PROTOCOL_VERSION = 1
 
+/** Datagram count field is a u16 */
+const MAX_BATCH_DATAGRAMS = 0xffff
+
+/**
+ * Parse an OP_UDP_RECV_BATCH payload: socketId(4), count(2), then per
+ * datagram port(2), addrLen(2), addr, dataLen(2), data.
+ * Datagram data are views into the payload.
+ */
+export function unpackUdpBatch(payload: Uint8Array): UdpDatagram[] {
+  const view = new DataView(payload.buffer, payload.byteOffset, payload.byteLength)
+  const decoder = new TextDecoder()
+  const count = view.getUint16(4, true)
+  const datagrams: UdpDatagram[] = new Array(count)
+  let offset = 6
+  for (let i = 0; i < count; i++) {
+    const port = view.getUint16(offset, true)
+    const addrLen = view.getUint16(offset + 2, true)
+    const addr = decoder.decode(payload.subarray(offset + 4, offset + 4 + addrLen))
+    offset += 4 + addrLen
+    const dataLen = view.getUint16(offset, true)
+    datagrams[i] = { addr, port, data: payload.subarray(offset + 2, offset + 2 + dataLen) }
+    offset += 2 + dataLen
+  }
+  return datagrams
+}
+
+/** Pack an OP_UDP_SEND_BATCH payload (same layout as OP_UDP_RECV_BATCH). */
+export function packUdpBatch(socketId: number, datagrams: UdpDatagram[]): Uint8Array {
+  const encoder = new TextEncoder()
+  const addrs = datagrams.map((d) => encoder.encode(d.addr))
+  let size = 6
+  for (let i = 0; i < datagrams.length; i++) size += 6 + addrs[i].length + datagrams[i].data.length
+
+  const out = new Uint8Array(size)
+  const view = new DataView(out.buffer)
+  view.setUint32(0, socketId, true)
+  view.setUint16(4, datagrams.length, true)
+  let offset = 6
+  for (let i = 0; i < datagrams.length; i++) {
+    const { port, data } = datagrams[i]
+    view.setUint16(offset, port, true)
+    view.setUint16(offset + 2, addrs[i].length, true)
+    out.set(addrs[i], offset + 4)
+    offset += 4 + addrs[i].length
+    view.setUint16(offset, data.length, true)
+    out.set(data, offset + 2)
+    offset += 2 + data.length
+  }
+  return out
+}
+
 export class DaemonUdpSocket implements IUdpSocket {
   private onMessageCb: ((src: { addr: string; port: number }, data: Uint8Array) => void) | null =
     null
+  private onMessageBatchCb: ((datagrams: UdpDatagram[]) => void) | null = null
   private closed = false
 
+  /**
+   * @param batched - the daemon accepts OP_UDP_SEND_BATCH (negotiated via
+   *   DaemonSocketFactory.enableFlowControl)
+   */
   constructor(
     private id: number,
     private daemon: DaemonConnection,
     private manager: IDaemonSocketManager,
+    private batched = false,
   ) {
     this.manager.registerHandler(
       id,
@@ -31,9 +90,18 @@ export class DaemonUdpSocket implements IUdpSocket {
           const addr = new TextDecoder().decode(payload.slice(8, 8 + addrLen))
           const data = payload.slice(8 + addrLen)
 
-          if (this.onMessageCb) {
+          if (this.onMessageBatchCb) {
+            this.onMessageBatchCb([{ addr, port, data }])
+          } else if (this.onMessageCb) {
             this.onMessageCb({ addr, port }, data)
           }
+        } else if (msgType === OP_UDP_RECV_BATCH) {
+          const datagrams = unpackUdpBatch(payload)
+          if (this.onMessageBatchCb) {
+            this.onMessageBatchCb(datagrams)
+          } else if (this.onMessageCb) {
+            for (const d of datagrams) this.onMessageCb({ addr: d.addr, port: d.port }, d.data)
+          }
         } else if (msgType === OP_UDP_CLOSE) {
           // Socket was closed (either by daemon or synthetic from IO disconnect)
           this.closed = true
@@ -67,10 +135,25 @@ export class DaemonUdpSocket implements IUdpSocket {
     this.daemon.sendFrame(env)
   }
 
+  sendBatch(datagrams: UdpDatagram[]) {
+    if (!this.batched) {
+      for (const d of datagrams) this.send(d.addr, d.port, d.data)
+      return
+    }
+    for (let i = 0; i < datagrams.length; i += MAX_BATCH_DATAGRAMS) {
+      const payload = packUdpBatch(this.id, datagrams.slice(i, i + MAX_BATCH_DATAGRAMS))
+      this.daemon.sendFrame(this.manager.packEnvelope(OP_UDP_SEND_BATCH, 0, payload))
+    }
+  }
+
   onMessage(cb: (src: { addr: string; port: number }, data: Uint8Array) => void) {
     this.onMessageCb = cb
   }
 
+  onMessageBatch(cb: (datagrams: UdpDatagram[]) => void) {
+    this.onMessageBatchCb = cb
+  }
+
   close() {
     if (this.closed) return
     this.closed = true
@@ -1,5 +1,8 @@
 import { IFileSystem, IFileHandle, IFileStat } from '../../interfaces/filesystem'
 
+/** Most a file's backing buffer grows by beyond what a write needs */
+const MAX_GROWTH = 64 * 1024 * 1024
+
 class MemoryFileHandle implements IFileHandle {
   constructor(
     private fs: InMemoryFileSystem,
@@ -34,12 +37,19 @@ class MemoryFileHandle implements IFileHandle {
 
     const requiredSize = position + length
     if (fileData.length < requiredSize) {
-      const newBuffer = new Uint8Array(requiredSize)
-      newBuffer.set(fileData)
-      fileData = newBuffer
+      // Files are views over a larger buffer so that sequential writes don't
+      // copy the whole file every time it grows.
+      if (fileData.byteOffset === 0 && fileData.buffer.byteLength >= requiredSize) {
+        fileData = new Uint8Array(fileData.buffer, 0, requiredSize)
+      } else {
+        const growth = Math.min(fileData.length, MAX_GROWTH)
+        const newBuffer = new Uint8Array(Math.max(requiredSize, fileData.length + growth))
+        newBuffer.set(fileData)
+        fileData = newBuffer.subarray(0, requiredSize)
+      }
     }
 
-    fileData.set(buffer.slice(offset, offset + length), position)
+    fileData.set(buffer.subarray(offset, offset + length), position)
     this.fs.files.set(this.path, fileData)
 
     return { bytesWritten: length }
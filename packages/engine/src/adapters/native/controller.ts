@@ -424,8 +424,12 @@ export function setupController(getEngine: () => BtEngine | null, isReady: () =>
     if (pendingHashes > 30) {
       // Hasher backed up: delay proportional to queue depth
       delayMs = Math.min(100, Math.floor(pendingHashes * 0.4))
-    } else if (result.activePieces === 0 && result.bufferedBytes === 0) {
-      // No work pending
+    } else if (
+      result.activePieces === 0 &&
+      result.bufferedBytes === 0 &&
+      result.torrentsDeferred === 0
+    ) {
+      // No work pending (deferred torrents run on the next, immediate tick)
       delayMs = 20
     }
     // else: delayMs = 0 (immediate)
@@ -11,4 +11,10 @@ export class NodeHasher implements IHasher {
     hash.update(data)
     return new Uint8Array(hash.digest())
   }
+
+  async sha256(data: Uint8Array): Promise<Uint8Array> {
+    const hash = crypto.createHash('sha256')
+    hash.update(data)
+    return new Uint8Array(hash.digest())
+  }
 }
@@ -1,15 +1,20 @@
 import { ActivePiece } from './active-piece'
-import { PieceBufferPool } from './piece-buffer-pool'
+import { SlabAllocator } from './slab-allocator'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
 
 export interface ActivePieceConfig {
   requestTimeoutMs: number
   maxActivePieces: number
   maxBufferedBytes: number
-  /** Standard piece length for buffer pooling. If not set, buffer pooling is disabled. */
+  /**
+   * Standard piece length. Without a shared allocator, it enables a private
+   * buffer pool of maxPoolSize pieces; if not set either, pooling is disabled.
+   */
   standardPieceLength?: number
-  /** Maximum number of buffers to keep in pool (default: 64) */
+  /** Maximum number of buffers to keep in a private pool (default: 64) */
   maxPoolSize?: number
+  /** Engine-wide allocator for piece buffers, shared with other torrents */
+  bufferAllocator?: SlabAllocator
 }
 
 // Detect if running in native/QuickJS environment (Android/iOS)
@@ -57,7 +62,9 @@ export class ActivePieceManager extends EngineComponent {
   private _fullyRespondedPieces: Map<number, ActivePiece> = new Map()
   private config: ActivePieceConfig
   private pieceLengthFn: (index: number) => number
-  private bufferPool: PieceBufferPool | null = null
+  private bufferPool: SlabAllocator | null = null
+  /** Whether bufferPool is private to this manager (cleared on destroy) */
+  private ownsBufferPool = false
   /** Standard block size for calculating block cap (typically 16KB) */
   private readonly blocksPerPiece: number
 
@@ -76,12 +83,14 @@ export class ActivePieceManager extends EngineComponent {
       ? Math.ceil(this.config.standardPieceLength / BLOCK_SIZE)
       : 16 // Default assumption: 256KB pieces = 16 blocks
 
-    // Initialize buffer pool if standard piece length is configured
-    if (this.config.standardPieceLength) {
-      this.bufferPool = new PieceBufferPool(
-        this.config.standardPieceLength,
-        this.config.maxPoolSize ?? 64,
-      )
+    // Prefer the engine's shared allocator; otherwise pool privately if the
+    // standard piece length is configured
+    if (this.config.bufferAllocator) {
+      this.bufferPool = this.config.bufferAllocator
+    } else if (this.config.standardPieceLength) {
+      const slabSize = SlabAllocator.classSize(this.config.standardPieceLength)
+      this.bufferPool = new SlabAllocator((this.config.maxPoolSize ?? 64) * slabSize)
+      this.ownsBufferPool = true
       this.logger.debug(
         `Buffer pool initialized for ${this.config.standardPieceLength} byte pieces`,
       )
@@ -134,11 +143,8 @@ export class ActivePieceManager extends EngineComponent {
 
     const length = this.pieceLengthFn(index)
 
-    // Try to acquire a buffer from the pool (only if size matches standard)
-    let buffer: Uint8Array | undefined
-    if (this.bufferPool && length === this.config.standardPieceLength) {
-      buffer = this.bufferPool.acquire()
-    }
+    // Acquire the buffer from the pool (any length; the allocator picks the size class)
+    const buffer = this.bufferPool?.acquire(length)
 
     piece = new ActivePiece(index, length, buffer)
     this._partialPieces.set(index, piece)
@@ -340,12 +346,10 @@ export class ActivePieceManager extends EngineComponent {
   }
 
   /**
-   * Release a piece's buffer back to the pool if it matches the standard size.
+   * Release a piece's buffer back to the pool.
    */
   private releaseBuffer(piece: ActivePiece): void {
-    if (this.bufferPool && piece.length === this.config.standardPieceLength) {
-      this.bufferPool.release(piece.getBuffer())
-    }
+    this.bufferPool?.release(piece.getBuffer())
   }
 
   // --- Iteration ---
@@ -566,6 +570,18 @@ export class ActivePieceManager extends EngineComponent {
     return total
   }
 
+  /**
+   * Estimated bytes held by active pieces (buffers and block tracking) and
+   * by idle buffers in a private pool (the shared pool is reported by the engine).
+   */
+  get memoryBytes(): number {
+    let total = this.ownsBufferPool ? this.bufferPool!.memoryBytes : 0
+    for (const piece of this.allPiecesIterator()) {
+      total += piece.memoryBytes
+    }
+    return total
+  }
+
   // --- Request Management (THE KEY FIX) ---
 
   /**
@@ -602,6 +618,17 @@ export class ActivePieceManager extends EngineComponent {
     return totalCleared
   }
 
+  /**
+   * Outstanding duplicate (endgame) requests across active pieces.
+   * fullyResponded pieces have no requests left.
+   */
+  get duplicateRequestCount(): number {
+    let count = 0
+    for (const piece of this._partialPieces.values()) count += piece.duplicateRequests
+    for (const piece of this._fullyRequestedPieces.values()) count += piece.duplicateRequests
+    return count
+  }
+
   /**
    * Check if any partial piece has unrequested blocks.
    * Used to determine endgame eligibility.
@@ -657,7 +684,7 @@ export class ActivePieceManager extends EngineComponent {
    * Cleanup on destroy.
    */
   destroy(): void {
-    // Release all buffers back to pool before clearing
+    // Release the buffers of pieces still downloading back to the pool
     for (const piece of this._partialPieces.values()) {
       this.releaseBuffer(piece)
       piece.clear()
@@ -666,23 +693,23 @@ export class ActivePieceManager extends EngineComponent {
       this.releaseBuffer(piece)
       piece.clear()
     }
-    for (const piece of this._fullyRespondedPieces.values()) {
-      this.releaseBuffer(piece)
-      piece.clear()
-    }
+    // fullyResponded pieces are still in finalizePiece: their buffers may be
+    // awaiting a hash or held by a disk write. Leave them (and the piece state
+    // finalization reads) alone; the buffers go to GC, not back to the pool,
+    // where another torrent could reuse them mid-write.
     this._partialPieces.clear()
     this._fullyRequestedPieces.clear()
     this._fullyRespondedPieces.clear()
 
-    // Clear the buffer pool
-    if (this.bufferPool) {
-      this.bufferPool.clear()
+    // Clear a private buffer pool; the shared one outlives this torrent
+    if (this.ownsBufferPool) {
+      this.bufferPool!.trim()
     }
   }
 
   /**
-   * Get buffer pool statistics for debugging/monitoring.
-   * Returns null if buffer pooling is not enabled.
+   * Get buffer pool statistics for debugging/monitoring (engine-wide when the
+   * pool is shared). Returns null if buffer pooling is not enabled.
    */
   get bufferPoolStats(): {
     acquires: number
@@ -690,6 +717,13 @@ export class ActivePieceManager extends EngineComponent {
     releases: number
     pooled: number
   } | null {
-    return this.bufferPool?.stats ?? null
+    if (!this.bufferPool) return null
+    const stats = this.bufferPool.getStats()
+    return {
+      acquires: stats.allocations,
+      reuses: stats.hits,
+      releases: stats.releases,
+      pooled: stats.pooledBuffers,
+    }
   }
 }
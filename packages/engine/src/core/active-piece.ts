@@ -1,10 +1,19 @@
 import { ChunkedBuffer } from './chunked-buffer'
+import type { IIncrementalHash } from '../interfaces/hasher'
+import { MAP_ENTRY_BYTES, SLOT_BYTES, objectBytes } from '../utils/memory-estimate'
 
 export const BLOCK_SIZE = 16384
 
+/** Requests beyond the first for a block with `count` requests */
+function duplicates(count: number): number {
+  return count > 1 ? count - 1 : 0
+}
+
 export interface RequestInfo {
   peerId: string
   timestamp: number
+  /** When the block is expected from this peer (request time + its block latency) */
+  expectedAt?: number
 }
 
 export interface BlockInfo {
@@ -45,6 +54,9 @@ export class ActivePiece {
   // This is THE KEY CHANGE: requests are tied to specific peers
   private blockRequests: Map<number, RequestInfo[]> = new Map()
 
+  // Requests beyond the first per block (endgame duplicates), kept incrementally
+  private _duplicateRequests = 0
+
   // Activity tracking for stale piece cleanup
   private _lastActivity: number = Date.now()
 
@@ -66,6 +78,16 @@ export class ActivePiece {
    */
   private _activatedAt: number = Date.now()
 
+  // Optional incremental hash, fed with the contiguous prefix of received blocks
+  // so the digest is ready (or nearly so) when the last block arrives.
+  private streamingHash: IIncrementalHash | null = null
+  private hashedBlocks = 0
+
+  // Blocks written to disk by the I/O layer (direct-to-disk receive) rather
+  // than copied into the buffer. Allocated on the first such block.
+  private blockOnDisk: boolean[] | null = null
+  private _directBlocks = 0
+
   /**
    * Create a new ActivePiece.
    * @param index - Piece index in the torrent
@@ -101,6 +123,20 @@ export class ActivePiece {
     return this.length
   }
 
+  /**
+   * Estimated heap bytes held: the piece buffer plus per-block tracking.
+   */
+  get memoryBytes(): number {
+    let requests = 0
+    for (const list of this.blockRequests.values()) requests += list.length
+    return (
+      this.buffer.byteLength +
+      this.blocksNeeded * SLOT_BYTES +
+      (this.blockSenders.size + this.blockRequests.size) * MAP_ENTRY_BYTES +
+      requests * objectBytes(2)
+    )
+  }
+
   /**
    * Returns the number of bytes actually received (for progress tracking).
    */
@@ -234,6 +270,25 @@ export class ActivePiece {
     return true
   }
 
+  /**
+   * Number of outstanding requests beyond the first per block (endgame duplicates).
+   */
+  get duplicateRequests(): number {
+    return this._duplicateRequests
+  }
+
+  /**
+   * Time a block was requested from a peer, if that request is outstanding.
+   */
+  getRequestTime(blockIndex: number, peerId: string): number | undefined {
+    const requests = this.blockRequests.get(blockIndex)
+    if (!requests) return undefined
+    for (const r of requests) {
+      if (r.peerId === peerId) return r.timestamp
+    }
+    return undefined
+  }
+
   // --- Mutations ---
 
   /**
@@ -241,8 +296,9 @@ export class ActivePiece {
    * @param blockIndex - The block index
    * @param peerId - The peer ID
    * @param now - Optional cached timestamp (avoids repeated Date.now() calls in hot paths)
+   * @param expectedAt - When the block is expected to arrive from this peer
    */
-  addRequest(blockIndex: number, peerId: string, now?: number): void {
+  addRequest(blockIndex: number, peerId: string, now?: number, expectedAt?: number): void {
     // Phase 7: Check if this block was unrequested before adding request
     const wasUnrequested =
       !this.blockReceived[blockIndex] &&
@@ -254,7 +310,8 @@ export class ActivePiece {
       this.blockRequests.set(blockIndex, requests)
     }
     const timestamp = now ?? Date.now()
-    requests.push({ peerId, timestamp })
+    if (requests.length > 0) this._duplicateRequests++
+    requests.push({ peerId, timestamp, expectedAt })
     this._lastActivity = timestamp
 
     // Phase 7: Decrement unrequested count if this was the first request
@@ -287,7 +344,7 @@ export class ActivePiece {
     this._lastActivity = Date.now()
 
     // Clear requests for this block - it's been fulfilled
-    this.blockRequests.delete(blockIndex)
+    this.dropRequests(blockIndex)
 
     // Phase 7: Decrement unrequested count if block was unrequested
     // (if it had requests, the count was already decremented when requests were added)
@@ -295,6 +352,8 @@ export class ActivePiece {
       this._unrequestedCount--
     }
 
+    if (this.streamingHash) this.advanceStreamingHash()
+
     return true
   }
 
@@ -327,16 +386,115 @@ export class ActivePiece {
     this._lastActivity = Date.now()
 
     // Clear requests for this block - it's been fulfilled
-    this.blockRequests.delete(blockIndex)
+    this.dropRequests(blockIndex)
 
     // Phase 7: Decrement unrequested count if block was unrequested
     if (hadNoRequests) {
       this._unrequestedCount--
     }
 
+    if (this.streamingHash) this.advanceStreamingHash()
+
     return true
   }
 
+  /**
+   * Record a block the I/O layer already wrote to disk (direct-to-disk receive).
+   * The buffer is left untouched for this block.
+   * Returns true if this was a new block, false if duplicate.
+   */
+  addBlockWritten(blockIndex: number, peerId: string): boolean {
+    if (this.blockReceived[blockIndex]) {
+      return false // Duplicate
+    }
+
+    const hadNoRequests =
+      !this.blockRequests.has(blockIndex) || this.blockRequests.get(blockIndex)!.length === 0
+
+    if (!this.blockOnDisk) {
+      this.blockOnDisk = new Array<boolean>(this.blocksNeeded).fill(false)
+    }
+    this.blockOnDisk[blockIndex] = true
+    this._directBlocks++
+    this.blockReceived[blockIndex] = true
+    this._blocksReceivedCount++
+    this.blockSenders.set(blockIndex, peerId)
+    this._lastActivity = Date.now()
+
+    this.dropRequests(blockIndex)
+
+    if (hadNoRequests) {
+      this._unrequestedCount--
+    }
+
+    // The buffer no longer holds the whole piece, so a streamed digest is moot
+    this.streamingHash?.abort()
+    this.streamingHash = null
+
+    return true
+  }
+
+  /**
+   * Number of blocks written to disk by the I/O layer.
+   */
+  get directBlocks(): number {
+    return this._directBlocks
+  }
+
+  /**
+   * Whether a block was written to disk by the I/O layer (not in the buffer).
+   */
+  isBlockOnDisk(blockIndex: number): boolean {
+    return this.blockOnDisk?.[blockIndex] ?? false
+  }
+
+  // --- Streaming Hash ---
+
+  get hasStreamingHash(): boolean {
+    return this.streamingHash !== null
+  }
+
+  /**
+   * Attach an incremental hash. Blocks already received in order are fed
+   * immediately; later blocks are fed as the contiguous prefix grows.
+   */
+  attachStreamingHash(hash: IIncrementalHash): void {
+    this.streamingHash?.abort()
+    if (this._directBlocks > 0) {
+      // Some blocks are only on disk - the buffer can't be hashed
+      hash.abort()
+      this.streamingHash = null
+      return
+    }
+    this.streamingHash = hash
+    this.hashedBlocks = 0
+    this.advanceStreamingHash()
+  }
+
+  /**
+   * Detach the streaming hash and return its digest.
+   * Returns null if no hash is attached or not every block has been fed.
+   */
+  takeStreamingDigest(): Promise<Uint8Array> | null {
+    const hash = this.streamingHash
+    if (!hash) return null
+    this.streamingHash = null
+    if (this.hashedBlocks !== this.blocksNeeded) {
+      hash.abort()
+      return null
+    }
+    return hash.digest()
+  }
+
+  private advanceStreamingHash(): void {
+    while (this.hashedBlocks < this.blocksNeeded && this.blockReceived[this.hashedBlocks]) {
+      const start = this.hashedBlocks * BLOCK_SIZE
+      const end = Math.min(start + BLOCK_SIZE, this.length)
+      this.streamingHash!.update(this.buffer.subarray(start, end))
+      this.hashedBlocks++
+    }
+  }
+
   // --- Phase 5: Piece Health Management ---
 
   /**
@@ -400,6 +558,7 @@ export class ActivePiece {
 
     const idx = requests.findIndex((r) => r.peerId === peerId)
     if (idx !== -1) {
+      if (requests.length > 1) this._duplicateRequests--
       requests.splice(idx, 1)
       if (requests.length === 0) {
         this.blockRequests.delete(blockIndex)
@@ -429,6 +588,7 @@ export class ActivePiece {
       const filtered = requests.filter((r) => r.peerId !== peerId)
       if (filtered.length !== requests.length) {
         cleared += requests.length - filtered.length
+        this._duplicateRequests -= duplicates(requests.length) - duplicates(filtered.length)
         if (filtered.length === 0) {
           this.blockRequests.delete(blockIndex)
           // Phase 7: Block becomes unrequested again (if not received)
@@ -461,6 +621,7 @@ export class ActivePiece {
           remaining.push(req)
         }
       }
+      this._duplicateRequests -= duplicates(requests.length) - duplicates(remaining.length)
       if (remaining.length === 0) {
         this.blockRequests.delete(blockIndex)
         // Phase 7: Block becomes unrequested again (if not received)
@@ -501,9 +662,15 @@ export class ActivePiece {
 
   /**
    * Get blocks needed from a specific peer in endgame mode.
-   * Returns blocks this peer hasn't requested yet, even if other peers have.
+   * Returns blocks this peer hasn't requested yet, even if other peers have;
+   * blocks other peers have requested are included only if `shouldDuplicate`
+   * (when given) accepts their outstanding requests.
    */
-  getNeededBlocksEndgame(peerId: string, maxBlocks: number = Infinity): BlockInfo[] {
+  getNeededBlocksEndgame(
+    peerId: string,
+    maxBlocks: number = Infinity,
+    shouldDuplicate?: (requests: readonly RequestInfo[]) => boolean,
+  ): BlockInfo[] {
     const needed: BlockInfo[] = []
 
     for (let i = 0; i < this.blocksNeeded && needed.length < maxBlocks; i++) {
@@ -512,7 +679,10 @@ export class ActivePiece {
 
       // In endgame: skip only if THIS PEER already requested it
       const requests = this.blockRequests.get(i)
-      if (requests?.some((r) => r.peerId === peerId)) continue
+      if (requests && requests.length > 0) {
+        if (requests.some((r) => r.peerId === peerId)) continue
+        if (shouldDuplicate && !shouldDuplicate(requests)) continue
+      }
 
       const begin = i * BLOCK_SIZE
       const length = Math.min(BLOCK_SIZE, this.length - begin)
@@ -522,6 +692,16 @@ export class ActivePiece {
     return needed
   }
 
+  /**
+   * Remove every request for a block (it has been received).
+   */
+  private dropRequests(blockIndex: number): void {
+    const requests = this.blockRequests.get(blockIndex)
+    if (!requests) return
+    this._duplicateRequests -= duplicates(requests.length)
+    this.blockRequests.delete(blockIndex)
+  }
+
   /**
    * Get peer IDs that have outstanding requests for a block (excluding one peer).
    * Used in endgame to send CANCEL messages when a block arrives.
@@ -570,12 +750,19 @@ export class ActivePiece {
     this.blockReceived.fill(false)
     this._blocksReceivedCount = 0
     this.blockRequests.clear()
+    this._duplicateRequests = 0
     this.blockSenders.clear()
     // Phase 4: Reset ownership tracking
     this._exclusivePeer = null
     this._activatedAt = Date.now()
     // Phase 7: Reset unrequested count - all blocks become unrequested again
     this._unrequestedCount = this.blocksNeeded
+    // Discard any partial digest - blocks will be re-downloaded
+    this.streamingHash?.abort()
+    this.streamingHash = null
+    this.hashedBlocks = 0
+    this.blockOnDisk = null
+    this._directBlocks = 0
     // Note: buffer is NOT cleared - for pooling, the caller can reuse it
   }
 }
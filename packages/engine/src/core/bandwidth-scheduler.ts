@@ -0,0 +1,386 @@
+/**
+ * Hierarchical token-bucket bandwidth scheduler.
+ *
+ * Classes form a tree (global → torrent → peer). The topmost class with a
+ * rate limit is the source: it refills continuously from the clock (no tick
+ * alignment) and hands fresh tokens to its active children in proportion to
+ * their weights, and they to theirs. Handing out is lazy: each class keeps
+ * a running "tokens per unit of weight" total, and a child collects its
+ * share when it next consumes, so consuming costs O(depth) no matter how
+ * many siblings there are.
+ *
+ * A class consumes from its own share first and then borrows spare tokens
+ * from its ancestors. Spare tokens are what a class received while none of
+ * its children were active, plus whatever overflowed a child's burst
+ * capacity, so bandwidth an idle or slow class doesn't use flows to its busy
+ * siblings. Limits below the source are ceilings: separate buckets that cap
+ * a class (e.g. a per-torrent cap) whatever its share would allow.
+ *
+ * Classes that haven't asked for bandwidth in IDLE_MS (and aren't waiting
+ * for tokens) stop counting towards their parent's active weight and give
+ * their tokens back as spare.
+ */
+
+/** A class stops receiving a share after this long without demand */
+const IDLE_MS = 500
+
+/** Default burst: how much unused share a class may bank */
+export const DEFAULT_BURST_MS = 500
+
+/** Minimum burst, so a full block always fits even at very low rates */
+const MIN_BURST_BYTES = 32 * 1024
+
+export interface BandwidthClassOptions {
+  /** Share of the parent's bandwidth relative to active siblings (default 1) */
+  weight?: number
+  /** Rate limit in bytes/sec (0 = none) */
+  rateLimit?: number
+}
+
+export class BandwidthClass {
+  readonly children = new Set<BandwidthClass>()
+
+  private _weight: number
+  private _rateLimit: number
+  private removed = false
+
+  // Share accounting
+  /** Own share (leaf) or spare tokens (class with active children) */
+  private tokens = 0
+  /** Running total of tokens handed out per unit of active child weight */
+  private creditPerWeight = 0
+  private activeWeight = 0
+  /** Parent's creditPerWeight when this class last collected its share */
+  private lastCredit = 0
+  /** Burst capacity for the class's current rate share */
+  private capacity = MIN_BURST_BYTES
+  private active = false
+  private lastDemand = 0
+  private lastSweep = 0
+  /** Last refill time while this class is the source */
+  private lastRefill = -1
+
+  // Ceiling bucket, used while the class is limited below the source
+  private ceilTokens = 0
+  private lastCeilRefill = -1
+
+  constructor(
+    readonly scheduler: BandwidthScheduler,
+    readonly parent: BandwidthClass | null,
+    options: BandwidthClassOptions = {},
+  ) {
+    this._weight = Math.max(options.weight ?? 1, Number.MIN_VALUE)
+    this._rateLimit = options.rateLimit ?? 0
+    parent?.children.add(this)
+  }
+
+  get weight(): number {
+    return this._weight
+  }
+
+  get rateLimit(): number {
+    return this._rateLimit
+  }
+
+  /** Refill rate of a TokenBucket-like view: this class's own limit */
+  get refillRate(): number {
+    return this._rateLimit
+  }
+
+  /**
+   * Tightest rate limit of this class and its ancestors (0 = unlimited).
+   */
+  get effectiveLimit(): number {
+    let limit = 0
+    for (let c: BandwidthClass | null = this; c; c = c.parent) {
+      if (c._rateLimit > 0 && (limit === 0 || c._rateLimit < limit)) limit = c._rateLimit
+    }
+    return limit
+  }
+
+  /**
+   * Whether this class or any ancestor has a rate limit.
+   */
+  get isLimited(): boolean {
+    for (let c: BandwidthClass | null = this; c; c = c.parent) {
+      if (c._rateLimit > 0) return true
+    }
+    return false
+  }
+
+  /**
+   * Create a child class.
+   */
+  createChild(options: BandwidthClassOptions = {}): BandwidthClass {
+    if (this.removed) throw new Error('Bandwidth class was removed')
+    return new BandwidthClass(this.scheduler, this, options)
+  }
+
+  /**
+   * Detach this class (and its children) from the tree. Unused tokens go
+   * back to the parent.
+   */
+  remove(): void {
+    if (this.removed || !this.parent) return
+    const path = this.pathFromSource()
+    if (path) this.sync(path, this.scheduler.now())
+    this.deactivate()
+    this.parent.children.delete(this)
+    this.removed = true
+  }
+
+  /**
+   * Change the rate limit (0 = none). Tokens are not reset, so a class
+   * that becomes the source starts empty, like TokenBucket.setLimit.
+   */
+  setLimit(bytesPerSec: number): void {
+    if (bytesPerSec === this._rateLimit) return
+    this._rateLimit = Math.max(0, bytesPerSec)
+    this.lastRefill = -1
+    this.lastCeilRefill = -1
+    this.ceilTokens = 0
+  }
+
+  /**
+   * Change the weight. Takes effect for tokens handed out from now on.
+   */
+  setWeight(weight: number): void {
+    weight = Math.max(weight, Number.MIN_VALUE)
+    if (this.active && this.parent) {
+      this.parent.activeWeight += weight - this._weight
+    }
+    this._weight = weight
+  }
+
+  /**
+   * Try to consume bandwidth. Returns true if successful.
+   * If neither this class nor an ancestor is limited, always returns true.
+   */
+  tryConsume(bytes: number): boolean {
+    const path = this.pathFromSource()
+    if (!path) return true
+
+    const now = this.scheduler.now()
+    this.sync(path, now)
+
+    for (let i = 1; i < path.length; i++) {
+      const c = path[i]
+      if (c._rateLimit > 0 && c.refillCeiling(now) < bytes) return false
+    }
+
+    let available = 0
+    for (const c of path) available += c.tokens
+    if (available < bytes) return false
+
+    // Own share first, then borrow from the nearest ancestor upwards
+    let remaining = bytes
+    for (let i = path.length - 1; i >= 0 && remaining > 0; i--) {
+      const take = Math.min(path[i].tokens, remaining)
+      path[i].tokens -= take
+      remaining -= take
+    }
+    for (let i = 1; i < path.length; i++) {
+      if (path[i]._rateLimit > 0) path[i].ceilTokens -= bytes
+    }
+    return true
+  }
+
+  /**
+   * How long until `bytes` can be consumed (milliseconds), assuming this
+   * class's current share of the source's rate. Returns 0 if available now
+   * or unlimited.
+   */
+  msUntilAvailable(bytes: number): number {
+    const path = this.pathFromSource()
+    if (!path) return 0
+
+    const now = this.scheduler.now()
+    const rate = this.sync(path, now)
+
+    let waitMs = 0
+    for (let i = 1; i < path.length; i++) {
+      const c = path[i]
+      if (c._rateLimit > 0) {
+        const deficit = bytes - c.refillCeiling(now)
+        if (deficit > 0) waitMs = Math.max(waitMs, (deficit / c._rateLimit) * 1000)
+      }
+    }
+
+    let available = 0
+    for (const c of path) available += c.tokens
+    if (available < bytes && rate > 0) {
+      waitMs = Math.max(waitMs, ((bytes - available) / rate) * 1000)
+    }
+    // A class waiting for tokens keeps its share until the wait is over
+    for (let i = 1; i < path.length; i++) {
+      path[i].lastDemand = Math.max(path[i].lastDemand, now + waitMs)
+    }
+    return Math.ceil(waitMs)
+  }
+
+  // === Private methods ===
+
+  /**
+   * Classes from the source down to this one, or null if unlimited.
+   */
+  private pathFromSource(): BandwidthClass[] | null {
+    const path: BandwidthClass[] = []
+    let sourceIndex = -1
+    for (let c: BandwidthClass | null = this; c; c = c.parent) {
+      path.push(c)
+      if (c._rateLimit > 0) sourceIndex = path.length - 1
+    }
+    if (sourceIndex < 0) return null
+    path.length = sourceIndex + 1
+    return path.reverse()
+  }
+
+  /**
+   * Refill the source, activate the path and collect each class's share.
+   *
+   * @returns This class's current rate share in bytes/sec
+   */
+  private sync(path: BandwidthClass[], now: number): number {
+    const source = path[0]
+    let rate = source._rateLimit
+    source.capacity = burstCapacity(rate)
+    source.refillSource(now)
+
+    for (let i = 1; i < path.length; i++) {
+      const parent = path[i - 1]
+      const c = path[i]
+      const wasActive = c.active
+      if (!wasActive) {
+        c.active = true
+        c.lastCredit = parent.creditPerWeight
+        parent.activeWeight += c._weight
+      }
+      rate = (rate * c._weight) / parent.activeWeight
+      if (c._rateLimit > 0) rate = Math.min(rate, c._rateLimit)
+      c.capacity = burstCapacity(rate)
+      if (wasActive) c.collect(parent)
+      c.lastDemand = Math.max(c.lastDemand, now)
+      parent.sweepIdle(now)
+    }
+    return rate
+  }
+
+  /**
+   * Add tokens from the clock while this class is the source.
+   */
+  private refillSource(now: number): void {
+    if (this.lastRefill >= 0 && now > this.lastRefill) {
+      this.distribute(((now - this.lastRefill) / 1000) * this._rateLimit)
+    }
+    if (this.lastRefill < 0 || now > this.lastRefill) this.lastRefill = now
+  }
+
+  /**
+   * Collect this class's share of what the parent handed out since the
+   * last collection.
+   */
+  private collect(parent: BandwidthClass): void {
+    const gain = (parent.creditPerWeight - this.lastCredit) * this._weight
+    this.lastCredit = parent.creditPerWeight
+    if (gain > 0) this.distribute(gain)
+  }
+
+  /**
+   * Hand tokens to active children, or keep them as spare.
+   */
+  private distribute(amount: number): void {
+    if (this.activeWeight > 0) {
+      this.creditPerWeight += amount / this.activeWeight
+    } else {
+      this.addSpare(amount)
+    }
+  }
+
+  /**
+   * Keep tokens up to the burst capacity; overflow goes to the parent's
+   * spare. The source discards overflow, like a full TokenBucket.
+   */
+  private addSpare(amount: number): void {
+    this.tokens += amount
+    if (this.tokens <= this.capacity) return
+    const overflow = this.tokens - this.capacity
+    this.tokens = this.capacity
+    if (this.active && this.parent) this.parent.addSpare(overflow)
+  }
+
+  /**
+   * Deactivate children that haven't asked for bandwidth in IDLE_MS.
+   */
+  private sweepIdle(now: number): void {
+    if (now - this.lastSweep < IDLE_MS) return
+    this.lastSweep = now
+    for (const child of this.children) {
+      if (child.active && now - child.lastDemand >= IDLE_MS) {
+        child.deactivate()
+      }
+    }
+  }
+
+  /**
+   * Stop taking a share: collect what was handed out so far and give all
+   * tokens back to the parent as spare, and the same for active descendants.
+   */
+  private deactivate(): void {
+    if (!this.active || !this.parent) return
+    this.collect(this.parent)
+    for (const child of this.children) child.deactivate()
+    this.active = false
+    this.parent.activeWeight = Math.max(0, this.parent.activeWeight - this._weight)
+    const tokens = this.tokens
+    this.tokens = 0
+    this.parent.addSpare(tokens)
+  }
+
+  /**
+   * Refill the ceiling bucket and return its tokens.
+   */
+  private refillCeiling(now: number): number {
+    if (this.lastCeilRefill >= 0 && now > this.lastCeilRefill) {
+      const added = ((now - this.lastCeilRefill) / 1000) * this._rateLimit
+      this.ceilTokens = Math.min(burstCapacity(this._rateLimit), this.ceilTokens + added)
+    }
+    if (this.lastCeilRefill < 0 || now > this.lastCeilRefill) this.lastCeilRefill = now
+    return this.ceilTokens
+  }
+}
+
+function burstCapacity(rate: number): number {
+  return Math.max((rate * DEFAULT_BURST_MS) / 1000, MIN_BURST_BYTES)
+}
+
+/**
+ * Owns the root class and the clock for one direction of traffic.
+ */
+export class BandwidthScheduler {
+  readonly root: BandwidthClass
+
+  /**
+   * @param rateLimit - Global limit in bytes/sec (0 = unlimited)
+   * @param now - Clock in milliseconds; fractional values refine refill
+   */
+  constructor(
+    rateLimit: number = 0,
+    readonly now: () => number = Date.now,
+  ) {
+    this.root = new BandwidthClass(this, null, { rateLimit })
+  }
+
+  /**
+   * Set the global limit (0 = unlimited).
+   */
+  setLimit(bytesPerSec: number): void {
+    this.root.setLimit(bytesPerSec)
+  }
+
+  /**
+   * Create a class under the root (e.g. for a torrent).
+   */
+  createClass(options: BandwidthClassOptions = {}): BandwidthClass {
+    return this.root.createChild(options)
+  }
+}
@@ -3,9 +3,10 @@ import {
   RrdTierConfig,
   RrdSample,
   RrdSamplesResult,
+  RrdSeries,
   DEFAULT_RRD_TIERS,
 } from '../utils/rrd-history'
-import { TokenBucket } from '../utils/token-bucket'
+import { BandwidthScheduler } from './bandwidth-scheduler'
 
 /**
  * Traffic category for bandwidth tracking.
@@ -44,9 +45,9 @@ export class BandwidthTracker {
   public readonly download: RrdHistory
   public readonly upload: RrdHistory
 
-  // Rate limiting stays global
-  public readonly downloadBucket: TokenBucket
-  public readonly uploadBucket: TokenBucket
+  // Global rate limits, shared between torrents and peers by the schedulers
+  public readonly downloadScheduler: BandwidthScheduler
+  public readonly uploadScheduler: BandwidthScheduler
 
   constructor(config: BandwidthTrackerConfig = {}) {
     const tiers = config.tiers ?? DEFAULT_RRD_TIERS
@@ -63,8 +64,8 @@ export class BandwidthTracker {
     this.download = this.downloadByCategory.get('peer:protocol')!
     this.upload = this.uploadByCategory.get('peer:protocol')!
 
-    this.downloadBucket = new TokenBucket(0) // unlimited by default
-    this.uploadBucket = new TokenBucket(0)
+    this.downloadScheduler = new BandwidthScheduler(0) // unlimited by default
+    this.uploadScheduler = new BandwidthScheduler(0)
   }
 
   /**
@@ -199,6 +200,21 @@ export class BandwidthTracker {
     return map.get(category)?.getSamples(fromTime, toTime, maxPoints) ?? []
   }
 
+  /**
+   * Get a single category's history as a contiguous series (see
+   * RrdHistory.getSeries), for bulk export.
+   */
+  getCategorySeries(
+    direction: 'up' | 'down',
+    category: TrafficCategory,
+    fromTime: number,
+    toTime: number,
+    resolutionMs?: number,
+  ): RrdSeries {
+    const map = direction === 'down' ? this.downloadByCategory : this.uploadByCategory
+    return map.get(category)!.getSeries(fromTime, toTime, resolutionMs)
+  }
+
   /**
    * Get current rate for specified categories.
    */
@@ -223,6 +239,16 @@ export class BandwidthTracker {
     return total
   }
 
+  /**
+   * Bytes held by the per-category history buffers.
+   */
+  get memoryBytes(): number {
+    let total = 0
+    for (const history of this.downloadByCategory.values()) total += history.memoryBytes
+    for (const history of this.uploadByCategory.values()) total += history.memoryBytes
+    return total
+  }
+
   /**
    * Get current rate for a single category.
    */
@@ -282,7 +308,7 @@ export class BandwidthTracker {
    * @param bytesPerSec - Limit in bytes/sec (0 = unlimited)
    */
   setDownloadLimit(bytesPerSec: number): void {
-    this.downloadBucket.setLimit(bytesPerSec)
+    this.downloadScheduler.setLimit(bytesPerSec)
   }
 
   /**
@@ -290,21 +316,21 @@ export class BandwidthTracker {
    * @param bytesPerSec - Limit in bytes/sec (0 = unlimited)
    */
   setUploadLimit(bytesPerSec: number): void {
-    this.uploadBucket.setLimit(bytesPerSec)
+    this.uploadScheduler.setLimit(bytesPerSec)
   }
 
   /**
    * Get current download limit (0 = unlimited).
    */
   getDownloadLimit(): number {
-    return this.downloadBucket.refillRate
+    return this.downloadScheduler.root.rateLimit
   }
 
   /**
    * Get current upload limit (0 = unlimited).
    */
   getUploadLimit(): number {
-    return this.uploadBucket.refillRate
+    return this.uploadScheduler.root.rateLimit
   }
 
   /**
@@ -2,7 +2,7 @@ import { EventEmitter } from '../utils/event-emitter'
 import { ISocketFactory } from '../interfaces/socket'
 import { IFileSystem } from '../interfaces/filesystem'
 import { randomBytes } from '../utils/hash'
-import { fromString, concat, toHex, fromBase64 } from '../utils/buffer'
+import { fromString, concat, toHex, fromBase64, compare } from '../utils/buffer'
 import { VERSION, versionToAzureusCode } from '../version'
 import { TokenBucket } from '../utils/token-bucket'
 import { DHTNode, saveDHTState, loadDHTState, hexToNodeId } from '../dht'
@@ -31,14 +31,19 @@ import type { ConfigHub } from '../config/config-hub'
 import { MemoryConfigHub } from '../config/memory-config-hub'
 import type { ConfigType } from '../config/config-schema'
 import { SessionPersistence } from './session-persistence'
-import { Torrent } from './torrent'
+import { MetadataCache } from './metadata-cache'
+import { Torrent, TorrentMemoryUsage } from './torrent'
 import { PeerConnection } from './peer-connection'
 import { TorrentUserState } from './torrent-state'
 import { BandwidthTracker } from './bandwidth-tracker'
+import { ConnectPipeline } from './connect-pipeline'
 
 // New imports for refactored code
 import { parseTorrentInput } from './torrent-factory'
 import { initializeTorrentMetadata } from './torrent-initializer'
+import { TickScheduler } from './tick-scheduler'
+import { PeerCounters } from './peer-counters'
+import { SlabAllocator } from './slab-allocator'
 
 // Maximum piece size supported by the io-daemon (must match DefaultBodyLimit in io-daemon)
 export const MAX_PIECE_SIZE = 32 * 1024 * 1024 // 32MB
@@ -46,6 +51,26 @@ export const MAX_PIECE_SIZE = 32 * 1024 * 1024 // 32MB
 // UPnP status type
 export type UPnPStatus = 'disabled' | 'discovering' | 'mapped' | 'unavailable' | 'failed'
 
+/**
+ * Estimated bytes held per subsystem (see BtEngine.getMemoryReport).
+ */
+export interface EngineMemoryReport {
+  subsystems: TorrentMemoryUsage & {
+    /** Routing table and announced-peer store */
+    dht: number
+    /** Retained log entries */
+    logs: number
+    /** Per-category bandwidth history buffers */
+    bandwidthHistory: number
+    /** Idle buffers in the shared buffer pool */
+    bufferPool: number
+  }
+  /** Sum of the subsystems */
+  total: number
+  /** Per-torrent breakdown by info hash */
+  torrents: Record<string, TorrentMemoryUsage>
+}
+
 /**
  * Engine-wide tick result aggregated across all torrents.
  * Returned from tick() for Kotlin to log/monitor.
@@ -56,7 +81,7 @@ export interface EngineTickResult {
   blocksSent: number
   elapsedMs: number
 
-  // Current state snapshot
+  // Current state snapshot (torrents ticked this tick)
   activePieces: number
   connectedPeers: number
   bufferedBytes: number
@@ -68,6 +93,12 @@ export interface EngineTickResult {
   // Backpressure queue depths (native only)
   pendingHashes: number
   pendingDiskWrites: number
+
+  // Scheduling (see TickScheduler)
+  torrentsTicked: number
+  torrentsDeferred: number // due but left for the next tick when the budget ran out
+  overruns: number // torrents that used more than their slice of the budget
+  overrunMs: number
 }
 
 // === Unified Daemon Operation Queue Types ===
@@ -165,6 +196,14 @@ export interface BtEngineOptions {
    */
   autoDrainBuffers?: boolean
 
+  /**
+   * Let the I/O layer write and verify received blocks itself (direct-to-disk
+   * receive). Only used when the socket factory supports disk layouts (desktop
+   * io-daemon) and a torrent downloads every piece straight to its files.
+   * Default: false
+   */
+  directToDisk?: boolean
+
   /**
    * Callback invoked at end of each engine tick.
    * Used by native adapters to flush batched writes in a single FFI call.
@@ -193,14 +232,49 @@ export interface BtEngineOptions {
    * and can measure timing precisely, including job pump time.
    */
   tickMode?: 'js' | 'host'
+
+  /**
+   * Time per engine tick that torrent ticks may use before the remaining
+   * torrents are deferred to the next tick.
+   * Default: 80ms (of the 100ms tick)
+   */
+  tickBudgetMs?: number
+
+  /**
+   * Idle and complete torrents tick once every N engine ticks unless their
+   * peers have I/O pending.
+   * Default: 5
+   */
+  idleTickInterval?: number
+
+  /**
+   * Byte budget for idle buffers in the engine-wide buffer pool shared by
+   * all torrents (piece buffers, upload reads).
+   * Default: 64MB
+   */
+  bufferPoolBytes?: number
+
+  /**
+   * Recompute the incrementally maintained peer counters every tick and log
+   * any mismatch. Costs a pass over every peer; for debug builds and tests.
+   * Default: false
+   */
+  debugInvariants?: boolean
 }
 
 export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableComponent {
   public readonly storageRootManager: StorageRootManager
   public readonly socketFactory: ISocketFactory
   public readonly sessionPersistence: SessionPersistence
+  /** Info dicts fetched from peers, kept across torrent removal for magnet re-adds */
+  public readonly metadataCache: MetadataCache
   public readonly hasher: IHasher
   public readonly bandwidthTracker = new BandwidthTracker()
+
+  /** Outgoing connects across all torrents: half-open limit, timeouts, metrics */
+  public readonly connectPipeline = new ConnectPipeline()
+  /** Buffer pool shared by all torrents; trimmed when backpressure kicks in */
+  public readonly bufferAllocator: SlabAllocator
   public torrents: Torrent[] = []
   public port: number
   public peerId: Uint8Array
@@ -257,6 +331,9 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
    */
   public autoDrainBuffers: boolean = false
 
+  /** Opt-in direct-to-disk receive (see BtEngineOptions.directToDisk) */
+  public readonly directToDisk: boolean
+
   // === Backpressure (Phase 2) ===
   /** High water mark for total buffered bytes across all peers - activate backpressure (16MB) */
   private static readonly BACKPRESSURE_HIGH_WATER = 16 * 1024 * 1024
@@ -264,6 +341,10 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
   private static readonly BACKPRESSURE_LOW_WATER = 4 * 1024 * 1024
   /** Whether backpressure is currently active (reads paused on native side) */
   private backpressureActive: boolean = false
+  /** Running sums over all torrents' connected peers, fed by torrent counters */
+  readonly peerCounters = new PeerCounters()
+  /** Verify peerCounters against a full recount every tick */
+  private readonly debugInvariants: boolean
 
   // === Incoming Connection Protection ===
   /** Timeout for incoming connections to complete BT handshake (ms) */
@@ -305,6 +386,9 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
    */
   private _tickMode: 'js' | 'host' = 'js'
 
+  /** Per-torrent time budgets and round-robin order for doTick() */
+  private tickScheduler: TickScheduler<Torrent>
+
   // ILoggableComponent implementation
   static logName = 'client'
   getLogName(): string {
@@ -337,6 +421,7 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     }
     const sessionStore = options.sessionStore ?? new MemorySessionStore()
     this.sessionPersistence = new SessionPersistence(sessionStore, this)
+    this.metadataCache = new MetadataCache(sessionStore)
     this.hasher = options.hasher ?? new SubtleCryptoHasher()
     this.port = options.port ?? 6881 // Use nullish coalescing to allow port 0
 
@@ -377,6 +462,11 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     this._dhtEnabled = this.config.dhtEnabled.get()
     this.usePassthroughDiskQueue = options.usePassthroughDiskQueue ?? false
     this._tickMode = options.tickMode ?? 'js'
+    this.debugInvariants = options.debugInvariants ?? false
+    this.tickScheduler = new TickScheduler({
+      budgetMs: options.tickBudgetMs,
+      idleTickInterval: options.idleTickInterval,
+    })
 
     // Set up bandwidth limits from config (0 = unlimited)
     const downloadLimit = this.config.downloadSpeedUnlimited.get()
@@ -398,6 +488,8 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
 
     this._skipDHTBootstrap = options._skipDHTBootstrap ?? false
     this.autoDrainBuffers = options.autoDrainBuffers ?? false
+    this.directToDisk = options.directToDisk ?? false
+    this.bufferAllocator = new SlabAllocator(options.bufferPoolBytes)
 
     // Initialize logger for BtEngine itself
     this.logger = this.scopedLoggerFor(this)
@@ -421,7 +513,7 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     return withScopeAndFiltering(component, (level, ctx) => this.filterFn(level, ctx), {
       onLog: (entry) => {
         // Add to global store (once)
-        globalLogStore.add(entry.level, entry.message, entry.args)
+        globalLogStore.addEntry(entry)
         // Also call user-provided callback if any
         this.onLogCallback?.(entry)
       },
@@ -725,6 +817,9 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
           throw e
         }
       }
+    } else if (input.magnetLink && options.source !== 'restore') {
+      // Magnet fast path: skip the BEP 9 fetch if we've seen this info dict before
+      await this.loadCachedMetadata(torrent, input.infoHashStr)
     }
 
     // Set up metadata event handler for magnet links
@@ -734,6 +829,7 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
 
         // Save infodict for future restores
         await this.sessionPersistence.saveInfoDict(input.infoHashStr, infoBuffer)
+        await this.metadataCache.put(input.infoHashStr, infoBuffer)
 
         torrent.recheckPeers()
         torrent.emit('test:ready')
@@ -774,6 +870,35 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     return { torrent, isDuplicate: false }
   }
 
+  /**
+   * Initialize a magnet torrent from the metadata cache, if it has an info
+   * dict that hashes to the torrent's info hash.
+   */
+  private async loadCachedMetadata(torrent: Torrent, infoHashStr: string): Promise<void> {
+    const infoBuffer = await this.metadataCache.get(infoHashStr)
+    if (!infoBuffer) return
+
+    const hash = await this.hasher.sha1(infoBuffer)
+    if (compare(hash, torrent.infoHash) !== 0) {
+      this.logger.warn(`Cached metadata for ${infoHashStr} does not match info hash, discarding`)
+      await this.metadataCache.delete(infoHashStr)
+      return
+    }
+
+    try {
+      await initializeTorrentMetadata(this, torrent, infoBuffer)
+      await this.sessionPersistence.saveInfoDict(infoHashStr, infoBuffer)
+      this.logger.info(`Loaded metadata for ${infoHashStr} from cache`)
+    } catch (e) {
+      if (e instanceof Error && e.name === 'MissingStorageRootError') {
+        torrent.errorMessage = `Download location unavailable. Storage root not found.`
+        this.logger.warn(`Torrent ${infoHashStr} initialized with missing storage`)
+      } else {
+        throw e
+      }
+    }
+  }
+
   async removeTorrent(torrent: Torrent) {
     const index = this.torrents.indexOf(torrent)
     if (index !== -1) {
@@ -958,6 +1083,9 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     }
     this.pendingIncoming.clear()
 
+    // Drop idle pooled buffers
+    this.bufferAllocator.trim()
+
     // Notify ConfigHub that engine is stopping (clears pending restart-required changes)
     if (this.config && 'setEngineRunning' in this.config) {
       ;(this.config as { setEngineRunning: (running: boolean) => void }).setEngineRunning(false)
@@ -968,6 +1096,7 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
 
     // Clear pending operations
     this.pendingOps.clear()
+    this.connectPipeline.timers.clear()
 
     // Clean up UPnP mappings
     await this.disableUPnP()
@@ -1016,6 +1145,10 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     activePieces: number
     connectedPeers: number
     activeTorrents: number
+    /** Time torrents spent in endgame, summed (ms, cumulative) */
+    endgameMs: number
+    /** Payload bytes received for blocks we already had (cumulative) */
+    wastedBytes: number
   } {
     let tickCount = 0
     let tickTotalMs = 0
@@ -1023,6 +1156,8 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     let activePieces = 0
     let connectedPeers = 0
     let activeTorrents = 0
+    let endgameMs = 0
+    let wastedBytes = 0
 
     for (const torrent of this.torrents) {
       const stats = torrent.getTickStats()
@@ -1036,6 +1171,8 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
       if (stats.connectedPeers > 0) {
         activeTorrents++
       }
+      endgameMs += stats.endgameMs
+      wastedBytes += stats.wastedBytes
     }
 
     return {
@@ -1046,9 +1183,41 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
       activePieces,
       connectedPeers,
       activeTorrents,
+      endgameMs,
+      wastedBytes,
     }
   }
 
+  /**
+   * Estimated memory per subsystem. Each component maintains its own
+   * estimate (see `memoryBytes`); torrent subsystems are summed over torrents
+   * and also reported per torrent.
+   */
+  getMemoryReport(): EngineMemoryReport {
+    const subsystems: EngineMemoryReport['subsystems'] = {
+      activePieces: 0,
+      pieceAvailability: 0,
+      swarm: 0,
+      peerBuffers: 0,
+      dht: this._dhtNode?.memoryBytes() ?? 0,
+      logs: globalLogStore.memoryBytes,
+      bandwidthHistory: this.bandwidthTracker.memoryBytes,
+      bufferPool: this.bufferAllocator.memoryBytes,
+    }
+    const torrents: Record<string, TorrentMemoryUsage> = {}
+    for (const torrent of this.torrents) {
+      const usage = torrent.getMemoryUsage()
+      torrents[torrent.infoHashStr] = usage
+      subsystems.activePieces += usage.activePieces
+      subsystems.pieceAvailability += usage.pieceAvailability
+      subsystems.swarm += usage.swarm
+      subsystems.peerBuffers += usage.peerBuffers
+    }
+    let total = 0
+    for (const bytes of Object.values(subsystems)) total += bytes
+    return { subsystems, total, torrents }
+  }
+
   // === ConfigHub Subscription Wiring ===
 
   /**
@@ -1362,13 +1531,15 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     // from 60+ per tick to 1-2. Only available on native (Android) - no-op on extension.
     this.socketFactory.flushCallbacks?.()
 
+    if (this.debugInvariants) this.checkPeerCounters()
+
     // 0. Check backpressure before processing (Phase 2)
     this.checkBackpressure()
 
     // 1. Connection slot allocation (existing drainOpQueue logic)
     this.drainOpQueue()
 
-    // 2. Torrent data processing - tick all network-active torrents
+    // 2. Torrent data processing - tick due torrents within the time budget
     // Aggregate results across all torrents
     let blocksRecv = 0
     let blocksSent = 0
@@ -1378,20 +1549,15 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
     let pipelineFilled = 0
     let pipelineMax = 0
 
-    for (const torrent of this.torrents) {
-      if (torrent.isActive) {
-        const result = torrent.tick()
-        if (result) {
-          blocksRecv += result.blocksRecv
-          blocksSent += result.blocksSent
-          activePieces += result.activePieces
-          connectedPeers += result.connectedPeers
-          bufferedBytes += result.bufferedBytes
-          pipelineFilled += result.pipelineFilled
-          pipelineMax += result.pipelineMax
-        }
-      }
-    }
+    const scheduled = this.tickScheduler.run(this.torrents, (result) => {
+      blocksRecv += result.blocksRecv
+      blocksSent += result.blocksSent
+      activePieces += result.activePieces
+      connectedPeers += result.connectedPeers
+      bufferedBytes += result.bufferedBytes
+      pipelineFilled += result.pipelineFilled
+      pipelineMax += result.pipelineMax
+    })
 
     // 3. End of tick - flush batched operations (e.g., verified writes on native)
     this.onEndOfTickCallback?.()
@@ -1410,22 +1576,31 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
       pipelineMax,
       pendingHashes: 0, // Filled by native controller
       pendingDiskWrites: 0, // Filled by native controller
+      ...scheduled,
     }
   }
 
   /**
-   * Get total buffered bytes across all peer connections.
-   * Used for backpressure detection - when too much data is buffered,
-   * native reads are paused to prevent unbounded memory growth.
+   * Debug invariant: the incrementally maintained peer counters must match a
+   * recount, per torrent and engine-wide.
    */
-  private getTotalBufferedBytes(): number {
-    let total = 0
+  private checkPeerCounters(): void {
+    const total = { bufferedBytes: 0, requestsPending: 0, pipelineDepth: 0, queuedSendBytes: 0 }
+    let peers = 0
     for (const torrent of this.torrents) {
-      for (const peer of torrent.peers) {
-        total += peer.bufferedBytes
+      for (const mismatch of torrent.checkPeerCounters()) {
+        this.logger.error(`INVARIANT VIOLATION: ${torrent.infoHashStr} peer counters ${mismatch}`)
       }
+      const counters = torrent.peerCounters
+      total.bufferedBytes += counters.bufferedBytes
+      total.requestsPending += counters.requestsPending
+      total.pipelineDepth += counters.pipelineDepth
+      total.queuedSendBytes += counters.queuedSendBytes
+      peers += counters.peers
+    }
+    for (const mismatch of this.peerCounters.diff({ ...total, peers })) {
+      this.logger.error(`INVARIANT VIOLATION: engine peer counters ${mismatch}`)
     }
-    return total
   }
 
   /**
@@ -1435,13 +1610,18 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
    * - Release when buffered < LOW_WATER (4MB)
    */
   private checkBackpressure(): void {
-    const buffered = this.getTotalBufferedBytes()
+    // Total buffered bytes across all peer connections: when too much data is
+    // buffered, native reads are paused to prevent unbounded memory growth
+    const buffered = this.peerCounters.bufferedBytes
 
     if (!this.backpressureActive && buffered > BtEngine.BACKPRESSURE_HIGH_WATER) {
       this.backpressureActive = true
       this.socketFactory.setBackpressure?.(true)
+      // Give idle pooled buffers back to GC while memory is tight
+      const trimmed = this.bufferAllocator.trim()
       this.logger.warn(
-        `Backpressure ON: ${(buffered / 1024 / 1024).toFixed(1)}MB buffered across all peers`,
+        `Backpressure ON: ${(buffered / 1024 / 1024).toFixed(1)}MB buffered across all peers` +
+          `, trimmed ${(trimmed / 1024 / 1024).toFixed(1)}MB of pooled buffers`,
       )
     } else if (this.backpressureActive && buffered < BtEngine.BACKPRESSURE_LOW_WATER) {
       this.backpressureActive = false
@@ -1454,18 +1634,32 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
 
   /**
    * Drain operation queue with round-robin fairness.
-   * Grants one connection slot per call, rate limited.
+   * Grants connection slots while the connect pipeline has half-open room,
+   * one per rate limiter token.
    */
   private drainOpQueue(): void {
     // Early exit if no pending ops (avoid any allocations)
     if (this.pendingOps.size === 0) return
 
-    // Check global connection limit
-    if (this.numConnections >= this.maxConnections) return
+    while (this.pendingOps.size > 0) {
+      // Check global connection limit (in-flight connects will become connections)
+      if (this.numConnections + this.connectPipeline.halfOpen >= this.maxConnections) return
+
+      // Check half-open limit
+      if (this.connectPipeline.available <= 0) return
 
-    // Check rate limit
-    if (!this.daemonRateLimiter.tryConsume(1)) return
+      // Check rate limit
+      if (!this.daemonRateLimiter.tryConsume(1)) return
 
+      if (!this.grantConnectionSlot()) return
+    }
+  }
+
+  /**
+   * Grant one connection slot to the next torrent in round-robin order.
+   * @returns false if no torrent could use it
+   */
+  private grantConnectionSlot(): boolean {
     // Get hashes for round-robin iteration
     const hashes = Array.from(this.pendingOps.keys())
     const numTorrents = hashes.length
@@ -1499,12 +1693,13 @@ export class BtEngine extends EventEmitter implements ILoggingEngine, ILoggableC
 
         // Advance round-robin for next call
         this.opDrainIndex = (idx + 1) % numTorrents
-        return
+        return true
       } else {
         // Torrent couldn't use slot, clear its pending ops
         this.pendingOps.delete(hash)
       }
     }
+    return false
   }
 
   /**
@@ -0,0 +1,229 @@
+import { TimerWheel } from '../utils/timer-wheel'
+
+/**
+ * Engine-wide outgoing connect pipeline.
+ *
+ * Caps the number of half-open (in-progress) TCP connects across all
+ * torrents and adapts the cap to what the network shows:
+ *
+ * - Each successful connect that isn't slowed by queueing raises the cap
+ *   by one, so a fresh start ramps up quickly (like TCP slow start).
+ * - When connect latency inflates well past the best recently seen, our
+ *   own link or the io-daemon is queueing: the cap shrinks.
+ * - A timeout among mostly reachable peers is treated the same way. When
+ *   most peers are unreachable a timeout just means a dead peer, and the
+ *   cap keeps growing so live peers are found sooner.
+ *
+ * It also owns the timer wheel that runs every connect timeout, and keeps
+ * the latency and success-rate metrics reported in /engine/status.
+ */
+
+export type ConnectOutcome = 'connected' | 'failed' | 'timeout'
+
+export interface ConnectPipelineConfig {
+  /** Lowest half-open limit */
+  minHalfOpen: number
+  /** Highest half-open limit */
+  maxHalfOpen: number
+  /** Limit before any connects have completed */
+  initialHalfOpen: number
+}
+
+export const DEFAULT_CONNECT_PIPELINE_CONFIG: ConnectPipelineConfig = {
+  minHalfOpen: 4,
+  maxHalfOpen: 64,
+  initialHalfOpen: 8,
+}
+
+export interface ConnectPipelineStats {
+  halfOpen: number
+  halfOpenLimit: number
+  attempts: number
+  connected: number
+  failed: number
+  timedOut: number
+  cancelled: number
+  /** Recent success rate (EWMA over completed attempts, 0-1) */
+  successRate: number
+  /** Connect latency of recent successes (ms) */
+  latencyMs: { avg: number; min: number; p50: number; p90: number }
+}
+
+/** EWMA weight for success rate and latency */
+const EWMA_ALPHA = 0.1
+
+/** Latency above this multiple of the recent minimum counts as queueing */
+const LATENCY_INFLATION = 3
+
+/** Latencies below this never count as queueing (LAN and loopback jitter) */
+const LATENCY_FLOOR_MS = 50
+
+/** Recent successful connect latencies kept for min and percentiles */
+const LATENCY_SAMPLES = 64
+
+/** Multiplicative decrease on congestion */
+const DECREASE_FACTOR = 0.75
+
+/** Success rate above which a timeout is treated as congestion */
+const CONGESTION_SUCCESS_RATE = 0.5
+
+export class ConnectPipeline {
+  /** Timer wheel for all connect timeouts */
+  readonly timers: TimerWheel
+
+  private config: ConnectPipelineConfig
+  private limit: number
+  private _halfOpen = 0
+  private lastDecrease = 0
+
+  // Counters
+  private attempts = 0
+  private connected = 0
+  private failed = 0
+  private timedOut = 0
+  private cancelled = 0
+
+  // Adaptive signals
+  private successRate = 0.5
+  private latencyAvg = 0
+  private readonly latencies = new Float64Array(LATENCY_SAMPLES)
+  private latencyCount = 0
+
+  constructor(
+    config: Partial<ConnectPipelineConfig> = {},
+    private readonly now: () => number = Date.now,
+  ) {
+    this.config = { ...DEFAULT_CONNECT_PIPELINE_CONFIG, ...config }
+    this.limit = this.config.initialHalfOpen
+    this.timers = new TimerWheel(100, 256, now)
+  }
+
+  /** Connects currently in progress */
+  get halfOpen(): number {
+    return this._halfOpen
+  }
+
+  /** Current half-open limit */
+  get halfOpenLimit(): number {
+    return Math.floor(this.limit)
+  }
+
+  /** How many more connects may start now */
+  get available(): number {
+    return Math.max(0, this.halfOpenLimit - this._halfOpen)
+  }
+
+  /**
+   * Record the start of a connect. Callers check `available` first; connects
+   * started regardless (e.g. user-added peers) still count.
+   */
+  begin(): void {
+    this._halfOpen++
+    this.attempts++
+  }
+
+  /**
+   * Record a connect that was abandoned without an outcome (cancelled, or
+   * lost a dual-stack race). Doesn't affect the limit or success rate.
+   */
+  abandon(): void {
+    this._halfOpen = Math.max(0, this._halfOpen - 1)
+    this.cancelled++
+  }
+
+  /**
+   * Record the outcome of a connect and adapt the limit.
+   *
+   * @param latencyMs - Time from start to outcome
+   */
+  complete(outcome: ConnectOutcome, latencyMs: number): void {
+    this._halfOpen = Math.max(0, this._halfOpen - 1)
+    const success = outcome === 'connected' ? 1 : 0
+    this.successRate += EWMA_ALPHA * (success - this.successRate)
+
+    if (outcome === 'connected') {
+      this.connected++
+      this.recordLatency(latencyMs)
+      if (this.latencyAvg > LATENCY_INFLATION * Math.max(this.minLatency(), LATENCY_FLOOR_MS)) {
+        this.decrease()
+      } else {
+        this.limit = Math.min(this.config.maxHalfOpen, this.limit + 1)
+      }
+    } else if (outcome === 'timeout') {
+      this.timedOut++
+      if (this.successRate >= CONGESTION_SUCCESS_RATE) {
+        this.decrease()
+      } else {
+        this.limit = Math.min(this.config.maxHalfOpen, this.limit + 1 / this.limit)
+      }
+    } else {
+      // Refused/unreachable: fails fast and frees its slot, no signal
+      this.failed++
+    }
+  }
+
+  /**
+   * Update limits at runtime. The current limit is clamped to the new range.
+   */
+  updateConfig(config: Partial<ConnectPipelineConfig>): void {
+    this.config = { ...this.config, ...config }
+    this.clampLimit()
+  }
+
+  getStats(): ConnectPipelineStats {
+    const sorted = this.latencies.slice(0, Math.min(this.latencyCount, LATENCY_SAMPLES)).sort()
+    const percentile = (p: number) =>
+      sorted.length > 0 ? sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))] : 0
+    return {
+      halfOpen: this._halfOpen,
+      halfOpenLimit: this.halfOpenLimit,
+      attempts: this.attempts,
+      connected: this.connected,
+      failed: this.failed,
+      timedOut: this.timedOut,
+      cancelled: this.cancelled,
+      successRate: this.successRate,
+      latencyMs: {
+        avg: Math.round(this.latencyAvg),
+        min: Math.round(this.minLatency()),
+        p50: Math.round(percentile(0.5)),
+        p90: Math.round(percentile(0.9)),
+      },
+    }
+  }
+
+  // === Private methods ===
+
+  private recordLatency(latencyMs: number): void {
+    this.latencies[this.latencyCount % LATENCY_SAMPLES] = latencyMs
+    this.latencyCount++
+    this.latencyAvg =
+      this.latencyCount === 1
+        ? latencyMs
+        : this.latencyAvg + EWMA_ALPHA * (latencyMs - this.latencyAvg)
+  }
+
+  private minLatency(): number {
+    const count = Math.min(this.latencyCount, LATENCY_SAMPLES)
+    if (count === 0) return 0
+    let min = Infinity
+    for (let i = 0; i < count; i++) min = Math.min(min, this.latencies[i])
+    return min
+  }
+
+  /**
+   * Shrink the limit, at most once per average connect latency so one
+   * burst of slow connects doesn't collapse it.
+   */
+  private decrease(): void {
+    const now = this.now()
+    if (now - this.lastDecrease < Math.max(this.latencyAvg, 100)) return
+    this.lastDecrease = now
+    this.limit *= DECREASE_FACTOR
+    this.clampLimit()
+  }
+
+  private clampLimit(): void {
+    this.limit = Math.min(this.config.maxHalfOpen, Math.max(this.config.minHalfOpen, this.limit))
+  }
+}
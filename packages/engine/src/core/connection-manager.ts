@@ -4,6 +4,9 @@ import { PeerConnection } from './peer-connection'
 import { ISocketFactory, ITcpSocket } from '../interfaces/socket'
 import type { Logger, ILoggingEngine } from '../logging/logger'
 import { MseSocket, EncryptionPolicy } from '../crypto'
+import { ConnectPipeline } from './connect-pipeline'
+import type { ConnectOutcome } from './connect-pipeline'
+import { toHex } from '../utils/buffer'
 
 // ============================================================================
 // Configuration
@@ -44,6 +47,27 @@ export const DEFAULT_CONNECTION_CONFIG: Omit<ConnectionConfig, 'maxPeersPerTorre
   slowPeerTimeoutMs: 60000, // 60 seconds without data
 }
 
+/** Head start for the first address when racing IPv4 and IPv6 (RFC 8305) */
+const HAPPY_EYEBALLS_DELAY_MS = 250
+
+/** An outgoing connect in progress */
+interface ConnectAttempt {
+  /** Timeout handle in the pipeline's timer wheel */
+  timer: number
+  /** Socket, once created (closed to abort the connect) */
+  socket: ITcpSocket | null
+  startedAt: number
+  /** Outcome already reported to the pipeline */
+  settled: boolean
+}
+
+interface TcpConnectResult {
+  peer: SwarmPeer
+  key: string
+  attempt: ConnectAttempt
+  socket: ITcpSocket
+}
+
 // ============================================================================
 // ConnectionManager
 // ============================================================================
@@ -56,6 +80,9 @@ export const DEFAULT_CONNECTION_CONFIG: Omit<ConnectionConfig, 'maxPeersPerTorre
  * - Managing connection timeouts
  * - Filling available peer slots from swarm
  * - Coordinating with Swarm for state tracking
+ *
+ * Connects go through the engine-wide ConnectPipeline, which limits
+ * half-open connects across torrents and runs all connect timeouts.
  */
 export class ConnectionManager {
   private config: ConnectionConfig
@@ -65,11 +92,11 @@ export class ConnectionManager {
   private engine: ILoggingEngine
   private logger: Logger
 
-  // Connection timeout timers
-  private connectTimers: Map<string, ReturnType<typeof setTimeout>> = new Map()
+  // Engine-wide connect pipeline (half-open limit, timeouts, metrics)
+  private pipeline: ConnectPipeline
 
-  // Pending sockets (for cancellation of in-flight connections)
-  private pendingSockets: Map<string, ITcpSocket> = new Map()
+  // In-flight connects by peer key (for timeouts and cancellation)
+  private connectAttempts: Map<string, ConnectAttempt> = new Map()
 
   // Callbacks for peer setup (provided by Torrent)
   private onPeerConnected?: (key: string, connection: PeerConnection) => void
@@ -88,6 +115,7 @@ export class ConnectionManager {
     logger: Logger,
     config: Pick<ConnectionConfig, 'maxPeersPerTorrent'> &
       Partial<Omit<ConnectionConfig, 'maxPeersPerTorrent'>>,
+    pipeline: ConnectPipeline = new ConnectPipeline(),
   ) {
     this.swarm = swarm
     this.peerSelector = new PeerSelector(swarm)
@@ -95,6 +123,7 @@ export class ConnectionManager {
     this.engine = engine
     this.logger = logger
     this.config = { ...DEFAULT_CONNECTION_CONFIG, ...config }
+    this.pipeline = pipeline
   }
 
   // --- Configuration ---
@@ -161,24 +190,55 @@ export class ConnectionManager {
    * Initiate connection to a specific peer.
    * Sets up timeout and handles success/failure.
    * If encryption is enabled and context is set, performs MSE handshake.
+   *
+   * When the peer is known at an address of the other family too (same
+   * peer ID seen over IPv4 and IPv6), both are raced: the other address
+   * starts after a short head start, or as soon as the first fails.
    */
   async initiateConnection(peer: SwarmPeer): Promise<void> {
+    const alternate = this.findDualStackAlternate(peer)
+    const result = alternate ? await this.raceConnect(peer, alternate) : await this.connectTcp(peer)
+    if (!result) return
+
+    const { key, attempt } = result
+    try {
+      await this.setupConnection(result)
+    } catch (err) {
+      this.failAttempt(key, attempt, err)
+    }
+  }
+
+  /**
+   * Open the TCP connection for one address.
+   * @returns The connected socket, or null if it failed or was cancelled
+   */
+  private async connectTcp(peer: SwarmPeer): Promise<TcpConnectResult | null> {
     const key = peerKey(peer.ip, peer.port)
 
     // Mark connecting in swarm
     this.swarm.markConnecting(key)
 
     // Set internal timeout (more aggressive than io-daemon's 10s)
-    const timer = setTimeout(() => {
-      this.handleConnectionTimeout(key)
-    }, this.config.connectTimeout)
-    this.connectTimers.set(key, timer)
-
-    // Create socket without connecting - allows cancellation
-    const rawSocket = await this.socketFactory.createTcpSocket()
-    this.pendingSockets.set(key, rawSocket)
+    const attempt: ConnectAttempt = {
+      timer: this.pipeline.timers.schedule(this.config.connectTimeout, () => {
+        this.handleConnectionTimeout(key)
+      }),
+      socket: null,
+      startedAt: Date.now(),
+      settled: false,
+    }
+    this.connectAttempts.set(key, attempt)
+    this.pipeline.begin()
 
     try {
+      // Create socket without connecting - allows cancellation
+      const rawSocket = await this.socketFactory.createTcpSocket()
+      attempt.socket = rawSocket
+      if (this.connectAttempts.get(key) !== attempt) {
+        rawSocket.close()
+        return null
+      }
+
       this.logger.debug(`[ConnectionManager] Connecting to ${key}`)
 
       // Connect (can be cancelled by closing socket)
@@ -187,100 +247,198 @@ export class ConnectionManager {
       }
       await rawSocket.connect(peer.port, peer.ip)
 
-      // Check if we were cancelled while awaiting (timer removed by cancelAllPendingConnections)
-      if (!this.connectTimers.has(key)) {
+      // Check if we were cancelled while awaiting (attempt removed by timeout or cancel)
+      if (this.connectAttempts.get(key) !== attempt) {
         this.logger.debug(
           `[ConnectionManager] Connection to ${key} completed but was cancelled, closing socket`,
         )
         rawSocket.close()
-        return
+        return null
       }
 
-      // Wrap with MSE encryption if policy is 'prefer' or 'required' and context available
-      // 'disabled' and 'allow' don't initiate MSE on outgoing connections
-      let socket: ITcpSocket = rawSocket
-      const shouldInitiateMse =
-        (this.config.encryptionPolicy === 'prefer' ||
-          this.config.encryptionPolicy === 'required') &&
-        this.encryptionContext
-      if (shouldInitiateMse) {
-        const mseSocket = new MseSocket(rawSocket, {
-          policy: this.config.encryptionPolicy,
-          infoHash: this.encryptionContext!.infoHash,
-          sha1: this.encryptionContext!.sha1,
-          getRandomBytes: this.encryptionContext!.getRandomBytes,
-        })
-
-        try {
-          // Socket is already connected, just run the MSE handshake
-          await mseSocket.runHandshakeOnConnected()
-          socket = mseSocket
-          this.logger.debug(
-            `[ConnectionManager] MSE handshake complete for ${key} (encrypted: ${mseSocket.isEncrypted})`,
-          )
-        } catch (mseErr) {
-          // MSE handshake failed
-          if (this.config.encryptionPolicy === 'required') {
-            // Encryption required but failed - reject connection
-            rawSocket.close()
-            throw new Error(`MSE handshake failed: ${mseErr}`)
-          }
-          // 'prefer' mode: fall back to plain socket
-          this.logger.debug(
-            `[ConnectionManager] MSE handshake failed for ${key}, using plain: ${mseErr}`,
-          )
-          socket = rawSocket
-        }
-      }
+      this.settleAttempt(attempt, 'connected')
+      return { peer, key, attempt, socket: rawSocket }
+    } catch (err) {
+      this.failAttempt(key, attempt, err)
+      return null
+    }
+  }
 
-      // Check again if we were cancelled during MSE handshake
-      if (!this.connectTimers.has(key)) {
-        this.logger.debug(`[ConnectionManager] Connection to ${key} cancelled during MSE handshake`)
-        socket.close()
-        return
+  /**
+   * Race two addresses of one peer (happy eyeballs, RFC 8305). The first
+   * gets a head start; the first to connect wins and the other is aborted.
+   * The second address only starts if the pipeline has a half-open slot.
+   */
+  private async raceConnect(first: SwarmPeer, second: SwarmPeer): Promise<TcpConnectResult | null> {
+    this.logger.debug(
+      `[ConnectionManager] Racing ${peerKey(first.ip, first.port)} and ${peerKey(second.ip, second.port)}`,
+    )
+    const firstConnect = this.connectTcp(first)
+    let headStartTimer: number | undefined
+    const headStart = await Promise.race([
+      firstConnect,
+      new Promise<undefined>((resolve) => {
+        headStartTimer = this.pipeline.timers.schedule(HAPPY_EYEBALLS_DELAY_MS, () =>
+          resolve(undefined),
+        )
+      }),
+    ])
+    if (headStart !== undefined) {
+      // The first attempt settled within its head start
+      this.pipeline.timers.cancel(headStartTimer!)
+      if (headStart || this.pipeline.available <= 0) return headStart
+      return this.connectTcp(second)
+    }
+    if (this.pipeline.available <= 0) return firstConnect
+
+    const secondConnect = this.connectTcp(second)
+    const winner = await new Promise<TcpConnectResult | null>((resolve) => {
+      let pending = 2
+      const onResult = (result: TcpConnectResult | null) => {
+        if (result) resolve(result)
+        else if (--pending === 0) resolve(null)
       }
+      firstConnect.then(onResult)
+      secondConnect.then(onResult)
+    })
+    if (winner) {
+      const loser = winner.peer === first ? second : first
+      this.abortAttempt(peerKey(loser.ip, loser.port))
+    }
+    return winner
+  }
 
-      // Clear timeout on success
-      clearTimeout(timer)
-      this.connectTimers.delete(key)
-
-      // Create peer connection
-      const connection = new PeerConnection(this.engine, socket, {
-        remoteAddress: peer.ip,
-        remotePort: peer.port,
+  /**
+   * Run the MSE handshake (if enabled) on a connected socket and hand the
+   * connection to the torrent.
+   */
+  private async setupConnection(result: TcpConnectResult): Promise<void> {
+    const { peer, key, attempt, socket: rawSocket } = result
+
+    // Wrap with MSE encryption if policy is 'prefer' or 'required' and context available
+    // 'disabled' and 'allow' don't initiate MSE on outgoing connections
+    let socket: ITcpSocket = rawSocket
+    const shouldInitiateMse =
+      (this.config.encryptionPolicy === 'prefer' || this.config.encryptionPolicy === 'required') &&
+      this.encryptionContext
+    if (shouldInitiateMse) {
+      const mseSocket = new MseSocket(rawSocket, {
+        policy: this.config.encryptionPolicy,
+        infoHash: this.encryptionContext!.infoHash,
+        sha1: this.encryptionContext!.sha1,
+        getRandomBytes: this.encryptionContext!.getRandomBytes,
       })
 
-      // Don't mark connected here - let the callback (addPeer) handle it
-      // This avoids duplicate detection rejecting the peer
-      this.onPeerConnected?.(key, connection)
-    } catch (err) {
-      // Clear timeout on failure (may already be cleared by cancel)
-      clearTimeout(timer)
-      this.connectTimers.delete(key)
-
-      // Only mark failed if we weren't already cancelled
-      if (this.swarm.getPeerByKey(key)?.state === 'connecting') {
-        const reason = err instanceof Error ? err.message : String(err)
-        this.swarm.markConnectFailed(key, reason)
+      try {
+        // Socket is already connected, just run the MSE handshake
+        await mseSocket.runHandshakeOnConnected()
+        socket = mseSocket
+        this.logger.debug(
+          `[ConnectionManager] MSE handshake complete for ${key} (encrypted: ${mseSocket.isEncrypted})`,
+        )
+      } catch (mseErr) {
+        // MSE handshake failed
+        if (this.config.encryptionPolicy === 'required') {
+          // Encryption required but failed - reject connection
+          rawSocket.close()
+          throw new Error(`MSE handshake failed: ${mseErr}`)
+        }
+        // 'prefer' mode: fall back to plain socket
+        this.logger.debug(
+          `[ConnectionManager] MSE handshake failed for ${key}, using plain: ${mseErr}`,
+        )
+        socket = rawSocket
       }
-    } finally {
-      // Always clean up pending socket tracking
-      this.pendingSockets.delete(key)
+    }
+
+    // Check again if we were cancelled during MSE handshake
+    if (this.connectAttempts.get(key) !== attempt) {
+      this.logger.debug(`[ConnectionManager] Connection to ${key} cancelled during MSE handshake`)
+      socket.close()
+      return
+    }
+
+    // Clear timeout on success
+    this.pipeline.timers.cancel(attempt.timer)
+    this.connectAttempts.delete(key)
+
+    // Create peer connection
+    const connection = new PeerConnection(this.engine, socket, {
+      remoteAddress: peer.ip,
+      remotePort: peer.port,
+    })
+
+    // Don't mark connected here - let the callback (addPeer) handle it
+    // This avoids duplicate detection rejecting the peer
+    this.onPeerConnected?.(key, connection)
+  }
+
+  /**
+   * Another idle address of the same peer in the other address family,
+   * if one is known from an earlier handshake.
+   */
+  private findDualStackAlternate(peer: SwarmPeer): SwarmPeer | null {
+    if (!peer.peerId) return null
+    for (const other of this.swarm.getPeersByPeerId(toHex(peer.peerId))) {
+      if (other.family === peer.family) continue
+      if (other.state === 'idle' || other.state === 'failed') return other
+    }
+    return null
+  }
+
+  /**
+   * Record the pipeline outcome of an attempt once.
+   */
+  private settleAttempt(attempt: ConnectAttempt, outcome: ConnectOutcome | 'abandoned'): void {
+    if (attempt.settled) return
+    attempt.settled = true
+    if (outcome === 'abandoned') {
+      this.pipeline.abandon()
+    } else {
+      this.pipeline.complete(outcome, Date.now() - attempt.startedAt)
+    }
+  }
+
+  /**
+   * Handle a failed attempt (no-op if it was already timed out or cancelled).
+   */
+  private failAttempt(key: string, attempt: ConnectAttempt, err: unknown): void {
+    if (this.connectAttempts.get(key) !== attempt) return
+    this.pipeline.timers.cancel(attempt.timer)
+    this.connectAttempts.delete(key)
+    this.settleAttempt(attempt, 'failed')
+
+    if (this.swarm.getPeerByKey(key)?.state === 'connecting') {
+      const reason = err instanceof Error ? err.message : String(err)
+      this.swarm.markConnectFailed(key, reason)
     }
   }
 
+  /**
+   * Abort an attempt that lost a dual-stack race. The peer goes back to
+   * idle rather than failed.
+   */
+  private abortAttempt(key: string): void {
+    const attempt = this.connectAttempts.get(key)
+    if (!attempt) return
+    this.pipeline.timers.cancel(attempt.timer)
+    this.connectAttempts.delete(key)
+    attempt.socket?.close()
+    this.settleAttempt(attempt, 'abandoned')
+    this.swarm.markConnectAborted(key)
+  }
+
   /**
    * Handle connection timeout.
    */
   private handleConnectionTimeout(key: string): void {
-    this.connectTimers.delete(key)
+    const attempt = this.connectAttempts.get(key)
+    if (!attempt) return
+    this.connectAttempts.delete(key)
 
     // Close the pending socket to abort the TCP connection
-    const pendingSocket = this.pendingSockets.get(key)
-    if (pendingSocket) {
-      pendingSocket.close()
-      this.pendingSockets.delete(key)
-    }
+    attempt.socket?.close()
+    this.settleAttempt(attempt, 'timeout')
 
     this.swarm.markConnectFailed(key, 'timeout')
     this.logger.debug(`[ConnectionManager] Connection timeout: ${key}`)
@@ -296,7 +454,11 @@ export class ConnectionManager {
   async fillSlots(globalLimitCheck?: () => boolean): Promise<number> {
     this.lastMaintenanceRun = Date.now()
 
-    const slots = Math.min(this.availableSlots, this.config.burstConnections)
+    const slots = Math.min(
+      this.availableSlots,
+      this.config.burstConnections,
+      this.pipeline.available,
+    )
     if (slots <= 0) return 0
 
     const candidates = this.peerSelector.getConnectablePeers(slots)
@@ -315,7 +477,7 @@ export class ConnectionManager {
       }
 
       // Re-check available slots (may change as we connect)
-      if (this.availableSlots <= 0) break
+      if (this.availableSlots <= 0 || this.pipeline.available <= 0) break
 
       // Initiate connection (async, don't await all)
       this.initiateConnection(peer).catch((err) => {
@@ -345,25 +507,21 @@ export class ConnectionManager {
    */
   cancelAllPendingConnections(): void {
     const t0 = Date.now()
-    const numPending = this.pendingSockets.size
-    const numTimers = this.connectTimers.size
+    const numPending = this.connectAttempts.size
 
-    // Close all pending sockets to abort in-flight TCP connections
-    for (const [key, socket] of this.pendingSockets) {
+    // Close pending sockets to abort in-flight TCP connections, clear
+    // timeouts and mark peers as failed
+    for (const [key, attempt] of this.connectAttempts) {
       this.logger.debug(`[ConnectionManager] Aborting pending connection to ${key}`)
-      socket.close()
-    }
-    this.pendingSockets.clear()
-
-    // Clear timers and mark peers as failed
-    for (const [key, timer] of this.connectTimers) {
-      clearTimeout(timer)
+      attempt.socket?.close()
+      this.pipeline.timers.cancel(attempt.timer)
+      this.settleAttempt(attempt, 'abandoned')
       this.swarm.markConnectFailed(key, 'cancelled')
     }
-    this.connectTimers.clear()
+    this.connectAttempts.clear()
 
     this.logger.info(
-      `[ConnectionManager] cancelAllPendingConnections: closed ${numPending} sockets, cleared ${numTimers} timers in ${Date.now() - t0}ms`,
+      `[ConnectionManager] cancelAllPendingConnections: aborted ${numPending} connects in ${Date.now() - t0}ms`,
     )
   }
 
@@ -518,7 +676,7 @@ export class ConnectionManager {
     return {
       connected: this.swarm.connectedCount,
       connecting: this.swarm.connectingCount,
-      pendingTimers: this.connectTimers.size,
+      pendingTimers: this.connectAttempts.size,
       availableSlots: this.availableSlots,
       config: this.config,
       adaptiveInterval: this.getAdaptiveMaintenanceInterval(),
@@ -1,4 +1,4 @@
-import { ActivePiece, BLOCK_SIZE } from './active-piece'
+import { ActivePiece, BLOCK_SIZE, RequestInfo } from './active-piece'
 
 /**
  * Decision to enter or exit endgame mode.
@@ -27,10 +27,36 @@ export interface EndgameConfig {
    * Default: 3
    */
   maxDuplicateRequests: number
+
+  /**
+   * Maximum duplicate requests outstanding across the torrent at once
+   * (requests beyond the first per block).
+   * 0 = unlimited
+   * Default: 64 (1MB of 16KB blocks)
+   */
+  duplicateBudget: number
 }
 
 const DEFAULT_CONFIG: EndgameConfig = {
   maxDuplicateRequests: 3,
+  duplicateBudget: 64,
+}
+
+/**
+ * Block latency assumed for peers not measured yet. Pessimistic, so an
+ * unmeasured peer mostly duplicates requests that are running late.
+ */
+export const UNMEASURED_BLOCK_LATENCY_MS = 2000
+
+/**
+ * Endgame counters reported with the tick stats. Unlike the tick stats,
+ * these are cumulative over the torrent's lifetime and never reset.
+ */
+export interface EndgameStats {
+  /** Time spent in endgame, including the current stretch (ms) */
+  endgameMs: number
+  /** Payload bytes of blocks received again after we already had them */
+  wastedBytes: number
 }
 
 /**
@@ -41,7 +67,9 @@ const DEFAULT_CONFIG: EndgameConfig = {
  * - Every block in every active piece has at least one outstanding request
  *
  * In endgame mode:
- * - Duplicate block requests are sent to multiple peers
+ * - Duplicate block requests are sent to multiple peers, within a per-block
+ *   limit and a torrent-wide budget, and only to peers expected to deliver
+ *   the block before everyone already asked for it
  * - CANCEL messages are sent when blocks arrive to avoid waste
  *
  * This class is pure - no I/O, no side effects. Produces decisions for caller to execute.
@@ -50,6 +78,11 @@ export class EndgameManager {
   private _inEndgame = false
   private config: EndgameConfig
 
+  // Stats
+  private _enteredAt = 0
+  private _endgameMs = 0
+  private _wastedBytes = 0
+
   constructor(config: Partial<EndgameConfig> = {}) {
     this.config = { ...DEFAULT_CONFIG, ...config }
   }
@@ -81,12 +114,14 @@ export class EndgameManager {
    * @param missingPieceCount Number of pieces we don't have yet
    * @param activePieceCount Number of pieces currently being downloaded
    * @param hasUnrequestedBlocks Whether any active piece has blocks with no requests
+   * @param now Current time, for endgame duration
    * @returns Decision to enter/exit endgame, or null if no change
    */
   evaluate(
     missingPieceCount: number,
     activePieceCount: number,
     hasUnrequestedBlocks: boolean,
+    now: number = Date.now(),
   ): EndgameDecision | null {
     // Endgame conditions:
     // 1. We have missing pieces (not complete)
@@ -97,11 +132,12 @@ export class EndgameManager {
 
     if (shouldBeEndgame && !this._inEndgame) {
       this._inEndgame = true
+      this._enteredAt = now
       return { type: 'enter_endgame' }
     }
 
     if (!shouldBeEndgame && this._inEndgame) {
-      this._inEndgame = false
+      this.leave(now)
       return { type: 'exit_endgame' }
     }
 
@@ -111,8 +147,27 @@ export class EndgameManager {
   /**
    * Force exit endgame mode (e.g., when torrent completes or stops).
    */
-  reset(): void {
+  reset(now: number = Date.now()): void {
+    if (this._inEndgame) this.leave(now)
+  }
+
+  private leave(now: number): void {
     this._inEndgame = false
+    this._endgameMs += now - this._enteredAt
+  }
+
+  /**
+   * Record a block that arrived after we already had it.
+   */
+  recordWastedBlock(bytes: number): void {
+    this._wastedBytes += bytes
+  }
+
+  getStats(now: number = Date.now()): EndgameStats {
+    return {
+      endgameMs: this._endgameMs + (this._inEndgame ? now - this._enteredAt : 0),
+      wastedBytes: this._wastedBytes,
+    }
   }
 
   /**
@@ -153,4 +208,40 @@ export class EndgameManager {
     if (this.config.maxDuplicateRequests === 0) return true // Unlimited
     return currentRequestCount < this.config.maxDuplicateRequests
   }
+
+  /**
+   * Create the filter for one peer's endgame request pass, deciding per
+   * block whether to duplicate its outstanding requests to this peer.
+   *
+   * A duplicate is sent only if the block is under maxDuplicateRequests, the
+   * torrent is under duplicateBudget, and this peer is expected to deliver
+   * before every peer already asked - or those are running late (outstanding
+   * for twice their expected latency). Expected delivery is request time plus
+   * the peer's measured block latency (request to arrival, so it covers both
+   * RTT and how fast the peer works through its queue).
+   *
+   * @param blockLatencyMs This peer's measured block latency (0 = not measured)
+   * @param now Current time
+   * @param outstandingDuplicates Duplicate requests already outstanding in the torrent
+   */
+  createDuplicateFilter(
+    blockLatencyMs: number,
+    now: number,
+    outstandingDuplicates: number,
+  ): (requests: readonly RequestInfo[]) => boolean {
+    const budget = this.config.duplicateBudget
+    let remaining = budget === 0 ? Infinity : budget - outstandingDuplicates
+    const arrival = now + (blockLatencyMs || UNMEASURED_BLOCK_LATENCY_MS)
+
+    return (requests) => {
+      if (remaining <= 0 || !this.shouldSendDuplicateRequest(requests.length)) return false
+      for (const r of requests) {
+        const expectedAt = r.expectedAt ?? r.timestamp + UNMEASURED_BLOCK_LATENCY_MS
+        const late = now - r.timestamp > 2 * (expectedAt - r.timestamp)
+        if (!late && expectedAt <= arrival) return false
+      }
+      remaining--
+      return true
+    }
+  }
 }
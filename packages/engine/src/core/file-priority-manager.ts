@@ -9,6 +9,13 @@ import { BitField } from '../utils/bitfield'
  */
 export type PieceClassification = 'wanted' | 'boundary' | 'blacklisted'
 
+/** Classification codes as stored in FilePriorityManager.classificationCodes */
+export const PIECE_WANTED = 0
+export const PIECE_BOUNDARY = 1
+export const PIECE_BLACKLISTED = 2
+
+const CLASSIFICATION_NAMES: PieceClassification[] = ['wanted', 'boundary', 'blacklisted']
+
 /** File information needed for classification */
 export interface FileInfo {
   offset: number
@@ -29,7 +36,7 @@ export interface FilePriorityManagerConfig {
   getBitfield: () => BitField | undefined
 
   // Callbacks for side effects
-  onPrioritiesChanged: (filePriorities: number[], classification: PieceClassification[]) => void
+  onPrioritiesChanged: (filePriorities: number[], classification: Uint8Array) => void
   onBlacklistPieces: (indices: number[]) => void
 }
 
@@ -45,14 +52,28 @@ export interface FilePriorityManagerConfig {
  * - 'wanted': All files are non-skipped
  * - 'boundary': Some files are skipped, some are not
  * - 'blacklisted': All files are skipped
+ *
+ * Classification is stored as one byte per piece (PIECE_* codes). When file
+ * priorities change, only the pieces overlapping the changed files are
+ * re-classified, by sweeping those pieces against the file byte ranges in
+ * offset order.
  */
 export class FilePriorityManager extends EngineComponent {
   static override logName = 'fileprio'
 
   // State
   private _filePriorities: number[] = []
-  private _pieceClassification: PieceClassification[] = []
+  private _classification: Uint8Array = new Uint8Array(0)
+  /** String view of _classification, built on demand */
+  private _classificationView: PieceClassification[] | null = null
+  private _classCounts = [0, 0, 0]
   private _piecePriority: Uint8Array | null = null
+  /** Pieces with priority 2 (high) */
+  private _highCount = 0
+
+  /** File indices in byte-offset order, and the files array it was built for */
+  private _sortedFiles: Int32Array = new Int32Array(0)
+  private _sortedFor: FileInfo[] | null = null
 
   // Callbacks
   private readonly getPiecesCount: () => number
@@ -63,7 +84,7 @@ export class FilePriorityManager extends EngineComponent {
   private readonly getBitfield: () => BitField | undefined
   private readonly onPrioritiesChanged: (
     filePriorities: number[],
-    classification: PieceClassification[],
+    classification: Uint8Array,
   ) => void
   private readonly onBlacklistPieces: (indices: number[]) => void
 
@@ -90,9 +111,29 @@ export class FilePriorityManager extends EngineComponent {
     return this._filePriorities
   }
 
-  /** Get the piece classification array. */
+  /**
+   * Get the piece classification array.
+   * Built from classificationCodes on first access after a change; hot paths
+   * should use getClassification() or classificationCodes instead.
+   */
   get pieceClassification(): PieceClassification[] {
-    return this._pieceClassification
+    if (!this._classificationView) {
+      const codes = this._classification
+      const view: PieceClassification[] = new Array(codes.length)
+      for (let i = 0; i < codes.length; i++) view[i] = CLASSIFICATION_NAMES[codes[i]]
+      this._classificationView = view
+    }
+    return this._classificationView
+  }
+
+  /** Per-piece classification codes (PIECE_*). Empty until classified. */
+  get classificationCodes(): Uint8Array {
+    return this._classification
+  }
+
+  /** Number of pieces touching both skipped and non-skipped files. */
+  get boundaryCount(): number {
+    return this._classCounts[PIECE_BOUNDARY]
   }
 
   /** Get per-piece priority (0=skip, 1=normal, 2=high). */
@@ -121,7 +162,8 @@ export class FilePriorityManager extends EngineComponent {
    * Get classification for a piece.
    */
   getClassification(pieceIndex: number): PieceClassification | undefined {
-    return this._pieceClassification[pieceIndex]
+    if (pieceIndex < 0 || pieceIndex >= this._classification.length) return undefined
+    return CLASSIFICATION_NAMES[this._classification[pieceIndex]]
   }
 
   /**
@@ -129,8 +171,8 @@ export class FilePriorityManager extends EngineComponent {
    */
   getWantedPiecesCount(): number {
     const piecesCount = this.getPiecesCount()
-    if (this._pieceClassification.length === 0) return piecesCount
-    return this._pieceClassification.filter((c) => c !== 'blacklisted').length
+    if (this._classification.length === 0) return piecesCount
+    return this._classification.length - this._classCounts[PIECE_BLACKLISTED]
   }
 
   /**
@@ -140,12 +182,13 @@ export class FilePriorityManager extends EngineComponent {
   getCompletedWantedCount(): number {
     const bitfield = this.getBitfield()
     if (!bitfield) return 0
-    if (this._pieceClassification.length === 0) return bitfield.count()
+    const codes = this._classification
+    if (codes.length === 0) return bitfield.count()
 
     const piecesCount = this.getPiecesCount()
     let count = 0
     for (let i = 0; i < piecesCount; i++) {
-      if (this._pieceClassification[i] !== 'blacklisted' && bitfield.get(i)) {
+      if (codes[i] !== PIECE_BLACKLISTED && bitfield.get(i)) {
         count++
       }
     }
@@ -165,9 +208,7 @@ export class FilePriorityManager extends EngineComponent {
     if (this._piecePriority && this._piecePriority[index] === 0) return false
 
     // Fallback to classification for backwards compatibility
-    if (this._pieceClassification.length > 0) {
-      if (this._pieceClassification[index] === 'blacklisted') return false
-    }
+    if (this._classification[index] === PIECE_BLACKLISTED) return false
 
     return true // Wanted or boundary - both get requested
   }
@@ -197,7 +238,7 @@ export class FilePriorityManager extends EngineComponent {
     if (this._filePriorities[fileIndex] === priority) return false
 
     this._filePriorities[fileIndex] = priority
-    this.recomputePieceClassification()
+    this.recomputePieceClassification([fileIndex])
 
     this.logger.info(`File ${fileIndex} priority set to ${priority === 1 ? 'skip' : 'normal'}`)
 
@@ -218,7 +259,7 @@ export class FilePriorityManager extends EngineComponent {
       this._filePriorities = new Array(fileCount).fill(0)
     }
 
-    let changed = 0
+    const changedFiles: number[] = []
     for (const [fileIndex, priority] of priorities) {
       if (fileIndex < 0 || fileIndex >= fileCount) continue
 
@@ -230,16 +271,16 @@ export class FilePriorityManager extends EngineComponent {
 
       if (this._filePriorities[fileIndex] !== priority) {
         this._filePriorities[fileIndex] = priority
-        changed++
+        changedFiles.push(fileIndex)
       }
     }
 
-    if (changed > 0) {
-      this.recomputePieceClassification()
-      this.logger.info(`Updated ${changed} file priorities`)
+    if (changedFiles.length > 0) {
+      this.recomputePieceClassification(changedFiles)
+      this.logger.info(`Updated ${changedFiles.length} file priorities`)
     }
 
-    return changed
+    return changedFiles.length
   }
 
   /**
@@ -296,168 +337,221 @@ export class FilePriorityManager extends EngineComponent {
   // === Private Methods ===
 
   /**
-   * Recompute piece classification based on current file priorities.
-   * Called whenever file priorities change.
+   * Recompute piece classification and priority based on current file
+   * priorities. Called whenever file priorities change.
+   *
+   * @param changedFiles - Files whose priority changed; only their pieces are
+   *   re-classified. Omit to classify every piece.
    */
-  private recomputePieceClassification(): void {
+  private recomputePieceClassification(changedFiles?: number[]): void {
     if (!this.hasMetadata()) {
-      this._pieceClassification = []
+      this.resetClassification()
       return
     }
 
     const files = this.getFiles()
     if (files.length === 0) {
-      this._pieceClassification = []
+      this.resetClassification()
       return
     }
 
     const piecesCount = this.getPiecesCount()
     const pieceLength = this.standardPieceLength
-    const classification: PieceClassification[] = new Array(piecesCount)
-
-    for (let pieceIndex = 0; pieceIndex < piecesCount; pieceIndex++) {
-      const pieceStart = pieceIndex * pieceLength
-      const pieceEnd = pieceStart + this.getPieceLength(pieceIndex)
-
-      let touchesSkipped = false
-      let touchesNonSkipped = false
-
-      for (let fileIndex = 0; fileIndex < files.length; fileIndex++) {
-        const file = files[fileIndex]
-        const fileEnd = file.offset + file.length
-
-        // Check if piece overlaps with this file
-        if (pieceStart < fileEnd && pieceEnd > file.offset) {
-          if (this._filePriorities[fileIndex] === 1) {
-            touchesSkipped = true
-          } else {
-            touchesNonSkipped = true
-          }
-        }
-
-        // Early exit if we've found both
-        if (touchesSkipped && touchesNonSkipped) break
-      }
-
-      if (touchesSkipped && touchesNonSkipped) {
-        classification[pieceIndex] = 'boundary'
-      } else if (touchesSkipped) {
-        classification[pieceIndex] = 'blacklisted'
-      } else {
-        classification[pieceIndex] = 'wanted'
+    const full =
+      !changedFiles ||
+      pieceLength <= 0 ||
+      this._classification.length !== piecesCount ||
+      this._piecePriority?.length !== piecesCount
+
+    if (full) {
+      this._classification = new Uint8Array(piecesCount)
+      this._piecePriority = piecesCount > 0 ? new Uint8Array(piecesCount) : null
+      // Every piece starts out as PIECE_WANTED (0)
+      this._classCounts = [piecesCount, 0, 0]
+      this._highCount = 0
+    }
+    this._classificationView = null
+
+    const blacklisted: number[] = []
+    if (full) {
+      this.classifyPieces(files, 0, piecesCount - 1, blacklisted)
+    } else {
+      for (const [first, last] of this.pieceRangesForFiles(files, changedFiles, pieceLength)) {
+        this.classifyPieces(files, first, last, blacklisted)
       }
     }
 
-    this._pieceClassification = classification
-
     // Notify callback (updates contentStorage)
-    this.onPrioritiesChanged(this._filePriorities, classification)
+    this.onPrioritiesChanged(this._filePriorities, this._classification)
 
     // Log summary
-    const wanted = classification.filter((c) => c === 'wanted').length
-    const boundary = classification.filter((c) => c === 'boundary').length
-    const blacklisted = classification.filter((c) => c === 'blacklisted').length
+    const [wanted, boundary, blacklistedCount] = this._classCounts
     this.logger.debug(
-      `Piece classification: ${wanted} wanted, ${boundary} boundary, ${blacklisted} blacklisted`,
+      `Piece classification: ${wanted} wanted, ${boundary} boundary, ${blacklistedCount} blacklisted`,
     )
 
     // Clear any active pieces that are now blacklisted
-    this.clearBlacklistedActivePieces()
+    if (blacklisted.length > 0) {
+      this.onBlacklistPieces(blacklisted)
+    }
+
+    if (this._highCount > 0) {
+      const high = this._highCount
+      const skip = this._classCounts[PIECE_BLACKLISTED]
+      this.logger.debug(
+        `Piece priority: ${high} high, ${piecesCount - skip - high} normal, ${skip} skip`,
+      )
+    }
+  }
 
-    // Recompute piece priorities
-    this.recomputePiecePriority()
+  private resetClassification(): void {
+    this._classification = new Uint8Array(0)
+    this._classificationView = null
+    this._classCounts = [0, 0, 0]
   }
 
   /**
-   * Recompute piece priorities from file priorities.
+   * Classify pieces `first`..`last` (inclusive), sweeping them against the
+   * file byte ranges in offset order. Pieces that become blacklisted are
+   * appended to `blacklisted`.
+   *
    * Piece priority = max(priority of files it touches), mapped as:
    *   - File priority 0 (normal) -> contributes piece priority 1
    *   - File priority 1 (skip) -> contributes piece priority 0
    *   - File priority 2 (high) -> contributes piece priority 2
    */
-  private recomputePiecePriority(): void {
-    if (!this.hasMetadata()) {
-      this._piecePriority = null
-      return
-    }
-
-    const piecesCount = this.getPiecesCount()
-    if (piecesCount === 0) {
-      this._piecePriority = null
-      return
-    }
-
-    if (!this._piecePriority || this._piecePriority.length !== piecesCount) {
-      this._piecePriority = new Uint8Array(piecesCount)
-    }
-
-    const files = this.getFiles()
+  private classifyPieces(
+    files: FileInfo[],
+    first: number,
+    last: number,
+    blacklisted: number[],
+  ): void {
+    if (last < first) return
+    const order = this.sortedFiles(files)
+    const priorities = this._filePriorities
+    const codes = this._classification
+    const piecePriority = this._piecePriority!
+    const counts = this._classCounts
     const pieceLength = this.standardPieceLength
 
-    for (let pieceIndex = 0; pieceIndex < piecesCount; pieceIndex++) {
+    // First file (in offset order) that can overlap piece `first`
+    let lo = this.firstFileEndingAfter(files, order, first * pieceLength)
+
+    for (let pieceIndex = first; pieceIndex <= last; pieceIndex++) {
       const pieceStart = pieceIndex * pieceLength
       const pieceEnd = pieceStart + this.getPieceLength(pieceIndex)
 
-      let maxPriority = 0 // Start as skip
-
-      for (let fileIndex = 0; fileIndex < files.length; fileIndex++) {
-        const file = files[fileIndex]
-        const fileEnd = file.offset + file.length
-
-        // Check if piece overlaps with this file
-        if (pieceStart < fileEnd && pieceEnd > file.offset) {
-          const filePriority = this._filePriorities[fileIndex] ?? 0
-
-          // Map file priority to piece priority contribution
-          let contribution = 0
-          if (filePriority === 2) {
-            contribution = 2 // High priority
-          } else if (filePriority === 0) {
-            contribution = 1 // Normal priority
-          }
-          // filePriority === 1 (skip) contributes 0
+      // Files ending at or before this piece can't overlap it or any later one
+      while (lo < order.length && fileEnd(files[order[lo]]) <= pieceStart) lo++
 
-          maxPriority = Math.max(maxPriority, contribution)
+      let touchesSkipped = false
+      let touchesNonSkipped = false
+      let maxPriority = 0
 
-          // Early exit if we hit high priority (can't go higher)
-          if (maxPriority === 2) break
+      for (let j = lo; j < order.length; j++) {
+        const fileIndex = order[j]
+        const file = files[fileIndex]
+        if (file.offset >= pieceEnd) break
+        // Zero-length files only count strictly inside the piece
+        if (fileEnd(file) <= pieceStart) continue
+
+        const filePriority = priorities[fileIndex] ?? 0
+        if (filePriority === 1) {
+          touchesSkipped = true
+        } else {
+          touchesNonSkipped = true
+          maxPriority = Math.max(maxPriority, filePriority === 2 ? 2 : 1)
         }
+
+        // Early exit once nothing more can change
+        if (touchesSkipped && maxPriority === 2) break
       }
 
-      this._piecePriority[pieceIndex] = maxPriority
+      const code = touchesNonSkipped
+        ? touchesSkipped
+          ? PIECE_BOUNDARY
+          : PIECE_WANTED
+        : touchesSkipped
+          ? PIECE_BLACKLISTED
+          : PIECE_WANTED
+
+      if (pieceIndex < codes.length) {
+        counts[codes[pieceIndex]]--
+        codes[pieceIndex] = code
+        counts[code]++
+        if (piecePriority[pieceIndex] === 2) this._highCount--
+        if (maxPriority === 2) this._highCount++
+        piecePriority[pieceIndex] = maxPriority
+        if (code === PIECE_BLACKLISTED) blacklisted.push(pieceIndex)
+      }
     }
+  }
 
-    // Log summary
-    let skip = 0,
-      normal = 0,
-      high = 0
-    for (let i = 0; i < piecesCount; i++) {
-      const p = this._piecePriority[i]
-      if (p === 0) skip++
-      else if (p === 1) normal++
-      else high++
+  /**
+   * Piece ranges (inclusive, merged and sorted) overlapping the given files.
+   */
+  private pieceRangesForFiles(
+    files: FileInfo[],
+    fileIndices: number[],
+    pieceLength: number,
+  ): [number, number][] {
+    const lastPiece = this._classification.length - 1
+    const ranges: [number, number][] = []
+    for (const fileIndex of fileIndices) {
+      const file = files[fileIndex]
+      const first = Math.floor(file.offset / pieceLength)
+      const last = Math.floor(Math.max(file.offset, fileEnd(file) - 1) / pieceLength)
+      ranges.push([Math.min(first, lastPiece), Math.min(last, lastPiece)])
     }
-    if (high > 0) {
-      this.logger.debug(`Piece priority: ${high} high, ${normal} normal, ${skip} skip`)
+    ranges.sort((a, b) => a[0] - b[0])
+
+    const merged: [number, number][] = []
+    for (const range of ranges) {
+      const prev = merged[merged.length - 1]
+      if (prev && range[0] <= prev[1] + 1) {
+        prev[1] = Math.max(prev[1], range[1])
+      } else {
+        merged.push(range)
+      }
     }
+    return merged
   }
 
   /**
-   * Clear any active pieces that are blacklisted.
-   * Notifies Torrent via callback so it can update ActivePieceManager.
+   * File indices sorted by byte offset. Torrent file lists are already in
+   * offset order, so this is usually the identity; cached per files array.
    */
-  private clearBlacklistedActivePieces(): void {
-    if (this._pieceClassification.length === 0) return
-
-    const blacklistedIndices: number[] = []
-    for (let i = 0; i < this._pieceClassification.length; i++) {
-      if (this._pieceClassification[i] === 'blacklisted') {
-        blacklistedIndices.push(i)
-      }
+  private sortedFiles(files: FileInfo[]): Int32Array {
+    if (this._sortedFor === files && this._sortedFiles.length === files.length) {
+      return this._sortedFiles
     }
+    const order = new Int32Array(files.length)
+    let sorted = true
+    for (let i = 0; i < files.length; i++) {
+      order[i] = i
+      if (i > 0 && files[i].offset < files[i - 1].offset) sorted = false
+    }
+    if (!sorted) order.sort((a, b) => files[a].offset - files[b].offset)
+    this._sortedFiles = order
+    this._sortedFor = files
+    return order
+  }
 
-    if (blacklistedIndices.length > 0) {
-      this.onBlacklistPieces(blacklistedIndices)
+  /**
+   * Binary search: first position in `order` whose file ends after `position`.
+   */
+  private firstFileEndingAfter(files: FileInfo[], order: Int32Array, position: number): number {
+    let lo = 0
+    let hi = order.length
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1
+      if (fileEnd(files[order[mid]]) <= position) lo = mid + 1
+      else hi = mid
     }
+    return lo
   }
 }
+
+function fileEnd(file: FileInfo): number {
+  return file.offset + file.length
+}
@@ -0,0 +1,105 @@
+/**
+ * Metadata Cache
+ *
+ * Keeps info dictionaries fetched over BEP 9 in the session store, keyed by
+ * info hash, so adding the same magnet again (after removing the torrent, or
+ * on another profile sharing the store) starts with metadata instead of
+ * waiting for peers. Unlike the per-torrent infodict saved by
+ * SessionPersistence, entries outlive the torrent; the oldest are evicted
+ * once the cache exceeds its byte budget.
+ */
+
+import { ISessionStore } from '../interfaces/session-store'
+
+const INDEX_KEY = 'metadata:index'
+const ENTRY_PREFIX = 'metadata:infodict:'
+
+/** Default byte budget for cached info dictionaries */
+export const DEFAULT_METADATA_CACHE_BYTES = 32 * 1024 * 1024
+
+interface CacheIndexEntry {
+  /** Info hash in hex */
+  infoHash: string
+  size: number
+}
+
+function entryKey(infoHash: string): string {
+  return `${ENTRY_PREFIX}${infoHash}`
+}
+
+export class MetadataCache {
+  /** Entries, least recently used first (loaded lazily) */
+  private index: CacheIndexEntry[] | null = null
+
+  /**
+   * @param store - Session store to keep entries in
+   * @param maxBytes - Total size of cached info dictionaries before eviction
+   */
+  constructor(
+    private readonly store: ISessionStore,
+    private readonly maxBytes: number = DEFAULT_METADATA_CACHE_BYTES,
+  ) {}
+
+  /**
+   * Look up the info dictionary for an info hash.
+   * The caller must verify it against the info hash before trusting it.
+   */
+  async get(infoHash: string): Promise<Uint8Array | null> {
+    const index = await this.loadIndex()
+    const position = index.findIndex((e) => e.infoHash === infoHash)
+    if (position === -1) return null
+
+    const infoDict = await this.store.get(entryKey(infoHash))
+    if (!infoDict) {
+      index.splice(position, 1)
+      await this.store.setJson(INDEX_KEY, index)
+      return null
+    }
+
+    // Move to most recently used
+    const [entry] = index.splice(position, 1)
+    index.push(entry)
+    await this.store.setJson(INDEX_KEY, index)
+    return infoDict
+  }
+
+  /** Cache a verified info dictionary, evicting the oldest entries if over budget */
+  async put(infoHash: string, infoDict: Uint8Array): Promise<void> {
+    if (infoDict.length > this.maxBytes) return
+
+    const index = await this.loadIndex()
+    const existing = index.findIndex((e) => e.infoHash === infoHash)
+    if (existing !== -1) index.splice(existing, 1)
+    index.push({ infoHash, size: infoDict.length })
+
+    let total = index.reduce((sum, e) => sum + e.size, 0)
+    const evicted: string[] = []
+    while (total > this.maxBytes) {
+      const oldest = index.shift()!
+      total -= oldest.size
+      evicted.push(oldest.infoHash)
+    }
+
+    await this.store.set(entryKey(infoHash), infoDict)
+    await Promise.all(evicted.map((hash) => this.store.delete(entryKey(hash))))
+    await this.store.setJson(INDEX_KEY, index)
+  }
+
+  /** Drop a cached entry (e.g. it failed verification) */
+  async delete(infoHash: string): Promise<void> {
+    const index = await this.loadIndex()
+    const position = index.findIndex((e) => e.infoHash === infoHash)
+    if (position === -1) return
+    index.splice(position, 1)
+    await this.store.delete(entryKey(infoHash))
+    await this.store.setJson(INDEX_KEY, index)
+  }
+
+  private async loadIndex(): Promise<CacheIndexEntry[]> {
+    if (!this.index) {
+      const stored = await this.store.getJson<CacheIndexEntry[]>(INDEX_KEY)
+      this.index = Array.isArray(stored) ? stored : []
+    }
+    return this.index
+  }
+}
@@ -2,13 +2,42 @@
 import { PeerConnection } from './peer-connection'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
 import { compare } from '../utils/buffer'
+import { TimerWheel } from '../utils/timer-wheel'
+
+/** Metadata requests kept in flight per peer */
+const MAX_REQUESTS_PER_PEER = 4
+
+/** How long a metadata request may go unanswered before it is re-issued elsewhere */
+const REQUEST_TIMEOUT_MS = 10_000
+
+/** Rejects + timeouts after which a peer is no longer asked for metadata */
+const MAX_PEER_FAILURES = 3
+
+/** Largest metadata_size accepted from a peer's extension handshake */
+const MAX_METADATA_SIZE = 64 * 1024 * 1024
+
+/** A metadata-capable peer taking part in the fetch */
+interface MetadataPeer {
+  /** Pieces requested from this peer and not yet answered */
+  outstanding: Map<number, number> // piece -> timer id
+  /** Pieces this peer rejected or let time out; asked elsewhere first */
+  failed: Set<number>
+  failures: number
+}
 
 /**
  * BEP 9 metadata (info dictionary) fetcher.
  *
  * Handles fetching the info dictionary from peers for magnet links.
- * Each peer's metadata is fetched independently and verified against
- * the expected info hash before being accepted.
+ * Pieces are requested in parallel across every metadata-capable peer into
+ * one shared buffer, a few requests per peer at a time. Requests that are
+ * rejected or time out go back to the pool and are re-issued, preferably to
+ * another peer; once every piece arrives the whole dictionary is verified
+ * against the info hash.
+ *
+ * If verification fails, pieces from several peers can't be told apart, so
+ * the fetcher falls back to isolation: each remaining peer in turn supplies
+ * the whole dictionary, and a peer whose copy fails verification is dropped.
  *
  * Events:
  * - 'metadata': Emitted with the verified info buffer when metadata is complete
@@ -19,8 +48,32 @@ export class MetadataFetcher extends EngineComponent {
   /** BEP 9 metadata block size (16 KiB) */
   private static readonly BLOCK_SIZE = 16 * 1024
 
-  /** Per-peer metadata piece buffers */
-  private peerBuffers = new Map<PeerConnection, (Uint8Array | null)[]>()
+  /** Peers that are taking part in the fetch */
+  private peers = new Map<PeerConnection, MetadataPeer>()
+
+  /** Peers whose metadata failed verification; never asked again */
+  private badPeers = new WeakSet<PeerConnection>()
+
+  /** Shared buffer the pieces are assembled into */
+  private _data: Uint8Array | null = null
+
+  /** Peer that supplied each received piece (null = not received yet) */
+  private sources: (PeerConnection | null)[] = []
+
+  /** Number of peers with a request outstanding for each piece */
+  private requestCounts: Uint8Array = new Uint8Array(0)
+
+  private _piecesReceived = 0
+
+  /** While set, only this peer is asked for pieces (after a hash mismatch) */
+  private isolatedPeer: PeerConnection | null = null
+
+  private isolating = false
+
+  private verifying = false
+
+  /** Per-request timeouts */
+  private readonly timers: TimerWheel
 
   /** Expected total metadata size (from first peer's extension handshake) */
   private _metadataSize: number | null = null
@@ -41,12 +94,15 @@ export class MetadataFetcher extends EngineComponent {
     engine: ILoggingEngine
     infoHash: Uint8Array
     sha1: (data: Uint8Array) => Promise<Uint8Array>
+    /** Clock for request timeouts (default Date.now) */
+    now?: () => number
   }) {
     super(config.engine)
     this._expectedInfoHash = config.infoHash
     // Set inherited infoHash for logging context
     this.infoHash = config.infoHash
     this.sha1 = config.sha1
+    this.timers = new TimerWheel(250, 64, config.now)
   }
 
   // === Public getters ===
@@ -63,6 +119,21 @@ export class MetadataFetcher extends EngineComponent {
     return this._buffer
   }
 
+  /** Number of metadata pieces (0 until a peer has reported the size) */
+  get pieceCount(): number {
+    return this.sources.length
+  }
+
+  /** Metadata pieces received towards the current attempt */
+  get piecesReceived(): number {
+    return this._piecesReceived
+  }
+
+  /** Peers currently being asked for metadata */
+  get activePeerCount(): number {
+    return this.peers.size
+  }
+
   // === External metadata (from .torrent file or restored state) ===
 
   /**
@@ -73,13 +144,19 @@ export class MetadataFetcher extends EngineComponent {
     this._buffer = infoBuffer
     this._complete = true
     this._metadataSize = infoBuffer.length
+    this.stopFetching()
+  }
+
+  /** Cancel outstanding request timeouts */
+  destroy(): void {
+    this.stopFetching()
   }
 
   // === Peer event handlers ===
 
   /**
    * Handle extension handshake from a peer.
-   * If we need metadata and peer supports ut_metadata, request all pieces.
+   * If we need metadata and peer supports ut_metadata, add it to the fetch.
    */
   onExtensionHandshake(peer: PeerConnection): void {
     this.logger.debug(
@@ -101,6 +178,11 @@ export class MetadataFetcher extends EngineComponent {
       return
     }
 
+    if (peer.peerMetadataSize > MAX_METADATA_SIZE) {
+      this.logger.warn(`Peer metadata size ${peer.peerMetadataSize} exceeds ${MAX_METADATA_SIZE}`)
+      return
+    }
+
     // Set or validate metadata size
     if (this._metadataSize === null) {
       this._metadataSize = peer.peerMetadataSize
@@ -111,13 +193,21 @@ export class MetadataFetcher extends EngineComponent {
       return
     }
 
-    // Create per-peer buffer and request ALL pieces upfront (pipelined)
-    const totalPieces = Math.ceil(this._metadataSize / MetadataFetcher.BLOCK_SIZE)
-    this.peerBuffers.set(peer, new Array(totalPieces).fill(null))
-    for (let i = 0; i < totalPieces; i++) {
-      peer.sendMetadataRequest(i)
+    if (this.badPeers.has(peer) || this.peers.has(peer)) return
+
+    if (!this._data) {
+      const totalPieces = Math.ceil(this._metadataSize / MetadataFetcher.BLOCK_SIZE)
+      this._data = new Uint8Array(this._metadataSize)
+      this.sources = new Array(totalPieces).fill(null)
+      this.requestCounts = new Uint8Array(totalPieces)
     }
-    this.logger.info(`Requesting ${totalPieces} metadata pieces from peer`)
+
+    this.peers.set(peer, { outstanding: new Map(), failed: new Set(), failures: 0 })
+    if (this.isolating && !this.isolatedPeer) this.isolate(peer)
+    this.logger.info(
+      `Fetching ${this.sources.length} metadata pieces from ${this.peers.size} peer(s)`,
+    )
+    this.fill(peer)
   }
 
   /**
@@ -149,14 +239,13 @@ export class MetadataFetcher extends EngineComponent {
     totalSize: number,
     data: Uint8Array,
   ): Promise<void> {
-    this.logger.info(
+    this.logger.debug(
       `Received metadata piece ${piece}, totalSize=${totalSize}, dataLen=${data.length}`,
     )
     if (this._complete) return
 
-    // Get this peer's buffer
-    const peerBuffer = this.peerBuffers.get(peer)
-    if (!peerBuffer) {
+    const state = this.peers.get(peer)
+    if (!state) {
       this.logger.warn('Received metadata from peer we are not tracking')
       return
     }
@@ -164,72 +253,224 @@ export class MetadataFetcher extends EngineComponent {
     // Validate size matches
     if (this._metadataSize !== totalSize) {
       this.logger.error(`Metadata size mismatch: expected ${this._metadataSize}, got ${totalSize}`)
-      this.peerBuffers.delete(peer)
+      this.dropPeer(peer)
+      this.fillAll()
       return
     }
 
     // Validate piece index
-    if (piece < 0 || piece >= peerBuffer.length) {
+    if (piece < 0 || piece >= this.sources.length) {
       this.logger.error(`Invalid metadata piece index: ${piece}`)
       return
     }
 
-    // Store the piece
-    peerBuffer[piece] = data
+    // Only answers to our own requests count; a late answer after a timeout
+    // is still welcome if nobody else has delivered the piece yet
+    this.release(state, piece)
+
+    const offset = piece * MetadataFetcher.BLOCK_SIZE
+    const expected = Math.min(MetadataFetcher.BLOCK_SIZE, totalSize - offset)
+    if (data.length !== expected) {
+      this.logger.warn(`Metadata piece ${piece} is ${data.length} bytes, expected ${expected}`)
+      this.recordFailure(peer, state, piece)
+      this.fillAll()
+      return
+    }
+
+    if (this.sources[piece] !== null || this.verifying) {
+      this.fill(peer)
+      return
+    }
+    if (this.isolatedPeer && peer !== this.isolatedPeer) return
+
+    this._data!.set(data, offset)
+    this.sources[piece] = peer
+    this._piecesReceived++
 
-    // Check if all pieces received from this peer
-    if (peerBuffer.every((p) => p !== null)) {
-      await this.verifyPeerMetadata(peer, peerBuffer as Uint8Array[])
+    // Anyone else still asked for this piece is free to take another
+    if (this.requestCounts[piece] > 0) {
+      for (const other of this.peers.values()) this.release(other, piece)
+    }
+
+    if (this._piecesReceived === this.sources.length) {
+      await this.verify()
+    } else {
+      this.fillAll()
     }
   }
 
   /**
    * Handle metadata reject from a peer.
    */
-  onMetadataReject(_peer: PeerConnection, piece: number): void {
+  onMetadataReject(peer: PeerConnection, piece: number): void {
     this.logger.warn(`Metadata piece ${piece} rejected by peer`)
+    const state = this.peers.get(peer)
+    if (!state || !state.outstanding.has(piece)) return
+    this.release(state, piece)
+    this.recordFailure(peer, state, piece)
+    this.fillAll()
   }
 
   /**
    * Clean up when a peer disconnects.
    */
   onPeerDisconnected(peer: PeerConnection): void {
-    this.peerBuffers.delete(peer)
+    if (!this.peers.has(peer)) return
+    this.dropPeer(peer)
+    this.fillAll()
   }
 
   // === Private methods ===
 
-  private async verifyPeerMetadata(peer: PeerConnection, pieces: Uint8Array[]): Promise<void> {
-    if (this._complete) return
+  /** Top up a peer's requests from the pieces nobody has delivered */
+  private fill(peer: PeerConnection): void {
+    if (this._complete || this.verifying) return
+    if (this.isolatedPeer && peer !== this.isolatedPeer) return
+    const state = this.peers.get(peer)
+    if (!state) return
+
+    while (state.outstanding.size < MAX_REQUESTS_PER_PEER) {
+      const piece = this.pickPiece(state)
+      if (piece === -1) break
+      this.request(peer, state, piece)
+    }
+  }
+
+  private fillAll(): void {
+    for (const peer of this.peers.keys()) this.fill(peer)
+  }
+
+  /**
+   * Next piece to ask a peer for: an unrequested piece it hasn't failed,
+   * then one it has failed (nobody else may have it), then - near the end -
+   * a second request for a piece still outstanding at another peer.
+   */
+  private pickPiece(state: MetadataPeer): number {
+    const count = this.sources.length
+    let retry = -1
+    let duplicate = -1
+    for (let i = 0; i < count; i++) {
+      if (this.sources[i] !== null || state.outstanding.has(i)) continue
+      if (this.requestCounts[i] === 0) {
+        if (!state.failed.has(i)) return i
+        if (retry === -1) retry = i
+      } else if (this.requestCounts[i] === 1 && duplicate === -1 && !state.failed.has(i)) {
+        duplicate = i
+      }
+    }
+    return retry !== -1 ? retry : duplicate
+  }
+
+  private request(peer: PeerConnection, state: MetadataPeer, piece: number): void {
+    const timer = this.timers.schedule(REQUEST_TIMEOUT_MS, () => this.onTimeout(peer, piece))
+    state.outstanding.set(piece, timer)
+    this.requestCounts[piece]++
+    peer.sendMetadataRequest(piece)
+  }
+
+  /** Forget an outstanding request (answered, rejected or superseded) */
+  private release(state: MetadataPeer, piece: number): void {
+    const timer = state.outstanding.get(piece)
+    if (timer === undefined) return
+    this.timers.cancel(timer)
+    state.outstanding.delete(piece)
+    this.requestCounts[piece]--
+  }
+
+  private onTimeout(peer: PeerConnection, piece: number): void {
+    const state = this.peers.get(peer)
+    if (!state || !state.outstanding.has(piece)) return
+    this.logger.debug(`Metadata piece ${piece} timed out`)
+    state.outstanding.delete(piece)
+    this.requestCounts[piece]--
+    this.recordFailure(peer, state, piece)
+    this.fillAll()
+  }
+
+  private recordFailure(peer: PeerConnection, state: MetadataPeer, piece: number): void {
+    state.failed.add(piece)
+    if (++state.failures >= MAX_PEER_FAILURES) {
+      this.logger.info(`Giving up on peer for metadata after ${state.failures} failures`)
+      this.dropPeer(peer)
+    }
+  }
 
-    // Concatenate all pieces into full metadata buffer
-    const totalSize = this._metadataSize!
-    const fullBuffer = new Uint8Array(totalSize)
-    let offset = 0
-    for (const piece of pieces) {
-      fullBuffer.set(piece, offset)
-      offset += piece.length
+  private dropPeer(peer: PeerConnection): void {
+    const state = this.peers.get(peer)
+    if (!state) return
+    for (const piece of [...state.outstanding.keys()]) this.release(state, piece)
+    this.peers.delete(peer)
+    if (peer === this.isolatedPeer) {
+      this.isolatedPeer = null
+      const next = this.peers.keys().next()
+      if (!next.done) this.isolate(next.value)
     }
+  }
+
+  /** Fetch the whole dictionary from one peer, discarding any partial copy */
+  private isolate(peer: PeerConnection): void {
+    this.isolatedPeer = peer
+    this.resetPieces()
+  }
+
+  private resetPieces(): void {
+    this.sources.fill(null)
+    this._piecesReceived = 0
+  }
+
+  private stopFetching(): void {
+    this.timers.clear()
+    this.peers.clear()
+    this._data = null
+    this.sources = []
+    this.requestCounts = new Uint8Array(0)
+    this._piecesReceived = 0
+    this.isolatedPeer = null
+    this.isolating = false
+  }
+
+  private async verify(): Promise<void> {
+    if (this._complete) return
+    const fullBuffer = this._data!
 
     // SHA1 hash should match infoHash
+    this.verifying = true
     const hash = await this.sha1(fullBuffer)
+    this.verifying = false
+    if (this._complete) return
+
     if (compare(hash, this._expectedInfoHash) === 0) {
       this.logger.info('Metadata verified successfully!')
       this._complete = true
       this._buffer = fullBuffer
-      // Clean up all peer metadata buffers
-      this.peerBuffers.clear()
+      this.stopFetching()
       this.emit('metadata', fullBuffer)
+      return
+    }
+
+    this.logger.warn(
+      `Metadata hash mismatch from peer - sent info dict that doesn't match expected hash. ` +
+        `This could be: (1) peer sent invalid/corrupted data, or ` +
+        `(2) you connected with a truncated v2 info hash to a hybrid torrent ` +
+        `(use the v1 SHA-1 hash instead). Discarding this peer's metadata.`,
+    )
+
+    const contributors = new Set(this.sources)
+    if (contributors.size === 1) {
+      // One peer supplied everything: it is the bad one
+      const peer = this.sources[0]!
+      this.badPeers.add(peer)
+      this.dropPeer(peer)
+      this.resetPieces()
     } else {
-      this.logger.warn(
-        `Metadata hash mismatch from peer - sent info dict that doesn't match expected hash. ` +
-          `This could be: (1) peer sent invalid/corrupted data, or ` +
-          `(2) you connected with a truncated v2 info hash to a hybrid torrent ` +
-          `(use the v1 SHA-1 hash instead). Discarding this peer's metadata.`,
-      )
-      // Just remove this peer's buffer, other peers may still succeed
-      this.peerBuffers.delete(peer)
+      // Can't tell which contributor is bad: fetch from one peer at a time
+      this.logger.info(`Metadata came from ${contributors.size} peers, verifying them one by one`)
+      this.isolating = true
+      const next = this.peers.keys().next()
+      if (next.done) this.resetPieces()
+      else this.isolate(next.value)
     }
+    this.fillAll()
   }
 }
 
@@ -1,7 +1,35 @@
 import { IStorageHandle } from '../io/storage-handle'
+import { IFileHandle } from '../interfaces/filesystem'
 import { Bencode } from '../utils/bencode'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
 
+// === Format ===
+//
+// Header (16 bytes): magic "JSTP", version u8, 3 reserved, index capacity u32, 4 reserved
+// Index: `capacity` entries of 24 bytes:
+//   pieceIndex u32 (0xffffffff = slot free), length u32, slotCapacity u32, reserved u32,
+//   offset u64 (lo u32, hi u32)
+//   An entry with slotCapacity 0 has no slot.
+// Data: piece slots after the index, in any order. Freed slots are reused.
+//
+// All integers are little-endian.
+
+const MAGIC = [0x4a, 0x53, 0x54, 0x50] // "JSTP"
+const FORMAT_VERSION = 1
+const HEADER_SIZE = 16
+const ENTRY_SIZE = 24
+const INITIAL_INDEX_CAPACITY = 64
+const NO_PIECE = 0xffffffff
+
+interface Slot {
+  /** Index entry describing this slot */
+  entry: number
+  offset: number
+  capacity: number
+  /** Bytes of piece data in the slot */
+  length: number
+}
+
 /**
  * Manages the .parts file for storing boundary pieces.
  *
@@ -9,15 +37,27 @@ import { EngineComponent, ILoggingEngine } from '../logging/logger'
  * They are stored in the .parts file until all files they touch are un-skipped,
  * at which point they can be materialized to regular files.
  *
- * Format: Bencoded dictionary where keys are piece indices (as strings) and
- * values are the raw piece data.
+ * The file starts with a fixed index (piece → offset/length), so adding or
+ * removing a piece writes that piece and one index entry, and piece data is
+ * only read when asked for. Files in the older format (one bencoded dictionary
+ * of piece index → data) are converted on load.
  */
 export class PartsFile extends EngineComponent {
   static logName = 'parts-file'
 
   private filename: string
-  private data: Map<number, Uint8Array> = new Map()
-  private dirty = false
+  /** Pieces stored on disk */
+  private slots: Map<number, Slot> = new Map()
+  /** Slots without a piece, available for reuse */
+  private freeSlots: Slot[] = []
+  /** Index entries without a slot */
+  private unusedEntries: number[] = []
+  private indexCapacity = 0
+  private fileEnd = 0
+  /** Changes not yet flushed: data to write, or null to remove */
+  private pending: Map<number, Uint8Array | null> = new Map()
+  /** Serializes disk access so reads never see a half-moved slot */
+  private lock: Promise<unknown> = Promise.resolve()
 
   constructor(
     engine: ILoggingEngine,
@@ -33,29 +73,52 @@ export class PartsFile extends EngineComponent {
    * Get the set of piece indices currently stored in the .parts file.
    */
   get pieces(): Set<number> {
-    return new Set(this.data.keys())
+    const pieces = new Set(this.slots.keys())
+    for (const [index, data] of this.pending) {
+      if (data) pieces.add(index)
+      else pieces.delete(index)
+    }
+    return pieces
   }
 
   /**
    * Check if a piece is stored in .parts.
    */
   hasPiece(index: number): boolean {
-    return this.data.has(index)
+    const pending = this.pending.get(index)
+    if (pending !== undefined) return pending !== null
+    return this.slots.has(index)
   }
 
   /**
-   * Get piece data from .parts.
+   * Read piece data from .parts.
    */
-  getPiece(index: number): Uint8Array | undefined {
-    return this.data.get(index)
+  async readPiece(index: number): Promise<Uint8Array | undefined> {
+    const pending = this.pending.get(index)
+    if (pending !== undefined) return pending ?? undefined
+
+    return this.withLock(async () => {
+      const slot = this.slots.get(index)
+      if (!slot) return undefined
+      const handle = await this.storageHandle.getFileSystem().open(this.filename, 'r')
+      try {
+        const data = new Uint8Array(slot.length)
+        const { bytesRead } = await handle.read(data, 0, slot.length, slot.offset)
+        if (bytesRead !== slot.length) {
+          throw new Error(`short read of piece ${index}: ${bytesRead}/${slot.length} bytes`)
+        }
+        return data
+      } finally {
+        await handle.close()
+      }
+    })
   }
 
   /**
    * Add a piece to .parts (in-memory only until flush is called).
    */
   addPiece(index: number, data: Uint8Array): void {
-    this.data.set(index, data)
-    this.dirty = true
+    this.pending.set(index, data)
     this.logger.debug(`Added piece ${index} to .parts (${data.length} bytes)`)
   }
 
@@ -63,19 +126,23 @@ export class PartsFile extends EngineComponent {
    * Remove a piece from .parts (in-memory only until flush is called).
    */
   removePiece(index: number): boolean {
-    const existed = this.data.delete(index)
-    if (existed) {
-      this.dirty = true
-      this.logger.debug(`Removed piece ${index} from .parts`)
+    if (!this.hasPiece(index)) return false
+    if (this.slots.has(index)) {
+      this.pending.set(index, null)
+    } else {
+      this.pending.delete(index)
     }
-    return existed
+    this.logger.debug(`Removed piece ${index} from .parts`)
+    return true
   }
 
   /**
-   * Load the .parts file from disk.
-   * Call this on startup before using the PartsFile.
+   * Load the .parts index from disk.
+   * Call this on startup before using the PartsFile. Unflushed changes are dropped.
    */
   async load(): Promise<void> {
+    this.reset()
+    this.pending.clear()
     try {
       const fs = this.storageHandle.getFileSystem()
 
@@ -86,85 +153,88 @@ export class PartsFile extends EngineComponent {
         return
       }
 
-      // Get file size via filesystem stat
       const stat = await fs.stat(this.filename)
+      if (stat.size === 0) return
 
-      // Read the file
-      const handle = await fs.open(this.filename, 'r')
-      try {
-        const buffer = new Uint8Array(stat.size)
-        await handle.read(buffer, 0, stat.size, 0)
-
-        // Decode bencode
-        const decoded = Bencode.decode(buffer)
-        if (typeof decoded !== 'object' || decoded === null) {
-          this.logger.warn(`.parts file has invalid format, starting fresh`)
-          return
-        }
-
-        // Load pieces into map
-        let loadedCount = 0
-        for (const [key, value] of Object.entries(decoded)) {
-          const index = parseInt(key, 10)
-          if (!isNaN(index) && value instanceof Uint8Array) {
-            this.data.set(index, value)
-            loadedCount++
+      await this.withLock(async () => {
+        const handle = await fs.open(this.filename, 'r+')
+        try {
+          const header = new Uint8Array(Math.min(HEADER_SIZE, stat.size))
+          await handle.read(header, 0, header.length, 0)
+          if (isIndexedHeader(header)) {
+            await this.readIndex(handle, header, stat.size)
+            this.logger.info(`Loaded ${this.slots.size} pieces from .parts file`)
+          } else {
+            await this.migrateBencoded(handle, stat.size)
           }
+        } finally {
+          await handle.close()
         }
-
-        this.logger.info(`Loaded ${loadedCount} pieces from .parts file`)
-      } finally {
-        await handle.close()
-      }
+      })
     } catch (e) {
       // File doesn't exist or can't be read - that's ok, we start fresh
+      this.reset()
       this.logger.debug(`.parts file load failed: ${e instanceof Error ? e.message : String(e)}`)
     }
   }
 
   /**
    * Flush changes to disk.
-   * Writes directly to the .parts file with fsync for durability.
+   * Each added piece costs one data write and one index entry write; removals
+   * only rewrite the index entry. Synced for durability.
    *
    * If the .parts file becomes empty, it is deleted.
    */
   async flush(): Promise<void> {
-    if (!this.dirty) return
-
-    const fs = this.storageHandle.getFileSystem()
+    if (this.pending.size === 0) return
 
-    if (this.data.size === 0) {
-      // Delete the .parts file if empty
-      try {
-        await fs.delete(this.filename)
-        this.logger.info(`Deleted empty .parts file`)
-      } catch {
-        // File may not exist, that's fine
+    await this.withLock(async () => {
+      const fs = this.storageHandle.getFileSystem()
+      // Pending changes stay visible until they are on disk
+      const changes = new Map(this.pending)
+      const settle = () => {
+        for (const [index, data] of changes) {
+          if (this.pending.get(index) === data) this.pending.delete(index)
+        }
       }
-      this.dirty = false
-      return
-    }
-
-    // Convert map to object for bencoding
-    const obj: Record<string, Uint8Array> = {}
-    for (const [index, data] of this.data) {
-      obj[index.toString()] = data
-    }
 
-    // Encode
-    const encoded = Bencode.encode(obj)
-
-    // Write directly (io-daemon handles creation)
-    const handle = await fs.open(this.filename, 'w')
-    try {
-      await handle.write(encoded, 0, encoded.length, 0)
-      await handle.sync()
-    } finally {
-      await handle.close()
-    }
+      if (this.count === 0) {
+        // Delete the .parts file if empty
+        try {
+          await fs.delete(this.filename)
+          this.logger.info(`Deleted empty .parts file`)
+        } catch {
+          // File may not exist, that's fine
+        }
+        this.reset()
+        settle()
+        return
+      }
 
-    this.dirty = false
-    this.logger.debug(`Flushed ${this.data.size} pieces to .parts file (${encoded.length} bytes)`)
+      const handle = await fs.open(this.filename, 'r+')
+      try {
+        if (this.indexCapacity === 0) {
+          await this.createIndex(handle, changes.size)
+        }
+        let written = 0
+        for (const [index, data] of changes) {
+          if (data) {
+            await this.writePiece(handle, index, data)
+            written += data.length
+          } else {
+            await this.freePiece(handle, index)
+          }
+        }
+        await handle.sync()
+        settle()
+        this.logger.debug(
+          `Flushed ${changes.size} changes to .parts file ` +
+            `(${written} bytes, ${this.slots.size} pieces)`,
+        )
+      } finally {
+        await handle.close()
+      }
+    })
   }
 
   /**
@@ -191,13 +261,259 @@ export class PartsFile extends EngineComponent {
    * Get piece count.
    */
   get count(): number {
-    return this.data.size
+    return this.pieces.size
   }
 
   /**
    * Check if there are any pieces stored.
    */
   get isEmpty(): boolean {
-    return this.data.size === 0
+    return this.count === 0
   }
+
+  // ==========================================================================
+  // Index management
+  // ==========================================================================
+
+  private reset(): void {
+    this.slots.clear()
+    this.freeSlots = []
+    this.unusedEntries = []
+    this.indexCapacity = 0
+    this.fileEnd = 0
+  }
+
+  private withLock<T>(fn: () => Promise<T>): Promise<T> {
+    const result = this.lock.then(fn)
+    this.lock = result.catch(() => {})
+    return result
+  }
+
+  private async readIndex(handle: IFileHandle, header: Uint8Array, size: number): Promise<void> {
+    const capacity = new DataView(header.buffer, header.byteOffset).getUint32(8, true)
+    if (HEADER_SIZE + capacity * ENTRY_SIZE > size) {
+      throw new Error(`index of ${capacity} entries exceeds file size ${size}`)
+    }
+    const index = new Uint8Array(capacity * ENTRY_SIZE)
+    await handle.read(index, 0, index.length, HEADER_SIZE)
+    const view = new DataView(index.buffer)
+
+    this.indexCapacity = capacity
+    this.fileEnd = HEADER_SIZE + index.length
+    for (let entry = capacity - 1; entry >= 0; entry--) {
+      const pos = entry * ENTRY_SIZE
+      const piece = view.getUint32(pos, true)
+      const length = view.getUint32(pos + 4, true)
+      const slotCapacity = view.getUint32(pos + 8, true)
+      const offset = view.getUint32(pos + 16, true) + view.getUint32(pos + 20, true) * 2 ** 32
+      if (slotCapacity === 0 || offset + slotCapacity > size) {
+        this.unusedEntries.push(entry)
+        continue
+      }
+      const slot = { entry, offset, capacity: slotCapacity, length }
+      this.fileEnd = Math.max(this.fileEnd, offset + slotCapacity)
+      if (piece === NO_PIECE || length > slotCapacity) {
+        slot.length = 0
+        this.freeSlots.push(slot)
+      } else {
+        this.slots.set(piece, slot)
+      }
+    }
+  }
+
+  /**
+   * Convert a file in the original format (one bencoded dictionary of piece
+   * index → data) by rewriting it with an index.
+   */
+  private async migrateBencoded(handle: IFileHandle, size: number): Promise<void> {
+    const buffer = new Uint8Array(size)
+    await handle.read(buffer, 0, size, 0)
+
+    // Decode bencode
+    const decoded = Bencode.decode(buffer)
+    if (typeof decoded !== 'object' || decoded === null) {
+      this.logger.warn(`.parts file has invalid format, starting fresh`)
+      return
+    }
+    const pieces: Array<[number, Uint8Array]> = []
+    for (const [key, value] of Object.entries(decoded)) {
+      const index = parseInt(key, 10)
+      if (!isNaN(index) && value instanceof Uint8Array) {
+        pieces.push([index, value])
+      }
+    }
+    if (pieces.length === 0) {
+      this.logger.warn(`.parts file has no pieces, starting fresh`)
+      return
+    }
+
+    // Build the whole file in memory and write it in one go, like the old format did
+    const capacity = indexCapacityFor(pieces.length)
+    let end = HEADER_SIZE + capacity * ENTRY_SIZE
+    const total = pieces.reduce((sum, [, data]) => sum + data.length, end)
+    const out = new Uint8Array(total)
+    out.set(indexHeader(capacity))
+    this.indexCapacity = capacity
+    for (let entry = 0; entry < pieces.length; entry++) {
+      const [index, data] = pieces[entry]
+      const slot = { entry, offset: end, capacity: data.length, length: data.length }
+      out.set(data, end)
+      out.set(encodeEntry(index, slot), HEADER_SIZE + entry * ENTRY_SIZE)
+      this.slots.set(index, slot)
+      end += data.length
+    }
+    for (let entry = capacity - 1; entry >= pieces.length; entry--) {
+      this.unusedEntries.push(entry)
+    }
+    this.fileEnd = end
+
+    await handle.write(out, 0, out.length, 0)
+    await handle.truncate(out.length)
+    await handle.sync()
+    this.logger.info(`Migrated ${pieces.length} pieces from bencoded .parts file`)
+  }
+
+  private async createIndex(handle: IFileHandle, expectedPieces: number): Promise<void> {
+    const capacity = indexCapacityFor(expectedPieces)
+    const indexEnd = HEADER_SIZE + capacity * ENTRY_SIZE
+    const out = new Uint8Array(indexEnd)
+    out.set(indexHeader(capacity))
+    await handle.write(out, 0, out.length, 0)
+    await handle.truncate(indexEnd)
+
+    this.indexCapacity = capacity
+    this.fileEnd = indexEnd
+    this.unusedEntries = []
+    for (let entry = capacity - 1; entry >= 0; entry--) {
+      this.unusedEntries.push(entry)
+    }
+  }
+
+  /**
+   * Write a piece into its current slot if it fits, else into the smallest
+   * free slot that fits, else into a new slot at the end of the file. The
+   * data is written before the index entry that points at it.
+   */
+  private async writePiece(handle: IFileHandle, index: number, data: Uint8Array): Promise<void> {
+    let slot = this.slots.get(index)
+    if (slot && slot.capacity < data.length) {
+      await this.freePiece(handle, index)
+      slot = undefined
+    }
+    if (!slot) {
+      slot = await this.allocateSlot(handle, data.length)
+      this.slots.set(index, slot)
+    }
+    slot.length = data.length
+    await handle.write(data, 0, data.length, slot.offset)
+    await this.writeEntry(handle, index, slot)
+  }
+
+  private async freePiece(handle: IFileHandle, index: number): Promise<void> {
+    const slot = this.slots.get(index)
+    if (!slot) return
+    this.slots.delete(index)
+    slot.length = 0
+    this.freeSlots.push(slot)
+    await this.writeEntry(handle, NO_PIECE, slot)
+  }
+
+  private async allocateSlot(handle: IFileHandle, length: number): Promise<Slot> {
+    let best = -1
+    for (let i = 0; i < this.freeSlots.length; i++) {
+      const capacity = this.freeSlots[i].capacity
+      if (capacity >= length && (best < 0 || capacity < this.freeSlots[best].capacity)) {
+        best = i
+      }
+    }
+    if (best >= 0) return this.freeSlots.splice(best, 1)[0]
+
+    if (this.unusedEntries.length === 0) await this.growIndex(handle)
+    const entry = this.unusedEntries.pop()!
+    const slot = { entry, offset: this.fileEnd, capacity: length, length }
+    this.fileEnd += length
+    return slot
+  }
+
+  /**
+   * Double the index. Slots in the way are moved to the end of the file
+   * first; the header only announces the larger index once they are.
+   */
+  private async growIndex(handle: IFileHandle): Promise<void> {
+    const oldCapacity = this.indexCapacity
+    const capacity = oldCapacity * 2
+    const oldEnd = HEADER_SIZE + oldCapacity * ENTRY_SIZE
+    const newEnd = HEADER_SIZE + capacity * ENTRY_SIZE
+
+    // Free slots in the way are dropped along with their entries
+    this.freeSlots = this.freeSlots.filter((slot) => {
+      if (slot.offset >= newEnd) return true
+      this.unusedEntries.push(slot.entry)
+      return false
+    })
+    this.fileEnd = Math.max(this.fileEnd, newEnd)
+    for (const [index, slot] of this.slots) {
+      if (slot.offset >= newEnd) continue
+      const data = new Uint8Array(slot.length)
+      await handle.read(data, 0, slot.length, slot.offset)
+      await handle.write(data, 0, data.length, this.fileEnd)
+      slot.offset = this.fileEnd
+      slot.capacity = slot.length
+      this.fileEnd += slot.length
+      await this.writeEntry(handle, index, slot)
+    }
+    const empty = new Uint8Array(ENTRY_SIZE)
+    for (const entry of this.unusedEntries) {
+      await handle.write(empty, 0, ENTRY_SIZE, HEADER_SIZE + entry * ENTRY_SIZE)
+    }
+    await handle.sync()
+
+    await handle.write(new Uint8Array(newEnd - oldEnd), 0, newEnd - oldEnd, oldEnd)
+    await handle.write(indexHeader(capacity), 0, HEADER_SIZE, 0)
+    await handle.sync()
+
+    this.indexCapacity = capacity
+    for (let entry = capacity - 1; entry >= oldCapacity; entry--) {
+      this.unusedEntries.push(entry)
+    }
+    this.logger.debug(`Grew .parts index to ${capacity} entries`)
+  }
+
+  private async writeEntry(handle: IFileHandle, piece: number, slot: Slot): Promise<void> {
+    const entry = encodeEntry(piece, slot)
+    await handle.write(entry, 0, ENTRY_SIZE, HEADER_SIZE + slot.entry * ENTRY_SIZE)
+  }
+}
+
+function isIndexedHeader(header: Uint8Array): boolean {
+  return (
+    header.length === HEADER_SIZE &&
+    MAGIC.every((byte, i) => header[i] === byte) &&
+    header[4] === FORMAT_VERSION
+  )
+}
+
+function indexCapacityFor(pieces: number): number {
+  let capacity = INITIAL_INDEX_CAPACITY
+  while (capacity < pieces) capacity *= 2
+  return capacity
+}
+
+function indexHeader(capacity: number): Uint8Array {
+  const header = new Uint8Array(HEADER_SIZE)
+  header.set(MAGIC)
+  header[4] = FORMAT_VERSION
+  new DataView(header.buffer).setUint32(8, capacity, true)
+  return header
+}
+
+function encodeEntry(piece: number, slot: Slot): Uint8Array {
+  const entry = new Uint8Array(ENTRY_SIZE)
+  const view = new DataView(entry.buffer)
+  view.setUint32(0, piece, true)
+  view.setUint32(4, slot.length, true)
+  view.setUint32(8, slot.capacity, true)
+  view.setUint32(16, slot.offset % 2 ** 32, true)
+  view.setUint32(20, Math.floor(slot.offset / 2 ** 32), true)
+  return entry
 }
@@ -1,5 +1,5 @@
 /* eslint-disable @typescript-eslint/no-unsafe-declaration-merging */
-import { ITcpSocket } from '../interfaces/socket'
+import { DirectBlockEvent, ITcpSocket } from '../interfaces/socket'
 import {
   PeerWireProtocol,
   MessageType,
@@ -12,6 +12,7 @@ import { toHex } from '../utils/buffer'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
 import { SpeedCalculator } from '../utils/speed-calculator'
 import { ChunkedBuffer } from './chunked-buffer'
+import type { PeerCounters } from './peer-counters'
 
 export interface PeerConnection {
   on(event: 'connect', listener: () => void): this
@@ -47,6 +48,12 @@ export interface PeerConnection {
   close(): void
 }
 
+/** Delay before retrying a rejected switch to direct-to-disk receive */
+const DIRECT_RECEIVE_RETRY_MS = 1000
+
+/** Block event status: the daemon dropped a block that answered no request of ours */
+const DIRECT_BLOCK_NOT_REQUESTED = 3
+
 export class PeerConnection extends EngineComponent {
   static logName = 'peer'
 
@@ -58,10 +65,15 @@ export class PeerConnection extends EngineComponent {
   private sendQueue: Uint8Array[] = []
   private sendQueueBytes = 0
 
+  // Torrent-level running sums this peer reports deltas to (see attachCounters)
+  private counters: PeerCounters | null = null
+  private countedBufferedBytes = 0
+
   private send(data: Uint8Array) {
     // Queue for batched send at end of tick
     this.sendQueue.push(data)
     this.sendQueueBytes += data.length
+    this.counters?.add(0, 0, 0, data.length)
 
     // Track bytes immediately (matches previous behavior)
     this.uploaded += data.length
@@ -90,10 +102,21 @@ export class PeerConnection extends EngineComponent {
       this.socket.send(combined)
     }
 
+    this.counters?.add(0, 0, 0, -this.sendQueueBytes)
     this.sendQueue = []
     this.sendQueueBytes = 0
   }
 
+  /** Whether sends are queued for the next flush */
+  get hasQueuedSends(): boolean {
+    return this.sendQueue.length > 0
+  }
+
+  /** Bytes queued for the next flush */
+  get queuedSendBytes(): number {
+    return this.sendQueueBytes
+  }
+
   /**
    * Get the socket ID for batch send operations.
    * Returns undefined if socket doesn't expose an ID.
@@ -122,6 +145,7 @@ export class PeerConnection extends EngineComponent {
       }
     }
 
+    this.counters?.add(0, 0, 0, -this.sendQueueBytes)
     this.sendQueue = []
     this.sendQueueBytes = 0
     return result
@@ -133,15 +157,23 @@ export class PeerConnection extends EngineComponent {
   public amInterested = false
   public peerExtensions = false
   public peerFastExtension = false // BEP 6 Fast Extension support
-  public requestsPending = 0 // Number of outstanding requests
+  private _requestsPending = 0
+  /** Requests we CANCELed and already freed the pipeline slot of ("index:begin") */
+  private cancelledRequests = new Set<string>()
+  private static readonly MAX_CANCELLED_REQUESTS = 1024
 
   // Adaptive pipeline depth - starts conservative, ramps up for fast peers
-  public pipelineDepth = 50 // Current allowed depth (5-500), starts higher for faster initial fill
+  private _pipelineDepth = 50 // Allowed depth (5-500), starts higher for faster initial fill
   private blockCount = 0 // Blocks received since last rate check
   private lastRateCheckTime = 0 // Timestamp of last rate calculation
   private static readonly RATE_CHECK_INTERVAL = 1000 // Check rate every 1 second
   private static readonly MAX_PIPELINE_DEPTH = 500
   private static readonly MIN_PIPELINE_DEPTH = 5
+  /** EWMA weight for block latency samples */
+  private static readonly LATENCY_ALPHA = 0.2
+
+  /** Smoothed time from request to block arrival (ms, 0 = not measured yet) */
+  public blockLatencyMs = 0
   public peerMetadataId: number | null = null
   public peerMetadataSize: number | null = null
   public myMetadataId = 1 // Our ID for ut_metadata
@@ -157,6 +189,20 @@ export class PeerConnection extends EngineComponent {
    */
   private pendingBytes = 0
 
+  /**
+   * Direct-to-disk receive (desktop io-daemon): when 'on', PIECE payloads are
+   * written by the daemon and arrive as block events instead of buffer bytes.
+   */
+  public directReceive: 'off' | 'pending' | 'on' = 'off'
+  private directLayoutId: number | null = null
+  private directRetryAt = 0
+  // Stream bytes received so far, raw or as block events (the switch point)
+  private streamBytes = 0
+  // Raw bytes pushed into the receive buffer, used to order block events
+  private rawBytes = 0
+  // Block events waiting for the raw bytes that preceded them to be processed
+  private directBlockQueue: Array<{ event: DirectBlockEvent; rawPos: number }> = []
+
   /** Timestamp when this connection was established */
   public connectedAt: number = Date.now()
 
@@ -216,6 +262,12 @@ export class PeerConnection extends EngineComponent {
     dataLength: number,
   ) => void
 
+  /**
+   * Handler for blocks the I/O layer wrote to disk itself (direct-to-disk
+   * receive). Invoked from drainBuffer() in stream order with other messages.
+   */
+  public onDirectBlock?: (event: DirectBlockEvent) => void
+
   constructor(
     engine: ILoggingEngine,
     socket: ITcpSocket,
@@ -229,11 +281,118 @@ export class PeerConnection extends EngineComponent {
     }
 
     this.socket.onData((data) => this.handleData(data))
+    if (this.socket.onDirectBlock) {
+      this.socket.onDirectBlock((event) => this.handleDirectBlock(event))
+    }
     // Assuming ITcpSocket will be updated to support these or we wrap it
     if (this.socket.onClose) this.socket.onClose((hadError) => this.emit('close', hadError))
     if (this.socket.onError) this.socket.onError((err) => this.emit('error', err))
   }
 
+  /** Number of outstanding requests */
+  get requestsPending(): number {
+    return this._requestsPending
+  }
+
+  set requestsPending(value: number) {
+    this.counters?.add(0, value - this._requestsPending, 0, 0)
+    this._requestsPending = value
+  }
+
+  /**
+   * Free the pipeline slot of a request we CANCELed. The block may still
+   * arrive (PIECE racing CANCEL is normal), so remember the request and
+   * don't free its slot again when it does.
+   */
+  releaseCancelledRequest(index: number, begin: number): void {
+    if (this.cancelledRequests.size >= PeerConnection.MAX_CANCELLED_REQUESTS) {
+      // Peer honours its CANCELs: forget the oldest
+      const oldest = this.cancelledRequests.values().next().value
+      if (oldest !== undefined) this.cancelledRequests.delete(oldest)
+    }
+    this.cancelledRequests.add(`${index}:${begin}`)
+    if (this.requestsPending > 0) this.requestsPending--
+  }
+
+  /**
+   * Free the pipeline slot of an arrived block, unless its request was
+   * already released by a CANCEL.
+   */
+  releaseRequest(index: number, begin: number): void {
+    if (this.cancelledRequests.size > 0 && this.cancelledRequests.delete(`${index}:${begin}`)) {
+      return
+    }
+    if (this.requestsPending > 0) this.requestsPending--
+  }
+
+  /**
+   * A block requested again after a CANCEL the peer honoured: its arrival
+   * answers the new request, so it must free a slot.
+   */
+  private forgetCancelledRequest(index: number, begin: number): void {
+    if (this.cancelledRequests.size > 0) this.cancelledRequests.delete(`${index}:${begin}`)
+  }
+
+  /**
+   * Forget all outstanding requests (the peer discards them when it chokes us).
+   */
+  resetRequests(): void {
+    this.requestsPending = 0
+    this.cancelledRequests.clear()
+  }
+
+  /** Current allowed pipeline depth */
+  get pipelineDepth(): number {
+    return this._pipelineDepth
+  }
+
+  set pipelineDepth(value: number) {
+    this.counters?.add(0, 0, value - this._pipelineDepth, 0)
+    this._pipelineDepth = value
+  }
+
+  /**
+   * Start reporting counter deltas to a torrent's running sums. The peer's
+   * current values are added right away; detachCounters() removes them.
+   */
+  attachCounters(counters: PeerCounters): void {
+    if (this.counters === counters) return
+    this.detachCounters()
+    this.counters = counters
+    this.countedBufferedBytes = this.buffer.length
+    counters.addPeer(1)
+    counters.add(
+      this.countedBufferedBytes,
+      this._requestsPending,
+      this._pipelineDepth,
+      this.sendQueueBytes,
+    )
+  }
+
+  /**
+   * Stop reporting to the attached counters and take this peer's values out.
+   */
+  detachCounters(): void {
+    const counters = this.counters
+    if (!counters) return
+    this.counters = null
+    counters.addPeer(-1)
+    counters.add(
+      -this.countedBufferedBytes,
+      -this._requestsPending,
+      -this._pipelineDepth,
+      -this.sendQueueBytes,
+    )
+  }
+
+  /** Report a change in buffered bytes since the last sync */
+  private syncBufferedBytes(): void {
+    const delta = this.buffer.length - this.countedBufferedBytes
+    if (delta === 0) return
+    this.countedBufferedBytes = this.buffer.length
+    this.counters?.add(delta, 0, 0, 0)
+  }
+
   connect(port: number, host: string): Promise<void> {
     if (this.socket.connect) {
       return this.socket.connect(port, host)
@@ -255,6 +414,7 @@ export class PeerConnection extends EngineComponent {
   }
 
   sendRequest(index: number, begin: number, length: number) {
+    this.forgetCancelledRequest(index, begin)
     // Use pooled buffer to avoid allocation in hot path
     const [buffer, view] = requestMessagePool.acquire(index, begin, length)
     this.send(buffer)
@@ -298,6 +458,7 @@ export class PeerConnection extends EngineComponent {
     // Fill buffer with all requests
     let offset = 0
     for (const { index, begin, length } of requests) {
+      this.forgetCancelledRequest(index, begin)
       view.setUint32(offset, 13, false) // length = 13
       buffer[offset + 4] = MessageType.REQUEST
       view.setUint32(offset + 5, index, false)
@@ -315,6 +476,25 @@ export class PeerConnection extends EngineComponent {
     this.send(message)
   }
 
+  /**
+   * Send multiple CANCEL messages in a single write (17 bytes each, like REQUEST).
+   */
+  sendCancels(cancels: Array<{ index: number; begin: number; length: number }>) {
+    if (cancels.length === 0) return
+    const buffer = new Uint8Array(cancels.length * 17)
+    const view = new DataView(buffer.buffer)
+    let offset = 0
+    for (const { index, begin, length } of cancels) {
+      view.setUint32(offset, 13, false) // length = 13
+      buffer[offset + 4] = MessageType.CANCEL
+      view.setUint32(offset + 5, index, false)
+      view.setUint32(offset + 9, begin, false)
+      view.setUint32(offset + 13, length, false)
+      offset += 17
+    }
+    this.send(buffer)
+  }
+
   sendHave(index: number) {
     // HAVE message payload is just the index (4 bytes)
     const payload = new Uint8Array(4)
@@ -408,7 +588,10 @@ export class PeerConnection extends EngineComponent {
   private handleData(data: Uint8Array) {
     // O(1) push to chunked buffer - no copy
     this.buffer.push(data)
+    this.syncBufferedBytes()
     this.pendingBytes += data.length
+    this.rawBytes += data.length
+    this.streamBytes += data.length
 
     // Process immediately if:
     // 1. Handshake not yet received (required for connection establishment)
@@ -419,6 +602,75 @@ export class PeerConnection extends EngineComponent {
     }
   }
 
+  /**
+   * Queue a block the I/O layer has written in direct-to-disk mode.
+   * Counted like the PIECE message it replaced; dispatched by drainBuffer().
+   */
+  private handleDirectBlock(event: DirectBlockEvent) {
+    this.directBlockQueue.push({ event, rawPos: this.rawBytes })
+    // 4 (len) + 1 (type) + 4 (index) + 4 (begin) + data
+    const wireBytes = 13 + event.length
+    this.pendingBytes += wireBytes
+    this.streamBytes += wireBytes
+
+    if (this.engine.autoDrainBuffers) {
+      this.drainBuffer()
+    }
+  }
+
+  /**
+   * Ask the socket to switch to direct-to-disk receive with the given layout.
+   * Only attempted once every received byte has been processed; the I/O layer
+   * checks that offset against what it has delivered and rejects on a
+   * mismatch, in which case this is retried on a later tick.
+   */
+  enableDirectReceive(layoutId: number): void {
+    if (!this.socket.enableDirectReceive || this.directReceive === 'pending') return
+    if (this.directReceive === 'on' && this.directLayoutId === layoutId) return
+    if (!this.handshakeReceived || this.isEncrypted || this.buffer.length > 0) return
+    const now = Date.now()
+    if (now < this.directRetryAt) return
+
+    const previous = this.directReceive
+    this.directReceive = 'pending'
+    this.socket.enableDirectReceive(layoutId, this.streamBytes).then(
+      () => {
+        this.directReceive = 'on'
+        this.directLayoutId = layoutId
+      },
+      () => {
+        this.directReceive = previous
+        this.directRetryAt = Date.now() + DIRECT_RECEIVE_RETRY_MS
+      },
+    )
+  }
+
+  /**
+   * Dispatch queued direct blocks whose preceding raw bytes have been processed.
+   * Returns false if the connection was closed by a handler error.
+   */
+  private dispatchDirectBlocks(): boolean {
+    const consumed = this.rawBytes - this.buffer.length
+    const queue = this.directBlockQueue
+    let i = 0
+    while (i < queue.length && queue[i].rawPos <= consumed) {
+      const { event } = queue[i++]
+      if (event.status !== DIRECT_BLOCK_NOT_REQUESTED) {
+        this.releaseRequest(event.index, event.begin)
+      }
+      try {
+        this.onDirectBlock?.(event)
+      } catch (err) {
+        this.logger.error('Error in onDirectBlock handler:', { err })
+        this.directBlockQueue = []
+        this.close()
+        return false
+      }
+    }
+    if (i > 0) queue.splice(0, i)
+    return true
+  }
+
   /**
    * Drain the receive buffer and process accumulated data.
    * Called by tick loop to perform all processing at once.
@@ -437,6 +689,7 @@ export class PeerConnection extends EngineComponent {
 
     // Process protocol messages
     this.processBuffer()
+    this.syncBufferedBytes()
   }
 
   /**
@@ -472,6 +725,8 @@ export class PeerConnection extends EngineComponent {
     }
 
     while (this.buffer.length > 4) {
+      if (this.directBlockQueue.length > 0 && !this.dispatchDirectBlocks()) return
+
       const length = this.buffer.peekUint32(0)
       if (length === null) break
 
@@ -503,10 +758,8 @@ export class PeerConnection extends EngineComponent {
             // Note: pendingBytes was already incremented in handleData() when the socket received this data.
             // Do NOT add to pendingBytes here - that would cause double-counting.
 
-            // Decrement requestsPending (matching handleMessage PIECE behavior)
-            if (this.requestsPending > 0) {
-              this.requestsPending--
-            }
+            // Free the pipeline slot (matching handleMessage PIECE behavior)
+            this.releaseRequest(pieceIndex, blockOffset)
 
             continue
           }
@@ -526,6 +779,8 @@ export class PeerConnection extends EngineComponent {
         return
       }
     }
+
+    if (this.directBlockQueue.length > 0) this.dispatchDirectBlocks()
   }
 
   private handleMessage(message: WireMessage) {
@@ -814,6 +1069,17 @@ export class PeerConnection extends EngineComponent {
     }
   }
 
+  /**
+   * Record the time from requesting a block to receiving it. Includes the
+   * peer's queue, so it reflects both RTT and throughput.
+   */
+  recordBlockLatency(ms: number): void {
+    this.blockLatencyMs =
+      this.blockLatencyMs === 0
+        ? ms
+        : this.blockLatencyMs + PeerConnection.LATENCY_ALPHA * (ms - this.blockLatencyMs)
+  }
+
   /**
    * Reduce pipeline depth - called on choke as a congestion signal.
    * Uses multiplicative decrease (halve) for faster recovery from congestion.
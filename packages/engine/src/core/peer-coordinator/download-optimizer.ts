@@ -79,8 +79,7 @@ export class DownloadOptimizer {
     const skipSpeedChecks = context?.skipSpeedChecks ?? false
 
     // Calculate average download rate (excluding choked peers)
-    const unchokingPeers = peers.filter((p) => !p.peerChoking)
-    const avgRate = this.calculateAverageRate(unchokingPeers)
+    const avgRate = this.calculateAverageRate(peers)
 
     for (const peer of peers) {
       const decision = this.evaluatePeer(peer, protectedIds, avgRate, now, skipSpeedChecks)
@@ -203,11 +202,16 @@ export class DownloadOptimizer {
   }
 
   /**
-   * Calculate average download rate across peers.
+   * Calculate average download rate across peers that are not choking us.
    */
   private calculateAverageRate(peers: DownloadPeerSnapshot[]): number {
-    if (peers.length === 0) return 0
-    const total = peers.reduce((sum, p) => sum + p.downloadRate, 0)
-    return total / peers.length
+    let total = 0
+    let count = 0
+    for (const peer of peers) {
+      if (peer.peerChoking) continue
+      total += peer.downloadRate
+      count++
+    }
+    return count === 0 ? 0 : total / count
   }
 }
@@ -2,4 +2,5 @@
 export { PeerCoordinator } from './peer-coordinator'
 export { UnchokeAlgorithm, DEFAULT_UNCHOKE_CONFIG } from './unchoke-algorithm'
 export { DownloadOptimizer, DEFAULT_DOWNLOAD_CONFIG } from './download-optimizer'
+export { selectTopK, WeightedSampler } from './selection'
 export * from './types'
@@ -0,0 +1,95 @@
+/**
+ * Allocation-free selection helpers for the peer coordinator.
+ *
+ * Both run once per choke round over every connected peer, so they reuse
+ * their scratch storage between calls instead of building arrays per call.
+ */
+
+/**
+ * Select the k items with the highest score into `out`, highest first.
+ *
+ * Equivalent to a stable descending sort followed by `slice(0, k)`: ties keep
+ * their input order. Runs in O(n·k), which beats sorting for the small k used
+ * by upload slots.
+ *
+ * @returns `out`, truncated to at most k items
+ */
+export function selectTopK<T>(
+  items: readonly T[],
+  k: number,
+  score: (item: T) => number,
+  out: T[],
+  filter?: (item: T) => boolean,
+): T[] {
+  out.length = 0
+  if (k <= 0) return out
+
+  for (let i = 0; i < items.length; i++) {
+    const item = items[i]
+    if (filter && !filter(item)) continue
+    const s = score(item)
+    if (out.length === k && s <= score(out[k - 1])) continue
+
+    // Insert after every item with an equal or higher score (stable)
+    let pos = out.length < k ? out.length : k - 1
+    if (out.length < k) out.push(item)
+    while (pos > 0 && score(out[pos - 1]) < s) {
+      out[pos] = out[pos - 1]
+      pos--
+    }
+    out[pos] = item
+  }
+  return out
+}
+
+/**
+ * Weighted random sampler over prefix sums.
+ *
+ * Picks the same item as expanding every item `weight` times into an array
+ * and indexing it with `floor(random() * length)`, without the expansion.
+ * The prefix-sum buffer grows as needed and is reused across calls.
+ */
+export class WeightedSampler<T> {
+  private prefix = new Float64Array(64)
+  private indices = new Uint32Array(64)
+
+  constructor(private random: () => number = Math.random) {}
+
+  /**
+   * Pick one of `items`, weighted by `weight`. Items with a weight of zero
+   * (or below) are never picked.
+   *
+   * @returns The picked item, or null if the total weight is zero
+   */
+  sample(items: readonly T[], weight: (item: T) => number): T | null {
+    if (this.prefix.length < items.length) {
+      let size = this.prefix.length
+      while (size < items.length) size *= 2
+      this.prefix = new Float64Array(size)
+      this.indices = new Uint32Array(size)
+    }
+
+    let total = 0
+    let count = 0
+    for (let i = 0; i < items.length; i++) {
+      const w = weight(items[i])
+      if (w <= 0) continue
+      total += w
+      this.prefix[count] = total
+      this.indices[count] = i
+      count++
+    }
+    if (count === 0) return null
+
+    // First item whose cumulative weight exceeds the target
+    const target = Math.floor(this.random() * total)
+    let lo = 0
+    let hi = count - 1
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1
+      if (this.prefix[mid] > target) hi = mid
+      else lo = mid + 1
+    }
+    return items[this.indices[lo]]
+  }
+}
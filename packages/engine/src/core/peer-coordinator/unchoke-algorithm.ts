@@ -4,6 +4,7 @@ import {
   UnchokeAlgorithmConfig,
   UnchokeAlgorithmState,
 } from './types'
+import { selectTopK, WeightedSampler } from './selection'
 
 // ============================================================================
 // Default Configuration
@@ -32,12 +33,20 @@ export const DEFAULT_UNCHOKE_CONFIG: UnchokeAlgorithmConfig = {
  *
  * This class is pure - no I/O, no side effects. Time is injected via clock.
  * Feed it snapshots, get back decisions.
+ *
+ * Selection is allocation-free: tit-for-tat peers are picked with a top-k
+ * pass instead of a sort, and the optimistic peer with a prefix-sum sampler
+ * instead of an array holding each candidate once per unit of weight.
  */
 export class UnchokeAlgorithm {
   private config: UnchokeAlgorithmConfig
   private state: UnchokeAlgorithmState
   private clock: () => number
-  private random: () => number
+  private sampler: WeightedSampler<UnchokePeerSnapshot>
+  /** Reused tit-for-tat selection, valid until the next evaluation */
+  private titForTatPeers: UnchokePeerSnapshot[] = []
+  /** Evaluation time, read by optimisticWeight */
+  private now = 0
 
   constructor(
     config: Partial<UnchokeAlgorithmConfig> = {},
@@ -46,7 +55,7 @@ export class UnchokeAlgorithm {
   ) {
     this.config = { ...DEFAULT_UNCHOKE_CONFIG, ...config }
     this.clock = clock
-    this.random = random
+    this.sampler = new WeightedSampler(random)
     this.state = {
       lastChokeEvaluation: -1, // -1 indicates never evaluated
       lastOptimisticRotation: -1, // -1 indicates never rotated
@@ -92,32 +101,38 @@ export class UnchokeAlgorithm {
 
     // === Core algorithm ===
 
-    const interested = peers.filter((p) => p.peerInterested)
-
-    // 1. Tit-for-tat: top N-1 by download rate
+    // 1. Tit-for-tat: top N-1 interested peers by download rate
     const regularSlots = this.config.maxUploadSlots - 1
-    const byDownloadRate = [...interested].sort((a, b) => b.downloadRate - a.downloadRate)
-    const titForTatPeers = byDownloadRate.slice(0, regularSlots)
+    const titForTatPeers = selectTopK(
+      peers,
+      regularSlots,
+      byDownloadRate,
+      this.titForTatPeers,
+      isInterested,
+    )
 
     // 2. Optimistic peer selection
     let optimisticPeer: UnchokePeerSnapshot | null = null
-    const titForTatIds = new Set(titForTatPeers.map((p) => p.id))
 
     // Need new optimistic if: rotation due, invalid, or current optimistic is now in tit-for-tat
-    const currentOptimisticInTitForTat = titForTatIds.has(this.state.optimisticPeerId ?? '')
+    const currentOptimisticInTitForTat = this.isTitForTat(this.state.optimisticPeerId)
     const needNewOptimistic =
       shouldRotateOptimistic || !this.isValidOptimistic(peers) || currentOptimisticInTitForTat
 
     if (needNewOptimistic) {
-      optimisticPeer = this.selectOptimisticPeer(peers, titForTatPeers, now)
+      optimisticPeer = this.selectOptimisticPeer(peers, now)
       this.state.optimisticPeerId = optimisticPeer?.id ?? null
     } else {
       // Keep current optimistic if still valid and not promoted to tit-for-tat
-      optimisticPeer = interested.find((p) => p.id === this.state.optimisticPeerId) ?? null
+      optimisticPeer =
+        peers.find((p) => p.peerInterested && p.id === this.state.optimisticPeerId) ?? null
     }
 
     // 3. Build final unchoke set
-    const shouldUnchoke = new Set<string>(titForTatPeers.map((p) => p.id))
+    const shouldUnchoke = new Set<string>()
+    for (const peer of titForTatPeers) {
+      shouldUnchoke.add(peer.id)
+    }
     if (optimisticPeer) {
       shouldUnchoke.add(optimisticPeer.id)
     }
@@ -206,34 +221,38 @@ export class UnchokeAlgorithm {
     return peer?.peerInterested ?? false
   }
 
+  /**
+   * Check if a peer holds one of the current tit-for-tat slots.
+   */
+  private isTitForTat(peerId: string | null): boolean {
+    if (peerId === null) return false
+    for (const peer of this.titForTatPeers) {
+      if (peer.id === peerId) return true
+    }
+    return false
+  }
+
   /**
    * Select new optimistic peer with 3x weighting for new connections.
    */
   private selectOptimisticPeer(
     peers: UnchokePeerSnapshot[],
-    titForTatPeers: UnchokePeerSnapshot[],
     now: number,
   ): UnchokePeerSnapshot | null {
-    const titForTatIds = new Set(titForTatPeers.map((p) => p.id))
-
-    // Candidates: interested peers NOT already in tit-for-tat slots
-    const candidates = peers.filter((p) => p.peerInterested && !titForTatIds.has(p.id))
-
-    if (candidates.length === 0) return null
-
-    // Weight by connection age
-    const weighted: UnchokePeerSnapshot[] = []
-    for (const peer of candidates) {
-      const age = now - peer.connectedAt
-      const isNew = age < this.config.newPeerThresholdMs
-      const weight = isNew ? this.config.newPeerWeight : 1
-      for (let i = 0; i < weight; i++) {
-        weighted.push(peer)
-      }
-    }
+    this.now = now
+    return this.sampler.sample(peers, this.optimisticWeight)
+  }
 
-    // Random selection
-    const index = Math.floor(this.random() * weighted.length)
-    return weighted[index]
+  /**
+   * Optimistic weight of a peer: zero unless it is an interested peer outside
+   * the tit-for-tat slots, boosted for new connections.
+   */
+  private optimisticWeight = (peer: UnchokePeerSnapshot): number => {
+    if (!peer.peerInterested || this.isTitForTat(peer.id)) return 0
+    const age = this.now - peer.connectedAt
+    return age < this.config.newPeerThresholdMs ? this.config.newPeerWeight : 1
   }
 }
+
+const isInterested = (peer: UnchokePeerSnapshot): boolean => peer.peerInterested
+const byDownloadRate = (peer: UnchokePeerSnapshot): number => peer.downloadRate
@@ -0,0 +1,87 @@
+const COUNTER_KEYS = [
+  'bufferedBytes',
+  'requestsPending',
+  'pipelineDepth',
+  'queuedSendBytes',
+  'peers',
+] as const
+
+export type PeerCounterValues = Pick<PeerCounters, (typeof COUNTER_KEYS)[number]>
+
+/**
+ * Running sums of per-peer counters, maintained incrementally.
+ *
+ * PeerConnection pushes a delta whenever one of its counters changes, so
+ * torrent- and engine-wide totals (backpressure, tick results) are O(1)
+ * instead of a pass over every connected peer. Torrent counters forward
+ * deltas to the engine's counters.
+ */
+export class PeerCounters {
+  /** Received bytes waiting in peer buffers for the tick to process */
+  bufferedBytes = 0
+  /** Outstanding block requests */
+  requestsPending = 0
+  /** Sum of allowed pipeline depths */
+  pipelineDepth = 0
+  /** Bytes queued for the next flush */
+  queuedSendBytes = 0
+  /** Peers currently attached */
+  peers = 0
+
+  constructor(private parent: PeerCounters | null = null) {}
+
+  add(bufferedBytes: number, requestsPending: number, pipelineDepth: number, queued: number): void {
+    this.bufferedBytes += bufferedBytes
+    this.requestsPending += requestsPending
+    this.pipelineDepth += pipelineDepth
+    this.queuedSendBytes += queued
+    this.parent?.add(bufferedBytes, requestsPending, pipelineDepth, queued)
+  }
+
+  addPeer(delta: 1 | -1): void {
+    this.peers += delta
+    this.parent?.addPeer(delta)
+  }
+
+  /**
+   * Compare against totals recomputed from the given sources and return a
+   * description of each mismatch. Used by debug invariant checks.
+   */
+  diff(actual: PeerCounterValues): string[] {
+    const mismatches: string[] = []
+    for (const key of COUNTER_KEYS) {
+      if (this[key] !== actual[key]) {
+        mismatches.push(`${key}: counted ${this[key]}, actual ${actual[key]}`)
+      }
+    }
+    return mismatches
+  }
+}
+
+/**
+ * Recompute counter values the slow way, from a list of peers.
+ */
+export function sumPeerCounters(
+  peers: Iterable<{
+    bufferedBytes: number
+    requestsPending: number
+    pipelineDepth: number
+    queuedSendBytes: number
+  }>,
+): PeerCounterValues {
+  const values = {
+    bufferedBytes: 0,
+    requestsPending: 0,
+    pipelineDepth: 0,
+    queuedSendBytes: 0,
+    peers: 0,
+  }
+  for (const peer of peers) {
+    values.bufferedBytes += peer.bufferedBytes
+    values.requestsPending += peer.requestsPending
+    values.pipelineDepth += peer.pipelineDepth
+    values.queuedSendBytes += peer.queuedSendBytes
+    values.peers++
+  }
+  return values
+}
@@ -1,10 +1,109 @@
 import type { Swarm, SwarmPeer } from './swarm'
-import { getPortScorePenalty } from './swarm'
+import { addressKey, getPortScorePenalty } from './swarm'
 
 // ============================================================================
 // PeerSelector
 // ============================================================================
 
+/**
+ * Cached selector state for one swarm peer.
+ */
+interface CandidateEntry {
+  key: string
+  peer: SwarmPeer
+  /** Score when last classified (includes the random jitter) */
+  score: number
+  /** Index in the candidate heap, -1 when not in it */
+  heapIndex: number
+  /** When eligibility or score next changes (backoff expiry, rescore), 0 if never */
+  wakeAt: number
+  /** Index in the wake heap, -1 when not in it */
+  wakeIndex: number
+  /** Index in the suspicious-port pool, -1 when not in it */
+  poolIndex: number
+}
+
+/**
+ * Binary heap of entries that tracks each entry's position, so entries can
+ * be removed or reordered in O(log n) when their peer changes.
+ */
+class EntryHeap {
+  readonly items: CandidateEntry[] = []
+
+  constructor(
+    private readonly before: (a: CandidateEntry, b: CandidateEntry) => boolean,
+    private readonly index: 'heapIndex' | 'wakeIndex',
+  ) {}
+
+  get size(): number {
+    return this.items.length
+  }
+
+  peek(): CandidateEntry | undefined {
+    return this.items[0]
+  }
+
+  push(entry: CandidateEntry): void {
+    entry[this.index] = this.items.length
+    this.items.push(entry)
+    this.siftUp(this.items.length - 1)
+  }
+
+  pop(): CandidateEntry | undefined {
+    const top = this.items[0]
+    if (top) this.remove(top)
+    return top
+  }
+
+  remove(entry: CandidateEntry): void {
+    const i = entry[this.index]
+    if (i < 0) return
+    entry[this.index] = -1
+    const last = this.items.pop()!
+    if (last === entry) return
+    this.items[i] = last
+    last[this.index] = i
+    this.siftUp(i)
+    this.siftDown(last[this.index])
+  }
+
+  clear(): void {
+    for (const entry of this.items) entry[this.index] = -1
+    this.items.length = 0
+  }
+
+  private siftUp(i: number): void {
+    const items = this.items
+    const entry = items[i]
+    while (i > 0) {
+      const parent = (i - 1) >> 1
+      if (!this.before(entry, items[parent])) break
+      items[i] = items[parent]
+      items[i][this.index] = i
+      i = parent
+    }
+    items[i] = entry
+    entry[this.index] = i
+  }
+
+  private siftDown(i: number): void {
+    const items = this.items
+    const entry = items[i]
+    const n = items.length
+    for (;;) {
+      let child = 2 * i + 1
+      if (child >= n) break
+      if (child + 1 < n && this.before(items[child + 1], items[child])) child++
+      if (!this.before(items[child], entry)) break
+      items[i] = items[child]
+      items[i][this.index] = i
+      i = child
+    }
+    items[i] = entry
+    entry[this.index] = i
+  }
+}
+
 /**
  * Handles peer selection for connection attempts.
  *
@@ -13,10 +112,33 @@ import { getPortScorePenalty } from './swarm'
  * - Filtering eligible candidates (not connected, not in backoff, not banned)
  * - Returning ranked candidates for ConnectionManager
  *
- * Future: candidate caching, round-robin scanning, score caching
+ * Selection is incremental: Swarm change events mark peers dirty, and only
+ * dirty peers are re-classified on the next query. Eligible peers sit in a
+ * max-heap by cached score; peers in backoff (and peers whose recent-attempt
+ * penalty is about to lapse) sit in a min-heap by the time that happens and
+ * are re-classified when it passes. A query costs O(changes + k log n)
+ * instead of scoring the whole swarm.
+ *
+ * A peer's random jitter is drawn when it is scored, so its order is stable
+ * until something about it changes.
  */
 export class PeerSelector {
-  constructor(private readonly swarm: Swarm) {}
+  private readonly entries = new Map<string, CandidateEntry>()
+  private readonly dirty = new Set<string>()
+  private readonly candidates = new EntryHeap((a, b) => a.score > b.score, 'heapIndex')
+  private readonly waiting = new EntryHeap((a, b) => a.wakeAt < b.wakeAt, 'wakeIndex')
+  /** Eligible suspicious-port peers, only used as a last resort */
+  private readonly suspicious: CandidateEntry[] = []
+
+  constructor(
+    private readonly swarm: Swarm,
+    private readonly now: () => number = () => Date.now(),
+  ) {
+    swarm.on('peerChanged', (key: string) => this.dirty.add(key))
+    swarm.on('peerRemoved', (key: string) => this.dirty.add(key))
+    swarm.on('cleared', () => this.reset())
+    for (const peer of swarm.getAllPeersArray()) this.dirty.add(addressKey(peer))
+  }
 
   /**
    * Get peers eligible for connection attempts.
@@ -25,56 +147,25 @@ export class PeerSelector {
    * Suspicious port peers are returned last (only as last resort).
    */
   getConnectablePeers(limit: number): SwarmPeer[] {
-    const now = Date.now()
-    const normalCandidates: SwarmPeer[] = []
-    const suspiciousCandidates: SwarmPeer[] = []
-
-    // Collect eligible candidates, separating suspicious ports
-    for (const peer of this.swarm.getAllPeersArray()) {
-      if (peer.state === 'connected' || peer.state === 'connecting') continue
-      if (peer.state === 'banned') continue
-
-      // Check backoff for failed peers
-      if (peer.state === 'failed' && peer.lastConnectAttempt) {
-        const backoffMs = this.calculateBackoff(peer.connectFailures)
-        if (now - peer.lastConnectAttempt < backoffMs) continue
-      }
-
-      // Check backoff for quick disconnects (idle peers that disconnect rapidly)
-      if (peer.state === 'idle' && peer.quickDisconnects > 0 && peer.lastDisconnect) {
-        const backoffMs = this.calculateBackoff(peer.quickDisconnects)
-        if (now - peer.lastDisconnect < backoffMs) continue
-      }
-
-      // Separate suspicious ports - they go last
-      if (peer.suspiciousPort) {
-        suspiciousCandidates.push(peer)
-      } else {
-        normalCandidates.push(peer)
-      }
-    }
-
-    // Score and sort normal candidates
-    const scoredNormal = normalCandidates.map((peer) => ({
-      peer,
-      score: this.calculatePeerScore(peer, now),
-    }))
-    scoredNormal.sort((a, b) => b.score - a.score)
-
-    // Shuffle suspicious candidates (they're all equally bad)
-    this.shuffle(suspiciousCandidates)
-
-    // Return normal peers first, then suspicious as last resort
+    this.refresh(this.now())
     const result: SwarmPeer[] = []
-    for (const { peer } of scoredNormal) {
-      if (result.length >= limit) break
-      result.push(peer)
+    if (limit <= 0) return result
+
+    // Take the best from the heap, then put them back: the caller may not
+    // connect to all of them
+    const taken: CandidateEntry[] = []
+    while (taken.length < limit && this.candidates.size > 0) {
+      const entry = this.candidates.pop()!
+      taken.push(entry)
+      result.push(entry.peer)
     }
+    for (const entry of taken) this.candidates.push(entry)
 
-    // Only add suspicious peers if we still need more
-    for (const peer of suspiciousCandidates) {
-      if (result.length >= limit) break
-      result.push(peer)
+    // Suspicious ports are all equally bad: pick at random
+    const pool = this.suspicious
+    for (let i = 0; result.length < limit && i < pool.length; i++) {
+      this.swapPool(i, i + Math.floor(Math.random() * (pool.length - i)))
+      result.push(pool[i].peer)
     }
 
     return result
@@ -85,29 +176,138 @@ export class PeerSelector {
    * More efficient than getConnectablePeers(1).length > 0 when we just need a boolean.
    */
   hasConnectablePeers(): boolean {
-    const now = Date.now()
+    this.refresh(this.now())
+    return this.candidates.size > 0 || this.suspicious.length > 0
+  }
 
-    for (const peer of this.swarm.getAllPeersArray()) {
-      if (peer.state === 'connected' || peer.state === 'connecting') continue
-      if (peer.state === 'banned') continue
+  // --- Candidate cache ---
 
-      // Check backoff for failed peers
-      if (peer.state === 'failed' && peer.lastConnectAttempt) {
-        const backoffMs = this.calculateBackoff(peer.connectFailures)
-        if (now - peer.lastConnectAttempt < backoffMs) continue
+  /**
+   * Re-classify peers that changed since the last query and peers whose
+   * backoff or score changed with time.
+   */
+  private refresh(now: number): void {
+    if (this.dirty.size > 0) {
+      for (const key of this.dirty) {
+        const peer = this.swarm.getPeerByKey(key)
+        let entry = this.entries.get(key)
+        if (!peer) {
+          if (entry) this.drop(entry)
+          continue
+        }
+        if (!entry || entry.peer !== peer) {
+          if (entry) this.drop(entry)
+          entry = {
+            key,
+            peer,
+            score: 0,
+            heapIndex: -1,
+            wakeAt: 0,
+            wakeIndex: -1,
+            poolIndex: -1,
+          }
+          this.entries.set(key, entry)
+        }
+        this.classify(entry, now)
       }
+      this.dirty.clear()
+    }
 
-      // Check backoff for quick disconnects
-      if (peer.state === 'idle' && peer.quickDisconnects > 0 && peer.lastDisconnect) {
-        const backoffMs = this.calculateBackoff(peer.quickDisconnects)
-        if (now - peer.lastDisconnect < backoffMs) continue
-      }
+    for (let next = this.waiting.peek(); next && next.wakeAt <= now; next = this.waiting.peek()) {
+      this.classify(next, now)
+    }
+  }
+
+  /**
+   * Place a peer in the structure matching its current state.
+   */
+  private classify(entry: CandidateEntry, now: number): void {
+    this.unlink(entry)
+    const peer = entry.peer
+    if (peer.state === 'connected' || peer.state === 'connecting') return
+    if (peer.state === 'banned') return
+
+    const backoffUntil = this.backoffUntil(peer)
+    if (backoffUntil > now) {
+      this.wakeAt(entry, backoffUntil)
+      return
+    }
+
+    // Separate suspicious ports - they go last
+    if (peer.suspiciousPort) {
+      entry.poolIndex = this.suspicious.length
+      this.suspicious.push(entry)
+      return
+    }
+
+    entry.score = this.calculatePeerScore(peer, now)
+    this.candidates.push(entry)
+
+    // The recent-attempt penalty steps down at 30s and 60s: rescore then
+    if (peer.lastConnectAttempt) {
+      const timeSince = now - peer.lastConnectAttempt
+      if (timeSince < 30000) this.wakeAt(entry, peer.lastConnectAttempt + 30000)
+      else if (timeSince < 60000) this.wakeAt(entry, peer.lastConnectAttempt + 60000)
+    }
+  }
+
+  /**
+   * When the peer's backoff ends (0 if it isn't in backoff).
+   */
+  private backoffUntil(peer: SwarmPeer): number {
+    // Backoff for failed peers
+    if (peer.state === 'failed' && peer.lastConnectAttempt) {
+      return peer.lastConnectAttempt + this.calculateBackoff(peer.connectFailures)
+    }
+    // Backoff for quick disconnects (idle peers that disconnect rapidly)
+    if (peer.state === 'idle' && peer.quickDisconnects > 0 && peer.lastDisconnect) {
+      return peer.lastDisconnect + this.calculateBackoff(peer.quickDisconnects)
+    }
+    return 0
+  }
 
-      // Found at least one eligible peer
-      return true
+  private wakeAt(entry: CandidateEntry, time: number): void {
+    entry.wakeAt = time
+    this.waiting.push(entry)
+  }
+
+  /**
+   * Remove an entry from the candidate heap, wake heap and suspicious pool.
+   */
+  private unlink(entry: CandidateEntry): void {
+    this.candidates.remove(entry)
+    this.waiting.remove(entry)
+    if (entry.poolIndex >= 0) {
+      const pool = this.suspicious
+      const last = pool.pop()!
+      if (last !== entry) {
+        pool[entry.poolIndex] = last
+        last.poolIndex = entry.poolIndex
+      }
+      entry.poolIndex = -1
     }
+  }
+
+  private drop(entry: CandidateEntry): void {
+    this.unlink(entry)
+    this.entries.delete(entry.key)
+  }
+
+  private reset(): void {
+    this.candidates.clear()
+    this.waiting.clear()
+    this.suspicious.length = 0
+    this.entries.clear()
+    this.dirty.clear()
+  }
 
-    return false
+  private swapPool(i: number, j: number): void {
+    const pool = this.suspicious
+    const a = pool[i]
+    pool[i] = pool[j]
+    pool[j] = a
+    pool[i].poolIndex = i
+    pool[j].poolIndex = j
   }
 
   // --- Scoring ---
@@ -179,13 +379,4 @@ export class PeerSelector {
   private calculateBackoff(failures: number): number {
     return Math.min(1000 * Math.pow(2, failures), 5 * 60 * 1000)
   }
-
-  // --- Helpers ---
-
-  private shuffle<T>(array: T[]): void {
-    for (let i = array.length - 1; i > 0; i--) {
-      const j = Math.floor(Math.random() * (i + 1))
-      ;[array[i], array[j]] = [array[j], array[i]]
-    }
-  }
 }
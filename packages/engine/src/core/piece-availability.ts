@@ -1,4 +1,5 @@
 import { BitField } from '../utils/bitfield'
+import { MAP_ENTRY_BYTES } from '../utils/memory-estimate'
 
 /**
  * Tracks piece availability across connected peers for rarest-first selection.
@@ -58,6 +59,17 @@ export class PieceAvailability {
     return this._availability[index] + this._seedCount
   }
 
+  /**
+   * Estimated bytes held by the availability counts and per-peer piece sets.
+   */
+  get memoryBytes(): number {
+    let total = this._availability?.byteLength ?? 0
+    for (const pieces of this._peerPieceIndex.values()) {
+      total += (pieces.size + 1) * MAP_ENTRY_BYTES
+    }
+    return total
+  }
+
   /**
    * Get the piece index for a specific peer (for candidate selection).
    */
@@ -1,7 +1,7 @@
 import { BLOCK_SIZE } from './active-piece'
 import { ActivePieceManager } from './active-piece-manager'
 import { PieceAvailability } from './piece-availability'
-import { EndgameManager } from './endgame-manager'
+import { EndgameManager, UNMEASURED_BLOCK_LATENCY_MS } from './endgame-manager'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
 import { BitField } from '../utils/bitfield'
 
@@ -33,6 +33,9 @@ export interface RequestablePeer {
   /** Number of outstanding requests to this peer */
   requestsPending: number
 
+  /** Smoothed time from request to block arrival (ms, 0 = not measured yet) */
+  blockLatencyMs?: number
+
   /** Record that a block was received (for adaptive pipeline) */
   recordBlockReceived(): void
 
@@ -102,8 +105,11 @@ export interface PieceRequesterDeps {
   /** Get current download rate limit (bytes/sec) */
   getDownloadRateLimit(): number
 
-  /** Try to consume bandwidth for a block. Returns false if rate limited. */
-  tryConsumeDownloadBandwidth(bytes: number): boolean
+  /**
+   * Try to consume bandwidth for a block requested from a peer. Returns false
+   * if rate limited (the peer has used its share for now).
+   */
+  tryConsumeDownloadBandwidth(peer: RequestablePeer, bytes: number): boolean
 
   // === Callbacks ===
 
@@ -189,10 +195,19 @@ export class TorrentPieceRequester extends EngineComponent {
 
     const peerId = this.deps.getPeerId(peer)
     const peerBitfield = peer.bitfield
-    const isEndgame = this.deps.getEndgameManager().isEndgame
+    const endgame = this.deps.getEndgameManager()
+    const isEndgame = endgame.isEndgame
     const peerIsFast = peer.isFast
     const availability = this.deps.getAvailability()
 
+    // When blocks requested now should arrive, and in endgame which blocks
+    // are worth duplicating to this peer
+    const blockLatencyMs = peer.blockLatencyMs || 0
+    const expectedAt = now + (blockLatencyMs || UNMEASURED_BLOCK_LATENCY_MS)
+    const duplicateFilter = isEndgame
+      ? endgame.createDuplicateFilter(blockLatencyMs, now, activePieces.duplicateRequestCount)
+      : undefined
+
     // Collect requests for batched sending (reduces FFI overhead)
     const pendingRequests: Array<{ index: number; begin: number; length: number }> = []
 
@@ -237,7 +252,11 @@ export class TorrentPieceRequester extends EngineComponent {
 
         // Get blocks we can request from this piece
         const neededBlocks = isEndgame
-          ? piece.getNeededBlocksEndgame(peerId, pipelineLimit - peer.requestsPending)
+          ? piece.getNeededBlocksEndgame(
+              peerId,
+              pipelineLimit - peer.requestsPending,
+              duplicateFilter,
+            )
           : piece.getNeededBlocks(pipelineLimit - peer.requestsPending)
 
         for (const block of neededBlocks) {
@@ -249,7 +268,7 @@ export class TorrentPieceRequester extends EngineComponent {
           // Rate limit check
           if (
             this.deps.isDownloadRateLimited() &&
-            !this.deps.tryConsumeDownloadBandwidth(block.length)
+            !this.deps.tryConsumeDownloadBandwidth(peer, block.length)
           ) {
             flushPending()
             this.deps.scheduleRateLimitRetry(block.length, () => {})
@@ -260,7 +279,7 @@ export class TorrentPieceRequester extends EngineComponent {
           peer.requestsPending++
 
           const blockIndex = Math.floor(block.begin / BLOCK_SIZE)
-          piece.addRequest(blockIndex, peerId, now)
+          piece.addRequest(blockIndex, peerId, now, expectedAt)
 
           // Promote to full if all blocks are now requested
           if (!piece.hasUnrequestedBlocks) {
@@ -279,7 +298,11 @@ export class TorrentPieceRequester extends EngineComponent {
         if (!isEndgame && !piece.hasUnrequestedBlocks) continue
 
         const neededBlocks = isEndgame
-          ? piece.getNeededBlocksEndgame(peerId, pipelineLimit - peer.requestsPending)
+          ? piece.getNeededBlocksEndgame(
+              peerId,
+              pipelineLimit - peer.requestsPending,
+              duplicateFilter,
+            )
           : piece.getNeededBlocks(pipelineLimit - peer.requestsPending)
 
         for (const block of neededBlocks) {
@@ -289,7 +312,7 @@ export class TorrentPieceRequester extends EngineComponent {
           }
           if (
             this.deps.isDownloadRateLimited() &&
-            !this.deps.tryConsumeDownloadBandwidth(block.length)
+            !this.deps.tryConsumeDownloadBandwidth(peer, block.length)
           ) {
             flushPending()
             this.deps.scheduleRateLimitRetry(block.length, () => {})
@@ -298,7 +321,7 @@ export class TorrentPieceRequester extends EngineComponent {
           pendingRequests.push({ index: piece.index, begin: block.begin, length: block.length })
           peer.requestsPending++
           const blockIndex = Math.floor(block.begin / BLOCK_SIZE)
-          piece.addRequest(blockIndex, peerId, now)
+          piece.addRequest(blockIndex, peerId, now, expectedAt)
 
           if (!piece.hasUnrequestedBlocks) {
             activePieces.promoteToFullyRequested(piece.index)
@@ -342,8 +365,12 @@ export class TorrentPieceRequester extends EngineComponent {
         piece.claimExclusive(peerId)
       }
 
-      const neededBlocks = this.deps.getEndgameManager().isEndgame
-        ? piece.getNeededBlocksEndgame(peerId, pipelineLimit - peer.requestsPending)
+      const neededBlocks = isEndgame
+        ? piece.getNeededBlocksEndgame(
+            peerId,
+            pipelineLimit - peer.requestsPending,
+            duplicateFilter,
+          )
         : piece.getNeededBlocks(pipelineLimit - peer.requestsPending)
 
       for (const block of neededBlocks) {
@@ -352,7 +379,7 @@ export class TorrentPieceRequester extends EngineComponent {
         // Rate limit check
         if (
           this.deps.isDownloadRateLimited() &&
-          !this.deps.tryConsumeDownloadBandwidth(block.length)
+          !this.deps.tryConsumeDownloadBandwidth(peer, block.length)
         ) {
           flushPending()
           this.deps.scheduleRateLimitRetry(block.length, () => {})
@@ -363,7 +390,7 @@ export class TorrentPieceRequester extends EngineComponent {
         peer.requestsPending++
 
         const blockIndex = Math.floor(block.begin / BLOCK_SIZE)
-        piece.addRequest(blockIndex, peerId, now)
+        piece.addRequest(blockIndex, peerId, now, expectedAt)
 
         if (!piece.hasUnrequestedBlocks) {
           activePieces.promoteToFullyRequested(piece.index)
@@ -59,6 +59,11 @@ export interface TorrentStateData {
 
   // File priorities (absent until metadata received and user sets priorities)
   filePriorities?: number[] // Per-file: 0=normal, 1=skip
+
+  // Bandwidth (absent = no per-torrent cap, default weight)
+  downloadLimit?: number // bytes/sec
+  uploadLimit?: number // bytes/sec
+  bandwidthWeight?: number
 }
 
 /**
@@ -125,6 +130,7 @@ export class SessionPersistence {
   async saveTorrentState(torrent: Torrent): Promise<void> {
     const infoHash = toHex(torrent.infoHash)
     const root = this.engine.storageRootManager.getRootForTorrent(infoHash)
+    const bandwidth = torrent.bandwidthLimits
 
     const state: TorrentStateData = {
       userState: torrent.userState,
@@ -135,6 +141,9 @@ export class SessionPersistence {
       downloaded: torrent.totalDownloaded,
       updatedAt: Date.now(),
       filePriorities: torrent.filePriorities?.length > 0 ? [...torrent.filePriorities] : undefined,
+      downloadLimit: bandwidth?.downloadLimit || undefined,
+      uploadLimit: bandwidth?.uploadLimit || undefined,
+      bandwidthWeight: bandwidth && bandwidth.weight !== 1 ? bandwidth.weight : undefined,
     }
 
     await this._store.setJson(stateKey(infoHash), state)
@@ -326,6 +335,12 @@ export class SessionPersistence {
             if (state.filePriorities && torrent.hasMetadata) {
               torrent.restoreFilePriorities(state.filePriorities)
             }
+
+            torrent.restoreBandwidthLimits({
+              downloadLimit: state.downloadLimit,
+              uploadLimit: state.uploadLimit,
+              weight: state.bandwidthWeight,
+            })
           }
 
           // Restore addedAt from list entry
@@ -0,0 +1,174 @@
+/** Smallest size class: one 16KiB block */
+export const MIN_SLAB_SIZE = 16 * 1024
+
+/** Largest size class; bigger requests are allocated fresh and never pooled */
+export const MAX_SLAB_SIZE = 16 * 1024 * 1024
+
+/** Default cap on bytes held by idle buffers across all size classes */
+export const DEFAULT_SLAB_BUDGET = 64 * 1024 * 1024
+
+const CLASS_COUNT = Math.log2(MAX_SLAB_SIZE / MIN_SLAB_SIZE) + 1
+
+export interface SlabAllocatorStats {
+  /** acquire() calls */
+  allocations: number
+  /** Acquires served from a free list */
+  hits: number
+  /** Acquires that allocated a new buffer (including oversize requests) */
+  misses: number
+  releases: number
+  /** Released buffers not pooled: budget full, not a slab, or already idle */
+  dropped: number
+  /** Idle buffers freed by trim() */
+  trimmed: number
+  /** Idle buffers and their bytes */
+  pooledBuffers: number
+  pooledBytes: number
+  budgetBytes: number
+}
+
+/**
+ * Engine-wide buffer pool shared by all torrents.
+ *
+ * Buffers come in power-of-two size classes from 16KiB to 16MiB, so a piece
+ * buffer freed by one torrent can be reused by any torrent whose pieces fall
+ * in the same class, and the last (short) piece of a torrent is pooled too.
+ * acquire() returns a view of exactly the requested length over a class-sized
+ * slab; release() takes the view back and pools the whole slab.
+ *
+ * Idle buffers are capped by a global byte budget: releases beyond it are
+ * left for GC. trim() drops idle buffers (largest first) under memory
+ * pressure, so the pool shrinks instead of holding its high-water mark.
+ *
+ * Acquired buffers may contain stale data from previous use.
+ */
+export class SlabAllocator {
+  /** Idle slabs per size class (index = log2(size / MIN_SLAB_SIZE)) */
+  private readonly freeLists: Uint8Array[][] = []
+  /** Backing stores of idle slabs, to ignore double releases */
+  private readonly idle = new WeakSet<ArrayBufferLike>()
+  private _pooledBytes = 0
+  private _pooledBuffers = 0
+
+  private allocations = 0
+  private hits = 0
+  private misses = 0
+  private releases = 0
+  private dropped = 0
+  private trimmed = 0
+
+  /**
+   * @param budgetBytes - Maximum bytes held by idle buffers (default: 64MiB)
+   */
+  constructor(readonly budgetBytes: number = DEFAULT_SLAB_BUDGET) {
+    for (let i = 0; i < CLASS_COUNT; i++) this.freeLists.push([])
+  }
+
+  /**
+   * Size class for a request of `length` bytes, or 0 if it is too large to pool.
+   */
+  static classSize(length: number): number {
+    if (length > MAX_SLAB_SIZE) return 0
+    let size = MIN_SLAB_SIZE
+    while (size < length) size *= 2
+    return size
+  }
+
+  /**
+   * Get a buffer of exactly `length` bytes, reusing an idle slab if one is
+   * available in its size class.
+   */
+  acquire(length: number): Uint8Array {
+    this.allocations++
+    const size = SlabAllocator.classSize(length)
+    if (size === 0) {
+      this.misses++
+      return new Uint8Array(length)
+    }
+
+    let slab = this.freeLists[classIndex(size)].pop()
+    if (slab) {
+      this.hits++
+      this.idle.delete(slab.buffer)
+      this._pooledBytes -= size
+      this._pooledBuffers--
+    } else {
+      this.misses++
+      slab = new Uint8Array(size)
+    }
+    return length === size ? slab : slab.subarray(0, length)
+  }
+
+  /**
+   * Return a buffer from acquire(). The caller must not use it afterwards.
+   * Buffers that weren't allocated as slabs, or that don't fit in the budget,
+   * are left for GC.
+   */
+  release(buffer: Uint8Array): void {
+    this.releases++
+    const store = buffer.buffer
+    const size = store.byteLength
+    if (
+      buffer.byteOffset !== 0 ||
+      SlabAllocator.classSize(size) !== size ||
+      this.idle.has(store) ||
+      this._pooledBytes + size > this.budgetBytes
+    ) {
+      this.dropped++
+      return
+    }
+
+    this.freeLists[classIndex(size)].push(
+      buffer.length === size ? buffer : new Uint8Array(store, 0, size),
+    )
+    this.idle.add(store)
+    this._pooledBytes += size
+    this._pooledBuffers++
+  }
+
+  /**
+   * Drop idle buffers, largest classes first, until at most `targetBytes`
+   * remain pooled.
+   * @returns bytes released to GC
+   */
+  trim(targetBytes: number = 0): number {
+    let freed = 0
+    for (let i = CLASS_COUNT - 1; i >= 0 && this._pooledBytes > targetBytes; i--) {
+      const list = this.freeLists[i]
+      while (list.length > 0 && this._pooledBytes > targetBytes) {
+        const slab = list.pop()!
+        this.idle.delete(slab.buffer)
+        this._pooledBytes -= slab.length
+        this._pooledBuffers--
+        this.trimmed++
+        freed += slab.length
+      }
+    }
+    return freed
+  }
+
+  /**
+   * Bytes held by idle buffers.
+   */
+  get memoryBytes(): number {
+    return this._pooledBytes
+  }
+
+  getStats(): SlabAllocatorStats {
+    return {
+      allocations: this.allocations,
+      hits: this.hits,
+      misses: this.misses,
+      releases: this.releases,
+      dropped: this.dropped,
+      trimmed: this.trimmed,
+      pooledBuffers: this._pooledBuffers,
+      pooledBytes: this._pooledBytes,
+      budgetBytes: this.budgetBytes,
+    }
+  }
+}
+
+function classIndex(size: number): number {
+  return Math.log2(size / MIN_SLAB_SIZE)
+}
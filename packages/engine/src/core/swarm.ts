@@ -1,5 +1,6 @@
 import { EventEmitter } from '../utils/event-emitter'
 import { toHex } from '../utils/buffer'
+import { MAP_ENTRY_BYTES, SLOT_BYTES, objectBytes, stringBytes } from '../utils/memory-estimate'
 import { lookupCountry } from '../geo/geoip'
 import type { PeerConnection } from './peer-connection'
 import type { Logger } from '../logging/logger'
@@ -377,8 +378,17 @@ export interface SwarmEvents {
   peersAdded: (count: number) => void
   peerConnected: (key: string, peer: SwarmPeer) => void
   peerDisconnected: (key: string, peer: SwarmPeer) => void
+  /** A peer was added, or its state or connection history changed */
+  peerChanged: (key: string, peer: SwarmPeer) => void
+  /** A peer was removed */
+  peerRemoved: (key: string) => void
+  /** All peers were removed */
+  cleared: () => void
 }
 
+/** Estimated size of one SwarmPeer with its address key and ip strings */
+const SWARM_PEER_BYTES = objectBytes(27) + stringBytes(21) + stringBytes(15) + MAP_ENTRY_BYTES
+
 export class Swarm extends EventEmitter {
   // All peers by address key
   private peers: Map<string, SwarmPeer> = new Map()
@@ -469,6 +479,7 @@ export class Swarm extends EventEmitter {
     }
     this.peers.set(key, peer)
     this._allPeersVersion++
+    this.emit('peerChanged', key, peer)
 
     return peer
   }
@@ -545,6 +556,7 @@ export class Swarm extends EventEmitter {
       peer.lastConnectAttempt = Date.now()
       this.connectingKeys.add(key)
       this.logger.debug(`[${key}] ${prevState} → connecting (attempt #${peer.connectAttempts})`)
+      this.emit('peerChanged', key, peer)
     } else {
       this.logger.warn(`markConnecting: peer not found in swarm: ${key}`)
     }
@@ -570,6 +582,7 @@ export class Swarm extends EventEmitter {
         `[${key}] ${prevState} → connected (total: ${this.connectedKeys.size} connected, ${this.connectingKeys.size} connecting)`,
       )
 
+      this.emit('peerChanged', key, peer)
       this.emit('test:peerConnected', key, peer)
     } else {
       this.logger.warn(`markConnected: peer not found in swarm: ${key}`)
@@ -626,11 +639,28 @@ export class Swarm extends EventEmitter {
       this.logger.debug(
         `[${key}] ${prevState} → failed: ${reason} (failures: ${peer.connectFailures})`,
       )
+      this.emit('peerChanged', key, peer)
     } else {
       this.logger.warn(`markConnectFailed: peer not found in swarm: ${key}`)
     }
   }
 
+  /**
+   * Mark a connection attempt abandoned without a result (e.g. the other
+   * address of a dual-stack peer connected first). Back to idle, not counted
+   * as a failure.
+   */
+  markConnectAborted(key: string): void {
+    const peer = this.peers.get(key)
+    if (peer && peer.state === 'connecting') {
+      peer.state = 'idle'
+      peer.connection = null
+      this.connectingKeys.delete(key)
+      this.logger.debug(`[${key}] connecting → idle (aborted)`)
+      this.emit('peerChanged', key, peer)
+    }
+  }
+
   /**
    * Record a rejected incoming connection.
    * Tracks the peer in the swarm so we can detect repeat attempts.
@@ -668,6 +698,7 @@ export class Swarm extends EventEmitter {
       }
       this.peers.set(key, peer)
       this._allPeersVersion++
+      this.emit('peerChanged', key, peer)
     }
 
     peer.rejectionCount++
@@ -710,6 +741,7 @@ export class Swarm extends EventEmitter {
         `[${key}] ${prevState} → idle (disconnected, duration=${connectionDuration}ms, quickDisconnects=${peer.quickDisconnects}) (total: ${this.connectedKeys.size} connected)`,
       )
 
+      this.emit('peerChanged', key, peer)
       this.emit('test:peerDisconnected', key, peer)
     } else {
       this.logger.warn(`markDisconnected: peer not found in swarm: ${key}`)
@@ -768,6 +800,7 @@ export class Swarm extends EventEmitter {
     peer.lastConnectSuccess = Date.now()
     this.connectedKeys.add(key)
 
+    this.emit('peerChanged', key, peer)
     this.emit('test:peerConnected', key, peer)
 
     return peer
@@ -790,6 +823,7 @@ export class Swarm extends EventEmitter {
       this.connectingKeys.delete(key)
 
       this.logger.info(`Banned peer ${key}: ${reason}`)
+      this.emit('peerChanged', key, peer)
     }
   }
 
@@ -803,6 +837,7 @@ export class Swarm extends EventEmitter {
       peer.banReason = null
       peer.connectFailures = 0 // Give them a fresh start
       this.logger.info(`Unbanned peer ${key}`)
+      this.emit('peerChanged', key, peer)
     }
   }
 
@@ -812,12 +847,13 @@ export class Swarm extends EventEmitter {
    */
   unbanRecoverable(): number {
     let count = 0
-    for (const peer of this.peers.values()) {
+    for (const [key, peer] of this.peers) {
       if (peer.state === 'banned' && !peer.banReason?.includes('corrupt')) {
         peer.state = 'idle'
         peer.banReason = null
         peer.connectFailures = 0
         count++
+        this.emit('peerChanged', key, peer)
       }
     }
     if (count > 0) {
@@ -832,6 +868,19 @@ export class Swarm extends EventEmitter {
     return this.peers.size
   }
 
+  /**
+   * Estimated bytes held by peer records and their indexes. Connections
+   * (socket buffers) are accounted separately.
+   */
+  get memoryBytes(): number {
+    const indexed = this.connectedKeys.size + this.connectingKeys.size + this.peerIdIndex.size
+    return (
+      this.peers.size * SWARM_PEER_BYTES +
+      indexed * MAP_ENTRY_BYTES +
+      (this._cachedPeersArray?.length ?? 0) * SLOT_BYTES
+    )
+  }
+
   get connectedCount(): number {
     return this.connectedKeys.size
   }
@@ -989,6 +1038,7 @@ export class Swarm extends EventEmitter {
     this.peerIdIndex.clear()
     this._allPeersVersion++
     this._cachedPeersArray = null
+    this.emit('cleared')
   }
 
   /**
@@ -1030,6 +1080,7 @@ export class Swarm extends EventEmitter {
         }
 
         this.peers.delete(key)
+        this.emit('peerRemoved', key)
       }
     }
 
@@ -1053,7 +1104,7 @@ export class Swarm extends EventEmitter {
    * Preserves peer addresses and stats, only resets connection attempt tracking.
    */
   resetBackoffState(): void {
-    for (const peer of this.peers.values()) {
+    for (const [key, peer] of this.peers) {
       // Don't reset banned peers
       if (peer.state === 'banned') continue
 
@@ -1071,6 +1122,7 @@ export class Swarm extends EventEmitter {
       // Reset quick disconnect tracking
       peer.quickDisconnects = 0
       peer.lastDisconnect = null
+      this.emit('peerChanged', key, peer)
     }
 
     this.logger.debug(`Reset backoff state for ${this.peers.size} peers`)
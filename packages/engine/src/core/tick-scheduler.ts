@@ -0,0 +1,186 @@
+import type { TickResult } from './torrent-tick-loop'
+
+// === Constants ===
+
+/**
+ * Share of the 100ms engine tick that torrent ticks may use.
+ * The rest is left for socket callbacks and disk completions.
+ */
+export const DEFAULT_TICK_BUDGET_MS = 80
+
+/**
+ * Floor for a torrent's slice of the budget. With thousands of due torrents
+ * an even split would be below what a tick can possibly take.
+ */
+export const MIN_TORRENT_SLICE_MS = 1
+
+/**
+ * Idle and complete torrents tick once every N engine ticks (500ms at 10Hz)
+ * unless their peers have data or sends waiting.
+ */
+export const DEFAULT_IDLE_TICK_INTERVAL = 5
+
+/**
+ * What the scheduler needs from a torrent.
+ */
+export interface SchedulableTorrent {
+  readonly isActive: boolean
+  readonly isComplete: boolean
+  /** Whether peers have received data or queued sends waiting for a tick */
+  hasPendingIo(): boolean
+  tick(): TickResult | null
+}
+
+export interface TickSchedulerOptions {
+  /** Time torrents may use per engine tick (default DEFAULT_TICK_BUDGET_MS) */
+  budgetMs?: number
+  /** Engine ticks between runs of idle/complete torrents (default DEFAULT_IDLE_TICK_INTERVAL) */
+  idleTickInterval?: number
+  /** Clock in ms; injectable for tests */
+  now?: () => number
+}
+
+/**
+ * Scheduling outcome of one engine tick.
+ */
+export interface ScheduledTickResult {
+  /** Torrents that ran this tick */
+  torrentsTicked: number
+  /** Torrents that were due but left for the next tick when the budget ran out */
+  torrentsDeferred: number
+  /** Torrents that used more than their slice */
+  overruns: number
+  /** Total time spent beyond slices */
+  overrunMs: number
+}
+
+interface SliceState {
+  /** Unused (positive) or overdrawn (negative) slice carried between ticks */
+  credit: number
+  /** Scheduler tick in which the torrent last ran (0 = never) */
+  lastTick: number
+  /** Last tick did no download work */
+  idle: boolean
+  /** Due last tick but not run */
+  deferred: boolean
+}
+
+const defaultClock: () => number =
+  typeof performance !== 'undefined' ? () => performance.now() : () => Date.now()
+
+/**
+ * Deadline-aware scheduler for per-torrent ticks.
+ *
+ * Each engine tick, the budget is split evenly across the torrents that are
+ * due. Torrents run in this order:
+ * 1. torrents deferred from the previous tick
+ * 2. torrents within their slice, round-robin from a rotating start
+ * 3. torrents still paying back earlier overruns
+ *
+ * Once the budget is spent the remaining torrents are deferred, so a few busy
+ * torrents delay the rest by at most one tick instead of stretching every
+ * tick. A torrent's unused or overdrawn time carries into the next tick
+ * (bounded by one slice of credit and one budget of debt).
+ *
+ * Torrents that are complete or did no download work last tick run at
+ * 1/idleTickInterval rate, but still every tick while peers have I/O pending.
+ */
+export class TickScheduler<T extends SchedulableTorrent = SchedulableTorrent> {
+  readonly budgetMs: number
+  readonly idleTickInterval: number
+  private now: () => number
+
+  private states = new WeakMap<T, SliceState>()
+  private tickNumber = 0
+  private cursor = 0
+
+  constructor(options: TickSchedulerOptions = {}) {
+    this.budgetMs = options.budgetMs ?? DEFAULT_TICK_BUDGET_MS
+    this.idleTickInterval = options.idleTickInterval ?? DEFAULT_IDLE_TICK_INTERVAL
+    this.now = options.now ?? defaultClock
+  }
+
+  /**
+   * Run one engine tick's worth of torrent ticks.
+   * @param torrents All torrents; inactive ones are skipped
+   * @param onResult Called with each non-null torrent tick result
+   */
+  run(torrents: readonly T[], onResult: (result: TickResult) => void): ScheduledTickResult {
+    this.tickNumber++
+    const count = torrents.length
+    if (this.cursor >= count) this.cursor = 0
+
+    const carried: T[] = []
+    const ready: T[] = []
+    const owing: T[] = []
+    for (let i = 0; i < count; i++) {
+      const torrent = torrents[(this.cursor + i) % count]
+      if (!torrent.isActive) continue
+      const state = this.stateFor(torrent)
+      if (state.deferred) carried.push(torrent)
+      else if (!this.isDue(torrent, state)) continue
+      else if (state.credit < 0) owing.push(torrent)
+      else ready.push(torrent)
+    }
+    this.cursor = count > 0 ? (this.cursor + 1) % count : 0
+
+    const order = carried.concat(ready, owing)
+    const result: ScheduledTickResult = {
+      torrentsTicked: 0,
+      torrentsDeferred: 0,
+      overruns: 0,
+      overrunMs: 0,
+    }
+    if (order.length === 0) return result
+
+    const slice = Math.max(MIN_TORRENT_SLICE_MS, this.budgetMs / order.length)
+    const start = this.now()
+    for (let i = 0; i < order.length; i++) {
+      const torrent = order[i]
+      const state = this.stateFor(torrent)
+
+      // Always make progress; after that, stop at the deadline
+      if (i > 0 && this.now() - start >= this.budgetMs) {
+        state.deferred = true
+        result.torrentsDeferred++
+        continue
+      }
+
+      const tickStart = this.now()
+      const tickResult = torrent.tick()
+      const elapsed = this.now() - tickStart
+
+      state.credit = Math.max(-this.budgetMs, Math.min(state.credit + slice, slice) - elapsed)
+      state.lastTick = this.tickNumber
+      state.deferred = false
+      state.idle =
+        !tickResult ||
+        (tickResult.blocksRecv === 0 &&
+          tickResult.blocksSent === 0 &&
+          tickResult.activePieces === 0)
+      if (elapsed > slice) {
+        result.overruns++
+        result.overrunMs += elapsed - slice
+      }
+      result.torrentsTicked++
+      if (tickResult) onResult(tickResult)
+    }
+    return result
+  }
+
+  private isDue(torrent: T, state: SliceState): boolean {
+    if (state.lastTick === 0) return true
+    if (!torrent.isComplete && !state.idle) return true
+    if (this.tickNumber - state.lastTick >= this.idleTickInterval) return true
+    return torrent.hasPendingIo()
+  }
+
+  private stateFor(torrent: T): SliceState {
+    let state = this.states.get(torrent)
+    if (!state) {
+      state = { credit: 0, lastTick: 0, idle: false, deferred: false }
+      this.states.set(torrent, state)
+    }
+    return state
+  }
+}
@@ -226,6 +226,14 @@ export class TorrentContentStorage extends EngineComponent {
     return null
   }
 
+  /**
+   * Whether a piece lies entirely within one file, i.e. can use a verified write.
+   * Pieces spanning files must be hashed by the engine.
+   */
+  pieceFitsSingleFile(pieceIndex: number, pieceLength: number): boolean {
+    return this.pieceSpansSingleFile(pieceIndex, pieceLength) !== null
+  }
+
   /**
    * Count how many files a write at the given torrent offset and length touches.
    */
@@ -317,8 +325,17 @@ export class TorrentContentStorage extends EngineComponent {
     return result
   }
 
-  async read(index: number, begin: number, length: number): Promise<Uint8Array> {
-    const buffer = new Uint8Array(length)
+  /**
+   * Read `length` bytes of piece `index` from `begin`, into `into` if given
+   * (at least `length` bytes; e.g. a pooled buffer).
+   */
+  async read(
+    index: number,
+    begin: number,
+    length: number,
+    into?: Uint8Array,
+  ): Promise<Uint8Array> {
+    const buffer = into ? into.subarray(0, length) : new Uint8Array(length)
     const torrentOffset = index * this.pieceLength + begin
     let remaining = length
     let bufferOffset = 0
@@ -1,9 +1,25 @@
 import { IStorageHandle } from '../io/storage-handle'
 import { Bencode } from '../utils/bencode'
+import { fromHex, toHex } from '../utils/buffer'
 import { IFileHandle, IFileSystem } from '../interfaces/filesystem'
 import { IHasher } from '../interfaces/hasher'
 import * as path from '../utils/path'
 
+/**
+ * Metainfo flavour to create:
+ * - 'v1': classic torrent (SHA1 pieces spanning files)
+ * - 'v2': BEP 52 torrent (per-file SHA256 merkle trees)
+ * - 'hybrid': both, with pad files so v1 pieces align to file boundaries
+ */
+export type TorrentVersion = 'v1' | 'v2' | 'hybrid'
+
+export interface TorrentCreationProgress {
+  bytesHashed: number
+  totalBytes: number
+  piecesHashed: number
+  totalPieces: number
+}
+
 export interface TorrentCreationOptions {
   pieceLength?: number
   forceMultiFile?: boolean
@@ -13,6 +29,12 @@ export interface TorrentCreationOptions {
   announceList?: string[][]
   urlList?: string[]
   private?: boolean
+  /** Metainfo version (default 'v1'). v2 and hybrid need a hasher with sha256(). */
+  version?: TorrentVersion
+  /** Pieces being hashed while the next ones are read (default DEFAULT_HASH_CONCURRENCY) */
+  hashConcurrency?: number
+  /** Called after each piece is hashed */
+  onProgress?: (progress: TorrentCreationProgress) => void
 }
 
 interface FileInfo {
@@ -21,6 +43,43 @@ interface FileInfo {
   relativePath: string
 }
 
+/** A byte range of one file */
+interface Segment {
+  file: FileInfo
+  offset: number
+  length: number
+}
+
+/**
+ * One piece to read and hash. In v2/hybrid torrents pieces never span files.
+ */
+interface PieceJob {
+  /** v1 piece index (also the job's position in hybrid torrents) */
+  index: number
+  segments: Segment[]
+  /** Bytes of file data */
+  length: number
+  /** Bytes covered by the v1 hash: file data plus trailing pad-file zeros */
+  v1Length: number
+  /** Index into `files` (v2/hybrid only) */
+  fileIndex: number
+  /** Piece index within its file (v2/hybrid only) */
+  filePiece: number
+}
+
+/** Per-file v2 hashing state */
+interface MerkleFile {
+  /** Piece-layer hashes, for files longer than one piece */
+  layer: Uint8Array[]
+  root?: Uint8Array
+}
+
+/** BEP 52 merkle leaf size */
+const BLOCK_SIZE = 16 * 1024
+const SHA1_LENGTH = 20
+const SHA256_LENGTH = 32
+export const DEFAULT_HASH_CONCURRENCY = 4
+
 export class TorrentCreator {
   private static readonly DEFAULT_PIECE_LENGTH = 256 * 1024 // 256KB
   private static readonly MIN_PIECE_LENGTH = 16 * 1024 // 16KB
@@ -34,6 +93,9 @@ export class TorrentCreator {
   ): Promise<Uint8Array> {
     const fs = storage.getFileSystem()
     const rootStat = await fs.stat(rootPath)
+    const version = options.version ?? 'v1'
+    const hasV1 = version !== 'v2'
+    const hasV2 = version !== 'v1'
 
     let files: FileInfo[] = []
     let totalSize = 0
@@ -54,30 +116,55 @@ export class TorrentCreator {
     totalSize = files.reduce((acc, f) => acc + f.length, 0)
 
     const pieceLength = options.pieceLength || this.calculatePieceLength(totalSize)
-    const pieces = await this.hashFiles(fs, files, pieceLength, hasher)
+    if (hasV2) {
+      if (!hasher.sha256) {
+        throw new Error('Hasher does not support SHA256, required for v2 torrents')
+      }
+      if (pieceLength < BLOCK_SIZE || (pieceLength & (pieceLength - 1)) !== 0) {
+        throw new Error(`v2 piece length must be a power of two >= 16KiB, got ${pieceLength}`)
+      }
+      // The v2 file tree is ordered by path; v1 files must follow the same order
+      files.sort((a, b) => comparePaths(a.relativePath, b.relativePath))
+    }
 
+    const { pieces, merkle } = await this.hashFiles(fs, files, pieceLength, hasher, {
+      v1: hasV1,
+      v2: hasV2,
+      concurrency: options.hashConcurrency ?? DEFAULT_HASH_CONCURRENCY,
+      onProgress: options.onProgress,
+    })
+
+    const name = options.name || path.basename(rootPath)
     const info: Record<string, unknown> = {
       'piece length': pieceLength,
-      pieces: pieces,
-      name: options.name || path.basename(rootPath),
-      'name.utf-8': options.name || path.basename(rootPath),
+      name: name,
+      'name.utf-8': name,
     }
 
     if (options.private) {
       info.private = 1
     }
 
-    if (isMultiFile) {
-      info.files = files.map((f) => {
-        const pathSegments = f.relativePath.split(path.sep)
-        return {
-          length: f.length,
-          path: pathSegments,
-          'path.utf-8': pathSegments,
+    if (hasV1) {
+      info.pieces = pieces
+      if (isMultiFile) {
+        info.files = this.v1FileList(files, pieceLength, hasV2)
+      } else {
+        info.length = files[0].length
+      }
+    }
+
+    // Keyed by hex root: identical files share a root, and must share one entry
+    let pieceLayers: Map<string, Uint8Array> | undefined
+    if (hasV2) {
+      info['meta version'] = 2
+      info['file tree'] = this.fileTree(files, merkle, isMultiFile ? null : name)
+      pieceLayers = new Map()
+      for (const file of merkle) {
+        if (file.root && file.layer.length > 0) {
+          pieceLayers.set(toHex(file.root), concat(file.layer))
         }
-      })
-    } else {
-      info.length = files[0].length
+      }
     }
 
     const dict: Record<string, unknown> = {
@@ -85,6 +172,12 @@ export class TorrentCreator {
       encoding: 'UTF-8',
     }
 
+    if (pieceLayers) {
+      const layers = new Map<Uint8Array, Uint8Array>()
+      for (const [root, layer] of pieceLayers) layers.set(fromHex(root), layer)
+      dict['piece layers'] = layers
+    }
+
     if (options.announceList && options.announceList.length > 0) {
       dict['announce-list'] = options.announceList
       dict.announce = options.announceList[0][0]
@@ -146,53 +239,341 @@ export class TorrentCreator {
     return pieceLength
   }
 
+  /**
+   * v1 'files' list. In hybrid torrents every file but the last is followed
+   * by a pad file (BEP 47) up to the next piece boundary.
+   */
+  private static v1FileList(
+    files: FileInfo[],
+    pieceLength: number,
+    padded: boolean,
+  ): Record<string, unknown>[] {
+    const list: Record<string, unknown>[] = []
+    files.forEach((f, i) => {
+      const pathSegments = f.relativePath.split(path.sep)
+      list.push({
+        length: f.length,
+        path: pathSegments,
+        'path.utf-8': pathSegments,
+      })
+      const pad = padded && i < files.length - 1 ? padLength(f.length, pieceLength) : 0
+      if (pad > 0) {
+        list.push({ attr: 'p', length: pad, path: ['.pad', String(pad)] })
+      }
+    })
+    return list
+  }
+
+  /**
+   * BEP 52 'file tree'. A single-file torrent's tree holds just the file, under
+   * the torrent name.
+   */
+  private static fileTree(
+    files: FileInfo[],
+    merkle: MerkleFile[],
+    singleName: string | null,
+  ): Record<string, unknown> {
+    const tree: Record<string, unknown> = {}
+    files.forEach((f, i) => {
+      const segments = singleName !== null ? [singleName] : f.relativePath.split(path.sep)
+      let node = tree
+      for (const segment of segments) {
+        if (!node[segment]) node[segment] = {}
+        node = node[segment] as Record<string, unknown>
+      }
+      const entry: Record<string, unknown> = { length: f.length }
+      if (f.length > 0) entry['pieces root'] = merkle[i].root
+      node[''] = entry
+    })
+    return tree
+  }
+
+  /**
+   * Read and hash all pieces. Reads run one piece at a time, in order, while
+   * up to `concurrency` earlier pieces are being hashed, so disk reads overlap
+   * hashing (which runs off-thread with the daemon and native hashers).
+   */
   private static async hashFiles(
     fs: IFileSystem,
     files: FileInfo[],
     pieceLength: number,
     hasher: IHasher,
-  ): Promise<Uint8Array> {
-    const pieceHashes: Uint8Array[] = []
-    const buffer = new Uint8Array(pieceLength)
-    let bufferOffset = 0
+    opts: {
+      v1: boolean
+      v2: boolean
+      concurrency: number
+      onProgress?: (progress: TorrentCreationProgress) => void
+    },
+  ): Promise<{ pieces: Uint8Array; merkle: MerkleFile[] }> {
+    const aligned = opts.v2
+    const totalBytes = files.reduce((acc, f) => acc + f.length, 0)
+    const totalPieces = aligned
+      ? files.reduce((acc, f) => acc + Math.ceil(f.length / pieceLength), 0)
+      : Math.ceil(totalBytes / pieceLength)
+    const pieces = new Uint8Array(opts.v1 ? totalPieces * SHA1_LENGTH : 0)
+    const merkle: MerkleFile[] = files.map(() => ({ layer: [] }))
+    const progress: TorrentCreationProgress = {
+      bytesHashed: 0,
+      totalBytes,
+      piecesHashed: 0,
+      totalPieces,
+    }
 
-    for (const file of files) {
-      const handle: IFileHandle = await fs.open(file.path, 'r')
-      let fileOffset = 0
-      let remaining = file.length
+    const hashJob = async (job: PieceJob, buffer: Uint8Array): Promise<void> => {
+      if (opts.v1) {
+        buffer.fill(0, job.length, job.v1Length)
+        const hash = await hasher.sha1(buffer.subarray(0, job.v1Length))
+        pieces.set(hash, job.index * SHA1_LENGTH)
+      }
+      if (opts.v2) {
+        const file = files[job.fileIndex]
+        const blocks = await hashBlocks(hasher, buffer.subarray(0, job.length))
+        if (file.length <= pieceLength) {
+          merkle[job.fileIndex].root = await merkleRoot(
+            hasher,
+            blocks,
+            nextPowerOfTwo(blocks.length),
+            new Uint8Array(SHA256_LENGTH),
+          )
+        } else {
+          merkle[job.fileIndex].layer[job.filePiece] = await merkleRoot(
+            hasher,
+            blocks,
+            pieceLength / BLOCK_SIZE,
+            new Uint8Array(SHA256_LENGTH),
+          )
+        }
+      }
+    }
 
-      try {
-        while (remaining > 0) {
-          const bytesToRead = Math.min(remaining, pieceLength - bufferOffset)
-          const { bytesRead } = await handle.read(buffer, bufferOffset, bytesToRead, fileOffset)
+    const reader = new PieceReader(fs)
+    const freeBuffers: Uint8Array[] = []
+    const inFlight = new Set<Promise<void>>()
+    let error: unknown = null
 
-          if (bytesRead === 0) break // Should not happen if size is correct
+    try {
+      for (const job of pieceJobs(files, pieceLength, aligned, opts.v1)) {
+        while (inFlight.size >= Math.max(1, opts.concurrency) && !error) {
+          await Promise.race(inFlight)
+        }
+        if (error) break
+
+        const buffer = freeBuffers.pop() ?? new Uint8Array(pieceLength)
+        await reader.read(job, buffer)
+
+        const hashing: Promise<void> = hashJob(job, buffer).then(
+          () => {
+            inFlight.delete(hashing)
+            freeBuffers.push(buffer)
+            progress.bytesHashed += job.length
+            progress.piecesHashed++
+            opts.onProgress?.({ ...progress })
+          },
+          (e) => {
+            inFlight.delete(hashing)
+            if (!error) error = e
+          },
+        )
+        inFlight.add(hashing)
+      }
+      await Promise.all(inFlight)
+    } finally {
+      await reader.close()
+    }
+    if (error) throw error
+
+    if (opts.v2) {
+      // Roots of multi-piece files: tree over the piece layer, padded with
+      // the hash of an all-zero piece
+      const zeroPiece = await merkleRoot(
+        hasher,
+        [],
+        pieceLength / BLOCK_SIZE,
+        new Uint8Array(SHA256_LENGTH),
+      )
+      for (let i = 0; i < files.length; i++) {
+        const layer = merkle[i].layer
+        if (layer.length > 0) {
+          merkle[i].root = await merkleRoot(
+            hasher,
+            layer,
+            nextPowerOfTwo(layer.length),
+            zeroPiece,
+          )
+        }
+      }
+    }
+
+    return { pieces, merkle }
+  }
+}
+
+/**
+ * Reads piece jobs, keeping the current file open across pieces.
+ */
+class PieceReader {
+  private current: { file: FileInfo; handle: IFileHandle } | null = null
 
-          bufferOffset += bytesRead
-          fileOffset += bytesRead
-          remaining -= bytesRead
+  constructor(private fs: IFileSystem) {}
+
+  async read(job: PieceJob, buffer: Uint8Array): Promise<void> {
+    let bufferOffset = 0
+    for (const segment of job.segments) {
+      const handle = await this.open(segment.file)
+      let done = 0
+      while (done < segment.length) {
+        const { bytesRead } = await handle.read(
+          buffer,
+          bufferOffset + done,
+          segment.length - done,
+          segment.offset + done,
+        )
+        if (bytesRead === 0) {
+          throw new Error(`Unexpected end of file: ${segment.file.path}`)
+        }
+        done += bytesRead
+      }
+      bufferOffset += segment.length
+    }
+  }
+
+  async close(): Promise<void> {
+    const current = this.current
+    this.current = null
+    await current?.handle.close()
+  }
+
+  private async open(file: FileInfo): Promise<IFileHandle> {
+    if (this.current?.file === file) return this.current.handle
+    await this.close()
+    const handle = await this.fs.open(file.path, 'r')
+    this.current = { file, handle }
+    return handle
+  }
+}
 
-          if (bufferOffset === pieceLength) {
-            pieceHashes.push(await hasher.sha1(buffer))
-            bufferOffset = 0
-          }
+/**
+ * Split files into pieces. Unaligned (v1) pieces run across file boundaries;
+ * aligned (v2/hybrid) pieces start at each file, with the v1 hash of a file's
+ * last piece covering the pad file that follows it.
+ */
+function* pieceJobs(
+  files: FileInfo[],
+  pieceLength: number,
+  aligned: boolean,
+  v1: boolean,
+): Generator<PieceJob> {
+  let index = 0
+  if (aligned) {
+    for (let f = 0; f < files.length; f++) {
+      const file = files[f]
+      const isLast = f === files.length - 1
+      for (let offset = 0, p = 0; offset < file.length; offset += pieceLength, p++) {
+        const length = Math.min(pieceLength, file.length - offset)
+        yield {
+          index: index++,
+          segments: [{ file, offset, length }],
+          length,
+          v1Length: v1 && !isLast ? pieceLength : length,
+          fileIndex: f,
+          filePiece: p,
         }
-      } finally {
-        await handle.close()
       }
     }
+    return
+  }
 
-    // Hash last partial piece
-    if (bufferOffset > 0) {
-      pieceHashes.push(await hasher.sha1(buffer.slice(0, bufferOffset)))
+  let segments: Segment[] = []
+  let length = 0
+  for (const file of files) {
+    let offset = 0
+    while (offset < file.length) {
+      const take = Math.min(pieceLength - length, file.length - offset)
+      segments.push({ file, offset, length: take })
+      offset += take
+      length += take
+      if (length === pieceLength) {
+        yield { index: index++, segments, length, v1Length: length, fileIndex: 0, filePiece: 0 }
+        segments = []
+        length = 0
+      }
     }
+  }
+  // Last partial piece
+  if (length > 0) {
+    yield { index: index++, segments, length, v1Length: length, fileIndex: 0, filePiece: 0 }
+  }
+}
+
+/**
+ * SHA256 of each 16KiB block (the last may be shorter).
+ */
+function hashBlocks(hasher: IHasher, data: Uint8Array): Promise<Uint8Array[]> {
+  const hashes: Promise<Uint8Array>[] = []
+  for (let offset = 0; offset < data.length; offset += BLOCK_SIZE) {
+    hashes.push(hasher.sha256!(data.subarray(offset, offset + BLOCK_SIZE)))
+  }
+  return Promise.all(hashes)
+}
+
+/**
+ * Root of a merkle tree with `width` leaves (a power of two), of which the
+ * ones past `leaves` are `pad`. Padding subtrees are hashed once per level.
+ */
+async function merkleRoot(
+  hasher: IHasher,
+  leaves: Uint8Array[],
+  width: number,
+  pad: Uint8Array,
+): Promise<Uint8Array> {
+  let level = leaves
+  let padHash = pad
+  const pair = new Uint8Array(SHA256_LENGTH * 2)
+  const hashPair = (a: Uint8Array, b: Uint8Array) => {
+    pair.set(a, 0)
+    pair.set(b, SHA256_LENGTH)
+    return hasher.sha256!(pair.slice())
+  }
 
-    // Concatenate all hashes
-    const result = new Uint8Array(pieceHashes.length * 20)
-    for (let i = 0; i < pieceHashes.length; i++) {
-      result.set(pieceHashes[i], i * 20)
+  for (; width > 1; width /= 2) {
+    const next: Promise<Uint8Array>[] = []
+    for (let i = 0; i < level.length; i += 2) {
+      next.push(hashPair(level[i], level[i + 1] ?? padHash))
     }
+    const nextPad = hashPair(padHash, padHash)
+    level = await Promise.all(next)
+    padHash = await nextPad
+  }
+  return level[0] ?? padHash
+}
+
+function nextPowerOfTwo(n: number): number {
+  let p = 1
+  while (p < n) p *= 2
+  return p
+}
+
+function padLength(length: number, pieceLength: number): number {
+  const rem = length % pieceLength
+  return rem === 0 ? 0 : pieceLength - rem
+}
+
+/** Order paths segment by segment, as in a bencoded file tree */
+function comparePaths(a: string, b: string): number {
+  const sa = a.split(path.sep)
+  const sb = b.split(path.sep)
+  for (let i = 0; i < Math.min(sa.length, sb.length); i++) {
+    if (sa[i] !== sb[i]) return sa[i] < sb[i] ? -1 : 1
+  }
+  return sa.length - sb.length
+}
 
-    return result
+function concat(chunks: Uint8Array[]): Uint8Array {
+  const out = new Uint8Array(chunks.reduce((acc, c) => acc + c.length, 0))
+  let offset = 0
+  for (const chunk of chunks) {
+    out.set(chunk, offset)
+    offset += chunk.length
   }
+  return out
 }
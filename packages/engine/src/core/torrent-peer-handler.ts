@@ -6,6 +6,7 @@ import { peerKey, PeerAddress } from './swarm'
 import { PexHandler } from '../extensions/pex-handler'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
 import type { ChunkedBuffer } from './chunked-buffer'
+import type { DirectBlockEvent } from '../interfaces/socket'
 import type { PieceAvailability } from './piece-availability'
 import type { MetadataFetcher } from './metadata-fetcher'
 import type { ActivePieceManager } from './active-piece-manager'
@@ -59,6 +60,11 @@ export interface PeerHandlerCallbacks {
     dataOffset: number,
     dataLength: number,
   ): void
+
+  /**
+   * Block written to disk by the I/O layer (direct-to-disk receive).
+   */
+  onDirectBlock(peer: PeerConnection, event: DirectBlockEvent): void
 }
 
 /**
@@ -241,6 +247,7 @@ export class TorrentPeerHandler extends EngineComponent {
     peer.onPieceBlock = (pieceIndex, blockOffset, buffer, dataOffset, dataLength) => {
       this.callbacks.onBlockZeroCopy(peer, pieceIndex, blockOffset, buffer, dataOffset, dataLength)
     }
+    peer.onDirectBlock = (event) => this.callbacks.onDirectBlock(peer, event)
 
     peer.on('request', (index, begin, length) => {
       this.callbacks.getUploader().queueRequest(peer, index, begin, length)
@@ -425,7 +432,7 @@ export class TorrentPeerHandler extends EngineComponent {
     const activePieces = this.callbacks.getActivePieces()
     const cleared = activePieces?.clearRequestsForPeer(peerId) || 0
 
-    peer.requestsPending = 0 // Critical: reset so we can request again after unchoke
+    peer.resetRequests() // Critical: reset so we can request again after unchoke
     // Reduce pipeline depth - choke is a congestion signal
     peer.reduceDepth()
 
@@ -12,6 +12,7 @@ import type { Swarm } from './swarm'
 import type { TorrentUploader } from './torrent-uploader'
 import type { IDiskQueue } from './disk-queue'
 import type { TrafficCategory } from './bandwidth-tracker'
+import type { PeerCounters } from './peer-counters'
 
 // === Constants ===
 
@@ -36,10 +37,10 @@ export const PIECE_ABANDON_TIMEOUT_MS = 30_000 // 30 seconds
 export const PIECE_ABANDON_MIN_PROGRESS = 0.5 // 50%
 
 /**
- * How often to run piece health cleanup (every N ticks).
- * With 100ms tick interval, 5 = every 500ms.
+ * How often to run piece health cleanup (ms). Timed rather than counted in
+ * ticks, since idle torrents are ticked less often than active ones.
  */
-export const CLEANUP_TICK_INTERVAL = 5
+export const CLEANUP_INTERVAL_MS = 500
 
 /**
  * Adaptive maintenance intervals.
@@ -64,6 +65,8 @@ export interface TickLoopCallbacks {
   // Peer access
   getConnectedPeers(): PeerConnection[]
   getPeers(): PeerConnection[]
+  /** Running sums over connected peers, maintained by PeerConnection */
+  getPeerCounters(): PeerCounters
 
   // Managers
   getSwarm(): Swarm
@@ -98,6 +101,12 @@ export interface TickLoopCallbacks {
    * On native (Android/iOS), this reduces FFI overhead significantly.
    */
   batchFlushPeers?(peers: PeerConnection[]): void
+
+  /**
+   * Optional direct-to-disk layout ID (desktop io-daemon). When non-null,
+   * peers are switched to direct receive after their buffers are drained.
+   */
+  getDirectLayoutId?(): number | null
 }
 
 /**
@@ -155,13 +164,18 @@ export class TorrentTickLoop extends EngineComponent {
   private _tickTotalMs = 0
   private _tickMaxMs = 0
   private _lastTickLogTime = 0
-  private _cleanupTickCounter = 0
+  private _lastCleanupTime = 0
 
   // === HAVE Batching (Phase 5) ===
   // Instead of broadcasting HAVE to all peers immediately when a piece completes,
   // we queue them here and flush at the end of the tick. This batches multiple
   // piece completions into a single pass over peers.
   private _pendingHaves: number[] = []
+  /** Endgame CANCELs per peer, coalesced into one write per peer per tick */
+  private _pendingCancels = new Map<
+    PeerConnection,
+    Array<{ index: number; begin: number; length: number }>
+  >()
 
   // === Maintenance State ===
   private _maintenanceInterval: ReturnType<typeof setTimeout> | null = null
@@ -174,6 +188,12 @@ export class TorrentTickLoop extends EngineComponent {
   private _maintCoordinatorMs = 0
   private _maintApplyMs = 0
   private _lastBackpressureLogTime = 0
+  // Snapshot objects reused across maintenance rounds. _snapshotPeers records
+  // which connection each pooled object last described, so its id is only
+  // recomputed when the slot moves to another peer.
+  private _snapshotPool: PeerSnapshot[] = []
+  private _snapshotPeers: (PeerConnection | null)[] = []
+  private _snapshots: PeerSnapshot[] = []
 
   constructor(
     engineInstance: ILoggingEngine,
@@ -242,6 +262,37 @@ export class TorrentTickLoop extends EngineComponent {
     this._pendingHaves = []
   }
 
+  // ==========================================================================
+  // CANCEL Batching
+  // ==========================================================================
+
+  /**
+   * Queue a CANCEL for a peer, sent with the peer's other CANCELs at the end
+   * of the tick. In endgame a burst of arriving blocks can cancel many
+   * requests at the same peer.
+   */
+  queueCancel(peer: PeerConnection, index: number, begin: number, length: number): void {
+    let cancels = this._pendingCancels.get(peer)
+    if (!cancels) {
+      cancels = []
+      this._pendingCancels.set(peer, cancels)
+    }
+    cancels.push({ index, begin, length })
+  }
+
+  /**
+   * Send each connected peer's queued CANCELs as one write.
+   * Called at the end of the tick, before flushPeers().
+   */
+  private flushCancels(peers: PeerConnection[]): void {
+    if (this._pendingCancels.size === 0) return
+    for (const peer of peers) {
+      const cancels = this._pendingCancels.get(peer)
+      if (cancels) peer.sendCancels(cancels)
+    }
+    this._pendingCancels.clear()
+  }
+
   // ==========================================================================
   // Request Tick (Game Loop)
   // ==========================================================================
@@ -273,42 +324,36 @@ export class TorrentTickLoop extends EngineComponent {
 
     const startTime = Date.now()
     const connectedPeers = this.callbacks.getConnectedPeers()
+    const counters = this.callbacks.getPeerCounters()
 
     // Measure buffer state before drain (for bottleneck analysis)
-    let bufferedBytesBefore = 0
-    let requestsPendingBefore = 0
-    let totalPipelineDepth = 0
-    for (const peer of connectedPeers) {
-      bufferedBytesBefore += peer.bufferedBytes
-      requestsPendingBefore += peer.requestsPending
-      totalPipelineDepth += peer.pipelineDepth
-    }
+    const bufferedBytesBefore = counters.bufferedBytes
+    const requestsPendingBefore = counters.requestsPending
+    const totalPipelineDepth = counters.pipelineDepth
 
     // === Phase 1: GATHER - drain all input buffers ===
     // Process all accumulated TCP data before any other work.
     // This moves processing from unpredictable callbacks to this controlled tick.
     const phase1Start = Date.now()
+    const directLayoutId = this.callbacks.getDirectLayoutId?.() ?? null
     for (const peer of connectedPeers) {
       peer.drainBuffer()
+      // An empty buffer right after draining is the switch point for direct receive
+      if (directLayoutId !== null) peer.enableDirectReceive(directLayoutId)
     }
     const phase1End = Date.now()
     this._phase1TotalMs += phase1End - phase1Start
 
     // Count blocks received this tick (measure post-drain state)
-    let requestsPendingAfter = 0
-    for (const peer of connectedPeers) {
-      requestsPendingAfter += peer.requestsPending
-    }
-    const blocksReceived = requestsPendingBefore - requestsPendingAfter
+    const blocksReceived = requestsPendingBefore - counters.requestsPending
     this._totalBlocksReceived += Math.max(0, blocksReceived)
     this._totalBufferedBytes += bufferedBytesBefore
     this._totalPipelineSlots += totalPipelineDepth
     this._totalPipelineFilled += requestsPendingBefore
 
     // === Phase 2: PROCESS - periodic cleanup of stuck pieces ===
-    this._cleanupTickCounter++
-    if (this._cleanupTickCounter >= CLEANUP_TICK_INTERVAL) {
-      this._cleanupTickCounter = 0
+    if (startTime - this._lastCleanupTime >= CLEANUP_INTERVAL_MS) {
+      this._lastCleanupTime = startTime
       this.cleanupStuckPieces()
     }
 
@@ -332,6 +377,7 @@ export class TorrentTickLoop extends EngineComponent {
     // First, broadcast any pending HAVE messages (batched from piece completions during GATHER)
     const phase4Start = Date.now()
     this.flushHaves(connectedPeers)
+    this.flushCancels(connectedPeers)
     // Then batch all protocol messages into single FFI call (reduces overhead on Android)
     this.flushPeers(connectedPeers)
     const phase4End = Date.now()
@@ -383,25 +429,15 @@ export class TorrentTickLoop extends EngineComponent {
       this._phase4TotalMs = 0
     }
 
-    // Measure post-tick state for result
-    let bufferedBytesAfter = 0
-    let pipelineFilledAfter = 0
-    let pipelineMaxAfter = 0
-    for (const peer of connectedPeers) {
-      bufferedBytesAfter += peer.bufferedBytes
-      pipelineFilledAfter += peer.requestsPending
-      pipelineMaxAfter += peer.pipelineDepth
-    }
-
     return {
       blocksRecv: Math.max(0, blocksReceived),
       blocksSent: requestsSentThisTick,
       elapsedMs: elapsed,
       activePieces: this.callbacks.getActivePieces()?.activeCount ?? 0,
       connectedPeers: connectedPeers.length,
-      bufferedBytes: bufferedBytesAfter,
-      pipelineFilled: pipelineFilledAfter,
-      pipelineMax: pipelineMaxAfter,
+      bufferedBytes: counters.bufferedBytes,
+      pipelineFilled: counters.requestsPending,
+      pipelineMax: counters.pipelineDepth,
     }
   }
 
@@ -456,8 +492,8 @@ export class TorrentTickLoop extends EngineComponent {
           const length = Math.min(BLOCK_SIZE, piece.length - begin)
           peer.sendCancel(piece.index, begin, length)
 
-          // Decrement peer's pending request count
-          peer.requestsPending = Math.max(0, peer.requestsPending - 1)
+          // Free the peer's pipeline slot (once, even if the block still arrives)
+          peer.releaseCancelledRequest(piece.index, begin)
         }
 
         // Clean up the request from the piece
@@ -486,8 +522,8 @@ export class TorrentTickLoop extends EngineComponent {
           const length = Math.min(BLOCK_SIZE, piece.length - begin)
           peer.sendCancel(piece.index, begin, length)
 
-          // Decrement peer's pending request count
-          peer.requestsPending = Math.max(0, peer.requestsPending - 1)
+          // Free the peer's pipeline slot (once, even if the block still arrives)
+          peer.releaseCancelledRequest(piece.index, begin)
         }
 
         // Clean up the request from the piece
@@ -626,13 +662,13 @@ export class TorrentTickLoop extends EngineComponent {
     // === Phase 3: Apply decisions ===
     const applyStart = Date.now()
     for (const decision of unchoke) {
-      this.applyUnchokeDecision(peers, decision)
+      this.applyUnchokeDecision(this.findDecisionPeer(peers, snapshots, decision.peerId), decision)
     }
 
     // Apply drop decisions (only when downloading - don't drop peers for slow download when seeding)
     if (!this.callbacks.isComplete()) {
       for (const decision of drop) {
-        this.applyDropDecision(peers, decision)
+        this.applyDropDecision(this.findDecisionPeer(peers, snapshots, decision.peerId), decision)
       }
     }
     const applyMs = Date.now() - applyStart
@@ -680,27 +716,76 @@ export class TorrentTickLoop extends EngineComponent {
 
   /**
    * Build peer snapshots for the coordinator algorithms.
+   * Snapshots come from a pool and are only valid until the next call; the
+   * coordinator keeps peer ids, never the snapshot objects.
    */
   private buildPeerSnapshots(peers: PeerConnection[]): PeerSnapshot[] {
     const now = Date.now()
-    return peers.map((peer) => ({
-      id: peerKey(peer.remoteAddress!, peer.remotePort!),
-      peerInterested: peer.peerInterested,
-      peerChoking: peer.peerChoking,
-      amChoking: peer.amChoking,
-      downloadRate: peer.downloadSpeed,
-      connectedAt: peer.connectedAt,
-      lastDataReceived: peer.downloadSpeedCalculator.lastActivity || now,
-      isIncoming: peer.isIncoming,
-      totalBytesReceived: peer.downloadSpeedCalculator.totalBytes,
-    }))
+    const pool = this._snapshotPool
+    const owners = this._snapshotPeers
+    const snapshots = this._snapshots
+
+    for (let i = 0; i < peers.length; i++) {
+      const peer = peers[i]
+      let snapshot = pool[i]
+      if (!snapshot) {
+        snapshot = {
+          id: '',
+          peerInterested: false,
+          peerChoking: true,
+          amChoking: true,
+          downloadRate: 0,
+          connectedAt: 0,
+          lastDataReceived: 0,
+          isIncoming: false,
+          totalBytesReceived: 0,
+        }
+        pool.push(snapshot)
+        owners.push(null)
+      }
+      if (owners[i] !== peer) {
+        snapshot.id = peerKey(peer.remoteAddress!, peer.remotePort!)
+        owners[i] = peer
+      }
+      snapshot.peerInterested = peer.peerInterested
+      snapshot.peerChoking = peer.peerChoking
+      snapshot.amChoking = peer.amChoking
+      snapshot.downloadRate = peer.downloadSpeed
+      snapshot.connectedAt = peer.connectedAt
+      snapshot.lastDataReceived = peer.downloadSpeedCalculator.lastActivity || now
+      snapshot.isIncoming = peer.isIncoming
+      snapshot.totalBytesReceived = peer.downloadSpeedCalculator.totalBytes
+      snapshots[i] = snapshot
+    }
+
+    // Release closed connections held by unused pool slots
+    for (let i = peers.length; i < owners.length && owners[i] !== null; i++) {
+      owners[i] = null
+    }
+    snapshots.length = peers.length
+    return snapshots
+  }
+
+  /**
+   * Find the connection a coordinator decision refers to. Snapshots are
+   * index-aligned with peers, so this compares cached ids instead of
+   * rebuilding a key per peer.
+   */
+  private findDecisionPeer(
+    peers: PeerConnection[],
+    snapshots: PeerSnapshot[],
+    peerId: string,
+  ): PeerConnection | undefined {
+    for (let i = 0; i < snapshots.length; i++) {
+      if (snapshots[i].id === peerId) return peers[i]
+    }
+    return undefined
   }
 
   /**
    * Apply an unchoke decision to a peer.
    */
-  private applyUnchokeDecision(peers: PeerConnection[], decision: ChokeDecision): void {
-    const peer = peers.find((p) => peerKey(p.remoteAddress!, p.remotePort!) === decision.peerId)
+  private applyUnchokeDecision(peer: PeerConnection | undefined, decision: ChokeDecision): void {
     if (!peer) return
 
     if (decision.action === 'unchoke') {
@@ -718,8 +803,7 @@ export class TorrentTickLoop extends EngineComponent {
   /**
    * Apply a drop decision to a peer.
    */
-  private applyDropDecision(peers: PeerConnection[], decision: DropDecision): void {
-    const peer = peers.find((p) => peerKey(p.remoteAddress!, p.remotePort!) === decision.peerId)
+  private applyDropDecision(peer: PeerConnection | undefined, decision: DropDecision): void {
     if (!peer) return
 
     this.logger.info(`Dropping slow peer ${decision.peerId}: ${decision.reason}`)
@@ -1,5 +1,7 @@
 import { PeerConnection } from './peer-connection'
 import { EngineComponent, ILoggingEngine } from '../logging/logger'
+import type { BandwidthClass } from './bandwidth-scheduler'
+import type { SlabAllocator } from './slab-allocator'
 
 /** Queued upload request for rate limiting */
 interface QueuedUploadRequest {
@@ -10,16 +12,9 @@ interface QueuedUploadRequest {
   queuedAt: number
 }
 
-/** Token bucket interface for rate limiting */
-interface UploadBucket {
-  isLimited: boolean
-  tryConsume(bytes: number): boolean
-  msUntilAvailable(bytes: number): number
-}
-
 /** Content storage interface for reading piece data */
 interface ContentReader {
-  read(index: number, begin: number, length: number): Promise<Uint8Array>
+  read(index: number, begin: number, length: number, into?: Uint8Array): Promise<Uint8Array>
 }
 
 /**
@@ -27,6 +22,10 @@ interface ContentReader {
  *
  * Queues incoming requests and drains them respecting the upload rate limit.
  * Validates requests before queueing (peer not choked, piece is serveable).
+ *
+ * Each peer gets its own class under the torrent's upload class, so peers
+ * share the torrent's bandwidth equally. A peer that is out of tokens
+ * doesn't block the queue: its requests wait while other peers' are served.
  */
 export class TorrentUploader extends EngineComponent {
   static override logName = 'uploader'
@@ -37,8 +36,11 @@ export class TorrentUploader extends EngineComponent {
   /** Whether a drain loop is scheduled */
   private drainScheduled = false
 
-  /** Upload rate limit bucket */
-  private readonly uploadBucket: UploadBucket
+  /** Torrent's upload bandwidth class */
+  private readonly uploadClass: BandwidthClass
+
+  /** Per-peer classes under uploadClass, created on first request */
+  private readonly peerClasses = new Map<PeerConnection, BandwidthClass>()
 
   /** Content storage for reading piece data */
   private contentStorage: ContentReader | null = null
@@ -52,20 +54,25 @@ export class TorrentUploader extends EngineComponent {
   /** Callback to record uploaded bytes for bandwidth tracking */
   private readonly recordUpload: (bytes: number) => void
 
+  /** Engine-wide pool for block read buffers (sendPiece copies the block) */
+  private readonly bufferAllocator?: SlabAllocator
+
   constructor(config: {
     engine: ILoggingEngine
     infoHash: Uint8Array
-    uploadBucket: UploadBucket
+    uploadClass: BandwidthClass
     isPeerConnected: (peer: PeerConnection) => boolean
     canServePiece: (index: number) => boolean
     recordUpload: (bytes: number) => void
+    bufferAllocator?: SlabAllocator
   }) {
     super(config.engine)
     this.infoHash = config.infoHash
-    this.uploadBucket = config.uploadBucket
+    this.uploadClass = config.uploadClass
     this.isPeerConnected = config.isPeerConnected
     this.canServePiece = config.canServePiece
     this.recordUpload = config.recordUpload
+    this.bufferAllocator = config.bufferAllocator
   }
 
   /**
@@ -121,9 +128,20 @@ export class TorrentUploader extends EngineComponent {
   removeQueuedUploads(peer: PeerConnection): number {
     const before = this.queue.length
     this.queue = this.queue.filter((req) => req.peer !== peer)
+    this.peerClasses.get(peer)?.remove()
+    this.peerClasses.delete(peer)
     return before - this.queue.length
   }
 
+  /**
+   * Release all per-peer classes (torrent teardown).
+   */
+  destroy(): void {
+    for (const peerClass of this.peerClasses.values()) peerClass.remove()
+    this.peerClasses.clear()
+    this.queue = []
+  }
+
   /**
    * Get the current queue length (for debugging/stats).
    */
@@ -133,46 +151,74 @@ export class TorrentUploader extends EngineComponent {
 
   // === Private methods ===
 
+  private peerClass(peer: PeerConnection): BandwidthClass {
+    let peerClass = this.peerClasses.get(peer)
+    if (!peerClass) {
+      peerClass = this.uploadClass.createChild()
+      this.peerClasses.set(peer, peerClass)
+    }
+    return peerClass
+  }
+
   private async drainQueue(): Promise<void> {
     // Prevent concurrent drain loops
     if (this.drainScheduled) return
 
     while (this.queue.length > 0) {
-      const req = this.queue[0]
+      const limited = this.uploadClass.isLimited
+      let index = 0
+      let minWaitMs = Infinity
+      // Peers already found out of tokens in this pass
+      let blocked: Set<PeerConnection> | null = null
 
-      // Skip if peer disconnected
-      if (!this.isPeerConnected(req.peer)) {
-        this.queue.shift()
-        continue
-      }
+      // First request whose peer has tokens; skip over blocked peers
+      for (; index < this.queue.length; index++) {
+        const req = this.queue[index]
+
+        // Drop if peer disconnected
+        if (!this.isPeerConnected(req.peer)) {
+          this.queue.splice(index--, 1)
+          continue
+        }
+
+        // Drop if we've since choked this peer
+        if (req.peer.amChoking) {
+          this.queue.splice(index--, 1)
+          this.logger.debug('Discarding queued request: peer now choked')
+          continue
+        }
+
+        if (!limited) break
+        if (blocked?.has(req.peer)) continue
 
-      // Skip if we've since choked this peer
-      if (req.peer.amChoking) {
-        this.queue.shift()
-        this.logger.debug('Discarding queued request: peer now choked')
-        continue
+        // Rate limit check
+        const peerClass = this.peerClass(req.peer)
+        if (peerClass.tryConsume(req.length)) break
+        minWaitMs = Math.min(minWaitMs, peerClass.msUntilAvailable(req.length))
+        if (!blocked) blocked = new Set()
+        blocked.add(req.peer)
       }
 
-      // Rate limit check
-      if (this.uploadBucket.isLimited && !this.uploadBucket.tryConsume(req.length)) {
-        // Schedule retry when tokens available
-        const delayMs = this.uploadBucket.msUntilAvailable(req.length)
+      if (index >= this.queue.length) {
+        if (this.queue.length === 0) return
+        // Every queued peer is out of tokens: retry when the first has some
         this.drainScheduled = true
         setTimeout(
           () => {
             this.drainScheduled = false
             this.drainQueue()
           },
-          Math.max(delayMs, 10),
+          Math.max(minWaitMs, 10),
         ) // minimum 10ms to avoid tight loop
         return
       }
 
       // Dequeue and process
-      this.queue.shift()
+      const req = this.queue.splice(index, 1)[0]
 
+      const buffer = this.bufferAllocator?.acquire(req.length)
       try {
-        const block = await this.contentStorage!.read(req.index, req.begin, req.length)
+        const block = await this.contentStorage!.read(req.index, req.begin, req.length, buffer)
 
         // Final check: peer still connected and unchoked
         if (!this.isPeerConnected(req.peer)) {
@@ -191,6 +237,8 @@ export class TorrentUploader extends EngineComponent {
           `Error handling queued request: ${err instanceof Error ? err.message : String(err)}`,
           { err },
         )
+      } finally {
+        if (buffer) this.bufferAllocator!.release(buffer)
       }
     }
   }
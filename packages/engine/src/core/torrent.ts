@@ -12,7 +12,7 @@ import { toHex, toString, compare } from '../utils/buffer'
 import { InfoHashHex, infoHashFromBytes } from '../utils/infohash'
 import { Bencode } from '../utils/bencode'
 import { TrackerManager } from '../tracker/tracker-manager'
-import { ISocketFactory } from '../interfaces/socket'
+import { DirectBlockEvent, ISocketFactory } from '../interfaces/socket'
 import { AnnounceStats, PeerInfo, TrackerStats } from '../interfaces/tracker'
 import { TorrentFileInfo } from './torrent-file-info'
 import { EngineComponent } from '../logging/logger'
@@ -33,7 +33,7 @@ import { randomBytes } from '../utils/hash'
 import { ConnectionTimingTracker } from './connection-timing'
 import { initializeTorrentStorage } from './torrent-initializer'
 import { TorrentDiskQueue, PassthroughDiskQueue, DiskQueueSnapshot, IDiskQueue } from './disk-queue'
-import { EndgameManager } from './endgame-manager'
+import { EndgameManager, EndgameStats } from './endgame-manager'
 import { PartsFile } from './parts-file'
 import type { LookupResult } from '../dht'
 import { CorruptionTracker, BanDecision } from './corruption-tracker'
@@ -43,16 +43,18 @@ import {
   TickLoopCallbacks,
   TickStats,
   TickResult,
-  CLEANUP_TICK_INTERVAL,
+  CLEANUP_INTERVAL_MS,
   BLOCK_REQUEST_TIMEOUT_MS,
   PIECE_ABANDON_TIMEOUT_MS,
   PIECE_ABANDON_MIN_PROGRESS,
 } from './torrent-tick-loop'
 import { MetadataFetcher } from './metadata-fetcher'
 import { TorrentUploader } from './torrent-uploader'
+import type { BandwidthClass } from './bandwidth-scheduler'
 import { FilePriorityManager, PieceClassification } from './file-priority-manager'
 import { PieceAvailability } from './piece-availability'
-import { TorrentPieceRequester, PieceRequesterDeps } from './piece-requester'
+import { TorrentPieceRequester, PieceRequesterDeps, RequestablePeer } from './piece-requester'
+import { PeerCounters, sumPeerCounters } from './peer-counters'
 
 /**
  * Maximum ratio of peer slots that incoming connections can occupy.
@@ -61,9 +63,19 @@ import { TorrentPieceRequester, PieceRequesterDeps } from './piece-requester'
  */
 export const MAX_INCOMING_RATIO = 0.6
 
+// Direct-to-disk receive status codes (see DirectBlockEvent)
+const DIRECT_BLOCK_WRITTEN = 0
+const DIRECT_BLOCK_NOT_REQUESTED = 3
+const DIRECT_BLOCK_PIECE_COMPLETE = 4
+const DIRECT_PIECE_PENDING = 0
+const DIRECT_PIECE_VERIFIED = 1
+
+/** How long to wait for the daemon's verdict on a piece it wrote entirely itself */
+const DIRECT_RESULT_TIMEOUT_MS = 5000
+
 // Re-export tick loop constants for consumers
 export {
-  CLEANUP_TICK_INTERVAL,
+  CLEANUP_INTERVAL_MS,
   BLOCK_REQUEST_TIMEOUT_MS,
   PIECE_ABANDON_TIMEOUT_MS,
   PIECE_ABANDON_MIN_PROGRESS,
@@ -104,6 +116,37 @@ export interface TorrentPersistedState {
 
   // === File Priorities ===
   filePriorities?: number[] // Per-file priority: 0=normal, 1=skip
+
+  // === Bandwidth ===
+  downloadLimit?: number // Per-torrent cap in bytes/sec (0 or absent = none)
+  uploadLimit?: number
+  bandwidthWeight?: number // Share of the global limits (default 1)
+}
+
+/**
+ * Per-torrent bandwidth settings (see Torrent.setBandwidthLimits).
+ */
+export interface TorrentBandwidthLimits {
+  /** Download cap in bytes/sec (0 = none) */
+  downloadLimit?: number
+  /** Upload cap in bytes/sec (0 = none) */
+  uploadLimit?: number
+  /** Share of the global limits relative to other active torrents (default 1) */
+  weight?: number
+}
+
+/**
+ * Estimated bytes held by one torrent's subsystems (see Torrent.getMemoryUsage).
+ */
+export interface TorrentMemoryUsage {
+  /** Active piece buffers and block tracking, plus pooled idle buffers */
+  activePieces: number
+  /** Availability counts and per-peer piece sets */
+  pieceAvailability: number
+  /** Peer records and indexes */
+  swarm: number
+  /** Received data waiting for a tick and queued sends, across connections */
+  peerBuffers: number
 }
 
 /**
@@ -143,6 +186,8 @@ export class Torrent extends EngineComponent {
 
   private btEngine: BtEngine
   private _swarm: Swarm // Single source of truth for peer state
+  /** Running sums over connected peers (buffered bytes, requests, pipeline depth) */
+  readonly peerCounters: PeerCounters
   private _corruptionTracker: CorruptionTracker = new CorruptionTracker()
   private _connectionManager: ConnectionManager // Handles outgoing connection lifecycle
   private connectionTiming: ConnectionTimingTracker // Tracks connection timing for adaptive timeouts
@@ -188,6 +233,17 @@ export class Torrent extends EngineComponent {
   private _partsFilePieces: Set<number> = new Set()
   /** .parts file manager for boundary pieces */
   private _partsFile?: PartsFile
+
+  // === Direct-to-disk receive (desktop io-daemon) ===
+  /** Registered disk layout, or null while PIECE data flows through JS */
+  private _directLayoutId: number | null = null
+  private _directLayoutPending = false
+  /** Registration was rejected - don't retry for this session */
+  private _directLayoutFailed = false
+  /** Piece verdicts from the daemon that arrived before the engine finalized the piece */
+  private _directPieceResults: Map<number, number> = new Map()
+  private _directResultWaiters: Map<number, (result: number) => void> = new Map()
+
   private maxUploadSlots: number = 4
 
   // Metadata fetcher (BEP 9)
@@ -205,6 +261,11 @@ export class Torrent extends EngineComponent {
   // Peer event handler (handles wire protocol events)
   private _peerHandler!: TorrentPeerHandler
 
+  // Bandwidth classes: this torrent's share of the global limits, split per peer
+  private _downloadClass!: BandwidthClass
+  private _uploadClass!: BandwidthClass
+  private _peerDownloadClasses = new Map<RequestablePeer, BandwidthClass>()
+
   // Download rate limit retry scheduling
   private downloadRateLimitRetryScheduled = false
 
@@ -413,6 +474,7 @@ export class Torrent extends EngineComponent {
 
     // Initialize swarm for unified peer tracking
     this._swarm = new Swarm(this.logger)
+    this.peerCounters = new PeerCounters(engine.peerCounters ?? null)
 
     // Initialize connection manager with config based on maxPeers
     this._connectionManager = new ConnectionManager(
@@ -425,6 +487,7 @@ export class Torrent extends EngineComponent {
         connectTimeout: 10000, // 10 second internal timeout
         encryptionPolicy, // MSE/PE encryption policy
       },
+      this.btEngine.connectPipeline,
     )
 
     // Set MSE encryption context for the connection manager
@@ -456,14 +519,18 @@ export class Torrent extends EngineComponent {
       this.emit('metadata', buffer)
     })
 
+    this._downloadClass = this.btEngine.bandwidthTracker.downloadScheduler.createClass()
+    this._uploadClass = this.btEngine.bandwidthTracker.uploadScheduler.createClass()
+
     // Initialize uploader for rate-limited piece uploads
     this._uploader = new TorrentUploader({
       engine: this.engineInstance,
       infoHash: this.infoHash,
-      uploadBucket: this.btEngine.bandwidthTracker.uploadBucket,
+      uploadClass: this._uploadClass,
       isPeerConnected: (peer) => this.connectedPeers.includes(peer),
       canServePiece: (index) => this.canServePiece(index),
       recordUpload: (bytes) => this.btEngine.bandwidthTracker.record('peer:payload', bytes, 'up'),
+      bufferAllocator: this.btEngine.bufferAllocator,
     })
     this._uploader.setContentStorage(this.contentStorage ?? null)
 
@@ -480,6 +547,8 @@ export class Torrent extends EngineComponent {
       onPrioritiesChanged: (filePriorities, _classification) => {
         // Propagate file priorities to contentStorage for filtered writes
         this.contentStorage?.setFilePriorities(filePriorities)
+        // Boundary pieces need engine-side handling, which rules out direct receive
+        this.updateDirectReceive()
       },
       onBlacklistPieces: (indices) => {
         // Clear blacklisted pieces from active pieces
@@ -529,6 +598,7 @@ export class Torrent extends EngineComponent {
       // Peer access
       getConnectedPeers: () => this.connectedPeers,
       getPeers: () => this.peers,
+      getPeerCounters: () => this.peerCounters,
 
       // Managers
       getSwarm: () => this._swarm,
@@ -567,6 +637,8 @@ export class Torrent extends EngineComponent {
             }
           }
         : undefined,
+
+      getDirectLayoutId: () => this._directLayoutId,
     }
   }
 
@@ -605,6 +677,7 @@ export class Torrent extends EngineComponent {
       onBlock: (peer, msg) => this.handleBlock(peer, msg),
       onBlockZeroCopy: (peer, pieceIndex, blockOffset, buffer, dataOffset, dataLength) =>
         this.handleBlockZeroCopy(peer, pieceIndex, blockOffset, buffer, dataOffset, dataLength),
+      onDirectBlock: (peer, event) => this.handleDirectBlock(peer, event),
       onInterested: (peer) => this.handleInterested(peer),
       buildPeerPieceIndex: (peer) => this.buildPeerPieceIndex(peer),
       updateInterest: (peer) => this.updateInterest(peer),
@@ -666,6 +739,8 @@ export class Torrent extends EngineComponent {
     if (!this.isPrivate) {
       this.startDHTLookup()
     }
+
+    this.updateDirectReceive()
   }
 
   async connectToPeer(peerInfo: PeerInfo) {
@@ -831,7 +906,7 @@ export class Torrent extends EngineComponent {
     if (this.piecesCount === 0) return false
 
     // If we have file priorities, check only wanted pieces
-    if (this.pieceClassification.length > 0) {
+    if (this._filePriorityManager.classificationCodes.length > 0) {
       return this.completedWantedPiecesCount === this.wantedPiecesCount
     }
 
@@ -1011,6 +1086,75 @@ export class Torrent extends EngineComponent {
     // Sync partsFilePieces set with loaded data
     this._partsFilePieces = this._partsFile.pieces
     this.logger.debug(`PartsFile initialized with ${this._partsFilePieces.size} pieces`)
+
+    // Storage is ready - a running torrent can switch to direct receive now
+    this.updateDirectReceive()
+  }
+
+  /**
+   * Register or remove the direct-to-disk layout to match the torrent's state.
+   *
+   * Direct receive is only used while every wanted piece goes straight to its
+   * files: the torrent is downloading, has storage on a daemon root, and has
+   * no boundary pieces (those are verified and stored in .parts by the engine).
+   */
+  private updateDirectReceive(): void {
+    const factory = this.socketFactory
+    const root = this.storageRoot
+    const eligible =
+      this.btEngine.directToDisk &&
+      !!factory.registerDiskLayout &&
+      this._networkActive &&
+      this.hasMetadata &&
+      !!this.contentStorage &&
+      !!root &&
+      !this.isDownloadComplete &&
+      this.pieceHashes.length === this.piecesCount &&
+      this._filePriorityManager.boundaryCount === 0
+
+    if (!eligible) {
+      if (this._directLayoutId !== null) {
+        this.logger.info('Direct-to-disk receive disabled')
+        factory.removeDiskLayout?.(this._directLayoutId)
+        this._directLayoutId = null
+        this._directPieceResults.clear()
+        // Pieces waiting on a verdict fall back to reading their data back
+        for (const resolve of this._directResultWaiters.values()) resolve(DIRECT_PIECE_PENDING)
+        this._directResultWaiters.clear()
+      }
+      return
+    }
+    if (this._directLayoutId !== null || this._directLayoutPending || this._directLayoutFailed) {
+      return
+    }
+
+    const pieceHashes = new Uint8Array(this.piecesCount * 20)
+    for (let i = 0; i < this.piecesCount; i++) {
+      pieceHashes.set(this.pieceHashes[i], i * 20)
+    }
+    this._directLayoutPending = true
+    factory
+      .registerDiskLayout!({
+        rootKey: root!.key,
+        pieceLength: this.pieceLength,
+        files: this.contentStorage!.filesList.map((f) => ({ path: f.path, length: f.length })),
+        pieceHashes,
+      })
+      .then(
+        (layoutId) => {
+          this._directLayoutPending = false
+          this._directLayoutId = layoutId
+          this.logger.info(`Direct-to-disk receive enabled (layout ${layoutId})`)
+          // The torrent may have changed state while the layout was registered
+          this.updateDirectReceive()
+        },
+        (err) => {
+          this._directLayoutPending = false
+          this._directLayoutFailed = true
+          const msg = err instanceof Error ? err.message : String(err)
+          this.logger.warn(`Direct-to-disk receive unavailable: ${msg}`)
+        },
+      )
   }
 
   /**
@@ -1118,7 +1262,13 @@ export class Torrent extends EngineComponent {
   private async materializePiece(pieceIndex: number): Promise<boolean> {
     if (!this._partsFile || !this.contentStorage) return false
 
-    const pieceData = this._partsFile.getPiece(pieceIndex)
+    let pieceData: Uint8Array | undefined
+    try {
+      pieceData = await this._partsFile.readPiece(pieceIndex)
+    } catch (e) {
+      this.logger.error(`Failed to read piece ${pieceIndex} from .parts:`, e)
+      return false
+    }
     if (!pieceData) {
       this.logger.warn(`Cannot materialize piece ${pieceIndex}: not in .parts`)
       return false
@@ -1171,7 +1321,7 @@ export class Torrent extends EngineComponent {
     if (!this._bitfield?.get(pieceIndex)) return false
 
     // The new classification should be 'wanted' (all files non-skipped)
-    return this.pieceClassification[pieceIndex] === 'wanted'
+    return this._filePriorityManager.getClassification(pieceIndex) === 'wanted'
   }
 
   /**
@@ -1247,7 +1397,7 @@ export class Torrent extends EngineComponent {
     if (this.piecesCount === 0) return 0
 
     // If we have file priorities, calculate progress based on wanted pieces
-    if (this.pieceClassification.length > 0) {
+    if (this._filePriorityManager.classificationCodes.length > 0) {
       const wanted = this.wantedPiecesCount
       if (wanted === 0) return 1 // All files skipped = 100% (nothing to do)
       return this.completedWantedPiecesCount / wanted
@@ -1535,14 +1685,46 @@ export class Torrent extends EngineComponent {
 
     // Reset peer coordinator so next start gets fresh isFirstEvaluation
     this._peerCoordinator.reset()
+
+    this.updateDirectReceive()
   }
 
   /**
    * Get current tick statistics for health monitoring.
-   * Returns stats from the current logging window (resets every 5 seconds).
+   * Tick stats cover the current logging window (resets every 5 seconds);
+   * the endgame counters (endgameMs, wastedBytes) are cumulative.
    */
-  getTickStats(): TickStats {
-    return this._tickLoop.getTickStats()
+  getTickStats(): TickStats & EndgameStats {
+    return { ...this._tickLoop.getTickStats(), ...this._endgameManager.getStats() }
+  }
+
+  /**
+   * Estimated bytes held by this torrent's subsystems.
+   */
+  getMemoryUsage(): TorrentMemoryUsage {
+    return {
+      activePieces: this.activePieces?.memoryBytes ?? 0,
+      pieceAvailability: this._availability.memoryBytes,
+      swarm: this._swarm.memoryBytes,
+      peerBuffers: this.peerCounters.bufferedBytes + this.peerCounters.queuedSendBytes,
+    }
+  }
+
+  /**
+   * Whether any peer has received data or queued sends waiting for a tick.
+   * Lets the engine tick idle and seeding torrents less often without
+   * delaying their traffic.
+   */
+  hasPendingIo(): boolean {
+    return this.peerCounters.bufferedBytes > 0 || this.peerCounters.queuedSendBytes > 0
+  }
+
+  /**
+   * Recompute peer counters from the connected peers and describe any
+   * difference from the incrementally maintained ones (debug invariant).
+   */
+  checkPeerCounters(): string[] {
+    return this.peerCounters.diff(sumPeerCounters(this.connectedPeers))
   }
 
   /**
@@ -1789,6 +1971,62 @@ export class Torrent extends EngineComponent {
     this._connectionManager.updateConfig({ maxPeersPerTorrent: max })
   }
 
+  /**
+   * Per-torrent bandwidth caps and weight.
+   */
+  get bandwidthLimits(): Required<TorrentBandwidthLimits> {
+    return {
+      downloadLimit: this._persisted.downloadLimit ?? 0,
+      uploadLimit: this._persisted.uploadLimit ?? 0,
+      weight: this._persisted.bandwidthWeight ?? 1,
+    }
+  }
+
+  /**
+   * Set per-torrent bandwidth caps and/or weight; omitted fields are left
+   * unchanged. Caps apply on top of the global limits, and the weight sets
+   * this torrent's share of them while other torrents are active.
+   * Throws InvalidParameter, changing nothing, for a cap that isn't a finite
+   * number >= 0 or a weight that isn't a finite number > 0.
+   */
+  setBandwidthLimits(limits: TorrentBandwidthLimits): void {
+    const isCap = (v: number | undefined) => v === undefined || (Number.isFinite(v) && v >= 0)
+    const { weight } = limits
+    if (
+      !isCap(limits.downloadLimit) ||
+      !isCap(limits.uploadLimit) ||
+      !(weight === undefined || (Number.isFinite(weight) && weight > 0))
+    ) {
+      throw new Error('InvalidParameter')
+    }
+    this.restoreBandwidthLimits(limits)
+    ;(this.engine as BtEngine).sessionPersistence?.saveTorrentState(this)
+  }
+
+  /**
+   * Apply bandwidth settings without persisting (used during session restore).
+   */
+  restoreBandwidthLimits(limits: TorrentBandwidthLimits): void {
+    if (limits.downloadLimit !== undefined) {
+      this._persisted.downloadLimit = Math.max(0, limits.downloadLimit)
+    }
+    if (limits.uploadLimit !== undefined) {
+      this._persisted.uploadLimit = Math.max(0, limits.uploadLimit)
+    }
+    if (limits.weight !== undefined && limits.weight > 0) {
+      this._persisted.bandwidthWeight = limits.weight
+    }
+    this.applyBandwidthLimits()
+  }
+
+  private applyBandwidthLimits(): void {
+    const { downloadLimit, uploadLimit, weight } = this.bandwidthLimits
+    this._downloadClass.setLimit(downloadLimit)
+    this._downloadClass.setWeight(weight)
+    this._uploadClass.setLimit(uploadLimit)
+    this._uploadClass.setWeight(weight)
+  }
+
   setMaxUploadSlots(max: number) {
     this.maxUploadSlots = max
     this._peerCoordinator.updateUnchokeConfig({ maxUploadSlots: max })
@@ -1905,6 +2143,7 @@ export class Torrent extends EngineComponent {
           peer,
         )
       }
+      peer.attachCounters(this.peerCounters)
     }
 
     this.assertConnectionLimit('addPeer')
@@ -1929,6 +2168,8 @@ export class Torrent extends EngineComponent {
     if (removedUploads > 0) {
       this.logger.debug(`Cleared ${removedUploads} queued uploads for disconnected peer`)
     }
+    this._peerDownloadClasses.get(peer)?.remove()
+    this._peerDownloadClasses.delete(peer)
 
     // Clean up any pending metadata fetch from this peer
     this._metadataFetcher.onPeerDisconnected(peer)
@@ -1937,6 +2178,7 @@ export class Torrent extends EngineComponent {
     if (peer.remoteAddress && peer.remotePort) {
       const key = peerKey(peer.remoteAddress, peer.remotePort)
       this._swarm.markDisconnected(key)
+      peer.detachCounters()
       // Notify peer coordinator of disconnect
       this._peerCoordinator.peerDisconnected(key)
       this.logger.debug(`Removing peer ${key}, peers remaining: ${this.numPeers}`)
@@ -1984,6 +2226,18 @@ export class Torrent extends EngineComponent {
     this._peerRequestRoundRobin = (startIndex + 1) % peers.length
   }
 
+  /**
+   * Download bandwidth class for a peer, created on first request.
+   */
+  private peerDownloadClass(peer: RequestablePeer): BandwidthClass {
+    let peerClass = this._peerDownloadClasses.get(peer)
+    if (!peerClass) {
+      peerClass = this._downloadClass.createChild()
+      this._peerDownloadClasses.set(peer, peerClass)
+    }
+    return peerClass
+  }
+
   /**
    * Schedule retry when download rate limit blocks requests.
    * Uses round-robin to be fair across peers when resuming.
@@ -1991,8 +2245,8 @@ export class Torrent extends EngineComponent {
   private scheduleDownloadRateLimitRetry(blockSize: number): void {
     if (this.downloadRateLimitRetryScheduled) return
 
-    const downloadBucket = this.btEngine.bandwidthTracker.downloadBucket
-    const delayMs = downloadBucket.msUntilAvailable(blockSize)
+    // The torrent's share of the limit; peers take turns within it below
+    const delayMs = this._downloadClass.msUntilAvailable(blockSize)
     this.downloadRateLimitRetryScheduled = true
     setTimeout(
       () => {
@@ -2172,7 +2426,10 @@ export class Torrent extends EngineComponent {
         this.activePieces = new ActivePieceManager(
           this.engineInstance,
           (index) => this.getPieceLength(index),
-          { standardPieceLength: this.pieceLength },
+          {
+            standardPieceLength: this.pieceLength,
+            bufferAllocator: this.btEngine.bufferAllocator,
+          },
         )
         return this.activePieces
       },
@@ -2181,10 +2438,10 @@ export class Torrent extends EngineComponent {
 
       // Bandwidth
       getMaxPipelineDepth: () => this.btEngine.config?.maxPipelineDepth.get() ?? 500,
-      isDownloadRateLimited: () => this.btEngine.bandwidthTracker.downloadBucket.isLimited,
-      getDownloadRateLimit: () => this.btEngine.bandwidthTracker.downloadBucket.refillRate,
-      tryConsumeDownloadBandwidth: (bytes) =>
-        this.btEngine.bandwidthTracker.downloadBucket.tryConsume(bytes),
+      isDownloadRateLimited: () => this._downloadClass.isLimited,
+      getDownloadRateLimit: () => this._downloadClass.effectiveLimit,
+      tryConsumeDownloadBandwidth: (peer, bytes) =>
+        this.peerDownloadClass(peer).tryConsume(bytes),
 
       // Callbacks
       removePieceFromAllIndices: (index) => this.removePieceFromAllIndices(index),
@@ -2225,7 +2482,7 @@ export class Torrent extends EngineComponent {
       return
     }
 
-    if (peer.requestsPending > 0) peer.requestsPending--
+    peer.releaseRequest(msg.index, msg.begin)
 
     const block = msg.block
     this.handleBlockCommon(peer, msg.index, msg.begin, block.length, (piece, blockIndex, peerId) =>
@@ -2233,6 +2490,110 @@ export class Torrent extends EngineComponent {
     )
   }
 
+  /**
+   * Handle a block the io-daemon parsed and wrote to disk itself
+   * (direct-to-disk receive). Only bookkeeping happens here - the data
+   * never enters JS.
+   */
+  private handleDirectBlock(peer: PeerConnection, event: DirectBlockEvent): void {
+    if (
+      event.status === DIRECT_BLOCK_NOT_REQUESTED ||
+      event.status === DIRECT_BLOCK_PIECE_COMPLETE
+    ) {
+      // Dropped by the daemon: cancelled, unsolicited, or a duplicate in endgame
+      this.logger.debug(
+        `Direct block ${event.index}:${event.begin} dropped (status ${event.status})`,
+      )
+      return
+    }
+    if (event.status !== DIRECT_BLOCK_WRITTEN) {
+      // Not on disk: leave the block missing so its request times out and is retried
+      this.logger.warn(
+        `Direct write of block ${event.index}:${event.begin} failed (status ${event.status})`,
+      )
+      return
+    }
+
+    const active = this.activePieces?.get(event.index)
+    if (!active || active.blocksReceived === 0) {
+      // A fresh attempt at this piece - any stored verdict is from an earlier one
+      this._directPieceResults.delete(event.index)
+    }
+    if (event.pieceResult !== DIRECT_PIECE_PENDING) {
+      this.recordDirectPieceResult(event.index, event.pieceResult)
+    }
+
+    const { index, begin, length } = event
+    this.handleBlockCommon(peer, index, begin, length, (piece, blockIndex, peerId) =>
+      piece.addBlockWritten(blockIndex, peerId),
+    )
+  }
+
+  private recordDirectPieceResult(index: number, result: number): void {
+    const waiter = this._directResultWaiters.get(index)
+    if (waiter) {
+      this._directResultWaiters.delete(index)
+      waiter(result)
+    } else {
+      this._directPieceResults.set(index, result)
+    }
+  }
+
+  /**
+   * Wait for the daemon's verdict on a piece whose blocks it all wrote.
+   * The verdict rides on whichever block completed the piece daemon-side,
+   * which may be processed after the engine's last block (e.g. duplicates
+   * in endgame). Resolves to DIRECT_PIECE_PENDING on timeout.
+   */
+  private awaitDirectPieceResult(index: number): Promise<number> {
+    const result = this._directPieceResults.get(index)
+    if (result !== undefined) {
+      this._directPieceResults.delete(index)
+      return Promise.resolve(result)
+    }
+    return new Promise((resolve) => {
+      const timer = setTimeout(() => {
+        this._directResultWaiters.delete(index)
+        resolve(DIRECT_PIECE_PENDING)
+      }, DIRECT_RESULT_TIMEOUT_MS)
+      this._directResultWaiters.set(index, (r) => {
+        clearTimeout(timer)
+        resolve(r)
+      })
+    })
+  }
+
+  /**
+   * Verify a piece some of whose blocks the io-daemon wrote itself.
+   * Uses the daemon's verdict when every block went through it; otherwise
+   * writes the buffered blocks, then reads the piece back and hashes it.
+   */
+  private async verifyDirectPiece(index: number, piece: ActivePiece): Promise<boolean> {
+    if (piece.directBlocks === piece.blocksNeeded && this._directLayoutId !== null) {
+      const result = await this.awaitDirectPieceResult(index)
+      if (result !== DIRECT_PIECE_PENDING) return result === DIRECT_PIECE_VERIFIED
+    }
+
+    const storage = this.contentStorage!
+    const buffer = piece.getBuffer()
+    for (let i = 0; i < piece.blocksNeeded; i++) {
+      if (piece.isBlockOnDisk(i)) continue
+      const begin = i * BLOCK_SIZE
+      const end = Math.min(begin + BLOCK_SIZE, piece.length)
+      await storage.write(index, begin, buffer.subarray(begin, end))
+    }
+    // The daemon only saw part of the piece - drop its partial hash state
+    if (this._directLayoutId !== null) {
+      this.socketFactory.resetDiskPiece?.(this._directLayoutId, index)
+    }
+    this._directPieceResults.delete(index)
+
+    const expectedHash = this.getPieceHash(index)
+    if (!expectedHash) return true
+    const data = await storage.read(index, 0, piece.length)
+    return compare(await this.btEngine.hasher.sha1(data), expectedHash) === 0
+  }
+
   /**
    * Zero-copy block handler for PIECE messages.
    * Called from processBuffer() fast path to copy block data directly from
@@ -2246,7 +2607,7 @@ export class Torrent extends EngineComponent {
     dataOffset: number,
     dataLength: number,
   ): void {
-    // Note: requestsPending is already decremented in processBuffer fast path
+    // Note: the pipeline slot is already released in processBuffer fast path
     this.handleBlockCommon(peer, pieceIndex, blockOffset, dataLength, (piece, blockIndex, peerId) =>
       piece.addBlockFromChunked(blockIndex, buffer, dataOffset, dataLength, peerId),
     )
@@ -2271,7 +2632,10 @@ export class Torrent extends EngineComponent {
       this.activePieces = new ActivePieceManager(
         this.engineInstance,
         (index) => this.getPieceLength(index),
-        { standardPieceLength: this.pieceLength },
+        {
+          standardPieceLength: this.pieceLength,
+          bufferAllocator: this.btEngine.bufferAllocator,
+        },
       )
     }
 
@@ -2285,6 +2649,7 @@ export class Torrent extends EngineComponent {
     // Early exit if we already have this piece (prevents creating active pieces for complete pieces)
     if (this._bitfield?.get(pieceIndex)) {
       this.logger.debug(`Ignoring block ${pieceIndex}:${blockOffset} - piece already complete`)
+      this._endgameManager.recordWastedBlock(dataLength)
       return
     }
 
@@ -2302,29 +2667,47 @@ export class Torrent extends EngineComponent {
       this.removePieceFromAllIndices(pieceIndex)
     }
 
+    // First block of a (re)started piece: stream it to the hasher if the
+    // storage layer won't verify it, so the digest is ready at completion
+    if (piece.blocksReceived === 0 && !piece.hasStreamingHash) {
+      this.maybeAttachStreamingHash(piece)
+    }
+
     // Get peer ID for tracking
     const peerId = peer.peerId ? toHex(peer.peerId) : 'unknown'
     const blockIndex = Math.floor(blockOffset / BLOCK_SIZE)
 
+    // Request-to-arrival time: how soon this peer delivers (endgame duplicates)
+    const requestedAt = piece.getRequestTime(blockIndex, peerId)
+    if (requestedAt !== undefined) peer.recordBlockLatency(Date.now() - requestedAt)
+
+    // Other peers' requests for this block, read before adding it clears them
+    const cancels = this._endgameManager.isEndgame
+      ? this._endgameManager.getCancels(piece, blockIndex, peerId)
+      : null
+
     // Add block to piece using the provided function
     const isNew = addBlockFn(piece, blockIndex, peerId)
     if (!isNew) {
       this.logger.debug(`Duplicate block ${pieceIndex}:${blockOffset}`)
+      this._endgameManager.recordWastedBlock(dataLength)
     } else {
       // Record payload bytes (piece data only, not protocol overhead)
       ;(this.engine as BtEngine).bandwidthTracker.record('peer:payload', dataLength, 'down')
     }
 
-    // In endgame mode, send CANCEL to other peers that requested this block
-    if (isNew && this._endgameManager.isEndgame) {
-      const cancels = this._endgameManager.getCancels(piece, blockIndex, peerId)
+    // In endgame mode, CANCEL other peers' requests for this block
+    // (queued and sent per peer at the end of the tick)
+    if (isNew && cancels) {
       for (const cancel of cancels) {
-        // Find peer by ID and send cancel
+        // Find peer by ID and queue the cancel
         for (const p of this.connectedPeers) {
           const pId = p.peerId ? toHex(p.peerId) : `${p.remoteAddress}:${p.remotePort}`
           if (pId === cancel.peerId) {
-            p.sendCancel(cancel.index, cancel.begin, cancel.length)
-            this.logger.debug(`Endgame: sent CANCEL to ${pId} for ${cancel.index}:${cancel.begin}`)
+            this._tickLoop.queueCancel(p, cancel.index, cancel.begin, cancel.length)
+            // The request is gone from the piece: free the peer's pipeline slot
+            p.releaseCancelledRequest(cancel.index, cancel.begin)
+            this.logger.debug(`Endgame: CANCEL to ${pId} for ${cancel.index}:${cancel.begin}`)
             break
           }
         }
@@ -2343,6 +2726,43 @@ export class Torrent extends EngineComponent {
     }
   }
 
+  /**
+   * Attach an incremental hash to a piece that will be hashed by the engine
+   * (boundary pieces bound for .parts, and pieces spanning several files).
+   * Single-file pieces are verified by the storage layer instead.
+   */
+  private maybeAttachStreamingHash(piece: ActivePiece): void {
+    const createSha1 = this.btEngine.hasher.createSha1
+    if (!createSha1 || !this.getPieceHash(piece.index)) return
+    // Blocks received directly are never in the buffer, so there's nothing to stream
+    if (this._directLayoutId !== null) return
+
+    const isBoundaryPiece = this._filePriorityManager.getClassification(piece.index) === 'boundary'
+    const engineHashed =
+      (isBoundaryPiece && this._partsFile) ||
+      !this.contentStorage?.pieceFitsSingleFile(piece.index, piece.length)
+    if (engineHashed) {
+      piece.attachStreamingHash(createSha1.call(this.btEngine.hasher))
+    }
+  }
+
+  /**
+   * Hash a completed piece, preferring the digest streamed while its blocks
+   * arrived. Falls back to hashing the assembled data.
+   */
+  private async hashPiece(piece: ActivePiece, pieceData: Uint8Array): Promise<Uint8Array> {
+    const streamed = piece.takeStreamingDigest()
+    if (streamed) {
+      try {
+        return await streamed
+      } catch (e) {
+        const msg = e instanceof Error ? e.message : String(e)
+        this.logger.debug(`Streaming hash failed for piece ${piece.index}, rehashing: ${msg}`)
+      }
+    }
+    return this.btEngine.hasher.sha1(pieceData)
+  }
+
   /**
    * Finalize a complete piece: verify hash and write to storage.
    * Uses verified write when available (io-daemon) for atomic hash verification.
@@ -2353,13 +2773,37 @@ export class Torrent extends EngineComponent {
     const expectedHash = this.getPieceHash(index)
 
     // Check piece classification to determine storage destination
-    const classification = this.pieceClassification[index]
+    const classification = this._filePriorityManager.getClassification(index)
     const isBoundaryPiece = classification === 'boundary'
 
-    if (isBoundaryPiece && this._partsFile) {
+    if (piece.directBlocks > 0 && this.contentStorage) {
+      // Direct-to-disk piece: (some of) the data is already in its files
+      try {
+        if (!(await this.verifyDirectPiece(index, piece))) {
+          this.handleHashMismatch(index, piece)
+          return
+        }
+      } catch (e) {
+        const errorMsg = e instanceof Error ? e.message : String(e)
+        this.logger.error(`Fatal write error - stopping torrent:`, errorMsg)
+        this.errorMessage = `Write failed: ${errorMsg}`
+        this.stopNetwork()
+        this.activePieces?.removeFullyResponded(index)
+        ;(this.engine as BtEngine).sessionPersistence?.saveTorrentState(this)
+        return
+      }
+
+      this.markPieceVerified(index)
+      this.activePieces?.removeFullyResponded(index)
+      ;(this.engine as BtEngine).bandwidthTracker.record('disk', piece.length, 'down')
+      for (const file of this._files) {
+        file.updateForPiece(index)
+      }
+      this._tickLoop.queueHave(index)
+    } else if (isBoundaryPiece && this._partsFile) {
       // Boundary piece: verify hash then store in .parts file
       if (expectedHash) {
-        const actualHash = await this.btEngine.hasher.sha1(pieceData)
+        const actualHash = await this.hashPiece(piece, pieceData)
         if (compare(actualHash, expectedHash) !== 0) {
           this.handleHashMismatch(index, piece)
           return
@@ -2425,7 +2869,7 @@ export class Torrent extends EngineComponent {
 
           if (!usedVerifiedWrite && expectedHash) {
             // Verified write not available - verify hash in TypeScript
-            const actualHash = await this.btEngine.hasher.sha1(pieceData)
+            const actualHash = await this.hashPiece(piece, pieceData)
             if (compare(actualHash, expectedHash) !== 0) {
               this.handleHashMismatch(index, piece)
               return
@@ -2452,7 +2896,7 @@ export class Torrent extends EngineComponent {
         }
       } else if (expectedHash) {
         // No storage but have hash - verify anyway (shouldn't happen in practice)
-        const actualHash = await this.btEngine.hasher.sha1(pieceData)
+        const actualHash = await this.hashPiece(piece, pieceData)
         if (compare(actualHash, expectedHash) !== 0) {
           this.handleHashMismatch(index, piece)
           return
@@ -2600,6 +3044,9 @@ export class Torrent extends EngineComponent {
     this.activePieces?.destroy()
     this.logger.info(`activePieces.destroy done at ${Date.now() - t0}ms`)
 
+    // Cancel outstanding metadata request timeouts
+    this._metadataFetcher.destroy()
+
     this.logger.info(`about to check trackerManager (exists=${!!this.trackerManager})`)
     if (this.trackerManager) {
       if (!options?.skipAnnounce) {
@@ -2625,12 +3072,21 @@ export class Torrent extends EngineComponent {
     }
     // Close all connected peers (swarm will be updated via markDisconnected)
     const numPeers = this.connectedPeers.length
-    this.connectedPeers.forEach((peer) => peer.close())
+    this.connectedPeers.forEach((peer) => {
+      peer.close()
+      peer.detachCounters()
+    })
     this.logger.info(`Closed ${numPeers} peers`)
 
     // Clear swarm state
     this._swarm.clear()
 
+    // Release bandwidth classes so the rest of the engine gets our share
+    this._uploader.destroy()
+    this._peerDownloadClasses.clear()
+    this._downloadClass.remove()
+    this._uploadClass.remove()
+
     if (this.contentStorage) {
       const t2 = Date.now()
       await this.contentStorage.close()
@@ -2717,7 +3173,7 @@ export class Torrent extends EngineComponent {
       for (let i = 0; i < this.piecesCount; i++) {
         try {
           // Check if this is a boundary piece that might be in .parts
-          const isBoundary = this.pieceClassification[i] === 'boundary'
+          const isBoundary = this._filePriorityManager.getClassification(i) === 'boundary'
           let isValid = false
 
           if (isBoundary && this._partsFile?.hasPiece(i)) {
@@ -2766,7 +3222,7 @@ export class Torrent extends EngineComponent {
   private async verifyPieceFromParts(index: number): Promise<boolean> {
     if (!this._partsFile) return false
 
-    const data = this._partsFile.getPiece(index)
+    const data = await this._partsFile.readPiece(index).catch(() => undefined)
     if (!data) return false
 
     const expectedHash = this.getPieceHash(index)
@@ -2787,6 +3243,7 @@ export class Torrent extends EngineComponent {
       // Clear ALL active pieces - downloading is done, release memory
       this.activePieces?.destroy()
       this.activePieces = undefined
+      this.updateDirectReceive()
 
       // Reset endgame state
       this._endgameManager.reset()
@@ -2901,6 +3358,7 @@ export class Torrent extends EngineComponent {
    */
   restorePersistedState(state: TorrentPersistedState): void {
     this._persisted = { ...state }
+    this.applyBandwidthLimits()
 
     // Restore bitfield from completedPieces
     if (state.completedPieces.length && this._bitfield) {
@@ -1175,6 +1175,13 @@ export class DHTNode extends EventEmitter {
     return this.routingTable.size()
   }
 
+  /**
+   * Estimated bytes held by the routing table and the announced-peer store.
+   */
+  memoryBytes(): number {
+    return this.routingTable.memoryBytes() + this.peerStore.memoryBytes()
+  }
+
   /**
    * Get all nodes in the routing table.
    */
@@ -6,7 +6,7 @@
  */
 
 import { EventEmitter } from '../utils/event-emitter'
-import { IUdpSocket, ISocketFactory } from '../interfaces/socket'
+import { IUdpSocket, ISocketFactory, UdpDatagram } from '../interfaces/socket'
 import { TransactionManager } from './transaction-manager'
 import {
   KRPCQuery,
@@ -84,6 +84,9 @@ export class KRPCSocket extends EventEmitter {
   private rateLimitCleanupTimer: ReturnType<typeof setTimeout> | null = null
   private _queriesDropped = 0
 
+  // Datagrams sent in the current task, handed to sendBatch() together
+  private outgoing: UdpDatagram[] = []
+
   constructor(socketFactory: ISocketFactory, options: KRPCSocketOptions = {}) {
     super()
     this.socketFactory = socketFactory
@@ -110,9 +113,17 @@ export class KRPCSocket extends EventEmitter {
       this.options.bindPort,
     )
 
-    this.socket.onMessage((rinfo, data) => {
-      this.handleMessage(data, rinfo)
-    })
+    if (this.socket.onMessageBatch) {
+      this.socket.onMessageBatch((datagrams) => {
+        for (const d of datagrams) {
+          this.handleMessage(d.data, d)
+        }
+      })
+    } else {
+      this.socket.onMessage((rinfo, data) => {
+        this.handleMessage(data, rinfo)
+      })
+    }
 
     // Start rate limit cleanup timer
     if (this.rateLimitEnabled) {
@@ -197,9 +208,7 @@ export class KRPCSocket extends EventEmitter {
         }
       })
 
-      this._bytesSent += data.length
-      this.bandwidthTracker?.record('dht', data.length, 'up')
-      this.socket.send(host, port, data)
+      this.transmit(host, port, data)
     })
   }
 
@@ -210,9 +219,33 @@ export class KRPCSocket extends EventEmitter {
     if (!this.socket) {
       throw new Error('Socket not bound')
     }
+    this.transmit(host, port, data)
+  }
+
+  /**
+   * Send a datagram. With a batching socket, datagrams sent during the
+   * current task (e.g. responses to a received batch, or a lookup's parallel
+   * queries) go out together in one sendBatch() call.
+   */
+  private transmit(host: string, port: number, data: Uint8Array): void {
     this._bytesSent += data.length
     this.bandwidthTracker?.record('dht', data.length, 'up')
-    this.socket.send(host, port, data)
+    const socket = this.socket!
+    if (!socket.sendBatch) {
+      socket.send(host, port, data)
+      return
+    }
+    this.outgoing.push({ addr: host, port, data })
+    if (this.outgoing.length === 1) {
+      queueMicrotask(() => this.flushOutgoing())
+    }
+  }
+
+  private flushOutgoing(): void {
+    if (this.outgoing.length === 0) return
+    const datagrams = this.outgoing
+    this.outgoing = []
+    this.socket?.sendBatch?.(datagrams)
   }
 
   /**
@@ -246,6 +279,7 @@ export class KRPCSocket extends EventEmitter {
       this.rateLimitCleanupTimer = null
     }
     this.rateLimitMap.clear()
+    this.flushOutgoing()
     if (this.socket) {
       this.socket.close()
       this.socket = null
@@ -9,6 +9,7 @@
  */
 
 import { CompactPeer } from './types'
+import { MAP_ENTRY_BYTES, SLOT_BYTES, objectBytes, stringBytes } from '../utils/memory-estimate'
 
 /**
  * Default peer TTL: 30 minutes.
@@ -49,6 +50,11 @@ interface PeerEntry {
   addedAt: number
 }
 
+/** Estimated size of one PeerEntry with its host string */
+const PEER_ENTRY_BYTES = objectBytes(3) + stringBytes(15) + SLOT_BYTES
+/** Estimated size of one infohash entry: hex key, peer array and map slot */
+const INFOHASH_ENTRY_BYTES = stringBytes(40) + objectBytes(0) + MAP_ENTRY_BYTES
+
 /**
  * Stores peers by infohash with TTL expiration.
  */
@@ -188,6 +194,13 @@ export class PeerStore {
     return count
   }
 
+  /**
+   * Estimated bytes held by stored infohashes and peers.
+   */
+  memoryBytes(): number {
+    return this.store.size * INFOHASH_ENTRY_BYTES + this.totalPeerCount() * PEER_ENTRY_BYTES
+  }
+
   /**
    * Clear all stored peers.
    */
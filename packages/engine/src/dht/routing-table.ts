@@ -18,6 +18,12 @@ import {
   hexToNodeId,
   compareDistance,
 } from './xor-distance'
+import { objectBytes, stringBytes } from '../utils/memory-estimate'
+
+/** Estimated size of one DHTNodeInfo: object, 20-byte id and host string */
+const NODE_BYTES = objectBytes(6) + objectBytes(0) + 20 + stringBytes(15)
+/** Estimated size of one bucket: object, bigint bounds and nodes array */
+const BUCKET_BYTES = objectBytes(4) + 2 * objectBytes(3) + objectBytes(8)
 
 export class RoutingTable extends EventEmitter {
   /** Our local node ID */
@@ -192,6 +198,13 @@ export class RoutingTable extends EventEmitter {
     return this.buckets.reduce((sum, b) => sum + b.nodes.length, 0)
   }
 
+  /**
+   * Estimated bytes held by buckets and node records.
+   */
+  memoryBytes(): number {
+    return this.buckets.length * BUCKET_BYTES + this.size() * NODE_BYTES
+  }
+
   /**
    * Get all nodes in the routing table.
    */
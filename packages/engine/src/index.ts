@@ -1,14 +1,25 @@
 // Core
 export { BtEngine } from './core/bt-engine'
-export type { DaemonOpType, UPnPStatus } from './core/bt-engine'
+export type { DaemonOpType, EngineMemoryReport, UPnPStatus } from './core/bt-engine'
 export { Torrent } from './core/torrent'
-export type { DisplayPeer } from './core/torrent'
+export type { DisplayPeer, TorrentBandwidthLimits, TorrentMemoryUsage } from './core/torrent'
 export { BandwidthTracker, ALL_TRAFFIC_CATEGORIES } from './core/bandwidth-tracker'
 export type { BandwidthTrackerConfig, TrafficCategory } from './core/bandwidth-tracker'
+export { BandwidthScheduler, BandwidthClass } from './core/bandwidth-scheduler'
+export type { BandwidthClassOptions } from './core/bandwidth-scheduler'
+export { ConnectPipeline, DEFAULT_CONNECT_PIPELINE_CONFIG } from './core/connect-pipeline'
+export { SlabAllocator, MIN_SLAB_SIZE, MAX_SLAB_SIZE } from './core/slab-allocator'
+export type { SlabAllocatorStats } from './core/slab-allocator'
+export type {
+  ConnectOutcome,
+  ConnectPipelineConfig,
+  ConnectPipelineStats,
+} from './core/connect-pipeline'
 export { TorrentFileInfo } from './core/torrent-file-info'
 export { PeerConnection } from './core/peer-connection'
 export { ActivePiece } from './core/active-piece'
 export { SessionPersistence } from './core/session-persistence'
+export { MetadataCache } from './core/metadata-cache'
 export type { SwarmPeer, ConnectionState, DiscoverySource, AddressFamily } from './core/swarm'
 export { addressKey } from './core/swarm'
 export * from './core/peer-coordinator'
@@ -16,7 +27,12 @@ export type { TorrentListEntry, TorrentStateData } from './core/session-persiste
 export { ConnectionTimingTracker } from './core/connection-timing'
 export type { ConnectionTimingStats } from './core/connection-timing'
 export { EndgameManager } from './core/endgame-manager'
-export type { EndgameDecision, CancelDecision, EndgameConfig } from './core/endgame-manager'
+export type {
+  EndgameDecision,
+  CancelDecision,
+  EndgameConfig,
+  EndgameStats,
+} from './core/endgame-manager'
 
 // Torrent state
 export type { TorrentUserState, TorrentActivityState } from './core/torrent-state'
@@ -24,13 +40,20 @@ export { computeActivityState } from './core/torrent-state'
 
 // Interfaces
 export type { IFileSystem, IFileHandle, IFileStat } from './interfaces/filesystem'
-export type { ISocketFactory, ITcpSocket, IUdpSocket } from './interfaces/socket'
+export type {
+  DirectBlockEvent,
+  DirectDiskLayout,
+  ISocketFactory,
+  ITcpSocket,
+  IUdpSocket,
+  UdpDatagram,
+} from './interfaces/socket'
 export type { ISessionStore } from './interfaces/session-store'
-export type { IHasher } from './interfaces/hasher'
+export type { IHasher, IIncrementalHash } from './interfaces/hasher'
 export type { TrackerStats, TrackerStatus } from './interfaces/tracker'
 
 // Logging
-export type { Logger, LogEntry, LogLevel, EngineLoggingConfig } from './logging/logger'
+export type { Logger, LogEntry, LogLevel, LogQuery, EngineLoggingConfig } from './logging/logger'
 export { LogStore, globalLogStore, defaultLogger } from './logging/logger'
 
 // Adapters
@@ -45,7 +68,13 @@ export type {
   CredentialsGetter,
 } from './adapters/daemon/daemon-connection'
 export { DaemonSocketFactory } from './adapters/daemon/daemon-socket-factory'
+export type {
+  DaemonFlowControlOptions,
+  DaemonIoStats,
+} from './adapters/daemon/daemon-socket-factory'
 export { DaemonFileSystem } from './adapters/daemon/daemon-filesystem'
+export { DaemonBatchingDiskQueue } from './adapters/daemon/daemon-batching-disk-queue'
+export type { DaemonBatchWriteMetrics } from './adapters/daemon/daemon-batching-disk-queue'
 export { DaemonHasher } from './adapters/daemon/daemon-hasher'
 
 // Storage
@@ -59,9 +88,10 @@ export { createDaemonEngine } from './presets/daemon'
 export { generateMagnet, parseMagnet, createTorrentBuffer } from './utils/magnet'
 export type { GenerateMagnetOptions, ParsedMagnet } from './utils/magnet'
 export { RrdHistory, DEFAULT_RRD_TIERS } from './utils/rrd-history'
-export type { RrdTierConfig, RrdSample, RrdSamplesResult } from './utils/rrd-history'
+export type { RrdTierConfig, RrdSample, RrdSamplesResult, RrdSeries } from './utils/rrd-history'
 export { toHex, fromHex, toBase64, fromBase64 } from './utils/buffer'
 export { TokenBucket } from './utils/token-bucket'
+export { TimerWheel } from './utils/timer-wheel'
 export type { InfoHashHex } from './utils/infohash'
 export { infoHashFromHex, infoHashFromBytes } from './utils/infohash'
 export { SleepWakeDetector } from './utils/sleep-wake-detector'
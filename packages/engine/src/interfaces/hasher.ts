@@ -1,3 +1,23 @@
+/**
+ * Incremental hash fed piecewise (e.g. block by block as a piece downloads).
+ */
+export interface IIncrementalHash {
+  /**
+   * Feed more data. The data is consumed synchronously and may be reused by
+   * the caller after this returns.
+   */
+  update(data: Uint8Array): void
+  /**
+   * Finish the hash. No further updates are allowed.
+   * @returns raw digest bytes
+   */
+  digest(): Promise<Uint8Array>
+  /**
+   * Discard the hash without computing a digest.
+   */
+  abort(): void
+}
+
 /**
  * Interface for cryptographic hashing.
  */
@@ -8,4 +28,17 @@ export interface IHasher {
    * @returns 20-byte hash as Uint8Array
    */
   sha1(data: Uint8Array): Promise<Uint8Array>
+
+  /**
+   * Compute SHA256 hash of data. Optional - only needed to create v2 torrents.
+   * @param data - Data to hash
+   * @returns 32-byte hash as Uint8Array
+   */
+  sha256?(data: Uint8Array): Promise<Uint8Array>
+
+  /**
+   * Start an incremental SHA1 hash. Optional - only implemented by hashers
+   * where streaming avoids a large round trip at piece completion.
+   */
+  createSha1?(): IIncrementalHash
 }
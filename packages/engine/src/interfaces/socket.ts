@@ -6,6 +6,34 @@
  * to initiate connections.
  */
 
+/**
+ * Piece layout for direct-to-disk receive.
+ * Describes where a torrent's pieces live so the I/O layer can write
+ * PIECE payloads to their files and verify them without a trip through JS.
+ */
+export interface DirectDiskLayout {
+  rootKey: string
+  pieceLength: number
+  /** Files in torrent order; paths are relative to the storage root */
+  files: Array<{ path: string; length: number }>
+  /** Concatenated 20-byte SHA1 piece hashes */
+  pieceHashes: Uint8Array
+}
+
+/** Block written to disk in direct-to-disk receive mode. */
+export interface DirectBlockEvent {
+  index: number
+  begin: number
+  length: number
+  /**
+   * 0 = written, 1 = I/O error, 2 = outside the torrent; not written because
+   * 3 = it answers no outstanding request, 4 = its piece is already complete
+   */
+  status: number
+  /** 0 = piece still pending, 1 = piece verified, 2 = piece failed its hash check */
+  pieceResult: number
+}
+
 export interface ITcpSocket {
   /**
    * Send data to the remote peer.
@@ -67,6 +95,20 @@ export interface ITcpSocket {
    * the engine to initiate connections.
    */
   connect?(port: number, host: string): Promise<void>
+
+  /**
+   * Switch to direct-to-disk receive: PIECE messages are parsed, written and
+   * hashed by the I/O layer and reported via onDirectBlock(); other messages
+   * still arrive via onData(). Rejects if the I/O layer has delivered more
+   * than streamOffset bytes (caller retries once it has consumed them).
+   * Optional - only the desktop io-daemon supports it.
+   */
+  enableDirectReceive?(layoutId: number, streamOffset: number): Promise<void>
+
+  /**
+   * Register a callback for blocks written in direct-to-disk receive mode.
+   */
+  onDirectBlock?(cb: (event: DirectBlockEvent) => void): void
 }
 
 export interface ITcpServer {
@@ -94,17 +136,37 @@ export interface ITcpServer {
   close(): void
 }
 
+export interface UdpDatagram {
+  addr: string
+  port: number
+  data: Uint8Array
+}
+
 export interface IUdpSocket {
   /**
    * Send data to a specific address and port.
    */
   send(addr: string, port: number, data: Uint8Array): void
 
+  /**
+   * Send several datagrams at once. Implementations that batch on the wire
+   * (desktop io-daemon) hand them over in a single frame.
+   * Optional - callers should fall back to send().
+   */
+  sendBatch?(datagrams: UdpDatagram[]): void
+
   /**
    * Register a callback for incoming messages.
    */
   onMessage(cb: (src: { addr: string; port: number }, data: Uint8Array) => void): void
 
+  /**
+   * Register a callback that receives datagrams in the batches they arrived
+   * in. Replaces onMessage() delivery once set.
+   * Optional - only implemented where datagrams arrive batched.
+   */
+  onMessageBatch?(cb: (datagrams: UdpDatagram[]) => void): void
+
   /**
    * Close the socket.
    */
@@ -158,8 +220,8 @@ export interface ISocketFactory {
    * When active=true, native implementations (Android) pause all reads
    * to prevent unbounded buffer growth when JS can't keep up with incoming data.
    * When active=false, reads resume.
-   * Web implementations (extension) treat this as a no-op since WebSocket has
-   * its own flow control.
+   * The desktop io-daemon factory withholds receive credit instead, so the
+   * daemon stops reading once its window is used up.
    * Optional - callers should check if method exists before calling.
    */
   setBackpressure?(active: boolean): void
@@ -174,4 +236,23 @@ export interface ISocketFactory {
    * Optional - callers should check if method exists before calling.
    */
   flushCallbacks?(): void
+
+  /**
+   * Register a piece layout for direct-to-disk receive. Returns the layout ID
+   * passed to ITcpSocket.enableDirectReceive().
+   * Optional - callers should check if method exists before calling.
+   */
+  registerDiskLayout?(layout: DirectDiskLayout): Promise<number>
+
+  /**
+   * Remove a layout. Sockets using it fall back to delivering PIECE messages
+   * through onData().
+   */
+  removeDiskLayout?(layoutId: number): void
+
+  /**
+   * Discard the I/O layer's partial hash state for a piece (e.g. after the
+   * engine verified or re-requested it itself).
+   */
+  resetDiskPiece?(layoutId: number, pieceIndex: number): void
 }
@@ -0,0 +1,153 @@
+/**
+ * Verified Write Batch Wire Format
+ *
+ * Shared by the Android native batching queue (single FFI call per tick) and
+ * the io-daemon batching queue (single HTTP request per tick). Both sides
+ * hash each item, write it only if the SHA1 matches, and report one
+ * WriteResultCode per item.
+ */
+
+/** Result codes from a verified write (must match Kotlin and io-daemon) */
+export const WriteResultCode = {
+  SUCCESS: 0,
+  HASH_MISMATCH: 1,
+  IO_ERROR: 2,
+  INVALID_ARGS: 3,
+} as const
+
+export type WriteResultCodeValue = (typeof WriteResultCode)[keyof typeof WriteResultCode]
+
+/** A single verified write as it appears on the wire */
+export interface VerifiedWriteBatchItem {
+  rootKey: string
+  path: string
+  position: number
+  data: ArrayBuffer | Uint8Array
+  expectedHashHex: string
+  callbackId: string
+}
+
+/** Per-item result of a verified write batch */
+export interface VerifiedWriteResult {
+  resultCode: number
+  bytesWritten: number
+}
+
+/**
+ * Pack an array of verified write requests into a binary buffer.
+ *
+ * Format (all multi-byte integers are little-endian):
+ *   [count: u32 LE] then for each write:
+ *     [rootKeyLen: u8] [rootKey: UTF-8 bytes]
+ *     [pathLen: u16 LE] [path: UTF-8 bytes]
+ *     [position: u64 LE]
+ *     [dataLen: u32 LE] [data: bytes]
+ *     [hashHex: 40 bytes] (fixed size - SHA1 hex is always 40 chars)
+ *     [callbackIdLen: u8] [callbackId: UTF-8 bytes]
+ */
+export function packVerifiedWriteBatch(writes: VerifiedWriteBatchItem[]): ArrayBuffer {
+  const textEncoder = new TextEncoder()
+
+  // Pre-encode strings to calculate total size
+  const encoded = writes.map((w) => ({
+    rootKey: textEncoder.encode(w.rootKey),
+    path: textEncoder.encode(w.path),
+    hashHex: textEncoder.encode(w.expectedHashHex),
+    callbackId: textEncoder.encode(w.callbackId),
+    data: w.data instanceof Uint8Array ? w.data : new Uint8Array(w.data),
+    position: w.position,
+  }))
+
+  // Calculate total size
+  let totalSize = 4 // count
+  for (const e of encoded) {
+    totalSize += 1 + e.rootKey.length // rootKeyLen + rootKey
+    totalSize += 2 + e.path.length // pathLen + path
+    totalSize += 8 // position (u64)
+    totalSize += 4 + e.data.byteLength // dataLen + data
+    totalSize += 40 // hashHex (fixed 40 bytes)
+    totalSize += 1 + e.callbackId.length // callbackIdLen + callbackId
+  }
+
+  const buffer = new ArrayBuffer(totalSize)
+  const view = new DataView(buffer)
+  const bytes = new Uint8Array(buffer)
+
+  let offset = 0
+
+  // Count
+  view.setUint32(offset, writes.length, true)
+  offset += 4
+
+  for (const e of encoded) {
+    // rootKeyLen + rootKey
+    bytes[offset] = e.rootKey.length
+    offset += 1
+    bytes.set(e.rootKey, offset)
+    offset += e.rootKey.length
+
+    // pathLen + path
+    view.setUint16(offset, e.path.length, true)
+    offset += 2
+    bytes.set(e.path, offset)
+    offset += e.path.length
+
+    // position (u64 LE)
+    // JavaScript can't write u64 directly, but positions fit in 52 bits (Number.MAX_SAFE_INTEGER)
+    // Write as two u32 values
+    view.setUint32(offset, e.position >>> 0, true) // low 32 bits
+    view.setUint32(offset + 4, Math.floor(e.position / 0x100000000) >>> 0, true) // high 32 bits
+    offset += 8
+
+    // dataLen + data
+    view.setUint32(offset, e.data.byteLength, true)
+    offset += 4
+    bytes.set(e.data, offset)
+    offset += e.data.byteLength
+
+    // hashHex (40 bytes, fixed size)
+    bytes.set(e.hashHex, offset)
+    offset += 40
+
+    // callbackIdLen + callbackId
+    bytes[offset] = e.callbackId.length
+    offset += 1
+    bytes.set(e.callbackId, offset)
+    offset += e.callbackId.length
+  }
+
+  return buffer
+}
+
+/**
+ * Unpack the io-daemon response to a verified write batch.
+ * Results are returned in request order.
+ *
+ * Format (little-endian):
+ *   [count: u32 LE] then for each write:
+ *     [resultCode: u8] [bytesWritten: u32 LE]
+ */
+export function unpackVerifiedWriteResults(buffer: ArrayBuffer): VerifiedWriteResult[] {
+  const view = new DataView(buffer)
+  if (buffer.byteLength < 4) {
+    throw new Error(`Verified write results too short: ${buffer.byteLength} bytes`)
+  }
+
+  const count = view.getUint32(0, true)
+  if (buffer.byteLength !== 4 + count * 5) {
+    throw new Error(
+      `Verified write results length mismatch: ${buffer.byteLength} bytes for ${count} items`,
+    )
+  }
+
+  const results: VerifiedWriteResult[] = new Array(count)
+  let offset = 4
+  for (let i = 0; i < count; i++) {
+    results[i] = {
+      resultCode: view.getUint8(offset),
+      bytesWritten: view.getUint32(offset + 1, true),
+    }
+    offset += 5
+  }
+  return results
+}
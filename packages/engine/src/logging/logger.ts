@@ -1,5 +1,6 @@
 import { EventEmitter } from '../utils/event-emitter'
 import { toHex } from '../utils/buffer'
+import { SLOT_BYTES, stringBytes } from '../utils/memory-estimate'
 
 export type LogLevel = 'debug' | 'info' | 'warn' | 'error'
 
@@ -190,22 +191,48 @@ export function withScopeAndFiltering(
   shouldLog: ShouldLogFn,
   callbacks?: LogCallbacks,
 ): Logger {
+  // Context and prefix are built once and rebuilt only if the component's
+  // identity changes (e.g. a peer learns its id), not on every log call.
+  let ctx: LogContext | null = null
+  let prefix: string | null = null
+  let ctxName: string | undefined
+  let ctxInfoHash: string | Uint8Array | undefined
+  let ctxPeerId: string | Uint8Array | undefined
+
+  const context = (): LogContext => {
+    const name = component.getLogName()
+    if (
+      !ctx ||
+      name !== ctxName ||
+      component.infoHash !== ctxInfoHash ||
+      component.peerId !== ctxPeerId
+    ) {
+      ctx = buildInjectedContext(component)
+      prefix = null
+      ctxName = name
+      ctxInfoHash = component.infoHash
+      ctxPeerId = component.peerId
+    }
+    return ctx
+  }
+
   const getLogger = (level: LogLevel) => {
-    const ctx = buildInjectedContext(component)
-    if (!shouldLog(level, ctx)) return NOOP
+    const logCtx = context()
+    if (!shouldLog(level, logCtx)) return NOOP
 
-    const prefix = formatPrefix(ctx)
+    if (prefix === null) prefix = formatPrefix(logCtx)
+    const linePrefix = prefix
 
     // Return a wrapper that does ALL side effects, then calls console directly.
     // This wrapper is in logger.ts which is in the ignore list, so DevTools
     // will skip it and show the actual caller.
     return (msg: string, ...args: unknown[]) => {
       if (callbacks?.onLog || callbacks?.onCapture) {
-        const entry: LogEntry = { timestamp: Date.now(), level, message: `${prefix} ${msg}`, args }
+        const entry = new ScopedLogEntry(Date.now(), level, linePrefix, msg, args)
         callbacks.onLog?.(entry)
         callbacks.onCapture?.(entry)
       }
-      ;(console[level] as (...a: unknown[]) => void)(prefix, msg, ...args)
+      ;(console[level] as (...a: unknown[]) => void)(linePrefix, msg, ...args)
     }
   }
 
@@ -269,6 +296,32 @@ export interface LogEntry {
   args: unknown[]
 }
 
+/**
+ * Entry from a scoped logger. The scope prefix and message are kept apart and
+ * only joined when `message` is read.
+ */
+export class ScopedLogEntry implements LogEntry {
+  constructor(
+    readonly timestamp: number,
+    readonly level: LogLevel,
+    readonly prefix: string,
+    readonly text: string,
+    readonly args: unknown[],
+  ) {}
+
+  get message(): string {
+    return joinMessage(this.prefix, this.text)
+  }
+
+  toJSON(): LogEntry {
+    return { timestamp: this.timestamp, level: this.level, message: this.message, args: this.args }
+  }
+}
+
+function joinMessage(prefix: string, text: string): string {
+  return prefix ? `${prefix} ${text}` : text
+}
+
 /**
  * Callbacks for logging side-effects.
  * These are called from within logger.ts (which is in x_google_ignoreList)
@@ -281,28 +334,124 @@ export interface LogCallbacks {
 
 type LogListener = (entry: LogEntry) => void
 
-export class LogStore {
-  private logs: LogEntry[] = []
-  private maxLogs: number = 1000
-  private nextId: number = 0
-  private listeners: Set<LogListener> = new Set()
+export interface LogQuery {
+  /** Minimum level (default 'debug') */
+  level?: LogLevel
+  /** Only entries with a larger id, oldest first. Without it, the newest entries are returned. */
+  after?: number
+  /** Maximum entries to return (default all) */
+  limit?: number
+}
 
-  add(level: LogLevel, message: string, args: unknown[]): void {
-    const entry: LogEntry = {
-      id: this.nextId++,
-      timestamp: Date.now(),
-      level,
-      message,
-      args,
-    }
-    this.logs.push(entry)
+const LEVELS: LogLevel[] = ['debug', 'info', 'warn', 'error']
+
+export const DEFAULT_LOG_CAPACITY = 1000
+
+const EMPTY_ARGS: unknown[] = []
 
-    // Bulk truncate when 50% over capacity
-    if (this.logs.length > this.maxLogs * 1.5) {
-      this.logs = this.logs.slice(-this.maxLogs)
+/**
+ * Ring of entry ids for one level, oldest first. Ids are increasing, so a
+ * cursor can be found by binary search. Ids that have dropped out of the
+ * store are skipped by readers.
+ */
+class IdRing {
+  private ids: Float64Array
+  private head = 0
+  count = 0
+
+  constructor(capacity: number) {
+    this.ids = new Float64Array(capacity)
+  }
+
+  push(id: number): void {
+    const capacity = this.ids.length
+    this.ids[(this.head + this.count) % capacity] = id
+    if (this.count < capacity) this.count++
+    else this.head = (this.head + 1) % capacity
+  }
+
+  /** i-th oldest id */
+  at(i: number): number {
+    return this.ids[(this.head + i) % this.ids.length]
+  }
+
+  /** Index of the first id >= `id` */
+  lowerBound(id: number): number {
+    let lo = 0
+    let hi = this.count
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1
+      if (this.at(mid) < id) lo = mid + 1
+      else hi = mid
     }
+    return lo
+  }
+
+  clear(): void {
+    this.head = 0
+    this.count = 0
+  }
+}
 
+/**
+ * Fixed-capacity ring buffer of log entries.
+ *
+ * Entries are stored column-wise (typed arrays for timestamps and levels) and
+ * turned into LogEntry objects only when read; the scope prefix is joined to
+ * the message at that point too. Per-level id rings let level-filtered reads
+ * and `after` cursors skip straight to matching entries instead of scanning
+ * the whole buffer.
+ */
+export class LogStore {
+  readonly capacity: number
+  private timestamps: Float64Array
+  private levels: Uint8Array
+  private prefixes: string[]
+  private messages: string[]
+  private args: unknown[][]
+  private byLevel: IdRing[]
+  /** Id of the next entry */
+  private nextId: number = 0
+  /** Id of the oldest retained entry */
+  private firstId: number = 0
+  private entriesCache: LogEntry[] | null = null
+  private listeners: Set<LogListener> = new Set()
+  /** Total length of the retained message strings, for memoryBytes */
+  private messageChars = 0
+
+  constructor(capacity: number = DEFAULT_LOG_CAPACITY) {
+    this.capacity = capacity
+    this.timestamps = new Float64Array(capacity)
+    this.levels = new Uint8Array(capacity)
+    this.prefixes = new Array(capacity).fill('')
+    this.messages = new Array(capacity).fill('')
+    this.args = new Array(capacity).fill(EMPTY_ARGS)
+    this.byLevel = LEVELS.map(() => new IdRing(capacity))
+  }
+
+  add(
+    level: LogLevel,
+    message: string,
+    args: unknown[],
+    prefix: string = '',
+    timestamp: number = Date.now(),
+  ): void {
+    const id = this.nextId++
+    const slot = id % this.capacity
+    const levelIndex = LEVEL_PRIORITY[level]
+    this.timestamps[slot] = timestamp
+    this.levels[slot] = levelIndex
+    this.prefixes[slot] = prefix
+    this.messageChars += message.length - this.messages[slot].length
+    this.messages[slot] = message
+    this.args[slot] = args
+    this.byLevel[levelIndex].push(id)
+    if (id - this.firstId >= this.capacity) this.firstId = id - this.capacity + 1
+    this.entriesCache = null
+
+    if (this.listeners.size === 0) return
     // Notify listeners
+    const entry = this.entryAt(id)
     for (const listener of this.listeners) {
       try {
         listener(entry)
@@ -312,8 +461,49 @@ export class LogStore {
     }
   }
 
+  /**
+   * Add an entry from a logger callback, keeping a scoped entry's prefix
+   * unformatted.
+   */
+  addEntry(entry: LogEntry): void {
+    if (entry instanceof ScopedLogEntry) {
+      this.add(entry.level, entry.text, entry.args, entry.prefix, entry.timestamp)
+    } else {
+      this.add(entry.level, entry.message, entry.args, '', entry.timestamp)
+    }
+  }
+
+  /**
+   * All retained entries, oldest first.
+   */
   getEntries(): LogEntry[] {
-    return this.logs
+    if (!this.entriesCache) {
+      const entries: LogEntry[] = []
+      for (let id = this.firstId; id < this.nextId; id++) entries.push(this.entryAt(id))
+      this.entriesCache = entries
+    }
+    return this.entriesCache
+  }
+
+  /**
+   * Entries at or above a level. With `after`, returns the oldest entries
+   * following that id (for tailing); otherwise the newest `limit` entries.
+   * Results are oldest first either way.
+   */
+  query(query: LogQuery = {}): LogEntry[] {
+    const limit = query.limit ?? Infinity
+    const minLevel = LEVEL_PRIORITY[query.level ?? 'debug']
+    if (limit <= 0) return []
+    const ids =
+      query.after !== undefined
+        ? this.idsAfter(minLevel, Math.max(query.after + 1, this.firstId), limit)
+        : this.newestIds(minLevel, limit)
+    return ids.map((id) => this.entryAt(id))
+  }
+
+  /** Id of the newest entry, or -1 if nothing was logged yet */
+  get lastId(): number {
+    return this.nextId - 1
   }
 
   subscribe(listener: LogListener): () => void {
@@ -322,12 +512,84 @@ export class LogStore {
   }
 
   clear(): void {
-    this.logs = []
+    this.firstId = this.nextId
+    // Release references held by old entries
+    this.args.fill(EMPTY_ARGS)
+    for (const ring of this.byLevel) ring.clear()
+    this.entriesCache = null
     // Note: don't reset nextId to keep keys unique
   }
 
   get size(): number {
-    return this.logs.length
+    return this.nextId - this.firstId
+  }
+
+  /**
+   * Estimated bytes held: the column arrays, level rings and message strings.
+   * Args are counted as references only.
+   */
+  get memoryBytes(): number {
+    // Timestamps, levels and three reference columns, plus a Float64 ring per level
+    const columns = this.capacity * (8 + 1 + 3 * SLOT_BYTES + this.byLevel.length * 8)
+    const stored = Math.min(this.nextId, this.capacity)
+    return columns + stored * stringBytes(0) + this.messageChars
+  }
+
+  private entryAt(id: number): LogEntry {
+    const slot = id % this.capacity
+    return {
+      id,
+      timestamp: this.timestamps[slot],
+      level: LEVELS[this.levels[slot]],
+      message: joinMessage(this.prefixes[slot], this.messages[slot]),
+      args: this.args[slot],
+    }
+  }
+
+  private idsAfter(minLevel: number, start: number, limit: number): number[] {
+    const ids: number[] = []
+    if (minLevel === 0) {
+      // Every level matches: ids are contiguous
+      for (let id = start; id < this.nextId && ids.length < limit; id++) ids.push(id)
+      return ids
+    }
+    // Merge the matching levels' rings, ascending
+    const rings = this.byLevel.slice(minLevel)
+    const pos = rings.map((ring) => ring.lowerBound(start))
+    while (ids.length < limit) {
+      let best = -1
+      for (let r = 0; r < rings.length; r++) {
+        if (pos[r] >= rings[r].count) continue
+        if (best < 0 || rings[r].at(pos[r]) < rings[best].at(pos[best])) best = r
+      }
+      if (best < 0) break
+      ids.push(rings[best].at(pos[best]++))
+    }
+    return ids
+  }
+
+  private newestIds(minLevel: number, limit: number): number[] {
+    const ids: number[] = []
+    if (minLevel === 0) {
+      const start = Math.max(this.firstId, this.nextId - limit)
+      for (let id = start; id < this.nextId; id++) ids.push(id)
+      return ids
+    }
+    // Merge the matching levels' rings from the newest end, then reverse
+    const rings = this.byLevel.slice(minLevel)
+    const pos = rings.map((ring) => ring.count - 1)
+    while (ids.length < limit) {
+      let best = -1
+      for (let r = 0; r < rings.length; r++) {
+        if (pos[r] < 0) continue
+        if (best < 0 || rings[r].at(pos[r]) > rings[best].at(pos[best])) best = r
+      }
+      if (best < 0) break
+      const id = rings[best].at(pos[best]--)
+      if (id < this.firstId) break
+      ids.push(id)
+    }
+    return ids.reverse()
   }
 }
 
@@ -1,15 +1,55 @@
-import { BtEngine } from '../core/bt-engine'
-import { Torrent } from '../core/torrent'
+import * as os from 'os'
+import * as path from 'path'
+import * as v8 from 'v8'
+import { BtEngine, EngineMemoryReport } from '../core/bt-engine'
+import { Torrent, TorrentBandwidthLimits } from '../core/torrent'
 import { toInfoHashString } from '../utils/infohash'
-import { createNodeEngine, NodeEngineConfig } from '../presets/node'
-import { globalLogStore, LogLevel } from '../logging/logger'
+import { createNodeEngine, NodeEngineConfig, NodeStorageMode } from '../presets/node'
+import { globalLogStore, LogEntry, LogLevel } from '../logging/logger'
+import { ALL_TRAFFIC_CATEGORIES, TrafficCategory } from '../core/bandwidth-tracker'
+import type { ConnectPipelineStats } from '../core/connect-pipeline'
+import type { SlabAllocatorStats } from '../core/slab-allocator'
+
+const LOG_LEVELS: LogLevel[] = ['debug', 'info', 'warn', 'error']
+
+function parseLogLevel(level: string): LogLevel {
+  return LOG_LEVELS.includes(level as LogLevel) ? (level as LogLevel) : 'info'
+}
 
 export interface EngineStatus {
   ok: boolean
   running: boolean
   version?: string
   port?: number
+  /** Where downloaded data goes ('disk' unless started with storage: 'null' | 'memory') */
+  storage?: NodeStorageMode
   torrents?: Array<{ id: string; state: string }>
+  /** Outgoing connect pipeline: half-open limit, success rate, latency */
+  connections?: ConnectPipelineStats
+  /** Shared buffer pool: allocations, hit rate, idle bytes */
+  buffers?: SlabAllocatorStats
+}
+
+/**
+ * One category/direction of bandwidth history. `values` holds the bytes per
+ * bucket as base64 little-endian float32; bucket i starts at
+ * `startTime + i * bucketMs` (epoch ms).
+ */
+export interface BandwidthSeriesJson {
+  category: TrafficCategory
+  direction: 'down' | 'up'
+  startTime: number
+  bucketMs: number
+  count: number
+  dtype: 'float32'
+  values: string
+}
+
+/** Engine estimates per subsystem plus what the process itself reports */
+export interface EngineMemory extends EngineMemoryReport {
+  ok: boolean
+  /** process.memoryUsage(): rss, heapTotal, heapUsed, external, arrayBuffers */
+  process: NodeJS.MemoryUsage
 }
 
 export interface TorrentStatus {
@@ -17,6 +57,8 @@ export interface TorrentStatus {
   id: string
   state: string
   progress: number
+  /** False for a magnet until its info dictionary has been fetched and verified */
+  hasMetadata: boolean
   downloadRate: number
   uploadRate: number
   totalUploaded: number
@@ -25,6 +67,7 @@ export interface TorrentStatus {
 
 export class EngineController {
   private engine: BtEngine | null = null
+  private storage: NodeStorageMode = 'disk'
 
   constructor() {}
 
@@ -45,6 +88,7 @@ export class EngineController {
     }
 
     this.engine = createNodeEngine(engineConfig)
+    this.storage = engineConfig.storage ?? 'disk'
   }
 
   async stopEngine(): Promise<void> {
@@ -70,7 +114,10 @@ export class EngineController {
       running: true,
       version: '1.0.0', // Placeholder
       port: this.engine.port,
+      storage: this.storage,
       torrents,
+      connections: this.engine.connectPipeline.getStats(),
+      buffers: this.engine.bufferAllocator.getStats(),
     }
   }
 
@@ -119,6 +166,7 @@ export class EngineController {
       id,
       state: torrent.progress >= 1.0 ? 'seeding' : 'downloading',
       progress: torrent.progress,
+      hasMetadata: torrent.hasMetadata,
       downloadRate: torrent.downloadSpeed,
       uploadRate: torrent.uploadSpeed,
       totalUploaded: torrent.totalUploaded,
@@ -177,28 +225,93 @@ export class EngineController {
     return { ok: true }
   }
 
-  setTorrentSettings(id: string, settings: { maxPeers?: number }) {
+  setTorrentSettings(id: string, settings: { maxPeers?: number } & TorrentBandwidthLimits) {
     if (!this.engine) throw new Error('EngineNotRunning')
     const torrent = this.engine.getTorrent(id)
     if (!torrent) throw new Error('TorrentNotFound')
+    // Bandwidth first: it rejects invalid values before anything is changed
+    const { downloadLimit, uploadLimit, weight } = settings
+    if (downloadLimit !== undefined || uploadLimit !== undefined || weight !== undefined) {
+      torrent.setBandwidthLimits({ downloadLimit, uploadLimit, weight })
+    }
     if (settings.maxPeers !== undefined) {
       torrent.setMaxPeers(settings.maxPeers)
     }
-    return { ok: true }
+    return { ok: true, bandwidth: torrent.bandwidthLimits }
   }
 
-  getLogs(level: string = 'info', limit: number = 100) {
-    const levelPriority: Record<LogLevel, number> = {
-      debug: 0,
-      info: 1,
-      warn: 2,
-      error: 3,
+  getLogs(level: string = 'info', limit: number = 100, after?: number) {
+    const logs = globalLogStore.query({ level: parseLogLevel(level), limit, after })
+    return { ok: true, logs, lastId: globalLogStore.lastId }
+  }
+
+  /**
+   * Follow the log: calls `onEntry` with entries after the cursor, then with
+   * each new matching entry until the returned function is called.
+   */
+  streamLogs(level: string, after: number | undefined, onEntry: (entry: LogEntry) => void) {
+    const minLevel = parseLogLevel(level)
+    for (const entry of globalLogStore.query({ level: minLevel, after: after ?? -1 })) {
+      onEntry(entry)
     }
-    const minPriority = levelPriority[level as LogLevel] ?? 1
-    const allLogs = globalLogStore.getEntries()
-    const filtered = allLogs.filter((l) => levelPriority[l.level] >= minPriority)
-    const logs = filtered.slice(-limit)
-    return { ok: true, logs }
+    const minPriority = LOG_LEVELS.indexOf(minLevel)
+    return globalLogStore.subscribe((entry) => {
+      if (LOG_LEVELS.indexOf(entry.level) >= minPriority) onEntry(entry)
+    })
+  }
+
+  /**
+   * Export bandwidth history without per-sample objects.
+   *
+   * @param categories Comma-separated TrafficCategory names (all if omitted)
+   * @param direction 'down', 'up' or 'both'
+   * @param from Epoch ms, or ms relative to now if negative (all retained history if omitted)
+   * @param resolution Minimum bucket length in ms (tier picked from the range if omitted)
+   */
+  getBandwidthHistory(
+    categories: string | null,
+    direction: string = 'both',
+    from?: number,
+    resolution?: number,
+  ) {
+    const cats = categories ? (categories.split(',') as TrafficCategory[]) : ALL_TRAFFIC_CATEGORIES
+    if (cats.some((cat) => !ALL_TRAFFIC_CATEGORIES.includes(cat))) {
+      throw new Error('InvalidParameter')
+    }
+    if (direction !== 'down' && direction !== 'up' && direction !== 'both') {
+      throw new Error('InvalidParameter')
+    }
+    if (resolution !== undefined && resolution < 0) throw new Error('InvalidParameter')
+    if (!this.engine) throw new Error('EngineNotRunning')
+
+    const directions: Array<'down' | 'up'> = direction === 'both' ? ['down', 'up'] : [direction]
+
+    const now = Date.now()
+    const fromTime = from === undefined ? 0 : from < 0 ? now + from : from
+    const tracker = this.engine.bandwidthTracker
+    const series: BandwidthSeriesJson[] = []
+    for (const category of cats) {
+      for (const dir of directions) {
+        const { startTime, bucketMs, values } = tracker.getCategorySeries(
+          dir,
+          category,
+          fromTime,
+          now,
+          resolution,
+        )
+        const bytes = Buffer.from(values.buffer, values.byteOffset, values.byteLength)
+        series.push({
+          category,
+          direction: dir,
+          startTime,
+          bucketMs,
+          count: values.length,
+          dtype: 'float32',
+          values: bytes.toString('base64'),
+        })
+      }
+    }
+    return { ok: true, now, series }
   }
 
   getTickStats() {
@@ -206,4 +319,18 @@ export class EngineController {
     const stats = this.engine.getEngineStats()
     return { ok: true, ...stats }
   }
+
+  getMemory(): EngineMemory {
+    if (!this.engine) throw new Error('EngineNotRunning')
+    return { ok: true, ...this.engine.getMemoryReport(), process: process.memoryUsage() }
+  }
+
+  /**
+   * Write a V8 heap snapshot (open it in Chrome DevTools → Memory). Blocks the
+   * engine while it is written and needs roughly the heap size again in memory.
+   */
+  writeHeapSnapshot(file?: string): { ok: boolean; path: string } {
+    const target = file || path.join(os.tmpdir(), `jstorrent-${Date.now()}.heapsnapshot`)
+    return { ok: true, path: v8.writeHeapSnapshot(target) }
+  }
 }
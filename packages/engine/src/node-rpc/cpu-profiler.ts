@@ -0,0 +1,113 @@
+import * as fs from 'fs'
+import * as inspector from 'inspector'
+
+/** One function's share of the samples, aggregated over all its call sites */
+export interface ProfileHotspot {
+  functionName: string
+  /** Script URL and 1-based line, e.g. "file:///.../torrent.ts:812" */
+  location: string
+  selfMs: number
+  selfPercent: number
+}
+
+/**
+ * CPU sampling profiler for the engine's own process, driven through an
+ * inspector session - no DevTools attach needed, so it works in CI. Stop
+ * writes a .cpuprofile that Chrome DevTools (Performance) or speedscope load
+ * as a flame graph.
+ */
+export class CpuProfiler {
+  private session: inspector.Session | null = null
+
+  get running(): boolean {
+    return this.session !== null
+  }
+
+  /**
+   * Start sampling. `intervalUs` is the sampling interval (V8 default 1000us).
+   */
+  async start(intervalUs?: number): Promise<void> {
+    if (this.session) throw new Error('ProfileAlreadyRunning')
+    const session = new inspector.Session()
+    session.connect()
+    this.session = session
+    try {
+      await this.post('Profiler.enable')
+      if (intervalUs) await this.post('Profiler.setSamplingInterval', { interval: intervalUs })
+      await this.post('Profiler.start')
+    } catch (err) {
+      this.session = null
+      session.disconnect()
+      throw err
+    }
+  }
+
+  /**
+   * Stop sampling and write the profile to `file`.
+   */
+  async stop(file: string): Promise<inspector.Profiler.Profile> {
+    if (!this.session) throw new Error('ProfileNotRunning')
+    try {
+      const { profile } = (await this.post('Profiler.stop')) as inspector.Profiler.StopReturnType
+      await fs.promises.writeFile(file, JSON.stringify(profile))
+      return profile
+    } finally {
+      this.session.disconnect()
+      this.session = null
+    }
+  }
+
+  private post(method: string, params?: object): Promise<unknown> {
+    return new Promise((resolve, reject) => {
+      this.session!.post(method, params, (err, result) => (err ? reject(err) : resolve(result)))
+    })
+  }
+}
+
+/** V8's synthetic nodes: not engine functions, so never reported as hotspots */
+const IDLE_NODE = '(idle)'
+const SYNTHETIC_NODES = new Set([IDLE_NODE, '(program)', '(garbage collector)'])
+
+/**
+ * Functions with the most self time, from the sample timeline (each sample
+ * is charged the time until the next one, the last until the profile's end).
+ * V8's synthetic (idle), (program) and (garbage collector) nodes are left
+ * out; percentages are of the busy time, i.e. everything but (idle).
+ */
+export function summarizeCpuProfile(
+  profile: inspector.Profiler.Profile,
+  limit: number = 20,
+): ProfileHotspot[] {
+  const nodes = new Map(profile.nodes.map((node) => [node.id, node]))
+  const selfUs = new Map<number, number>()
+  const samples = profile.samples ?? []
+  const deltas = profile.timeDeltas ?? []
+  // timeDeltas[i] is the gap before sample i, so sample i lasts timeDeltas[i + 1]
+  let at = profile.startTime
+  for (let i = 0; i < samples.length; i++) {
+    at += deltas[i] ?? 0
+    const duration = i + 1 < deltas.length ? deltas[i + 1] : Math.max(0, profile.endTime - at)
+    selfUs.set(samples[i], (selfUs.get(samples[i]) ?? 0) + duration)
+  }
+
+  let totalUs = 0
+  const byFunction = new Map<string, ProfileHotspot>()
+  for (const [id, us] of selfUs) {
+    const { functionName, url, lineNumber } = nodes.get(id)!.callFrame
+    if (functionName === IDLE_NODE) continue
+    totalUs += us
+    if (SYNTHETIC_NODES.has(functionName)) continue
+    const name = functionName || '(anonymous)'
+    const location = url ? `${url}:${lineNumber + 1}` : ''
+    const key = `${name}\0${location}`
+    const entry = byFunction.get(key)
+    if (entry) entry.selfMs += us / 1000
+    else byFunction.set(key, { functionName: name, location, selfMs: us / 1000, selfPercent: 0 })
+  }
+
+  const hotspots = [...byFunction.values()].sort((a, b) => b.selfMs - a.selfMs).slice(0, limit)
+  for (const hotspot of hotspots) {
+    hotspot.selfPercent = totalUs > 0 ? (hotspot.selfMs * 1000 * 100) / totalUs : 0
+  }
+  return hotspots
+}
@@ -1,9 +1,23 @@
 import * as http from 'http'
+import * as os from 'os'
+import * as path from 'path'
 import { EngineController } from './controller'
+import { CpuProfiler, summarizeCpuProfile } from './cpu-profiler'
+
+/** Bytes of log lines held for a congested stream client before it is dropped */
+const MAX_LOG_STREAM_BACKLOG = 1024 * 1024
+
+/** Parse an optional integer query parameter; throws InvalidParameter if malformed. */
+function parseIntParam(value: string | null): number | undefined {
+  if (value === null) return undefined
+  if (!/^-?\d+$/.test(value)) throw new Error('InvalidParameter')
+  return parseInt(value, 10)
+}
 
 export class HttpRpcServer {
   private server: http.Server
   private controller: EngineController
+  private profiler = new CpuProfiler()
   private port: number
   private actualPort: number = 0
 
@@ -123,15 +137,45 @@ export class HttpRpcServer {
         const body = await this.readBody(req)
         const result = this.controller.disconnectPeer(id, body.ip, body.port)
         this.sendJson(res, result)
+      } else if (url?.startsWith('/logs/stream') && method === 'GET') {
+        const urlObj = new URL(url, `http://localhost:${this.port}`)
+        const level = urlObj.searchParams.get('level') || 'info'
+        const after = parseIntParam(urlObj.searchParams.get('after'))
+        this.streamLogs(req, res, level, after)
       } else if (url?.startsWith('/logs') && method === 'GET') {
         const urlObj = new URL(url, `http://localhost:${this.port}`)
         const level = urlObj.searchParams.get('level') || 'info'
-        const limit = parseInt(urlObj.searchParams.get('limit') || '100', 10)
-        const result = this.controller.getLogs(level, limit)
+        const limit = parseIntParam(urlObj.searchParams.get('limit')) ?? 100
+        const after = parseIntParam(urlObj.searchParams.get('after'))
+        const result = this.controller.getLogs(level, limit, after)
+        this.sendJson(res, result)
+      } else if (url?.startsWith('/engine/bandwidth-history') && method === 'GET') {
+        const urlObj = new URL(url, `http://localhost:${this.port}`)
+        const result = this.controller.getBandwidthHistory(
+          urlObj.searchParams.get('category'),
+          urlObj.searchParams.get('direction') || 'both',
+          parseIntParam(urlObj.searchParams.get('from')),
+          parseIntParam(urlObj.searchParams.get('resolution')),
+        )
         this.sendJson(res, result)
       } else if (url === '/engine/tick-stats' && method === 'GET') {
         const result = this.controller.getTickStats()
         this.sendJson(res, result)
+      } else if (url === '/engine/memory' && method === 'GET') {
+        this.sendJson(res, this.controller.getMemory())
+      } else if (url === '/engine/memory/heap-snapshot' && method === 'POST') {
+        const body = await this.readBody(req)
+        this.sendJson(res, this.controller.writeHeapSnapshot(body.path))
+      } else if (url === '/debug/profile/start' && method === 'POST') {
+        const body = await this.readBody(req)
+        await this.profiler.start(body.intervalUs)
+        this.sendJson(res, { ok: true })
+      } else if (url === '/debug/profile/stop' && method === 'POST') {
+        const body = await this.readBody(req)
+        const file = body.path || path.join(os.tmpdir(), `jstorrent-${Date.now()}.cpuprofile`)
+        const profile = await this.profiler.stop(file)
+        const hotspots = summarizeCpuProfile(profile, body.top)
+        this.sendJson(res, { ok: true, path: file, hotspots })
       } else {
         res.writeHead(404)
         this.sendJson(res, { ok: false, error: 'Not Found' })
@@ -141,7 +185,10 @@ export class HttpRpcServer {
       const code =
         message === 'EngineNotRunning' ||
         message === 'EngineAlreadyRunning' ||
-        message === 'TorrentNotFound'
+        message === 'TorrentNotFound' ||
+        message === 'ProfileAlreadyRunning' ||
+        message === 'ProfileNotRunning' ||
+        message === 'InvalidParameter'
           ? 400
           : 500
       res.writeHead(code)
@@ -167,6 +214,65 @@ export class HttpRpcServer {
     })
   }
 
+  /**
+   * Stream log entries as newline-delimited JSON until the client disconnects.
+   * Starts with the entries after `after` (all retained entries if omitted).
+   * While the socket is congested, lines are held back until it drains; a
+   * client that falls more than MAX_LOG_STREAM_BACKLOG behind is dropped and
+   * can reconnect with `after` set to the last entry it got.
+   */
+  private streamLogs(
+    req: http.IncomingMessage,
+    res: http.ServerResponse,
+    level: string,
+    after: number | undefined,
+  ) {
+    res.writeHead(200, {
+      'Content-Type': 'application/x-ndjson',
+      'Cache-Control': 'no-cache',
+    })
+    // Send headers now, so the client sees the stream open before the first entry
+    res.flushHeaders()
+    let backlog: string[] = []
+    let backlogBytes = 0
+    let congested = false
+    let dropped = false
+    const send = (line: string) => {
+      if (dropped) return
+      if (congested) {
+        backlog.push(line)
+        backlogBytes += line.length
+        if (backlogBytes > MAX_LOG_STREAM_BACKLOG) {
+          dropped = true
+          backlog = []
+          res.destroy()
+        }
+      } else if (!res.write(line)) {
+        congested = true
+      }
+    }
+    res.on('drain', () => {
+      congested = false
+      const lines = backlog
+      backlog = []
+      backlogBytes = 0
+      // Re-queued by send() if the socket congests again part way
+      for (const line of lines) send(line)
+    })
+
+    const unsubscribe = this.controller.streamLogs(level, after, (entry) => {
+      let line: string
+      try {
+        line = JSON.stringify(entry)
+      } catch {
+        // Args that can't be serialized (cycles, BigInt) are dropped
+        line = JSON.stringify({ ...entry, args: [] })
+      }
+      send(line + '\n')
+    })
+    req.on('close', unsubscribe)
+  }
+
   private sendJson(res: http.ServerResponse, data: unknown) {
     if (!res.headersSent) {
       res.setHeader('Content-Type', 'application/json')
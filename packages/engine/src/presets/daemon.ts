@@ -1,7 +1,9 @@
 import { BtEngine } from '../core/bt-engine'
 import { DaemonConnection } from '../adapters/daemon/daemon-connection'
 import { DaemonFileSystem } from '../adapters/daemon/daemon-filesystem'
+import { DaemonBatchingDiskQueue } from '../adapters/daemon/daemon-batching-disk-queue'
 import { DaemonSocketFactory } from '../adapters/daemon/daemon-socket-factory'
+import { DaemonHasher } from '../adapters/daemon/daemon-hasher'
 import { StorageRootManager, StorageRoot } from '../storage/storage-root-manager'
 import { ISessionStore } from '../interfaces/session-store'
 import { LogEntry } from '../logging/logger'
@@ -21,14 +23,22 @@ export interface DaemonEngineConfig {
    * Optional ConfigHub for reactive configuration.
    */
   config?: ConfigHub
+  /**
+   * Let the io-daemon write and verify received blocks itself.
+   * Default: false
+   */
+  directToDisk?: boolean
 }
 
 export async function createDaemonEngine(config: DaemonEngineConfig): Promise<BtEngine> {
   const connection = await DaemonConnection.connect(config.daemon.port, config.daemon.authToken)
   await connection.connectWebSocket()
 
+  // Verified piece writes are collected during a tick and sent in one request
+  const batchQueue = new DaemonBatchingDiskQueue(connection)
+
   const storageRootManager = new StorageRootManager((root) => {
-    return new DaemonFileSystem(connection, root.key)
+    return new DaemonFileSystem(connection, root.key, batchQueue)
   })
 
   for (const root of config.contentRoots) {
@@ -39,12 +49,20 @@ export async function createDaemonEngine(config: DaemonEngineConfig): Promise<Bt
     storageRootManager.setDefaultRoot(config.defaultContentRoot)
   }
 
+  // Pieces hashed by the engine are streamed block-by-block over the /io socket
+  const socketFactory = new DaemonSocketFactory(connection)
+  // Batch received data into fewer frames and bound what the daemon buffers
+  await socketFactory.enableFlowControl()
+
   return new BtEngine({
-    socketFactory: new DaemonSocketFactory(connection),
+    socketFactory,
     storageRootManager,
+    hasher: new DaemonHasher(connection, socketFactory),
     sessionStore: config.sessionStore,
     port: config.port,
     onLog: config.onLog,
     config: config.config,
+    directToDisk: config.directToDisk,
+    onEndOfTick: () => batchQueue.flushPending(),
   })
 }
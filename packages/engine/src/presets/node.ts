@@ -5,26 +5,57 @@ import {
   JsonFileSessionStore,
   NodeHasher,
 } from '../adapters/node'
-import { StorageRootManager } from '../storage/storage-root-manager'
+import { InMemoryFileSystem, MemorySessionStore } from '../adapters/memory'
+import { NullFileSystem } from '../adapters/null'
+import { StorageRoot, StorageRootManager } from '../storage/storage-root-manager'
 import { ISessionStore } from '../interfaces/session-store'
+import { IFileSystem } from '../interfaces/filesystem'
 import { LogEntry } from '../logging/logger'
 import * as path from 'path'
 
+/**
+ * Where downloaded data goes. 'null' discards it and 'memory' keeps it in
+ * RAM; pieces are still hash-checked, so both measure protocol throughput
+ * without disk speed mixed in.
+ */
+export type NodeStorageMode = 'disk' | 'null' | 'memory'
+
+export const NODE_STORAGE_MODES: NodeStorageMode[] = ['disk', 'null', 'memory']
+
 export interface NodeEngineConfig extends Partial<BtEngineOptions> {
   downloadPath: string
   sessionStore?: ISessionStore
   port?: number
   onLog?: (entry: LogEntry) => void
+  /** Default 'disk' */
+  storage?: NodeStorageMode
+}
+
+function createFileSystemFactory(storage: NodeStorageMode): (root: StorageRoot) => IFileSystem {
+  switch (storage) {
+    case 'disk':
+      return (root) => new ScopedNodeFileSystem(root.path)
+    case 'null':
+      return () => new NullFileSystem()
+    case 'memory':
+      return () => new InMemoryFileSystem()
+  }
 }
 
 export function createNodeEngine(config: NodeEngineConfig): BtEngine {
-  // Use file-based session store by default, located in the download directory
-  const sessionStorePath = path.join(config.downloadPath, '.jstorrent-session.json')
-  const sessionStore = config.sessionStore ?? new JsonFileSessionStore(sessionStorePath)
+  const { storage = 'disk', ...options } = config
+  // Config may come from JSON (the RPC server), so check the mode at runtime
+  if (!NODE_STORAGE_MODES.includes(storage)) {
+    throw new Error(`Unknown storage mode: ${storage} (expected ${NODE_STORAGE_MODES.join(', ')})`)
+  }
+  const storageRootManager = new StorageRootManager(createFileSystemFactory(storage))
 
-  const storageRootManager = new StorageRootManager((root) => {
-    return new ScopedNodeFileSystem(root.path)
-  })
+  // Use file-based session store by default, located in the download directory.
+  // Without real storage there is nothing to resume, so keep the session in memory.
+  const sessionStorePath = path.join(config.downloadPath, '.jstorrent-session.json')
+  const sessionStore =
+    config.sessionStore ??
+    (storage === 'disk' ? new JsonFileSessionStore(sessionStorePath) : new MemorySessionStore())
 
   // Register downloadPath as default root
   storageRootManager.addRoot({
@@ -39,7 +70,7 @@ export function createNodeEngine(config: NodeEngineConfig): BtEngine {
     storageRootManager,
     sessionStore,
     hasher: new NodeHasher(),
-    ...config, // Pass through other options like maxConnections, peerId, etc.
+    ...options, // Pass through other options like maxConnections, peerId, etc.
     port: config.port,
     onLog: config.onLog,
   })
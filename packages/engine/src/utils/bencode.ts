@@ -141,6 +141,19 @@ class BencodeEncoder {
         this.encodeValue(item)
       }
       this.pushString('e')
+    } else if (data instanceof Map) {
+      // Dictionary with byte-string keys (e.g. BEP 52 'piece layers'), sorted as raw bytes
+      const entries: [Uint8Array, unknown][] = []
+      for (const [key, value] of data) {
+        entries.push([typeof key === 'string' ? new TextEncoder().encode(key) : key, value])
+      }
+      entries.sort(([a], [b]) => compareBytes(a, b))
+      this.pushString('d')
+      for (const [key, value] of entries) {
+        this.encodeValue(key)
+        this.encodeValue(value)
+      }
+      this.pushString('e')
     } else if (typeof data === 'object' && data !== null) {
       this.pushString('d')
       const keys = Object.keys(data).sort() // Keys must be sorted
@@ -170,3 +183,11 @@ class BencodeEncoder {
     return res
   }
 }
+
+function compareBytes(a: Uint8Array, b: Uint8Array): number {
+  const n = Math.min(a.length, b.length)
+  for (let i = 0; i < n; i++) {
+    if (a[i] !== b[i]) return a[i] - b[i]
+  }
+  return a.length - b.length
+}
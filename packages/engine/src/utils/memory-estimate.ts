@@ -0,0 +1,25 @@
+/**
+ * Rough per-item costs for the memory estimates components report
+ * (`memoryBytes`). JS engines don't expose object sizes, so components count
+ * what they hold and multiply; the figures are ballpark for a 64-bit V8 heap.
+ * Good for comparing subsystems and spotting growth, not exact to the byte.
+ */
+
+/** One Map or Set entry: hash table slot plus key and value references */
+export const MAP_ENTRY_BYTES = 32
+
+/** Header of a heap object, including strings and typed array views */
+export const OBJECT_HEADER_BYTES = 24
+
+/** One reference-sized slot in an object or array */
+export const SLOT_BYTES = 8
+
+/** Estimated size of a plain object with `fields` properties */
+export function objectBytes(fields: number): number {
+  return OBJECT_HEADER_BYTES + fields * SLOT_BYTES
+}
+
+/** Estimated size of a string of `length` one-byte characters */
+export function stringBytes(length: number): number {
+  return OBJECT_HEADER_BYTES + length
+}
@@ -15,6 +15,18 @@ export interface RrdSamplesResult {
   latestBucketTime: number
 }
 
+/**
+ * Contiguous samples from one tier, for bulk export.
+ * Bucket i starts at `startTime + i * bucketMs`.
+ */
+export interface RrdSeries {
+  /** Start time of the first bucket (0 if there are no samples) */
+  startTime: number
+  bucketMs: number
+  /** Bytes per bucket, oldest first */
+  values: Float32Array
+}
+
 /**
  * Default tiers: ~10 min of history with decreasing resolution
  * Tier 0: 100ms × 300 = 30 sec (fine detail for live view)
@@ -180,6 +192,66 @@ export class RrdHistory {
     }
   }
 
+  /**
+   * Bytes held by the bucket arrays of all tiers.
+   */
+  get memoryBytes(): number {
+    return this.tiers.reduce((sum, tier) => sum + tier.buckets.byteLength, 0)
+  }
+
+  /**
+   * Get the tier configurations, finest first.
+   */
+  getTierConfigs(): readonly RrdTierConfig[] {
+    return this.tiers.map((t) => t.config)
+  }
+
+  /**
+   * Get samples for a time range as one contiguous series, copied from the
+   * ring buffer without building a sample object per bucket.
+   *
+   * With `resolutionMs`, uses the finest tier whose buckets are at least that
+   * long (the coarsest tier if none are); only the history that tier retains
+   * is returned. Without it, picks the tier like getSamples.
+   */
+  getSeries(
+    fromTime: number,
+    toTime: number,
+    resolutionMs?: number,
+    maxPoints: number = 500,
+  ): RrdSeries {
+    let tierIndex: number
+    if (resolutionMs === undefined) {
+      tierIndex = this.selectTier(toTime - fromTime, maxPoints)
+    } else {
+      tierIndex = this.tiers.findIndex((t) => t.config.bucketMs >= resolutionMs)
+      if (tierIndex < 0) tierIndex = this.tiers.length - 1
+    }
+
+    const { config, buckets, index, bucketStartTime } = this.tiers[tierIndex]
+    const bucketMs = config.bucketMs
+    if (this.lastRecordTime === 0) {
+      return { startTime: 0, bucketMs, values: new Float32Array(0) }
+    }
+
+    const oldest = bucketStartTime - (config.count - 1) * bucketMs
+    const first = Math.max(oldest, Math.ceil(fromTime / bucketMs) * bucketMs)
+    const last = Math.min(bucketStartTime, Math.floor(toTime / bucketMs) * bucketMs)
+    if (last < first) {
+      return { startTime: 0, bucketMs, values: new Float32Array(0) }
+    }
+
+    const length = (last - first) / bucketMs + 1
+    const values = new Float32Array(length)
+    // Ring position of the first bucket; the range may wrap once
+    const start = (index - (bucketStartTime - first) / bucketMs + config.count) % config.count
+    const head = Math.min(length, config.count - start)
+    values.set(buckets.subarray(start, start + head))
+    if (head < length) values.set(buckets.subarray(0, length - head), head)
+
+    return { startTime: first, bucketMs, values }
+  }
+
   private getSamplesFromTier(tierIndex: number, fromTime: number, toTime: number): RrdSample[] {
     const tier = this.tiers[tierIndex]
     const { config, buckets, index, bucketStartTime } = tier
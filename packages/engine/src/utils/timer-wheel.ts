@@ -0,0 +1,151 @@
+/**
+ * Hashed timer wheel.
+ *
+ * Runs many timeouts off one platform timer. Deadlines are hashed into slots
+ * of `resolutionMs`; a timeout fires on the first slot tick at or after its
+ * deadline, so it may fire up to one resolution late. Deadlines more than a
+ * full rotation away stay in their slot until the wheel comes round to them
+ * in the right rotation.
+ *
+ * The platform timer only runs while timeouts are pending.
+ */
+
+interface WheelEntry {
+  id: number
+  deadline: number
+  slot: number
+  callback: () => void
+}
+
+export class TimerWheel {
+  private readonly slots: WheelEntry[][]
+  private readonly entries = new Map<number, WheelEntry>()
+  private nextId = 1
+  /** Start time of the next slot to process */
+  private cursor = 0
+  private timer: ReturnType<typeof setTimeout> | null = null
+
+  /**
+   * @param resolutionMs - Slot width (timeouts fire up to this late)
+   * @param slotCount - Slots per rotation
+   * @param now - Clock in milliseconds
+   */
+  constructor(
+    readonly resolutionMs: number = 100,
+    slotCount: number = 256,
+    private readonly now: () => number = Date.now,
+  ) {
+    this.slots = Array.from({ length: slotCount }, () => [])
+  }
+
+  /** Number of pending timeouts */
+  get size(): number {
+    return this.entries.size
+  }
+
+  /**
+   * Schedule a callback after `delayMs`.
+   * @returns Handle for cancel()
+   */
+  schedule(delayMs: number, callback: () => void): number {
+    const now = this.now()
+    if (this.entries.size === 0) this.cursor = this.slotStart(now)
+
+    const deadline = now + Math.max(0, delayMs)
+    const slot = this.slotIndex(Math.max(deadline, this.cursor))
+    const entry: WheelEntry = { id: this.nextId++, deadline, slot, callback }
+    this.slots[slot].push(entry)
+    this.entries.set(entry.id, entry)
+    this.ensureTimer()
+    return entry.id
+  }
+
+  /**
+   * Cancel a pending timeout.
+   * @returns true if it was pending
+   */
+  cancel(id: number): boolean {
+    const entry = this.entries.get(id)
+    if (!entry) return false
+    this.entries.delete(id)
+    this.removeFromSlot(entry)
+    if (this.entries.size === 0) this.stopTimer()
+    return true
+  }
+
+  /**
+   * Fire every timeout whose deadline has passed. Called by the wheel's own
+   * timer; callers driving their own clock (tests, host ticks) may call it
+   * directly.
+   *
+   * @returns Number of callbacks fired
+   */
+  advance(now: number = this.now()): number {
+    if (this.entries.size === 0) return 0
+
+    const due: WheelEntry[] = []
+    const end = this.slotStart(now)
+    // Past a full rotation every slot has been visited once
+    const steps = Math.min((end - this.cursor) / this.resolutionMs + 1, this.slots.length)
+    for (let i = 0; i < steps; i++) {
+      const slot = this.slots[this.slotIndex(this.cursor + i * this.resolutionMs)]
+      for (let j = 0; j < slot.length; ) {
+        if (slot[j].deadline <= now) {
+          due.push(slot[j])
+          slot[j] = slot[slot.length - 1]
+          slot.pop()
+        } else {
+          j++
+        }
+      }
+    }
+    this.cursor = end
+
+    // Unlink everything first: callbacks may schedule or cancel
+    for (const entry of due) this.entries.delete(entry.id)
+    for (const entry of due) entry.callback()
+    return due.length
+  }
+
+  /**
+   * Cancel everything.
+   */
+  clear(): void {
+    for (const slot of this.slots) slot.length = 0
+    this.entries.clear()
+    this.stopTimer()
+  }
+
+  // === Private methods ===
+
+  private slotStart(time: number): number {
+    return Math.floor(time / this.resolutionMs) * this.resolutionMs
+  }
+
+  private slotIndex(time: number): number {
+    return Math.floor(time / this.resolutionMs) % this.slots.length
+  }
+
+  private removeFromSlot(entry: WheelEntry): void {
+    const slot = this.slots[entry.slot]
+    const index = slot.indexOf(entry)
+    if (index < 0) return
+    slot[index] = slot[slot.length - 1]
+    slot.pop()
+  }
+
+  private ensureTimer(): void {
+    if (this.timer || this.entries.size === 0) return
+    this.timer = setTimeout(() => {
+      this.timer = null
+      this.advance()
+      this.ensureTimer()
+    }, this.resolutionMs)
+  }
+
+  private stopTimer(): void {
+    if (!this.timer) return
+    clearTimeout(this.timer)
+    this.timer = null
+  }
+}
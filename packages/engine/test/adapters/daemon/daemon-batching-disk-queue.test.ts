@@ -0,0 +1,170 @@
+/* eslint-disable @typescript-eslint/no-explicit-any */
+import { describe, it, expect, vi, beforeEach } from 'vitest'
+import { DaemonBatchingDiskQueue } from '../../../src/adapters/daemon/daemon-batching-disk-queue'
+import { DaemonFileHandle } from '../../../src/adapters/daemon/daemon-file-handle'
+import { WriteResultCode, unpackVerifiedWriteResults } from '../../../src/io/verified-write-batch'
+
+function packResults(results: Array<[number, number]>): ArrayBuffer {
+  const buffer = new ArrayBuffer(4 + results.length * 5)
+  const view = new DataView(buffer)
+  view.setUint32(0, results.length, true)
+  results.forEach(([code, bytes], i) => {
+    view.setUint8(4 + i * 5, code)
+    view.setUint32(4 + i * 5 + 1, bytes, true)
+  })
+  return buffer
+}
+
+describe('DaemonBatchingDiskQueue', () => {
+  const mockConnection = {
+    requestWithHeaders: vi.fn(),
+  }
+
+  beforeEach(() => {
+    vi.clearAllMocks()
+  })
+
+  it('sends nothing until flushed, then one request per tick', async () => {
+    mockConnection.requestWithHeaders.mockResolvedValue(
+      new Response(packResults([[WriteResultCode.SUCCESS, 3], [WriteResultCode.SUCCESS, 2]])),
+    )
+    const queue = new DaemonBatchingDiskQueue(mockConnection as any)
+
+    const hash = new Uint8Array(20)
+    const p1 = queue.queueVerifiedWrite('root', 'a.bin', 0, new Uint8Array([1, 2, 3]), hash)
+    const p2 = queue.queueVerifiedWrite('root', 'b.bin', 16384, new Uint8Array([4, 5]), hash)
+
+    expect(mockConnection.requestWithHeaders).not.toHaveBeenCalled()
+    expect(queue.pendingCount).toBe(2)
+
+    queue.flushPending()
+
+    await expect(p1).resolves.toEqual({ bytesWritten: 3 })
+    await expect(p2).resolves.toEqual({ bytesWritten: 2 })
+    expect(mockConnection.requestWithHeaders).toHaveBeenCalledTimes(1)
+    expect(mockConnection.requestWithHeaders.mock.calls[0][1]).toBe('/write-verified-batch')
+    expect(queue.pendingCount).toBe(0)
+  })
+
+  it('maps per-item result codes to errors', async () => {
+    mockConnection.requestWithHeaders.mockResolvedValue(
+      new Response(
+        packResults([
+          [WriteResultCode.HASH_MISMATCH, 0],
+          [WriteResultCode.IO_ERROR, 0],
+          [WriteResultCode.INVALID_ARGS, 0],
+        ]),
+      ),
+    )
+    const queue = new DaemonBatchingDiskQueue(mockConnection as any)
+    const hash = new Uint8Array(20)
+
+    const p1 = queue.queueVerifiedWrite('root', 'a.bin', 0, new Uint8Array(1), hash)
+    const p2 = queue.queueVerifiedWrite('root', 'b.bin', 0, new Uint8Array(1), hash)
+    const p3 = queue.queueVerifiedWrite('bad', 'c.bin', 0, new Uint8Array(1), hash)
+    queue.flushPending()
+
+    await expect(p1).rejects.toMatchObject({ name: 'HashMismatchError' })
+    await expect(p2).rejects.toThrow('I/O error writing to b.bin')
+    await expect(p3).rejects.toThrow('Write failed with code 3')
+  })
+
+  it('splits batches that exceed maxBatchBytes', async () => {
+    mockConnection.requestWithHeaders.mockImplementation(async () => {
+      return new Response(packResults([[WriteResultCode.SUCCESS, 10]]))
+    })
+    const queue = new DaemonBatchingDiskQueue(mockConnection as any, 15)
+
+    const p1 = queue.queueVerifiedWrite('root', 'a', 0, new Uint8Array(10), new Uint8Array(20))
+    const p2 = queue.queueVerifiedWrite('root', 'b', 0, new Uint8Array(10), new Uint8Array(20))
+    queue.flushPending()
+
+    await Promise.all([p1, p2])
+    expect(mockConnection.requestWithHeaders).toHaveBeenCalledTimes(2)
+  })
+
+  it('falls back to per-write requests when the daemon lacks the batch endpoint', async () => {
+    mockConnection.requestWithHeaders.mockImplementation(async (_method: string, path: string) =>
+      path === '/write-verified-batch'
+        ? new Response('not found', { status: 404 })
+        : new Response(null, { status: 200 }),
+    )
+    const queue = new DaemonBatchingDiskQueue(mockConnection as any)
+
+    const p1 = queue.queueVerifiedWrite('root', 'a.bin', 0, new Uint8Array(4), new Uint8Array(20))
+    queue.flushPending()
+    await expect(p1).resolves.toEqual({ bytesWritten: 4 })
+    expect(queue.isBatchingSupported).toBe(false)
+
+    const p2 = queue.queueVerifiedWrite('root', 'b.bin', 0, new Uint8Array(2), new Uint8Array(20))
+    queue.flushPending()
+    await expect(p2).resolves.toEqual({ bytesWritten: 2 })
+
+    const paths = mockConnection.requestWithHeaders.mock.calls.map((c) => c[1])
+    expect(paths).toEqual(['/write-verified-batch', '/write/root', '/write/root'])
+    expect(mockConnection.requestWithHeaders.mock.calls[1][2]['X-Expected-SHA1']).toBe(
+      '0'.repeat(40),
+    )
+  })
+
+  it('rejects the whole batch on transport errors', async () => {
+    mockConnection.requestWithHeaders.mockRejectedValue(new Error('Connection refused'))
+    const queue = new DaemonBatchingDiskQueue(mockConnection as any)
+
+    const p1 = queue.queueVerifiedWrite('root', 'a', 0, new Uint8Array(1), new Uint8Array(20))
+    queue.flushPending()
+
+    await expect(p1).rejects.toThrow('Connection refused')
+  })
+
+  it('drain() flushes and waits for in-flight batches', async () => {
+    mockConnection.requestWithHeaders.mockResolvedValue(
+      new Response(packResults([[WriteResultCode.SUCCESS, 1]])),
+    )
+    const queue = new DaemonBatchingDiskQueue(mockConnection as any)
+    let done = false
+    void queue
+      .queueVerifiedWrite('root', 'a', 0, new Uint8Array(1), new Uint8Array(20))
+      .then(() => (done = true))
+
+    await queue.drain()
+    await Promise.resolve()
+    expect(done).toBe(true)
+  })
+})
+
+describe('DaemonFileHandle with batch queue', () => {
+  it('routes verified writes through the queue', async () => {
+    const connection = { requestWithHeaders: vi.fn() }
+    const queue = { queueVerifiedWrite: vi.fn().mockResolvedValue({ bytesWritten: 4 }) }
+    const handle = new DaemonFileHandle(connection as any, 'file.bin', 'root', queue as any)
+
+    handle.setExpectedHashForNextWrite(new Uint8Array(20))
+    const result = await handle.write(new Uint8Array(8), 2, 4, 100)
+
+    expect(result).toEqual({ bytesWritten: 4 })
+    expect(queue.queueVerifiedWrite).toHaveBeenCalledTimes(1)
+    const [rootKey, path, position, data] = queue.queueVerifiedWrite.mock.calls[0]
+    expect([rootKey, path, position, data.length]).toEqual(['root', 'file.bin', 100, 4])
+    expect(connection.requestWithHeaders).not.toHaveBeenCalled()
+  })
+
+  it('sends unverified writes directly', async () => {
+    const connection = { requestWithHeaders: vi.fn().mockResolvedValue(new Response(null)) }
+    const queue = { queueVerifiedWrite: vi.fn() }
+    const handle = new DaemonFileHandle(connection as any, 'file.bin', 'root', queue as any)
+
+    await handle.write(new Uint8Array(4), 0, 4, 0)
+
+    expect(queue.queueVerifiedWrite).not.toHaveBeenCalled()
+    expect(connection.requestWithHeaders).toHaveBeenCalledTimes(1)
+  })
+})
+
+describe('unpackVerifiedWriteResults', () => {
+  it('rejects malformed buffers', () => {
+    expect(() => unpackVerifiedWriteResults(new ArrayBuffer(2))).toThrow()
+    const bad = packResults([[0, 1]]).slice(0, 7)
+    expect(() => unpackVerifiedWriteResults(bad)).toThrow()
+  })
+})
@@ -63,4 +63,134 @@ describe('DaemonHasher', () => {
 
     await expect(hasher.sha1(testData)).rejects.toThrow('Connection failed')
   })
+
+  it('sha256() hashes in-process when Web Crypto is available', async () => {
+    const hasher = new DaemonHasher(mockConnection as any)
+    const result = await hasher.sha256(new TextEncoder().encode('abc'))
+
+    expect(mockConnection.requestBinary).not.toHaveBeenCalled()
+    expect(Buffer.from(result).toString('hex')).toBe(
+      'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad',
+    )
+  })
+
+  it('sha256() falls back to POST /hash/sha256 without Web Crypto', async () => {
+    const mockHash = new Uint8Array(32).fill(0xcd)
+    mockConnection.requestBinary.mockResolvedValue(mockHash)
+    vi.stubGlobal('crypto', undefined)
+    try {
+      const hasher = new DaemonHasher(mockConnection as any)
+      const testData = new Uint8Array([1, 2, 3])
+      expect(await hasher.sha256(testData)).toEqual(mockHash)
+      expect(mockConnection.requestBinary).toHaveBeenCalledWith(
+        'POST',
+        '/hash/sha256',
+        undefined,
+        testData,
+      )
+    } finally {
+      vi.unstubAllGlobals()
+    }
+  })
+})
+
+describe('DaemonHasher streaming over /io', () => {
+  const OP_HASH_OPEN = 0x30
+  const OP_HASH_UPDATE = 0x31
+  const OP_HASH_FINALIZE = 0x32
+  const OP_HASH_ABORT = 0x34
+
+  let frames: Array<{ msgType: number; reqId: number; payload: Uint8Array }>
+  let connection: any
+  let manager: any
+  let respond: (payload: Uint8Array) => void
+
+  beforeEach(() => {
+    frames = []
+    connection = {
+      ready: true,
+      requestBinary: vi.fn(),
+      sendFrame: vi.fn((frame: any) => frames.push(frame)),
+    }
+    manager = {
+      nextRequestId: () => 42,
+      packEnvelope: (msgType: number, reqId: number, payload?: Uint8Array) => ({
+        msgType,
+        reqId,
+        payload: payload ? payload.slice() : new Uint8Array(0),
+      }),
+      waitForResponse: vi.fn(
+        () =>
+          new Promise<Uint8Array>((resolve) => {
+            respond = resolve
+          }),
+      ),
+    }
+  })
+
+  function hashResult(hashId: number, digest: Uint8Array): Uint8Array {
+    const payload = new Uint8Array(5 + digest.length)
+    new DataView(payload.buffer).setUint32(0, hashId, true)
+    payload.set(digest, 5)
+    return payload
+  }
+
+  it('only offers createSha1 when a socket manager is provided', () => {
+    expect(new DaemonHasher(connection).createSha1).toBeUndefined()
+    expect(new DaemonHasher(connection, manager).createSha1).toBeTypeOf('function')
+  })
+
+  it('sends open, updates and finalize with a request id', async () => {
+    const hasher = new DaemonHasher(connection, manager)
+    const hash = hasher.createSha1!()
+    hash.update(new Uint8Array([1, 2, 3]))
+    hash.update(new Uint8Array([4]))
+    const digestPromise = hash.digest()
+
+    expect(frames.map((f) => f.msgType)).toEqual([
+      OP_HASH_OPEN,
+      OP_HASH_UPDATE,
+      OP_HASH_UPDATE,
+      OP_HASH_FINALIZE,
+    ])
+    const hashId = new DataView(frames[0].payload.buffer).getUint32(0, true)
+    expect(frames[0].payload[4]).toBe(0) // SHA1
+    expect(Array.from(frames[1].payload.subarray(4))).toEqual([1, 2, 3])
+    expect(frames[3].reqId).toBe(42)
+    expect(manager.waitForResponse).toHaveBeenCalledWith(42)
+
+    const digest = new Uint8Array(20).fill(0xcd)
+    respond(hashResult(hashId, digest))
+    await expect(digestPromise).resolves.toEqual(digest)
+    expect(connection.requestBinary).not.toHaveBeenCalled()
+  })
+
+  it('sha1() uses the socket when connected and HTTP otherwise', async () => {
+    const hasher = new DaemonHasher(connection, manager)
+    const pending = hasher.sha1(new Uint8Array([9]))
+    respond(hashResult(1, new Uint8Array(20)))
+    await pending
+    expect(connection.requestBinary).not.toHaveBeenCalled()
+
+    connection.ready = false
+    connection.requestBinary.mockResolvedValue(new Uint8Array(20))
+    await hasher.sha1(new Uint8Array([9]))
+    expect(connection.requestBinary).toHaveBeenCalledTimes(1)
+  })
+
+  it('abort() releases the daemon-side hasher', () => {
+    const hasher = new DaemonHasher(connection, manager)
+    hasher.createSha1!().abort()
+    expect(frames.map((f) => f.msgType)).toEqual([OP_HASH_OPEN, OP_HASH_ABORT])
+  })
+
+  it('surfaces send failures from digest()', async () => {
+    connection.sendFrame.mockImplementation(() => {
+      throw new Error('Daemon connection not ready')
+    })
+    const hasher = new DaemonHasher(connection, manager)
+    const hash = hasher.createSha1!()
+    hash.update(new Uint8Array(4))
+    await expect(hash.digest()).rejects.toThrow('Daemon connection not ready')
+  })
 })
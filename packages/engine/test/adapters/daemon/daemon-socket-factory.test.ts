@@ -0,0 +1,330 @@
+/* eslint-disable @typescript-eslint/no-explicit-any */
+import { describe, it, expect, vi, beforeEach } from 'vitest'
+import {
+  DaemonSocketFactory,
+  packDiskLayout,
+} from '../../../src/adapters/daemon/daemon-socket-factory'
+import { DaemonTcpSocket } from '../../../src/adapters/daemon/daemon-tcp-socket'
+import {
+  DaemonUdpSocket,
+  packUdpBatch,
+  unpackUdpBatch,
+} from '../../../src/adapters/daemon/daemon-udp-socket'
+
+const OP_TCP_BLOCK = 0x1b
+const OP_TCP_DIRECT = 0x1c
+const OP_TCP_DIRECT_RESULT = 0x1d
+const OP_DISK_LAYOUT_SET = 0x40
+const OP_DISK_LAYOUT_RESULT = 0x41
+const OP_DISK_PIECE_RESET = 0x43
+const OP_TCP_RECV_BATCH = 0x1e
+const OP_UDP_SEND_BATCH = 0x27
+const OP_UDP_RECV_BATCH = 0x28
+const OP_IO_CONFIGURE = 0x50
+const OP_IO_CONFIGURED = 0x51
+const OP_IO_CREDIT = 0x52
+const OP_IO_STATS = 0x53
+const OP_IO_STATS_RESULT = 0x54
+
+function frame(msgType: number, reqId: number, payload: Uint8Array): ArrayBuffer {
+  const buf = new ArrayBuffer(8 + payload.length)
+  const view = new DataView(buf)
+  view.setUint8(0, 1)
+  view.setUint8(1, msgType)
+  view.setUint32(4, reqId, true)
+  new Uint8Array(buf, 8).set(payload)
+  return buf
+}
+
+function parseFrame(buf: ArrayBuffer) {
+  const view = new DataView(buf)
+  return {
+    msgType: view.getUint8(1),
+    reqId: view.getUint32(4, true),
+    payload: new Uint8Array(buf, 8),
+  }
+}
+
+describe('DaemonSocketFactory direct-to-disk', () => {
+  let frameHandler: (frame: ArrayBuffer) => void
+  let sent: ArrayBuffer[]
+  let factory: DaemonSocketFactory
+
+  beforeEach(() => {
+    sent = []
+    const connection = {
+      ready: true,
+      onFrame: (cb: (frame: ArrayBuffer) => void) => (frameHandler = cb),
+      onDisconnect: vi.fn(),
+      sendFrame: (f: ArrayBuffer) => sent.push(f),
+    }
+    factory = new DaemonSocketFactory(connection as any)
+  })
+
+  it('packDiskLayout() encodes the layout little-endian', () => {
+    const hashes = new Uint8Array(40).fill(0xab)
+    const packed = packDiskLayout(5, {
+      rootKey: 'rk',
+      pieceLength: 16,
+      files: [
+        { path: 'a', length: 20 },
+        { path: 'dir/b', length: 0x100000004 },
+      ],
+      pieceHashes: hashes,
+    })
+    const view = new DataView(packed.buffer)
+
+    expect(view.getUint32(0, true)).toBe(5)
+    expect(view.getUint32(4, true)).toBe(16)
+    // totalLength = 20 + 2^32 + 4
+    expect(view.getUint32(8, true)).toBe(24)
+    expect(view.getUint32(12, true)).toBe(1)
+    expect(packed[16]).toBe(2)
+    expect(new TextDecoder().decode(packed.subarray(17, 19))).toBe('rk')
+    expect(view.getUint32(19, true)).toBe(2)
+    // file 0: length(8) pathLen(2) path
+    expect(view.getUint32(23, true)).toBe(20)
+    expect(view.getUint16(31, true)).toBe(1)
+    // file 1 starts at 34
+    expect(view.getUint32(34, true)).toBe(4)
+    expect(view.getUint32(38, true)).toBe(1)
+    expect(new TextDecoder().decode(packed.subarray(44, 49))).toBe('dir/b')
+    expect(view.getUint32(49, true)).toBe(2)
+    expect(packed.subarray(53)).toEqual(hashes)
+  })
+
+  it('registerDiskLayout() resolves with the layout ID once the daemon accepts it', async () => {
+    const layout = { rootKey: 'rk', pieceLength: 16, files: [], pieceHashes: new Uint8Array(0) }
+    const promise = factory.registerDiskLayout(layout)
+
+    const request = parseFrame(sent[0])
+    expect(request.msgType).toBe(OP_DISK_LAYOUT_SET)
+    const layoutId = new DataView(request.payload.buffer, 8).getUint32(0, true)
+
+    const accepted = new Uint8Array([layoutId, 0, 0, 0, 0])
+    frameHandler(frame(OP_DISK_LAYOUT_RESULT, request.reqId, accepted))
+    await expect(promise).resolves.toBe(layoutId)
+
+    const rejected = factory.registerDiskLayout(layout)
+    const second = parseFrame(sent[1])
+    frameHandler(frame(OP_DISK_LAYOUT_RESULT, second.reqId, new Uint8Array([2, 0, 0, 0, 1])))
+    await expect(rejected).rejects.toThrow()
+  })
+
+  it('resetDiskPiece() sends layoutId and piece index', () => {
+    factory.resetDiskPiece(3, 42)
+    const { msgType, payload } = parseFrame(sent[0])
+    expect(msgType).toBe(OP_DISK_PIECE_RESET)
+    expect(Array.from(payload)).toEqual([3, 0, 0, 0, 42, 0, 0, 0])
+  })
+
+  it('DaemonTcpSocket reports OP_TCP_BLOCK events and enables direct receive', async () => {
+    const socket = (await factory.createTcpSocket()) as DaemonTcpSocket
+    const events: unknown[] = []
+    socket.onDirectBlock((event) => events.push(event))
+
+    // socketId=1, index=7, begin=16384, length=16384, status=0, pieceResult=1
+    const block = new Uint8Array(18)
+    const view = new DataView(block.buffer)
+    view.setUint32(0, 1, true)
+    view.setUint32(4, 7, true)
+    view.setUint32(8, 16384, true)
+    view.setUint32(12, 16384, true)
+    block[17] = 1
+    frameHandler(frame(OP_TCP_BLOCK, 0, block))
+    expect(events).toEqual([{ index: 7, begin: 16384, length: 16384, status: 0, pieceResult: 1 }])
+
+    const enabled = socket.enableDirectReceive(9, 0x100000010)
+    const request = parseFrame(sent[0])
+    expect(request.msgType).toBe(OP_TCP_DIRECT)
+    const req = new DataView(request.payload.buffer, 8)
+    expect(req.getUint32(0, true)).toBe(1)
+    expect(req.getUint32(4, true)).toBe(9)
+    expect(req.getUint32(8, true)).toBe(0x10)
+    expect(req.getUint32(12, true)).toBe(1)
+
+    frameHandler(frame(OP_TCP_DIRECT_RESULT, request.reqId, new Uint8Array([1, 0, 0, 0, 0])))
+    await expect(enabled).resolves.toBeUndefined()
+  })
+})
+
+describe('DaemonSocketFactory flow control', () => {
+  let frameHandler: (frame: ArrayBuffer) => void
+  let reconnect: () => void
+  let sent: ArrayBuffer[]
+  let factory: DaemonSocketFactory
+
+  beforeEach(() => {
+    sent = []
+    const connection = {
+      ready: true,
+      onFrame: (cb: (frame: ArrayBuffer) => void) => (frameHandler = cb),
+      onDisconnect: vi.fn(),
+      onReconnect: (cb: () => void) => (reconnect = cb),
+      sendFrame: (f: ArrayBuffer) => sent.push(f),
+    }
+    factory = new DaemonSocketFactory(connection as any)
+  })
+
+  function u32(value: number): number[] {
+    return [value & 0xff, (value >>> 8) & 0xff, (value >>> 16) & 0xff, value >>> 24]
+  }
+
+  async function configure(window: number): Promise<void> {
+    const enabled = factory.enableFlowControl({ creditWindow: window })
+    const request = parseFrame(sent[sent.length - 1])
+    expect(request.msgType).toBe(OP_IO_CONFIGURE)
+    expect(Array.from(request.payload)).toEqual([7, ...u32(window)])
+    const reply = new Uint8Array([...u32(window), 0])
+    frameHandler(frame(OP_IO_CONFIGURED, request.reqId, reply))
+    await expect(enabled).resolves.toBe(true)
+  }
+
+  function credits(): number[] {
+    return sent
+      .map(parseFrame)
+      .filter((f) => f.msgType === OP_IO_CREDIT)
+      .map((f) => new DataView(f.payload.buffer, 8).getUint32(0, true))
+  }
+
+  it('enableFlowControl() resolves false when the daemon rejects the opcode', async () => {
+    const enabled = factory.enableFlowControl()
+    const request = parseFrame(sent[0])
+    const error = new TextEncoder().encode('Unknown opcode')
+    frameHandler(frame(0x7f, request.reqId, error))
+    await expect(enabled).resolves.toBe(false)
+
+    // No credit is granted to a daemon that does not know about it
+    frameHandler(frame(0x13, 0, new Uint8Array(4 + (1 << 20))))
+    expect(credits()).toEqual([])
+  })
+
+  it('delivers OP_TCP_RECV_BATCH entries to their sockets in order', async () => {
+    const a = (await factory.createTcpSocket()) as DaemonTcpSocket
+    const b = (await factory.createTcpSocket()) as DaemonTcpSocket
+    const received: string[] = []
+    a.onData((data) => received.push(`a:${Array.from(data)}`))
+    b.onData((data) => received.push(`b:${Array.from(data)}`))
+
+    // Entries: dataLen(4), socketId(4), data
+    const entry = (socketId: number, data: number[]) => [
+      ...u32(data.length),
+      ...u32(socketId),
+      ...data,
+    ]
+    const batch = new Uint8Array([
+      ...entry(1, [10, 11]),
+      ...entry(2, [20]),
+      ...entry(9, []),
+      ...entry(1, [12]),
+    ])
+    frameHandler(frame(OP_TCP_RECV_BATCH, 0, batch))
+    expect(received).toEqual(['a:10,11', 'b:20', 'a:12'])
+  })
+
+  it('grants credit per quarter window and withholds it under backpressure', async () => {
+    await configure(1024 * 1024)
+    const recv = (bytes: number) => {
+      const payload = new Uint8Array(4 + bytes)
+      payload[0] = 1
+      frameHandler(frame(0x13, 0, payload))
+    }
+
+    recv(200 * 1024)
+    expect(credits()).toEqual([])
+    recv(100 * 1024)
+    expect(credits()).toEqual([300 * 1024])
+
+    factory.setBackpressure(true)
+    recv(512 * 1024)
+    expect(credits()).toEqual([300 * 1024])
+    factory.setBackpressure(false)
+    expect(credits()).toEqual([300 * 1024, 512 * 1024])
+  })
+
+  it('grants back at most half the window per read, as the daemon charges', async () => {
+    await configure(256 * 1024)
+    const payload = new Uint8Array(4 + 200 * 1024)
+    payload[0] = 1
+    frameHandler(frame(0x13, 0, payload))
+    expect(credits()).toEqual([128 * 1024])
+
+    // Batch entries are separate reads, each capped on its own
+    const entry = [...u32(200 * 1024), ...u32(1), ...new Array(200 * 1024).fill(0)]
+    frameHandler(frame(OP_TCP_RECV_BATCH, 0, new Uint8Array([...entry, ...entry])))
+    expect(credits()).toEqual([128 * 1024, 256 * 1024])
+  })
+
+  it('re-applies flow control after a reconnect', async () => {
+    await configure(256 * 1024)
+    sent.length = 0
+    reconnect()
+    expect(parseFrame(sent[0]).msgType).toBe(OP_IO_CONFIGURE)
+  })
+
+  it('getIoStats() parses per-socket queue depths', async () => {
+    const stats = factory.getIoStats()
+    const request = parseFrame(sent[0])
+    expect(request.msgType).toBe(OP_IO_STATS)
+
+    const header = [...u32(4096), 0, ...u32(2)]
+    const first = [...u32(1), ...u32(100), ...u32(0)]
+    const second = [...u32(0x10000), ...u32(0), ...u32(8192)]
+    const reply = new Uint8Array([...header, ...first, ...second])
+    frameHandler(frame(OP_IO_STATS_RESULT, request.reqId, reply))
+    await expect(stats).resolves.toEqual({
+      availableCredit: 4096,
+      sockets: [
+        { socketId: 1, sendQueued: 100, recvWaiting: 0 },
+        { socketId: 0x10000, sendQueued: 0, recvWaiting: 8192 },
+      ],
+    })
+  })
+})
+
+describe('DaemonUdpSocket batches', () => {
+  const datagrams = [
+    { addr: '10.0.0.1', port: 6881, data: new Uint8Array([1, 2, 3]) },
+    { addr: '::1', port: 51413, data: new Uint8Array(0) },
+  ]
+
+  it('packUdpBatch() and unpackUdpBatch() round-trip', () => {
+    const packed = packUdpBatch(9, datagrams)
+    expect(new DataView(packed.buffer).getUint32(0, true)).toBe(9)
+    expect(unpackUdpBatch(packed)).toEqual(datagrams)
+  })
+
+  it('sends one OP_UDP_SEND_BATCH frame and delivers OP_UDP_RECV_BATCH as an array', () => {
+    const sent: ArrayBuffer[] = []
+    let handler: (payload: Uint8Array, msgType: number) => void = () => {}
+    const manager = {
+      registerHandler: (_id: number, h: typeof handler) => (handler = h),
+      unregisterHandler: vi.fn(),
+      packEnvelope: (msgType: number, reqId: number, payload?: Uint8Array) =>
+        frame(msgType, reqId, payload ?? new Uint8Array(0)),
+    }
+    const connection = { sendFrame: (f: ArrayBuffer) => sent.push(f) }
+    const socket = new DaemonUdpSocket(9, connection as any, manager as any, true)
+
+    socket.sendBatch(datagrams)
+    expect(sent.length).toBe(1)
+    const request = parseFrame(sent[0])
+    expect(request.msgType).toBe(OP_UDP_SEND_BATCH)
+    expect(unpackUdpBatch(request.payload)).toEqual(datagrams)
+
+    const batches: unknown[] = []
+    socket.onMessageBatch((received) => batches.push(received))
+    handler(packUdpBatch(9, datagrams), OP_UDP_RECV_BATCH)
+    expect(batches).toEqual([datagrams])
+  })
+
+  it('falls back to one OP_UDP_SEND per datagram when the daemon cannot batch', () => {
+    const sent: ArrayBuffer[] = []
+    const manager = { registerHandler: vi.fn(), unregisterHandler: vi.fn() }
+    const connection = { sendFrame: (f: ArrayBuffer) => sent.push(f) }
+    const socket = new DaemonUdpSocket(9, connection as any, manager as any)
+
+    socket.sendBatch(datagrams)
+    expect(sent.map((f) => parseFrame(f).msgType)).toEqual([0x22, 0x22])
+  })
+})
@@ -0,0 +1,50 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import { InMemoryFileSystem } from '../../../src/adapters/memory/memory-filesystem'
+
+describe('InMemoryFileSystem', () => {
+  let fs: InMemoryFileSystem
+
+  beforeEach(() => {
+    fs = new InMemoryFileSystem()
+  })
+
+  it('should grow files on sequential writes without changing their size', async () => {
+    const handle = await fs.open('/data.bin', 'w')
+    const block = new Uint8Array(1000)
+    for (let i = 0; i < 50; i++) {
+      block.fill(i)
+      await handle.write(block, 0, block.length, i * block.length)
+    }
+
+    const file = fs.files.get('/data.bin')!
+    expect(file.length).toBe(50_000)
+    // Later writes reuse the spare capacity instead of reallocating
+    expect(file.buffer.byteLength).toBeLessThan(2 * file.length)
+    expect(file[0]).toBe(0)
+    expect(file[49_999]).toBe(49)
+    expect((await fs.stat('/data.bin')).size).toBe(50_000)
+  })
+
+  it('should write out of order and read back', async () => {
+    const handle = await fs.open('/data.bin', 'w')
+    await handle.write(new Uint8Array([7, 8, 9]), 0, 3, 10)
+    await handle.write(new Uint8Array([1, 2, 3, 4]), 1, 2, 0)
+
+    const out = new Uint8Array(13)
+    const { bytesRead } = await handle.read(out, 0, 20, 0)
+    expect(bytesRead).toBe(13)
+    expect(Array.from(out)).toEqual([2, 3, 0, 0, 0, 0, 0, 0, 0, 0, 7, 8, 9])
+  })
+
+  it('should truncate to the requested length', async () => {
+    const handle = await fs.open('/data.bin', 'w')
+    await handle.write(new Uint8Array(100).fill(5), 0, 100, 0)
+    await handle.truncate(10)
+    expect(fs.files.get('/data.bin')!.length).toBe(10)
+
+    await handle.write(new Uint8Array([1]), 0, 1, 20)
+    const file = fs.files.get('/data.bin')!
+    expect(file.length).toBe(21)
+    expect(file[15]).toBe(0)
+  })
+})
@@ -1,5 +1,6 @@
 import { describe, it, expect, beforeEach, afterEach, vi } from 'vitest'
 import { ActivePieceManager } from '../../src/core/active-piece-manager'
+import { SlabAllocator } from '../../src/core/slab-allocator'
 import { MockEngine } from '../utils/mock-engine'
 
 describe('ActivePieceManager', () => {
@@ -370,6 +371,66 @@ describe('ActivePieceManager', () => {
       expect(newManager.bufferPoolStats!.pooled).toBe(0)
       newManager.destroy()
     })
+
+    it('should share an engine allocator across torrents and keep it on destroy', () => {
+      const allocator = new SlabAllocator()
+      const torrentA = new ActivePieceManager(mockEngine, () => PIECE_LENGTH, {
+        bufferAllocator: allocator,
+      })
+      const torrentB = new ActivePieceManager(mockEngine, () => PIECE_LENGTH - 1000, {
+        bufferAllocator: allocator,
+      })
+
+      const buffer = torrentA.getOrCreate(0)!.getBuffer()
+      torrentA.destroy()
+      expect(allocator.getStats().pooledBuffers).toBe(1)
+
+      // Another torrent's (shorter) piece reuses the slab
+      const piece = torrentB.getOrCreate(0)!
+      expect(piece.getBuffer().length).toBe(PIECE_LENGTH - 1000)
+      expect(piece.getBuffer().buffer).toBe(buffer.buffer)
+      expect(torrentB.bufferPoolStats!.reuses).toBe(1)
+      torrentB.destroy()
+    })
+
+    it('should not pool buffers of pieces still finalizing when a torrent is paused', () => {
+      const allocator = new SlabAllocator()
+      const torrentA = new ActivePieceManager(mockEngine, () => PIECE_LENGTH, {
+        bufferAllocator: allocator,
+      })
+      const torrentB = new ActivePieceManager(mockEngine, () => PIECE_LENGTH, {
+        bufferAllocator: allocator,
+      })
+
+      // Piece 0 completes and goes to finalizePiece (hash + disk write in flight)
+      const finalizing = torrentA.getOrCreate(0)!
+      for (let i = 0; i < finalizing.blocksNeeded; i++) {
+        finalizing.addBlock(i, new Uint8Array(16384).fill(7), 'peer1')
+      }
+      torrentA.promoteToFullyResponded(0)
+      const pieceData = finalizing.assemble()
+      // Piece 1 is still downloading
+      torrentA.getOrCreate(1)
+
+      // Pause mid-finalize
+      torrentA.destroy()
+      expect(allocator.getStats().pooledBuffers).toBe(1)
+
+      // Another torrent gets the downloading piece's slab, never the finalizing one
+      const other = torrentB.getOrCreate(0)!.getBuffer()
+      const fresh = torrentB.getOrCreate(1)!.getBuffer()
+      expect(other.buffer).not.toBe(pieceData.buffer)
+      expect(fresh.buffer).not.toBe(pieceData.buffer)
+      fresh.fill(0)
+      expect(pieceData.every((b) => b === 7)).toBe(true)
+      // Finalization still sees the piece's state
+      expect(finalizing.getContributingPeers().has('peer1')).toBe(true)
+
+      // finalizePiece finishing after the pause is a no-op
+      expect(torrentA.removeFullyResponded(0)).toBeUndefined()
+      expect(allocator.getStats().pooledBuffers).toBe(0)
+      torrentB.destroy()
+    })
   })
 
   describe('full zero-copy path integration', () => {
@@ -295,6 +295,28 @@ describe('ActivePiece', () => {
         expect(others).toHaveLength(0)
       })
     })
+
+    describe('duplicateRequests', () => {
+      it('should count requests beyond the first per block', () => {
+        piece.addRequest(0, 'peer1')
+        piece.addRequest(0, 'peer2')
+        piece.addRequest(0, 'peer3')
+        piece.addRequest(1, 'peer1')
+        piece.addRequest(1, 'peer2')
+        piece.addRequest(2, 'peer1')
+        expect(piece.duplicateRequests).toBe(3)
+
+        piece.cancelRequest(0, 'peer3')
+        expect(piece.duplicateRequests).toBe(2)
+
+        piece.clearRequestsForPeer('peer2')
+        expect(piece.duplicateRequests).toBe(0)
+
+        piece.addRequest(2, 'peer2')
+        piece.addBlock(2, new Uint8Array(BLOCK_SIZE), 'peer2')
+        expect(piece.duplicateRequests).toBe(0)
+      })
+    })
   })
 
   // === Phase 3: Pre-allocated Buffer Tests ===
@@ -958,4 +980,117 @@ describe('ActivePiece', () => {
       expect(piece.unrequestedCount).toBe(3) // No change, was already decremented
     })
   })
+
+  describe('streaming hash', () => {
+    function recordingHash() {
+      const updates: number[][] = []
+      return {
+        updates,
+        hash: {
+          update: vi.fn((data: Uint8Array) => updates.push([data[0], data.length])),
+          digest: vi.fn().mockResolvedValue(new Uint8Array(20).fill(7)),
+          abort: vi.fn(),
+        },
+      }
+    }
+
+    function block(value: number, length = BLOCK_SIZE): Uint8Array {
+      return new Uint8Array(length).fill(value)
+    }
+
+    it('feeds blocks in order as the contiguous prefix grows', async () => {
+      const { updates, hash } = recordingHash()
+      piece.attachStreamingHash(hash)
+
+      piece.addBlock(1, block(1), 'peer1')
+      expect(updates).toEqual([])
+      piece.addBlock(0, block(0), 'peer1')
+      piece.addBlock(3, block(3), 'peer1')
+      piece.addBlock(2, block(2), 'peer1')
+
+      expect(updates.map(([v]) => v)).toEqual([0, 1, 2, 3])
+      await expect(piece.takeStreamingDigest()).resolves.toEqual(new Uint8Array(20).fill(7))
+      expect(piece.hasStreamingHash).toBe(false)
+    })
+
+    it('feeds blocks already received when attached', () => {
+      const { updates, hash } = recordingHash()
+      piece.addBlock(0, block(0), 'peer1')
+      piece.attachStreamingHash(hash)
+      expect(updates).toEqual([[0, BLOCK_SIZE]])
+    })
+
+    it('feeds a short last block with its real length', () => {
+      const shortPiece = new ActivePiece(1, BLOCK_SIZE + 100)
+      const { updates, hash } = recordingHash()
+      shortPiece.attachStreamingHash(hash)
+      shortPiece.addBlock(0, block(0), 'peer1')
+      shortPiece.addBlock(1, block(1, 100), 'peer1')
+      expect(updates).toEqual([
+        [0, BLOCK_SIZE],
+        [1, 100],
+      ])
+    })
+
+    it('returns null and aborts when the piece is incomplete', () => {
+      const { hash } = recordingHash()
+      piece.attachStreamingHash(hash)
+      piece.addBlock(0, block(0), 'peer1')
+      expect(piece.takeStreamingDigest()).toBeNull()
+      expect(hash.abort).toHaveBeenCalled()
+    })
+
+    it('clear() aborts the hash', () => {
+      const { hash } = recordingHash()
+      piece.attachStreamingHash(hash)
+      piece.clear()
+      expect(hash.abort).toHaveBeenCalled()
+      expect(piece.hasStreamingHash).toBe(false)
+    })
+  })
+
+  describe('direct-to-disk blocks', () => {
+    it('counts written blocks toward completion without touching the buffer', () => {
+      const buffer = piece.getBuffer()
+      buffer.fill(9)
+      piece.addRequest(1, 'peer1')
+
+      expect(piece.addBlockWritten(1, 'peer1')).toBe(true)
+      expect(piece.addBlockWritten(1, 'peer1')).toBe(false)
+      expect(piece.addBlock(1, new Uint8Array(BLOCK_SIZE), 'peer2')).toBe(false)
+
+      expect(piece.blocksReceived).toBe(1)
+      expect(piece.directBlocks).toBe(1)
+      expect(piece.isBlockOnDisk(1)).toBe(true)
+      expect(piece.isBlockOnDisk(0)).toBe(false)
+      expect(piece.isBlockRequested(1)).toBe(false)
+      expect(buffer[BLOCK_SIZE]).toBe(9)
+
+      piece.addBlock(0, new Uint8Array(BLOCK_SIZE), 'peer2')
+      piece.addBlockWritten(2, 'peer1')
+      piece.addBlockWritten(3, 'peer1')
+      expect(piece.haveAllBlocks).toBe(true)
+      expect(piece.getContributingPeers()).toEqual(new Set(['peer1', 'peer2']))
+    })
+
+    it('drops the streaming hash once a block bypasses the buffer', () => {
+      const hash = { update: vi.fn(), digest: vi.fn(), abort: vi.fn() }
+      piece.attachStreamingHash(hash)
+      piece.addBlockWritten(0, 'peer1')
+      expect(hash.abort).toHaveBeenCalled()
+      expect(piece.hasStreamingHash).toBe(false)
+
+      const late = { update: vi.fn(), digest: vi.fn(), abort: vi.fn() }
+      piece.attachStreamingHash(late)
+      expect(late.abort).toHaveBeenCalled()
+      expect(late.update).not.toHaveBeenCalled()
+    })
+
+    it('clear() forgets which blocks were on disk', () => {
+      piece.addBlockWritten(0, 'peer1')
+      piece.clear()
+      expect(piece.directBlocks).toBe(0)
+      expect(piece.isBlockOnDisk(0)).toBe(false)
+    })
+  })
 })
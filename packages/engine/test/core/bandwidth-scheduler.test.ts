@@ -0,0 +1,183 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import { BandwidthClass, BandwidthScheduler } from '../../src/core/bandwidth-scheduler'
+
+const BLOCK = 16 * 1024
+
+describe('BandwidthScheduler', () => {
+  let now: number
+  let scheduler: BandwidthScheduler
+
+  beforeEach(() => {
+    now = 1_000_000
+    scheduler = new BandwidthScheduler(0, () => now)
+  })
+
+  /**
+   * Simulated swarm: every class in `peers` wants to send blocks as fast as
+   * it is allowed. Steps the clock in 1ms increments (finer than the 100ms
+   * engine tick) and returns bytes granted per peer.
+   */
+  function run(peers: BandwidthClass[], ms: number): number[] {
+    const sent = peers.map(() => 0)
+    for (let t = 0; t < ms; t++) {
+      now++
+      for (let i = 0; i < peers.length; i++) {
+        while (peers[i].tryConsume(BLOCK)) sent[i] += BLOCK
+      }
+    }
+    return sent
+  }
+
+  const sum = (values: number[]) => values.reduce((a, b) => a + b, 0)
+
+  /** Jain's fairness index: 1 when all values are equal */
+  const jain = (values: number[]) =>
+    sum(values) ** 2 / (values.length * sum(values.map((v) => v * v)))
+
+  it('is unlimited without a rate limit anywhere', () => {
+    const peer = scheduler.createClass().createChild()
+    expect(peer.isLimited).toBe(false)
+    expect(peer.tryConsume(100 * 1024 * 1024)).toBe(true)
+    expect(peer.msUntilAvailable(100 * 1024 * 1024)).toBe(0)
+  })
+
+  it('refills continuously rather than per tick', () => {
+    scheduler.setLimit(1024 * 1024)
+    const peer = scheduler.createClass().createChild()
+
+    // Starts empty, like TokenBucket.setLimit
+    expect(peer.tryConsume(BLOCK)).toBe(false)
+    expect(peer.msUntilAvailable(BLOCK)).toBe(16)
+
+    now += 10
+    expect(peer.tryConsume(BLOCK)).toBe(false)
+    now += 6
+    expect(peer.tryConsume(BLOCK)).toBe(true)
+  })
+
+  describe('simulated swarm', () => {
+    const LIMIT = 2 * 1024 * 1024
+    const SECONDS = 5
+
+    beforeEach(() => {
+      scheduler.setLimit(LIMIT)
+    })
+
+    it('shares equally between peers and uses the whole limit', () => {
+      const torrent = scheduler.createClass()
+      const peers = Array.from({ length: 8 }, () => torrent.createChild())
+
+      const sent = run(peers, SECONDS * 1000)
+
+      expect(jain(sent)).toBeGreaterThan(0.99)
+      expect(sum(sent)).toBeGreaterThan(0.95 * LIMIT * SECONDS)
+      expect(sum(sent)).toBeLessThanOrEqual(LIMIT * SECONDS + 64 * 1024)
+    })
+
+    it('shares between torrents by weight, independent of peer count', () => {
+      const small = scheduler.createClass({ weight: 1 })
+      const big = scheduler.createClass({ weight: 3 })
+      const smallPeers = Array.from({ length: 2 }, () => small.createChild())
+      const bigPeers = Array.from({ length: 20 }, () => big.createChild())
+
+      const sent = run([...smallPeers, ...bigPeers], SECONDS * 1000)
+      const smallBytes = sum(sent.slice(0, 2))
+      const bigBytes = sum(sent.slice(2))
+
+      expect(bigBytes / smallBytes).toBeGreaterThan(2.8)
+      expect(bigBytes / smallBytes).toBeLessThan(3.2)
+      expect(smallBytes + bigBytes).toBeGreaterThan(0.95 * LIMIT * SECONDS)
+    })
+
+    it('lets a busy torrent borrow what an idle one leaves unused', () => {
+      const idle = scheduler.createClass()
+      const busy = scheduler.createClass()
+      const idlePeer = idle.createChild()
+      const busyPeer = busy.createChild()
+
+      // Both active for a moment, then only the busy one asks
+      run([idlePeer, busyPeer], 100)
+      const sent = run([busyPeer], SECONDS * 1000)
+
+      expect(sent[0]).toBeGreaterThan(0.95 * LIMIT * SECONDS)
+    })
+
+    it('caps a torrent at its own limit and gives the rest to others', () => {
+      const capped = scheduler.createClass({ rateLimit: LIMIT / 8 })
+      const other = scheduler.createClass()
+      const cappedPeers = Array.from({ length: 4 }, () => capped.createChild())
+      const otherPeers = Array.from({ length: 4 }, () => other.createChild())
+
+      const sent = run([...cappedPeers, ...otherPeers], SECONDS * 1000)
+      const cappedBytes = sum(sent.slice(0, 4))
+      const otherBytes = sum(sent.slice(4))
+
+      expect(cappedBytes).toBeLessThanOrEqual((LIMIT / 8) * SECONDS + 64 * 1024)
+      expect(cappedBytes).toBeGreaterThan(0.9 * (LIMIT / 8) * SECONDS)
+      expect(cappedBytes + otherBytes).toBeGreaterThan(0.95 * LIMIT * SECONDS)
+    })
+
+    it('limits a torrent on its own when there is no global limit', () => {
+      scheduler.setLimit(0)
+      const capped = scheduler.createClass({ rateLimit: LIMIT })
+      const peers = Array.from({ length: 4 }, () => capped.createChild())
+
+      const sent = run(peers, SECONDS * 1000)
+
+      expect(jain(sent)).toBeGreaterThan(0.99)
+      expect(sum(sent)).toBeGreaterThan(0.95 * LIMIT * SECONDS)
+      expect(sum(sent)).toBeLessThanOrEqual(LIMIT * SECONDS + 64 * 1024)
+    })
+  })
+
+  it('stops sharing with a class that went idle', () => {
+    scheduler.setLimit(1024 * 1024)
+    const torrent = scheduler.createClass()
+    const a = torrent.createChild()
+    const b = torrent.createChild()
+
+    a.tryConsume(BLOCK)
+    b.tryConsume(BLOCK)
+    // Both active: a's share is half the limit
+    now += 100
+    expect(a.msUntilAvailable(1024 * 1024)).toBeGreaterThan(1500)
+
+    // b stops asking; after the idle window a gets the whole limit
+    for (let t = 0; t < 1000; t += 50) {
+      now += 50
+      a.tryConsume(BLOCK)
+    }
+    expect(a.msUntilAvailable(1024 * 1024)).toBeLessThanOrEqual(1000)
+  })
+
+  it('keeps the share of a class waiting for tokens', () => {
+    scheduler.setLimit(64 * 1024)
+    const torrent = scheduler.createClass()
+    const peers = Array.from({ length: 8 }, () => torrent.createChild())
+
+    // Once all are active each peer gets 8KiB/s: a block takes two seconds,
+    // longer than the idle window
+    for (const p of peers) p.msUntilAvailable(BLOCK)
+    const waits = peers.map((p) => p.msUntilAvailable(BLOCK))
+    expect(Math.min(...waits)).toBeGreaterThan(1000)
+
+    now += Math.max(...waits)
+    for (const p of peers) expect(p.tryConsume(BLOCK)).toBe(true)
+  })
+
+  it('returns tokens to the parent when a class is removed', () => {
+    scheduler.setLimit(1024 * 1024)
+    const torrent = scheduler.createClass()
+    const a = torrent.createChild()
+    const b = torrent.createChild()
+    a.tryConsume(BLOCK)
+    b.tryConsume(BLOCK)
+    now += 50
+
+    b.remove()
+    expect(torrent.children.has(b)).toBe(false)
+    // a can use what b had banked
+    expect(a.tryConsume(40 * 1024)).toBe(true)
+    expect(() => b.createChild()).toThrow(/removed/)
+  })
+})
@@ -66,6 +66,26 @@ describe('BtEngine', () => {
     await expect(client.addTorrent(buffer)).rejects.toThrow()
   })
 
+  it('should report estimated memory per subsystem and per torrent', async () => {
+    const info = {
+      name: 'memory-report',
+      'piece length': 16384,
+      pieces: new Uint8Array(20 * 64),
+      length: 64 * 16384,
+    }
+    const { torrent } = await client.addTorrent(Bencode.encode({ info }))
+    if (!torrent) throw new Error('Torrent is null')
+
+    const report = client.getMemoryReport()
+    const { subsystems } = report
+    expect(Object.keys(report.torrents)).toEqual([torrent.infoHashStr])
+    // One Uint16 availability count per piece
+    expect(subsystems.pieceAvailability).toBeGreaterThanOrEqual(64 * 2)
+    expect(subsystems.bandwidthHistory).toBeGreaterThan(0)
+    expect(report.total).toBe(Object.values(subsystems).reduce((a, b) => a + b, 0))
+    await client.destroy()
+  })
+
   it('should add a torrent from a magnet link', async () => {
     const magnetLink =
       'magnet:?xt=urn:btih:c12fe1c06bba254a9dc9f519b335aa7c1367a88a&dn=Test+Torrent&tr=udp%3A%2F%2Ftracker.opentrackr.org%3A1337%2Fannounce'
@@ -82,6 +102,31 @@ describe('BtEngine', () => {
     expect(torrent.contentStorage).toBeUndefined()
   }, 10000)
 
+  it('should load magnet metadata from the metadata cache', async () => {
+    const infoBuffer = Bencode.encode({
+      name: 'cached-torrent',
+      'piece length': 16384,
+      pieces: new Uint8Array(20),
+      length: 1000,
+    })
+    const hex = Buffer.from(await client.hasher.sha1(infoBuffer)).toString('hex')
+    await client.metadataCache.put(hex, infoBuffer)
+
+    const { torrent } = await client.addTorrent(`magnet:?xt=urn:btih:${hex}`)
+    if (!torrent) throw new Error('Torrent is null')
+    expect(torrent.hasMetadata).toBe(true)
+    expect(torrent.piecesCount).toBe(1)
+  })
+
+  it('should ignore cached metadata that does not match the info hash', async () => {
+    const hex = 'c12fe1c06bba254a9dc9f519b335aa7c1367a88a'
+    await client.metadataCache.put(hex, Bencode.encode({ name: 'other' }))
+
+    const { torrent } = await client.addTorrent(`magnet:?xt=urn:btih:${hex}`)
+    expect(torrent!.hasMetadata).toBe(false)
+    expect(await client.metadataCache.get(hex)).toBeNull()
+  })
+
   it('should get a torrent by infoHash', async () => {
     const info = {
       name: 'test-torrent-2',
@@ -0,0 +1,226 @@
+import { describe, it, expect, beforeEach, vi } from 'vitest'
+import { ConnectPipeline } from '../../src/core/connect-pipeline'
+import { ConnectionManager, DEFAULT_CONNECTION_CONFIG } from '../../src/core/connection-manager'
+import { Swarm } from '../../src/core/swarm'
+import { PeerConnection } from '../../src/core/peer-connection'
+import { ISocketFactory, ITcpSocket } from '../../src/interfaces/socket'
+import { MockEngine } from '../utils/mock-engine'
+import type { Logger } from '../../src/logging/logger'
+
+describe('ConnectPipeline', () => {
+  let now: number
+  let pipeline: ConnectPipeline
+
+  beforeEach(() => {
+    now = 1_000_000
+    pipeline = new ConnectPipeline(
+      { minHalfOpen: 4, maxHalfOpen: 32, initialHalfOpen: 8 },
+      () => now,
+    )
+  })
+
+  /** Start and complete one connect */
+  const connect = (outcome: 'connected' | 'failed' | 'timeout', latencyMs: number) => {
+    pipeline.begin()
+    now += 10
+    pipeline.complete(outcome, latencyMs)
+  }
+
+  it('counts half-open connects against the limit', () => {
+    expect(pipeline.available).toBe(8)
+    for (let i = 0; i < 8; i++) pipeline.begin()
+    expect(pipeline.available).toBe(0)
+    pipeline.abandon()
+    expect(pipeline.halfOpen).toBe(7)
+    expect(pipeline.available).toBe(1)
+  })
+
+  it('ramps up on fast successful connects', () => {
+    for (let i = 0; i < 10; i++) connect('connected', 40)
+    expect(pipeline.halfOpenLimit).toBe(18)
+    for (let i = 0; i < 50; i++) connect('connected', 40)
+    expect(pipeline.halfOpenLimit).toBe(32)
+  })
+
+  it('backs off when connect latency inflates', () => {
+    for (let i = 0; i < 10; i++) connect('connected', 40)
+    const before = pipeline.halfOpenLimit
+
+    // Queueing: connects now take ten times as long
+    for (let i = 0; i < 20; i++) {
+      now += 1000
+      connect('connected', 400)
+    }
+    expect(pipeline.halfOpenLimit).toBeLessThan(before)
+    expect(pipeline.halfOpenLimit).toBeGreaterThanOrEqual(4)
+  })
+
+  it('backs off on timeouts only while most peers are reachable', () => {
+    for (let i = 0; i < 20; i++) connect('connected', 40)
+    const reachable = pipeline.halfOpenLimit
+    now += 1000
+    connect('timeout', 10_000)
+    expect(pipeline.halfOpenLimit).toBeLessThan(reachable)
+
+    // A swarm of mostly dead peers: timeouts keep the limit growing
+    const dead = new ConnectPipeline({ initialHalfOpen: 8 }, () => now)
+    for (let i = 0; i < 30; i++) {
+      dead.begin()
+      now += 1000
+      dead.complete(i % 5 === 0 ? 'connected' : 'timeout', i % 5 === 0 ? 40 : 10_000)
+    }
+    expect(dead.halfOpenLimit).toBeGreaterThan(8)
+  })
+
+  it('ignores fast failures for the limit but not for the success rate', () => {
+    for (let i = 0; i < 10; i++) connect('failed', 5)
+    expect(pipeline.halfOpenLimit).toBe(8)
+    expect(pipeline.getStats().successRate).toBeLessThan(0.2)
+  })
+
+  it('reports latency and outcome metrics', () => {
+    connect('connected', 30)
+    connect('connected', 50)
+    connect('connected', 70)
+    connect('failed', 5)
+    connect('timeout', 10_000)
+    pipeline.begin()
+    pipeline.abandon()
+
+    const stats = pipeline.getStats()
+    expect(stats).toMatchObject({
+      attempts: 6,
+      connected: 3,
+      failed: 1,
+      timedOut: 1,
+      cancelled: 1,
+      halfOpen: 0,
+    })
+    expect(stats.latencyMs.min).toBe(30)
+    expect(stats.latencyMs.p50).toBe(50)
+    expect(stats.latencyMs.p90).toBe(70)
+  })
+})
+
+describe('ConnectionManager dual-stack racing', () => {
+  const V4 = { ip: '1.2.3.4', port: 6881, family: 'ipv4' as const }
+  const V6 = { ip: '2001:db8::1', port: 6881, family: 'ipv6' as const }
+  const PEER_ID = new Uint8Array(20).fill(7)
+
+  let swarm: Swarm
+  let pipeline: ConnectPipeline
+  let manager: ConnectionManager
+  let connected: string[]
+  let sockets: Map<string, { socket: ITcpSocket; close: ReturnType<typeof vi.fn> }>
+  /** Per-ip connect behaviour: delay in ms, or null to hang until closed */
+  let delays: Record<string, number | null>
+  let logger: Logger
+  let socketFactory: ISocketFactory
+
+  const createManager = () => {
+    manager = new ConnectionManager(
+      swarm,
+      socketFactory,
+      new MockEngine(),
+      logger,
+      { ...DEFAULT_CONNECTION_CONFIG, maxPeersPerTorrent: 50 },
+      pipeline,
+    )
+    manager.setOnPeerConnected((key: string, _connection: PeerConnection) => connected.push(key))
+  }
+
+  beforeEach(() => {
+    logger = {
+      info: vi.fn(),
+      warn: vi.fn(),
+      error: vi.fn(),
+      debug: vi.fn(),
+    } as unknown as Logger
+    swarm = new Swarm(logger)
+    pipeline = new ConnectPipeline()
+    connected = []
+    sockets = new Map()
+    delays = {}
+
+    socketFactory = {
+      createTcpSocket: vi.fn(async () => {
+        let reject: (err: Error) => void = () => {}
+        const close = vi.fn(() => reject(new Error('closed')))
+        const socket: ITcpSocket = {
+          send: vi.fn(),
+          onData: vi.fn(),
+          onClose: vi.fn(),
+          onError: vi.fn(),
+          close,
+          connect: (_port: number, ip: string) => {
+            sockets.set(ip, { socket, close })
+            return new Promise<void>((resolve, rej) => {
+              reject = rej
+              const delay = delays[ip]
+              if (delay !== null && delay !== undefined) setTimeout(resolve, delay)
+            })
+          },
+        }
+        return socket
+      }),
+    } as unknown as ISocketFactory
+    createManager()
+
+    // The same peer ID was seen at both addresses
+    swarm.addPeer(V4, 'tracker')
+    swarm.addPeer(V6, 'pex')
+    swarm.setIdentity('1.2.3.4:6881', PEER_ID, null)
+    swarm.setIdentity('[2001:db8::1]:6881', PEER_ID, null)
+  })
+
+  it('uses the first address when it connects within its head start', async () => {
+    delays = { '1.2.3.4': 10, '2001:db8::1': 10 }
+    await manager.initiateConnection(swarm.getPeerByKey('1.2.3.4:6881')!)
+
+    expect(connected).toEqual(['1.2.3.4:6881'])
+    expect(sockets.has('2001:db8::1')).toBe(false)
+    expect(pipeline.getStats()).toMatchObject({ attempts: 1, connected: 1, halfOpen: 0 })
+    // The head-start timer doesn't outlive the race
+    expect(pipeline.timers.size).toBe(0)
+  })
+
+  it('does not start the other family without a free half-open slot', async () => {
+    pipeline = new ConnectPipeline({ minHalfOpen: 1, maxHalfOpen: 1, initialHalfOpen: 1 })
+    createManager()
+    delays = { '1.2.3.4': 400, '2001:db8::1': 10 }
+    await manager.initiateConnection(swarm.getPeerByKey('1.2.3.4:6881')!)
+
+    expect(connected).toEqual(['1.2.3.4:6881'])
+    expect(sockets.has('2001:db8::1')).toBe(false)
+    expect(pipeline.getStats()).toMatchObject({ attempts: 1, connected: 1, halfOpen: 0 })
+  })
+
+  it('races the other family when the first stalls and aborts the loser', async () => {
+    delays = { '1.2.3.4': null, '2001:db8::1': 20 }
+    await manager.initiateConnection(swarm.getPeerByKey('1.2.3.4:6881')!)
+
+    expect(connected).toEqual(['[2001:db8::1]:6881'])
+    expect(sockets.get('1.2.3.4')!.close).toHaveBeenCalled()
+    // The stalled address is not penalised as a failure
+    const v4 = swarm.getPeerByKey('1.2.3.4:6881')!
+    expect(v4.state).toBe('idle')
+    expect(v4.connectFailures).toBe(0)
+    expect(pipeline.getStats()).toMatchObject({
+      attempts: 2,
+      connected: 1,
+      cancelled: 1,
+      halfOpen: 0,
+    })
+  })
+
+  it('starts the other family at once when the first fails', async () => {
+    delays = { '2001:db8::1': 10 }
+    const first = manager.initiateConnection(swarm.getPeerByKey('1.2.3.4:6881')!)
+    await new Promise((resolve) => setTimeout(resolve, 0))
+    sockets.get('1.2.3.4')!.close()
+    await first
+
+    expect(connected).toEqual(['[2001:db8::1]:6881'])
+    expect(swarm.getPeerByKey('1.2.3.4:6881')!.state).toBe('failed')
+  })
+})
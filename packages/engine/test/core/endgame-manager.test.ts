@@ -120,6 +120,75 @@ describe('EndgameManager', () => {
     })
   })
 
+  describe('createDuplicateFilter', () => {
+    const NOW = 100_000
+
+    beforeEach(() => {
+      manager.evaluate(1, 1, false, NOW) // Enter endgame
+    })
+
+    it('should duplicate only to a peer expected to deliver first', () => {
+      const piece = new ActivePiece(0, 32768) // 2 blocks
+      // Both asked at NOW - 100ms from a peer expected to take 1s
+      piece.addRequest(0, 'slow', NOW - 100, NOW + 900)
+      piece.addRequest(1, 'slow', NOW - 100, NOW + 900)
+
+      const fast = manager.createDuplicateFilter(50, NOW, 0)
+      expect(piece.getNeededBlocksEndgame('fast', Infinity, fast)).toHaveLength(2)
+
+      const slower = manager.createDuplicateFilter(2000, NOW, 0)
+      expect(piece.getNeededBlocksEndgame('other', Infinity, slower)).toHaveLength(0)
+    })
+
+    it('should duplicate requests that are running late to any peer', () => {
+      const piece = new ActivePiece(0, 16384)
+      // Expected within 100ms, outstanding for 500ms
+      piece.addRequest(0, 'stalled', NOW - 500, NOW - 400)
+
+      const unmeasured = manager.createDuplicateFilter(0, NOW, 0)
+      expect(piece.getNeededBlocksEndgame('peer2', Infinity, unmeasured)).toHaveLength(1)
+    })
+
+    it('should respect the torrent-wide duplicate budget', () => {
+      manager.updateConfig({ duplicateBudget: 3 })
+      const piece = new ActivePiece(0, 4 * 16384)
+      for (let i = 0; i < 4; i++) piece.addRequest(i, 'slow', NOW, NOW + 5000)
+
+      // One duplicate already outstanding elsewhere: two left
+      const filter = manager.createDuplicateFilter(10, NOW, 1)
+      expect(piece.getNeededBlocksEndgame('fast', Infinity, filter)).toHaveLength(2)
+    })
+
+    it('should respect maxDuplicateRequests per block', () => {
+      manager.updateConfig({ maxDuplicateRequests: 2 })
+      const piece = new ActivePiece(0, 16384)
+      piece.addRequest(0, 'peer1', NOW, NOW + 5000)
+      piece.addRequest(0, 'peer2', NOW, NOW + 5000)
+      expect(piece.duplicateRequests).toBe(1)
+
+      const filter = manager.createDuplicateFilter(10, NOW, 0)
+      expect(piece.getNeededBlocksEndgame('peer3', Infinity, filter)).toHaveLength(0)
+    })
+  })
+
+  describe('getStats', () => {
+    it('should accumulate endgame time across entries', () => {
+      manager.evaluate(1, 1, false, 1000)
+      expect(manager.getStats(1500).endgameMs).toBe(500)
+
+      manager.evaluate(1, 1, true, 2000) // Exit
+      manager.evaluate(1, 1, false, 5000) // Re-enter
+      manager.reset(5300)
+      expect(manager.getStats(9000).endgameMs).toBe(1300)
+    })
+
+    it('should count wasted bytes', () => {
+      manager.recordWastedBlock(16384)
+      manager.recordWastedBlock(1000)
+      expect(manager.getStats().wastedBytes).toBe(17384)
+    })
+  })
+
   describe('reset', () => {
     it('should exit endgame mode', () => {
       manager.evaluate(1, 1, false)
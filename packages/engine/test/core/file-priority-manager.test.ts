@@ -0,0 +1,135 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import {
+  FilePriorityManager,
+  FileInfo,
+  PIECE_BLACKLISTED,
+  PIECE_BOUNDARY,
+  PIECE_WANTED,
+} from '../../src/core/file-priority-manager'
+import { MockEngine } from '../utils/mock-engine'
+
+const PIECE_LENGTH = 1000
+
+/** Reference: check every file against every piece */
+function bruteForce(files: FileInfo[], priorities: number[], totalLength: number) {
+  const piecesCount = Math.ceil(totalLength / PIECE_LENGTH)
+  const codes = new Uint8Array(piecesCount)
+  const piecePriority = new Uint8Array(piecesCount)
+  for (let p = 0; p < piecesCount; p++) {
+    const start = p * PIECE_LENGTH
+    const end = Math.min(start + PIECE_LENGTH, totalLength)
+    let skipped = false
+    let nonSkipped = false
+    let max = 0
+    files.forEach((file, i) => {
+      if (start < file.offset + file.length && end > file.offset) {
+        if (priorities[i] === 1) skipped = true
+        else {
+          nonSkipped = true
+          max = Math.max(max, priorities[i] === 2 ? 2 : 1)
+        }
+      }
+    })
+    codes[p] = skipped && nonSkipped ? PIECE_BOUNDARY : skipped ? PIECE_BLACKLISTED : PIECE_WANTED
+    piecePriority[p] = max
+  }
+  return { codes, piecePriority }
+}
+
+describe('FilePriorityManager', () => {
+  let files: FileInfo[]
+  let totalLength: number
+  let blacklistCalls: number[][]
+  let manager: FilePriorityManager
+
+  const createManager = () => {
+    blacklistCalls = []
+    totalLength = files.reduce((sum, f) => sum + f.length, 0)
+    manager = new FilePriorityManager({
+      engine: new MockEngine(),
+      infoHash: new Uint8Array(20),
+      getPiecesCount: () => Math.ceil(totalLength / PIECE_LENGTH),
+      getPieceLength: (i) => Math.min(PIECE_LENGTH, totalLength - i * PIECE_LENGTH),
+      getFiles: () => files,
+      hasMetadata: () => true,
+      isFileComplete: () => false,
+      getBitfield: () => undefined,
+      onPrioritiesChanged: () => {},
+      onBlacklistPieces: (indices) => blacklistCalls.push(indices),
+    })
+    manager.setStandardPieceLength(PIECE_LENGTH)
+    manager.initFilePriorities()
+  }
+
+  beforeEach(() => {
+    // Uneven sizes, including a zero-length file inside piece 1
+    const sizes = [1500, 0, 700, 2300, 10, 10, 10, 5000, 470]
+    let offset = 0
+    files = sizes.map((length) => {
+      const file = { offset, length }
+      offset += length
+      return file
+    })
+    createManager()
+  })
+
+  it('classifies every piece as wanted initially', () => {
+    expect(manager.classificationCodes).toHaveLength(10)
+    expect(manager.classificationCodes.every((c) => c === PIECE_WANTED)).toBe(true)
+    expect(manager.getWantedPiecesCount()).toBe(10)
+    expect(manager.pieceClassification.every((c) => c === 'wanted')).toBe(true)
+  })
+
+  it('re-classifies only the changed file and reports new blacklisted pieces', () => {
+    // File 3 covers bytes 2200-4500: pieces 2 (boundary), 3 (all), 4 (boundary)
+    manager.setFilePriority(3, 1)
+
+    expect(manager.getClassification(1)).toBe('wanted')
+    expect(manager.getClassification(2)).toBe('boundary')
+    expect(manager.getClassification(3)).toBe('blacklisted')
+    expect(manager.getClassification(4)).toBe('boundary')
+    expect(manager.getClassification(10)).toBeUndefined()
+    expect(manager.boundaryCount).toBe(2)
+    expect(manager.getWantedPiecesCount()).toBe(9)
+    expect(blacklistCalls).toEqual([[3]])
+    expect(manager.pieceClassification[3]).toBe('blacklisted')
+  })
+
+  it('counts a skipped zero-length file inside a piece', () => {
+    manager.setFilePriority(1, 1)
+    expect(manager.getClassification(1)).toBe('boundary')
+    expect(manager.getClassification(0)).toBe('wanted')
+  })
+
+  it('matches a full check of every file against every piece', () => {
+    let seed = 7
+    const next = (n: number) => {
+      seed = (seed * 1103515245 + 12345) & 0x7fffffff
+      return (seed >>> 16) % n
+    }
+    files = []
+    let offset = 0
+    for (let i = 0; i < 300; i++) {
+      const length = next(4) === 0 ? next(50) : next(4000)
+      files.push({ offset, length })
+      offset += length
+    }
+    createManager()
+    const priorities = new Array(files.length).fill(0)
+
+    for (let round = 0; round < 100; round++) {
+      const changes = new Map<number, number>()
+      for (let i = next(5) + 1; i > 0; i--) changes.set(next(files.length), next(3))
+      for (const [file, priority] of changes) priorities[file] = priority
+      manager.setFilePriorities(changes)
+
+      const expected = bruteForce(files, priorities, totalLength)
+      expect(manager.classificationCodes).toEqual(expected.codes)
+      expect(manager.piecePriority).toEqual(expected.piecePriority)
+    }
+
+    let blacklisted = 0
+    for (const code of manager.classificationCodes) if (code === PIECE_BLACKLISTED) blacklisted++
+    expect(manager.getWantedPiecesCount()).toBe(manager.classificationCodes.length - blacklisted)
+  })
+})
@@ -0,0 +1,41 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import { MetadataCache } from '../../src/core/metadata-cache'
+import { MemorySessionStore } from '../../src/adapters/memory/memory-session-store'
+
+const hash = (n: number) => n.toString(16).padStart(40, '0')
+
+describe('MetadataCache', () => {
+  let store: MemorySessionStore
+  let cache: MetadataCache
+
+  beforeEach(() => {
+    store = new MemorySessionStore()
+    cache = new MetadataCache(store, 1000)
+  })
+
+  it('returns cached info dicts, also from a new instance on the same store', async () => {
+    const infoDict = new Uint8Array([1, 2, 3])
+    await cache.put(hash(1), infoDict)
+
+    expect(await cache.get(hash(1))).toEqual(infoDict)
+    expect(await cache.get(hash(2))).toBeNull()
+    expect(await new MetadataCache(store, 1000).get(hash(1))).toEqual(infoDict)
+  })
+
+  it('evicts least recently used entries over the byte budget', async () => {
+    await cache.put(hash(1), new Uint8Array(400))
+    await cache.put(hash(2), new Uint8Array(400))
+    // Touch 1 so 2 is the oldest
+    await cache.get(hash(1))
+    await cache.put(hash(3), new Uint8Array(400))
+
+    expect(await cache.get(hash(2))).toBeNull()
+    expect(await cache.get(hash(1))).not.toBeNull()
+    expect(await cache.get(hash(3))).not.toBeNull()
+    expect(await store.keys('metadata:infodict:')).toHaveLength(2)
+
+    // Larger than the whole budget: not cached
+    await cache.put(hash(4), new Uint8Array(2000))
+    expect(await cache.get(hash(4))).toBeNull()
+  })
+})
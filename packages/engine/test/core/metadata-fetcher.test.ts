@@ -0,0 +1,155 @@
+import { describe, it, expect, beforeEach, afterEach, vi } from 'vitest'
+import { MetadataFetcher } from '../../src/core/metadata-fetcher'
+import type { PeerConnection } from '../../src/core/peer-connection'
+import { SubtleCryptoHasher } from '../../src/adapters/browser/subtle-crypto-hasher'
+import { MockEngine } from '../utils/mock-engine'
+
+const BLOCK = 16 * 1024
+
+interface MockPeer {
+  peerMetadataId: number | null
+  peerMetadataSize: number
+  /** Every piece requested, in order */
+  requests: number[]
+  /** Requests not answered yet */
+  pending: number[]
+  sendMetadataRequest(piece: number): void
+  sendMetadataReject: ReturnType<typeof vi.fn>
+  sendMetadataData: ReturnType<typeof vi.fn>
+}
+
+function createPeer(size: number): MockPeer {
+  return {
+    peerMetadataId: 3,
+    peerMetadataSize: size,
+    requests: [],
+    pending: [],
+    sendMetadataRequest(piece: number) {
+      this.requests.push(piece)
+      this.pending.push(piece)
+    },
+    sendMetadataReject: vi.fn(),
+    sendMetadataData: vi.fn(),
+  }
+}
+
+const asConnection = (peer: MockPeer) => peer as unknown as PeerConnection
+
+describe('MetadataFetcher', () => {
+  const hasher = new SubtleCryptoHasher()
+  let info: Uint8Array
+  let fetcher: MetadataFetcher
+  let received: Uint8Array[]
+
+  /** Answer a peer's pending requests (and any it makes meanwhile) from `source` */
+  const serve = async (peer: MockPeer, source = info) => {
+    while (peer.pending.length > 0) {
+      const piece = peer.pending.shift()!
+      const data = source.subarray(piece * BLOCK, Math.min((piece + 1) * BLOCK, source.length))
+      await fetcher.onMetadataData(asConnection(peer), piece, source.length, data)
+    }
+  }
+
+  const join = (peer: MockPeer) => fetcher.onExtensionHandshake(asConnection(peer))
+
+  beforeEach(async () => {
+    vi.useFakeTimers()
+    // 10 pieces, the last one short
+    info = new Uint8Array(9 * BLOCK + 1234)
+    for (let i = 0; i < info.length; i++) info[i] = (i * 31 + (i >> 8)) & 0xff
+    const infoHash = await hasher.sha1(info)
+    fetcher = new MetadataFetcher({
+      engine: new MockEngine(),
+      infoHash,
+      sha1: (data) => hasher.sha1(data),
+    })
+    received = []
+    fetcher.on('metadata', (buffer) => received.push(buffer))
+  })
+
+  afterEach(() => {
+    fetcher.destroy()
+    vi.useRealTimers()
+  })
+
+  it('spreads piece requests across peers into one buffer', async () => {
+    const peers = [createPeer(info.length), createPeer(info.length), createPeer(info.length)]
+    peers.forEach(join)
+
+    expect(peers[0].requests).toEqual([0, 1, 2, 3])
+    expect(peers[1].requests).toEqual([4, 5, 6, 7])
+    expect(peers[2].requests.slice(0, 2)).toEqual([8, 9])
+    expect(fetcher.pieceCount).toBe(10)
+
+    for (const peer of peers) await serve(peer)
+
+    expect(received).toHaveLength(1)
+    expect(received[0]).toEqual(info)
+    expect(fetcher.isComplete).toBe(true)
+    expect(fetcher.activePeerCount).toBe(0)
+  })
+
+  it('asks another peer for a rejected piece', async () => {
+    const [a, b] = [createPeer(info.length), createPeer(info.length)]
+    join(a)
+    join(b)
+
+    a.pending = []
+    fetcher.onMetadataReject(asConnection(a), 0)
+    // A moves on to a piece nobody has asked for yet
+    expect(a.requests).toEqual([0, 1, 2, 3, 8])
+
+    await serve(b)
+    expect(b.requests).toContain(0)
+    expect(a.requests.filter((p) => p === 0)).toHaveLength(1)
+  })
+
+  it('re-issues timed out requests and stops asking the unresponsive peer', async () => {
+    const [slow, fast] = [createPeer(info.length), createPeer(info.length)]
+    join(slow)
+    vi.advanceTimersByTime(11_000)
+    expect(fetcher.activePeerCount).toBe(0)
+
+    join(fast)
+    expect(fast.requests.slice(0, 4)).toEqual([0, 1, 2, 3])
+    await serve(fast)
+    expect(received[0]).toEqual(info)
+  })
+
+  it('finds the peer with bad metadata by fetching from one peer at a time', async () => {
+    const bad = createPeer(info.length)
+    const good = createPeer(info.length)
+    const corrupt = info.slice()
+    for (let offset = 0; offset < corrupt.length; offset += BLOCK) corrupt[offset] ^= 0xff
+
+    join(bad)
+    join(good)
+    // Answer one request from each peer in turn, so both contribute to the
+    // first attempt and the mismatch can't be pinned on either
+    while (bad.pending.length > 0 || good.pending.length > 0) {
+      for (const [peer, source] of [
+        [bad, corrupt],
+        [good, info],
+      ] as const) {
+        const piece = peer.pending.shift()
+        if (piece === undefined) continue
+        const data = source.subarray(piece * BLOCK, (piece + 1) * BLOCK)
+        await fetcher.onMetadataData(asConnection(peer), piece, source.length, data)
+      }
+    }
+
+    expect(received).toHaveLength(1)
+    expect(received[0]).toEqual(info)
+    // The bad peer was asked for the whole dictionary on its own, then dropped
+    expect(new Set(bad.requests).size).toBe(10)
+  })
+
+  it('treats a piece of the wrong size as a failure', async () => {
+    const peer = createPeer(info.length)
+    join(peer)
+    await fetcher.onMetadataData(asConnection(peer), 0, info.length, new Uint8Array(100))
+    expect(fetcher.piecesReceived).toBe(0)
+    // The bad piece counts as a failure and is asked for again after the others
+    expect(peer.requests).toEqual([0, 1, 2, 3, 4])
+  })
+})
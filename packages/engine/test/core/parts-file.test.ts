@@ -38,7 +38,7 @@ describe('PartsFile', () => {
       await partsFile2.load()
 
       expect(partsFile2.hasPiece(42)).toBe(true)
-      expect(partsFile2.getPiece(42)).toEqual(pieceData)
+      expect(await partsFile2.readPiece(42)).toEqual(pieceData)
     })
 
     it('write multiple pieces, read back all', async () => {
@@ -59,9 +59,9 @@ describe('PartsFile', () => {
       expect(partsFile2.hasPiece(10)).toBe(true)
       expect(partsFile2.hasPiece(20)).toBe(true)
       expect(partsFile2.hasPiece(30)).toBe(true)
-      expect(partsFile2.getPiece(10)).toEqual(piece10)
-      expect(partsFile2.getPiece(20)).toEqual(piece20)
-      expect(partsFile2.getPiece(30)).toEqual(piece30)
+      expect(await partsFile2.readPiece(10)).toEqual(piece10)
+      expect(await partsFile2.readPiece(20)).toEqual(piece20)
+      expect(await partsFile2.readPiece(30)).toEqual(piece30)
     })
 
     it('empty file returns empty pieces set', async () => {
@@ -121,7 +121,7 @@ describe('PartsFile', () => {
       await partsFile.flush()
 
       expect(partsFile.count).toBe(1)
-      expect(partsFile.getPiece(5)).toEqual(dataB)
+      expect(await partsFile.readPiece(5)).toEqual(dataB)
     })
   })
 
@@ -299,6 +299,98 @@ describe('PartsFile', () => {
     })
   })
 
+  describe('indexed format', () => {
+    const filename = `${testInfoHash}.parts`
+
+    const fileSize = async () => (await fs.stat(filename)).size
+
+    it('migrates a bencoded .parts file on load', async () => {
+      const encoded = Bencode.encode({
+        '3': new Uint8Array([3, 3, 3]),
+        '17': new Uint8Array([17, 17]),
+      })
+      const handle = await fs.open(filename, 'w')
+      await handle.write(encoded, 0, encoded.length, 0)
+      await handle.close()
+
+      const partsFile = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile.load()
+      expect(partsFile.pieces).toEqual(new Set([3, 17]))
+      expect(await partsFile.readPiece(17)).toEqual(new Uint8Array([17, 17]))
+
+      // The file was rewritten in the indexed format
+      const header = new Uint8Array(4)
+      const h = await fs.open(filename, 'r')
+      await h.read(header, 0, 4, 0)
+      await h.close()
+      expect(new TextDecoder().decode(header)).toBe('JSTP')
+
+      const partsFile2 = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile2.load()
+      expect(await partsFile2.readPiece(3)).toEqual(new Uint8Array([3, 3, 3]))
+      await partsFile2.addPieceAndFlush(4, new Uint8Array([4]))
+      expect(partsFile2.count).toBe(3)
+    })
+
+    it('reuses freed slots instead of growing the file', async () => {
+      const partsFile = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile.addPieceAndFlush(1, new Uint8Array(100).fill(1))
+      await partsFile.addPieceAndFlush(2, new Uint8Array(100).fill(2))
+      const size = await fileSize()
+
+      await partsFile.removePieceAndFlush(1)
+      await partsFile.addPieceAndFlush(3, new Uint8Array(80).fill(3))
+      expect(await fileSize()).toBe(size)
+
+      const partsFile2 = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile2.load()
+      expect(partsFile2.pieces).toEqual(new Set([2, 3]))
+      expect(await partsFile2.readPiece(3)).toEqual(new Uint8Array(80).fill(3))
+      expect(await partsFile2.readPiece(2)).toEqual(new Uint8Array(100).fill(2))
+    })
+
+    it('grows the index past its initial capacity', async () => {
+      const partsFile = new PartsFile(engine, storageHandle, testInfoHash)
+      for (let i = 0; i < 150; i++) {
+        await partsFile.addPieceAndFlush(i, new Uint8Array([i, i + 1, i + 2]))
+      }
+
+      const partsFile2 = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile2.load()
+      expect(partsFile2.count).toBe(150)
+      for (let i = 0; i < 150; i++) {
+        expect(await partsFile2.readPiece(i)).toEqual(new Uint8Array([i, i + 1, i + 2]))
+      }
+    })
+
+    it('reads piece data from disk only when asked', async () => {
+      const partsFile = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile.addPieceAndFlush(9, new Uint8Array([9, 9]))
+
+      const partsFile2 = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile2.load()
+
+      // Overwrite the data behind the index's back
+      const size = await fileSize()
+      const handle = await fs.open(filename, 'r+')
+      await handle.write(new Uint8Array([7, 7]), 0, 2, size - 2)
+      await handle.close()
+
+      expect(await partsFile2.readPiece(9)).toEqual(new Uint8Array([7, 7]))
+    })
+
+    it('serves unflushed pieces from memory', async () => {
+      const partsFile = new PartsFile(engine, storageHandle, testInfoHash)
+      await partsFile.addPieceAndFlush(1, new Uint8Array([1]))
+      partsFile.addPiece(2, new Uint8Array([2]))
+      partsFile.removePiece(1)
+
+      expect(await partsFile.readPiece(2)).toEqual(new Uint8Array([2]))
+      expect(await partsFile.readPiece(1)).toBeUndefined()
+      expect(partsFile.pieces).toEqual(new Set([2]))
+    })
+  })
+
   describe('filename format', () => {
     it('uses infoHash.parts filename', async () => {
       const customHash = 'deadbeef12345678'
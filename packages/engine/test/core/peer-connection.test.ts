@@ -1,6 +1,6 @@
 import { describe, it, expect, vi, beforeEach } from 'vitest'
 import { PeerConnection } from '../../src/core/peer-connection'
-import { ITcpSocket } from '../../src/interfaces/socket'
+import { DirectBlockEvent, ITcpSocket } from '../../src/interfaces/socket'
 import { PeerWireProtocol, MessageType } from '../../src/protocol/wire-protocol'
 import { MockEngine } from '../utils/mock-engine'
 
@@ -57,6 +57,64 @@ describe('PeerConnection', () => {
     expect(parsed?.infoHash).toEqual(infoHash)
   })
 
+  it('should send coalesced CANCELs as wire-identical messages', () => {
+    const cancels = [
+      { index: 1, begin: 0, length: 16384 },
+      { index: 2, begin: 16384, length: 1000 },
+    ]
+    connection.sendCancels(cancels)
+    connection.flush()
+    expect(socket.sentData.length).toBe(1)
+
+    const expected = cancels.map((c) => PeerWireProtocol.createCancel(c.index, c.begin, c.length))
+    expect(Array.from(socket.sentData[0])).toEqual([...expected[0], ...expected[1]])
+  })
+
+  it('frees the pipeline slot of a cancelled request only once', () => {
+    connection.requestsPending = 2
+    connection.releaseCancelledRequest(1, 0)
+    expect(connection.requestsPending).toBe(1)
+
+    // The PIECE raced our CANCEL: its slot was already freed
+    connection.releaseRequest(1, 0)
+    expect(connection.requestsPending).toBe(1)
+
+    connection.releaseRequest(1, 16384)
+    expect(connection.requestsPending).toBe(0)
+  })
+
+  it('counts a cancelled block requested again when it arrives', () => {
+    connection.requestsPending = 1
+    connection.releaseCancelledRequest(1, 0)
+
+    // The peer honoured the CANCEL; the block is requested from it again
+    connection.sendRequests([{ index: 1, begin: 0, length: 16384 }])
+    connection.requestsPending++
+    connection.releaseRequest(1, 0)
+    expect(connection.requestsPending).toBe(0)
+
+    connection.requestsPending = 2
+    connection.releaseCancelledRequest(2, 0)
+    connection.sendRequests([
+      { index: 2, begin: 0, length: 16384 },
+      { index: 2, begin: 16384, length: 16384 },
+    ])
+    connection.requestsPending += 2
+    connection.releaseRequest(2, 0)
+    expect(connection.requestsPending).toBe(2)
+  })
+
+  it('forgets cancelled requests on choke reset', () => {
+    connection.requestsPending = 1
+    connection.releaseCancelledRequest(1, 0)
+    connection.resetRequests()
+
+    // A later request for the same block is counted normally
+    connection.requestsPending = 1
+    connection.releaseRequest(1, 0)
+    expect(connection.requestsPending).toBe(0)
+  })
+
   it('should emit handshake event on valid handshake', () => {
     const handshakeFn = vi.fn()
     connection.on('handshake', handshakeFn)
@@ -116,3 +174,111 @@ describe('PeerConnection', () => {
     expect(msgFn).toHaveBeenCalled()
   })
 })
+
+class DirectSocket extends MockSocket {
+  public onDirectBlockCb: ((event: DirectBlockEvent) => void) | null = null
+  public enableDirectReceive = vi.fn(async (_layoutId: number, _streamOffset: number) => {})
+
+  onDirectBlock(cb: (event: DirectBlockEvent) => void) {
+    this.onDirectBlockCb = cb
+  }
+
+  emitBlock(index: number, begin: number, length: number, status = 0) {
+    this.onDirectBlockCb?.({ index, begin, length, status, pieceResult: 0 })
+  }
+}
+
+describe('PeerConnection direct-to-disk receive', () => {
+  let socket: DirectSocket
+  let connection: PeerConnection
+  let engine: MockEngine
+  const handshake = PeerWireProtocol.createHandshake(
+    new Uint8Array(20).fill(1),
+    new Uint8Array(20).fill(2),
+  )
+
+  beforeEach(() => {
+    socket = new DirectSocket()
+    engine = new MockEngine()
+    engine.autoDrainBuffers = false
+    connection = new PeerConnection(engine, socket)
+    socket.emitData(handshake) // processed immediately (handshake not yet received)
+  })
+
+  it('dispatches block events in stream order with other messages', () => {
+    const order: string[] = []
+    connection.on('choke', () => order.push('choke'))
+    connection.on('unchoke', () => order.push('unchoke'))
+    connection.onDirectBlock = (event) => order.push(`block ${event.index}:${event.begin}`)
+    connection.requestsPending = 2
+
+    socket.emitData(PeerWireProtocol.createMessage(MessageType.CHOKE))
+    socket.emitBlock(3, 0, 16384)
+    socket.emitData(PeerWireProtocol.createMessage(MessageType.UNCHOKE))
+    socket.emitBlock(3, 16384, 16384)
+    expect(order).toEqual([])
+
+    connection.drainBuffer()
+
+    expect(order).toEqual(['choke', 'block 3:0', 'unchoke', 'block 3:16384'])
+    expect(connection.requestsPending).toBe(0)
+  })
+
+  it('keeps the pipeline slot when the daemon drops an unrequested block', () => {
+    connection.onDirectBlock = () => {}
+    connection.requestsPending = 1
+
+    socket.emitBlock(0, 0, 16384, 3)
+    connection.drainBuffer()
+    expect(connection.requestsPending).toBe(1)
+
+    socket.emitBlock(0, 16384, 16384, 4) // Requested, but the piece completed meanwhile
+    connection.drainBuffer()
+    expect(connection.requestsPending).toBe(0)
+  })
+
+  it('counts block events as the PIECE messages they replace', () => {
+    const downloaded = vi.fn()
+    connection.on('bytesDownloaded', downloaded)
+    connection.onDirectBlock = () => {}
+
+    socket.emitBlock(0, 0, 16384)
+    connection.drainBuffer()
+
+    expect(downloaded).toHaveBeenCalledWith(13 + 16384)
+  })
+
+  it('switches with the offset of every stream byte consumed', async () => {
+    connection.onDirectBlock = () => {}
+    socket.emitData(PeerWireProtocol.createMessage(MessageType.UNCHOKE)) // 5 bytes
+    socket.emitBlock(0, 0, 100)
+    connection.drainBuffer()
+
+    connection.enableDirectReceive(7)
+    expect(socket.enableDirectReceive).toHaveBeenCalledWith(7, 68 + 5 + 13 + 100)
+    expect(connection.directReceive).toBe('pending')
+
+    await Promise.resolve()
+    expect(connection.directReceive).toBe('on')
+
+    // Already on with this layout - nothing to do
+    connection.enableDirectReceive(7)
+    expect(socket.enableDirectReceive).toHaveBeenCalledTimes(1)
+  })
+
+  it('waits for an empty buffer and backs off after a rejection', async () => {
+    socket.emitData(PeerWireProtocol.createMessage(MessageType.UNCHOKE))
+    connection.enableDirectReceive(1)
+    expect(socket.enableDirectReceive).not.toHaveBeenCalled()
+
+    connection.drainBuffer()
+    socket.enableDirectReceive.mockRejectedValueOnce(new Error('offset mismatch'))
+    connection.enableDirectReceive(1)
+    await Promise.resolve()
+    await Promise.resolve()
+    expect(connection.directReceive).toBe('off')
+
+    connection.enableDirectReceive(1)
+    expect(socket.enableDirectReceive).toHaveBeenCalledTimes(1)
+  })
+})
@@ -0,0 +1,81 @@
+import { describe, it, expect } from 'vitest'
+import { selectTopK, WeightedSampler } from '../../../src/core/peer-coordinator/selection'
+
+interface Item {
+  id: string
+  score: number
+  weight: number
+}
+
+const score = (item: Item) => item.score
+const weight = (item: Item) => item.weight
+
+describe('selectTopK', () => {
+  it('matches a stable descending sort and slice', () => {
+    const items: Item[] = [5, 1, 9, 5, 3, 9, 0, 7, 5].map((s, i) => ({
+      id: `i${i}`,
+      score: s,
+      weight: 1,
+    }))
+    for (let k = 0; k <= items.length + 1; k++) {
+      const expected = [...items].sort((a, b) => b.score - a.score).slice(0, Math.max(0, k))
+      expect(selectTopK(items, k, score, [])).toEqual(expected)
+    }
+  })
+
+  it('applies the filter and reuses the output array', () => {
+    const items: Item[] = [
+      { id: 'a', score: 10, weight: 1 },
+      { id: 'b', score: 20, weight: 0 },
+      { id: 'c', score: 30, weight: 1 },
+    ]
+    const out: Item[] = [items[1], items[1], items[1], items[1]]
+    const result = selectTopK(items, 3, score, out, (item) => item.weight > 0)
+    expect(result).toBe(out)
+    expect(result.map((i) => i.id)).toEqual(['c', 'a'])
+  })
+})
+
+describe('WeightedSampler', () => {
+  const items: Item[] = [
+    { id: 'a', score: 0, weight: 1 },
+    { id: 'b', score: 0, weight: 0 },
+    { id: 'c', score: 0, weight: 3 },
+    { id: 'd', score: 0, weight: 1 },
+  ]
+
+  /** The expanded-array selection the sampler replaces */
+  const expand = (r: number) => {
+    const weighted: Item[] = []
+    for (const item of items) {
+      for (let i = 0; i < item.weight; i++) weighted.push(item)
+    }
+    return weighted[Math.floor(r * weighted.length)]
+  }
+
+  it('picks the same item as an expanded weighted array', () => {
+    for (let step = 0; step < 50; step++) {
+      const r = step / 50
+      const sampler = new WeightedSampler<Item>(() => r)
+      expect(sampler.sample(items, weight)).toBe(expand(r))
+    }
+  })
+
+  it('returns null when nothing has weight', () => {
+    const sampler = new WeightedSampler<Item>(() => 0.5)
+    expect(sampler.sample([], weight)).toBeNull()
+    expect(sampler.sample([items[1]], weight)).toBeNull()
+  })
+
+  it('grows past its initial capacity', () => {
+    const many: Item[] = Array.from({ length: 1000 }, (_, i) => ({
+      id: `p${i}`,
+      score: 0,
+      weight: i === 999 ? 1 : 0,
+    }))
+    const sampler = new WeightedSampler<Item>(() => 0.99)
+    expect(sampler.sample(many, weight)?.id).toBe('p999')
+    // Smaller inputs after growth still work
+    expect(sampler.sample(items, weight)).toBe(expand(0.99))
+  })
+})
@@ -0,0 +1,130 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import { PeerConnection } from '../../src/core/peer-connection'
+import { PeerCounters, sumPeerCounters } from '../../src/core/peer-counters'
+import { ITcpSocket } from '../../src/interfaces/socket'
+import { PeerWireProtocol, MessageType } from '../../src/protocol/wire-protocol'
+import { MockEngine } from '../utils/mock-engine'
+
+class MockSocket implements ITcpSocket {
+  public onDataCb: ((data: Uint8Array) => void) | null = null
+
+  send() {}
+
+  onData(cb: (data: Uint8Array) => void) {
+    this.onDataCb = cb
+  }
+
+  onClose() {}
+
+  onError() {}
+
+  close() {}
+
+  emitData(data: Uint8Array) {
+    this.onDataCb?.(data)
+  }
+}
+
+describe('PeerCounters', () => {
+  let engine: MockEngine
+  let engineCounters: PeerCounters
+  let torrentCounters: PeerCounters
+
+  const connect = () => {
+    const socket = new MockSocket()
+    const peer = new PeerConnection(engine, socket)
+    socket.emitData(PeerWireProtocol.createHandshake(new Uint8Array(20), new Uint8Array(20)))
+    return { socket, peer }
+  }
+
+  beforeEach(() => {
+    engine = new MockEngine()
+    engine.autoDrainBuffers = false
+    engineCounters = new PeerCounters()
+    torrentCounters = new PeerCounters(engineCounters)
+  })
+
+  it('adds current values on attach and removes them on detach', () => {
+    const { socket, peer } = connect()
+    socket.emitData(new Uint8Array(10))
+    peer.requestsPending = 3
+
+    peer.attachCounters(torrentCounters)
+    expect(torrentCounters.peers).toBe(1)
+    expect(torrentCounters.bufferedBytes).toBe(10)
+    expect(torrentCounters.requestsPending).toBe(3)
+    expect(torrentCounters.pipelineDepth).toBe(peer.pipelineDepth)
+
+    // Attaching again is a no-op
+    peer.attachCounters(torrentCounters)
+    expect(torrentCounters.peers).toBe(1)
+
+    peer.detachCounters()
+    expect(engineCounters.diff(sumPeerCounters([]))).toEqual([])
+    // Detached peers no longer report
+    peer.requestsPending = 7
+    expect(engineCounters.requestsPending).toBe(0)
+  })
+
+  it('tracks buffered bytes through receive and drain', () => {
+    const { socket, peer } = connect()
+    peer.attachCounters(torrentCounters)
+
+    // Half of an UNCHOKE message stays buffered
+    const unchoke = PeerWireProtocol.createMessage(MessageType.UNCHOKE)
+    socket.emitData(unchoke.subarray(0, 3))
+    expect(torrentCounters.bufferedBytes).toBe(3)
+    expect(engineCounters.bufferedBytes).toBe(3)
+
+    peer.drainBuffer()
+    expect(torrentCounters.bufferedBytes).toBe(3)
+
+    socket.emitData(unchoke.subarray(3))
+    expect(engineCounters.bufferedBytes).toBe(unchoke.length)
+    peer.drainBuffer()
+    expect(peer.peerChoking).toBe(false)
+    expect(engineCounters.bufferedBytes).toBe(0)
+  })
+
+  it('tracks requests, pipeline depth and queued sends', () => {
+    const { peer } = connect()
+    peer.attachCounters(torrentCounters)
+    const depth = peer.pipelineDepth
+
+    peer.requestsPending += 5
+    peer.requestsPending--
+    peer.pipelineDepth = depth + 50
+    expect(engineCounters.requestsPending).toBe(4)
+    expect(engineCounters.pipelineDepth).toBe(depth + 50)
+
+    peer.sendMessage(MessageType.INTERESTED)
+    expect(engineCounters.queuedSendBytes).toBe(5)
+    peer.flush()
+    expect(engineCounters.queuedSendBytes).toBe(0)
+
+    peer.sendMessage(MessageType.INTERESTED)
+    peer.getQueuedData()
+    expect(engineCounters.queuedSendBytes).toBe(0)
+  })
+
+  it('matches a recount across peers', () => {
+    const peers = [connect(), connect(), connect()]
+    peers.forEach(({ peer }) => peer.attachCounters(torrentCounters))
+    peers[0].socket.emitData(new Uint8Array(7))
+    peers[1].peer.requestsPending = 12
+    peers[2].peer.sendMessage(MessageType.NOT_INTERESTED)
+    peers[1].peer.detachCounters()
+
+    const attached = [peers[0].peer, peers[2].peer]
+    expect(torrentCounters.diff(sumPeerCounters(attached))).toEqual([])
+    expect(engineCounters.diff(sumPeerCounters(attached))).toEqual([])
+
+    // Peers the counters don't know about show up as mismatches
+    const depth = peers[0].peer.pipelineDepth
+    expect(torrentCounters.diff(sumPeerCounters(peers.map((p) => p.peer)))).toEqual([
+      'requestsPending: counted 0, actual 12',
+      `pipelineDepth: counted ${2 * depth}, actual ${3 * depth}`,
+      'peers: counted 2, actual 3',
+    ])
+  })
+})
@@ -0,0 +1,174 @@
+import { describe, it, expect, beforeEach, afterEach, vi } from 'vitest'
+import { Swarm, SwarmPeer, addressKey } from '../../src/core/swarm'
+import { PeerSelector } from '../../src/core/peer-selector'
+import type { Logger } from '../../src/logging/logger'
+
+function createMockLogger(): Logger {
+  return {
+    debug: vi.fn(),
+    info: vi.fn(),
+    warn: vi.fn(),
+    error: vi.fn(),
+  }
+}
+
+describe('PeerSelector', () => {
+  let swarm: Swarm
+  let selector: PeerSelector
+  let random: ReturnType<typeof vi.spyOn>
+
+  const keys = (peers: SwarmPeer[]) => peers.map((p) => addressKey(p))
+
+  beforeEach(() => {
+    vi.useFakeTimers()
+    // No jitter, so order depends only on the heuristics
+    random = vi.spyOn(Math, 'random').mockReturnValue(0)
+    swarm = new Swarm(createMockLogger())
+    selector = new PeerSelector(swarm)
+  })
+
+  afterEach(() => {
+    random.mockRestore()
+    vi.useRealTimers()
+  })
+
+  it('returns the best scored peers first', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 6881, family: 'ipv4' }, 'dht')
+    swarm.addPeer({ ip: '10.0.0.2', port: 6881, family: 'ipv4' }, 'manual')
+    swarm.addPeer({ ip: '10.0.0.3', port: 6881, family: 'ipv4' }, 'tracker')
+
+    expect(keys(selector.getConnectablePeers(2))).toEqual(['10.0.0.2:6881', '10.0.0.3:6881'])
+    // Selection doesn't consume candidates
+    expect(keys(selector.getConnectablePeers(10))).toEqual([
+      '10.0.0.2:6881',
+      '10.0.0.3:6881',
+      '10.0.0.1:6881',
+    ])
+  })
+
+  it('picks up peers created before the selector', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 6881, family: 'ipv4' }, 'tracker')
+    const late = new PeerSelector(swarm)
+    expect(keys(late.getConnectablePeers(5))).toEqual(['10.0.0.1:6881'])
+  })
+
+  it('follows connection state changes', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 6881, family: 'ipv4' }, 'tracker')
+    const key = '10.0.0.1:6881'
+
+    swarm.markConnecting(key)
+    expect(selector.hasConnectablePeers()).toBe(false)
+
+    swarm.markConnectAborted(key)
+    expect(keys(selector.getConnectablePeers(5))).toEqual([key])
+
+    swarm.markConnecting(key)
+    swarm.markConnected(key, { downloaded: 0, uploaded: 0, close: vi.fn() } as never)
+    expect(selector.getConnectablePeers(5)).toHaveLength(0)
+
+    swarm.ban(key, 'corrupt data')
+    expect(selector.getConnectablePeers(5)).toHaveLength(0)
+  })
+
+  it('returns failed peers once their backoff expires', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 6881, family: 'ipv4' }, 'tracker')
+    const key = '10.0.0.1:6881'
+    swarm.markConnecting(key)
+    swarm.markConnectFailed(key, 'refused')
+
+    // One failure: 2s backoff
+    vi.advanceTimersByTime(1900)
+    expect(selector.hasConnectablePeers()).toBe(false)
+    vi.advanceTimersByTime(200)
+    expect(keys(selector.getConnectablePeers(5))).toEqual([key])
+  })
+
+  it('rescores peers as the recent-attempt penalty lapses', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 6881, family: 'ipv4' }, 'manual')
+    swarm.addPeer({ ip: '10.0.0.2', port: 6881, family: 'ipv4' }, 'tracker')
+    swarm.markConnecting('10.0.0.1:6881')
+    swarm.markConnectAborted('10.0.0.1:6881')
+
+    // manual 120 - 30 (attempted just now) < tracker 110
+    expect(keys(selector.getConnectablePeers(1))).toEqual(['10.0.0.2:6881'])
+    vi.advanceTimersByTime(31_000)
+    expect(keys(selector.getConnectablePeers(1))).toEqual(['10.0.0.2:6881'])
+    vi.advanceTimersByTime(30_000)
+    expect(keys(selector.getConnectablePeers(1))).toEqual(['10.0.0.1:6881'])
+  })
+
+  it('returns suspicious ports only after all other candidates', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 22, family: 'ipv4' }, 'manual')
+    swarm.addPeer({ ip: '10.0.0.2', port: 6881, family: 'ipv4' }, 'dht')
+
+    expect(keys(selector.getConnectablePeers(1))).toEqual(['10.0.0.2:6881'])
+    expect(keys(selector.getConnectablePeers(5))).toEqual(['10.0.0.2:6881', '10.0.0.1:22'])
+  })
+
+  it('forgets removed peers', () => {
+    swarm.addPeer({ ip: '10.0.0.1', port: 6881, family: 'ipv4' }, 'tracker')
+    swarm.addPeer({ ip: '10.0.0.2', port: 6881, family: 'ipv4' }, 'tracker')
+    selector.getConnectablePeers(5)
+
+    swarm.pruneForSeeding()
+    expect(selector.hasConnectablePeers()).toBe(false)
+
+    swarm.addPeer({ ip: '10.0.0.3', port: 6881, family: 'ipv4' }, 'tracker')
+    swarm.clear()
+    expect(selector.hasConnectablePeers()).toBe(false)
+  })
+
+  it('matches a full scan through random state churn', () => {
+    const all: string[] = []
+    for (let i = 0; i < 200; i++) {
+      const port = i % 17 === 0 ? 22 : 6881
+      swarm.addPeer({ ip: `10.0.${i >> 8}.${i & 255}`, port, family: 'ipv4' }, 'tracker')
+      all.push(addressKey({ ip: `10.0.${i >> 8}.${i & 255}`, port, family: 'ipv4' }))
+    }
+
+    // Deterministic pseudo-random walk over peer states
+    let seed = 1
+    const next = (n: number) => {
+      seed = (seed * 1103515245 + 12345) & 0x7fffffff
+      return seed % n
+    }
+    const eligible = () => {
+      const now = Date.now()
+      return all.filter((key) => {
+        const peer = swarm.getPeerByKey(key)!
+        if (peer.state !== 'idle' && peer.state !== 'failed') return false
+        if (peer.state === 'failed' && peer.lastConnectAttempt) {
+          const backoff = Math.min(1000 * 2 ** peer.connectFailures, 300_000)
+          if (now - peer.lastConnectAttempt < backoff) return false
+        }
+        if (peer.state === 'idle' && peer.quickDisconnects > 0 && peer.lastDisconnect) {
+          const backoff = Math.min(1000 * 2 ** peer.quickDisconnects, 300_000)
+          if (now - peer.lastDisconnect < backoff) return false
+        }
+        return true
+      })
+    }
+
+    for (let round = 0; round < 50; round++) {
+      for (let op = 0; op < 20; op++) {
+        const key = all[next(all.length)]
+        const peer = swarm.getPeerByKey(key)!
+        if (peer.state === 'connecting') {
+          if (next(2)) swarm.markConnected(key, { downloaded: 0, uploaded: 0 } as never)
+          else swarm.markConnectFailed(key, 'timeout')
+        } else if (peer.state === 'connected') {
+          swarm.markDisconnected(key)
+        } else if (peer.state !== 'banned') {
+          if (next(20) === 0) swarm.ban(key, 'slow')
+          else swarm.markConnecting(key)
+        }
+      }
+      vi.advanceTimersByTime(next(3000))
+
+      const expected = eligible()
+      const selected = keys(selector.getConnectablePeers(all.length))
+      expect([...selected].sort()).toEqual([...expected].sort())
+      expect(selector.hasConnectablePeers()).toBe(expected.length > 0)
+    }
+  })
+})
@@ -1,5 +1,6 @@
 import { describe, it, expect, beforeEach } from 'vitest'
 import { BtEngine } from '../../src/core/bt-engine'
+import type { TorrentBandwidthLimits } from '../../src/core/torrent'
 import { MemorySocketFactory } from '../../src/adapters/memory'
 import { InMemoryFileSystem } from '../../src/adapters/memory'
 import { TorrentCreator } from '../../src/core/torrent-creator'
@@ -26,35 +27,37 @@ describe('Rate Limiting Integration', () => {
   })
 
   describe('BandwidthTracker rate limit API', () => {
-    it('exposes download and upload token buckets', () => {
-      expect(seeder.bandwidthTracker.downloadBucket).toBeDefined()
-      expect(seeder.bandwidthTracker.uploadBucket).toBeDefined()
+    it('exposes download and upload schedulers', () => {
+      expect(seeder.bandwidthTracker.downloadScheduler).toBeDefined()
+      expect(seeder.bandwidthTracker.uploadScheduler).toBeDefined()
     })
 
-    it('setDownloadLimit updates the bucket', () => {
+    it('setDownloadLimit updates the scheduler', () => {
       seeder.bandwidthTracker.setDownloadLimit(100000)
       expect(seeder.bandwidthTracker.getDownloadLimit()).toBe(100000)
-      expect(seeder.bandwidthTracker.downloadBucket.isLimited).toBe(true)
+      expect(seeder.bandwidthTracker.downloadScheduler.root.isLimited).toBe(true)
     })
 
-    it('setUploadLimit updates the bucket', () => {
+    it('setUploadLimit updates the scheduler', () => {
       seeder.bandwidthTracker.setUploadLimit(50000)
       expect(seeder.bandwidthTracker.getUploadLimit()).toBe(50000)
-      expect(seeder.bandwidthTracker.uploadBucket.isLimited).toBe(true)
+      expect(seeder.bandwidthTracker.uploadScheduler.root.isLimited).toBe(true)
     })
 
     it('setting limit to 0 disables rate limiting', () => {
       seeder.bandwidthTracker.setDownloadLimit(100000)
-      expect(seeder.bandwidthTracker.downloadBucket.isLimited).toBe(true)
+      expect(seeder.bandwidthTracker.downloadScheduler.root.isLimited).toBe(true)
 
       seeder.bandwidthTracker.setDownloadLimit(0)
-      expect(seeder.bandwidthTracker.downloadBucket.isLimited).toBe(false)
+      expect(seeder.bandwidthTracker.downloadScheduler.root.isLimited).toBe(false)
     })
 
-    it('unlimited buckets always allow consumption', () => {
+    it('unlimited schedulers always allow consumption', () => {
       // Default is unlimited
-      expect(seeder.bandwidthTracker.downloadBucket.tryConsume(1_000_000)).toBe(true)
-      expect(seeder.bandwidthTracker.uploadBucket.tryConsume(1_000_000)).toBe(true)
+      const download = seeder.bandwidthTracker.downloadScheduler.createClass()
+      const upload = seeder.bandwidthTracker.uploadScheduler.createClass()
+      expect(download.tryConsume(1_000_000)).toBe(true)
+      expect(upload.tryConsume(1_000_000)).toBe(true)
     })
   })
 
@@ -126,54 +129,117 @@ describe('Rate Limiting Integration', () => {
   })
 
   describe('download rate limit retry mechanism', () => {
-    it('rate limiting API is exposed on bandwidth tracker', () => {
+    it('rate limiting API is exposed on the torrent bandwidth class', () => {
       // Verify the API used by the retry mechanism is available
       leecher.bandwidthTracker.setDownloadLimit(16384)
-      const bucket = leecher.bandwidthTracker.downloadBucket
+      const cls = leecher.bandwidthTracker.downloadScheduler.createClass()
 
-      expect(bucket.isLimited).toBe(true)
-      expect(bucket.refillRate).toBe(16384)
-      expect(bucket.capacity).toBe(32768) // 2x burst
-      expect(typeof bucket.msUntilAvailable).toBe('function')
-      expect(typeof bucket.tryConsume).toBe('function')
+      expect(cls.isLimited).toBe(true)
+      expect(cls.effectiveLimit).toBe(16384)
+      expect(typeof cls.msUntilAvailable).toBe('function')
+      expect(typeof cls.tryConsume).toBe('function')
     })
 
-    it('msUntilAvailable returns correct delay when bucket is empty', () => {
+    it('msUntilAvailable returns correct delay when the source is empty', () => {
       // Set 1KB/s limit
       leecher.bandwidthTracker.setDownloadLimit(1024)
-      const bucket = leecher.bandwidthTracker.downloadBucket
+      const cls = leecher.bandwidthTracker.downloadScheduler.createClass()
 
-      expect(bucket.capacity).toBe(2048)
-
-      // Bucket starts empty when transitioning from unlimited
+      // The source starts empty when transitioning from unlimited
       // At 1024 bytes/sec, waiting for 1024 bytes = ~1000ms (allow timing variance)
-      const delay1024 = bucket.msUntilAvailable(1024)
+      const delay1024 = cls.msUntilAvailable(1024)
       expect(delay1024).toBeGreaterThan(990)
       expect(delay1024).toBeLessThanOrEqual(1000)
 
       // Waiting for 512 bytes = ~500ms
-      const delay512 = bucket.msUntilAvailable(512)
+      const delay512 = cls.msUntilAvailable(512)
       expect(delay512).toBeGreaterThan(490)
       expect(delay512).toBeLessThanOrEqual(500)
     })
 
     it('tryConsume returns false when insufficient tokens', () => {
       leecher.bandwidthTracker.setDownloadLimit(16384) // 16KB/sec
-      const bucket = leecher.bandwidthTracker.downloadBucket
+      const cls = leecher.bandwidthTracker.downloadScheduler.createClass()
 
-      // Bucket starts empty when first limited, so tryConsume should fail
-      expect(bucket.tryConsume(16384)).toBe(false)
+      // The source starts empty when first limited, so tryConsume should fail
+      expect(cls.tryConsume(16384)).toBe(false)
 
       // Delay should be approximately 1 second (may be slightly less due to elapsed time)
-      const delay = bucket.msUntilAvailable(16384)
+      const delay = cls.msUntilAvailable(16384)
       expect(delay).toBeGreaterThan(900)
       expect(delay).toBeLessThanOrEqual(1000)
     })
 
-    it('unlimited bucket always allows consumption', () => {
+    it('unlimited class always allows consumption', () => {
       // Default is unlimited
-      expect(leecher.bandwidthTracker.downloadBucket.isLimited).toBe(false)
-      expect(leecher.bandwidthTracker.downloadBucket.tryConsume(1_000_000)).toBe(true)
+      const cls = leecher.bandwidthTracker.downloadScheduler.createClass()
+      expect(cls.isLimited).toBe(false)
+      expect(cls.tryConsume(1_000_000)).toBe(true)
+    })
+  })
+
+  describe('per-torrent bandwidth limits', () => {
+    const infoHash = 'abababababababababababababababababababab'
+
+    it('defaults to no cap and weight 1', async () => {
+      const { torrent } = await leecher.addTorrent(`magnet:?xt=urn:btih:${infoHash}`)
+      if (!torrent) throw new Error('Failed to add torrent')
+
+      expect(torrent.bandwidthLimits).toEqual({ downloadLimit: 0, uploadLimit: 0, weight: 1 })
+    })
+
+    it('setBandwidthLimits updates only the given fields and persists them', async () => {
+      const { torrent } = await leecher.addTorrent(`magnet:?xt=urn:btih:${infoHash}`)
+      if (!torrent) throw new Error('Failed to add torrent')
+
+      torrent.setBandwidthLimits({ downloadLimit: 8192, weight: 2 })
+      torrent.setBandwidthLimits({ uploadLimit: 4096 })
+      expect(torrent.bandwidthLimits).toEqual({
+        downloadLimit: 8192,
+        uploadLimit: 4096,
+        weight: 2,
+      })
+
+      await leecher.sessionPersistence.saveTorrentState(torrent)
+      const state = await leecher.sessionPersistence.loadTorrentState(infoHash)
+      expect(state!.downloadLimit).toBe(8192)
+      expect(state!.uploadLimit).toBe(4096)
+      expect(state!.bandwidthWeight).toBe(2)
+    })
+
+    it('setBandwidthLimits rejects invalid values without applying any', async () => {
+      const { torrent } = await leecher.addTorrent(`magnet:?xt=urn:btih:${infoHash}`)
+      if (!torrent) throw new Error('Failed to add torrent')
+
+      torrent.setBandwidthLimits({ downloadLimit: 8192, uploadLimit: 0, weight: 2 })
+      const invalid: unknown[] = [
+        { downloadLimit: -1 },
+        { uploadLimit: NaN },
+        { downloadLimit: Infinity },
+        { uploadLimit: '4096' },
+        { weight: 0 },
+        { weight: -2 },
+        { downloadLimit: 1024, weight: NaN },
+      ]
+      for (const limits of invalid) {
+        expect(() => torrent.setBandwidthLimits(limits as TorrentBandwidthLimits)).toThrow(
+          'InvalidParameter',
+        )
+      }
+      expect(torrent.bandwidthLimits).toEqual({ downloadLimit: 8192, uploadLimit: 0, weight: 2 })
+    })
+
+    it('effective limit is the tighter of the torrent and global caps', () => {
+      const scheduler = leecher.bandwidthTracker.downloadScheduler
+      const cls = scheduler.createClass({ rateLimit: 8192 })
+      expect(cls.effectiveLimit).toBe(8192)
+
+      leecher.bandwidthTracker.setDownloadLimit(4096)
+      expect(cls.effectiveLimit).toBe(4096)
+
+      leecher.bandwidthTracker.setDownloadLimit(0)
+      cls.setLimit(0)
+      expect(cls.effectiveLimit).toBe(0)
     })
   })
 })
@@ -0,0 +1,73 @@
+import { describe, it, expect } from 'vitest'
+import { SlabAllocator, MIN_SLAB_SIZE, MAX_SLAB_SIZE } from '../../src/core/slab-allocator'
+
+describe('SlabAllocator', () => {
+  it('should round requests up to power-of-two size classes', () => {
+    expect(SlabAllocator.classSize(1)).toBe(MIN_SLAB_SIZE)
+    expect(SlabAllocator.classSize(16384)).toBe(16384)
+    expect(SlabAllocator.classSize(16385)).toBe(32768)
+    expect(SlabAllocator.classSize(MAX_SLAB_SIZE)).toBe(MAX_SLAB_SIZE)
+    expect(SlabAllocator.classSize(MAX_SLAB_SIZE + 1)).toBe(0)
+  })
+
+  it('should reuse released slabs across lengths in the same class', () => {
+    const allocator = new SlabAllocator()
+    const piece = allocator.acquire(256 * 1024)
+    allocator.release(piece)
+
+    // A shorter last piece of another torrent reuses the same slab
+    const lastPiece = allocator.acquire(200_000)
+    expect(lastPiece.length).toBe(200_000)
+    expect(lastPiece.buffer).toBe(piece.buffer)
+
+    allocator.release(lastPiece)
+    expect(allocator.acquire(256 * 1024).buffer).toBe(piece.buffer)
+
+    const stats = allocator.getStats()
+    expect(stats.allocations).toBe(3)
+    expect(stats.hits).toBe(2)
+    expect(stats.misses).toBe(1)
+    expect(stats.pooledBytes).toBe(0)
+  })
+
+  it('should keep idle bytes within the budget', () => {
+    const allocator = new SlabAllocator(3 * 64 * 1024)
+    const buffers = Array.from({ length: 5 }, () => allocator.acquire(64 * 1024))
+    for (const buffer of buffers) allocator.release(buffer)
+
+    const stats = allocator.getStats()
+    expect(stats.pooledBuffers).toBe(3)
+    expect(stats.pooledBytes).toBe(3 * 64 * 1024)
+    expect(stats.dropped).toBe(2)
+  })
+
+  it('should ignore foreign, oversize and double releases', () => {
+    const allocator = new SlabAllocator()
+    allocator.release(new Uint8Array(new ArrayBuffer(64 * 1024), 16 * 1024, 16 * 1024))
+    allocator.release(new Uint8Array(100_000))
+    allocator.release(allocator.acquire(MAX_SLAB_SIZE + 1))
+
+    const buffer = allocator.acquire(MIN_SLAB_SIZE)
+    allocator.release(buffer)
+    allocator.release(buffer)
+
+    const stats = allocator.getStats()
+    expect(stats.pooledBuffers).toBe(1)
+    expect(stats.dropped).toBe(4)
+  })
+
+  it('should trim largest classes first', () => {
+    const allocator = new SlabAllocator()
+    const small = allocator.acquire(MIN_SLAB_SIZE)
+    const large = allocator.acquire(1024 * 1024)
+    allocator.release(small)
+    allocator.release(large)
+
+    expect(allocator.trim(MIN_SLAB_SIZE)).toBe(1024 * 1024)
+    expect(allocator.memoryBytes).toBe(MIN_SLAB_SIZE)
+    expect(allocator.acquire(MIN_SLAB_SIZE)).toBe(small)
+
+    expect(allocator.trim()).toBe(0)
+    expect(allocator.getStats().trimmed).toBe(1)
+  })
+})
@@ -0,0 +1,163 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import { TickScheduler, type SchedulableTorrent } from '../../src/core/tick-scheduler'
+import type { TickResult } from '../../src/core/torrent-tick-loop'
+
+let clock = 0
+let order: string[] = []
+
+class FakeTorrent implements SchedulableTorrent {
+  isActive = true
+  isComplete = false
+  pendingIo = false
+  /** Simulated tick duration in ms */
+  cost = 1
+  /** Reported download work */
+  busy = true
+  ticks = 0
+
+  constructor(public name: string) {}
+
+  hasPendingIo(): boolean {
+    return this.pendingIo
+  }
+
+  tick(): TickResult {
+    this.ticks++
+    order.push(this.name)
+    clock += this.cost
+    const work = this.busy ? 1 : 0
+    return {
+      blocksRecv: work,
+      blocksSent: work,
+      elapsedMs: this.cost,
+      activePieces: work,
+      connectedPeers: 1,
+      bufferedBytes: 0,
+      pipelineFilled: 0,
+      pipelineMax: 0,
+    }
+  }
+}
+
+function makeTorrents(count: number): FakeTorrent[] {
+  return Array.from({ length: count }, (_, i) => new FakeTorrent(`t${i}`))
+}
+
+describe('TickScheduler', () => {
+  let scheduler: TickScheduler<FakeTorrent>
+
+  const run = (torrents: FakeTorrent[]) => {
+    order = []
+    return scheduler.run(torrents, () => {})
+  }
+
+  beforeEach(() => {
+    clock = 0
+    scheduler = new TickScheduler<FakeTorrent>({
+      budgetMs: 10,
+      idleTickInterval: 4,
+      now: () => clock,
+    })
+  })
+
+  it('ticks every active torrent when the budget allows', () => {
+    const torrents = makeTorrents(3)
+    torrents[1].isActive = false
+
+    const result = run(torrents)
+    expect(order).toEqual(['t0', 't2'])
+    expect(result).toEqual({ torrentsTicked: 2, torrentsDeferred: 0, overruns: 0, overrunMs: 0 })
+  })
+
+  it('passes results to the callback', () => {
+    const results: TickResult[] = []
+    scheduler.run(makeTorrents(2), (r) => results.push(r))
+    expect(results).toHaveLength(2)
+  })
+
+  it('rotates the starting torrent', () => {
+    const torrents = makeTorrents(3)
+    run(torrents)
+    expect(order).toEqual(['t0', 't1', 't2'])
+    run(torrents)
+    expect(order).toEqual(['t1', 't2', 't0'])
+    run(torrents)
+    expect(order).toEqual(['t2', 't0', 't1'])
+  })
+
+  it('defers torrents past the deadline and runs them first next tick', () => {
+    const torrents = makeTorrents(4)
+    torrents[0].cost = 12
+
+    const result = run(torrents)
+    // The first torrent always runs, even past the deadline
+    expect(order).toEqual(['t0'])
+    expect(result.torrentsDeferred).toBe(3)
+    expect(result.overruns).toBe(1)
+    expect(result.overrunMs).toBe(12 - 10 / 4)
+
+    torrents[0].cost = 1
+    run(torrents)
+    // Deferred torrents first, the overrunning one last
+    expect(order).toEqual(['t1', 't2', 't3', 't0'])
+  })
+
+  it('runs torrents paying back an overrun after the others', () => {
+    const torrents = makeTorrents(3)
+    torrents[1].cost = 5
+    run(torrents)
+    expect(order).toEqual(['t0', 't1', 't2'])
+
+    torrents[1].cost = 1
+    run(torrents)
+    // t1 used 5ms of a 3.3ms slice; it runs last despite the rotation
+    expect(order).toEqual(['t2', 't0', 't1'])
+  })
+
+  it('reports overruns against the per-torrent slice', () => {
+    const torrents = makeTorrents(2)
+    torrents[0].cost = 6
+    const result = run(torrents)
+    expect(result.overruns).toBe(1)
+    expect(result.overrunMs).toBe(1)
+    expect(result.torrentsDeferred).toBe(0)
+  })
+
+  it('ticks idle and complete torrents at a lower rate', () => {
+    const [busy, idle, complete] = makeTorrents(3)
+    idle.busy = false
+    complete.isComplete = true
+    const torrents = [busy, idle, complete]
+
+    for (let i = 0; i < 9; i++) run(torrents)
+    expect(busy.ticks).toBe(9)
+    // First tick, then every 4th (ticks 1, 5 and 9)
+    expect(idle.ticks).toBe(3)
+    expect(complete.ticks).toBe(3)
+  })
+
+  it('ticks low-rate torrents whenever peers have I/O pending', () => {
+    const torrents = makeTorrents(1)
+    torrents[0].isComplete = true
+    run(torrents)
+    run(torrents)
+    expect(torrents[0].ticks).toBe(1)
+
+    torrents[0].pendingIo = true
+    run(torrents)
+    expect(torrents[0].ticks).toBe(2)
+  })
+
+  it('returns to full rate once an idle torrent does work', () => {
+    const torrents = makeTorrents(1)
+    torrents[0].busy = false
+    run(torrents)
+    torrents[0].busy = true
+    torrents[0].pendingIo = true
+    run(torrents)
+    torrents[0].pendingIo = false
+    run(torrents)
+    run(torrents)
+    expect(torrents[0].ticks).toBe(4)
+  })
+})
@@ -136,4 +136,154 @@ describe('TorrentCreator', () => {
     const torrent = Bencode.decode(torrentData)
     expect(torrent.info.private).toBe(1)
   })
+
+  describe('v2 and hybrid', () => {
+    const BLOCK = 16 * 1024
+    const decoder = new TextDecoder()
+    const sha256 = (data: Uint8Array) => hasher.sha256!(data)
+    const pairHash = async (a: Uint8Array, b: Uint8Array) => sha256(Buffer.concat([a, b]))
+
+    const fill = (length: number, seed: number) =>
+      Uint8Array.from({ length }, (_, i) => (i * 31 + seed) & 0xff)
+
+    it('creates a hybrid torrent with pad files and per-file merkle roots', async () => {
+      const big = fill(BLOCK + 3000, 1)
+      const small = fill(5, 2)
+      // Inserted out of order; v2 sorts files by path
+      fs.files.set('/dir/b.bin', small)
+      fs.files.set('/dir/a.bin', big)
+
+      const torrentData = await TorrentCreator.create(storage, '/dir', hasher, {
+        pieceLength: BLOCK,
+        version: 'hybrid',
+      })
+      const torrent = Bencode.decode(torrentData)
+      const info = torrent.info
+
+      expect(info['meta version']).toBe(2)
+      const files = (info.files as { length: number; path: Uint8Array[]; attr?: Uint8Array }[]).map(
+        (f) => ({
+          length: f.length,
+          path: f.path.map((p) => decoder.decode(p)).join('/'),
+          attr: f.attr && decoder.decode(f.attr),
+        }),
+      )
+      expect(files).toEqual([
+        { length: big.length, path: 'a.bin', attr: undefined },
+        { length: BLOCK - 3000, path: `.pad/${BLOCK - 3000}`, attr: 'p' },
+        { length: 5, path: 'b.bin', attr: undefined },
+      ])
+
+      // v1 pieces are aligned to files; a.bin's last piece is hashed with its padding
+      const padded = new Uint8Array(BLOCK)
+      padded.set(big.subarray(BLOCK))
+      const expectedPieces = Buffer.concat([
+        await hasher.sha1(big.subarray(0, BLOCK)),
+        await hasher.sha1(padded),
+        await hasher.sha1(small),
+      ])
+      expect(Buffer.compare(info.pieces, expectedPieces)).toBe(0)
+
+      // a.bin spans two pieces of one block each: root over the piece layer
+      const layer = [await sha256(big.subarray(0, BLOCK)), await sha256(big.subarray(BLOCK))]
+      const rootA = await pairHash(layer[0], layer[1])
+      const tree = info['file tree']
+      expect(tree['a.bin'][''].length).toBe(big.length)
+      expect(Buffer.compare(tree['a.bin']['']['pieces root'], rootA)).toBe(0)
+      expect(Buffer.compare(tree['b.bin']['']['pieces root'], await sha256(small))).toBe(0)
+
+      // Only files longer than a piece have a piece layer
+      const layers = torrent['piece layers'] as Record<string, Uint8Array>
+      expect(Object.keys(layers)).toHaveLength(1)
+      expect(Buffer.compare(Object.values(layers)[0], Buffer.concat(layer))).toBe(0)
+    })
+
+    it('writes one piece layer for identical files', async () => {
+      const content = fill(2 * BLOCK, 4)
+      fs.files.set('/dir/a.bin', content)
+      fs.files.set('/dir/b.bin', content.slice())
+
+      const torrentData = await TorrentCreator.create(storage, '/dir', hasher, {
+        pieceLength: BLOCK,
+        version: 'v2',
+      })
+      const torrent = Bencode.decode(torrentData)
+      const tree = torrent.info['file tree']
+      const root = Buffer.from(tree['a.bin']['']['pieces root'])
+      expect(Buffer.compare(tree['b.bin']['']['pieces root'], root)).toBe(0)
+
+      // The root appears in both file entries and as a single piece layers key
+      // (decoding would silently collapse a duplicate key, so count the bytes)
+      const raw = Buffer.from(torrentData)
+      let count = 0
+      for (let i = raw.indexOf(root); i >= 0; i = raw.indexOf(root, i + 1)) count++
+      expect(count).toBe(3)
+    })
+
+    it('creates a v2-only single file torrent', async () => {
+      // Three blocks in one piece: leaves are padded with zero hashes to four
+      const content = fill(2 * BLOCK + 100, 3)
+      fs.files.set('/single.bin', content)
+
+      const torrentData = await TorrentCreator.create(storage, '/single.bin', hasher, {
+        pieceLength: 4 * BLOCK,
+        version: 'v2',
+      })
+      const info = Bencode.decode(torrentData).info
+      expect(info.pieces).toBeUndefined()
+      expect(info.length).toBeUndefined()
+
+      const leaves = [
+        await sha256(content.subarray(0, BLOCK)),
+        await sha256(content.subarray(BLOCK, 2 * BLOCK)),
+        await sha256(content.subarray(2 * BLOCK)),
+        new Uint8Array(32),
+      ]
+      const root = await pairHash(
+        await pairHash(leaves[0], leaves[1]),
+        await pairHash(leaves[2], leaves[3]),
+      )
+      const entry = info['file tree']['single.bin']['']
+      expect(entry.length).toBe(content.length)
+      expect(Buffer.compare(entry['pieces root'], root)).toBe(0)
+    })
+
+    it('rejects v2 piece lengths that are not a power of two', async () => {
+      fs.files.set('/x.bin', fill(10, 0))
+      await expect(
+        TorrentCreator.create(storage, '/x.bin', hasher, { pieceLength: 3 * BLOCK, version: 'v2' }),
+      ).rejects.toThrow(/power of two/)
+    })
+
+    it('rejects v2 with a hasher without SHA256', async () => {
+      fs.files.set('/x.bin', fill(10, 0))
+      const sha1Only: IHasher = { sha1: (data) => hasher.sha1(data) }
+      await expect(
+        TorrentCreator.create(storage, '/x.bin', sha1Only, { version: 'hybrid' }),
+      ).rejects.toThrow(/SHA256/)
+    })
+  })
+
+  it('reports progress and matches sequential hashing with many pieces in flight', async () => {
+    const content = Uint8Array.from({ length: 1000 }, (_, i) => i & 0xff)
+    fs.files.set('/dir/one.bin', content.subarray(0, 333))
+    fs.files.set('/dir/two.bin', content.subarray(333))
+
+    const events: { bytesHashed: number; piecesHashed: number; totalPieces: number }[] = []
+    const torrentData = await TorrentCreator.create(storage, '/dir', hasher, {
+      pieceLength: 64,
+      hashConcurrency: 8,
+      onProgress: (p) => events.push(p),
+    })
+    const torrent = Bencode.decode(torrentData)
+
+    const expected: Uint8Array[] = []
+    for (let offset = 0; offset < content.length; offset += 64) {
+      expected.push(await hasher.sha1(content.slice(offset, offset + 64)))
+    }
+    expect(Buffer.compare(torrent.info.pieces, Buffer.concat(expected))).toBe(0)
+
+    expect(events).toHaveLength(16)
+    expect(events[15]).toMatchObject({ bytesHashed: 1000, piecesHashed: 16, totalPieces: 16 })
+  })
 })
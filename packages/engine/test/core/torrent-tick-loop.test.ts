@@ -0,0 +1,49 @@
+import { describe, it, expect, beforeEach, afterEach, vi } from 'vitest'
+import {
+  TorrentTickLoop,
+  TickLoopCallbacks,
+  CLEANUP_INTERVAL_MS,
+} from '../../src/core/torrent-tick-loop'
+import { PeerCounters } from '../../src/core/peer-counters'
+import { MockEngine } from '../utils/mock-engine'
+
+describe('TorrentTickLoop piece health cleanup', () => {
+  let partialValues: ReturnType<typeof vi.fn>
+  let loop: TorrentTickLoop
+
+  beforeEach(() => {
+    vi.useFakeTimers()
+    // cleanupStuckPieces() starts by scanning the partial pieces
+    partialValues = vi.fn(() => [])
+    const activePieces = { activeCount: 0, partialValues, fullyRequestedValues: () => [] }
+    const callbacks = {
+      isNetworkActive: () => true,
+      getConnectedPeers: () => [],
+      getPeerCounters: () => new PeerCounters(),
+      getActivePieces: () => activePieces,
+    } as unknown as TickLoopCallbacks
+    loop = new TorrentTickLoop(new MockEngine(), callbacks)
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+  })
+
+  it('runs on elapsed time, however rarely the torrent is ticked', () => {
+    // An idle torrent ticked once per 500ms still cleans up every tick
+    for (let i = 0; i < 4; i++) {
+      loop.tick()
+      vi.advanceTimersByTime(CLEANUP_INTERVAL_MS)
+    }
+    expect(partialValues).toHaveBeenCalledTimes(4)
+  })
+
+  it('does not run more often than the interval for busy torrents', () => {
+    for (let i = 0; i < 10; i++) {
+      loop.tick()
+      vi.advanceTimersByTime(100)
+    }
+    // t = 0 and t = 500
+    expect(partialValues).toHaveBeenCalledTimes(2)
+  })
+})
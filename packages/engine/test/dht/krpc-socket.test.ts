@@ -1,7 +1,7 @@
 /* eslint-disable @typescript-eslint/no-explicit-any */
 import { describe, it, expect, vi, beforeEach, afterEach } from 'vitest'
 import { KRPCSocket } from '../../src/dht/krpc-socket'
-import { IUdpSocket, ISocketFactory } from '../../src/interfaces/socket'
+import { IUdpSocket, ISocketFactory, UdpDatagram } from '../../src/interfaces/socket'
 import {
   encodePingQuery,
   encodePingResponse,
@@ -42,7 +42,7 @@ class MockUdpSocket implements IUdpSocket {
 
 // Mock Socket Factory
 class MockSocketFactory implements ISocketFactory {
-  public mockSocket = new MockUdpSocket()
+  public mockSocket: MockUdpSocket = new MockUdpSocket()
 
   async createTcpSocket(_host?: string, _port?: number): Promise<any> {
     return {}
@@ -248,3 +248,76 @@ describe('KRPCSocket', () => {
     })
   })
 })
+
+describe('KRPCSocket with a batching UDP socket', () => {
+  class BatchingMockUdpSocket extends MockUdpSocket {
+    public batches: UdpDatagram[][] = []
+    private batchCallback: ((datagrams: UdpDatagram[]) => void) | null = null
+
+    sendBatch(datagrams: UdpDatagram[]): void {
+      this.batches.push(datagrams)
+    }
+
+    onMessageBatch(cb: (datagrams: UdpDatagram[]) => void): void {
+      this.batchCallback = cb
+    }
+
+    emitBatch(datagrams: UdpDatagram[]): void {
+      this.batchCallback?.(datagrams)
+    }
+  }
+
+  let socket: BatchingMockUdpSocket
+  let krpcSocket: KRPCSocket
+
+  beforeEach(async () => {
+    const factory = new MockSocketFactory()
+    socket = new BatchingMockUdpSocket()
+    factory.mockSocket = socket
+    krpcSocket = new KRPCSocket(factory, { timeout: 1000 })
+    await krpcSocket.bind()
+  })
+
+  afterEach(() => {
+    krpcSocket.close()
+  })
+
+  it('handles every datagram of a received batch', () => {
+    const queryHandler = vi.fn()
+    krpcSocket.on('query', queryHandler)
+
+    const senderId = new Uint8Array(20).fill(0x33)
+    socket.emitBatch([
+      { addr: '10.0.0.1', port: 1001, data: encodePingQuery(new Uint8Array([1, 1]), senderId) },
+      { addr: '10.0.0.2', port: 1002, data: new Uint8Array([0xff]) },
+      { addr: '10.0.0.3', port: 1003, data: encodePingQuery(new Uint8Array([3, 3]), senderId) },
+    ])
+
+    expect(queryHandler).toHaveBeenCalledTimes(2)
+    expect(queryHandler.mock.calls[1][1]).toEqual({ host: '10.0.0.3', port: 1003 })
+  })
+
+  it('sends datagrams from the same task as one batch', async () => {
+    const nodeId = new Uint8Array(NODE_ID_BYTES).fill(0x11)
+    for (let i = 0; i < 3; i++) {
+      const tid = krpcSocket.generateTransactionId()
+      const query = encodePingQuery(tid, nodeId)
+      krpcSocket.query(`10.0.0.${i}`, 6881, query, tid, 'ping').catch(() => {})
+    }
+    krpcSocket.send('10.0.0.9', 6881, new Uint8Array([1]))
+    expect(socket.batches).toEqual([])
+    expect(socket.sentData).toEqual([])
+
+    await Promise.resolve()
+    expect(socket.batches.length).toBe(1)
+    expect(socket.batches[0].map((d) => d.addr)).toEqual([
+      '10.0.0.0',
+      '10.0.0.1',
+      '10.0.0.2',
+      '10.0.0.9',
+    ])
+    expect(krpcSocket.bytesSent).toBe(
+      socket.batches[0].reduce((sum, d) => sum + d.data.length, 0),
+    )
+  })
+})
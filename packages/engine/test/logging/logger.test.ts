@@ -9,6 +9,8 @@ import {
   withScopeAndFiltering,
   randomClientId,
   LogEntry,
+  LogStore,
+  ScopedLogEntry,
 } from '../../src/logging/logger'
 
 class TestClient implements ILoggingEngine {
@@ -141,3 +143,122 @@ describe('Logger System', () => {
     }
   })
 })
+
+describe('Scoped logger prefix', () => {
+  it('formats the prefix once and again only when the scope changes', () => {
+    const originalDebug = console.debug
+    const debugSpy = vi.fn()
+    console.debug = debugSpy
+
+    try {
+      const component = {
+        name: 'peer',
+        getLogName() {
+          return this.name
+        },
+        getStaticLogName: () => 'peer',
+        engineInstance: { clientId: 'abcdef123456' } as any,
+        peerId: undefined as string | undefined,
+      }
+      const entries: LogEntry[] = []
+      const scoped = withScopeAndFiltering(component, () => true, {
+        onCapture: (e) => entries.push(e),
+      })
+
+      scoped.debug('one')
+      scoped.debug('two')
+      expect(debugSpy.mock.calls[0][0]).toBe(debugSpy.mock.calls[1][0])
+
+      component.name = 'peer:1.2.3.4'
+      scoped.debug('three')
+      expect(debugSpy.mock.calls[2][0]).toBe('[Client[abcd]:peer:1.2.3.4]')
+
+      // Entries keep prefix and text apart until the message is read
+      const entry = entries[2] as ScopedLogEntry
+      expect(entry.text).toBe('three')
+      expect(entry.message).toBe('[Client[abcd]:peer:1.2.3.4] three')
+      expect(JSON.parse(JSON.stringify(entry)).message).toBe(entry.message)
+    } finally {
+      console.debug = originalDebug
+    }
+  })
+})
+
+describe('LogStore', () => {
+  const fill = (store: LogStore, levels: LogEntry['level'][]) =>
+    levels.forEach((level, i) => store.add(level, `m${i}`, [], i % 2 ? '[P]' : ''))
+
+  it('keeps the newest entries up to capacity', () => {
+    const store = new LogStore(4)
+    fill(store, ['debug', 'info', 'warn', 'error', 'info', 'debug'])
+
+    expect(store.size).toBe(4)
+    expect(store.lastId).toBe(5)
+    expect(store.getEntries().map((e) => e.id)).toEqual([2, 3, 4, 5])
+    expect(store.getEntries()[1].message).toBe('[P] m3')
+    expect(store.getEntries()[2].message).toBe('m4')
+  })
+
+  it('returns the newest entries at or above a level', () => {
+    const store = new LogStore(8)
+    fill(store, ['info', 'debug', 'error', 'warn', 'debug', 'info', 'warn'])
+
+    expect(store.query({ level: 'warn' }).map((e) => e.id)).toEqual([2, 3, 6])
+    expect(store.query({ level: 'info', limit: 2 }).map((e) => e.id)).toEqual([5, 6])
+    expect(store.query({ limit: 3 }).map((e) => e.id)).toEqual([4, 5, 6])
+    expect(store.query({ level: 'error', limit: 0 })).toEqual([])
+  })
+
+  it('pages forward from an after cursor', () => {
+    const store = new LogStore(8)
+    fill(store, ['info', 'debug', 'error', 'warn', 'debug', 'info', 'warn'])
+
+    expect(store.query({ level: 'info', after: 0, limit: 2 }).map((e) => e.id)).toEqual([2, 3])
+    expect(store.query({ level: 'info', after: 3 }).map((e) => e.id)).toEqual([5, 6])
+    expect(store.query({ after: 3, limit: 2 }).map((e) => e.id)).toEqual([4, 5])
+    expect(store.query({ after: store.lastId })).toEqual([])
+  })
+
+  it('skips level entries that have dropped out of the buffer', () => {
+    const store = new LogStore(3)
+    fill(store, ['error', 'debug', 'debug', 'debug', 'error'])
+
+    expect(store.query({ level: 'error' }).map((e) => e.id)).toEqual([4])
+    expect(store.query({ level: 'error', after: -1 }).map((e) => e.id)).toEqual([4])
+  })
+
+  it('notifies subscribers and clears without reusing ids', () => {
+    const store = new LogStore(4)
+    const seen: LogEntry[] = []
+    const unsubscribe = store.subscribe((e) => seen.push(e))
+    store.addEntry(new ScopedLogEntry(1234, 'warn', '[T]', 'hello', [1]))
+    unsubscribe()
+    store.add('info', 'unseen', [])
+
+    expect(seen).toEqual([
+      { id: 0, timestamp: 1234, level: 'warn', message: '[T] hello', args: [1] },
+    ])
+
+    store.clear()
+    expect(store.size).toBe(0)
+    expect(store.getEntries()).toEqual([])
+    store.add('info', 'after clear', [])
+    expect(store.getEntries()[0].id).toBe(2)
+  })
+
+  it('estimates memory from retained messages, bounded by capacity', () => {
+    const store = new LogStore(4)
+    const empty = store.memoryBytes
+    store.add('info', 'x'.repeat(1000), [])
+    const one = store.memoryBytes
+    expect(one - empty).toBeGreaterThanOrEqual(1000)
+
+    for (let i = 0; i < 8; i++) store.add('info', 'x'.repeat(1000), [])
+    const full = store.memoryBytes
+    // Overwritten messages are no longer counted
+    for (let i = 0; i < 8; i++) store.add('info', 'x'.repeat(1000), [])
+    expect(store.memoryBytes).toBe(full)
+    for (let i = 0; i < 4; i++) store.add('info', 'short', [])
+    expect(store.memoryBytes).toBeLessThan(one)
+  })
+})
@@ -0,0 +1,89 @@
+import { describe, it, expect } from 'vitest'
+import * as fs from 'fs'
+import * as os from 'os'
+import * as path from 'path'
+import type { Profiler } from 'inspector'
+import { CpuProfiler, summarizeCpuProfile } from '../../src/node-rpc/cpu-profiler'
+
+const frame = (functionName: string, lineNumber = 0) => ({
+  functionName,
+  scriptId: '1',
+  url: functionName ? 'file:///engine.js' : '',
+  lineNumber,
+  columnNumber: 0,
+})
+
+describe('summarizeCpuProfile', () => {
+  it('ranks functions by self time across their call sites', () => {
+    const profile: Profiler.Profile = {
+      nodes: [
+        { id: 1, callFrame: frame(''), children: [2, 3, 4] },
+        { id: 2, callFrame: frame('tick', 9) },
+        { id: 3, callFrame: frame('hash', 19) },
+        // Same function reached through another parent
+        { id: 4, callFrame: frame('tick', 9) },
+      ],
+      startTime: 0,
+      endTime: 10_000,
+      samples: [2, 3, 4, 2, 1],
+      // Gap before each sample; sample i lasts until sample i + 1
+      timeDeltas: [0, 1000, 3000, 2000, 4000],
+    }
+
+    const hotspots = summarizeCpuProfile(profile)
+    expect(hotspots.map((h) => [h.functionName, h.selfMs])).toEqual([
+      ['tick', 1 + 2 + 4],
+      ['hash', 3],
+      ['(anonymous)', 0],
+    ])
+    expect(hotspots[0].location).toBe('file:///engine.js:10')
+    expect(hotspots[0].selfPercent).toBeCloseTo(70)
+    expect(summarizeCpuProfile(profile, 1)).toHaveLength(1)
+  })
+
+  it('charges the last sample up to endTime and leaves out synthetic nodes', () => {
+    const profile: Profiler.Profile = {
+      nodes: [
+        { id: 1, callFrame: frame(''), children: [2, 3, 4, 5] },
+        { id: 2, callFrame: frame('tick', 9) },
+        { id: 3, callFrame: { ...frame('(idle)'), url: '' } },
+        { id: 4, callFrame: { ...frame('(garbage collector)'), url: '' } },
+        { id: 5, callFrame: { ...frame('(program)'), url: '' } },
+      ],
+      startTime: 1_000,
+      endTime: 12_000,
+      samples: [3, 4, 5, 2],
+      timeDeltas: [0, 4000, 1000, 1000],
+    }
+
+    // (idle) 4ms, GC 1ms, (program) 1ms, then tick until endTime: 5ms
+    const hotspots = summarizeCpuProfile(profile)
+    expect(hotspots.map((h) => [h.functionName, h.selfMs])).toEqual([['tick', 5]])
+    // Percent of busy (non-idle) time
+    expect(hotspots[0].selfPercent).toBeCloseTo((5 / 7) * 100)
+  })
+})
+
+describe('CpuProfiler', () => {
+  it('captures a profile of this process and writes it to a file', async () => {
+    const profiler = new CpuProfiler()
+    const file = path.join(os.tmpdir(), `cpu-profiler-test-${process.pid}.cpuprofile`)
+    await profiler.start(100)
+    expect(profiler.running).toBe(true)
+    await expect(profiler.start()).rejects.toThrow('ProfileAlreadyRunning')
+
+    let x = 0
+    const until = Date.now() + 50
+    while (Date.now() < until) x += Math.sqrt(x + 1)
+
+    const profile = await profiler.stop(file)
+    try {
+      expect(profiler.running).toBe(false)
+      expect(profile.samples!.length).toBeGreaterThan(0)
+      expect(JSON.parse(fs.readFileSync(file, 'utf8')).nodes.length).toBe(profile.nodes.length)
+    } finally {
+      fs.unlinkSync(file)
+    }
+    await expect(profiler.stop(file)).rejects.toThrow('ProfileNotRunning')
+  })
+})
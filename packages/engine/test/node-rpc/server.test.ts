@@ -0,0 +1,88 @@
+import { describe, it, expect, beforeEach, afterEach } from 'vitest'
+import * as http from 'http'
+import { HttpRpcServer } from '../../src/node-rpc/server'
+import { globalLogStore } from '../../src/logging/logger'
+
+function get(port: number, path: string): Promise<{ status: number; body: string }> {
+  return new Promise((resolve, reject) => {
+    http
+      .get({ port, path, agent: false }, (res) => {
+        let body = ''
+        res.on('data', (chunk) => (body += chunk))
+        res.on('end', () => resolve({ status: res.statusCode!, body }))
+      })
+      .on('error', reject)
+  })
+}
+
+describe('HttpRpcServer logs', () => {
+  let server: HttpRpcServer
+  let port: number
+
+  beforeEach(async () => {
+    server = new HttpRpcServer(0)
+    port = await server.start()
+  })
+
+  afterEach(async () => {
+    await server.stop()
+  })
+
+  it('rejects a malformed after cursor with 400', async () => {
+    const logs = await get(port, '/logs?after=abc')
+    expect(logs.status).toBe(400)
+    expect(JSON.parse(logs.body).error).toBe('InvalidParameter')
+
+    const stream = await get(port, '/logs/stream?after=12x')
+    expect(stream.status).toBe(400)
+
+    const ok = await get(port, `/logs?after=${globalLogStore.lastId}`)
+    expect(ok.status).toBe(200)
+  })
+
+  it('drops a stream client that stops reading', async () => {
+    let timer: ReturnType<typeof setTimeout> | undefined
+    const closed = new Promise<void>((resolve, reject) => {
+      const path = `/logs/stream?after=${globalLogStore.lastId}`
+      const req = http.get({ port, path, agent: false }, (res) => {
+        // Never read: the server must not buffer for this client without bound
+        res.pause()
+        res.on('close', () => resolve())
+        const message = 'x'.repeat(64 * 1024)
+        for (let i = 0; i < 200; i++) globalLogStore.add('info', message, [])
+      })
+      req.on('error', () => resolve())
+      timer = setTimeout(() => reject(new Error('client was not dropped')), 5000)
+    })
+    await closed
+    clearTimeout(timer)
+  })
+})
+
+describe('HttpRpcServer bandwidth history', () => {
+  let server: HttpRpcServer
+  let port: number
+
+  beforeEach(async () => {
+    server = new HttpRpcServer(0)
+    port = await server.start()
+  })
+
+  afterEach(async () => {
+    await server.stop()
+  })
+
+  it('rejects malformed parameters with 400', async () => {
+    for (const query of [
+      'from=abc',
+      'resolution=1s',
+      'resolution=-1000',
+      'category=nope',
+      'direction=sideways',
+    ]) {
+      const res = await get(port, `/engine/bandwidth-history?${query}`)
+      expect(res.status).toBe(400)
+      expect(JSON.parse(res.body).error).toBe('InvalidParameter')
+    }
+  })
+})
@@ -0,0 +1,47 @@
+import { describe, it, expect, afterEach } from 'vitest'
+import * as os from 'os'
+import * as path from 'path'
+import { BtEngine } from '../../src/core/bt-engine'
+import { createNodeEngine, NodeStorageMode } from '../../src/presets/node'
+import { ScopedNodeFileSystem, JsonFileSessionStore } from '../../src/adapters/node'
+import { InMemoryFileSystem, MemorySessionStore } from '../../src/adapters/memory'
+import { NullFileSystem } from '../../src/adapters/null'
+
+describe('createNodeEngine storage modes', () => {
+  const downloadPath = path.join(os.tmpdir(), `node-preset-test-${process.pid}`)
+  let engine: BtEngine | null = null
+
+  afterEach(async () => {
+    await engine?.destroy()
+    engine = null
+  })
+
+  const create = (storage?: NodeStorageMode) => {
+    engine = createNodeEngine({ downloadPath, storage, port: 0, startSuspended: true })
+    return engine
+  }
+
+  it('defaults to disk storage with a file session store', () => {
+    const e = create()
+    expect(e.storageRootManager.getFileSystemForTorrent('any')).toBeInstanceOf(ScopedNodeFileSystem)
+    expect(e.sessionPersistence.store).toBeInstanceOf(JsonFileSessionStore)
+  })
+
+  it('null and memory storage keep the session in memory', async () => {
+    const modes: [NodeStorageMode, unknown][] = [
+      ['null', NullFileSystem],
+      ['memory', InMemoryFileSystem],
+    ]
+    for (const [storage, fsClass] of modes) {
+      const e = create(storage)
+      expect(e.storageRootManager.getFileSystemForTorrent('any')).toBeInstanceOf(fsClass)
+      expect(e.sessionPersistence.store).toBeInstanceOf(MemorySessionStore)
+      await e.destroy()
+    }
+  })
+
+  it('rejects an unknown storage mode', () => {
+    expect(() => create('tape' as NodeStorageMode)).toThrow(/Unknown storage mode: tape/)
+    expect(engine).toBeNull()
+  })
+})
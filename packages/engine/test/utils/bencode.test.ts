@@ -35,4 +35,18 @@ describe('Bencode', () => {
     expect(decoded['baz']).toBe(42)
     expect(new TextDecoder().decode(decoded['foo'])).toBe('bar')
   })
+
+  it('should encode maps with byte-string keys in byte order', () => {
+    const val = new Map<Uint8Array | string, number>([
+      [new Uint8Array([0xff, 0x00]), 2],
+      ['a', 1],
+    ])
+    const encoded = Bencode.encode(val)
+    expect(Array.from(encoded)).toEqual([
+      ...new TextEncoder().encode('d1:ai1e2:'),
+      0xff,
+      0x00,
+      ...new TextEncoder().encode('i2ee'),
+    ])
+  })
 })
@@ -19,7 +19,7 @@ export class MockEngine implements ILoggingEngine {
 
   scopedLoggerFor(component: EngineComponent): Logger {
     return withScopeAndFiltering(component, this.filterFn, {
-      onCapture: (entry) => globalLogStore.add(entry.level, entry.message, entry.args),
+      onCapture: (entry) => globalLogStore.addEntry(entry),
     })
   }
 }
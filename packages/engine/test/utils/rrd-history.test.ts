@@ -49,4 +49,56 @@ describe('RrdHistory', () => {
     expect(rate).toBeGreaterThan(800)
     expect(rate).toBeLessThan(1200)
   })
+
+  describe('getSeries', () => {
+    const baseTime = 1000000
+
+    it('copies the retained buckets oldest first across the ring wrap', () => {
+      const rrd = new RrdHistory([{ bucketMs: 100, count: 5 }])
+      for (let i = 0; i < 8; i++) {
+        rrd.record(i + 1, baseTime + i * 100)
+      }
+
+      const series = rrd.getSeries(0, baseTime + 10_000, 100)
+      expect(series.bucketMs).toBe(100)
+      expect(series.startTime).toBe(baseTime + 300)
+      expect(Array.from(series.values)).toEqual([4, 5, 6, 7, 8])
+
+      // Same buckets as getSamples
+      const samples = rrd.getSamples(0, baseTime + 10_000)
+      const times = [0, 1, 2, 3, 4].map((i) => series.startTime + i * 100)
+      expect(samples.map((s) => s.time)).toEqual(times)
+      expect(samples.map((s) => s.value)).toEqual(Array.from(series.values))
+    })
+
+    it('clips to the requested range', () => {
+      const rrd = new RrdHistory([{ bucketMs: 100, count: 5 }])
+      for (let i = 0; i < 8; i++) {
+        rrd.record(i + 1, baseTime + i * 100)
+      }
+
+      const series = rrd.getSeries(baseTime + 450, baseTime + 650, 100)
+      expect(series.startTime).toBe(baseTime + 500)
+      expect(Array.from(series.values)).toEqual([6, 7])
+      expect(rrd.getSeries(baseTime + 5000, baseTime + 6000, 100).values).toHaveLength(0)
+    })
+
+    it('picks the finest tier at least as coarse as the resolution', () => {
+      const rrd = new RrdHistory([
+        { bucketMs: 100, count: 5 },
+        { bucketMs: 500, count: 5 },
+      ])
+      rrd.record(1, baseTime)
+
+      expect(rrd.getSeries(0, baseTime, 100).bucketMs).toBe(100)
+      expect(rrd.getSeries(0, baseTime, 200).bucketMs).toBe(500)
+      expect(rrd.getSeries(0, baseTime, 5000).bucketMs).toBe(500)
+    })
+
+    it('is empty before anything is recorded', () => {
+      const series = new RrdHistory([{ bucketMs: 100, count: 5 }]).getSeries(0, baseTime)
+      expect(series.startTime).toBe(0)
+      expect(series.values).toHaveLength(0)
+    })
+  })
 })
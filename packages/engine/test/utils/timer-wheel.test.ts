@@ -0,0 +1,94 @@
+import { describe, it, expect, beforeEach } from 'vitest'
+import { TimerWheel } from '../../src/utils/timer-wheel'
+
+describe('TimerWheel', () => {
+  let now: number
+  let wheel: TimerWheel
+
+  beforeEach(() => {
+    now = 1_000_000
+    wheel = new TimerWheel(100, 8, () => now)
+  })
+
+  it('fires a timeout once its deadline has passed', () => {
+    const fired: string[] = []
+    wheel.schedule(250, () => fired.push('a'))
+    wheel.schedule(50, () => fired.push('b'))
+
+    now += 100
+    expect(wheel.advance()).toBe(1)
+    expect(fired).toEqual(['b'])
+
+    now += 100
+    wheel.advance()
+    expect(fired).toEqual(['b'])
+
+    now += 100
+    wheel.advance()
+    expect(fired).toEqual(['b', 'a'])
+    expect(wheel.size).toBe(0)
+    wheel.clear()
+  })
+
+  it('does not fire cancelled timeouts', () => {
+    let fired = false
+    const id = wheel.schedule(100, () => (fired = true))
+    expect(wheel.cancel(id)).toBe(true)
+    expect(wheel.cancel(id)).toBe(false)
+
+    now += 1000
+    expect(wheel.advance()).toBe(0)
+    expect(fired).toBe(false)
+  })
+
+  it('keeps deadlines beyond one rotation until their turn', () => {
+    // 8 slots of 100ms: 2500ms wraps the wheel three times
+    let fired = false
+    wheel.schedule(2500, () => (fired = true))
+
+    for (let t = 0; t < 24; t++) {
+      now += 100
+      wheel.advance()
+    }
+    expect(fired).toBe(false)
+
+    now += 100
+    wheel.advance()
+    expect(fired).toBe(true)
+  })
+
+  it('fires everything due after a long gap', () => {
+    const fired: number[] = []
+    for (let i = 0; i < 20; i++) wheel.schedule(i * 150, () => fired.push(i))
+
+    now += 10_000
+    expect(wheel.advance()).toBe(20)
+    expect(fired.sort((a, b) => a - b)).toEqual(Array.from({ length: 20 }, (_, i) => i))
+  })
+
+  it('lets callbacks schedule and cancel other timeouts', () => {
+    const fired: string[] = []
+    let laterId = 0
+    wheel.schedule(100, () => {
+      fired.push('first')
+      wheel.cancel(laterId)
+      wheel.schedule(100, () => fired.push('rescheduled'))
+    })
+    laterId = wheel.schedule(150, () => fired.push('cancelled'))
+
+    now += 100
+    wheel.advance()
+    now += 200
+    wheel.advance()
+    expect(fired).toEqual(['first', 'rescheduled'])
+  })
+
+  it('runs its own timer while timeouts are pending', async () => {
+    const realWheel = new TimerWheel(10)
+    const fired = await new Promise<boolean>((resolve) => {
+      realWheel.schedule(25, () => resolve(true))
+    })
+    expect(fired).toBe(true)
+    expect(realWheel.size).toBe(0)
+  })
+})